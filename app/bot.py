@@ -74,11 +74,14 @@ from app.middlewares.display_name_restriction import DisplayNameRestrictionMiddl
 from app.middlewares.global_error import GlobalErrorMiddleware
 from app.middlewares.logging import LoggingMiddleware
 from app.middlewares.maintenance import MaintenanceMiddleware
+from app.middlewares.metrics import instrument_dispatcher
 from app.middlewares.subscription_checker import SubscriptionStatusMiddleware
 from app.middlewares.throttling import ThrottlingMiddleware
 from app.services.maintenance_service import maintenance_service
 from app.utils.cache import cache
+from app.utils.callback_index import install_callback_index, log_callback_index_report
 from app.utils.message_patch import patch_message_methods
+from app.utils.metrics import metrics
 
 
 patch_message_methods()
@@ -93,6 +96,66 @@ async def debug_callback_handler(callback: types.CallbackQuery):
     logger.info('Username', username=callback.from_user.username)
 
 
+def register_all_handlers(dp: Dispatcher) -> None:
+    """Регистрирует хендлеры всех разделов на корневом диспетчере (порядок важен)."""
+    start.register_handlers(dp)
+    menu.register_handlers(dp)
+    subscription.register_handlers(dp)
+    balance.register_balance_handlers(dp)
+    promocode.register_handlers(dp)
+    referral.register_handlers(dp)
+    support.register_handlers(dp)
+    server_status.register_handlers(dp)
+    tickets.register_handlers(dp)
+    admin_main.register_handlers(dp)
+    admin_users.register_handlers(dp)
+    admin_subscriptions.register_handlers(dp)
+    admin_servers.register_handlers(dp)
+    admin_promocodes.register_handlers(dp)
+    admin_messages.register_handlers(dp)
+    admin_monitoring.register_handlers(dp)
+    admin_referrals.register_handlers(dp)
+    admin_rules.register_handlers(dp)
+    admin_remnawave.register_handlers(dp)
+    admin_statistics.register_handlers(dp)
+    admin_polls.register_handlers(dp)
+    admin_promo_groups.register_handlers(dp)
+    admin_campaigns.register_handlers(dp)
+    admin_coupons.register_handlers(dp)
+    admin_contests.register_handlers(dp)
+    admin_daily_contests.register_handlers(dp)
+    admin_promo_offers.register_handlers(dp)
+    admin_maintenance.register_handlers(dp)
+    admin_user_messages.register_handlers(dp)
+    admin_updates.register_handlers(dp)
+    admin_backup.register_handlers(dp)
+    admin_system_logs.register_handlers(dp)
+    admin_welcome_text.register_welcome_text_handlers(dp)
+    admin_tickets.register_handlers(dp)
+    admin_reports.register_handlers(dp)
+    admin_bot_configuration.register_handlers(dp)
+    admin_pricing.register_handlers(dp)
+    admin_privacy_policy.register_handlers(dp)
+    admin_public_offer.register_handlers(dp)
+    admin_faq.register_handlers(dp)
+    admin_payments.register_handlers(dp)
+    admin_trials.register_handlers(dp)
+    admin_tariffs.register_handlers(dp)
+    admin_bulk_ban.register_bulk_ban_handlers(dp)
+    admin_blacklist.register_blacklist_handlers(dp)
+    admin_blocked_users.register_handlers(dp)
+    admin_required_channels.register_handlers(dp)
+    admin_quick_amounts.register_handlers(dp)
+    admin_overpay_certificate.register_handlers(dp)
+    register_channel_member_handlers(dp)
+    register_gift_activation_handlers(dp)
+    common.register_handlers(dp)
+    register_stars_handlers(dp)
+    user_contests.register_handlers(dp)
+    user_polls.register_handlers(dp)
+    simple_subscription.register_simple_subscription_handlers(dp)
+
+
 async def setup_bot() -> tuple[Bot, Dispatcher]:
     try:
         await cache.connect()
@@ -135,6 +198,7 @@ async def setup_bot() -> tuple[Bot, Dispatcher]:
         storage = MemoryStorage()
 
     dp = Dispatcher(storage=storage)
+    callback_observer = install_callback_index(dp)
 
     dp.message.middleware(ContextVarsMiddleware())
     dp.callback_query.middleware(ContextVarsMiddleware())
@@ -153,7 +217,7 @@ async def setup_bot() -> tuple[Bot, Dispatcher]:
     dp.message.middleware(blacklist_middleware)
     dp.callback_query.middleware(blacklist_middleware)
     dp.pre_checkout_query.middleware(blacklist_middleware)
-    throttling_middleware = ThrottlingMiddleware()
+    throttling_middleware = ThrottlingMiddleware(cost_weights=settings.get_throttling_cost_weights())
     dp.message.middleware(throttling_middleware)
     dp.callback_query.middleware(throttling_middleware)
 
@@ -180,62 +244,10 @@ async def setup_bot() -> tuple[Bot, Dispatcher]:
     dp.message.middleware(SubscriptionStatusMiddleware())
     dp.callback_query.middleware(SubscriptionStatusMiddleware())
     dp.pre_checkout_query.middleware(SubscriptionStatusMiddleware())
-    start.register_handlers(dp)
-    menu.register_handlers(dp)
-    subscription.register_handlers(dp)
-    balance.register_balance_handlers(dp)
-    promocode.register_handlers(dp)
-    referral.register_handlers(dp)
-    support.register_handlers(dp)
-    server_status.register_handlers(dp)
-    tickets.register_handlers(dp)
-    admin_main.register_handlers(dp)
-    admin_users.register_handlers(dp)
-    admin_subscriptions.register_handlers(dp)
-    admin_servers.register_handlers(dp)
-    admin_promocodes.register_handlers(dp)
-    admin_messages.register_handlers(dp)
-    admin_monitoring.register_handlers(dp)
-    admin_referrals.register_handlers(dp)
-    admin_rules.register_handlers(dp)
-    admin_remnawave.register_handlers(dp)
-    admin_statistics.register_handlers(dp)
-    admin_polls.register_handlers(dp)
-    admin_promo_groups.register_handlers(dp)
-    admin_campaigns.register_handlers(dp)
-    admin_coupons.register_handlers(dp)
-    admin_contests.register_handlers(dp)
-    admin_daily_contests.register_handlers(dp)
-    admin_promo_offers.register_handlers(dp)
-    admin_maintenance.register_handlers(dp)
-    admin_user_messages.register_handlers(dp)
-    admin_updates.register_handlers(dp)
-    admin_backup.register_handlers(dp)
-    admin_system_logs.register_handlers(dp)
-    admin_welcome_text.register_welcome_text_handlers(dp)
-    admin_tickets.register_handlers(dp)
-    admin_reports.register_handlers(dp)
-    admin_bot_configuration.register_handlers(dp)
-    admin_pricing.register_handlers(dp)
-    admin_privacy_policy.register_handlers(dp)
-    admin_public_offer.register_handlers(dp)
-    admin_faq.register_handlers(dp)
-    admin_payments.register_handlers(dp)
-    admin_trials.register_handlers(dp)
-    admin_tariffs.register_handlers(dp)
-    admin_bulk_ban.register_bulk_ban_handlers(dp)
-    admin_blacklist.register_blacklist_handlers(dp)
-    admin_blocked_users.register_handlers(dp)
-    admin_required_channels.register_handlers(dp)
-    admin_quick_amounts.register_handlers(dp)
-    admin_overpay_certificate.register_handlers(dp)
-    register_channel_member_handlers(dp)
-    register_gift_activation_handlers(dp)
-    common.register_handlers(dp)
-    register_stars_handlers(dp)
-    user_contests.register_handlers(dp)
-    user_polls.register_handlers(dp)
-    simple_subscription.register_simple_subscription_handlers(dp)
+    if metrics.enabled:
+        instrument_dispatcher(dp)
+    register_all_handlers(dp)
+    log_callback_index_report(callback_observer)
     logger.info('⭐ Зарегистрированы обработчики Telegram Stars платежей')
     logger.info('⚡ Зарегистрированы обработчики простой покупки')
     logger.info('⚡ Зарегистрированы обработчики простой подписки')
@@ -308,14 +320,7 @@ async def setup_bot() -> tuple[Bot, Dispatcher]:
 
 
 async def shutdown_bot():
-    try:
-        from app.services.remnawave_retry_queue import remnawave_retry_queue
-
-        await remnawave_retry_queue.stop()
-        logger.info('RemnaWave retry queue остановлен')
-    except Exception as e:
-        logger.error('Ошибка остановки RemnaWave retry queue', error=e)
-
+    # Очередь повторов RemnaWave останавливает main.py вместе с остальными фоновыми сервисами
     try:
         await maintenance_service.stop_monitoring()
         logger.info('Мониторинг техработ остановлен')
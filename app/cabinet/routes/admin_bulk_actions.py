@@ -1,12 +1,16 @@
 """Admin routes for bulk actions on users."""
 
+import asyncio
 import json
+from contextvars import ContextVar
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
+from typing import Any
 
 import structlog
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from fastapi.responses import StreamingResponse
-from sqlalchemy import delete as sa_delete, select
+from sqlalchemy import delete as sa_delete, insert, inspect as sa_inspect, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
@@ -15,12 +19,16 @@ from app.database.crud.subscription import (
     create_paid_subscription,
     extend_subscription,
     get_subscription_by_id,
+    get_subscriptions_by_ids,
     reactivate_subscription,
 )
 from app.database.crud.tariff import get_tariff_by_id
-from app.database.crud.user import add_user_balance, get_user_by_id
+from app.database.crud.user import add_user_balance, get_user_by_id, get_users_by_ids
 from app.database.crud.user_promo_group import sync_user_primary_promo_group
+from app.database.database import AsyncSessionLocal
 from app.database.models import (
+    BulkActionJob,
+    BulkActionJobResult,
     PaymentMethod,
     PromoGroup,
     Subscription,
@@ -39,6 +47,11 @@ from ..schemas.bulk_actions import (
     BulkActionType,
     BulkExecuteRequest,
     BulkExecuteResponse,
+    BulkJobCreateRequest,
+    BulkJobResponse,
+    BulkJobResultItem,
+    BulkJobResultsResponse,
+    BulkJobStatus,
     BulkSubscriptionInfo,
     BulkUserResult,
 )
@@ -117,6 +130,60 @@ def _resolve_subscription(user: User, override: Subscription | None = None) -> S
     return next((s for s in subs if s.is_active), subs[0] if subs else None)
 
 
+# ---------------------------------------------------------------------------
+# Panel sync (inline for /execute, deferred to a worker pool for jobs)
+# ---------------------------------------------------------------------------
+
+
+@dataclass(slots=True)
+class _PanelSyncRequest:
+    user_id: int
+    subscription_id: int
+    kwargs: dict[str, Any]
+    enable_user: bool = False
+
+
+# Set by the job runner while a chunk is processed: handlers then record the
+# panel updates here instead of calling the panel between DB mutations.
+_deferred_panel_syncs: ContextVar[list[_PanelSyncRequest] | None] = ContextVar(
+    'bulk_deferred_panel_syncs', default=None
+)
+
+
+async def _enable_panel_user(user: User, sub: Subscription) -> None:
+    panel_user_id = sub.remnawave_id if settings.is_multi_tariff_enabled() else getattr(user, 'remnawave_id', None)
+    if not panel_user_id or sub.status != 'active':
+        return
+    try:
+        from app.services.subscription_service import SubscriptionService
+
+        subscription_service = SubscriptionService()
+        await subscription_service.enable_remnawave_user(panel_user_id)
+    except Exception:
+        pass  # "User already enabled" is expected for active subscriptions
+
+
+async def _panel_sync(
+    db: AsyncSession,
+    user: User,
+    sub: Subscription,
+    *,
+    enable_user: bool = False,
+    **kwargs: Any,
+) -> dict | None:
+    deferred = _deferred_panel_syncs.get()
+    if deferred is not None:
+        deferred.append(
+            _PanelSyncRequest(user_id=user.id, subscription_id=sub.id, kwargs=kwargs, enable_user=enable_user)
+        )
+        return None
+
+    outcome = await _sync_subscription_to_panel(db, user, sub, **kwargs)
+    if enable_user:
+        await _enable_panel_user(user, sub)
+    return outcome
+
+
 # ---------------------------------------------------------------------------
 # Per-user action handlers
 # ---------------------------------------------------------------------------
@@ -144,7 +211,7 @@ async def _do_extend_subscription(
 
     await extend_subscription(db, sub, days)
     await db.refresh(sub)
-    await _sync_subscription_to_panel(db, user, sub)
+    await _panel_sync(db, user, sub)
 
     return BulkUserResult(
         user_id=user.id,
@@ -181,7 +248,7 @@ async def _do_cancel_subscription(
         sub.is_daily_paused = True
     await db.commit()
     await db.refresh(sub)
-    await _sync_subscription_to_panel(db, user, sub)
+    await _panel_sync(db, user, sub)
 
     return BulkUserResult(
         user_id=user.id,
@@ -229,7 +296,7 @@ async def _do_activate_subscription(
         sub.end_date = datetime.now(UTC) + timedelta(days=30)
     await db.commit()
     await db.refresh(sub)
-    await _sync_subscription_to_panel(db, user, sub)
+    await _panel_sync(db, user, sub)
 
     return BulkUserResult(
         user_id=user.id,
@@ -320,7 +387,7 @@ async def _do_change_tariff(
 
     # Sync to RemnaWave panel
     try:
-        await _sync_subscription_to_panel(
+        await _panel_sync(
             db,
             user,
             sub,
@@ -363,20 +430,8 @@ async def _do_add_traffic(
     await reactivate_subscription(db, sub)
     await db.refresh(sub)
 
-    await _sync_subscription_to_panel(db, user, sub)
-
-    # Explicitly enable user on panel (PATCH may not clear LIMITED status)
-    _enable_panel_user_id = (
-        sub.remnawave_id if settings.is_multi_tariff_enabled() else getattr(user, 'remnawave_id', None)
-    )
-    if _enable_panel_user_id and sub.status == 'active':
-        try:
-            from app.services.subscription_service import SubscriptionService
-
-            subscription_service = SubscriptionService()
-            await subscription_service.enable_remnawave_user(_enable_panel_user_id)
-        except Exception:
-            pass  # "User already enabled" is expected for active subscriptions
+    # Explicitly enable user on panel after sync (PATCH may not clear LIMITED status)
+    await _panel_sync(db, user, sub, enable_user=True)
 
     return BulkUserResult(
         user_id=user.id,
@@ -483,7 +538,7 @@ async def _do_set_devices(
     sub.device_limit = device_limit
     await db.commit()
     await db.refresh(sub)
-    await _sync_subscription_to_panel(db, user, sub)
+    await _panel_sync(db, user, sub)
 
     return BulkUserResult(
         user_id=user.id,
@@ -726,7 +781,7 @@ async def _do_grant_subscription(
 
     # Sync to RemnaWave panel
     try:
-        await _sync_subscription_to_panel(db, user, new_sub)
+        await _panel_sync(db, user, new_sub)
     except Exception as e:
         logger.error('Failed to sync new subscription with RemnaWave', user_id=user.id, error=e)
 
@@ -847,10 +902,16 @@ async def _execute_for_user(
     tariff: Tariff | None,
     dry_run: bool,
     admin_id: int = 0,
+    *,
+    user: User | None = None,
 ) -> BulkUserResult:
-    """Execute the bulk action for a single user.  Handles exceptions internally."""
+    """Execute the bulk action for a single user.  Handles exceptions internally.
+
+    *user* is the already loaded user (job runner prefetches whole chunks).
+    """
     try:
-        user = await get_user_by_id(db, uid)
+        if user is None:
+            user = await get_user_by_id(db, uid)
         if not user:
             return BulkUserResult(user_id=uid, success=False, message='User not found')
 
@@ -898,10 +959,16 @@ async def _execute_for_subscription(
     params: BulkActionParams,
     tariff: Tariff | None,
     dry_run: bool,
+    *,
+    sub: Subscription | None = None,
 ) -> BulkUserResult:
-    """Execute the bulk action for a single subscription.  Handles exceptions internally."""
+    """Execute the bulk action for a single subscription.  Handles exceptions internally.
+
+    *sub* is the already loaded subscription (job runner prefetches whole chunks).
+    """
     try:
-        sub = await get_subscription_by_id(db, sub_id)
+        if sub is None:
+            sub = await get_subscription_by_id(db, sub_id)
         if not sub:
             return BulkUserResult(user_id=0, subscription_id=sub_id, success=False, message='Subscription not found')
 
@@ -939,6 +1006,30 @@ async def _execute_for_subscription(
         return BulkUserResult(user_id=0, subscription_id=sub_id, success=False, message='Action failed: internal error')
 
 
+async def _check_request(db: AsyncSession, admin: User, request: BulkExecuteRequest) -> Tariff | None:
+    """Permission and target-mode checks shared by /execute and /jobs.  Returns the pre-loaded tariff."""
+    action = request.action
+
+    # Delete user requires elevated permission
+    if action == BulkActionType.DELETE_USER:
+        from app.services.permission_service import PermissionService
+
+        allowed, _ = await PermissionService.check_permission(db, admin, 'users:delete')
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail='Permission users:delete is required for this action',
+            )
+
+    if request.subscription_ids is not None and action in _USER_LEVEL_ACTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Action {action} operates on users, not subscriptions. Use user_ids instead.',
+        )
+
+    return await _validate_and_prepare(db, action, request.params)
+
+
 # ---------------------------------------------------------------------------
 # Endpoint
 # ---------------------------------------------------------------------------
@@ -961,27 +1052,10 @@ async def bulk_execute(
     params = request.params
     dry_run = request.dry_run
 
-    # Delete user requires elevated permission
-    if action == BulkActionType.DELETE_USER:
-        from app.services.permission_service import PermissionService
-
-        allowed, _ = await PermissionService.check_permission(db, admin, 'users:delete')
-        if not allowed:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail='Permission users:delete is required for this action',
-            )
-
     # Determine target mode: subscription_ids or user_ids
     use_subscription_ids = request.subscription_ids is not None
 
-    if use_subscription_ids and action in _USER_LEVEL_ACTIONS:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Action {action} operates on users, not subscriptions. Use user_ids instead.',
-        )
-
-    tariff = await _validate_and_prepare(db, action, params)
+    tariff = await _check_request(db, admin, request)
 
     if use_subscription_ids:
         sub_ids = list(dict.fromkeys(request.subscription_ids))
@@ -1202,3 +1276,591 @@ async def _stream_bulk_execute_subscriptions(
         'dry_run': dry_run,
     }
     yield f'data: {json.dumps(summary, ensure_ascii=False)}\n\n'
+
+
+# ---------------------------------------------------------------------------
+# Background jobs
+# ---------------------------------------------------------------------------
+
+_JOB_CHUNK_SIZE = 200
+_JOB_PANEL_CONCURRENCY = 8
+_JOB_EVENTS_POLL_SECONDS = 1.0
+# A running job without a heartbeat for this long lost its process (restart/crash)
+_JOB_STALE_AFTER = timedelta(minutes=10)
+
+_SKIP_MESSAGES = frozenset({'User not found', 'Subscription not found', 'User not found for subscription'})
+
+# Plain column updates: applied with one statement per chunk instead of per target
+_SET_BASED_ACTIONS = frozenset(
+    {
+        BulkActionType.CANCEL_SUBSCRIPTION,
+        BulkActionType.SET_DEVICES,
+        BulkActionType.ASSIGN_PROMO_GROUP,
+    }
+)
+
+# Strong refs to running jobs — asyncio.create_task may garbage-collect otherwise
+_running_jobs: dict[int, asyncio.Task] = {}
+
+
+def _is_skipped(result: BulkUserResult) -> bool:
+    return result.message in _SKIP_MESSAGES
+
+
+def _job_is_stale(job: BulkActionJob) -> bool:
+    if job.status not in (BulkJobStatus.QUEUED, BulkJobStatus.RUNNING) or job.id in _running_jobs:
+        return False
+    last_seen = job.heartbeat_at or job.started_at or job.created_at
+    return last_seen is None or datetime.now(UTC) - last_seen > _JOB_STALE_AFTER
+
+
+def _serialize_job(job: BulkActionJob) -> BulkJobResponse:
+    job_status = BulkJobStatus(job.status)
+    error = job.error
+    if _job_is_stale(job):
+        # Процесс, выполнявший задачу, перезапустился: обработанные чанки уже в БД
+        job_status = BulkJobStatus.FAILED
+        error = error or 'Job was interrupted by a restart'
+    return BulkJobResponse(
+        id=job.id,
+        action=job.action,
+        target_type=job.target_type,
+        status=job_status,
+        dry_run=job.dry_run,
+        total=job.total_count,
+        processed=job.processed_count,
+        success_count=job.success_count,
+        error_count=job.error_count,
+        skipped_count=job.skipped_count,
+        panel_error_count=job.panel_error_count,
+        error=error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        completed_at=job.completed_at,
+    )
+
+
+def _is_expired(obj: object | None) -> bool:
+    """True after a rollback: prefetched ORM objects must be reloaded before use."""
+    return obj is not None and bool(sa_inspect(obj).expired_attributes)
+
+
+async def _prefetch_targets(
+    db: AsyncSession, ids: list[int], use_subscription_ids: bool
+) -> dict[int, User] | dict[int, Subscription]:
+    if use_subscription_ids:
+        return await get_subscriptions_by_ids(db, ids)
+    return await get_users_by_ids(db, ids)
+
+
+async def _apply_per_target(
+    db: AsyncSession,
+    ids: list[int],
+    use_subscription_ids: bool,
+    action: BulkActionType,
+    params: BulkActionParams,
+    tariff: Tariff | None,
+    dry_run: bool,
+    admin_id: int,
+) -> list[BulkUserResult]:
+    """Runs the regular per-target handler on chunk-prefetched users/subscriptions."""
+    targets = await _prefetch_targets(db, ids, use_subscription_ids)
+    results: list[BulkUserResult] = []
+    for index, target_id in enumerate(ids):
+        target = targets.get(target_id)
+        if _is_expired(target):
+            # A failed target rolled the session back and expired everything it held
+            targets = await _prefetch_targets(db, ids[index:], use_subscription_ids)
+            target = targets.get(target_id)
+
+        if use_subscription_ids:
+            if target is None:
+                results.append(
+                    BulkUserResult(
+                        user_id=0, subscription_id=target_id, success=False, message='Subscription not found'
+                    )
+                )
+                continue
+            result = await _execute_for_subscription(db, target_id, action, params, tariff, dry_run, sub=target)
+        else:
+            if target is None:
+                results.append(BulkUserResult(user_id=target_id, success=False, message='User not found'))
+                continue
+            result = await _execute_for_user(
+                db, target_id, action, params, tariff, dry_run, admin_id=admin_id, user=target
+            )
+        results.append(result)
+    return results
+
+
+async def _apply_set_based(
+    db: AsyncSession,
+    ids: list[int],
+    use_subscription_ids: bool,
+    action: BulkActionType,
+    params: BulkActionParams,
+    dry_run: bool,
+) -> list[BulkUserResult]:
+    """Same outcome as the per-target handlers, but one UPDATE/INSERT per chunk."""
+    targets = await _prefetch_targets(db, ids, use_subscription_ids)
+    results: list[BulkUserResult] = []
+    resolved: list[tuple[BulkUserResult, User, Subscription | None]] = []
+
+    for target_id in ids:
+        target = targets.get(target_id)
+        if use_subscription_ids:
+            user = target.user if target is not None else None
+            if target is None or user is None:
+                message = 'Subscription not found' if target is None else 'User not found for subscription'
+                results.append(BulkUserResult(user_id=0, subscription_id=target_id, success=False, message=message))
+                continue
+            sub = target
+        else:
+            user = target
+            if user is None:
+                results.append(BulkUserResult(user_id=target_id, success=False, message='User not found'))
+                continue
+            sub = None if action == BulkActionType.ASSIGN_PROMO_GROUP else _resolve_subscription(user)
+
+        result = BulkUserResult(
+            user_id=user.id,
+            subscription_id=target_id if use_subscription_ids else None,
+            success=True,
+            message='',
+            username=user.username,
+        )
+        if action != BulkActionType.ASSIGN_PROMO_GROUP and sub is None:
+            result.success = False
+            result.message = 'No subscription found'
+        results.append(result)
+        if result.success:
+            resolved.append((result, user, sub))
+
+    now = datetime.now(UTC)
+    if action == BulkActionType.CANCEL_SUBSCRIPTION:
+        for result, _, _ in resolved:
+            result.message = 'Would cancel subscription' if dry_run else 'Subscription cancelled'
+        if not dry_run and resolved:
+            sub_ids = [sub.id for _, _, sub in resolved]
+            await db.execute(
+                update(Subscription)
+                .where(Subscription.id.in_(sub_ids))
+                .values(status=SubscriptionStatus.EXPIRED.value, end_date=now, grace_suppressed_until=now)
+                .execution_options(synchronize_session='evaluate')
+            )
+            # For daily tariffs: mark as paused to prevent auto-resume by DailySubscriptionService
+            daily_ids = [sub.id for _, _, sub in resolved if sub.tariff and getattr(sub.tariff, 'is_daily', False)]
+            if daily_ids:
+                await db.execute(
+                    update(Subscription)
+                    .where(Subscription.id.in_(daily_ids))
+                    .values(is_daily_paused=True)
+                    .execution_options(synchronize_session='evaluate')
+                )
+    elif action == BulkActionType.SET_DEVICES:
+        device_limit = params.device_limit
+        for result, _, _ in resolved:
+            result.message = f'Would set devices to {device_limit}' if dry_run else f'Set devices to {device_limit}'
+        if not dry_run and resolved:
+            await db.execute(
+                update(Subscription)
+                .where(Subscription.id.in_([sub.id for _, _, sub in resolved]))
+                .values(device_limit=device_limit)
+                .execution_options(synchronize_session='evaluate')
+            )
+    elif action == BulkActionType.ASSIGN_PROMO_GROUP:
+        promo_group_id = params.promo_group_id
+        for result, _, _ in resolved:
+            if dry_run:
+                result.message = (
+                    f'Would assign promo group {promo_group_id}' if promo_group_id else 'Would remove promo group'
+                )
+            else:
+                result.message = f'Promo group set to {promo_group_id}' if promo_group_id else 'Promo group removed'
+        if not dry_run and resolved:
+            user_ids = [user.id for _, user, _ in resolved]
+            await db.execute(sa_delete(UserPromoGroup).where(UserPromoGroup.user_id.in_(user_ids)))
+            if promo_group_id is not None:
+                await db.execute(
+                    insert(UserPromoGroup).values(
+                        [
+                            {'user_id': user_id, 'promo_group_id': promo_group_id, 'assigned_by': 'admin'}
+                            for user_id in user_ids
+                        ]
+                    )
+                )
+            # The only remaining group is the primary one (see sync_user_primary_promo_group)
+            changed_ids = [user.id for _, user, _ in resolved if user.promo_group_id != promo_group_id]
+            if changed_ids:
+                await db.execute(
+                    update(User)
+                    .where(User.id.in_(changed_ids))
+                    .values(promo_group_id=promo_group_id, updated_at=now)
+                    .execution_options(synchronize_session='evaluate')
+                )
+
+    if not dry_run:
+        await db.commit()
+        if action != BulkActionType.ASSIGN_PROMO_GROUP:
+            deferred = _deferred_panel_syncs.get()
+            for _, user, sub in resolved:
+                deferred.append(_PanelSyncRequest(user_id=user.id, subscription_id=sub.id, kwargs={}))
+
+    for result in results:
+        target = targets.get(result.subscription_id if use_subscription_ids else result.user_id)
+        if target is None:
+            continue
+        if use_subscription_ids:
+            result.subscriptions = _build_subscription_info([target])
+        else:
+            result.subscriptions = _build_subscription_info(getattr(target, 'subscriptions', None) or [])
+    return results
+
+
+async def _process_job_chunk(
+    ids: list[int],
+    use_subscription_ids: bool,
+    action: BulkActionType,
+    params: BulkActionParams,
+    tariff: Tariff | None,
+    dry_run: bool,
+    admin_id: int,
+) -> tuple[list[BulkUserResult], list[_PanelSyncRequest]]:
+    """DB phase of one chunk.  Panel updates are collected, not executed."""
+    panel_requests: list[_PanelSyncRequest] = []
+    token = _deferred_panel_syncs.set(panel_requests)
+    try:
+        async with AsyncSessionLocal() as db:
+            if action in _SET_BASED_ACTIONS:
+                try:
+                    results = await _apply_set_based(db, ids, use_subscription_ids, action, params, dry_run)
+                except Exception as exc:
+                    logger.error('Bulk job chunk failed', action=action, size=len(ids), error=str(exc))
+                    await db.rollback()
+                    panel_requests.clear()
+                    results = [
+                        BulkUserResult(
+                            user_id=0 if use_subscription_ids else target_id,
+                            subscription_id=target_id if use_subscription_ids else None,
+                            success=False,
+                            message='Action failed: internal error',
+                        )
+                        for target_id in ids
+                    ]
+            else:
+                results = await _apply_per_target(
+                    db, ids, use_subscription_ids, action, params, tariff, dry_run, admin_id
+                )
+    finally:
+        _deferred_panel_syncs.reset(token)
+    return results, panel_requests
+
+
+async def _run_panel_syncs(requests: list[_PanelSyncRequest], concurrency: int = _JOB_PANEL_CONCURRENCY) -> int:
+    """Sends collected panel updates through a bounded pool.  Returns the number of failures.
+
+    Requests are sharded by user: in single-tariff mode all subscriptions of a
+    user share one panel user, so they must not be synced concurrently.
+    """
+    if not requests:
+        return 0
+    workers = max(1, min(concurrency, len(requests)))
+    shards: list[list[_PanelSyncRequest]] = [[] for _ in range(workers)]
+    for request in requests:
+        shards[request.user_id % workers].append(request)
+
+    async def worker(shard: list[_PanelSyncRequest]) -> int:
+        failures = 0
+        ids = [request.subscription_id for request in shard]
+        async with AsyncSessionLocal() as db:
+            subs = await get_subscriptions_by_ids(db, ids)
+            for index, request in enumerate(shard):
+                sub = subs.get(request.subscription_id)
+                if _is_expired(sub):
+                    subs = await get_subscriptions_by_ids(db, ids[index:])
+                    sub = subs.get(request.subscription_id)
+                if sub is None or sub.user is None:
+                    continue  # deleted meanwhile
+                try:
+                    outcome = await _sync_subscription_to_panel(db, sub.user, sub, **request.kwargs)
+                    if request.enable_user:
+                        await _enable_panel_user(sub.user, sub)
+                except Exception as exc:
+                    outcome = {'error': str(exc)}
+                if outcome and outcome.get('error'):
+                    failures += 1
+                    logger.warning(
+                        'Bulk job panel sync failed',
+                        subscription_id=request.subscription_id,
+                        error=outcome['error'],
+                    )
+                    await db.rollback()
+        return failures
+
+    return sum(await asyncio.gather(*(worker(shard) for shard in shards if shard)))
+
+
+async def _finish_job(job_id: int, job_status: BulkJobStatus, error: str | None = None) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(BulkActionJob)
+            .where(BulkActionJob.id == job_id)
+            .values(status=job_status.value, error=error, completed_at=datetime.now(UTC))
+        )
+        await db.commit()
+
+
+async def _run_bulk_job(job_id: int) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            job = await db.get(BulkActionJob, job_id)
+            if job is None:
+                return
+            action = BulkActionType(job.action)
+            params = BulkActionParams(**job.params)
+            target_ids = list(job.target_ids)
+            use_subscription_ids = job.target_type == 'subscriptions'
+            dry_run = job.dry_run
+            admin_id = job.admin_id or 0
+            seq = job.processed_count
+
+            now = datetime.now(UTC)
+            job.status = BulkJobStatus.RUNNING.value
+            job.started_at = now
+            job.heartbeat_at = now
+            await db.commit()
+
+            tariff = await _validate_and_prepare(db, action, params)
+
+        for start in range(0, len(target_ids), _JOB_CHUNK_SIZE):
+            async with AsyncSessionLocal() as db:
+                if await db.scalar(select(BulkActionJob.cancel_requested).where(BulkActionJob.id == job_id)):
+                    await _finish_job(job_id, BulkJobStatus.CANCELLED)
+                    logger.info('Bulk job cancelled', job_id=job_id, processed=seq)
+                    return
+
+            chunk = target_ids[start : start + _JOB_CHUNK_SIZE]
+            results, panel_requests = await _process_job_chunk(
+                chunk, use_subscription_ids, action, params, tariff, dry_run, admin_id
+            )
+            panel_failures = await _run_panel_syncs(panel_requests)
+
+            skipped = sum(1 for result in results if _is_skipped(result))
+            succeeded = sum(1 for result in results if result.success and not _is_skipped(result))
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    insert(BulkActionJobResult).values(
+                        [
+                            {
+                                'job_id': job_id,
+                                'seq': seq + offset,
+                                'user_id': result.user_id,
+                                'subscription_id': result.subscription_id,
+                                'success': result.success,
+                                'message': result.message,
+                                'username': result.username,
+                                'subscriptions': (
+                                    [info.model_dump() for info in result.subscriptions]
+                                    if result.subscriptions is not None
+                                    else None
+                                ),
+                            }
+                            for offset, result in enumerate(results, start=1)
+                        ]
+                    )
+                )
+                await db.execute(
+                    update(BulkActionJob)
+                    .where(BulkActionJob.id == job_id)
+                    .values(
+                        processed_count=BulkActionJob.processed_count + len(results),
+                        success_count=BulkActionJob.success_count + succeeded,
+                        skipped_count=BulkActionJob.skipped_count + skipped,
+                        error_count=BulkActionJob.error_count + len(results) - succeeded - skipped,
+                        panel_error_count=BulkActionJob.panel_error_count + panel_failures,
+                        heartbeat_at=datetime.now(UTC),
+                    )
+                )
+                await db.commit()
+            seq += len(results)
+
+        await _finish_job(job_id, BulkJobStatus.COMPLETED)
+        logger.info('Bulk job completed', job_id=job_id, action=action, total=len(target_ids), dry_run=dry_run)
+    except asyncio.CancelledError:
+        await _finish_job(job_id, BulkJobStatus.CANCELLED, 'Stopped on shutdown')
+        raise
+    except Exception as exc:
+        detail = exc.detail if isinstance(exc, HTTPException) else 'internal error'
+        logger.exception('Bulk job failed', job_id=job_id, error=str(exc))
+        await _finish_job(job_id, BulkJobStatus.FAILED, str(detail))
+    finally:
+        _running_jobs.pop(job_id, None)
+
+
+def _start_job(job_id: int) -> None:
+    task = asyncio.create_task(_run_bulk_job(job_id), name=f'bulk-job-{job_id}')
+    _running_jobs[job_id] = task
+
+
+async def _get_job_or_404(db: AsyncSession, job_id: int) -> BulkActionJob:
+    job = await db.get(BulkActionJob, job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Job not found')
+    return job
+
+
+async def _load_job_results(db: AsyncSession, job_id: int, after: int, limit: int) -> list[BulkJobResultItem]:
+    rows = await db.scalars(
+        select(BulkActionJobResult)
+        .where(BulkActionJobResult.job_id == job_id, BulkActionJobResult.seq > after)
+        .order_by(BulkActionJobResult.seq)
+        .limit(limit)
+    )
+    return [
+        BulkJobResultItem(
+            seq=row.seq,
+            user_id=row.user_id,
+            subscription_id=row.subscription_id,
+            success=row.success,
+            message=row.message,
+            username=row.username,
+            subscriptions=row.subscriptions,
+        )
+        for row in rows
+    ]
+
+
+@router.post('/jobs', response_model=BulkJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_bulk_job(
+    request: BulkJobCreateRequest,
+    admin: User = Depends(require_permission('bulk_actions:execute')),
+    db: AsyncSession = Depends(get_cabinet_db),
+):
+    """Start a bulk action as a background job.
+
+    Targets are processed in chunks; progress is available via
+    ``GET /jobs/{id}``, ``GET /jobs/{id}/results`` and the resumable
+    ``GET /jobs/{id}/events`` SSE stream.
+    """
+    await _check_request(db, admin, request)
+
+    use_subscription_ids = request.subscription_ids is not None
+    target_ids = list(dict.fromkeys(request.subscription_ids if use_subscription_ids else request.user_ids))
+    job = BulkActionJob(
+        action=request.action.value,
+        target_type='subscriptions' if use_subscription_ids else 'users',
+        target_ids=target_ids,
+        params=request.params.model_dump(),
+        dry_run=request.dry_run,
+        status=BulkJobStatus.QUEUED.value,
+        total_count=len(target_ids),
+        admin_id=admin.id,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+
+    _start_job(job.id)
+    logger.info(
+        'Bulk job created',
+        job_id=job.id,
+        admin_id=admin.id,
+        action=request.action,
+        total=len(target_ids),
+        dry_run=request.dry_run,
+    )
+    return _serialize_job(job)
+
+
+@router.get('/jobs/{job_id}', response_model=BulkJobResponse)
+async def get_bulk_job(
+    job_id: int,
+    admin: User = Depends(require_permission('bulk_actions:read')),
+    db: AsyncSession = Depends(get_cabinet_db),
+):
+    return _serialize_job(await _get_job_or_404(db, job_id))
+
+
+@router.get('/jobs/{job_id}/results', response_model=BulkJobResultsResponse)
+async def get_bulk_job_results(
+    job_id: int,
+    after: int = Query(0, ge=0, description='Return results with seq greater than this'),
+    limit: int = Query(500, ge=1, le=2000),
+    admin: User = Depends(require_permission('bulk_actions:read')),
+    db: AsyncSession = Depends(get_cabinet_db),
+):
+    job = await _get_job_or_404(db, job_id)
+    results = await _load_job_results(db, job_id, after, limit)
+    return BulkJobResultsResponse(
+        job=_serialize_job(job),
+        results=results,
+        next_after=results[-1].seq if results else after,
+    )
+
+
+@router.post('/jobs/{job_id}/cancel', response_model=BulkJobResponse)
+async def cancel_bulk_job(
+    job_id: int,
+    admin: User = Depends(require_permission('bulk_actions:execute')),
+    db: AsyncSession = Depends(get_cabinet_db),
+):
+    """Stop the job after the chunk in progress."""
+    job = await _get_job_or_404(db, job_id)
+    if job.status in (BulkJobStatus.QUEUED, BulkJobStatus.RUNNING):
+        job.cancel_requested = True
+        await db.commit()
+    return _serialize_job(job)
+
+
+@router.get('/jobs/{job_id}/events')
+async def stream_bulk_job_events(
+    job_id: int,
+    after: int = Query(0, ge=0, description='Resume after this seq'),
+    last_event_id: int | None = Header(None, alias='Last-Event-ID'),
+    admin: User = Depends(require_permission('bulk_actions:read')),
+    db: AsyncSession = Depends(get_cabinet_db),
+):
+    """SSE progress of a job.  Every progress event carries ``id: <seq>``, so a
+    reconnecting EventSource resumes from ``Last-Event-ID`` without gaps.
+    """
+    await _get_job_or_404(db, job_id)
+    cursor = max(after, last_event_id or 0)
+    return StreamingResponse(_stream_job_events(job_id, cursor), media_type='text/event-stream')
+
+
+async def _stream_job_events(job_id: int, cursor: int):
+    while True:
+        # Short-lived sessions: the stream may stay open for minutes
+        async with AsyncSessionLocal() as db:
+            job = await db.get(BulkActionJob, job_id)
+            if job is None:
+                return
+            job_view = _serialize_job(job)
+            results = await _load_job_results(db, job_id, cursor, 500)
+
+        for result in results:
+            cursor = result.seq
+            progress = {
+                'type': 'progress',
+                'current': result.seq,
+                'total': job_view.total,
+                **result.model_dump(exclude={'seq'}),
+            }
+            yield f'id: {result.seq}\ndata: {json.dumps(progress, ensure_ascii=False)}\n\n'
+
+        if len(results) == 500:
+            continue
+        if job_view.status not in (BulkJobStatus.QUEUED, BulkJobStatus.RUNNING):
+            summary = {'type': 'complete', **job_view.model_dump(mode='json')}
+            yield f'data: {json.dumps(summary, ensure_ascii=False)}\n\n'
+            return
+        await asyncio.sleep(_JOB_EVENTS_POLL_SECONDS)
+
+
+async def stop_bulk_jobs() -> None:
+    """Cancels jobs running in this process (called on shutdown)."""
+    tasks = list(_running_jobs.values())
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import asyncio
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Any, ClassVar
 
@@ -10,13 +11,14 @@ import structlog
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel, Field, validator
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.crud.discount_offer import (
+    bulk_upsert_discount_offers,
     count_discount_offers,
     list_discount_offers,
-    upsert_discount_offer,
 )
 from app.database.crud.promo_offer_log import list_promo_offer_logs
 from app.database.crud.promo_offer_template import (
@@ -33,7 +35,12 @@ from app.database.models import (
     PromoOfferTemplate,
     User,
 )
-from app.handlers.admin.messages import get_custom_users, get_target_users, get_target_users_count
+from app.handlers.admin.messages import (
+    build_target_user_ids_query,
+    get_custom_users,
+    get_target_users,
+    get_target_users_count,
+)
 from app.services.broadcast_service import BroadcastConfig, broadcast_service
 from app.utils.miniapp_buttons import build_miniapp_or_callback_button
 
@@ -45,7 +52,7 @@ logger = structlog.get_logger(__name__)
 router = APIRouter(prefix='/admin/promo-offers', tags=['Admin Promo Offers'])
 
 # Broadcasts with more than this many recipients send notifications in the background so
-# the HTTP request returns before the proxy timeout (offers are committed per-recipient).
+# the HTTP request returns before the proxy timeout.
 _SYNC_NOTIFY_LIMIT = 30
 
 # Strong refs to detached notification fan-out tasks — asyncio.create_task may garbage
@@ -315,6 +322,54 @@ async def _resolve_target_users(db: AsyncSession, target: str) -> list[User]:
     return await get_target_users(db, normalized)
 
 
+@dataclass(frozen=True, slots=True)
+class _PromoRecipient:
+    """Scalar fields of a broadcast recipient — enough to create the offer and notify."""
+
+    id: int
+    telegram_id: int | None
+    email: str | None
+    email_verified: bool | None
+    language: str | None
+    first_name: str | None
+    username: str | None
+
+    @classmethod
+    def from_user(cls, user: User) -> _PromoRecipient:
+        return cls(
+            id=user.id,
+            telegram_id=user.telegram_id,
+            email=user.email,
+            email_verified=user.email_verified,
+            language=user.language,
+            first_name=user.first_name,
+            username=user.username,
+        )
+
+
+async def _resolve_target_recipients(db: AsyncSession, target: str) -> list[_PromoRecipient]:
+    """Resolve the segment in SQL and fetch only the columns the broadcast needs.
+
+    Segments without a SQL form fall back to loading users (``_resolve_target_users``).
+    """
+    ids_query = build_target_user_ids_query(target.strip().lower())
+    if ids_query is None:
+        return [_PromoRecipient.from_user(user) for user in await _resolve_target_users(db, target) if user and user.id]
+
+    result = await db.execute(
+        select(
+            User.id,
+            User.telegram_id,
+            User.email,
+            User.email_verified,
+            User.language,
+            User.first_name,
+            User.username,
+        ).where(User.id.in_(ids_query))
+    )
+    return [_PromoRecipient(*row) for row in result.all()]
+
+
 # Сегменты, доступные для рассылки промопредложений. Порядок задаёт порядок в кабинете.
 TARGET_SEGMENTS: tuple[str, ...] = (
     'all',
@@ -571,30 +626,16 @@ async def _send_promo_email_notifications(
     if not targets:
         return 0, 0
 
-    from app.services.promo_offer_email import send_promo_offer_email
-
-    # SMTP медленнее и капризнее Telegram — небольшой параллелизм
-    semaphore = asyncio.Semaphore(4)
+    from app.services.promo_offer_email import send_promo_offer_emails
 
-    async def send_single(email: str, language: str, username: str) -> bool:
-        async with semaphore:
-            try:
-                return await send_promo_offer_email(
-                    email=email,
-                    language=language,
-                    username=username,
-                    message_text=message_text,
-                    valid_hours=valid_hours,
-                    discount_percent=discount_percent,
-                    bonus_amount_kopeks=bonus_amount_kopeks,
-                )
-            except Exception as exc:
-                logger.warning('Не удалось отправить промо-письмо', email=email, exc=exc)
-                return False
-
-    results = await asyncio.gather(*(send_single(*target) for target in targets), return_exceptions=True)
-    sent = sum(1 for result in results if result is True)
-    return sent, len(targets) - sent
+    # Шаблон рендерится один раз на язык, письма уходят пачками через пул SMTP-соединений
+    return await send_promo_offer_emails(
+        targets,
+        message_text=message_text,
+        valid_hours=valid_hours,
+        discount_percent=discount_percent,
+        bonus_amount_kopeks=bonus_amount_kopeks,
+    )
 
 
 @router.post('/broadcast', response_model=PromoOfferBroadcastResponse, status_code=status.HTTP_201_CREATED)
@@ -604,12 +645,13 @@ async def broadcast_offer(
     db: AsyncSession = Depends(get_cabinet_db),
 ) -> PromoOfferBroadcastResponse:
     """Broadcast promo offer to users with optional Telegram notification."""
-    recipients: dict[int, User] = {}
+    recipients: dict[int, _PromoRecipient] = {}
 
     # Resolve target segment
     if payload.target:
-        users = await _resolve_target_users(db, payload.target)
-        recipients.update({user.id: user for user in users if user and user.id})
+        recipients.update(
+            {recipient.id: recipient for recipient in await _resolve_target_recipients(db, payload.target)}
+        )
 
     # Resolve specific user
     target_user_id = payload.user_id
@@ -643,7 +685,7 @@ async def broadcast_offer(
             user = await db.get(User, target_user_id)
         if not user:
             raise HTTPException(status.HTTP_404_NOT_FOUND, 'User not found')
-        recipients[target_user_id] = user
+        recipients[target_user_id] = _PromoRecipient.from_user(user)
 
     if not recipients:
         raise HTTPException(
@@ -651,30 +693,27 @@ async def broadcast_offer(
             'No recipients: specify target or user',
         )
 
-    # Create offers for all recipients and collect (user, offer) pairs
-    created_offers = 0
-    offers_to_notify: list[tuple[User, DiscountOffer]] = []
-
-    for recipient in recipients.values():
-        offer = await upsert_discount_offer(
-            db,
-            user_id=recipient.id,
-            subscription_id=None,
-            notification_type=payload.notification_type.strip(),
-            discount_percent=payload.discount_percent,
-            bonus_amount_kopeks=payload.bonus_amount_kopeks,
-            valid_hours=payload.valid_hours,
-            effect_type=payload.effect_type,
-            extra_data=payload.extra_data,
-        )
-        if offer:
-            created_offers += 1
-            offers_to_notify.append((recipient, offer))
+    # One UPDATE + one INSERT per chunk instead of SELECT/COMMIT/REFRESH per recipient
+    offer_ids = await bulk_upsert_discount_offers(
+        db,
+        user_ids=list(recipients),
+        subscription_id=None,
+        notification_type=payload.notification_type.strip(),
+        discount_percent=payload.discount_percent,
+        bonus_amount_kopeks=payload.bonus_amount_kopeks,
+        valid_hours=payload.valid_hours,
+        effect_type=payload.effect_type,
+        extra_data=payload.extra_data,
+    )
+    created_offers = len(offer_ids)
+    offers_to_notify = [
+        (recipient, offer_ids[user_id]) for user_id, recipient in recipients.items() if user_id in offer_ids
+    ]
 
-    # Reduce to plain (telegram_id, offer_id) so the fan-out can run detached: the
-    # request's DB session closes on return, and ORM objects would then fail to lazy-load.
+    # Plain (telegram_id, offer_id) pairs so the fan-out can run detached after the
+    # request's DB session closes.
     notify_targets = [
-        (recipient.telegram_id, offer.id) for recipient, offer in offers_to_notify if recipient.telegram_id
+        (recipient.telegram_id, offer_id) for recipient, offer_id in offers_to_notify if recipient.telegram_id
     ]
 
     # Email-only юзеры (без telegram_id): оффер у них уже создан выше, но о нём
@@ -683,7 +722,7 @@ async def broadcast_offer(
     # бежать detached после закрытия сессии запроса).
     email_targets = [
         (recipient.email, recipient.language or 'ru', recipient.first_name or recipient.username or '')
-        for recipient, _offer in offers_to_notify
+        for recipient, _offer_id in offers_to_notify
         if not recipient.telegram_id and recipient.email and recipient.email_verified
     ]
 
@@ -12,6 +12,7 @@ from sqlalchemy.orm import selectinload
 from app.cabinet.utils.device_ownership import verify_hwid_belongs_to_user
 from app.config import settings
 from app.database.crud.campaign import get_campaign_registration_by_user
+from app.database.crud.referral_contest import get_user_contest_ids, rebuild_contest_leaderboards
 from app.database.crud.subscription import (
     extend_subscription,
 )
@@ -19,14 +20,17 @@ from app.database.crud.tariff import get_tariff_by_id
 from app.database.crud.user import (
     add_user_balance,
     delete_user as soft_delete_user,
-    get_referrals,
+    get_referrals_page,
+    get_referrals_total,
     get_user_by_id,
     get_user_by_telegram_id,
-    get_users_count,
     get_users_list,
     get_users_spending_stats,
     get_users_statistics,
+    get_users_total,
+    referrals_next_cursor,
     subtract_user_balance,
+    users_next_cursor,
 )
 from app.database.crud.user_device_alias import (
     delete_alias,
@@ -61,6 +65,7 @@ from app.database.models import (
     WithdrawalRequest,
 )
 from app.services.permission_service import PermissionService
+from app.utils.pagination import InvalidCursorError, apply_keyset, count_total, keyset_cursor_for
 from app.utils.subscription_utils import coerce_panel_device_limit
 from app.utils.timezone import panel_datetime_to_utc
 
@@ -577,6 +582,8 @@ async def _sync_subscription_to_panel(
 async def list_users(
     offset: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, max_length=512),
+    estimate_total: bool = Query(False),
     search: str | None = Query(None, max_length=255),
     email: str | None = Query(None, max_length=255),
     status: UserStatusEnum | None = Query(None),
@@ -592,8 +599,10 @@ async def list_users(
     """
     Get paginated list of users with filtering and sorting.
 
-    - **offset**: Pagination offset
+    - **offset**: Pagination offset (ignored when `cursor` is given)
     - **limit**: Number of users per page (max 200)
+    - **cursor**: `next_cursor` from the previous page (not available for traffic/last_activity sorting)
+    - **estimate_total**: Return a planner/cached estimate instead of an exact total
     - **search**: Search by telegram_id, username, first_name, last_name
     - **email**: Search by email
     - **status**: Filter by user status (active, blocked, deleted)
@@ -619,27 +628,31 @@ async def list_users(
         except ValueError:
             tariff_ids = None
 
-    users = await get_users_list(
-        db=db,
-        offset=offset,
-        limit=limit,
-        search=search,
-        email=email,
-        status=user_status,
-        subscription_status=subscription_status,
-        tariff_ids=tariff_ids,
-        promo_group_id=promo_group_id,
-        campaign_id=campaign_id,
-        partner_id=partner_id,
-        order_by_balance=order_by_balance,
-        order_by_traffic=order_by_traffic,
-        order_by_last_activity=order_by_last_activity,
-        order_by_total_spent=order_by_total_spent,
-        order_by_purchase_count=order_by_purchase_count,
-    )
-
-    total = await get_users_count(
-        db=db,
+    try:
+        users = await get_users_list(
+            db=db,
+            offset=offset,
+            limit=limit,
+            search=search,
+            email=email,
+            status=user_status,
+            subscription_status=subscription_status,
+            tariff_ids=tariff_ids,
+            promo_group_id=promo_group_id,
+            campaign_id=campaign_id,
+            partner_id=partner_id,
+            order_by_balance=order_by_balance,
+            order_by_traffic=order_by_traffic,
+            order_by_last_activity=order_by_last_activity,
+            order_by_total_spent=order_by_total_spent,
+            order_by_purchase_count=order_by_purchase_count,
+            cursor=cursor,
+        )
+    except InvalidCursorError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error)) from error
+
+    total, total_is_estimate = await get_users_total(
+        db,
         status=user_status,
         search=search,
         email=email,
@@ -648,6 +661,7 @@ async def list_users(
         promo_group_id=promo_group_id,
         campaign_id=campaign_id,
         partner_id=partner_id,
+        estimate=estimate_total,
     )
 
     # Get spending stats for all users
@@ -661,6 +675,8 @@ async def list_users(
         total=total,
         offset=offset,
         limit=limit,
+        next_cursor=users_next_cursor(users, sort_by.value, limit),
+        total_is_estimate=total_is_estimate,
     )
 
 
@@ -850,8 +866,7 @@ async def get_user_detail(
         )
 
     # Get referrals count
-    referrals = await get_referrals(db, user.id)
-    referrals_count = len(referrals)
+    referrals_count, _ = await get_referrals_total(db, user.id)
 
     # Calculate total referral earnings (canonical source: ReferralEarning)
     referral_earnings_q = select(func.coalesce(func.sum(ReferralEarning.amount_kopeks), 0)).where(
@@ -2879,8 +2894,11 @@ async def delete_user(
                 status_code=status.HTTP_409_CONFLICT,
                 detail='Open grace access must be drained or restored before permanent deletion.',
             ) from error
-        # Hard delete
+        # Hard delete; contest events cascade away, so rebuild the affected leaderboards
+        contest_ids = await get_user_contest_ids(db, [user.id])
         await db.delete(user)
+        await db.flush()
+        await rebuild_contest_leaderboards(db, contest_ids, commit=False)
         await db.commit()
         action = 'permanently deleted'
 
@@ -3248,6 +3266,8 @@ async def get_user_referrals(
     user_id: int,
     offset: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, max_length=512),
+    estimate_total: bool = Query(False),
     admin: User = Depends(require_permission('users:read')),
     db: AsyncSession = Depends(get_cabinet_db),
 ):
@@ -3259,11 +3279,11 @@ async def get_user_referrals(
             detail='User not found',
         )
 
-    referrals = await get_referrals(db, user.id)
-
-    # Apply pagination manually
-    total = len(referrals)
-    referrals = referrals[offset : offset + limit]
+    try:
+        referrals = await get_referrals_page(db, user.id, limit=limit, offset=offset, cursor=cursor)
+    except InvalidCursorError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error)) from error
+    total, total_is_estimate = await get_referrals_total(db, user.id, estimate=estimate_total)
 
     # Get spending stats
     user_ids = [r.id for r in referrals]
@@ -3276,6 +3296,8 @@ async def get_user_referrals(
         total=total,
         offset=offset,
         limit=limit,
+        next_cursor=referrals_next_cursor(referrals, user.id, limit),
+        total_is_estimate=total_is_estimate,
     )
 
 
@@ -3288,6 +3310,8 @@ async def get_user_transactions(
     offset: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
     transaction_type: str | None = Query(None),
+    cursor: str | None = Query(None, max_length=512),
+    estimate_total: bool = Query(False),
     admin: User = Depends(require_permission('users:read')),
     db: AsyncSession = Depends(get_cabinet_db),
 ):
@@ -3304,16 +3328,24 @@ async def get_user_transactions(
     if transaction_type:
         query = query.where(Transaction.type == transaction_type)
 
-    # Get total count
-    count_query = select(func.count(Transaction.id)).where(Transaction.user_id == user.id)
-    if transaction_type:
-        count_query = count_query.where(Transaction.type == transaction_type)
-    total = (await db.execute(count_query)).scalar() or 0
+    total, total_is_estimate = await count_total(db, query.with_only_columns(Transaction.id), estimate=estimate_total)
 
     # Get transactions
-    query = query.order_by(Transaction.created_at.desc()).offset(offset).limit(limit)
-    result = await db.execute(query)
+    keyset_columns = (Transaction.created_at, Transaction.id)
+    keyset_scope = f'transactions:{user.id}:{transaction_type or ""}'
+    try:
+        query = apply_keyset(query, keyset_columns, cursor, scope=keyset_scope)
+    except InvalidCursorError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error)) from error
+    if cursor is None:
+        query = query.offset(offset)
+    result = await db.execute(query.limit(limit))
     transactions = result.scalars().all()
+    next_cursor = (
+        keyset_cursor_for(transactions[-1], keyset_columns, keyset_scope)
+        if transactions and len(transactions) == limit
+        else None
+    )
 
     _EXPENSE_TYPES = {
         TransactionType.WITHDRAWAL.value,
@@ -3340,6 +3372,8 @@ async def get_user_transactions(
         'total': total,
         'offset': offset,
         'limit': limit,
+        'next_cursor': next_cursor,
+        'total_is_estimate': total_is_estimate,
     }
 
 
@@ -34,6 +34,7 @@ from app.database.crud.user_device_alias import (
     set_alias,
 )
 from app.database.models import Subscription, TransactionType, User
+from app.services.hwid_device_cache import hwid_device_cache
 from app.services.subscription_service import SubscriptionService
 from app.services.user_cart_service import user_cart_service
 
@@ -896,9 +897,7 @@ async def get_devices(
     user: User = Depends(get_current_cabinet_user),
     db: AsyncSession = Depends(get_cabinet_db),
 ) -> dict[str, Any]:
-    """Get list of connected devices."""
-    from app.services.remnawave_service import RemnaWaveService
-
+    """Get list of connected devices (served from the webhook-maintained device cache)."""
     subscription = await resolve_subscription(db, user, subscription_id)
 
     if not subscription:
@@ -916,49 +915,7 @@ async def get_devices(
         }
 
     try:
-        service = RemnaWaveService()
-        async with service.get_api_client() as api:
-            response = await api.get_user_devices_all(_panel_user_id)
-
-            devices_list = response.get('devices', [])
-            # Подтягиваем все локальные alias'ы юзера одним запросом — дешевле
-            # чем N+1 при сборке списка устройств. Aliases декоративны: при
-            # сбое чтения возвращаем список без них, а не 500.
-            try:
-                aliases = await get_aliases_for_user(db, user.id)
-            except Exception as alias_error:
-                logger.warning(
-                    'Failed to load device aliases, falling back to defaults',
-                    user_id=user.id,
-                    error=str(alias_error)[:200],
-                )
-                aliases = {}
-
-            formatted_devices = []
-            for device in devices_list:
-                hwid = device.get('hwid') or device.get('deviceId') or device.get('id')
-                platform = device.get('platform') or device.get('platformType') or 'Unknown'
-                model = device.get('deviceModel') or device.get('model') or device.get('name') or 'Unknown'
-                created_at = device.get('updatedAt') or device.get('lastSeen') or device.get('createdAt')
-
-                formatted_devices.append(
-                    {
-                        'hwid': hwid,
-                        'platform': platform,
-                        'device_model': model,
-                        'created_at': created_at,
-                        # Локальное имя, заданное юзером. None — алиаса нет,
-                        # фронт фоллбэчит на platform/device_model.
-                        'local_name': aliases.get(hwid) or None,
-                    }
-                )
-
-            return {
-                'devices': formatted_devices,
-                'total': response.get('total', len(formatted_devices)),
-                'device_limit': subscription.device_limit or 0,
-            }
-
+        response = await hwid_device_cache.get_devices(_panel_user_id)
     except Exception as e:
         # Панель медленная/недоступна — деградируем мягко (пустой список) и логируем
         # WARNING, как соседние читатели устройств (device_ownership, miniapp), чтобы
@@ -970,6 +927,45 @@ async def get_devices(
             'device_limit': subscription.device_limit or 0,
         }
 
+    devices_list = response.get('devices', [])
+    # Подтягиваем все локальные alias'ы юзера одним запросом — дешевле
+    # чем N+1 при сборке списка устройств. Aliases декоративны: при
+    # сбое чтения возвращаем список без них, а не 500.
+    try:
+        aliases = await get_aliases_for_user(db, user.id)
+    except Exception as alias_error:
+        logger.warning(
+            'Failed to load device aliases, falling back to defaults',
+            user_id=user.id,
+            error=str(alias_error)[:200],
+        )
+        aliases = {}
+
+    formatted_devices = []
+    for device in devices_list:
+        hwid = device.get('hwid') or device.get('deviceId') or device.get('id')
+        platform = device.get('platform') or device.get('platformType') or 'Unknown'
+        model = device.get('deviceModel') or device.get('model') or device.get('name') or 'Unknown'
+        created_at = device.get('updatedAt') or device.get('lastSeen') or device.get('createdAt')
+
+        formatted_devices.append(
+            {
+                'hwid': hwid,
+                'platform': platform,
+                'device_model': model,
+                'created_at': created_at,
+                # Локальное имя, заданное юзером. None — алиаса нет,
+                # фронт фоллбэчит на platform/device_model.
+                'local_name': aliases.get(hwid) or None,
+            }
+        )
+
+    return {
+        'devices': formatted_devices,
+        'total': response.get('total', len(formatted_devices)),
+        'device_limit': subscription.device_limit or 0,
+    }
+
 
 class DeviceRenameRequest(BaseModel):
     """Payload for `PATCH /subscription/devices/{hwid}/name`.
@@ -1115,8 +1111,8 @@ async def delete_all_devices(
     try:
         service = RemnaWaveService()
         async with service.get_api_client() as api:
-            # Get all devices first
-            response = await api.get_user_devices_all(_panel_user_id)
+            # Удаляем по точному списку из панели, а не по кешу
+            response = await hwid_device_cache.get_devices(_panel_user_id, refresh=True)
 
             if not response:
                 return {
@@ -1170,8 +1166,6 @@ async def get_device_reduction_info(
     db: AsyncSession = Depends(get_cabinet_db),
 ) -> dict[str, Any]:
     """Get info about device limit reduction availability."""
-    from app.services.remnawave_service import RemnaWaveService
-
     subscription = await resolve_subscription(db, user, subscription_id)
 
     if not subscription:
@@ -1227,11 +1221,8 @@ async def get_device_reduction_info(
     _panel_user_id = _resolve_panel_user_id(subscription, user)
     if _panel_user_id:
         try:
-            service = RemnaWaveService()
-            async with service.get_api_client() as api:
-                response = await api.get_user_devices_all(_panel_user_id)
-                if response:
-                    connected_devices_count = response.get('total', 0)
+            response = await hwid_device_cache.get_devices(_panel_user_id)
+            connected_devices_count = response.get('total', 0)
         except Exception as e:
             logger.warning('Failed to get connected devices count (panel slow/unavailable)', error=str(e)[:200])
 
@@ -1325,7 +1316,8 @@ async def reduce_devices(
         try:
             service = RemnaWaveService()
             async with service.get_api_client() as api:
-                response = await api.get_user_devices_all(_panel_user_id)
+                # Удаляем по точному списку из панели, а не по кешу
+                response = await hwid_device_cache.get_devices(_panel_user_id, refresh=True)
                 if response:
                     devices_list = response.get('devices', [])
                     connected_devices_count = len(devices_list)
@@ -9,20 +9,23 @@ GET /subscription/app-config
 from __future__ import annotations
 
 import base64
+import hashlib
+import json
 import re
+from dataclasses import dataclass
 from datetime import UTC, datetime
 from typing import Any
 
 import structlog
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.database.crud.tariff import get_tariff_by_id
 from app.database.models import ServerSquad, User
-from app.services.remnawave_service import RemnaWaveService
-from app.services.system_settings_service import bot_configuration_service
+from app.services.app_config_cache import app_config_cache
+from app.services.happ_crypto_links import happ_crypto_link_filler
 
 from ...dependencies import get_cabinet_db, get_current_cabinet_user
 from ...schemas.subscription import (
@@ -222,14 +225,6 @@ async def get_happ_downloads(
 # ============ App Config for Connection ============
 
 
-def _get_remnawave_config_uuid() -> str | None:
-    """Get RemnaWave config UUID from system settings or env."""
-    try:
-        return bot_configuration_service.get_current_value('CABINET_REMNA_SUB_CONFIG')
-    except Exception:
-        return settings.CABINET_REMNA_SUB_CONFIG
-
-
 def _extract_scheme_from_buttons(buttons: list[dict[str, Any]]) -> tuple[str, bool]:
     """Extract URL scheme from buttons list.
 
@@ -309,48 +304,87 @@ def _get_url_scheme_for_app(app: dict[str, Any]) -> tuple[str, bool]:
     return '', False
 
 
-async def _load_app_config_async() -> dict[str, Any] | None:
-    """Load app config from RemnaWave API (if configured).
+_FALLBACK_PLATFORM_NAMES = {
+    'ios': {'en': 'iPhone/iPad'},
+    'android': {'en': 'Android'},
+    'macos': {'en': 'macOS'},
+    'windows': {'en': 'Windows'},
+    'linux': {'en': 'Linux'},
+    'androidTV': {'en': 'Android TV'},
+    'appleTV': {'en': 'Apple TV'},
+}
 
-    Returns None when no Remnawave config is set or API fails.
-    """
-    remnawave_uuid = _get_remnawave_config_uuid()
 
-    if remnawave_uuid:
-        try:
-            service = RemnaWaveService()
-            async with service.get_api_client() as api:
-                config = await api.get_subscription_page_config(remnawave_uuid)
-                if config and config.config:
-                    logger.debug('Loaded app config from RemnaWave', remnawave_uuid=remnawave_uuid)
-                    raw = dict(config.config)
-                    raw['_isRemnawave'] = True
-                    return raw
-        except Exception as e:
-            logger.warning('Failed to load RemnaWave config', error=e)
+@dataclass(slots=True, frozen=True)
+class _CompiledApp:
+    """App from the shared config with everything that doesn't depend on the user precomputed."""
 
-    return None
+    app: dict[str, Any]
+    scheme: str
+    uses_crypto: bool
+    # (block index, button index, template url) of subscriptionLink/copyButton buttons with templates
+    template_buttons: tuple[tuple[int, int, str], ...]
 
 
-def _create_deep_link(
-    app: dict[str, Any], subscription_url: str, subscription_crypto_link: str | None = None
-) -> str | None:
-    """Create deep link for app with subscription URL.
+@dataclass(slots=True, frozen=True)
+class _CompiledAppConfig:
+    platforms: dict[str, tuple[dict[str, Any], tuple[_CompiledApp, ...]]]
+    platform_names: dict[str, Any]
 
-    Uses urlScheme from RemnaWave config (e.g. "happ://add/", "v2rayng://install-config?url=")
-    combined with the appropriate payload URL.
 
-    Two Happ schemes exist in RemnaWave:
-      - happ://add/{{SUBSCRIPTION_LINK}}       -> uses plain subscription_url
-      - happ://crypt4/{{HAPP_CRYPT4_LINK}}     -> uses subscription_crypto_link
-    """
-    if not isinstance(app, dict):
-        return None
+def _compile_app(app: dict[str, Any]) -> _CompiledApp:
+    scheme, uses_crypto = _get_url_scheme_for_app(app)
+    template_buttons: list[tuple[int, int, str]] = []
+    for block_index, block in enumerate(app.get('blocks', [])):
+        if not isinstance(block, dict):
+            continue
+        for button_index, btn in enumerate(block.get('buttons', [])):
+            if not isinstance(btn, dict):
+                continue
+            # Resolve templates only for subscriptionLink and copyButton (not external)
+            if btn.get('type', '') in ('subscriptionLink', 'copyButton'):
+                url = btn.get('url', '') or btn.get('link', '')
+                if url and '{{' in url:
+                    template_buttons.append((block_index, button_index, url))
+    return _CompiledApp(app=app, scheme=scheme, uses_crypto=uses_crypto, template_buttons=tuple(template_buttons))
 
-    if not subscription_url and not subscription_crypto_link:
-        return None
 
-    scheme, uses_crypto = _get_url_scheme_for_app(app)
+def _compile_app_config(config: dict[str, Any]) -> _CompiledAppConfig:
+    """Parse URL schemes and button templates once per config version."""
+    raw_platforms = config.get('platforms', {})
+    if not isinstance(raw_platforms, dict):
+        raw_platforms = {}
+
+    # Build platformNames from displayName of each platform
+    platform_names: dict[str, Any] = {}
+    for pk, pd in raw_platforms.items():
+        if isinstance(pd, dict) and 'displayName' in pd:
+            platform_names[pk] = pd['displayName']
+    for k, v in _FALLBACK_PLATFORM_NAMES.items():
+        platform_names.setdefault(k, v)
+
+    platforms: dict[str, tuple[dict[str, Any], tuple[_CompiledApp, ...]]] = {}
+    for platform_key, platform_data in raw_platforms.items():
+        if not isinstance(platform_data, dict):
+            continue
+        apps = platform_data.get('apps', [])
+        if not isinstance(apps, list):
+            continue
+        compiled_apps = tuple(_compile_app(app) for app in apps if isinstance(app, dict))
+        if compiled_apps:
+            platform_output = {k: v for k, v in platform_data.items() if k != 'apps'}
+            platforms[platform_key] = (platform_output, compiled_apps)
+
+    return _CompiledAppConfig(platforms=platforms, platform_names=platform_names)
+
+
+def _build_deep_link(
+    app: dict[str, Any],
+    scheme: str,
+    uses_crypto: bool,
+    subscription_url: str | None,
+    subscription_crypto_link: str | None,
+) -> str | None:
     if not scheme:
         logger.debug('_create_deep_link: no urlScheme for app', get=app.get('name', 'unknown'))
         return None
@@ -386,6 +420,28 @@ def _create_deep_link(
     return f'{scheme}{payload}'
 
 
+def _create_deep_link(
+    app: dict[str, Any], subscription_url: str, subscription_crypto_link: str | None = None
+) -> str | None:
+    """Create deep link for app with subscription URL.
+
+    Uses urlScheme from RemnaWave config (e.g. "happ://add/", "v2rayng://install-config?url=")
+    combined with the appropriate payload URL.
+
+    Two Happ schemes exist in RemnaWave:
+      - happ://add/{{SUBSCRIPTION_LINK}}       -> uses plain subscription_url
+      - happ://crypt4/{{HAPP_CRYPT4_LINK}}     -> uses subscription_crypto_link
+    """
+    if not isinstance(app, dict):
+        return None
+
+    if not subscription_url and not subscription_crypto_link:
+        return None
+
+    scheme, uses_crypto = _get_url_scheme_for_app(app)
+    return _build_deep_link(app, scheme, uses_crypto, subscription_url, subscription_crypto_link)
+
+
 def _resolve_button_url(
     url: str,
     subscription_url: str | None,
@@ -414,13 +470,69 @@ def _resolve_button_url(
     return result
 
 
-@router.get('/app-config')
+def _render_app(
+    compiled: _CompiledApp,
+    subscription_url: str | None,
+    subscription_crypto_link: str | None,
+) -> dict[str, Any]:
+    """Copy of the shared app with deep link and resolved button URLs; the cached config is left untouched."""
+    app = dict(compiled.app)
+    deep_link = None
+    if subscription_url or subscription_crypto_link:
+        deep_link = _build_deep_link(
+            compiled.app, compiled.scheme, compiled.uses_crypto, subscription_url, subscription_crypto_link
+        )
+    app['deepLink'] = deep_link
+
+    if not compiled.template_buttons:
+        return app
+
+    blocks = list(app.get('blocks', []))
+    copied_blocks: set[int] = set()
+    for block_index, button_index, url in compiled.template_buttons:
+        resolved = _resolve_button_url(url, subscription_url, subscription_crypto_link)
+        # Only set resolvedUrl if ALL templates were resolved;
+        # otherwise let the frontend fall through to deepLink/subscriptionUrl
+        if '{{' in resolved:
+            continue
+        if block_index not in copied_blocks:
+            block = dict(blocks[block_index])
+            block['buttons'] = list(block.get('buttons', []))
+            blocks[block_index] = block
+            copied_blocks.add(block_index)
+        buttons = blocks[block_index]['buttons']
+        buttons[button_index] = {**buttons[button_index], 'resolvedUrl': resolved}
+
+    if copied_blocks:
+        app['blocks'] = blocks
+    return app
+
+
+def _app_config_etag(version: str, *parts: Any) -> str:
+    digest = hashlib.sha256(json.dumps([version, *parts], default=str).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix('W/') for candidate in if_none_match.split(',')}
+    return '*' in candidates or etag in candidates
+
+
+@router.get('/app-config', response_model=None)
 async def get_app_config(
+    request: Request,
+    response: Response,
     user: User = Depends(get_current_cabinet_user),
     db: AsyncSession = Depends(get_cabinet_db),
     subscription_id: int | None = Query(None, description='Subscription ID for multi-tariff'),
-) -> dict[str, Any]:
-    """Get app configuration for connection with deep links."""
+) -> dict[str, Any] | Response:
+    """Get app configuration for connection with deep links.
+
+    The config itself comes from the shared app-config cache; the response carries an
+    ``ETag`` over the config version and the user's links, so unchanged screens get 304.
+    """
     subscription = await resolve_subscription(db, user, subscription_id)
 
     subscription_url = None
@@ -429,101 +541,35 @@ async def get_app_config(
         subscription_url = subscription.subscription_url
         subscription_crypto_link = subscription.subscription_crypto_link
 
-    # Generate crypto link on the fly if subscription_url exists but crypto link is missing.
-    # This covers synced users where enrich_happ_links was not called.
-    if subscription_url and not subscription_crypto_link:
-        try:
-            service = RemnaWaveService()
-            async with service.get_api_client() as api:
-                encrypted = await api.encrypt_happ_crypto_link(subscription_url)
-                if encrypted:
-                    subscription_crypto_link = encrypted
-                    if subscription:
-                        subscription.subscription_crypto_link = encrypted
-                        await db.commit()
-                        logger.info(
-                            'Generated and saved crypto link for user',
-                            user_id=user.id,
-                        )
-        except Exception as e:
-            logger.debug('Could not generate crypto link', error=e)
-
-    config = await _load_app_config_async()
+    # Synced users may have no crypto link yet (enrich_happ_links was not called):
+    # generate it in the background, the next request will pick it up.
+    if subscription and subscription_url and not subscription_crypto_link:
+        happ_crypto_link_filler.schedule(subscription.id, subscription_url)
 
-    if not config:
+    entry = await app_config_cache.get()
+    if entry is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='App configuration not set up.',
         )
 
-    config.pop('_isRemnawave', None)
     hide_link = settings.should_hide_subscription_link()
+    etag = _app_config_etag(entry.version, subscription_url, subscription_crypto_link, hide_link)
+    cache_headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if _etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    response.headers.update(cache_headers)
 
-    # Build platformNames from displayName of each platform
-    platform_names: dict[str, Any] = {}
-    for pk, pd in config.get('platforms', {}).items():
-        if isinstance(pd, dict) and 'displayName' in pd:
-            platform_names[pk] = pd['displayName']
-    fallback_names = {
-        'ios': {'en': 'iPhone/iPad'},
-        'android': {'en': 'Android'},
-        'macos': {'en': 'macOS'},
-        'windows': {'en': 'Windows'},
-        'linux': {'en': 'Linux'},
-        'androidTV': {'en': 'Android TV'},
-        'appleTV': {'en': 'Apple TV'},
-    }
-    for k, v in fallback_names.items():
-        if k not in platform_names:
-            platform_names[k] = v
+    config = entry.config
+    compiled = entry.derive('cabinet.app_config', _compile_app_config)
 
     # Serve original blocks/svgLibrary enriched with deep links and resolved URLs.
     platforms: dict[str, Any] = {}
-    for platform_key, platform_data in config.get('platforms', {}).items():
-        if not isinstance(platform_data, dict):
-            continue
-        apps = platform_data.get('apps', [])
-        if not isinstance(apps, list):
-            continue
-
-        enriched_apps = []
-        for app in apps:
-            if not isinstance(app, dict):
-                continue
-
-            # Generate deep link
-            deep_link = None
-            if subscription_url or subscription_crypto_link:
-                deep_link = _create_deep_link(app, subscription_url, subscription_crypto_link)
-            app['deepLink'] = deep_link
-
-            # Resolve templates only for subscriptionLink and copyButton (not external)
-            for block in app.get('blocks', []):
-                if not isinstance(block, dict):
-                    continue
-                for btn in block.get('buttons', []):
-                    if not isinstance(btn, dict):
-                        continue
-                    btn_type = btn.get('type', '')
-                    if btn_type in ('subscriptionLink', 'copyButton'):
-                        url = btn.get('url', '') or btn.get('link', '')
-                        if url and '{{' in url:
-                            resolved = _resolve_button_url(
-                                url,
-                                subscription_url,
-                                subscription_crypto_link,
-                            )
-                            # Only set resolvedUrl if ALL templates were resolved;
-                            # otherwise let the frontend fall through to deepLink/subscriptionUrl
-                            if '{{' not in resolved:
-                                btn['resolvedUrl'] = resolved
-
-            enriched_apps.append(app)
-
-        if enriched_apps:
-            platform_output = {k: v for k, v in platform_data.items() if k != 'apps'}
-            platform_output['apps'] = enriched_apps
-            platforms[platform_key] = platform_output
+    for platform_key, (platform_data, apps) in compiled.platforms.items():
+        platforms[platform_key] = {
+            **platform_data,
+            'apps': [_render_app(app, subscription_url, subscription_crypto_link) for app in apps],
+        }
 
     return {
         'isRemnawave': True,
@@ -532,7 +578,7 @@ async def get_app_config(
         'baseTranslations': config.get('baseTranslations'),
         'baseSettings': config.get('baseSettings'),
         'uiConfig': config.get('uiConfig', {}),
-        'platformNames': platform_names,
+        'platformNames': compiled.platform_names,
         'hasSubscription': bool(subscription_url or subscription_crypto_link),
         'subscriptionUrl': subscription_url,
         'subscriptionCryptoLink': subscription_crypto_link,
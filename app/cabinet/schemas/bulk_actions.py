@@ -1,5 +1,6 @@
 """Schemas for admin bulk actions."""
 
+from datetime import datetime
 from enum import StrEnum
 
 from pydantic import BaseModel, Field, model_validator
@@ -76,3 +77,46 @@ class BulkExecuteResponse(BaseModel):
     skipped_count: int
     dry_run: bool
     results: list[BulkUserResult]
+
+
+class BulkJobStatus(StrEnum):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+
+class BulkJobCreateRequest(BulkExecuteRequest):
+    """Same as :class:`BulkExecuteRequest`, but the job runs in the background, so targets may be many."""
+
+    user_ids: list[int] | None = Field(None, min_length=1, max_length=50_000)
+    subscription_ids: list[int] | None = Field(None, min_length=1, max_length=50_000)
+
+
+class BulkJobResponse(BaseModel):
+    id: int
+    action: str
+    target_type: str
+    status: BulkJobStatus
+    dry_run: bool
+    total: int
+    processed: int
+    success_count: int
+    error_count: int
+    skipped_count: int
+    panel_error_count: int
+    error: str | None = None
+    created_at: datetime | None = None
+    started_at: datetime | None = None
+    completed_at: datetime | None = None
+
+
+class BulkJobResultItem(BulkUserResult):
+    seq: int
+
+
+class BulkJobResultsResponse(BaseModel):
+    job: BulkJobResponse
+    results: list[BulkJobResultItem]
+    next_after: int
@@ -153,6 +153,8 @@ class UsersListResponse(BaseModel):
     total: int
     offset: int = 0
     limit: int = 50
+    next_cursor: str | None = None
+    total_is_estimate: bool = False
 
 
 class UserByRemnawaveResponse(BaseModel):
@@ -0,0 +1,167 @@
+"""Async email dispatcher on top of the pooled ``EmailService``.
+
+Callers enqueue rendered emails into a bounded in-process queue and await the
+delivery result. A few workers drain the queue in batches: each batch is sent
+from one thread over pooled SMTP connections, so a mass mailing neither pays a
+TCP+TLS+AUTH round-trip per recipient nor spawns a thread per message.
+
+Per-domain limits (GCRA, same as the throttling middleware) keep a burst to a
+single provider (gmail.com, mail.ru, …) below its acceptance rate: each email
+gets a send-not-before deadline, which the sending thread honours.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+import structlog
+
+from app.utils.metrics import QUEUE_DEPTH, metrics
+
+from .email_service import EmailService, OutgoingEmail, email_service
+
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass(slots=True)
+class _QueuedEmail:
+    email: OutgoingEmail
+    future: asyncio.Future[bool]
+
+
+class DomainRateLimiter:
+    """GCRA per recipient domain: ``burst`` emails at once, then one per ``interval``."""
+
+    def __init__(self, interval: float, burst: int) -> None:
+        self.interval = interval
+        self.tolerance = interval * max(burst - 1, 0)
+        self._tats: dict[str, float] = {}
+
+    @staticmethod
+    def domain_of(address: str) -> str:
+        return address.rpartition('@')[2].strip().lower()
+
+    def reserve(self, address: str, now: float | None = None) -> float:
+        """Reserves a slot and returns the monotonic time the email may be sent at."""
+        now = time.monotonic() if now is None else now
+        domain = self.domain_of(address)
+        tat = max(self._tats.get(domain, now), now)
+        send_at = max(tat - self.tolerance, now)
+        self._tats[domain] = tat + self.interval
+        if len(self._tats) > 10_000:
+            self._tats = {key: value for key, value in self._tats.items() if value > now}
+        return send_at
+
+
+class EmailDispatcher:
+    """Bounded queue of outgoing emails drained by a small worker pool."""
+
+    def __init__(
+        self,
+        service: EmailService,
+        *,
+        workers: int = 4,
+        queue_size: int = 1000,
+        batch_size: int = 20,
+        domain_interval: float = 0.2,
+        domain_burst: int = 10,
+    ) -> None:
+        self.service = service
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.limiter = DomainRateLimiter(domain_interval, domain_burst)
+        self._queue: asyncio.Queue[_QueuedEmail] | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _ensure_started(self) -> asyncio.Queue[_QueuedEmail]:
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._tasks = [
+                asyncio.create_task(self._worker(self._queue), name=f'email-dispatcher-{index}')
+                for index in range(self.workers)
+            ]
+        return self._queue
+
+    async def enqueue(self, email: OutgoingEmail) -> asyncio.Future[bool]:
+        """Queues an email; waits for space when the queue is full (backpressure)."""
+        queue = self._ensure_started()
+        future: asyncio.Future[bool] = asyncio.get_running_loop().create_future()
+        await queue.put(_QueuedEmail(email, future))
+        return future
+
+    async def send(self, email: OutgoingEmail) -> bool:
+        return await (await self.enqueue(email))
+
+    async def send_many(self, emails: Sequence[OutgoingEmail]) -> list[bool]:
+        futures = [await self.enqueue(email) for email in emails]
+        return list(await asyncio.gather(*futures))
+
+    async def _worker(self, queue: asyncio.Queue[_QueuedEmail]) -> None:
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            emails = [item.email for item in batch]
+            not_before = [self.limiter.reserve(email.to_email) for email in emails]
+            sending = asyncio.ensure_future(asyncio.to_thread(self.service.send_batch, emails, not_before))
+            try:
+                # wait() не отменяет отправку вместе с воркером
+                await asyncio.wait((sending,))
+            except asyncio.CancelledError:
+                # Пачка уже передана потоку и может уйти после отмены воркера:
+                # ожидающим сообщаем его настоящий результат, а не отказ
+                sending.add_done_callback(lambda done, batch=batch: self._settle(queue, batch, done))
+                raise
+            self._settle(queue, batch, sending)
+
+    @staticmethod
+    def _settle(queue: asyncio.Queue[_QueuedEmail], batch: list[_QueuedEmail], sending: asyncio.Future) -> None:
+        results: list[bool] = [False] * len(batch)
+        if not sending.cancelled():
+            if sending.exception() is None:
+                results = sending.result()
+            else:
+                logger.error('Ошибка отправки пачки писем', count=len(batch), error=sending.exception())
+        for item, result in zip(batch, results, strict=True):
+            if not item.future.done():
+                item.future.set_result(bool(result))
+            queue.task_done()
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Lets queued emails go out (up to ``timeout``), then stops workers and closes connections."""
+        queue, tasks = self._queue, self._tasks
+        if queue is not None and self._loop is asyncio.get_running_loop():
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(queue.join(), timeout=timeout)
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError, RuntimeError):
+                await task
+        if queue is not None:
+            while not queue.empty():
+                item = queue.get_nowait()
+                if not item.future.done():
+                    item.future.set_result(False)
+        self._queue = None
+        self._tasks = []
+        self._loop = None
+        await asyncio.to_thread(self.service.pool.close_all)
+
+
+email_dispatcher = EmailDispatcher(email_service)
+metrics.add_collector('email_dispatcher', lambda: QUEUE_DEPTH.labels('email').set(email_dispatcher.queue_depth))
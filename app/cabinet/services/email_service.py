@@ -2,6 +2,11 @@
 
 import re
 import smtplib
+import threading
+import time
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from email import encoders
 from email.mime.base import MIMEBase
 from email.mime.multipart import MIMEMultipart
@@ -17,8 +22,148 @@ from app.config import settings
 logger = structlog.get_logger(__name__)
 
 
+@dataclass(slots=True)
+class OutgoingEmail:
+    """A rendered email ready for delivery."""
+
+    to_email: str
+    subject: str
+    body_html: str
+    body_text: str | None = None
+    attachments: list[tuple[str, bytes, str]] | None = None
+
+
+@dataclass(slots=True)
+class _PooledConnection:
+    smtp: smtplib.SMTP
+    signature: tuple
+    last_used: float = field(default_factory=time.monotonic)
+    sent: int = 0
+
+
+class SmtpConnectionPool:
+    """A small pool of authenticated SMTP connections shared between threads.
+
+    TCP connect, TLS handshake and AUTH happen once per connection instead of
+    once per message. A connection idle for longer than ``noop_after`` is probed
+    with NOOP before reuse; one idle for longer than ``max_idle`` (servers drop
+    those anyway), or one that has sent ``max_messages``, is closed. Changing
+    the SMTP settings invalidates the pool.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], smtplib.SMTP],
+        signature: Callable[[], tuple],
+        *,
+        max_size: int = 4,
+        noop_after: float = 10.0,
+        max_idle: float = 120.0,
+        max_messages: int = 200,
+        acquire_timeout: float = 60.0,
+    ) -> None:
+        self._factory = factory
+        self._signature = signature
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle: list[_PooledConnection] = []
+        self.noop_after = noop_after
+        self.max_idle = max_idle
+        self.max_messages = max_messages
+        self.acquire_timeout = acquire_timeout
+        self.opened = 0
+
+    @staticmethod
+    def _close(conn: _PooledConnection) -> None:
+        try:
+            conn.smtp.quit()
+        except Exception:
+            try:
+                conn.smtp.close()
+            except Exception:
+                pass
+
+    def _checkout(self) -> _PooledConnection:
+        signature = self._signature()
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                break
+            idle_for = time.monotonic() - conn.last_used
+            if conn.signature != signature or idle_for > self.max_idle:
+                self._close(conn)
+                continue
+            if idle_for > self.noop_after:
+                try:
+                    code, _ = conn.smtp.noop()
+                except Exception:
+                    code = 0
+                if code != 250:
+                    self._close(conn)
+                    continue
+            return conn
+
+        smtp = self._factory()
+        self.opened += 1
+        return _PooledConnection(smtp=smtp, signature=signature)
+
+    def _checkin(self, conn: _PooledConnection) -> None:
+        conn.last_used = time.monotonic()
+        if conn.sent >= self.max_messages or conn.signature != self._signature():
+            self._close(conn)
+            return
+        with self._lock:
+            self._idle.append(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[_PooledConnection]:
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError('No SMTP connection available')
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+            except (smtplib.SMTPServerDisconnected, OSError):
+                self._close(conn)
+                raise
+            except smtplib.SMTPException:
+                # Отказ по конкретному письму не ломает соединение, но транзакцию
+                # надо сбросить перед следующим MAIL FROM.
+                try:
+                    conn.smtp.rset()
+                except Exception:
+                    self._close(conn)
+                    raise
+                self._checkin(conn)
+                raise
+            except BaseException:
+                self._close(conn)
+                raise
+            else:
+                self._checkin(conn)
+        finally:
+            self._slots.release()
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._close(conn)
+
+
 class EmailService:
-    """Service for sending emails via SMTP."""
+    """Service for sending emails via SMTP.
+
+    Messages go through a shared ``SmtpConnectionPool``, so sync callers running
+    in threads reuse authenticated connections instead of opening one per send.
+    """
+
+    def __init__(self) -> None:
+        self.pool = SmtpConnectionPool(self._get_smtp_connection, self._connection_signature)
+
+    def _connection_signature(self) -> tuple:
+        return (self.host, self.port, self.user, self.password, self.use_ssl, self.use_tls)
 
     @property
     def host(self) -> str | None:
@@ -104,6 +249,99 @@ class EmailService:
 
         return smtp
 
+    def _build_message(self, email: OutgoingEmail) -> tuple[str, str, str] | None:
+        """Build the MIME message; returns ``(from, to, raw)`` or None if sending is impossible."""
+        if not self.is_configured():
+            logger.warning('SMTP is not configured, cannot send email')
+            return None
+
+        sender_email = self.from_email
+        if not sender_email or '@' not in sender_email:
+            logger.error('Invalid or missing SMTP from_email, cannot send email', from_email=sender_email)
+            return None
+
+        # Defensive: strip newlines to prevent header injection
+        to_email = email.to_email.strip().replace('\n', '').replace('\r', '')
+        subject = email.subject.replace('\n', '').replace('\r', '')
+        attachments = email.attachments
+
+        # С вложениями письмо становится multipart/mixed: внутри него
+        # обычная alternative-пара text/html плюс файлы.
+        alternative = MIMEMultipart('alternative')
+        msg = MIMEMultipart('mixed') if attachments else alternative
+        msg['Subject'] = subject
+        safe_from_name = self.from_name.replace('\n', '').replace('\r', '') if self.from_name else ''
+        safe_from_email = sender_email.replace('\n', '').replace('\r', '')
+        msg['From'] = formataddr((safe_from_name, safe_from_email))
+        msg['To'] = to_email
+        msg['Date'] = formatdate(localtime=False)
+        msg['Message-ID'] = make_msgid(domain=safe_from_email.split('@')[-1])
+
+        # Plain text version
+        body_text = email.body_text
+        if body_text is None:
+            body_text = self._html_to_plain_text(email.body_html)
+
+        part1 = MIMEText(body_text, 'plain', 'utf-8')
+        part2 = MIMEText(email.body_html, 'html', 'utf-8')
+
+        alternative.attach(part1)
+        alternative.attach(part2)
+
+        if attachments:
+            msg.attach(alternative)
+            for filename, content, mimetype in attachments:
+                maintype, _, subtype = (mimetype or 'application/octet-stream').partition('/')
+                attachment_part = MIMEBase(maintype or 'application', subtype or 'octet-stream')
+                attachment_part.set_payload(content)
+                encoders.encode_base64(attachment_part)
+                safe_filename = filename.replace('\n', '').replace('\r', '')
+                attachment_part.add_header('Content-Disposition', 'attachment', filename=safe_filename)
+                msg.attach(attachment_part)
+
+        return safe_from_email, to_email, msg.as_string()
+
+    def send_batch(self, emails: Sequence[OutgoingEmail], not_before: Sequence[float] | None = None) -> list[bool]:
+        """Send several emails over pooled connections (blocking, call from a thread).
+
+        ``not_before`` holds ``time.monotonic()`` deadlines, one per email, that
+        the sender waits for — this is how per-domain rate limits are applied.
+        A connection dropped by the server is replaced once per email.
+        """
+        results: list[bool] = []
+        for index, email in enumerate(emails):
+            if not_before is not None:
+                delay = not_before[index] - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            results.append(self._send_one(email))
+        return results
+
+    def _send_one(self, email: OutgoingEmail) -> bool:
+        try:
+            built = self._build_message(email)
+            if built is None:
+                return False
+            from_email, to_email, raw = built
+
+            for attempt in range(2):
+                try:
+                    with self.pool.connection() as conn:
+                        conn.smtp.sendmail(from_email, to_email, raw)
+                        conn.sent += 1
+                    break
+                except smtplib.SMTPServerDisconnected:
+                    # Сервер закрыл простаивавшее соединение между NOOP и отправкой
+                    if attempt:
+                        raise
+
+            logger.info('Email sent successfully to', to_email=to_email)
+            return True
+
+        except Exception as e:
+            logger.error('Failed to send email to', to_email=email.to_email, error=e)
+            return False
+
     def send_email(
         self,
         to_email: str,
@@ -125,62 +363,7 @@ class EmailService:
         Returns:
             True if email was sent successfully, False otherwise
         """
-        if not self.is_configured():
-            logger.warning('SMTP is not configured, cannot send email')
-            return False
-
-        sender_email = self.from_email
-        if not sender_email or '@' not in sender_email:
-            logger.error('Invalid or missing SMTP from_email, cannot send email', from_email=sender_email)
-            return False
-
-        # Defensive: strip newlines to prevent header injection
-        to_email = to_email.strip().replace('\n', '').replace('\r', '')
-        subject = subject.replace('\n', '').replace('\r', '')
-
-        try:
-            # С вложениями письмо становится multipart/mixed: внутри него
-            # обычная alternative-пара text/html плюс файлы.
-            alternative = MIMEMultipart('alternative')
-            msg = MIMEMultipart('mixed') if attachments else alternative
-            msg['Subject'] = subject
-            safe_from_name = self.from_name.replace('\n', '').replace('\r', '') if self.from_name else ''
-            safe_from_email = sender_email.replace('\n', '').replace('\r', '')
-            msg['From'] = formataddr((safe_from_name, safe_from_email))
-            msg['To'] = to_email
-            msg['Date'] = formatdate(localtime=False)
-            msg['Message-ID'] = make_msgid(domain=safe_from_email.split('@')[-1])
-
-            # Plain text version
-            if body_text is None:
-                body_text = self._html_to_plain_text(body_html)
-
-            part1 = MIMEText(body_text, 'plain', 'utf-8')
-            part2 = MIMEText(body_html, 'html', 'utf-8')
-
-            alternative.attach(part1)
-            alternative.attach(part2)
-
-            if attachments:
-                msg.attach(alternative)
-                for filename, content, mimetype in attachments:
-                    maintype, _, subtype = (mimetype or 'application/octet-stream').partition('/')
-                    attachment_part = MIMEBase(maintype or 'application', subtype or 'octet-stream')
-                    attachment_part.set_payload(content)
-                    encoders.encode_base64(attachment_part)
-                    safe_filename = filename.replace('\n', '').replace('\r', '')
-                    attachment_part.add_header('Content-Disposition', 'attachment', filename=safe_filename)
-                    msg.attach(attachment_part)
-
-            with self._get_smtp_connection() as smtp:
-                smtp.sendmail(safe_from_email, to_email, msg.as_string())
-
-            logger.info('Email sent successfully to', to_email=to_email)
-            return True
-
-        except Exception as e:
-            logger.error('Failed to send email to', to_email=to_email, error=e)
-            return False
+        return self._send_one(OutgoingEmail(to_email, subject, body_html, body_text, attachments))
 
     def _render_default_template(
         self,
@@ -19,6 +19,8 @@ import structlog
 
 from app.database.models import User
 from app.external.remnawave_api import RemnaWaveInvalidUserIdError
+from app.services.hwid_device_cache import device_hwid, hwid_device_cache
+from app.utils.cache import cache
 
 
 logger = structlog.get_logger(__name__)
@@ -43,6 +45,10 @@ def _collect_panel_user_ids(user: User) -> list[int]:
     return list(seen.keys())
 
 
+def _hwids(response: dict | None) -> set[str | None]:
+    return {device_hwid(d) for d in (response or {}).get('devices', [])}
+
+
 async def verify_hwid_belongs_to_user(user: User, hwid: str) -> bool:
     """Best-effort check that `hwid` is on one of the user's RemnaWave panels.
 
@@ -64,31 +70,28 @@ async def verify_hwid_belongs_to_user(user: User, hwid: str) -> bool:
     Returns False only when we successfully fetched ALL the panel's
     device lists and the hwid appeared in none of them.
     """
-    from app.services.remnawave_service import RemnaWaveService
 
     panel_user_ids = _collect_panel_user_ids(user)
     if not panel_user_ids:
         return False
 
     try:
-        service = RemnaWaveService()
-        async with service.get_api_client() as api:
-            for panel_user_id in panel_user_ids:
-                try:
-                    response = await api.get_user_devices_all(panel_user_id)
-                except RemnaWaveInvalidUserIdError as invalid_id_error:
-                    logger.warning(
-                        'Unusable panel user id during hwid validation, skipping',
-                        user_id=getattr(user, 'id', None),
-                        error=str(invalid_id_error)[:200],
-                    )
-                    continue
-                hwids_on_panel = {
-                    (d.get('hwid') or d.get('deviceId') or d.get('id')) for d in (response or {}).get('devices', [])
-                }
-                if hwid in hwids_on_panel:
-                    return True
-            return False
+        for panel_user_id in panel_user_ids:
+            try:
+                response = await hwid_device_cache.get_devices(panel_user_id)
+                if hwid not in _hwids(response) and cache.is_connected:
+                    # Устройство могло подключиться после заполнения кеша — сверяемся с панелью
+                    response = await hwid_device_cache.get_devices(panel_user_id, refresh=True)
+            except RemnaWaveInvalidUserIdError as invalid_id_error:
+                logger.warning(
+                    'Unusable panel user id during hwid validation, skipping',
+                    user_id=getattr(user, 'id', None),
+                    error=str(invalid_id_error)[:200],
+                )
+                continue
+            if hwid in _hwids(response):
+                return True
+        return False
     except Exception as remnawave_error:
         logger.warning(
             'RemnaWave unreachable during hwid validation, degrading open',
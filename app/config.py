@@ -142,7 +142,8 @@ class Settings(BaseSettings):
 
     # Настройки очереди чеков NaloGO
     NALOGO_QUEUE_CHECK_INTERVAL: int = 600  # Интервал проверки очереди (секунды, 10 мин)
-    NALOGO_QUEUE_RECEIPT_DELAY: int = 3  # Задержка между отправкой чеков (секунды)
+    NALOGO_QUEUE_RECEIPT_DELAY: int = 3  # Средний интервал между запросами к nalog.ru (секунды)
+    NALOGO_QUEUE_WORKERS: int = 3  # Параллельных воркеров отправки чеков из очереди
     NALOGO_QUEUE_MAX_ATTEMPTS: int = 72  # Максимум попыток отправки чека (72 × 10мин = 12 часов)
 
     ADMIN_REPORTS_ENABLED: bool = False
@@ -196,6 +197,12 @@ class Settings(BaseSettings):
     # явно нажал «Корзина сохранена → выбрать оплату» (return_to_cart). Иначе
     # пополнение ради подарка / просто денег не должно молча тратиться на подписку.
     CART_AUTOPURCHASE_INTENT_TTL_SECONDS: int = 1800  # 30 минут (хватает на оплату, но не на «забытую» корзину)
+    # Изменения настроек из админки рассылаются остальным процессам через Redis pub/sub;
+    # раз в N секунд процесс сверяет версию настроек, чтобы догнать пропущенные сообщения.
+    SYSTEM_SETTINGS_SYNC_INTERVAL: int = 30
+    # Формат значений в Redis-кеше: json (через orjson, если установлен) или msgpack
+    # (нужен пакет msgpack). Значения, записанные прежним JSON, читаются при любом формате.
+    CACHE_SERIALIZER: str = 'json'
 
     REMNAWAVE_API_URL: str | None = None
     REMNAWAVE_API_KEY: str | None = None
@@ -230,6 +237,9 @@ class Settings(BaseSettings):
     # mem-DoS при компрометации webhook-секрета). См. RemnaWaveWebhookService.
     REMNAWAVE_WEBHOOK_NODE_COALESCE_WINDOW_SECONDS: float = 10.0
     REMNAWAVE_WEBHOOK_NODE_BUFFER_MAX: int = 500
+    # Сколько воркеров параллельно разбирают очередь повторов операций в панели
+    # (remnawave_retry_queue). Операции одного пользователя всегда идут по порядку.
+    REMNAWAVE_RETRY_QUEUE_WORKERS: int = 4
 
     # Ограниченный grace-доступ для продления истёкшей подписки.
     # Режимы: false (выключено), observe (только журнал), true (активно),
@@ -245,6 +255,11 @@ class Settings(BaseSettings):
     GRACE_ACCESS_RECONCILE_INTERVAL_SECONDS: int = 60
     GRACE_ACCESS_RECONCILE_BATCH_SIZE: int = 200
     GRACE_ACCESS_CANDIDATE_LOOKBACK_MINUTES: int = 30
+    # Блокировка подписки на время grace-обработки берётся и в Redis, чтобы
+    # несколько реплик бота не трогали одну подписку одновременно. TTL аренды
+    # продлевается в фоне, пока держатель работает.
+    GRACE_ACCESS_REDIS_LOCK_ENABLED: bool = True
+    GRACE_ACCESS_LOCK_TTL_SECONDS: int = 30
 
     # Webhook user notification toggles (what Telegram messages users receive from webhook events)
     WEBHOOK_NOTIFY_USER_ENABLED: bool = True
@@ -305,6 +320,7 @@ class Settings(BaseSettings):
     SERVER_STATUS_METRICS_PASSWORD: str | None = None
     SERVER_STATUS_METRICS_VERIFY_SSL: bool = True
     SERVER_STATUS_REQUEST_TIMEOUT: int = 10
+    SERVER_STATUS_REFRESH_INTERVAL: int = 30
     SERVER_STATUS_ITEMS_PER_PAGE: int = 10
 
     BASE_SUBSCRIPTION_PRICE: int = 50000
@@ -337,6 +353,12 @@ class Settings(BaseSettings):
     BASE_PROMO_GROUP_PERIOD_DISCOUNTS_ENABLED: bool = False
     BASE_PROMO_GROUP_PERIOD_DISCOUNTS: str = ''
 
+    # Каталог цен (серверы, тарифы) в памяти процесса: PricingEngine считает цены без запросов в БД.
+    # Правки админки повышают версию в Redis, остальные процессы перечитывают каталог при смене версии.
+    PRICING_CATALOG_ENABLED: bool = True
+    PRICING_CATALOG_SYNC_INTERVAL: int = 5  # Как часто (сек) сверять версию каталога с Redis
+    PRICING_CATALOG_MAX_AGE: int = 300  # Полная перезагрузка каталога не реже, чем раз в N секунд
+
     # Режим выбора трафика:
     # - selectable: пользователь выбирает трафик при покупке и может докупать
     # - fixed: фиксированный лимит, без выбора и без докупки
@@ -414,6 +436,11 @@ class Settings(BaseSettings):
     BLACKLIST_UPDATE_INTERVAL_HOURS: int = 24
     BLACKLIST_IGNORE_ADMINS: bool = True
 
+    # Веса апдейтов для троттлинга: "префикс:вес" через запятую (callback_data или команда),
+    # например "admin_stats:4,/broadcast:5". После апдейта с весом N следующий
+    # допускается через N интервалов общего лимита.
+    THROTTLING_COST_WEIGHTS: str = ''
+
     DISPOSABLE_EMAIL_CHECK_ENABLED: bool = True
 
     # Настройки перевыпуска подписки (revoke + regenerate link)
@@ -460,6 +487,8 @@ class Settings(BaseSettings):
     # Настройки суточных подписок
     DAILY_SUBSCRIPTIONS_ENABLED: bool = True  # Включить автоматическое списание для суточных тарифов
     DAILY_SUBSCRIPTIONS_CHECK_INTERVAL_MINUTES: int = 30  # Интервал проверки в минутах
+    DAILY_SUBSCRIPTIONS_CHARGE_BATCH_SIZE: int = 500  # Подписок в одном пакетном списании
+    DAILY_SUBSCRIPTIONS_CONCURRENCY: int = 10  # Параллельных обновлений панели и уведомлений после списания
 
     AUTOPAY_WARNING_DAYS: str = '3,1'
 
@@ -486,6 +515,10 @@ class Settings(BaseSettings):
     SUBSCRIPTION_RENEWAL_BALANCE_THRESHOLD_KOPEKS: int = 20000
 
     MONITORING_INTERVAL: int = 60
+    # Планировщик истечения подписок спит до ближайшего end_date, но не дольше этого
+    # интервала (сек) — страховка, если end_date подписки сдвинули назад.
+    SUBSCRIPTION_EXPIRY_POLL_SECONDS: int = 30
+    SUBSCRIPTION_EXPIRY_BATCH_SIZE: int = 500  # Подписок в одном UPDATE при истечении
     # Жёсткий per-send таймаут (сек) на отправку уведомлений из MonitoringService.
     # Дефолтный session timeout aiogram = 60s; при медленном канале до Telegram
     # или недоступном получателе один send_photo/send_message блокирует ВЕСЬ хвост
@@ -590,6 +623,13 @@ class Settings(BaseSettings):
     SUPPORT_TOPUP_ENABLED: bool = True
     PAYMENT_VERIFICATION_AUTO_CHECK_ENABLED: bool = False
     PAYMENT_VERIFICATION_AUTO_CHECK_INTERVAL_MINUTES: int = 10
+    # Вебхуки провайдеров сохраняются в payment_webhook_inbox и подтверждаются сразу,
+    # зачисление выполняет фоновый воркер. false — обработка внутри запроса, как раньше.
+    PAYMENT_WEBHOOK_INBOX_ENABLED: bool = True
+    PAYMENT_WEBHOOK_INBOX_WORKERS: int = 8  # Параллельных воркеров (события одного платежа — по порядку)
+    PAYMENT_WEBHOOK_INBOX_MAX_ATTEMPTS: int = 10  # Попыток обработки до статуса failed
+    PAYMENT_WEBHOOK_INBOX_RETENTION_DAYS: int = 14  # Сколько хранить обработанные события
+    PAYMENT_WEBHOOK_INBOX_FAILED_RETENTION_DAYS: int = 90  # Сколько хранить failed-события для разбора
 
     NALOGO_ENABLED: bool = False
     NALOGO_INN: str | None = None
@@ -1064,6 +1104,12 @@ class Settings(BaseSettings):
     USER_ACTION_LOG_ENABLED: bool = True
     # Сколько дней хранить записи логов действий (0 = не чистить).
     USER_ACTION_LOG_RETENTION_DAYS: int = 90
+    # Записи лога копятся в памяти и пишутся пачками одним INSERT: раз в
+    # USER_ACTION_LOG_FLUSH_INTERVAL_MS или по накоплении USER_ACTION_LOG_BATCH_SIZE.
+    # При переполнении буфера (БД тормозит) новые записи отбрасываются.
+    USER_ACTION_LOG_FLUSH_INTERVAL_MS: int = 1000
+    USER_ACTION_LOG_BATCH_SIZE: int = 500
+    USER_ACTION_LOG_BUFFER_SIZE: int = 20000
     # Стиль кнопок Cabinet: primary (синий), success (зелёный), danger (красный), '' (по умолчанию для каждой секции)
     CABINET_BUTTON_STYLE: str = ''
     CONNECT_BUTTON_MODE: str = 'miniapp_subscription'
@@ -1093,6 +1139,10 @@ class Settings(BaseSettings):
     MINIAPP_SERVICE_NAME_RU: str = 'Bedolaga VPN'
     MINIAPP_SERVICE_DESCRIPTION_EN: str = 'Secure & Fast Connection'
     MINIAPP_SERVICE_DESCRIPTION_RU: str = 'Безопасное и быстрое подключение'
+    # Снимок трафика подписки старше этого возраста (сек) обновляется из панели в фоне
+    MINIAPP_USAGE_MAX_AGE_SECONDS: int = 300
+    # Бюджет (сек) на параллельную загрузку секций ответа /miniapp/subscription
+    MINIAPP_SECTIONS_BUDGET_SECONDS: float = 5.0
     CONNECT_BUTTON_HAPP_DOWNLOAD_ENABLED: bool = False
     HAPP_CRYPTOLINK_REDIRECT_TEMPLATE: str | None = None
     # Remnawave 2.8.0 удалил /api/system/tools/happ/encrypt — недостающие crypt-ссылки
@@ -1254,6 +1304,8 @@ class Settings(BaseSettings):
     WEB_API_TOKEN_HASH_ALGORITHM: str = 'sha256'
     WEB_API_TOKEN_HMAC_SECRET: str | None = None
     WEB_API_REQUEST_LOGGING: bool = True
+    # Встроенные метрики Prometheus (обработчики, HTTP, БД, Redis, панель); выдаются на /metrics Web API
+    METRICS_ENABLED: bool = True
     # Потолок ОДНОЙ операции ручного пополнения через POST /users/{id}/deposit.
     # Эндпоинт рассчитан на автоматизацию (AI-агент поддержки), поэтому у него есть
     # предохранитель: агент, ошибшийся на два нуля, упрётся в лимит, а не подарит
@@ -1399,6 +1451,7 @@ class Settings(BaseSettings):
         'GRACE_ACCESS_RECONCILE_INTERVAL_SECONDS',
         'GRACE_ACCESS_RECONCILE_BATCH_SIZE',
         'GRACE_ACCESS_CANDIDATE_LOOKBACK_MINUTES',
+        'GRACE_ACCESS_LOCK_TTL_SECONDS',
         mode='before',
     )
     @classmethod
@@ -3122,6 +3175,21 @@ class Settings(BaseSettings):
     def is_base_promo_group_period_discount_enabled(self) -> bool:
         return self.BASE_PROMO_GROUP_PERIOD_DISCOUNTS_ENABLED
 
+    def get_throttling_cost_weights(self) -> dict[str, float]:
+        weights: dict[str, float] = {}
+        for part in (self.THROTTLING_COST_WEIGHTS or '').split(','):
+            prefix, separator, weight_str = part.strip().rpartition(':')
+            prefix = prefix.strip()
+            if not separator or not prefix:
+                continue
+            try:
+                weight = float(weight_str.strip())
+            except ValueError:
+                continue
+            if weight > 0:
+                weights[prefix] = weight
+        return weights
+
     def get_base_promo_group_period_discounts(self) -> dict[int, int]:
         try:
             config_str = (self.BASE_PROMO_GROUP_PERIOD_DISCOUNTS or '').strip()
@@ -3601,6 +3669,18 @@ class Settings(BaseSettings):
     def get_server_status_request_timeout(self) -> int:
         return max(1, self.SERVER_STATUS_REQUEST_TIMEOUT)
 
+    def get_server_status_refresh_interval(self) -> int:
+        return max(5, self.SERVER_STATUS_REFRESH_INTERVAL)
+
+    def get_pricing_catalog_sync_interval(self) -> int:
+        return max(1, self.PRICING_CATALOG_SYNC_INTERVAL)
+
+    def get_pricing_catalog_max_age(self) -> int:
+        return max(self.get_pricing_catalog_sync_interval(), self.PRICING_CATALOG_MAX_AGE)
+
+    def get_system_settings_sync_interval(self) -> int:
+        return max(1, self.SYSTEM_SETTINGS_SYNC_INTERVAL)
+
     def is_web_api_enabled(self) -> bool:
         return bool(self.WEB_API_ENABLED)
 
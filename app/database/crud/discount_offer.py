@@ -3,11 +3,11 @@ from __future__ import annotations
 from datetime import UTC, datetime, timedelta
 
 import structlog
-from sqlalchemy import func, select
+from sqlalchemy import func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.database.crud.promo_offer_log import log_promo_offer_action
+from app.database.crud.promo_offer_log import log_promo_offer_action, log_promo_offer_actions_bulk
 from app.database.models import DiscountOffer
 
 
@@ -67,6 +67,74 @@ async def upsert_discount_offer(
     return offer
 
 
+async def bulk_upsert_discount_offers(
+    db: AsyncSession,
+    *,
+    user_ids: list[int],
+    subscription_id: int | None,
+    notification_type: str,
+    discount_percent: int,
+    bonus_amount_kopeks: int,
+    valid_hours: int,
+    effect_type: str = 'percent_discount',
+    extra_data: dict | None = None,
+    chunk_size: int = 1000,
+) -> dict[int, int]:
+    """Set-based ``upsert_discount_offer`` for many users; returns ``{user_id: offer_id}``.
+
+    Per chunk: one ``UPDATE ... RETURNING`` refreshes the latest active unclaimed
+    offer of each user, one multi-row ``INSERT ... RETURNING`` creates the rest.
+    Everything is committed once at the end.
+    """
+
+    expires_at = datetime.now(UTC) + timedelta(hours=valid_hours)
+    values = {
+        'subscription_id': subscription_id,
+        'discount_percent': discount_percent,
+        'bonus_amount_kopeks': bonus_amount_kopeks,
+        'expires_at': expires_at,
+        'effect_type': effect_type,
+        'extra_data': extra_data,
+    }
+    offer_ids: dict[int, int] = {}
+
+    unique_ids = list(dict.fromkeys(user_ids))
+    for start in range(0, len(unique_ids), chunk_size):
+        chunk = unique_ids[start : start + chunk_size]
+
+        latest_active = (
+            select(func.max(DiscountOffer.id))
+            .where(
+                DiscountOffer.user_id.in_(chunk),
+                DiscountOffer.notification_type == notification_type,
+                DiscountOffer.is_active == True,
+            )
+            .group_by(DiscountOffer.user_id)
+        )
+        updated = await db.execute(
+            update(DiscountOffer)
+            .where(DiscountOffer.id.in_(latest_active), DiscountOffer.claimed_at.is_(None))
+            .values(**values)
+            .returning(DiscountOffer.user_id, DiscountOffer.id)
+            .execution_options(synchronize_session=False)
+        )
+        offer_ids.update(updated.tuples().all())
+
+        missing = [user_id for user_id in chunk if user_id not in offer_ids]
+        if missing:
+            inserted = await db.execute(
+                insert(DiscountOffer).returning(DiscountOffer.user_id, DiscountOffer.id),
+                [
+                    {'user_id': user_id, 'notification_type': notification_type, 'is_active': True, **values}
+                    for user_id in missing
+                ],
+            )
+            offer_ids.update(inserted.tuples().all())
+
+    await db.commit()
+    return offer_ids
+
+
 async def get_offer_by_id(db: AsyncSession, offer_id: int) -> DiscountOffer | None:
     result = await db.execute(
         select(DiscountOffer)
@@ -192,58 +260,52 @@ async def mark_offer_claimed(
 async def deactivate_expired_offers(db: AsyncSession) -> int:
     now = datetime.now(UTC)
     result = await db.execute(
-        select(DiscountOffer).where(
+        update(DiscountOffer)
+        .where(
             DiscountOffer.is_active == True,
             DiscountOffer.expires_at < now,
         )
+        .values(is_active=False)
+        .returning(
+            DiscountOffer.id,
+            DiscountOffer.user_id,
+            DiscountOffer.notification_type,
+            DiscountOffer.discount_percent,
+            DiscountOffer.effect_type,
+        )
+        .execution_options(synchronize_session=False)
     )
-    offers = result.scalars().all()
-    if not offers:
+    expired = result.all()
+    if not expired:
         return 0
 
-    count = 0
-    log_payloads = []
-    for offer in offers:
-        offer.is_active = False
-        count += 1
-        log_payloads.append(
-            {
-                'user_id': offer.user_id,
-                'offer_id': offer.id,
-                'source': offer.notification_type,
-                'percent': offer.discount_percent,
-                'effect_type': offer.effect_type,
-            }
-        )
-
     await db.commit()
 
-    for payload in log_payloads:
-        if not payload.get('user_id'):
-            continue
+    log_entries = [
+        {
+            'user_id': row.user_id,
+            'offer_id': row.id,
+            'action': 'disabled',
+            'source': row.notification_type,
+            'percent': row.discount_percent,
+            'effect_type': row.effect_type,
+            'details': {'reason': 'offer_expired'},
+        }
+        for row in expired
+        if row.user_id
+    ]
+    try:
+        await log_promo_offer_actions_bulk(db, log_entries)
+    except Exception as exc:  # pragma: no cover - defensive logging
+        logger.warning('Failed to record promo offer disable logs', offers=len(log_entries), exc=exc)
         try:
-            await log_promo_offer_action(
-                db,
-                user_id=payload['user_id'],
-                offer_id=payload['offer_id'],
-                action='disabled',
-                source=payload.get('source'),
-                percent=payload.get('percent'),
-                effect_type=payload.get('effect_type'),
-                details={'reason': 'offer_expired'},
-            )
-        except Exception as exc:  # pragma: no cover - defensive logging
+            await db.rollback()
+        except Exception as rollback_error:  # pragma: no cover - defensive logging
             logger.warning(
-                'Failed to record promo offer disable log for offer', payload=payload.get('offer_id'), exc=exc
+                'Failed to rollback session after promo offer disable log failure', rollback_error=rollback_error
             )
-            try:
-                await db.rollback()
-            except Exception as rollback_error:  # pragma: no cover - defensive logging
-                logger.warning(
-                    'Failed to rollback session after promo offer disable log failure', rollback_error=rollback_error
-                )
-
-    return count
+
+    return len(expired)
 
 
 async def get_latest_claimed_offer_for_user(
@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.database.models import PromoGroup, Subscription, User, UserPromoGroup
+from app.services.pricing_catalog import commit_pricing_changes
 
 
 def _normalize_period_discounts(period_discounts: dict[int, int] | None) -> dict[int, int]:
@@ -239,7 +240,7 @@ async def delete_promo_group(db: AsyncSession, group: PromoGroup) -> bool:
             )
 
     await db.delete(group)
-    await db.commit()
+    await commit_pricing_changes(db)
 
     logger.info(
         'Промогруппа удалена, пользователи переведены в дефолтную',
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import structlog
-from sqlalchemy import func, select
+from sqlalchemy import func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -49,6 +49,39 @@ async def log_promo_offer_action(
     return entry
 
 
+async def log_promo_offer_actions_bulk(
+    db: AsyncSession,
+    entries: list[dict[str, object]],
+    *,
+    commit: bool = True,
+) -> int:
+    """Persist many log entries with one multi-row INSERT.
+
+    Each entry carries the keyword arguments of ``log_promo_offer_action``.
+    """
+
+    if not entries:
+        return 0
+
+    rows = [
+        {
+            'user_id': entry.get('user_id'),
+            'offer_id': entry.get('offer_id'),
+            'action': entry['action'],
+            'source': entry.get('source'),
+            'percent': entry.get('percent'),
+            'effect_type': entry.get('effect_type'),
+            'details': dict(entry.get('details') or {}),
+        }
+        for entry in entries
+    ]
+    await db.execute(insert(PromoOfferLog), rows)
+
+    if commit:
+        await db.commit()
+    return len(rows)
+
+
 async def list_promo_offer_logs(
     db: AsyncSession,
     offset: int = 0,
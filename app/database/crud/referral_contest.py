@@ -2,13 +2,16 @@ from collections.abc import Sequence
 from datetime import UTC, date, datetime, time, timedelta
 
 import structlog
-from sqlalchemy import and_, desc, func, select
+from sqlalchemy import and_, delete, desc, func, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.database.models import (
     ReferralContest,
     ReferralContestEvent,
+    ReferralContestScore,
     ReferralContestVirtualParticipant,
     Transaction,
     TransactionType,
@@ -97,10 +100,15 @@ async def update_referral_contest(
     contest: ReferralContest,
     **fields: object,
 ) -> ReferralContest:
+    window_changed = False
     for key, value in fields.items():
         if hasattr(contest, key):
+            window_changed |= key in {'start_at', 'end_at'} and getattr(contest, key) != value
             setattr(contest, key, value)
     await db.commit()
+    if window_changed:
+        # Лидерборд учитывает только события в границах конкурса
+        await rebuild_contest_leaderboard(db, contest.id)
     await db.refresh(contest)
     return contest
 
@@ -171,6 +179,7 @@ async def add_contest_event(
     if existing:
         # Обновляем amount_kopeks если повторная покупка (upsert)
         if amount_kopeks and existing.amount_kopeks != amount_kopeks:
+            await _apply_event_amount_change(db, existing, amount_kopeks)
             existing.amount_kopeks = amount_kopeks
             await db.commit()
             await db.refresh(existing)
@@ -185,11 +194,175 @@ async def add_contest_event(
         occurred_at=datetime.now(UTC),
     )
     db.add(event)
+    await _apply_new_event_score(db, event)
     await db.commit()
     await db.refresh(event)
     return event
 
 
+def _contest_end_bound(end_at: datetime) -> datetime:
+    # Полночный end_at означает «включительно весь день»
+    if end_at.hour == 0 and end_at.minute == 0 and end_at.second == 0:
+        return end_at.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return end_at
+
+
+async def _event_counts_in_contest(db: AsyncSession, contest_id: int, occurred_at: datetime) -> bool:
+    window = (
+        await db.execute(
+            select(ReferralContest.start_at, ReferralContest.end_at).where(ReferralContest.id == contest_id)
+        )
+    ).one_or_none()
+    if window is None:
+        return False
+    start_at, end_at = window
+    return start_at <= occurred_at <= _contest_end_bound(end_at)
+
+
+def _insert(db: AsyncSession):
+    return pg_insert if db.bind.dialect.name == 'postgresql' else sqlite_insert
+
+
+async def _apply_score_delta(
+    db: AsyncSession,
+    *,
+    contest_id: int,
+    referrer_id: int,
+    referral_count: int,
+    amount_kopeks: int,
+) -> None:
+    """Атомарно прибавляет дельту к счёту участника в текущей транзакции БД."""
+    stmt = _insert(db)(ReferralContestScore).values(
+        contest_id=contest_id,
+        referrer_id=referrer_id,
+        referral_count=referral_count,
+        total_amount_kopeks=amount_kopeks,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['contest_id', 'referrer_id'],
+        set_={
+            'referral_count': ReferralContestScore.referral_count + stmt.excluded.referral_count,
+            'total_amount_kopeks': ReferralContestScore.total_amount_kopeks + stmt.excluded.total_amount_kopeks,
+        },
+    )
+    await db.execute(stmt)
+
+
+async def _apply_new_event_score(db: AsyncSession, event: ReferralContestEvent) -> None:
+    if await _event_counts_in_contest(db, event.contest_id, event.occurred_at):
+        await _apply_score_delta(
+            db,
+            contest_id=event.contest_id,
+            referrer_id=event.referrer_id,
+            referral_count=1,
+            amount_kopeks=abs(event.amount_kopeks or 0),
+        )
+
+
+async def _apply_event_amount_change(db: AsyncSession, event: ReferralContestEvent, amount_kopeks: int) -> None:
+    delta = abs(amount_kopeks) - abs(event.amount_kopeks or 0)
+    if delta and await _event_counts_in_contest(db, event.contest_id, event.occurred_at):
+        await _apply_score_delta(
+            db,
+            contest_id=event.contest_id,
+            referrer_id=event.referrer_id,
+            referral_count=0,
+            amount_kopeks=delta,
+        )
+
+
+async def rebuild_contest_leaderboard(
+    db: AsyncSession,
+    contest_id: int,
+    *,
+    commit: bool = True,
+) -> int:
+    """Пересчитывает счёт участников конкурса из событий.
+
+    Сверка после массовых правок событий и изменения границ конкурса.
+    Возвращает число участников в лидерборде.
+    """
+    await db.execute(delete(ReferralContestScore).where(ReferralContestScore.contest_id == contest_id))
+
+    contest = (
+        await db.execute(
+            select(ReferralContest.start_at, ReferralContest.end_at).where(ReferralContest.id == contest_id)
+        )
+    ).one_or_none()
+    participants = 0
+    if contest is not None:
+        start_at, end_at = contest
+        result = await db.execute(
+            select(
+                ReferralContestEvent.referrer_id,
+                func.count(ReferralContestEvent.id),
+                func.coalesce(func.sum(func.abs(ReferralContestEvent.amount_kopeks)), 0),
+            )
+            .where(
+                and_(
+                    ReferralContestEvent.contest_id == contest_id,
+                    ReferralContestEvent.occurred_at >= start_at,
+                    ReferralContestEvent.occurred_at <= _contest_end_bound(end_at),
+                )
+            )
+            .group_by(ReferralContestEvent.referrer_id)
+        )
+        rows = [
+            {
+                'contest_id': contest_id,
+                'referrer_id': referrer_id,
+                'referral_count': int(count),
+                'total_amount_kopeks': int(amount),
+            }
+            for referrer_id, count, amount in result.all()
+        ]
+        if rows:
+            await db.execute(_insert(db)(ReferralContestScore), rows)
+        participants = len(rows)
+
+    if commit:
+        await db.commit()
+    else:
+        await db.flush()
+
+    logger.info('Лидерборд конкурса пересчитан', contest_id=contest_id, participants=participants)
+    return participants
+
+
+async def get_user_contest_ids(db: AsyncSession, user_ids: Sequence[int]) -> list[int]:
+    """Конкурсы, в событиях которых пользователи — рефереры или рефералы.
+
+    Снимается до мержа или удаления пользователей: после них события уже
+    переназначены или удалены каскадом, и затронутые конкурсы не найти.
+    """
+    if not user_ids:
+        return []
+    result = await db.execute(
+        select(ReferralContestEvent.contest_id)
+        .where(
+            or_(
+                ReferralContestEvent.referrer_id.in_(user_ids),
+                ReferralContestEvent.referral_id.in_(user_ids),
+            )
+        )
+        .distinct()
+    )
+    return sorted(result.scalars().all())
+
+
+async def rebuild_contest_leaderboards(
+    db: AsyncSession,
+    contest_ids: Sequence[int],
+    *,
+    commit: bool = True,
+) -> None:
+    """Пересчитывает лидерборды нескольких конкурсов одной транзакцией."""
+    for contest_id in contest_ids:
+        await rebuild_contest_leaderboard(db, contest_id, commit=False)
+    if commit and contest_ids:
+        await db.commit()
+
+
 async def get_contest_leaderboard(
     db: AsyncSession,
     contest_id: int,
@@ -199,40 +372,27 @@ async def get_contest_leaderboard(
     """Получить лидерборд конкурса.
 
     Учитывает только рефералов, зарегистрированных В ПЕРИОД конкурса.
+    Читается из ``referral_contest_scores`` по индексу, без агрегации событий.
     """
-    contest = await get_referral_contest(db, contest_id)
-    if not contest:
-        return []
-
-    # Нормализуем границы дат
-    contest_start = contest.start_at
-    contest_end = contest.end_at
-    if contest_end.hour == 0 and contest_end.minute == 0 and contest_end.second == 0:
-        contest_end = contest_end.replace(hour=23, minute=59, second=59, microsecond=999999)
-
     query = (
-        select(
-            User,
-            func.count(ReferralContestEvent.id).label('referral_count'),
-            func.coalesce(func.sum(func.abs(ReferralContestEvent.amount_kopeks)), 0).label('total_amount'),
-        )
-        .join(User, User.id == ReferralContestEvent.referrer_id)
+        select(User, ReferralContestScore.referral_count, ReferralContestScore.total_amount_kopeks)
+        .join(User, User.id == ReferralContestScore.referrer_id)
         .where(
             and_(
-                ReferralContestEvent.contest_id == contest_id,
-                ReferralContestEvent.occurred_at >= contest_start,
-                ReferralContestEvent.occurred_at <= contest_end,
+                ReferralContestScore.contest_id == contest_id,
+                ReferralContestScore.referral_count > 0,
             )
         )
-        .group_by(User.id)
-        .order_by(desc('referral_count'), desc('total_amount'), User.id)
+        .order_by(
+            desc(ReferralContestScore.referral_count),
+            desc(ReferralContestScore.total_amount_kopeks),
+            ReferralContestScore.referrer_id,
+        )
     )
     if limit:
         query = query.limit(limit)
     result = await db.execute(query)
-    leaderboard = result.all()
-
-    return leaderboard
+    return result.all()
 
 
 async def get_contest_participants(
@@ -243,30 +403,78 @@ async def get_contest_participants(
 
     Учитывает только рефералов, зарегистрированных В ПЕРИОД конкурса.
     """
-    contest = await get_referral_contest(db, contest_id)
-    if not contest:
-        return []
-
-    contest_start = contest.start_at
-    contest_end = contest.end_at
-    if contest_end.hour == 0 and contest_end.minute == 0 and contest_end.second == 0:
-        contest_end = contest_end.replace(hour=23, minute=59, second=59, microsecond=999999)
-
     result = await db.execute(
-        select(User, func.count(ReferralContestEvent.id).label('referral_count'))
-        .join(User, User.id == ReferralContestEvent.referrer_id)
+        select(User, ReferralContestScore.referral_count)
+        .join(User, User.id == ReferralContestScore.referrer_id)
         .where(
             and_(
-                ReferralContestEvent.contest_id == contest_id,
-                ReferralContestEvent.occurred_at >= contest_start,
-                ReferralContestEvent.occurred_at <= contest_end,
+                ReferralContestScore.contest_id == contest_id,
+                ReferralContestScore.referral_count > 0,
             )
         )
-        .group_by(User.id)
     )
     return result.all()
 
 
+async def get_contest_participants_count(db: AsyncSession, contest_id: int) -> int:
+    """Число реальных участников лидерборда (без виртуальных)."""
+    result = await db.execute(
+        select(func.count()).where(
+            and_(
+                ReferralContestScore.contest_id == contest_id,
+                ReferralContestScore.referral_count > 0,
+            )
+        )
+    )
+    return int(result.scalar_one())
+
+
+async def get_contest_rank(
+    db: AsyncSession,
+    contest_id: int,
+    referrer_id: int,
+) -> tuple[int, int, int] | None:
+    """Место участника в лидерборде (без виртуальных): ``(место, рефералы, сумма)``.
+
+    Считает участников впереди по индексу лидерборда, а не сортирует всех.
+    """
+    # Счёт меняется core-запросами в обход identity map, поэтому читаем колонки, а не db.get
+    score = (
+        await db.execute(
+            select(ReferralContestScore.referral_count, ReferralContestScore.total_amount_kopeks).where(
+                and_(
+                    ReferralContestScore.contest_id == contest_id,
+                    ReferralContestScore.referrer_id == referrer_id,
+                )
+            )
+        )
+    ).one_or_none()
+    if score is None or not score.referral_count:
+        return None
+
+    ahead = await db.execute(
+        select(func.count()).where(
+            and_(
+                ReferralContestScore.contest_id == contest_id,
+                or_(
+                    ReferralContestScore.referral_count > score.referral_count,
+                    and_(
+                        ReferralContestScore.referral_count == score.referral_count,
+                        or_(
+                            ReferralContestScore.total_amount_kopeks > score.total_amount_kopeks,
+                            and_(
+                                ReferralContestScore.total_amount_kopeks == score.total_amount_kopeks,
+                                ReferralContestScore.referrer_id < referrer_id,
+                            ),
+                        ),
+                    ),
+                ),
+            )
+        )
+    )
+    return int(ahead.scalar_one()) + 1, score.referral_count, score.total_amount_kopeks
+
+
 async def get_referrer_score(
     db: AsyncSession,
     contest_id: int,
@@ -518,6 +726,7 @@ async def upsert_contest_event(
     if existing:
         # Обновляем сумму если она изменилась
         if existing.amount_kopeks != amount_kopeks:
+            await _apply_event_amount_change(db, existing, amount_kopeks)
             existing.amount_kopeks = amount_kopeks
             await db.commit()
             await db.refresh(existing)
@@ -532,6 +741,7 @@ async def upsert_contest_event(
         occurred_at=datetime.now(UTC),
     )
     db.add(event)
+    await _apply_new_event_score(db, event)
     await db.commit()
     await db.refresh(event)
     return event, True
@@ -846,6 +1056,10 @@ async def sync_contest_events(
         else:
             stats['skipped'] += 1
 
+    # Суммы событий пересчитаны целиком — сверяем лидерборд с ними в той же транзакции
+    await db.flush()
+    await rebuild_contest_leaderboard(db, contest_id, commit=False)
+
     # Сохраняем изменения
     await db.commit()
 
@@ -916,12 +1130,11 @@ async def cleanup_invalid_contest_events(
     deleted = 0
     if invalid_event_ids:
         # Удаляем невалидные события
-        from sqlalchemy import delete as sql_delete
-
         delete_result = await db.execute(
-            sql_delete(ReferralContestEvent).where(ReferralContestEvent.id.in_(invalid_event_ids))
+            delete(ReferralContestEvent).where(ReferralContestEvent.id.in_(invalid_event_ids))
         )
         deleted = delete_result.rowcount
+        await rebuild_contest_leaderboard(db, contest_id, commit=False)
         await db.commit()
 
     # Считаем сколько осталось валидных событий
@@ -1022,8 +1235,9 @@ async def get_contest_leaderboard_with_virtual(
     """Лидерборд с виртуальными участниками.
 
     Возвращает список кортежей (display_name, referral_count, total_amount, is_virtual).
+    Для топ-N достаточно N лучших реальных участников: виртуальных немного, они добавляются все.
     """
-    real = await get_contest_leaderboard(db, contest_id)
+    real = await get_contest_leaderboard(db, contest_id, limit=limit)
     virtual = await list_virtual_participants(db, contest_id)
 
     merged: list[tuple[str, int, int, bool]] = []
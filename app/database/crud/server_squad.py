@@ -26,6 +26,7 @@ from app.database.models import (
     Tariff,
     User,
 )
+from app.services.pricing_catalog import SERVER_PRICE_FIELDS, commit_pricing_changes
 
 
 logger = structlog.get_logger(__name__)
@@ -89,7 +90,8 @@ async def create_server_squad(
     )
 
     db.add(server_squad)
-    await db.commit()
+    await commit_pricing_changes(db)
+
     await db.refresh(server_squad)
 
     logger.info('✅ Создан сервер', display_name=display_name, squad_uuid=squad_uuid)
@@ -248,7 +250,8 @@ async def update_server_squad_promo_groups(
         raise ValueError('Не найдены промогруппы для обновления сервера')
 
     server.allowed_promo_groups = promo_groups
-    await db.commit()
+    await commit_pricing_changes(db)
+
     await db.refresh(server)
 
     logger.info(
@@ -281,7 +284,7 @@ async def update_server_squad(db: AsyncSession, server_id: int, **updates) -> Se
 
     await db.execute(update(ServerSquad).where(ServerSquad.id == server_id).values(**filtered_updates))
 
-    await db.commit()
+    await commit_pricing_changes(db, changed=not SERVER_PRICE_FIELDS.isdisjoint(filtered_updates))
 
     return await get_server_squad_by_id(db, server_id)
 
@@ -301,7 +304,7 @@ async def delete_server_squad(db: AsyncSession, server_id: int) -> bool:
         return False
 
     await db.execute(delete(ServerSquad).where(ServerSquad.id == server_id))
-    await db.commit()
+    await commit_pricing_changes(db)
 
     logger.info('🗑️ Удален сервер', server_id=server_id)
     return True
@@ -426,7 +429,8 @@ async def sync_with_remnawave(db: AsyncSession, remnawave_squads: list[dict]) ->
         if cleaned_tariffs:
             logger.info('🧹 Обновлены тарифы после удаления серверов', cleaned_tariffs=cleaned_tariffs)
 
-    await db.commit()
+    # Новые серверы каталог уже получил через create_server_squad, переименования на цены не влияют
+    await commit_pricing_changes(db, changed=removed > 0)
 
     logger.info('🔄 Синхронизация завершена: + ~', created=created, updated=updated, removed=removed)
     return created, updated, removed
@@ -5,13 +5,14 @@ from collections.abc import Iterable
 from datetime import UTC, datetime, timedelta
 
 import structlog
-from sqlalchemy import and_, case, delete, func, select
+from sqlalchemy import and_, case, delete, func, select, update
 from sqlalchemy.exc import IntegrityError, InvalidRequestError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy.orm.exc import StaleDataError
 
 from app.config import settings
+from app.database.constants import POSTGRES_INT4_MAX, POSTGRES_INT4_MIN
 from app.database.crud.notification import clear_notifications
 from app.database.models import (
     Subscription,
@@ -21,6 +22,7 @@ from app.database.models import (
     Transaction,
     TransactionType,
     User,
+    UserPromoGroup,
     UserStatus,
 )
 from app.utils.timezone import format_local_datetime
@@ -1781,6 +1783,63 @@ async def get_expired_subscriptions(db: AsyncSession) -> list[Subscription]:
     return result.scalars().all()
 
 
+async def get_next_subscription_expiry_at(db: AsyncSession, *, after: datetime) -> datetime | None:
+    """Ближайший ``end_date`` активной подписки позже ``after`` — момент следующего истечения.
+
+    Читает один конец индекса ``ix_subscriptions_status_end_date``. Активные суточные
+    подписки не отфильтрованы: лишнее пробуждение планировщика дешевле join по тарифам.
+    """
+    return await db.scalar(
+        select(func.min(Subscription.end_date)).where(
+            Subscription.status == SubscriptionStatus.ACTIVE.value,
+            Subscription.end_date > after,
+        )
+    )
+
+
+async def expire_due_subscriptions(db: AsyncSession, *, now: datetime, limit: int) -> list[tuple[int, int]]:
+    """Переводит до ``limit`` просроченных подписок в EXPIRED одним ``UPDATE`` (без коммита).
+
+    Фильтр совпадает с ``get_expired_subscriptions``; дополнительно пропускаются подписки,
+    недавно обновлённые вебхуком (см. ``is_recently_updated_by_webhook``), — их заберёт
+    следующий проход. Строки, заблокированные продлением, пропускаются (``SKIP LOCKED``),
+    а повтор условия в самом ``UPDATE`` не даёт экспайрить уже продлённую подписку.
+    Возвращает пары ``(subscription_id, user_id)``.
+    """
+    due = (
+        select(Subscription.id)
+        .join(User, Subscription.user_id == User.id)
+        .outerjoin(Tariff, Subscription.tariff_id == Tariff.id)
+        .where(
+            Subscription.status == SubscriptionStatus.ACTIVE.value,
+            Subscription.end_date <= now,
+            User.status == UserStatus.ACTIVE.value,
+            # Не трогаем активные суточные подписки — ими управляет DailySubscriptionService
+            ~and_(
+                Tariff.is_daily.is_(True),
+                Subscription.is_daily_paused.is_(False),
+            ),
+            (Subscription.last_webhook_update_at.is_(None))
+            | (Subscription.last_webhook_update_at <= now - timedelta(seconds=_WEBHOOK_GUARD_SECONDS)),
+        )
+        .order_by(Subscription.end_date, Subscription.id)
+        .limit(limit)
+        .with_for_update(of=Subscription, skip_locked=True)
+    )
+    result = await db.execute(
+        update(Subscription)
+        .where(
+            Subscription.id.in_(due.scalar_subquery()),
+            Subscription.status == SubscriptionStatus.ACTIVE.value,
+            Subscription.end_date <= now,
+        )
+        .values(status=SubscriptionStatus.EXPIRED.value, updated_at=now)
+        .returning(Subscription.id, Subscription.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    return [(row.id, row.user_id) for row in result]
+
+
 async def get_subscriptions_for_autopay(db: AsyncSession) -> list[Subscription]:
     current_time = datetime.now(UTC)
 
@@ -2736,29 +2795,50 @@ async def activate_pending_trial_subscription(
 # ==================== СУТОЧНЫЕ ПОДПИСКИ ====================
 
 
-async def get_daily_subscriptions_for_charge(db: AsyncSession) -> list[Subscription]:
+def _daily_charge_load_options():
+    """Связи, которые читает суточное списание: тариф и промогруппы пользователя (скидка)."""
+    return (
+        selectinload(Subscription.tariff),
+        selectinload(Subscription.user).selectinload(User.user_promo_groups).selectinload(UserPromoGroup.promo_group),
+        selectinload(Subscription.user).selectinload(User.promo_group),
+    )
+
+
+def _keyset_page(query, after_id: int, limit: int | None):
+    query = query.where(Subscription.id > after_id).order_by(Subscription.id)
+    return query.limit(limit) if limit else query
+
+
+def daily_charge_due_clause(now: datetime | None = None):
+    """Подписка ждёт суточного списания: списания ещё не было или прошло более 24 часов."""
+    one_day_ago = (now or datetime.now(UTC)) - timedelta(hours=24)
+    return (Subscription.last_daily_charge_at.is_(None)) | (Subscription.last_daily_charge_at < one_day_ago)
+
+
+async def get_daily_subscriptions_for_charge(
+    db: AsyncSession,
+    *,
+    after_id: int = 0,
+    limit: int | None = None,
+) -> list[Subscription]:
     """
-    Получает все суточные подписки, которые нужно обработать для списания.
+    Получает суточные подписки, которые нужно обработать для списания.
 
     Критерии:
     - Тариф подписки суточный (is_daily=True)
     - Подписка активна
     - Подписка не приостановлена пользователем
     - Прошло более 24 часов с последнего списания (или списания ещё не было)
+
+    ``after_id``/``limit`` — keyset-пагинация по ``Subscription.id`` для пакетной обработки.
     """
     from app.database.models import Tariff
 
-    now = datetime.now(UTC)
-    one_day_ago = now - timedelta(hours=24)
-
     query = (
         select(Subscription)
         .join(Tariff, Subscription.tariff_id == Tariff.id)
         .join(User, Subscription.user_id == User.id)
-        .options(
-            selectinload(Subscription.user),
-            selectinload(Subscription.tariff),
-        )
+        .options(*_daily_charge_load_options())
         .where(
             and_(
                 Tariff.is_daily.is_(True),
@@ -2767,13 +2847,12 @@ async def get_daily_subscriptions_for_charge(db: AsyncSession) -> list[Subscript
                 User.status == UserStatus.ACTIVE.value,
                 Subscription.is_daily_paused.is_(False),
                 Subscription.is_trial.is_(False),  # Не списываем с триальных подписок
-                # Списания ещё не было ИЛИ прошло более 24 часов
-                ((Subscription.last_daily_charge_at.is_(None)) | (Subscription.last_daily_charge_at < one_day_ago)),
+                daily_charge_due_clause(),
             )
         )
     )
 
-    result = await db.execute(query)
+    result = await db.execute(_keyset_page(query, after_id, limit))
     subscriptions = result.scalars().all()
 
     logger.info('🔍 Найдено суточных подписок для списания', subscriptions_count=len(subscriptions))
@@ -2783,6 +2862,9 @@ async def get_daily_subscriptions_for_charge(db: AsyncSession) -> list[Subscript
 
 async def get_disabled_daily_subscriptions_for_resume(
     db: AsyncSession,
+    *,
+    after_id: int = 0,
+    limit: int | None = None,
 ) -> list[Subscription]:
     """
     Получает список DISABLED суточных подписок, которые можно возобновить.
@@ -2794,10 +2876,7 @@ async def get_disabled_daily_subscriptions_for_resume(
         select(Subscription)
         .join(Tariff, Subscription.tariff_id == Tariff.id)
         .join(User, Subscription.user_id == User.id)
-        .options(
-            selectinload(Subscription.user),
-            selectinload(Subscription.tariff),
-        )
+        .options(*_daily_charge_load_options())
         .where(
             and_(
                 Tariff.is_daily.is_(True),
@@ -2809,13 +2888,13 @@ async def get_disabled_daily_subscriptions_for_resume(
                 # is_(False) не ловит NULL, поэтому добавляем OR is_(None)
                 (Subscription.is_daily_paused.is_(False) | Subscription.is_daily_paused.is_(None)),
                 # Баланс пользователя > 0 (permissive pre-filter;
-                # actual discounted price check happens in _process_single_charge)
+                # точная проверка с учётом скидки — в пакетном списании)
                 User.balance_kopeks > 0,
             )
         )
     )
 
-    result = await db.execute(query)
+    result = await db.execute(_keyset_page(query, after_id, limit))
     subscriptions = result.scalars().all()
 
     logger.info('🔍 Найдено DISABLED суточных подписок для возобновления', subscriptions_count=len(subscriptions))
@@ -2823,7 +2902,12 @@ async def get_disabled_daily_subscriptions_for_resume(
     return list(subscriptions)
 
 
-async def get_expired_daily_subscriptions_for_recovery(db: AsyncSession) -> list[Subscription]:
+async def get_expired_daily_subscriptions_for_recovery(
+    db: AsyncSession,
+    *,
+    after_id: int = 0,
+    limit: int | None = None,
+) -> list[Subscription]:
     """
     Получает EXPIRED суточные подписки, которые были ошибочно экспайрены
     middleware или check_and_update_subscription_status.
@@ -2840,10 +2924,7 @@ async def get_expired_daily_subscriptions_for_recovery(db: AsyncSession) -> list
         select(Subscription)
         .join(Tariff, Subscription.tariff_id == Tariff.id)
         .join(User, Subscription.user_id == User.id)
-        .options(
-            selectinload(Subscription.user),
-            selectinload(Subscription.tariff),
-        )
+        .options(*_daily_charge_load_options())
         .where(
             and_(
                 Tariff.is_daily.is_(True),
@@ -2856,13 +2937,13 @@ async def get_expired_daily_subscriptions_for_recovery(db: AsyncSession) -> list
                 # Только недавно экспайренные
                 Subscription.updated_at >= recovery_threshold,
                 # Баланс > 0 (permissive pre-filter;
-                # actual discounted price check happens in _process_single_charge)
+                # точная проверка с учётом скидки — в пакетном списании)
                 User.balance_kopeks > 0,
             )
         )
     )
 
-    result = await db.execute(query)
+    result = await db.execute(_keyset_page(query, after_id, limit))
     subscriptions = result.scalars().all()
 
     if subscriptions:
@@ -2981,6 +3062,82 @@ async def suspend_daily_subscription_insufficient_balance(
     return subscription
 
 
+async def lock_daily_subscriptions_for_charge(
+    db: AsyncSession,
+    subscription_ids: list[int],
+    *,
+    status: str,
+    require_due: bool,
+    now: datetime,
+) -> list[Subscription]:
+    """Блокирует подписки пакета перед списанием и перепроверяет их состояние.
+
+    Строки, занятые другим процессом, пропускаются (``SKIP LOCKED``); подписки,
+    сменившие статус или уже списанные после выборки пакета, отбрасываются.
+    """
+    if not subscription_ids:
+        return []
+
+    query = (
+        select(Subscription)
+        .options(*_daily_charge_load_options())
+        .where(Subscription.id.in_(subscription_ids), Subscription.status == status)
+        .order_by(Subscription.id)
+        .with_for_update(of=Subscription, skip_locked=True)
+        .execution_options(populate_existing=True)
+    )
+    if require_due:
+        query = query.where(daily_charge_due_clause(now))
+
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
+async def mark_daily_subscriptions_charged(
+    db: AsyncSession,
+    subscription_ids: list[int],
+    *,
+    charged_at: datetime,
+) -> None:
+    """Пакетный аналог ``update_daily_charge_time``: фиксирует списание и продлевает на сутки (без коммита)."""
+    if not subscription_ids:
+        return
+
+    new_end_date = charged_at + timedelta(days=1)
+    await db.execute(
+        update(Subscription)
+        .where(Subscription.id.in_(subscription_ids))
+        .values(
+            status=SubscriptionStatus.ACTIVE.value,
+            last_daily_charge_at=charged_at,
+            end_date=case(
+                (
+                    (Subscription.end_date.is_(None)) | (Subscription.end_date < new_end_date),
+                    new_end_date,
+                ),
+                else_=Subscription.end_date,
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def suspend_daily_subscriptions_insufficient_balance(
+    db: AsyncSession,
+    subscription_ids: list[int],
+) -> None:
+    """Пакетный аналог ``suspend_daily_subscription_insufficient_balance`` (без коммита)."""
+    if not subscription_ids:
+        return
+
+    await db.execute(
+        update(Subscription)
+        .where(Subscription.id.in_(subscription_ids))
+        .values(status=SubscriptionStatus.DISABLED.value)
+        .execution_options(synchronize_session=False)
+    )
+
+
 async def get_subscription_with_tariff(
     db: AsyncSession,
     user_id: int,
@@ -3068,6 +3225,27 @@ async def get_subscription_by_id(db: AsyncSession, subscription_id: int) -> Subs
     return result.scalar_one_or_none()
 
 
+async def get_subscriptions_by_ids(db: AsyncSession, subscription_ids: list[int]) -> dict[int, Subscription]:
+    """Батчевый аналог get_subscription_by_id (admin use only, no ownership check)."""
+    subscription_ids = [
+        subscription_id
+        for subscription_id in subscription_ids
+        if POSTGRES_INT4_MIN <= subscription_id <= POSTGRES_INT4_MAX
+    ]
+    if not subscription_ids:
+        return {}
+
+    result = await db.execute(
+        select(Subscription)
+        .options(
+            selectinload(Subscription.user),
+            selectinload(Subscription.tariff),
+        )
+        .where(Subscription.id.in_(subscription_ids))
+    )
+    return {subscription.id: subscription for subscription in result.scalars().all()}
+
+
 async def get_subscription_by_user_and_tariff(
     db: AsyncSession,
     user_id: int,
@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.database.models import PromoGroup, Subscription, SubscriptionStatus, Tariff
+from app.services.pricing_catalog import commit_pricing_changes
 
 
 logger = structlog.get_logger(__name__)
@@ -256,7 +257,8 @@ async def create_tariff(
         await db.refresh(tariff, ['allowed_promo_groups'])
         tariff.allowed_promo_groups = list(promo_groups)
 
-    await db.commit()
+    await commit_pricing_changes(db)
+
     await db.refresh(tariff)
 
     logger.info(
@@ -399,7 +401,8 @@ async def update_tariff(
         else:
             tariff.allowed_promo_groups = []
 
-    await db.commit()
+    await commit_pricing_changes(db)
+
     await db.refresh(tariff)
 
     logger.info('Обновлен тариф', tariff_name=tariff.name, tariff_id=tariff.id)
@@ -424,7 +427,7 @@ async def delete_tariff(db: AsyncSession, tariff: Tariff) -> bool:
 
     # Удаляем тариф (FK RESTRICT — подписок с tariff_id быть не должно)
     await db.delete(tariff)
-    await db.commit()
+    await commit_pricing_changes(db)
 
     logger.info(
         'Удален тариф',
@@ -467,7 +470,8 @@ async def set_tariff_promo_groups(
     else:
         tariff.allowed_promo_groups = []
 
-    await db.commit()
+    await commit_pricing_changes(db)
+
     await db.refresh(tariff)
 
     return tariff
@@ -485,7 +489,7 @@ async def add_promo_group_to_tariff(
 
     if promo_group not in tariff.allowed_promo_groups:
         tariff.allowed_promo_groups.append(promo_group)
-        await db.commit()
+        await commit_pricing_changes(db)
 
     return True
 
@@ -499,7 +503,7 @@ async def remove_promo_group_from_tariff(
     for pg in tariff.allowed_promo_groups:
         if pg.id == promo_group_id:
             tariff.allowed_promo_groups.remove(pg)
-            await db.commit()
+            await commit_pricing_changes(db)
             return True
     return False
 
@@ -1,7 +1,7 @@
 from datetime import UTC, datetime, timedelta
 
 import structlog
-from sqlalchemy import and_, func, or_, select
+from sqlalchemy import and_, case, func, insert, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -63,6 +63,42 @@ def addon_description_clause(description_column):
     return or_(*(description_column.ilike(p) for p in ADDON_DESCRIPTION_PATTERNS))
 
 
+# Покупки, которые учитываются в счётчиках users.total_spent_kopeks / purchase_count.
+# Фильтр совпадает с _build_spending_stats_select в crud/user.py и бэкфиллом 0106.
+# REFUND счётчики не уменьшает: компенсирующий возврат при сбое покупки идёт после
+# отката её транзакции БД (вместе с ней откатывается и инкремент счётчиков), а возвраты
+# платёжных систем отменяют пополнения баланса, а не покупки подписок.
+SPENDING_TRANSACTION_TYPES = frozenset({TransactionType.SUBSCRIPTION_PAYMENT.value})
+
+
+async def apply_user_spending_delta(
+    db: AsyncSession,
+    user_id: int,
+    *,
+    amount_kopeks: int,
+    purchases: int = 1,
+    purchased_at: datetime | None = None,
+) -> None:
+    """Инкрементально обновляет счётчики трат пользователя в текущей транзакции БД."""
+    values = {
+        'total_spent_kopeks': User.total_spent_kopeks + abs(amount_kopeks),
+        'purchase_count': User.purchase_count + purchases,
+    }
+    if purchased_at is not None:
+        values['last_purchase_at'] = case(
+            (
+                or_(User.last_purchase_at.is_(None), User.last_purchase_at < purchased_at),
+                purchased_at,
+            ),
+            else_=User.last_purchase_at,
+        )
+    # Без синхронизации: истёкшие атрибуты загруженного User подгружались бы лениво
+    # (в async это ошибка), а устаревшее значение в памяти при flush не перезаписывается.
+    await db.execute(
+        update(User).where(User.id == user_id).values(**values).execution_options(synchronize_session=False)
+    )
+
+
 async def create_transaction(
     db: AsyncSession,
     user_id: int,
@@ -89,6 +125,11 @@ async def create_transaction(
     if payment_method is None and type in (TransactionType.SUBSCRIPTION_PAYMENT, TransactionType.GIFT_PAYMENT):
         payment_method = PaymentMethod.BALANCE
 
+    counts_as_purchase = is_completed and type.value in SPENDING_TRANSACTION_TYPES
+    if counts_as_purchase and created_at is None:
+        # Явное время, чтобы last_purchase_at совпадал с created_at транзакции при сверке
+        created_at = datetime.now(UTC)
+
     transaction = Transaction(
         user_id=user_id,
         type=type.value,
@@ -102,6 +143,8 @@ async def create_transaction(
     )
 
     db.add(transaction)
+    if counts_as_purchase:
+        await apply_user_spending_delta(db, user_id, amount_kopeks=stored_amount, purchased_at=created_at)
     if commit:
         await db.commit()
     else:
@@ -263,6 +306,61 @@ async def get_transaction_by_external_id(
     return result.scalar_one_or_none()
 
 
+async def get_existing_external_ids(
+    db: AsyncSession, external_ids: list[str], payment_method: PaymentMethod
+) -> set[str]:
+    if not external_ids:
+        return set()
+    result = await db.execute(
+        select(Transaction.external_id).where(
+            Transaction.external_id.in_(external_ids),
+            Transaction.payment_method == payment_method.value,
+        )
+    )
+    return set(result.scalars().all())
+
+
+async def create_balance_subscription_payments(
+    db: AsyncSession,
+    payments: list[dict],
+    *,
+    created_at: datetime,
+) -> dict[str, int]:
+    """Пишет оплаты подписок с баланса одним многострочным INSERT (без коммита).
+
+    Каждый элемент ``payments`` — ``user_id``, ``amount_kopeks`` (положительная сумма
+    списания), ``description`` и обязательный ``external_id``: уникальность
+    ``(external_id, payment_method)`` не даёт записать одну оплату дважды.
+    Счётчики трат пользователя здесь не обновляются — это делает списание баланса.
+
+    Возвращает ``id`` созданных транзакций по ``external_id``.
+    """
+    if not payments:
+        return {}
+
+    rows = [
+        {
+            'user_id': payment['user_id'],
+            'type': TransactionType.SUBSCRIPTION_PAYMENT.value,
+            'amount_kopeks': -abs(payment['amount_kopeks']),
+            'description': payment['description'],
+            'payment_method': PaymentMethod.BALANCE.value,
+            'external_id': payment['external_id'],
+            'is_completed': True,
+            'completed_at': created_at,
+            'created_at': created_at,
+        }
+        for payment in payments
+    ]
+    result = await db.execute(
+        insert(Transaction).returning(Transaction.id, Transaction.external_id, sort_by_parameter_order=True),
+        rows,
+    )
+    created = {external_id: transaction_id for transaction_id, external_id in result.all()}
+    logger.info('💳 Созданы транзакции оплаты с баланса', count=len(created))
+    return created
+
+
 async def get_user_transactions(db: AsyncSession, user_id: int, limit: int = 50, offset: int = 0) -> list[Transaction]:
     result = await db.execute(
         select(Transaction)
@@ -305,6 +403,14 @@ async def get_user_total_spent_kopeks(db: AsyncSession, user_id: int) -> int:
 
 
 async def complete_transaction(db: AsyncSession, transaction: Transaction) -> Transaction:
+    if not transaction.is_completed and transaction.type in SPENDING_TRANSACTION_TYPES:
+        await apply_user_spending_delta(
+            db,
+            transaction.user_id,
+            amount_kopeks=transaction.amount_kopeks,
+            purchased_at=transaction.created_at,
+        )
+
     transaction.is_completed = True
     transaction.completed_at = datetime.now(UTC)
 
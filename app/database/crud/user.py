@@ -4,7 +4,7 @@ import string
 from datetime import UTC, datetime, timedelta
 
 import structlog
-from sqlalchemy import and_, case, exists, func, nullslast, or_, select, text
+from sqlalchemy import Select, and_, case, exists, func, nullslast, or_, select, text, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -27,6 +27,7 @@ from app.database.models import (
     UserPromoGroup,
     UserStatus,
 )
+from app.utils.pagination import InvalidCursorError, apply_keyset, count_total, keyset_cursor_for
 from app.utils.text_search import contains_conditions
 from app.utils.validators import sanitize_telegram_name
 
@@ -76,12 +77,11 @@ def _build_spending_stats_select():
     """
     Возвращает базовый SELECT для статистики трат пользователей.
 
-    Используется в:
-    - get_users_list() для сортировки по тратам/покупкам
-    - get_users_spending_stats() для получения статистики
+    Источник истины для денормализованных счётчиков users.total_spent_kopeks /
+    purchase_count / last_purchase_at — используется в reconcile_user_spending_counters().
 
     Returns:
-        Tuple колонок (user_id, total_spent, purchase_count)
+        Tuple колонок (user_id, total_spent, purchase_count, last_purchase_at)
     """
 
     return (
@@ -110,6 +110,15 @@ def _build_spending_stats_select():
             ),
             0,
         ).label('purchase_count'),
+        func.max(
+            case(
+                (
+                    Transaction.type == TransactionType.SUBSCRIPTION_PAYMENT.value,
+                    Transaction.created_at,
+                ),
+                else_=None,
+            )
+        ).label('last_purchase_at'),
     )
 
 
@@ -143,6 +152,25 @@ async def get_user_by_id(db: AsyncSession, user_id: int) -> User | None:
     return user
 
 
+async def get_users_by_ids(db: AsyncSession, user_ids: list[int]) -> dict[int, User]:
+    """Батчевый аналог get_user_by_id: один запрос ``IN (...)`` вместо запроса на каждого."""
+    user_ids = [user_id for user_id in user_ids if POSTGRES_INT4_MIN <= user_id <= POSTGRES_INT4_MAX]
+    if not user_ids:
+        return {}
+
+    result = await db.execute(
+        select(User)
+        .options(
+            selectinload(User.subscriptions).selectinload(Subscription.tariff),
+            selectinload(User.user_promo_groups).selectinload(UserPromoGroup.promo_group),
+            selectinload(User.referrer),
+            selectinload(User.promo_group),
+        )
+        .where(User.id.in_(user_ids))
+    )
+    return {user.id: user for user in result.scalars().all()}
+
+
 async def get_user_by_telegram_id(db: AsyncSession, telegram_id: int) -> User | None:
     result = await db.execute(
         select(User)
@@ -854,6 +882,48 @@ async def subtract_user_balance(
         raise
 
 
+async def debit_user_balances(
+    db: AsyncSession,
+    amounts: dict[int, int],
+    *,
+    charged_at: datetime,
+) -> dict[int, int]:
+    """Списывает с нескольких пользователей одним условным UPDATE (без коммита).
+
+    ``amounts`` — сумма списания по ``user_id``. Списание проходит только там, где
+    баланса хватает (нулевая сумма проходит всегда); проверка и уменьшение баланса
+    выполняются атомарно в самом UPDATE, поэтому отдельная блокировка строк не нужна.
+    Вместе с балансом обновляются счётчики трат, как при ``create_transaction``.
+
+    Возвращает новый баланс для пользователей, с которых списание прошло.
+    """
+    if not amounts:
+        return {}
+
+    amount = case(amounts, value=User.id)
+    result = await db.execute(
+        update(User)
+        .where(
+            User.id.in_(list(amounts)),
+            or_(amount == 0, User.balance_kopeks >= amount),
+        )
+        .values(
+            balance_kopeks=User.balance_kopeks - amount,
+            has_had_paid_subscription=True,
+            total_spent_kopeks=User.total_spent_kopeks + amount,
+            purchase_count=User.purchase_count + 1,
+            last_purchase_at=case(
+                (or_(User.last_purchase_at.is_(None), User.last_purchase_at < charged_at), charged_at),
+                else_=User.last_purchase_at,
+            ),
+            updated_at=charged_at,
+        )
+        .returning(User.id, User.balance_kopeks)
+        .execution_options(synchronize_session=False)
+    )
+    return dict(result.all())
+
+
 async def cleanup_expired_promo_offer_discounts(db: AsyncSession) -> int:
     now = datetime.now(UTC)
     result = await db.execute(
@@ -940,30 +1010,41 @@ async def cleanup_expired_promo_offer_discounts(db: AsyncSession) -> int:
     return len(users)
 
 
-async def get_users_list(
-    db: AsyncSession,
-    offset: int = 0,
-    limit: int = 50,
+# Сортировки админского списка, которые поддерживают keyset-курсор: колонки ключа
+# по убыванию, id последним для уникальности. traffic (join подписок) и
+# last_activity (NULLS LAST) листаются только через OFFSET.
+USERS_KEYSET_SORTS = {
+    'created_at': (User.created_at, User.id),
+    'balance': (User.balance_kopeks, User.created_at, User.id),
+    'total_spent': (User.total_spent_kopeks, User.created_at, User.id),
+    'purchase_count': (User.purchase_count, User.created_at, User.id),
+}
+
+
+def _users_cursor_scope(sort: str) -> str:
+    return f'users:{sort}'
+
+
+def users_next_cursor(users: list[User], sort: str, limit: int) -> str | None:
+    """Курсор следующей страницы списка пользователей, если она может существовать."""
+    columns = USERS_KEYSET_SORTS.get(sort)
+    if columns is None or not users or len(users) < limit:
+        return None
+    return keyset_cursor_for(users[-1], columns, _users_cursor_scope(sort))
+
+
+def _apply_users_filters(
+    query: Select,
+    *,
+    status: UserStatus | None = None,
     search: str | None = None,
     email: str | None = None,
-    status: UserStatus | None = None,
     subscription_status: str | None = None,
     tariff_ids: list[int] | None = None,
     promo_group_id: int | None = None,
     campaign_id: int | None = None,
     partner_id: int | None = None,
-    order_by_balance: bool = False,
-    order_by_traffic: bool = False,
-    order_by_last_activity: bool = False,
-    order_by_total_spent: bool = False,
-    order_by_purchase_count: bool = False,
-) -> list[User]:
-    query = select(User).options(
-        selectinload(User.subscriptions).selectinload(Subscription.tariff),
-        selectinload(User.promo_group),
-        selectinload(User.referrer),
-    )
-
+) -> Select:
     if status:
         query = query.where(User.status == status.value)
 
@@ -1016,6 +1097,51 @@ async def get_users_list(
     if email:
         query = query.where(User.email.ilike(f'%{email}%'))
 
+    return query
+
+
+async def get_users_list(
+    db: AsyncSession,
+    offset: int = 0,
+    limit: int = 50,
+    search: str | None = None,
+    email: str | None = None,
+    status: UserStatus | None = None,
+    subscription_status: str | None = None,
+    tariff_ids: list[int] | None = None,
+    promo_group_id: int | None = None,
+    campaign_id: int | None = None,
+    partner_id: int | None = None,
+    order_by_balance: bool = False,
+    order_by_traffic: bool = False,
+    order_by_last_activity: bool = False,
+    order_by_total_spent: bool = False,
+    order_by_purchase_count: bool = False,
+    *,
+    cursor: str | None = None,
+) -> list[User]:
+    """Страница пользователей с фильтрами.
+
+    С ``cursor`` (см. users_next_cursor) страница продолжается после курсора
+    по индексу сортировки, ``offset`` при этом игнорируется.
+    """
+    query = select(User).options(
+        selectinload(User.subscriptions).selectinload(Subscription.tariff),
+        selectinload(User.promo_group),
+        selectinload(User.referrer),
+    )
+    query = _apply_users_filters(
+        query,
+        status=status,
+        search=search,
+        email=email,
+        subscription_status=subscription_status,
+        tariff_ids=tariff_ids,
+        promo_group_id=promo_group_id,
+        campaign_id=campaign_id,
+        partner_id=partner_id,
+    )
+
     sort_flags = [
         order_by_balance,
         order_by_traffic,
@@ -1028,36 +1154,33 @@ async def get_users_list(
             'Выбрано несколько сортировок пользователей — применяется приоритет: трафик > траты > покупки > баланс > активность'
         )
 
-    transactions_stats = None
-    if order_by_total_spent or order_by_purchase_count:
-        from app.database.models import Transaction
-
-        transactions_stats = (
-            select(*_build_spending_stats_select())
-            .where(Transaction.is_completed.is_(True))
-            .group_by(Transaction.user_id)
-            .subquery()
-        )
-        query = query.outerjoin(transactions_stats, transactions_stats.c.user_id == User.id)
-
     if order_by_traffic:
-        traffic_sort = func.coalesce(Subscription.traffic_used_gb, 0.0)
-        query = query.outerjoin(Subscription, Subscription.user_id == User.id)
-        query = query.order_by(traffic_sort.desc(), User.created_at.desc())
+        sort = 'traffic'
     elif order_by_total_spent:
-        order_column = func.coalesce(transactions_stats.c.total_spent, 0)
-        query = query.order_by(order_column.desc(), User.created_at.desc())
+        sort = 'total_spent'
     elif order_by_purchase_count:
-        order_column = func.coalesce(transactions_stats.c.purchase_count, 0)
-        query = query.order_by(order_column.desc(), User.created_at.desc())
+        sort = 'purchase_count'
     elif order_by_balance:
-        query = query.order_by(User.balance_kopeks.desc(), User.created_at.desc())
+        sort = 'balance'
     elif order_by_last_activity:
-        query = query.order_by(nullslast(User.last_activity.desc()), User.created_at.desc())
+        sort = 'last_activity'
     else:
-        query = query.order_by(User.created_at.desc())
+        sort = 'created_at'
+
+    if sort in USERS_KEYSET_SORTS:
+        query = apply_keyset(query, USERS_KEYSET_SORTS[sort], cursor, scope=_users_cursor_scope(sort))
+    elif cursor is not None:
+        raise InvalidCursorError(f'Сортировка {sort} не поддерживает курсор')
+    elif sort == 'traffic':
+        traffic_sort = func.coalesce(Subscription.traffic_used_gb, 0.0)
+        query = query.outerjoin(Subscription, Subscription.user_id == User.id)
+        query = query.order_by(traffic_sort.desc(), User.created_at.desc())
+    else:
+        query = query.order_by(nullslast(User.last_activity.desc()), User.created_at.desc())
 
-    query = query.offset(offset).limit(limit)
+    if cursor is None:
+        query = query.offset(offset)
+    query = query.limit(limit)
 
     result = await db.execute(query)
     users = result.scalars().unique().all()
@@ -1081,62 +1204,28 @@ async def get_users_count(
     promo_group_id: int | None = None,
     campaign_id: int | None = None,
     partner_id: int | None = None,
+    *,
+    estimate: bool = False,
 ) -> int:
-    query = select(func.count(User.id))
-
-    if status:
-        query = query.where(User.status == status.value)
-
-    if subscription_status or tariff_ids:
-        sub_conditions = []
-        if subscription_status:
-            sub_conditions.append(Subscription.status == subscription_status)
-        if tariff_ids:
-            sub_conditions.append(Subscription.tariff_id.in_(tariff_ids))
-        sub_query = select(Subscription.user_id).where(and_(*sub_conditions)).distinct().scalar_subquery()
-        query = query.where(User.id.in_(sub_query))
-
-    if promo_group_id:
-        # Юзер считается членом группы если она в legacy `user.promo_group_id` ИЛИ
-        # в M2M `user_promo_groups`. Без OR-условия админский фильтр пропускал юзеров
-        # с группой только в M2M (см. analogue issue #422 для payment methods).
-        query = query.where(
-            or_(
-                User.promo_group_id == promo_group_id,
-                User.id.in_(select(UserPromoGroup.user_id).where(UserPromoGroup.promo_group_id == promo_group_id)),
-            )
-        )
-
-    if campaign_id:
-        query = query.where(
-            exists(
-                select(AdvertisingCampaignRegistration.id).where(
-                    AdvertisingCampaignRegistration.user_id == User.id,
-                    AdvertisingCampaignRegistration.campaign_id == campaign_id,
-                )
-            )
-        )
+    total, _ = await get_users_total(
+        db,
+        status=status,
+        search=search,
+        email=email,
+        subscription_status=subscription_status,
+        tariff_ids=tariff_ids,
+        promo_group_id=promo_group_id,
+        campaign_id=campaign_id,
+        partner_id=partner_id,
+        estimate=estimate,
+    )
+    return total
 
-    if partner_id:
-        query = query.where(
-            exists(
-                select(AdvertisingCampaignRegistration.id)
-                .join(AdvertisingCampaign, AdvertisingCampaign.id == AdvertisingCampaignRegistration.campaign_id)
-                .where(
-                    AdvertisingCampaignRegistration.user_id == User.id,
-                    AdvertisingCampaign.partner_user_id == partner_id,
-                )
-            )
-        )
 
-    if search:
-        query = query.where(or_(*_user_search_conditions(search)))
-
-    if email:
-        query = query.where(User.email.ilike(f'%{email}%'))
-
-    result = await db.execute(query)
-    return result.scalar()
+async def get_users_total(db: AsyncSession, *, estimate: bool = False, **filters) -> tuple[int, bool]:
+    """Число пользователей под фильтрами ``get_users_list``: ``(total, is_estimate)``."""
+    query = _apply_users_filters(select(User.id), **filters)
+    return await count_total(db, query, estimate=estimate)
 
 
 async def get_users_spending_stats(db: AsyncSession, user_ids: list[int]) -> dict[int, dict[str, int]]:
@@ -1153,27 +1242,126 @@ async def get_users_spending_stats(db: AsyncSession, user_ids: list[int]) -> dic
     if not user_ids:
         return {}
 
-    stats_query = (
-        select(*_build_spending_stats_select())
-        .where(
-            Transaction.user_id.in_(user_ids),
-            Transaction.is_completed.is_(True),
-        )
-        .group_by(Transaction.user_id)
+    result = await db.execute(
+        select(User.id, User.total_spent_kopeks, User.purchase_count).where(User.id.in_(user_ids))
     )
 
-    result = await db.execute(stats_query)
-    rows = result.all()
-
     return {
-        row.user_id: {
-            'total_spent': int(row.total_spent or 0),
+        row.id: {
+            'total_spent': int(row.total_spent_kopeks or 0),
             'purchase_count': int(row.purchase_count or 0),
         }
-        for row in rows
+        for row in result.all()
     }
 
 
+async def reconcile_user_spending_counters(
+    db: AsyncSession,
+    user_ids: list[int] | None = None,
+    *,
+    batch_size: int = 1000,
+) -> int:
+    """
+    Сверяет счётчики трат пользователей с историей транзакций и исправляет расхождения.
+
+    Без ``user_ids`` проходит всех пользователей пачками по id. Изменения не
+    коммитит — это делает вызывающий код.
+
+    Returns:
+        Количество пользователей с исправленными счётчиками
+    """
+    fixed = 0
+    last_id = 0
+    while True:
+        users_query = select(User.id, User.total_spent_kopeks, User.purchase_count, User.last_purchase_at)
+        if user_ids is not None:
+            users_query = users_query.where(User.id.in_(user_ids))
+        else:
+            users_query = users_query.where(User.id > last_id).order_by(User.id).limit(batch_size)
+        users = (await db.execute(users_query)).all()
+        if not users:
+            break
+
+        stats_result = await db.execute(
+            select(*_build_spending_stats_select())
+            .where(
+                Transaction.user_id.in_([row.id for row in users]),
+                Transaction.is_completed.is_(True),
+            )
+            .group_by(Transaction.user_id)
+        )
+        stats = {row.user_id: row for row in stats_result.all()}
+
+        updates = []
+        for row in users:
+            actual = stats.get(row.id)
+            expected = (
+                int(actual.total_spent or 0) if actual else 0,
+                int(actual.purchase_count or 0) if actual else 0,
+                actual.last_purchase_at if actual else None,
+            )
+            if (row.total_spent_kopeks, row.purchase_count, row.last_purchase_at) != expected:
+                updates.append(
+                    {
+                        'id': row.id,
+                        'total_spent_kopeks': expected[0],
+                        'purchase_count': expected[1],
+                        'last_purchase_at': expected[2],
+                    }
+                )
+
+        if updates:
+            await db.execute(update(User), updates)
+            fixed += len(updates)
+
+        if user_ids is not None:
+            break
+        last_id = users[-1].id
+
+    if fixed:
+        logger.info('Исправлены счётчики трат пользователей', fixed=fixed)
+    return fixed
+
+
+REFERRALS_KEYSET_COLUMNS = (User.created_at, User.id)
+
+
+async def get_referrals_page(
+    db: AsyncSession,
+    user_id: int,
+    *,
+    limit: int = 50,
+    offset: int = 0,
+    cursor: str | None = None,
+) -> list[User]:
+    """Страница рефералов пользователя (новые сначала) с LIMIT на стороне БД."""
+    query = (
+        select(User)
+        .options(
+            selectinload(User.subscriptions).selectinload(Subscription.tariff),
+            selectinload(User.user_promo_groups).selectinload(UserPromoGroup.promo_group),
+            selectinload(User.referrer),
+            selectinload(User.promo_group),
+        )
+        .where(User.referred_by_id == user_id)
+    )
+    query = apply_keyset(query, REFERRALS_KEYSET_COLUMNS, cursor, scope=f'referrals:{user_id}')
+    if cursor is None:
+        query = query.offset(offset)
+    result = await db.execute(query.limit(limit))
+    return list(result.scalars().all())
+
+
+def referrals_next_cursor(referrals: list[User], user_id: int, limit: int) -> str | None:
+    if not referrals or len(referrals) < limit:
+        return None
+    return keyset_cursor_for(referrals[-1], REFERRALS_KEYSET_COLUMNS, f'referrals:{user_id}')
+
+
+async def get_referrals_total(db: AsyncSession, user_id: int, *, estimate: bool = False) -> tuple[int, bool]:
+    return await count_total(db, select(User.id).where(User.referred_by_id == user_id), estimate=estimate)
+
+
 async def get_referrals(db: AsyncSession, user_id: int) -> list[User]:
     result = await db.execute(
         select(User)
@@ -13,6 +13,7 @@ from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
 from app.config import settings
+from app.utils.metrics import metrics, observe_db_query
 
 
 logger = structlog.get_logger(__name__)
@@ -223,6 +224,20 @@ if settings.DEBUG:
         else:
             logger.debug('⚡ Query executed in', total=round(total, 3))
 
+
+if metrics.enabled:
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _metrics_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started_at = time.perf_counter()
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _metrics_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started_at = getattr(context, '_metrics_started_at', None)
+        if started_at is not None:
+            observe_db_query(statement, time.perf_counter() - started_at)
+
 # ============================================================================
 # ADVANCED SESSION MANAGER WITH READ REPLICAS
 # ============================================================================
@@ -640,3 +655,17 @@ async def get_pool_metrics() -> dict:
         'max_possible_connections': counters['total_connections'] + (getattr(pool, '_max_overflow', 0) or 0),
         'pool_utilization_percent': round(counters['utilization_percent'], 2),
     }
+
+
+DB_POOL_CONNECTIONS = metrics.gauge('db_pool_connections', 'Соединения пула основной БД', ('state',))
+
+
+def _collect_pool_metrics() -> None:
+    counters = _pool_counters(engine.pool)
+    if counters is None:
+        return
+    for state in ('checked_in', 'checked_out', 'overflow'):
+        DB_POOL_CONNECTIONS.labels(state).set(counters[state])
+
+
+metrics.add_collector('db_pool', _collect_pool_metrics)
@@ -2067,6 +2067,11 @@ class PartnerStatus(Enum):
 
 class User(Base):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Сортировки админского списка: index scan вместо GROUP BY по transactions
+        Index('ix_users_total_spent', 'total_spent_kopeks', 'created_at'),
+        Index('ix_users_purchase_count', 'purchase_count', 'created_at'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     telegram_id = Column(BigInteger, unique=True, index=True, nullable=True)  # Nullable для email-only пользователей
@@ -2078,6 +2083,11 @@ class User(Base):
     language = Column(String(5), default='ru')
     balance_kopeks = Column(Integer, default=0)
     used_promocodes = Column(Integer, default=0)
+    # Денормализованные счётчики покупок (SUBSCRIPTION_PAYMENT): ведутся в crud/transaction.py
+    # при записи транзакций, расхождения правит reconcile_user_spending_counters.
+    total_spent_kopeks = Column(BigInteger, default=0, server_default='0', nullable=False)
+    purchase_count = Column(Integer, default=0, server_default='0', nullable=False)
+    last_purchase_at = Column(AwareDateTime(), nullable=True)
     has_had_paid_subscription = Column(Boolean, default=False, nullable=False)
     referred_by_id = Column(Integer, ForeignKey('users.id', ondelete='SET NULL'), nullable=True, index=True)
     referral_code = Column(String(20), unique=True, nullable=True)
@@ -2274,6 +2284,8 @@ class Subscription(Base):
         Index('ix_subscriptions_user_status', 'user_id', 'status'),
         Index('ix_subscriptions_user_tariff_status', 'user_id', 'tariff_id', 'status'),
         Index('ix_subscriptions_grace_expiry_scan', 'status', 'is_trial', 'end_date'),
+        # Планировщик истечения: MIN(end_date) и выборка просроченных активных подписок
+        Index('ix_subscriptions_status_end_date', 'status', 'end_date'),
         Index('ix_subscriptions_grace_candidate', 'grace_candidate_at', 'grace_candidate_reason'),
         Index(
             'uq_subscriptions_user_tariff_active',
@@ -3023,6 +3035,32 @@ class ReferralContestEvent(Base):
         )
 
 
+class ReferralContestScore(Base):
+    """Текущий счёт участника конкурса: обновляется вместе с событиями, лидерборд читается по индексу."""
+
+    __tablename__ = 'referral_contest_scores'
+    __table_args__ = (
+        Index(
+            'ix_referral_contest_scores_rank',
+            'contest_id',
+            'referral_count',
+            'total_amount_kopeks',
+        ),
+    )
+
+    contest_id = Column(Integer, ForeignKey('referral_contests.id', ondelete='CASCADE'), primary_key=True)
+    referrer_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    referral_count = Column(Integer, nullable=False, default=0, server_default='0')
+    total_amount_kopeks = Column(BigInteger, nullable=False, default=0, server_default='0')
+
+    referrer = relationship('User', foreign_keys=[referrer_id])
+
+    def __repr__(self):
+        return (
+            f'<ReferralContestScore contest={self.contest_id} referrer={self.referrer_id} count={self.referral_count}>'
+        )
+
+
 class ReferralContestVirtualParticipant(Base):
     __tablename__ = 'referral_contest_virtual_participants'
 
@@ -3416,6 +3454,93 @@ class BroadcastHistory(Base):
     admin = relationship('User', back_populates='broadcasts')
 
 
+class BulkActionJob(Base):
+    """Фоновое массовое действие из админки кабинета.
+
+    Цели (``target_ids``) и параметры сохраняются целиком, прогресс обновляется
+    после каждого обработанного чанка, а результаты по отдельным целям пишутся
+    в :class:`BulkActionJobResult` с возрастающим ``seq`` — по нему клиент
+    продолжает чтение прогресса после обрыва соединения.
+    """
+
+    __tablename__ = 'bulk_action_jobs'
+
+    id = Column(Integer, primary_key=True, index=True)
+    action = Column(String(50), nullable=False)
+    target_type = Column(String(20), nullable=False)  # users|subscriptions
+    target_ids = Column(JSON, nullable=False)
+    params = Column(JSON, nullable=False)
+    dry_run = Column(Boolean, nullable=False, default=False)
+
+    status = Column(String(20), nullable=False, default='queued')  # queued|running|completed|failed|cancelled
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    total_count = Column(Integer, nullable=False, default=0)
+    processed_count = Column(Integer, nullable=False, default=0)
+    success_count = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    skipped_count = Column(Integer, nullable=False, default=0)
+    panel_error_count = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+
+    admin_id = Column(Integer, ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
+    created_at = Column(AwareDateTime(), default=func.now())
+    started_at = Column(AwareDateTime(), nullable=True)
+    # Обновляется после каждого чанка: по давности видно, что процесс с задачей умер
+    heartbeat_at = Column(AwareDateTime(), nullable=True)
+    completed_at = Column(AwareDateTime(), nullable=True)
+
+    __table_args__ = (Index('ix_bulk_action_jobs_status', 'status'),)
+
+
+class BulkActionJobResult(Base):
+    __tablename__ = 'bulk_action_job_results'
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey('bulk_action_jobs.id', ondelete='CASCADE'), nullable=False)
+    seq = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False, default=0)
+    subscription_id = Column(Integer, nullable=True)
+    success = Column(Boolean, nullable=False)
+    message = Column(Text, nullable=False)
+    username = Column(String(255), nullable=True)
+    subscriptions = Column(JSON, nullable=True)
+
+    __table_args__ = (UniqueConstraint('job_id', 'seq', name='uq_bulk_action_job_results_seq'),)
+
+
+class PaymentWebhookInbox(Base):
+    """Входящий вебхук платёжного провайдера, ожидающий обработки.
+
+    Вебхук после проверки IP/подписи сохраняется как есть и сразу получает
+    ответ; бизнес-обработку выполняет воркер. ``idempotency_key`` уникален —
+    повторная доставка того же события не создаёт новую строку. События с
+    одинаковым ``ordering_key`` (один платёж) обрабатываются строго по порядку.
+    """
+
+    __tablename__ = 'payment_webhook_inbox'
+
+    id = Column(Integer, primary_key=True, index=True)
+    provider = Column(String(32), nullable=False)
+    method = Column(String(64), nullable=False)  # метод PaymentService, который обработает payload
+    idempotency_key = Column(String(128), nullable=False)
+    ordering_key = Column(String(255), nullable=False)
+    payload = Column(JSON, nullable=False)
+
+    status = Column(String(20), nullable=False, default='pending')  # pending|processing|done|failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(AwareDateTime(), nullable=False, default=func.now())
+    locked_until = Column(AwareDateTime(), nullable=True)
+    created_at = Column(AwareDateTime(), nullable=False, default=func.now())
+    processed_at = Column(AwareDateTime(), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint('idempotency_key', name='uq_payment_webhook_inbox_idempotency_key'),
+        Index('ix_payment_webhook_inbox_status_next_attempt', 'status', 'next_attempt_at'),
+        Index('ix_payment_webhook_inbox_ordering_key', 'ordering_key', 'id'),
+    )
+
+
 class Poll(Base):
     __tablename__ = 'polls'
 
@@ -3,14 +3,16 @@ import hmac
 import json
 from typing import Any
 
-import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('cryptobot', HttpClientConfig(timeout=30, retries=2))
+
 
 class CryptoBotService:
     def __init__(self):
@@ -31,26 +33,21 @@ class CryptoBotService:
         headers = {'Crypto-Pay-API-Token': self.api_token, 'Content-Type': 'application/json'}
 
         try:
-            async with aiohttp.ClientSession() as session:
-                request_kwargs: dict[str, Any] = {'headers': headers}
-
-                if method.upper() == 'GET':
-                    if data:
-                        request_kwargs['params'] = data
-                elif data:
-                    request_kwargs['json'] = data
-
-                async with session.request(
-                    method,
-                    url,
-                    **request_kwargs,
-                ) as response:
-                    response_data = await response.json()
-
-                    if response.status == 200 and response_data.get('ok'):
-                        return response_data.get('result')
-                    logger.error('CryptoBot API ошибка', response_data=response_data)
-                    return None
+            request_kwargs: dict[str, Any] = {'headers': headers}
+
+            if method.upper() == 'GET':
+                if data:
+                    request_kwargs['params'] = data
+            elif data:
+                request_kwargs['json'] = data
+
+            async with http_clients.request('cryptobot', method, url, **request_kwargs) as response:
+                response_data = await response.json()
+
+                if response.status == 200 and response_data.get('ok'):
+                    return response_data.get('result')
+                logger.error('CryptoBot API ошибка', response_data=response_data)
+                return None
 
         except Exception as e:
             logger.error('Ошибка запроса к CryptoBot API', error=e)
@@ -8,14 +8,16 @@ import hmac
 import json
 from typing import Any
 
-import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('heleket', HttpClientConfig(timeout=30, retries=2))
+
 
 class HeleketService:
     """Minimal wrapper around Heleket API endpoints."""
@@ -81,16 +83,14 @@ class HeleketService:
         }
 
         try:
-            timeout = aiohttp.ClientTimeout(total=30)
-            async with (
-                aiohttp.ClientSession(timeout=timeout) as session,
-                session.post(
-                    url,
-                    data=body.encode('utf-8'),
-                    headers=headers,
-                    params=params,
-                ) as response,
-            ):
+            async with http_clients.request(
+                'heleket',
+                'POST',
+                url,
+                data=body.encode('utf-8'),
+                headers=headers,
+                params=params,
+            ) as response:
                 text = await response.text()
                 if response.content_type != 'application/json':
                     logger.error('Ответ Heleket не JSON', content_type=response.content_type, text=text)
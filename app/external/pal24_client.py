@@ -12,10 +12,13 @@ import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('pal24', HttpClientConfig(retries=2))
+
 
 class Pal24APIError(Exception):
     """Base error for Pal24 API operations."""
@@ -82,16 +85,15 @@ class Pal24Client:
         timeout = aiohttp.ClientTimeout(total=self.timeout)
 
         try:
-            async with (
-                aiohttp.ClientSession(timeout=timeout) as session,
-                session.request(
-                    method,
-                    url,
-                    headers=headers,
-                    json=json_payload,
-                    params=params,
-                ) as response,
-            ):
+            async with http_clients.request(
+                'pal24',
+                method,
+                url,
+                headers=headers,
+                json=json_payload,
+                params=params,
+                timeout=timeout,
+            ) as response:
                 status = response.status
                 try:
                     payload = await response.json(content_type=None)
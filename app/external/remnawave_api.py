@@ -15,6 +15,7 @@ from Crypto.Cipher import PKCS1_v1_5
 from Crypto.PublicKey import RSA
 
 from app.config import settings
+from app.utils.metrics import REMNAWAVE_REQUEST_SECONDS, REMNAWAVE_RETRIES, normalize_path
 
 
 logger = structlog.get_logger(__name__)
@@ -484,6 +485,26 @@ class RemnaWaveAPI:
 
     async def _make_request(
         self, method: str, endpoint: str, data: dict | None = None, params: dict | None = None
+    ) -> dict:
+        endpoint_label = normalize_path(endpoint)
+        outcome = 'ok'
+        start = time.perf_counter()
+        try:
+            return await self._request_with_retries(method, endpoint, endpoint_label, data, params)
+        except RemnaWaveTransientError:
+            outcome = 'transient'
+            raise
+        except RemnaWaveAPIError as error:
+            outcome = str(error.status_code or 'error')
+            raise
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            REMNAWAVE_REQUEST_SECONDS.labels(method, endpoint_label, outcome).observe(time.perf_counter() - start)
+
+    async def _request_with_retries(
+        self, method: str, endpoint: str, endpoint_label: str, data: dict | None, params: dict | None
     ) -> dict:
         if not self.session:
             raise RemnaWaveAPIError('Session not initialized. Use async context manager.')
@@ -518,6 +539,7 @@ class RemnaWaveAPI:
                             max_retries,
                             retry_after,
                         )
+                        REMNAWAVE_RETRIES.labels(method, endpoint_label).inc()
                         await asyncio.sleep(retry_after)
                         continue
 
@@ -556,6 +578,7 @@ class RemnaWaveAPI:
                         max_retries=max_retries,
                         delay=delay,
                     )
+                    REMNAWAVE_RETRIES.labels(method, endpoint_label).inc()
                     await asyncio.sleep(delay)
                     continue
                 # Транзиент (таймаут/обрыв связи с панелью) после ретраев — WARNING,
@@ -1621,6 +1644,16 @@ class RemnaWaveAPI:
     async def reset_user_devices(self, user_id: int) -> bool:
         """Снести все HWID-устройства пользователя одним запросом.
 
+        Кеш списков устройств (``hwid_device_cache``) обновляется здесь же, чтобы
+        кабинет и миниапп не показывали удалённые устройства, кто бы ни сбросил их.
+        """
+        reset = await self._reset_user_devices(user_id)
+        await self._sync_device_cache(user_id, reset)
+        return reset
+
+    async def _reset_user_devices(self, user_id: int) -> bool:
+        """Снести все HWID-устройства пользователя одним запросом.
+
         Раньше это был цикл из N удалений с эвристикой «успех, если упало меньше
         половины». ``POST /api/hwid/devices/delete-all`` с телом ``{userId}``
         делает то же атомарно, поэтому и результат теперь однозначный.
@@ -1670,6 +1703,12 @@ class RemnaWaveAPI:
         return True
 
     async def remove_device(self, user_id: int, device_hwid: str) -> bool:
+        """Удалить одно HWID-устройство пользователя и убрать его из кеша устройств."""
+        removed = await self._remove_device(user_id, device_hwid)
+        await self._sync_device_cache(user_id, removed, {device_hwid})
+        return removed
+
+    async def _remove_device(self, user_id: int, device_hwid: str) -> bool:
         """Удалить одно HWID-устройство пользователя.
 
         Возвращает True только когда устройство действительно отсутствует.
@@ -1713,6 +1752,29 @@ class RemnaWaveAPI:
 
         return True
 
+    @staticmethod
+    async def _sync_device_cache(user_id: int, succeeded: bool, hwids: set[str] | None = None) -> None:
+        """Отражает удаление устройств в кеше: ``hwids=None`` — сброс всех устройств.
+
+        После неудачи состояние в панели неизвестно (часть устройств могла удалиться),
+        поэтому запись просто сбрасывается.
+        """
+        from app.services.hwid_device_cache import hwid_device_cache
+
+        try:
+            panel_user_id = coerce_panel_user_id(user_id)
+        except RemnaWaveInvalidUserIdError:
+            return
+        try:
+            if not succeeded:
+                await hwid_device_cache.invalidate(panel_user_id)
+            elif hwids is None:
+                await hwid_device_cache.store(panel_user_id, [])
+            else:
+                await hwid_device_cache.remove_devices(panel_user_id, hwids)
+        except Exception as e:
+            logger.warning('Не удалось обновить кеш устройств', panel_user_id=panel_user_id, error=e)
+
     async def encrypt_happ_crypto_link(self, link_to_encrypt: str) -> str | None:
         encrypted = self._encrypt_locally(link_to_encrypt)
         if encrypted:
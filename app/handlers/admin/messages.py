@@ -6,7 +6,7 @@ import structlog
 from aiogram import Dispatcher, F, types
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import and_, func, or_, select
+from sqlalchemy import Select, and_, func, or_, select
 from sqlalchemy.exc import InterfaceError
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -19,6 +19,7 @@ from app.database.models import (
     BroadcastHistory,
     Subscription,
     SubscriptionStatus,
+    Tariff,
     User,
     UserStatus,
 )
@@ -1536,43 +1537,37 @@ INACTIVE_TARGET_DAYS = {
 }
 
 
-async def get_target_users_count(db: AsyncSession, target: str) -> int:
-    """Быстрый подсчёт пользователей через SQL COUNT вместо загрузки всех в память."""
-    from sqlalchemy import distinct, func as sql_func
+def build_target_user_ids_query(target: str) -> Select | None:
+    """SQL-подзапрос ``SELECT users.id`` для сегмента рассылки.
 
+    Один источник фильтров для счётчика охвата и для массовых операций,
+    которым не нужны ORM-объекты получателей (офферы, выборки id). ``None`` —
+    сегмент вычисляется только в Python (см. ``get_target_users``).
+    """
     base_filter = User.status == UserStatus.ACTIVE.value
+    now = datetime.now(UTC)
+    # Аналог Subscription.is_active: одного статуса мало — пока планировщик не
+    # перевёл истёкшую подписку в EXPIRED, она остаётся ACTIVE с прошедшим end_date
+    is_active = and_(Subscription.status == SubscriptionStatus.ACTIVE.value, Subscription.end_date > now)
+
+    def with_subscription(*conditions) -> Select:
+        return (
+            select(User.id)
+            .join(Subscription, User.id == Subscription.user_id)
+            .where(base_filter, *conditions)
+            .distinct()
+        )
 
     if target == 'all':
-        query = select(sql_func.count(User.id)).where(base_filter)
-        result = await db.execute(query)
-        return result.scalar() or 0
+        return select(User.id).where(base_filter)
 
     if target == 'active':
         # Активные платные подписки (не триал)
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                Subscription.is_trial == False,
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
+        return with_subscription(is_active, Subscription.is_trial == False)
 
     if target == 'trial':
         # Триальные подписки (без проверки is_active, как в оригинале)
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.is_trial == True,
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
+        return with_subscription(Subscription.is_trial == True)
 
     if target == 'no':
         # Без активной подписки - используем NOT EXISTS для корректности
@@ -1580,55 +1575,32 @@ async def get_target_users_count(db: AsyncSession, target: str) -> int:
             select(Subscription.id)
             .where(
                 Subscription.user_id == User.id,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
+                is_active,
             )
             .correlate(User)
             .exists()
         )
-        query = select(sql_func.count(User.id)).where(base_filter, ~subquery)
-        result = await db.execute(query)
-        return result.scalar() or 0
+        return select(User.id).where(base_filter, ~subquery)
 
-    if target == 'expiring':
-        # Истекающие в ближайшие 3 дня
-        now = datetime.now(UTC)
-        expiry_threshold = now + timedelta(days=3)
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                Subscription.end_date <= expiry_threshold,
-                Subscription.end_date > now,
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
-
-    if target == 'expiring_subscribers':
-        # Истекающие в ближайшие 7 дней
-        now = datetime.now(UTC)
-        expiry_threshold = now + timedelta(days=7)
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                Subscription.end_date <= expiry_threshold,
-                Subscription.end_date > now,
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
+    if target in ('expiring', 'expiring_subscribers'):
+        # Истекающие в ближайшие 3 (7) дня
+        days = 3 if target == 'expiring' else 7
+        return with_subscription(
+            Subscription.status == SubscriptionStatus.ACTIVE.value,
+            Subscription.end_date <= now + timedelta(days=days),
+            Subscription.end_date > now,
+            # Как в get_expiring_subscriptions: у активной суточной подписки end_date всегда +24ч
+            ~and_(
+                Tariff.is_daily.is_(True),
+                Subscription.is_daily_paused.is_(False),
+            ),
+        ).outerjoin(Tariff, Subscription.tariff_id == Tariff.id)
 
     if target in ('expired', 'expired_subscribers'):
         # Зеркало одноимённых веток get_target_users: активная (ACTIVE и не истекшая)
         # подписка исключает; иначе нужен хотя бы один истёкший сабж (EXPIRED/DISABLED
         # или end_date в прошлом) либо платное прошлое без единой подписки. LIMITED с
         # будущей датой истёкшим не считается, ACTIVE с прошедшей — активной не считается.
-        now = datetime.now(UTC)
         has_active_sub = (
             select(Subscription.id)
             .where(
@@ -1652,78 +1624,38 @@ async def get_target_users_count(db: AsyncSession, target: str) -> int:
             .exists()
         )
         has_any_sub = select(Subscription.id).where(Subscription.user_id == User.id).correlate(User).exists()
-        query = select(sql_func.count(User.id)).where(
+        return select(User.id).where(
             base_filter,
             ~has_active_sub,
             or_(has_expired_sub, and_(~has_any_sub, User.has_had_paid_subscription == True)),
         )
-        result = await db.execute(query)
-        return result.scalar() or 0
+
+    zero_traffic = or_(Subscription.traffic_used_gb == None, Subscription.traffic_used_gb <= 0)
 
     if target == 'active_zero':
         # Активные платные с нулевым трафиком
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                Subscription.is_trial == False,
-                or_(Subscription.traffic_used_gb == None, Subscription.traffic_used_gb <= 0),
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
+        return with_subscription(is_active, Subscription.is_trial == False, zero_traffic)
 
     if target == 'trial_zero':
         # Триальные с нулевым трафиком
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.is_trial == True,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                or_(Subscription.traffic_used_gb == None, Subscription.traffic_used_gb <= 0),
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
+        return with_subscription(Subscription.is_trial == True, is_active, zero_traffic)
 
     if target == 'zero':
         # Все активные с нулевым трафиком
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                or_(Subscription.traffic_used_gb == None, Subscription.traffic_used_gb <= 0),
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
+        return with_subscription(is_active, zero_traffic)
 
     if target == 'trial_ending':
-        now = datetime.now(UTC)
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.is_trial == True,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                Subscription.end_date > now,
-                Subscription.end_date <= now + timedelta(days=TRIAL_ENDING_DAYS),
-            )
+        return with_subscription(
+            Subscription.is_trial == True,
+            Subscription.status == SubscriptionStatus.ACTIVE.value,
+            Subscription.end_date > now,
+            Subscription.end_date <= now + timedelta(days=TRIAL_ENDING_DAYS),
         )
-        result = await db.execute(query)
-        return result.scalar() or 0
 
     if target == 'autopay_failed':
         from app.database.models import SubscriptionEvent
 
-        window_start = datetime.now(UTC) - timedelta(days=AUTOPAY_FAILED_WINDOW_DAYS)
+        window_start = now - timedelta(days=AUTOPAY_FAILED_WINDOW_DAYS)
         has_recent_failure = (
             select(SubscriptionEvent.id)
             .where(
@@ -1734,73 +1666,56 @@ async def get_target_users_count(db: AsyncSession, target: str) -> int:
             .correlate(User)
             .exists()
         )
-        query = select(sql_func.count(User.id)).where(base_filter, has_recent_failure)
-        result = await db.execute(query)
-        return result.scalar() or 0
+        return select(User.id).where(base_filter, has_recent_failure)
 
     if target == 'low_balance':
-        query = select(sql_func.count(User.id)).where(
+        return select(User.id).where(
             base_filter,
             User.balance_kopeks > 0,
             User.balance_kopeks < LOW_BALANCE_THRESHOLD_KOPEKS,
         )
-        result = await db.execute(query)
-        return result.scalar() or 0
 
     if target in INACTIVE_TARGET_DAYS:
-        threshold = datetime.now(UTC) - timedelta(days=INACTIVE_TARGET_DAYS[target])
-        query = select(sql_func.count(User.id)).where(
+        threshold = now - timedelta(days=INACTIVE_TARGET_DAYS[target])
+        return select(User.id).where(
             base_filter,
             User.last_activity.isnot(None),
             User.last_activity < threshold,
         )
-        result = await db.execute(query)
-        return result.scalar() or 0
 
     # Фильтр по тарифу
     if target.startswith('tariff_'):
         tariff_id = int(target.split('_')[1])
-        query = (
-            select(sql_func.count(distinct(User.id)))
-            .join(Subscription, User.id == Subscription.user_id)
-            .where(
-                base_filter,
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                Subscription.tariff_id == tariff_id,
-            )
-        )
-        result = await db.execute(query)
-        return result.scalar() or 0
+        return with_subscription(is_active, Subscription.tariff_id == tariff_id)
 
-    # Custom filters — быстрый COUNT вместо загрузки всех пользователей
+    # Custom filters
     if target.startswith('custom_'):
-        now = datetime.now(UTC)
         today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        criteria = target[len('custom_') :]
-
-        if criteria == 'today':
-            query = select(sql_func.count(User.id)).where(base_filter, User.created_at >= today)
-        elif criteria == 'week':
-            query = select(sql_func.count(User.id)).where(base_filter, User.created_at >= now - timedelta(days=7))
-        elif criteria == 'month':
-            query = select(sql_func.count(User.id)).where(base_filter, User.created_at >= now - timedelta(days=30))
-        elif criteria == 'active_today':
-            query = select(sql_func.count(User.id)).where(base_filter, User.last_activity >= today)
-        elif criteria == 'inactive_week':
-            query = select(sql_func.count(User.id)).where(base_filter, User.last_activity < now - timedelta(days=7))
-        elif criteria == 'inactive_month':
-            query = select(sql_func.count(User.id)).where(base_filter, User.last_activity < now - timedelta(days=30))
-        elif criteria == 'referrals':
-            query = select(sql_func.count(User.id)).where(base_filter, User.referred_by_id.isnot(None))
-        elif criteria == 'direct':
-            query = select(sql_func.count(User.id)).where(base_filter, User.referred_by_id.is_(None))
-        else:
-            return 0
+        custom_filters = {
+            'today': User.created_at >= today,
+            'week': User.created_at >= now - timedelta(days=7),
+            'month': User.created_at >= now - timedelta(days=30),
+            'active_today': User.last_activity >= today,
+            'inactive_week': User.last_activity < now - timedelta(days=7),
+            'inactive_month': User.last_activity < now - timedelta(days=30),
+            'referrals': User.referred_by_id.isnot(None),
+            'direct': User.referred_by_id.is_(None),
+        }
+        condition = custom_filters.get(target[len('custom_') :])
+        if condition is None:
+            return None
+        return select(User.id).where(base_filter, condition)
+
+    return None
 
-        result = await db.execute(query)
-        return result.scalar() or 0
 
-    return 0
+async def get_target_users_count(db: AsyncSession, target: str) -> int:
+    """Быстрый подсчёт пользователей через SQL COUNT вместо загрузки всех в память."""
+    query = build_target_user_ids_query(target)
+    if query is None:
+        return 0
+    result = await db.execute(select(func.count()).select_from(query.subquery()))
+    return result.scalar() or 0
 
 
 async def get_target_users(db: AsyncSession, target: str) -> list:
@@ -11,14 +11,12 @@ from app.localization.texts import get_texts
 from app.services.server_status_service import (
     ServerStatusEntry,
     ServerStatusError,
-    ServerStatusService,
+    server_status_service,
 )
 
 
 logger = structlog.get_logger(__name__)
 
-_status_service = ServerStatusService()
-
 
 async def show_server_status(callback: types.CallbackQuery, db_user: User) -> None:
     await _render_server_status(callback, db_user, page=1)
@@ -46,7 +44,7 @@ async def _render_server_status(
         return
 
     try:
-        servers = await _status_service.get_servers()
+        servers = await server_status_service.get_servers()
     except ServerStatusError as error:
         logger.warning('Server status error', error=error)
         await callback.answer(
@@ -1518,6 +1518,9 @@ async def cmd_start(message: types.Message, state: FSMContext, db: AsyncSession,
             # Keep status=DELETED so complete_registration properly handles
             # referral assignment and status change (not the "already active" branch)
             user.balance_kopeks = 0
+            user.total_spent_kopeks = 0
+            user.purchase_count = 0
+            user.last_purchase_at = None
             user.remnawave_id = None
             user.has_had_paid_subscription = False
             user.referred_by_id = None
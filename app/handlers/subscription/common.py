@@ -1,9 +1,7 @@
-import asyncio
 import base64
 import html as html_mod
 import math
 import re
-import time
 from datetime import UTC, datetime
 from typing import Any
 from urllib.parse import quote
@@ -96,12 +94,6 @@ async def resolve_subscription_from_context(
     return None, None
 
 
-# ── App config cache ──
-_app_config_cache: dict[str, Any] = {}
-_app_config_cache_ts: float = 0.0
-_app_config_lock = asyncio.Lock()
-
-
 _PLACEHOLDER_RE = re.compile(r'\{(\w+)\}')
 
 
@@ -338,64 +330,27 @@ _PLATFORM_TO_DEVICE = {
 }
 
 
-def _get_remnawave_config_uuid() -> str | None:
-    try:
-        from app.services.system_settings_service import bot_configuration_service
-
-        return bot_configuration_service.get_current_value('CABINET_REMNA_SUB_CONFIG')
-    except Exception as e:
-        logger.debug('Could not read CABINET_REMNA_SUB_CONFIG from service, using settings fallback', error=e)
-        return getattr(settings, 'CABINET_REMNA_SUB_CONFIG', None)
-
-
 async def load_app_config_async() -> dict[str, Any] | None:
-    """Load app config from Remnawave API (if configured), with TTL cache.
+    """Load app config from Remnawave API (if configured) via the shared app-config cache.
 
     Returns None when no Remnawave config is set or API fails.
     """
-    global _app_config_cache, _app_config_cache_ts
-
-    ttl = settings.APP_CONFIG_CACHE_TTL
-    if _app_config_cache and (time.monotonic() - _app_config_cache_ts) < ttl:
-        return _app_config_cache
-
-    async with _app_config_lock:
-        # Double-check after acquiring lock
-        if _app_config_cache and (time.monotonic() - _app_config_cache_ts) < ttl:
-            return _app_config_cache
-
-        remnawave_uuid = _get_remnawave_config_uuid()
-
-        if remnawave_uuid:
-            try:
-                from app.services.remnawave_service import RemnaWaveService
-
-                service = RemnaWaveService()
-                async with service.get_api_client() as api:
-                    config = await api.get_subscription_page_config(remnawave_uuid)
-                    if config and config.config:
-                        raw = dict(config.config)
-                        raw['_isRemnawave'] = True
-                        _app_config_cache = raw
-                        _app_config_cache_ts = time.monotonic()
-                        logger.debug('Loaded app config from Remnawave', remnawave_uuid=remnawave_uuid)
-                        return raw
-            except Exception as e:
-                logger.warning('Failed to load Remnawave config', error=e)
+    from app.services.app_config_cache import app_config_cache
 
+    entry = await app_config_cache.get()
+    if entry is None:
         return None
+    return {**entry.config, '_isRemnawave': True}
 
 
 def invalidate_app_config_cache() -> None:
     """Clear the cached app config so next call re-fetches from Remnawave.
 
     Note: This is intentionally sync (called from sync contexts in cabinet API).
-    Setting timestamp to 0 first ensures the fast-path check in load_app_config_async
-    fails immediately, even without acquiring _app_config_lock.
     """
-    global _app_config_cache, _app_config_cache_ts
-    _app_config_cache_ts = 0.0
-    _app_config_cache = {}
+    from app.services.app_config_cache import app_config_cache
+
+    app_config_cache.invalidate()
 
 
 async def get_apps_for_platform_async(device_type: str, language: str = 'ru') -> list[dict[str, Any]]:
@@ -4,7 +4,9 @@ Based on PHP library's AuthenticationPlugin and HTTP architecture.
 """
 
 import asyncio
+import contextlib
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Callable
 from http import HTTPStatus
 from typing import Any
 
@@ -13,6 +15,19 @@ import httpx
 from .exceptions import raise_for_status
 
 
+HttpClientFactory = Callable[[], httpx.AsyncClient]
+
+
+@contextlib.asynccontextmanager
+async def open_client(factory: HttpClientFactory | None, proxy_url: str | None) -> AsyncIterator[httpx.AsyncClient]:
+    """Yield the shared client from ``factory`` (left open), or a one-off client closed after use."""
+    if factory is not None:
+        yield factory()
+        return
+    async with httpx.AsyncClient(proxy=proxy_url) as client:
+        yield client
+
+
 class AuthProvider(ABC):
     """Abstract interface for authentication provider."""
 
@@ -42,12 +57,14 @@ class AsyncHTTPClient:
         default_headers: dict[str, str] | None = None,
         timeout: float = 10.0,
         proxy_url: str | None = None,
+        client_factory: HttpClientFactory | None = None,
     ):
         self.base_url = base_url
         self.auth_provider = auth_provider
         self.default_headers = default_headers or {}
         self.timeout = timeout
         self.proxy_url = proxy_url
+        self.client_factory = client_factory
         self._refresh_lock = asyncio.Lock()
         self.max_retries = 2  # Same as PHP AuthenticationPlugin::RETRY_LIMIT
 
@@ -126,7 +143,7 @@ class AsyncHTTPClient:
         if json_data is not None:
             request_kwargs['json'] = json_data
 
-        async with httpx.AsyncClient(proxy=self.proxy_url) as client:
+        async with open_client(self.client_factory, self.proxy_url) as client:
             # Initial request
             response = await client.request(**request_kwargs)
 
@@ -9,9 +9,8 @@ from http import HTTPStatus
 from pathlib import Path
 from typing import Any
 
-import httpx
 
-from ._http import AuthProvider
+from ._http import AuthProvider, HttpClientFactory, open_client
 from .dto.device import DeviceInfo
 from .exceptions import raise_for_status
 
@@ -41,6 +40,7 @@ class AuthProviderImpl(AuthProvider):
         storage_path: str | None = None,
         device_id: str | None = None,
         proxy_url: str | None = None,
+        client_factory: HttpClientFactory | None = None,
     ):
         self.base_url_v1 = f'{base_url}/v1'
         self.base_url_v2 = f'{base_url}/v2'
@@ -49,6 +49,7 @@ class AuthProviderImpl(AuthProvider):
         self.device_info = DeviceInfo(sourceDeviceId=self.device_id)
         self._token_data: dict[str, Any] | None = None
         self.proxy_url = proxy_url
+        self.client_factory = client_factory
 
         # Default headers similar to PHP Authenticator
         self.default_headers = {
@@ -132,7 +133,7 @@ class AuthProviderImpl(AuthProvider):
             'deviceInfo': self.device_info.model_dump(),
         }
 
-        async with httpx.AsyncClient(proxy=self.proxy_url) as client:
+        async with open_client(self.client_factory, self.proxy_url) as client:
             response = await client.post(
                 f'{self.base_url_v1}/auth/lkfl',
                 json=request_data,
@@ -167,7 +168,7 @@ class AuthProviderImpl(AuthProvider):
             'requireTpToBeActive': True,
         }
 
-        async with httpx.AsyncClient(proxy=self.proxy_url) as client:
+        async with open_client(self.client_factory, self.proxy_url) as client:
             response = await client.post(
                 f'{self.base_url_v2}/auth/challenge/sms/start',
                 json=request_data,
@@ -202,7 +203,7 @@ class AuthProviderImpl(AuthProvider):
             'deviceInfo': self.device_info.model_dump(),
         }
 
-        async with httpx.AsyncClient(proxy=self.proxy_url) as client:
+        async with open_client(self.client_factory, self.proxy_url) as client:
             response = await client.post(
                 f'{self.base_url_v1}/auth/challenge/sms/verify',
                 json=request_data,
@@ -235,7 +236,7 @@ class AuthProviderImpl(AuthProvider):
         }
 
         try:
-            async with httpx.AsyncClient(proxy=self.proxy_url) as client:
+            async with open_client(self.client_factory, self.proxy_url) as client:
                 response = await client.post(
                     f'{self.base_url_v1}/auth/token',
                     json=request_data,
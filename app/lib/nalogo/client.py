@@ -6,7 +6,7 @@ Based on PHP library's ApiClient class.
 import json
 from typing import Any
 
-from ._http import AsyncHTTPClient
+from ._http import AsyncHTTPClient, HttpClientFactory
 from .auth import AuthProviderImpl
 from .income import IncomeAPI
 from .payment_type import PaymentTypeAPI
@@ -37,6 +37,7 @@ class Client:
         device_id: str | None = None,
         timeout: float = 10.0,
         proxy_url: str | None = None,
+        http_client_factory: HttpClientFactory | None = None,
     ):
         """
         Initialize Moy Nalog API client.
@@ -47,6 +48,8 @@ class Client:
             device_id: Optional device ID (auto-generated if not provided)
             timeout: HTTP request timeout in seconds
             proxy_url: Optional SOCKS proxy URL for routing traffic
+            http_client_factory: Optional callable returning a shared httpx client
+                (configured with the proxy); by default each request opens its own client
         """
         self.base_url = base_url
         self.timeout = timeout
@@ -57,6 +60,7 @@ class Client:
             storage_path=storage_path,
             device_id=device_id,
             proxy_url=proxy_url,
+            client_factory=http_client_factory,
         )
 
         # Initialize HTTP client with auth middleware
@@ -71,6 +75,7 @@ class Client:
             },
             timeout=timeout,
             proxy_url=proxy_url,
+            client_factory=http_client_factory,
         )
 
         # User profile data (for receipt operations)
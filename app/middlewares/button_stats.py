@@ -1,6 +1,5 @@
 """Middleware для автоматического логирования кликов по кнопкам."""
 
-import asyncio
 from collections.abc import Awaitable, Callable
 from typing import Any
 
@@ -9,7 +8,7 @@ from aiogram import BaseMiddleware
 from aiogram.types import CallbackQuery, Message, TelegramObject
 
 from app.config import settings
-from app.database.database import AsyncSessionLocal
+from app.services.button_click_log_writer import ClickLogEntry, button_click_log_writer
 
 
 logger = structlog.get_logger(__name__)
@@ -110,7 +109,7 @@ class ButtonStatsMiddleware(BaseMiddleware):
         return await handler(event, data)
 
     def _log_callback(self, event: CallbackQuery) -> None:
-        """Логирует клик по inline-кнопке (асинхронно, не блокируя обработку)."""
+        """Логирует клик по inline-кнопке (через буфер пакетной записи, не блокируя обработку)."""
         try:
             callback_data = event.data
             if not callback_data:
@@ -124,14 +123,12 @@ class ButtonStatsMiddleware(BaseMiddleware):
             if event.message and hasattr(event.message, 'reply_markup'):
                 button_text = self._extract_button_text(event.message.reply_markup, callback_data)
 
-            asyncio.create_task(
-                self._log_button_click_async(
-                    button_id=callback_data,
-                    user_id=user_id,
-                    callback_data=callback_data,
-                    button_type=button_type,
-                    button_text=button_text,
-                )
+            self._enqueue_click(
+                button_id=callback_data,
+                user_id=user_id,
+                callback_data=callback_data,
+                button_type=button_type,
+                button_text=button_text,
             )
         except Exception as e:
             # Не прерываем обработку при ошибке логирования
@@ -158,14 +155,12 @@ class ButtonStatsMiddleware(BaseMiddleware):
 
             user_id = event.from_user.id if event.from_user else None
 
-            asyncio.create_task(
-                self._log_button_click_async(
-                    button_id=command,
-                    user_id=user_id,
-                    callback_data=None,
-                    button_type='command',
-                    button_text=f'{command} …' if has_payload else command,
-                )
+            self._enqueue_click(
+                button_id=command,
+                user_id=user_id,
+                callback_data=None,
+                button_type='command',
+                button_text=f'{command} …' if has_payload else command,
             )
         except Exception as e:
             logger.error('Ошибка логирования команды бота', error=e, exc_info=True)
@@ -212,29 +207,21 @@ class ButtonStatsMiddleware(BaseMiddleware):
             pass
         return None
 
-    async def _log_button_click_async(
+    def _enqueue_click(
         self,
         button_id: str,
-        user_id: int = None,
-        callback_data: str = None,
-        button_type: str = None,
-        button_text: str = None,
-    ):
-        """Асинхронно логирует клик по кнопке."""
-        try:
-            async with AsyncSessionLocal() as db:
-                try:
-                    from app.services.menu_layout_service import MenuLayoutService
-
-                    await MenuLayoutService.log_button_click(
-                        db,
-                        button_id=button_id,
-                        user_id=user_id,
-                        callback_data=callback_data,
-                        button_type=button_type,
-                        button_text=button_text,
-                    )
-                except Exception as e:
-                    logger.warning('Ошибка записи клика в БД', button_id=button_id, error=e)
-        except Exception as e:
-            logger.warning('Ошибка создания сессии БД для логирования клика', error=e)
+        user_id: int | None = None,
+        callback_data: str | None = None,
+        button_type: str | None = None,
+        button_text: str | None = None,
+    ) -> None:
+        """Кладёт клик в буфер фонового писателя (user_id здесь — Telegram ID)."""
+        button_click_log_writer.enqueue(
+            ClickLogEntry(
+                button_id=button_id,
+                telegram_id=user_id,
+                callback_data=callback_data,
+                button_type=button_type,
+                button_text=button_text,
+            )
+        )
@@ -0,0 +1,94 @@
+from collections.abc import Awaitable, Callable
+from time import perf_counter
+from typing import Any
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.types import TelegramObject
+
+from app.utils.metrics import HANDLER_ERRORS, HANDLER_SECONDS, MIDDLEWARE_SECONDS, db_query_scope
+
+
+Handler = Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]]
+
+INSTRUMENTED_EVENTS = ('message', 'callback_query', 'pre_checkout_query')
+
+
+def _handler_name(data: dict[str, Any]) -> str:
+    handler_object = data.get('handler')
+    callback = getattr(handler_object, 'callback', None)
+    if callback is None:
+        return 'unknown'
+    module = getattr(callback, '__module__', '') or ''
+    return f'{module.removeprefix("app.handlers.")}.{getattr(callback, "__qualname__", repr(callback))}'
+
+
+class UpdateScopeMiddleware(BaseMiddleware):
+    """Первая стадия: считает SQL-запросы всего обновления (middleware + обработчик)."""
+
+    async def __call__(self, handler: Handler, event: TelegramObject, data: dict[str, Any]) -> Any:
+        with db_query_scope('bot'):
+            return await handler(event, data)
+
+
+class StageMetricsMiddleware(BaseMiddleware):
+    """Меряет собственное время обёрнутого middleware — до передачи события следующей стадии."""
+
+    def __init__(self, middleware: Any, event: str) -> None:
+        self.middleware = middleware
+        self._histogram = MIDDLEWARE_SECONDS.labels(event, type(middleware).__name__)
+
+    async def __call__(self, handler: Handler, event: TelegramObject, data: dict[str, Any]) -> Any:
+        start = perf_counter()
+        passed = False
+
+        async def next_stage(event: TelegramObject, data: dict[str, Any]) -> Any:
+            nonlocal passed
+            passed = True
+            self._histogram.observe(perf_counter() - start)
+            return await handler(event, data)
+
+        try:
+            return await self.middleware(next_stage, event, data)
+        finally:
+            # Middleware остановил событие сам — всё его время собственное
+            if not passed:
+                self._histogram.observe(perf_counter() - start)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Последняя стадия: время самого обработчика."""
+
+    def __init__(self, event: str) -> None:
+        self.event = event
+
+    async def __call__(self, handler: Handler, event: TelegramObject, data: dict[str, Any]) -> Any:
+        name = _handler_name(data)
+        start = perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.labels(self.event, name).inc()
+            raise
+        finally:
+            HANDLER_SECONDS.labels(self.event, name).observe(perf_counter() - start)
+
+
+def _instrument_observer(observer: TelegramEventObserver, event: str) -> None:
+    middlewares = list(observer.middleware)
+    for middleware in middlewares:
+        observer.middleware.unregister(middleware)
+
+    observer.middleware.register(UpdateScopeMiddleware())
+    for middleware in middlewares:
+        observer.middleware.register(StageMetricsMiddleware(middleware, event))
+    observer.middleware.register(HandlerMetricsMiddleware(event))
+
+
+def instrument_dispatcher(dp: Dispatcher) -> None:
+    """Оборачивает уже зарегистрированные middleware и добавляет замер обработчиков.
+
+    Вызывается после регистрации всех middleware диспетчера.
+    """
+    for event in INSTRUMENTED_EVENTS:
+        _instrument_observer(getattr(dp, event), event)
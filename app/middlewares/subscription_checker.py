@@ -1,5 +1,5 @@
 from collections.abc import Awaitable, Callable
-from datetime import UTC, datetime, timedelta
+from datetime import UTC, datetime
 from typing import Any
 
 import structlog
@@ -11,18 +11,16 @@ from app.database.models import SubscriptionStatus
 
 logger = structlog.get_logger(__name__)
 
-# Буфер времени перед деактивацией (защита от race condition при продлении)
-EXPIRATION_BUFFER_MINUTES = 5
-
 
 class SubscriptionStatusMiddleware(BaseMiddleware):
     """
-    Проверяет статус подписки пользователя.
-    ВАЖНО: Использует db и db_user из data, которые уже загружены в AuthMiddleware.
-    Не создаёт дополнительных сессий БД.
+    Read-only проверка истечения подписок пользователя.
+    ВАЖНО: Использует db_user из data, который уже загружен в AuthMiddleware.
+    Не создаёт сессий и ничего не пишет в БД.
 
-    Деактивирует подписку только если она истекла более чем на EXPIRATION_BUFFER_MINUTES минут.
-    Это защищает от race conditions при продлении подписки.
+    Статус EXPIRED выставляет планировщик истечения в MonitoringService в момент end_date.
+    До его прохода ``Subscription.is_active`` и так учитывает end_date, поэтому здесь
+    достаточно разбудить планировщик, если он по какой-то причине отстал.
     """
 
     async def __call__(
@@ -31,18 +29,13 @@ class SubscriptionStatusMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: dict[str, Any],
     ) -> Any:
-        # Используем db и user из AuthMiddleware - не создаём новую сессию!
-        db = data.get('db')
         user = data.get('db_user')
 
-        if db and user and getattr(user, 'subscriptions', None):
+        if user and getattr(user, 'subscriptions', None):
             try:
                 current_time = datetime.now(UTC)
-                needs_commit = False
-
-                # Check all subscriptions (multi-tariff aware)
                 for subscription in user.subscriptions:
-                    # Суточные подписки управляются DailySubscriptionService — не экспайрим их тут
+                    # Суточные подписки управляются DailySubscriptionService
                     tariff = getattr(subscription, 'tariff', None)
                     is_active_daily = tariff and getattr(tariff, 'is_daily', False) and not subscription.is_daily_paused
 
@@ -52,30 +45,15 @@ class SubscriptionStatusMiddleware(BaseMiddleware):
                         and subscription.end_date <= current_time
                         and not is_active_daily
                     ):
-                        time_since_expiry = current_time - subscription.end_date
-
-                        if time_since_expiry > timedelta(minutes=EXPIRATION_BUFFER_MINUTES):
-                            subscription.status = SubscriptionStatus.EXPIRED.value
-                            subscription.updated_at = current_time
-                            needs_commit = True
-
-                            logger.warning(
-                                '⏰ Middleware DEACTIVATION: подписка деактивирована',
-                                subscription_id=subscription.id,
-                                user_id=user.id,
-                                end_date=subscription.end_date,
-                                time_since_expiry=time_since_expiry,
-                            )
-                        else:
-                            logger.debug(
-                                '⏰ Middleware: подписка истекла недавно, ждём буфер перед деактивацией',
-                                user_id=user.id,
-                                time_since_expiry=time_since_expiry,
-                                EXPIRATION_BUFFER_MINUTES=EXPIRATION_BUFFER_MINUTES,
-                            )
-
-                if needs_commit:
-                    await db.commit()
+                        from app.services.monitoring_service import monitoring_service
+
+                        logger.debug(
+                            '⏰ Middleware: подписка истекла, будим планировщик истечения',
+                            subscription_id=subscription.id,
+                            user_id=user.id,
+                        )
+                        monitoring_service.wake_expiry_scheduler()
+                        break
 
             except Exception as e:
                 logger.error('Ошибка проверки статуса подписки', error=e)
@@ -1,5 +1,6 @@
 import time
-from collections.abc import Awaitable, Callable
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass
 from typing import Any
 
 import structlog
@@ -8,18 +9,47 @@ from aiogram.exceptions import TelegramAPIError
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message, TelegramObject
 
+from app.utils.cache import GcraRateLimitCache, cache_key
+
 
 logger = structlog.get_logger(__name__)
 
 
+@dataclass(frozen=True, slots=True)
+class GcraLimit:
+    """Лимит GCRA: ``burst`` запросов подряд, далее один раз в ``interval`` секунд."""
+
+    name: str
+    interval: float
+    burst: int = 1
+
+    @property
+    def tolerance(self) -> float:
+        return self.interval * (self.burst - 1)
+
+
+@dataclass(frozen=True, slots=True)
+class _Decision:
+    allowed: bool
+    retry_after: float = 0.0
+    limit: GcraLimit | None = None
+
+
 class ThrottlingMiddleware(BaseMiddleware):
     """
-    Двухуровневый rate-limiter:
-    1. Общий троттлинг — 0.5 сек между любыми сообщениями (UX)
-    2. /start burst-лимит — макс N вызовов за окно (anti-spam)
-
-    NOTE: Assumes single-process, single-event-loop execution.
-    For multi-worker deployments, replace with Redis-based rate limiting.
+    Двухуровневый rate-limiter на GCRA (generic cell rate algorithm):
+    1. Общий троттлинг — один апдейт в 0.5 сек на пользователя (UX)
+    2. /start burst-лимит — N вызовов подряд, дальше не чаще одного в window / N (anti-spam)
+
+    Состояние лимитов хранится в Redis (один EVALSHA на апдейт для всех лимитов
+    сразу), поэтому лимиты общие для всех реплик. Перед Redis стоит локальный
+    пре-фильтр с теми же лимитами: локальная реплика видит лишь часть апдейтов
+    пользователя, поэтому её отказ всегда совпадает с глобальным — явный флуд
+    отсекается без сетевого запроса. Без Redis решение принимает только
+    локальный фильтр.
+
+    ``cost_weights`` задаёт вес апдейта по префиксу callback_data или команды:
+    после тяжёлого действия следующий апдейт допускается через ``interval * cost``.
     """
 
     def __init__(
@@ -27,30 +57,89 @@ class ThrottlingMiddleware(BaseMiddleware):
         rate_limit: float = 0.5,
         start_max_calls: int = 3,
         start_window: float = 60.0,
+        cost_weights: Mapping[str, float] | None = None,
+        use_redis: bool = True,
     ):
         self.rate_limit = rate_limit
-        self.user_buckets: dict[int, float] = {}
+        self.general_limit = GcraLimit('general', interval=rate_limit)
 
-        # /start anti-spam: sliding window per user
+        # /start anti-spam
         self.start_max_calls = start_max_calls
         self.start_window = start_window
-        self.start_buckets: dict[int, list[float]] = {}
+        self.start_limit = GcraLimit('start', interval=start_window / start_max_calls, burst=start_max_calls)
+
+        # Сортируем по длине префикса: побеждает самый специфичный
+        self.cost_weights = sorted((cost_weights or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.use_redis = use_redis
+
+        # Локальные TAT (theoretical arrival time) по (лимит, пользователь)
+        self.local_tats: dict[tuple[str, int], float] = {}
 
         self._last_cleanup: float = time.monotonic()
         self._cleanup_interval: float = 30.0
 
     def _maybe_cleanup(self, now: float) -> None:
-        """Periodic cleanup of stale entries. Runs at most once per _cleanup_interval."""
+        """Periodic cleanup of stale entries. Runs at most once per _cleanup_interval.
+
+        TAT в прошлом эквивалентен отсутствию записи, поэтому такие записи удаляются.
+        """
         if now - self._last_cleanup < self._cleanup_interval:
             return
         self._last_cleanup = now
-        cleanup_threshold = now - 60
-        self.user_buckets = {uid: ts for uid, ts in self.user_buckets.items() if ts > cleanup_threshold}
-        self.start_buckets = {
-            uid: [ts for ts in tss if now - ts < self.start_window]
-            for uid, tss in self.start_buckets.items()
-            if any(now - ts < self.start_window for ts in tss)
-        }
+        self.local_tats = {key: tat for key, tat in self.local_tats.items() if tat > now}
+
+    def _resolve_cost(self, event: TelegramObject) -> float:
+        if not self.cost_weights:
+            return 1.0
+        if isinstance(event, CallbackQuery):
+            subject = event.data or ''
+        elif isinstance(event, Message):
+            subject = (event.text or '').split(maxsplit=1)[0] if event.text else ''
+        else:
+            return 1.0
+        for prefix, weight in self.cost_weights:
+            if subject.startswith(prefix):
+                return weight
+        return 1.0
+
+    def _check_local(self, user_id: int, limits: list[tuple[GcraLimit, float]], now: float) -> tuple[_Decision, dict]:
+        """Проверяет лимиты по локальному состоянию, не изменяя его."""
+        new_tats: dict[tuple[str, int], float] = {}
+        worst = _Decision(allowed=True)
+        for limit, cost in limits:
+            key = (limit.name, user_id)
+            tat = max(self.local_tats.get(key, now), now)
+            allow_at = tat - limit.tolerance
+            new_tat = tat + limit.interval * cost
+            if allow_at > now and allow_at - now > worst.retry_after:
+                worst = _Decision(allowed=False, retry_after=allow_at - now, limit=limit)
+            new_tats[key] = new_tat
+        return worst, new_tats
+
+    async def _check(self, user_id: int, limits: list[tuple[GcraLimit, float]]) -> _Decision:
+        now = time.monotonic()
+        self._maybe_cleanup(now)
+
+        local_decision, new_tats = self._check_local(user_id, limits, now)
+        if not local_decision.allowed:
+            return local_decision
+
+        if self.use_redis:
+            remote = await GcraRateLimitCache.check(
+                [
+                    (cache_key('throttle', limit.name, user_id), limit.interval, limit.tolerance, cost)
+                    for limit, cost in limits
+                ]
+            )
+            if remote is not None:
+                allowed, retry_after, rejected_index = remote
+                if not allowed:
+                    return _Decision(allowed=False, retry_after=retry_after, limit=limits[rejected_index][0])
+
+        # Локальное состояние двигаем только для пропущенных апдейтов, иначе
+        # локальный фильтр стал бы строже глобального.
+        self.local_tats.update(new_tats)
+        return _Decision(allowed=True)
 
     async def __call__(
         self,
@@ -65,68 +154,58 @@ class ThrottlingMiddleware(BaseMiddleware):
         if not user_id:
             return await handler(event, data)
 
-        now = time.monotonic()
+        cost = self._resolve_cost(event)
+        limits = [(self.general_limit, cost)]
+        is_start = isinstance(event, Message) and event.text and event.text.split(maxsplit=1)[0] == '/start'
+        if is_start:
+            limits.append((self.start_limit, 1.0))
 
-        # Always run cleanup (independent of throttle path)
-        self._maybe_cleanup(now)
+        decision = await self._check(user_id, limits)
+        if decision.allowed:
+            return await handler(event, data)
 
         # --- /start burst rate-limit ---
-        if isinstance(event, Message) and event.text and event.text.split(maxsplit=1)[0] == '/start':
-            timestamps = self.start_buckets.get(user_id, [])
-            timestamps = [ts for ts in timestamps if now - ts < self.start_window]
-
-            if len(timestamps) >= self.start_max_calls:
-                cooldown = max(1, int(self.start_window - (now - timestamps[0])) + 1)
-                logger.warning(
-                    'Rate-limit /start burst exceeded',
-                    user_id=user_id,
-                    call_count=len(timestamps),
-                    window_sec=int(self.start_window),
-                    max_calls=self.start_max_calls,
+        if decision.limit is self.start_limit:
+            cooldown = max(1, int(decision.retry_after) + 1)
+            logger.warning(
+                'Rate-limit /start burst exceeded',
+                user_id=user_id,
+                window_sec=int(self.start_window),
+                max_calls=self.start_max_calls,
+                retry_after=round(decision.retry_after, 1),
+            )
+            try:
+                await event.answer(f'⏳ Слишком много запросов. Попробуйте через {cooldown} сек.')
+            except TelegramAPIError:
+                pass
+            return None
+
+        # --- Общий троттлинг ---
+        logger.debug('Throttling user', user_id=user_id)
+
+        # Для сообщений: молчим только если это состояние работы с тикетами; иначе показываем блок
+        if isinstance(event, Message):
+            try:
+                fsm: FSMContext | None = data.get('state')
+                current = await fsm.get_state() if fsm else None
+            except Exception:
+                current = None
+            if current:
+                state_str = str(current)
+                is_ticket_state = (':waiting_for_message' in state_str or ':waiting_for_reply' in state_str) and (
+                    'TicketStates' in state_str or 'AdminTicketStates' in state_str
                 )
-                try:
-                    await event.answer(f'⏳ Слишком много запросов. Попробуйте через {cooldown} сек.')
-                except TelegramAPIError:
-                    pass
-                self.start_buckets[user_id] = timestamps
-                return None
-
-            timestamps.append(now)
-            self.start_buckets[user_id] = timestamps
-
-        # --- Общий троттлинг (0.5 сек) ---
-        last_call = self.user_buckets.get(user_id, 0)
-
-        if now - last_call < self.rate_limit:
-            logger.debug('Throttling user', user_id=user_id)
-
-            # Для сообщений: молчим только если это состояние работы с тикетами; иначе показываем блок
-            if isinstance(event, Message):
-                try:
-                    fsm: FSMContext | None = data.get('state')
-                    current = await fsm.get_state() if fsm else None
-                except Exception:
-                    current = None
-                if current:
-                    state_str = str(current)
-                    is_ticket_state = (':waiting_for_message' in state_str or ':waiting_for_reply' in state_str) and (
-                        'TicketStates' in state_str or 'AdminTicketStates' in state_str
-                    )
-                    if is_ticket_state:
-                        return None
-                try:
-                    await event.answer('⏳ Пожалуйста, не отправляйте сообщения так часто!')
-                except TelegramAPIError:
-                    pass
-                return None
-            # Для callback допустим краткое уведомление
-            if isinstance(event, CallbackQuery):
-                try:
-                    await event.answer('⏳ Слишком быстро! Подождите немного.', show_alert=True)
-                except TelegramAPIError:
-                    pass
-                return None
-
-        self.user_buckets[user_id] = now
-
-        return await handler(event, data)
+                if is_ticket_state:
+                    return None
+            try:
+                await event.answer('⏳ Пожалуйста, не отправляйте сообщения так часто!')
+            except TelegramAPIError:
+                pass
+            return None
+        # Для callback допустим краткое уведомление
+        if isinstance(event, CallbackQuery):
+            try:
+                await event.answer('⏳ Слишком быстро! Подождите немного.', show_alert=True)
+            except TelegramAPIError:
+                pass
+        return None
@@ -8,7 +8,8 @@ from sqlalchemy import and_, delete, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
-from app.database.crud.user import OAUTH_PROVIDER_COLUMNS, get_user_by_id
+from app.database.crud.referral_contest import get_user_contest_ids, rebuild_contest_leaderboards
+from app.database.crud.user import OAUTH_PROVIDER_COLUMNS, get_user_by_id, reconcile_user_spending_counters
 from app.database.models import (
     AccessPolicy,
     AdminAuditLog,
@@ -701,6 +702,8 @@ async def execute_merge(
 
     # 6. Переназначение транзакций
     await db.execute(update(Transaction).where(Transaction.user_id == secondary.id).values(user_id=primary.id))
+    # Покупки secondary теперь числятся за primary — пересчитываем счётчики трат обоих
+    await reconcile_user_spending_counters(db, [primary.id, secondary.id])
 
     # 7. Переназначение всех платёжных таблиц
     for payment_model in _PAYMENT_MODELS:
@@ -842,6 +845,8 @@ async def execute_merge(
     await db.execute(update(UserRole).where(UserRole.assigned_by == secondary.id).values(assigned_by=None))
 
     # 10h. Переназначение referral_contest_events (unique: contest_id + referral_id)
+    # Счёт конкурсов хранится отдельно — запоминаем затронутые до правки событий
+    affected_contest_ids = await get_user_contest_ids(db, [primary.id, secondary.id])
     # Удаляем cross-referral события между участниками мержа
     await db.execute(
         delete(ReferralContestEvent).where(
@@ -871,6 +876,7 @@ async def execute_merge(
         .where(ReferralContestEvent.referrer_id == secondary.id)
         .values(referrer_id=primary.id)
     )
+    await rebuild_contest_leaderboards(db, affected_contest_ids, commit=False)
 
     # 10i. Переназначение promocode_uses (unique constraint: user_id + promocode_id)
     primary_promo_ids = select(PromoCodeUse.promocode_id).where(PromoCodeUse.user_id == primary.id)
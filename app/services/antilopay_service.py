@@ -11,10 +11,13 @@ from Crypto.PublicKey import RSA
 from Crypto.Signature import pkcs1_15
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('antilopay', HttpClientConfig(timeout=30))
+
 API_BASE_URL = 'https://lk.antilopay.com/api/v2'
 
 
@@ -31,9 +34,6 @@ class AntilopayAPIError(Exception):
 class AntilopayService:
     """Сервис для работы с API Antilopay."""
 
-    def __init__(self) -> None:
-        self._session: aiohttp.ClientSession | None = None
-
     @property
     def secret_id(self) -> str:
         return settings.ANTILOPAY_SECRET_ID or ''
@@ -52,17 +52,7 @@ class AntilopayService:
 
     async def _get_session(self) -> aiohttp.ClientSession:
         """Возвращает переиспользуемую HTTP-сессию."""
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=30),
-            )
-        return self._session
-
-    async def close(self) -> None:
-        """Закрывает HTTP-сессию."""
-        if self._session and not self._session.closed:
-            await self._session.close()
-            self._session = None
+        return http_clients.session('antilopay')
 
     def _sign_request(self, json_body: str) -> str:
         """SHA256WithRSA подпись JSON body приватным ключом.
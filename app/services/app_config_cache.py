@@ -0,0 +1,230 @@
+"""Общий кеш конфига страницы подписки Remnawave (список приложений и deep links).
+
+Конфиг нужен на каждом показе экрана подключения в кабинете и в боте, а меняется
+редко. Поэтому он хранится в Redis под ``app_config:{uuid}`` вместе с версией —
+хешем содержимого — и в локальной памяти процесса:
+
+- свежая запись (моложе ``APP_CONFIG_CACHE_TTL``) отдаётся без обращений к панели;
+- устаревшая отдаётся сразу, а обновление идёт в фоне (stale-while-revalidate),
+  одно на uuid внутри процесса и одно на кластер через ``SET NX`` в Redis;
+- локальная копия раз в ``LOCAL_RECHECK_SECONDS`` сверяет версию в Redis, так что
+  обновление или инвалидация в одном процессе доходят до остальных.
+
+Производные от конфига структуры (например, разобранные URL-схемы приложений)
+строятся один раз на версию через ``AppConfigVersion.derive``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+import structlog
+
+from app.config import settings
+from app.utils.cache import cache
+
+
+logger = structlog.get_logger(__name__)
+
+T = TypeVar('T')
+
+# Сколько устаревшая запись ещё может отдаваться, пока панель недоступна
+STALE_TTL_SECONDS = 24 * 3600
+# Как часто локальная копия сверяет версию с Redis
+LOCAL_RECHECK_SECONDS = 30.0
+REFRESH_LOCK_SECONDS = 30
+
+
+def _get_remnawave_config_uuid() -> str | None:
+    try:
+        from app.services.system_settings_service import bot_configuration_service
+
+        return bot_configuration_service.get_current_value('CABINET_REMNA_SUB_CONFIG')
+    except Exception as error:
+        logger.debug('Не удалось прочитать CABINET_REMNA_SUB_CONFIG из настроек', error=error)
+        return getattr(settings, 'CABINET_REMNA_SUB_CONFIG', None)
+
+
+def config_version(config: dict[str, Any]) -> str:
+    payload = json.dumps(config, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+@dataclass(slots=True)
+class AppConfigVersion:
+    """Конкретная версия конфига. ``config`` общий для всех запросов — не мутировать."""
+
+    uuid: str
+    version: str
+    config: dict[str, Any]
+    fetched_at: float
+    checked_at: float = field(default_factory=time.monotonic)
+    _derived: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def derive(self, name: str, builder: Callable[[dict[str, Any]], T]) -> T:
+        """Возвращает производную структуру, построенную один раз для этой версии."""
+        if name not in self._derived:
+            self._derived[name] = builder(self.config)
+        return self._derived[name]
+
+
+class AppConfigCache:
+    def __init__(self, key_prefix: str = 'app_config') -> None:
+        self.key_prefix = key_prefix
+        self._local: dict[str, AppConfigVersion] = {}
+        self._refreshing: dict[str, asyncio.Task[AppConfigVersion | None]] = {}
+        # uuid, сброшенные invalidate(): копии в Redis для них уже недействительны,
+        # даже если фоновое удаление ключей ещё не выполнилось
+        self._invalidated: set[str] = set()
+
+    def _key(self, uuid: str) -> str:
+        return f'{self.key_prefix}:{uuid}'
+
+    @staticmethod
+    def _fresh_ttl() -> int:
+        return max(int(settings.APP_CONFIG_CACHE_TTL), 1)
+
+    async def get(self) -> AppConfigVersion | None:
+        """Текущая версия конфига для настроенного uuid или None, если он не задан/недоступен."""
+        uuid = _get_remnawave_config_uuid()
+        if not uuid:
+            return None
+
+        entry = self._local.get(uuid)
+        if entry is not None and time.monotonic() - entry.checked_at >= LOCAL_RECHECK_SECONDS:
+            entry = await self._sync_with_shared(uuid, entry)
+
+        if entry is None and uuid not in self._invalidated:
+            entry = await self._load_shared(uuid)
+        if entry is None:
+            return await self._refresh_once(uuid)
+
+        if entry.age >= self._fresh_ttl():
+            self._schedule_refresh(uuid)
+        return entry
+
+    async def _load_shared(self, uuid: str) -> AppConfigVersion | None:
+        payload = await cache.get(self._key(uuid))
+        if not isinstance(payload, dict) or not isinstance(payload.get('config'), dict):
+            return None
+        entry = AppConfigVersion(
+            uuid=uuid,
+            version=str(payload.get('version') or config_version(payload['config'])),
+            config=payload['config'],
+            fetched_at=float(payload.get('fetched_at') or 0.0),
+        )
+        self._local[uuid] = entry
+        return entry
+
+    async def _sync_with_shared(self, uuid: str, entry: AppConfigVersion) -> AppConfigVersion | None:
+        shared_version = await cache.get(f'{self._key(uuid)}:version')
+        entry.checked_at = time.monotonic()
+        if shared_version is None:
+            # Ключ удалён инвалидацией в другом процессе (или Redis недоступен) —
+            # отдаём что есть, но сразу обновляем в фоне
+            if cache.is_connected:
+                entry.fetched_at = 0.0
+            return entry
+        if shared_version == entry.version:
+            return entry
+        return await self._load_shared(uuid) or entry
+
+    def _schedule_refresh(self, uuid: str) -> None:
+        if uuid in self._refreshing:
+            return
+        task = asyncio.create_task(self._refresh(uuid, background=True), name=f'app-config-refresh:{uuid}')
+        self._refreshing[uuid] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(uuid, None))
+
+    async def _refresh_once(self, uuid: str) -> AppConfigVersion | None:
+        task = self._refreshing.get(uuid)
+        if task is None:
+            task = asyncio.create_task(self._refresh(uuid, background=False), name=f'app-config-load:{uuid}')
+            self._refreshing[uuid] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(uuid, None))
+        return await asyncio.shield(task)
+
+    async def _refresh(self, uuid: str, *, background: bool) -> AppConfigVersion | None:
+        lock_key = f'{self._key(uuid)}:lock'
+        if background and cache.is_connected and not await cache.setnx(lock_key, 1, expire=REFRESH_LOCK_SECONDS):
+            # Другой процесс уже обновляет конфиг — подхватим его версию при следующей сверке
+            return self._local.get(uuid)
+
+        try:
+            config = await self._fetch(uuid)
+        finally:
+            if background:
+                await cache.delete(lock_key)
+
+        if config is None:
+            return self._local.get(uuid)
+
+        self._invalidated.discard(uuid)
+        version = config_version(config)
+        previous = self._local.get(uuid)
+        if previous is not None and previous.version == version:
+            previous.fetched_at = time.time()
+            previous.checked_at = time.monotonic()
+            entry = previous
+        else:
+            entry = AppConfigVersion(uuid=uuid, version=version, config=config, fetched_at=time.time())
+            self._local[uuid] = entry
+            logger.info('Загружена новая версия конфига приложений', remnawave_uuid=uuid, version=version)
+
+        expire = self._fresh_ttl() + STALE_TTL_SECONDS
+        await cache.set(
+            self._key(uuid),
+            {'version': entry.version, 'fetched_at': entry.fetched_at, 'config': entry.config},
+            expire=expire,
+        )
+        await cache.set(f'{self._key(uuid)}:version', entry.version, expire=expire)
+        return entry
+
+    @staticmethod
+    async def _fetch(uuid: str) -> dict[str, Any] | None:
+        try:
+            from app.services.remnawave_service import RemnaWaveService
+
+            service = RemnaWaveService()
+            async with service.get_api_client() as api:
+                page_config = await api.get_subscription_page_config(uuid)
+        except Exception as error:
+            logger.warning('Failed to load Remnawave config', error=error)
+            return None
+        if not page_config or not page_config.config:
+            return None
+        return dict(page_config.config)
+
+    def invalidate(self) -> None:
+        """Сбрасывает локальные копии и ключи в Redis; следующий запрос перечитает панель.
+
+        Синхронная — вызывается из синхронных обработчиков; удаление в Redis уходит
+        фоновой задачей, когда есть работающий event loop.
+        """
+        uuids = set(self._local)
+        self._local.clear()
+        current = _get_remnawave_config_uuid()
+        if current:
+            uuids.add(current)
+        self._invalidated.update(uuids)
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        for uuid in uuids:
+            loop.create_task(cache.delete(self._key(uuid)))
+            loop.create_task(cache.delete(f'{self._key(uuid)}:version'))
+
+
+app_config_cache = AppConfigCache()
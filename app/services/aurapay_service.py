@@ -8,10 +8,13 @@ import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('aurapay', HttpClientConfig(timeout=30))
+
 API_BASE_URL = 'https://app.aurapay.tech'
 
 
@@ -27,9 +30,6 @@ class AuraPayAPIError(Exception):
 class AuraPayService:
     """Сервис для работы с API AuraPay."""
 
-    def __init__(self):
-        self._session: aiohttp.ClientSession | None = None
-
     @property
     def api_key(self) -> str:
         return settings.AURAPAY_API_KEY or ''
@@ -44,17 +44,7 @@ class AuraPayService:
 
     async def _get_session(self) -> aiohttp.ClientSession:
         """Возвращает переиспользуемую HTTP-сессию."""
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=30),
-            )
-        return self._session
-
-    async def close(self) -> None:
-        """Закрывает HTTP-сессию."""
-        if self._session and not self._session.closed:
-            await self._session.close()
-            self._session = None
+        return http_clients.session('aurapay')
 
     def _build_headers(self) -> dict[str, str]:
         """Строит заголовки запроса с X-ApiKey и X-ShopId."""
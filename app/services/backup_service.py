@@ -25,6 +25,7 @@ from sqlalchemy.orm import selectinload
 from sqlalchemy.pool import NullPool
 
 from app.config import settings
+from app.database.crud.referral_contest import rebuild_contest_leaderboards
 from app.database.database import AsyncSessionLocal, engine, sync_postgres_sequences
 from app.database.models import (
     AccessPolicy,
@@ -1202,6 +1203,8 @@ class BackupService:
                 restored_tables += assoc_tables
                 restored_records += assoc_records
 
+                await self._rebuild_contest_leaderboards(db)
+
                 await db.commit()
 
                 # Синхронизируем PostgreSQL sequences после ORM-восстановления,
@@ -1219,6 +1222,17 @@ class BackupService:
 
         return restored_tables, restored_records
 
+    async def _rebuild_contest_leaderboards(self, db: AsyncSession) -> None:
+        """Пересчитывает счёт всех конкурсов из восстановленных событий.
+
+        ``referral_contest_scores`` в бекап не входит (бекапы до 0108 его и не
+        содержат), а TRUNCATE ``referral_contests`` очищает его каскадом.
+        """
+        contest_ids = (await db.execute(select(ReferralContest.id))).scalars().all()
+        if contest_ids:
+            await rebuild_contest_leaderboards(db, contest_ids, commit=False)
+            logger.info('🏆 Лидерборды конкурсов пересчитаны', contests=len(contest_ids))
+
     async def _restore_from_legacy(
         self,
         backup_path: Path,
@@ -1630,6 +1644,7 @@ class BackupService:
             'contest_rounds',
             'contest_templates',
             'referral_contest_virtual_participants',
+            'referral_contest_scores',
             'referral_contest_events',
             'referral_contests',
             # --- Webhooks ---
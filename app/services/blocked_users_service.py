@@ -18,6 +18,7 @@ from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.database.crud.referral_contest import get_user_contest_ids, rebuild_contest_leaderboards
 from app.database.models import (
     AdvertisingCampaignRegistration,
     ButtonClickLog,
@@ -370,6 +371,8 @@ class BlockedUsersService:
             await db.execute(delete(SentNotification).where(SentNotification.user_id == user.id))
             await db.execute(delete(PollResponse).where(PollResponse.user_id == user.id))
             await db.execute(delete(ContestAttempt).where(ContestAttempt.user_id == user.id))
+            # Затронутые конкурсы снимаем до удаления событий — потом их уже не найти
+            contest_ids = await get_user_contest_ids(db, [user.id])
             await db.execute(delete(ReferralContestEvent).where(ReferralContestEvent.referrer_id == user.id))
             await db.execute(delete(ReferralContestEvent).where(ReferralContestEvent.referral_id == user.id))
             await db.execute(
@@ -386,8 +389,10 @@ class BlockedUsersService:
             for referral in referrals_result.scalars().all():
                 referral.referred_by_id = None
 
-            # Удаляем пользователя
+            # Удаляем пользователя и пересчитываем счёт конкурсов без его событий
             await db.delete(user)
+            await db.flush()
+            await rebuild_contest_leaderboards(db, contest_ids, commit=False)
             await db.commit()
 
             logger.info('Пользователь полностью удален из БД', user_display=user_display)
@@ -26,6 +26,7 @@ from app.handlers.admin.messages import (
     get_custom_users,
     get_target_users,
 )
+from app.utils.metrics import QUEUE_DEPTH, metrics
 
 
 if TYPE_CHECKING:
@@ -108,11 +109,21 @@ class BroadcastService:
     def __init__(self) -> None:
         self._bot: Bot | None = None
         self._tasks: dict[int, _BroadcastTask] = {}
+        # Сколько получателей ещё не обработано в каждой идущей рассылке
+        self._pending_recipients: dict[int, int] = {}
         self._lock = asyncio.Lock()
 
     def set_bot(self, bot: Bot) -> None:
         self._bot = bot
 
+    @property
+    def pending_recipients(self) -> int:
+        return sum(self._pending_recipients.values())
+
+    def _forget(self, broadcast_id: int) -> None:
+        self._tasks.pop(broadcast_id, None)
+        self._pending_recipients.pop(broadcast_id, None)
+
     def is_running(self, broadcast_id: int) -> bool:
         task_entry = self._tasks.get(broadcast_id)
         return bool(task_entry and not task_entry.task.done())
@@ -135,7 +146,7 @@ class BroadcastService:
                 name=f'broadcast-{broadcast_id}',
             )
             self._tasks[broadcast_id] = _BroadcastTask(task=task, cancel_event=cancel_event)
-            task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+            task.add_done_callback(lambda _: self._forget(broadcast_id))
 
     async def request_stop(self, broadcast_id: int) -> bool:
         async with self._lock:
@@ -380,6 +391,7 @@ class BroadcastService:
                 await self._mark_cancelled(broadcast_id, sent_count, failed_count, blocked_count)
                 return sent_count, failed_count, blocked_count, True
 
+            self._pending_recipients[broadcast_id] = len(recipient_ids) - i
             batch = recipient_ids[i : i + _TG_BATCH_SIZE]
             results = await asyncio.gather(
                 *[send_single(tid) for tid in batch],
@@ -656,6 +668,9 @@ async def cleanup_blocked_broadcast_users(blocked_telegram_ids: list[int]) -> No
 
 
 broadcast_service = BroadcastService()
+metrics.add_collector(
+    'broadcast_recipients', lambda: QUEUE_DEPTH.labels('broadcast').set(broadcast_service.pending_recipients)
+)
 
 
 class EmailBroadcastService:
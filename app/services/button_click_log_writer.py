@@ -0,0 +1,225 @@
+"""Пакетная фоновая запись лога кликов и действий юзера в button_click_logs.
+
+Раньше каждое нажатие кнопки (ButtonStatsMiddleware) и каждое мутационное
+действие в кабинете (user_action_log_service) порождало отдельную задачу со
+своей сессией, SELECT'ом пользователя и COMMIT'ом — в часы пик это основная
+пишущая нагрузка на БД. Теперь источники только кладут запись в ограниченный
+кольцевой буфер, а один фоновый писатель сбрасывает его раз в N мс или по
+накоплении M записей: один SELECT для резолва пользователей и один
+многострочный INSERT на пачку.
+
+Буфер ограничен: если БД тормозит и буфер заполнен, новые записи
+отбрасываются со счётчиком ``dropped`` — обработка апдейтов никогда не ждёт
+записи лога. При остановке буфер дописывается целиком.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+
+import structlog
+from sqlalchemy import insert, select
+
+from app.config import settings
+from app.database.database import AsyncSessionLocal
+from app.database.models import ButtonClickLog, User
+
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass(slots=True)
+class ClickLogEntry:
+    """Одна запись лога до резолва пользователя.
+
+    Ровно одно из ``telegram_id``/``user_id`` задаёт автора: бот знает только
+    Telegram ID, кабинет — внутренний ``User.id``.
+    """
+
+    button_id: str
+    telegram_id: int | None = None
+    user_id: int | None = None
+    callback_data: str | None = None
+    button_type: str | None = None
+    button_text: str | None = None
+    clicked_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+
+
+class ButtonClickLogWriter:
+    """Ограниченный буфер записей лога + фоновый писатель пачками."""
+
+    def __init__(
+        self,
+        *,
+        buffer_size: int | None = None,
+        batch_size: int | None = None,
+        flush_interval_ms: int | None = None,
+    ) -> None:
+        self._buffer_size = max(1, buffer_size or settings.USER_ACTION_LOG_BUFFER_SIZE)
+        self._batch_size = max(1, batch_size or settings.USER_ACTION_LOG_BATCH_SIZE)
+        self._flush_interval = max(1, flush_interval_ms or settings.USER_ACTION_LOG_FLUSH_INTERVAL_MS) / 1000
+        self._buffer: deque[ClickLogEntry] = deque()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._buffer)
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def enqueue(self, entry: ClickLogEntry) -> bool:
+        """Кладёт запись в буфер, не блокируя вызывающего.
+
+        Возвращает False, если буфер переполнен и запись отброшена.
+        """
+        self._ensure_started()
+        if len(self._buffer) >= self._buffer_size:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(
+                    'Буфер лога действий переполнен, записи отбрасываются',
+                    dropped=self.dropped,
+                    buffer_size=self._buffer_size,
+                )
+            self._notify()
+            return False
+
+        self._buffer.append(entry)
+        if len(self._buffer) >= self._batch_size:
+            self._notify()
+        return True
+
+    def _notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_started(self) -> None:
+        if self._stopping or self.is_running():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        # Event создаётся под текущий loop: синглтон переживает пересоздание loop'а в тестах.
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._run_loop())
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._ensure_started()
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Останавливает писателя и дописывает всё, что осталось в буфере."""
+        self._stopping = True
+        if self._task and not self._task.done():
+            # Будим цикл и ждём, пока он допишет текущую пачку и выйдет. Если за
+            # timeout не успел, wait_for отменяет задачу — пачка, которую она писала,
+            # теряется, а остаток буфера дописывается ниже.
+            self._notify()
+            try:
+                await asyncio.wait_for(self._task, timeout=timeout)
+            except (TimeoutError, asyncio.CancelledError):
+                pass
+        self._task = None
+
+        while self._buffer:
+            if not await self.flush():
+                logger.warning('Не удалось дописать лог действий при остановке', lost=len(self._buffer))
+                self.dropped += len(self._buffer)
+                self._buffer.clear()
+                break
+
+    async def _run_loop(self) -> None:
+        wakeup = self._wakeup
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=self._flush_interval)
+            except TimeoutError:
+                pass
+            wakeup.clear()
+
+            while self._buffer:
+                if not await self.flush():
+                    # БД недоступна — ждём следующего тика, буфер сам ограничит рост.
+                    break
+                if len(self._buffer) < self._batch_size:
+                    break
+
+    def _take_batch(self) -> list[ClickLogEntry]:
+        count = min(self._batch_size, len(self._buffer))
+        return [self._buffer.popleft() for _ in range(count)]
+
+    async def flush(self) -> bool:
+        """Записывает одну пачку из буфера. False — пачка не записана."""
+        batch = self._take_batch()
+        if not batch:
+            return True
+
+        try:
+            await self._write_batch(batch)
+        except Exception as error:
+            self.failed_batches += 1
+            # Возвращаем пачку в начало буфера, если там есть место; остальное теряем.
+            room = self._buffer_size - len(self._buffer)
+            keep = batch[:room] if room > 0 else []
+            self._buffer.extendleft(reversed(keep))
+            self.dropped += len(batch) - len(keep)
+            logger.warning('Ошибка пакетной записи лога действий', batch=len(batch), error=str(error))
+            return False
+
+        self.written += len(batch)
+        return True
+
+    async def _write_batch(self, batch: list[ClickLogEntry]) -> None:
+        telegram_ids = {entry.telegram_id for entry in batch if entry.telegram_id is not None}
+        user_ids = {entry.user_id for entry in batch if entry.user_id is not None}
+
+        async with AsyncSessionLocal() as db:
+            # Резолвим авторов одним запросом: FK на users требует существующий
+            # User.id, а бот знает только Telegram ID.
+            by_telegram: dict[int, int] = {}
+            known_ids: set[int] = set()
+            if telegram_ids:
+                result = await db.execute(select(User.telegram_id, User.id).where(User.telegram_id.in_(telegram_ids)))
+                by_telegram = {telegram_id: user_id for telegram_id, user_id in result.all()}
+            if user_ids:
+                result = await db.execute(select(User.id).where(User.id.in_(user_ids)))
+                known_ids = set(result.scalars().all())
+
+            rows = [
+                {
+                    'button_id': entry.button_id[:100],
+                    'user_id': (
+                        by_telegram.get(entry.telegram_id)
+                        if entry.telegram_id is not None
+                        else (entry.user_id if entry.user_id in known_ids else None)
+                    ),
+                    'callback_data': entry.callback_data[:255] if entry.callback_data else None,
+                    'button_type': entry.button_type,
+                    'button_text': entry.button_text[:255] if entry.button_text else None,
+                    'clicked_at': entry.clicked_at,
+                }
+                for entry in batch
+            ]
+            await db.execute(insert(ButtonClickLog).values(rows))
+            await db.commit()
+
+    def get_stats(self) -> dict[str, int]:
+        return {
+            'pending': len(self._buffer),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed_batches': self.failed_batches,
+        }
+
+
+button_click_log_writer = ButtonClickLogWriter()
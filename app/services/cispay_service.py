@@ -8,10 +8,13 @@ import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('cispay', HttpClientConfig(timeout=30))
+
 
 class CisPayAPIError(Exception):
     """Ошибка API cisPay."""
@@ -30,9 +33,6 @@ class CisPayService:
     запроса ключом X-Api-Key (заголовок X-Signature).
     """
 
-    def __init__(self) -> None:
-        self._session: aiohttp.ClientSession | None = None
-
     @property
     def base_url(self) -> str:
         return (settings.CISPAY_BASE_URL or 'https://api.cispay.app').rstrip('/')
@@ -46,16 +46,7 @@ class CisPayService:
         return settings.CISPAY_API_KEY or ''
 
     async def _get_session(self) -> aiohttp.ClientSession:
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=30),
-            )
-        return self._session
-
-    async def close(self) -> None:
-        if self._session and not self._session.closed:
-            await self._session.close()
-            self._session = None
+        return http_clients.session('cispay')
 
     def _headers(self) -> dict[str, str]:
         return {
@@ -13,10 +13,13 @@ import httpx
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('cloudpayments', HttpClientConfig(timeout=30))
+
 
 class CloudPaymentsAPIError(RuntimeError):
     """Raised when the CloudPayments API returns an error response."""
@@ -72,21 +75,20 @@ class CloudPaymentsService:
         url = f'{self.api_url}/{path.lstrip("/")}'
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.request(
-                    method,
-                    url,
-                    json=json,
-                    headers=self._build_headers(),
-                )
+            response = await http_clients.httpx_client('cloudpayments').request(
+                method,
+                url,
+                json=json,
+                headers=self._build_headers(),
+            )
 
-                data = response.json()
+            data = response.json()
 
-                if response.status_code >= 400:
-                    logger.error('CloudPayments API error', status_code=response.status_code, data=data)
-                    raise CloudPaymentsAPIError(f'CloudPayments API returned status {response.status_code}')
+            if response.status_code >= 400:
+                logger.error('CloudPayments API error', status_code=response.status_code, data=data)
+                raise CloudPaymentsAPIError(f'CloudPayments API returned status {response.status_code}')
 
-                return data
+            return data
 
         except httpx.RequestError as error:
             logger.error('Error communicating with CloudPayments API', error=error)
@@ -2,9 +2,18 @@
 Сервис для автоматического списания суточных подписок.
 Проверяет подписки с суточным тарифом и списывает плату раз в сутки.
 Также сбрасывает докупленный трафик по истечении 30 дней.
+
+Списание идёт пакетами (``DAILY_SUBSCRIPTIONS_CHARGE_BATCH_SIZE``, keyset по id):
+на пакет — один условный UPDATE балансов с RETURNING, пакетные UPDATE подписок и
+один многострочный INSERT транзакций в общей транзакции БД. Синхронизация с панелью
+и уведомления после коммита разбираются пулом из ``DAILY_SUBSCRIPTIONS_CONCURRENCY``
+воркеров. Повторное списание за те же сутки исключают блокировка строк подписок и
+``external_id`` транзакции вида ``daily:<subscription_id>:<YYYY-MM-DD>``.
 """
 
 import asyncio
+from collections import Counter
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
 
 import structlog
@@ -18,22 +27,68 @@ from app.database.crud.subscription import (
     get_daily_subscriptions_for_charge,
     get_disabled_daily_subscriptions_for_resume,
     get_expired_daily_subscriptions_for_recovery,
-    suspend_daily_subscription_insufficient_balance,
-    update_daily_charge_time,
+    lock_daily_subscriptions_for_charge,
+    mark_daily_subscriptions_charged,
+    suspend_daily_subscriptions_insufficient_balance,
 )
-from app.database.crud.transaction import create_transaction
-from app.database.crud.user import get_user_by_id, subtract_user_balance
+from app.database.crud.transaction import create_balance_subscription_payments, get_existing_external_ids
+from app.database.crud.user import debit_user_balances, get_user_by_id
 from app.database.database import AsyncSessionLocal
-from app.database.models import PaymentMethod, Subscription, SubscriptionStatus, TransactionType, User
+from app.database.models import PaymentMethod, Subscription, SubscriptionStatus, Transaction, User
 from app.localization.texts import get_texts
 from app.services.notification_delivery_service import (
     NotificationType,
     notification_delivery_service,
 )
+from app.utils.cache import cache
 
 
 logger = structlog.get_logger(__name__)
 
+_INSUFFICIENT_NOTIFY_TTL = 21600  # 6 часов
+_CHARGE_NOTIFY_TTL = 2 * 86400
+
+
+@dataclass(slots=True)
+class DailyChargeOutcome:
+    """Итог списания одной подписки в пакете; по нему воркеры делают всё, что после коммита."""
+
+    subscription_id: int
+    user_id: int
+    result: str  # charged / suspended / skipped / error
+    price_kopeks: int = 0
+    balance_kopeks: int | None = None
+    transaction_id: int | None = None
+    old_end_date: datetime | None = None
+    billing_day: str = ''
+
+
+def billing_day_key(subscription_id: int, charged_at: datetime) -> str:
+    """Ключ идемпотентности суточного списания: одна оплата подписки за календарные сутки (UTC)."""
+    return f'daily:{subscription_id}:{charged_at:%Y-%m-%d}'
+
+
+def _daily_price(subscription: Subscription) -> int | None:
+    """Суточная цена с групповой скидкой (как в PricingEngine._calculate_switch_to_daily)."""
+    from app.services.pricing_engine import PricingEngine
+
+    tariff = subscription.tariff
+    if not tariff or tariff.daily_price_kopeks <= 0:
+        return None
+
+    promo_group = PricingEngine.resolve_promo_group(subscription.user)
+    daily_group_pct = promo_group.get_discount_percent('period', 1) if promo_group else 0
+    if daily_group_pct > 0:
+        return PricingEngine.apply_discount(tariff.daily_price_kopeks, daily_group_pct)
+    return tariff.daily_price_kopeks
+
+
+async def _claim_notification(key: str, expire: int) -> bool:
+    """Атомарно занимает ключ уведомления; без Redis дедупликации нет — уведомляем."""
+    if not cache.is_connected:
+        return True
+    return await cache.setnx(key, 1, expire=expire)
+
 
 class DailySubscriptionService:
     """
@@ -72,44 +127,219 @@ class DailySubscriptionService:
         }
 
         try:
-            async with AsyncSessionLocal() as db:
-                try:
-                    subscriptions = await get_daily_subscriptions_for_charge(db)
-                    stats['checked'] = len(subscriptions)
-
-                    for subscription in subscriptions:
-                        try:
-                            result = await self._process_single_charge(db, subscription)
-                            if result == 'charged':
-                                stats['charged'] += 1
-                            elif result == 'suspended':
-                                stats['suspended'] += 1
-                            elif result == 'error':
-                                stats['errors'] += 1
-                        except Exception as e:
-                            logger.error(
-                                'Ошибка обработки суточной подписки',
-                                subscription_id=subscription.id,
-                                error=e,
-                                exc_info=True,
-                            )
-                            stats['errors'] += 1
-                except Exception as e:
-                    logger.error('Ошибка при обработке подписок', error=e, exc_info=True)
-                    await db.rollback()
-
+            counts = await self._run_charge_pipeline(
+                get_daily_subscriptions_for_charge,
+                status=SubscriptionStatus.ACTIVE.value,
+                require_due=True,
+            )
         except Exception as e:
-            logger.error('Ошибка при получении подписок для списания', error=e, exc_info=True)
+            logger.error('Ошибка при обработке подписок', error=e, exc_info=True)
+            return stats
 
+        stats['checked'] = counts['checked']
+        stats['charged'] = counts['charged']
+        stats['suspended'] = counts['suspended']
+        stats['errors'] = counts['error']
         return stats
 
+    async def _run_charge_pipeline(self, fetch_page, *, status: str, require_due: bool) -> Counter:
+        """Списывает подписки пакетами и отдаёт последствия списания пулу воркеров.
+
+        ``fetch_page(db, after_id=..., limit=...)`` — выборка кандидатов по keyset.
+        Каждый пакет списывается и коммитится в своей сессии; пока воркеры
+        синхронизируют панель и шлют уведомления по прошлому пакету, списывается
+        следующий. Очередь ограничена, так что списание не убегает далеко вперёд.
+        """
+        batch_size = max(1, settings.DAILY_SUBSCRIPTIONS_CHARGE_BATCH_SIZE)
+        concurrency = max(1, settings.DAILY_SUBSCRIPTIONS_CONCURRENCY)
+        queue: asyncio.Queue[DailyChargeOutcome] = asyncio.Queue(maxsize=concurrency * 4)
+        workers = [asyncio.create_task(self._follow_up_worker(queue)) for _ in range(concurrency)]
+        counts: Counter = Counter()
+        after_id = 0
+
+        try:
+            while True:
+                async with AsyncSessionLocal() as db:
+                    page = await fetch_page(db, after_id=after_id, limit=batch_size)
+                    if not page:
+                        break
+                    after_id = page[-1].id
+                    counts['checked'] += len(page)
+                    try:
+                        outcomes = await self._charge_batch(
+                            db, page, status=status, require_due=require_due, now=datetime.now(UTC)
+                        )
+                    except Exception as e:
+                        await db.rollback()
+                        logger.error(
+                            'Ошибка пакетного суточного списания',
+                            first_subscription_id=page[0].id,
+                            last_subscription_id=after_id,
+                            error=e,
+                            exc_info=True,
+                        )
+                        counts['error'] += len(page)
+                        outcomes = []
+
+                for outcome in outcomes:
+                    counts[outcome.result] += 1
+                    if outcome.result in ('charged', 'suspended'):
+                        await queue.put(outcome)
+
+                if len(page) < batch_size:
+                    break
+
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        return counts
+
+    async def _charge_batch(
+        self,
+        db: AsyncSession,
+        subscriptions: list[Subscription],
+        *,
+        status: str,
+        require_due: bool,
+        now: datetime,
+    ) -> list[DailyChargeOutcome]:
+        """Списывает пакет подписок в одной транзакции БД и коммитит её."""
+        locked = await lock_daily_subscriptions_for_charge(
+            db, [subscription.id for subscription in subscriptions], status=status, require_due=require_due, now=now
+        )
+        keys = {subscription.id: billing_day_key(subscription.id, now) for subscription in locked}
+        already_charged = await get_existing_external_ids(db, list(keys.values()), PaymentMethod.BALANCE)
+
+        outcomes: list[DailyChargeOutcome] = []
+        pending: list[tuple[Subscription, int]] = []
+        for subscription in locked:
+            if keys[subscription.id] in already_charged:
+                outcomes.append(DailyChargeOutcome(subscription.id, subscription.user_id, 'skipped'))
+                continue
+            price = _daily_price(subscription)
+            if price is None:
+                logger.warning(
+                    'Некорректная суточная цена или тариф не найден',
+                    subscription_id=subscription.id,
+                    tariff_id=subscription.tariff_id,
+                )
+                outcomes.append(DailyChargeOutcome(subscription.id, subscription.user_id, 'error'))
+                continue
+            pending.append((subscription, price))
+
+        # Один UPDATE балансов не может списать с пользователя дважды, поэтому
+        # несколько суточных подписок одного пользователя идут разными раундами.
+        while pending:
+            current: dict[int, tuple[Subscription, int]] = {}
+            deferred: list[tuple[Subscription, int]] = []
+            for subscription, price in pending:
+                if subscription.user_id in current:
+                    deferred.append((subscription, price))
+                else:
+                    current[subscription.user_id] = (subscription, price)
+            outcomes.extend(await self._charge_round(db, list(current.values()), keys, now))
+            pending = deferred
+
+        await db.commit()
+        return outcomes
+
+    async def _charge_round(
+        self,
+        db: AsyncSession,
+        items: list[tuple[Subscription, int]],
+        keys: dict[int, str],
+        now: datetime,
+    ) -> list[DailyChargeOutcome]:
+        balances = await debit_user_balances(
+            db, {subscription.user_id: price for subscription, price in items}, charged_at=now
+        )
+        charged = [(subscription, price) for subscription, price in items if subscription.user_id in balances]
+        insufficient = [(subscription, price) for subscription, price in items if subscription.user_id not in balances]
+
+        await mark_daily_subscriptions_charged(db, [subscription.id for subscription, _ in charged], charged_at=now)
+        await suspend_daily_subscriptions_insufficient_balance(
+            db, [subscription.id for subscription, _ in insufficient]
+        )
+        transaction_ids = await create_balance_subscription_payments(
+            db,
+            [
+                {
+                    'user_id': subscription.user_id,
+                    'amount_kopeks': price,
+                    'description': f'Суточная оплата тарифа «{subscription.tariff.name}»',
+                    'external_id': keys[subscription.id],
+                }
+                for subscription, price in charged
+            ],
+            created_at=now,
+        )
+
+        billing_day = f'{now:%Y-%m-%d}'
+        outcomes = []
+        for subscription, price in charged:
+            logger.info(
+                '✅ Суточное списание',
+                subscription_id=subscription.id,
+                user_id=subscription.user_id,
+                daily_price=price,
+                balance_kopeks=balances[subscription.user_id],
+            )
+            outcomes.append(
+                DailyChargeOutcome(
+                    subscription.id,
+                    subscription.user_id,
+                    'charged',
+                    price_kopeks=price,
+                    balance_kopeks=balances[subscription.user_id],
+                    transaction_id=transaction_ids.get(keys[subscription.id]),
+                    old_end_date=subscription.end_date,
+                    billing_day=billing_day,
+                )
+            )
+        for subscription, price in insufficient:
+            logger.info(
+                'Подписка приостановлена: недостаточно средств',
+                subscription_id=subscription.id,
+                user_id=subscription.user_id,
+                daily_price=price,
+            )
+            outcomes.append(
+                DailyChargeOutcome(
+                    subscription.id, subscription.user_id, 'suspended', price_kopeks=price, billing_day=billing_day
+                )
+            )
+        return outcomes
+
+    async def _follow_up_worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            outcome = await queue.get()
+            try:
+                async with AsyncSessionLocal() as db:
+                    subscription = await self._reload_daily_subscription(db, outcome.subscription_id)
+                    if outcome.result == 'charged':
+                        await self._after_charge(db, subscription, outcome)
+                    elif self._bot:
+                        await self._after_suspend(subscription, outcome)
+            except Exception as e:
+                logger.error(
+                    'Ошибка обработки суточного списания после коммита',
+                    subscription_id=outcome.subscription_id,
+                    error=e,
+                    exc_info=True,
+                )
+            finally:
+                queue.task_done()
+
     async def _reload_daily_subscription(self, db, subscription_id: int) -> Subscription:
         """Пере-фетчит суточную подписку с eager-load user+tariff.
 
         После ``db.commit()`` (expire_on_commit) eager-loaded связи ``user``/``tariff``
         истекают; последующее обращение ``subscription.user``/``.tariff`` в async-сессии
         уходит в lazy-load → ``MissingGreenlet``. Пере-фетч с selectinload восстанавливает
-        связи на объекте, чтобы _process_single_charge и его нотификации читали их
+        связи на объекте, чтобы обработка после списания и нотификации читали их
         безопасно (см. ERROR REPORT: MissingGreenlet в process_auto_resume).
         """
         result = await db.execute(
@@ -119,222 +349,112 @@ class DailySubscriptionService:
         )
         return result.scalar_one()
 
-    async def _process_single_charge(self, db, subscription) -> str:
-        """
-        Обрабатывает списание для одной подписки.
-
-        Returns:
-            str: "charged", "suspended", "error", "skipped"
-        """
+    async def _after_charge(self, db: AsyncSession, subscription: Subscription, outcome: DailyChargeOutcome) -> None:
+        """Панель, админ- и пользовательское уведомление после списания (сессия воркера)."""
         user = subscription.user
-        if not user:
-            user = await get_user_by_id(db, subscription.user_id)
-
-        if not user:
-            logger.warning('Пользователь не найден для подписки', subscription_id=subscription.id)
-            return 'error'
-
         tariff = subscription.tariff
-        if not tariff:
-            logger.warning('Тариф не найден для подписки', subscription_id=subscription.id)
-            return 'error'
-
-        raw_daily_price = tariff.daily_price_kopeks
-        if raw_daily_price <= 0:
-            logger.warning('Некорректная суточная цена для тарифа', tariff_id=tariff.id)
-            return 'error'
-
-        # Lock user row to prevent TOCTOU between discount read and balance charge
-        from app.database.crud.user import lock_user_for_pricing
 
-        user = await lock_user_for_pricing(db, user.id)
-
-        # Apply group discount to daily price (consistent with PricingEngine._calculate_switch_to_daily)
-        from app.services.pricing_engine import PricingEngine
-
-        promo_group = PricingEngine.resolve_promo_group(user)
-        daily_group_pct = promo_group.get_discount_percent('period', 1) if promo_group else 0
-        daily_price = (
-            PricingEngine.apply_discount(raw_daily_price, daily_group_pct) if daily_group_pct > 0 else raw_daily_price
-        )
-
-        # Проверяем баланс (при 100% скидке — пропускаем)
-        if daily_price > 0 and user.balance_kopeks < daily_price:
-            # Недостаточно средств - приостанавливаем подписку
-            await suspend_daily_subscription_insufficient_balance(db, subscription)
-
-            # Уведомляем пользователя (rate-limit: 1 раз в 6 часов)
-            if self._bot:
-                from app.utils.cache import cache
-
-                cache_key = f'daily_insuf_notify:{subscription.id}'
-                try:
-                    already_notified = await cache.get(cache_key)
-                except Exception:
-                    already_notified = None
+        # Восстанавливаем connected_squads из тарифа, если очищены деактивацией
+        try:
+            if not subscription.connected_squads:
+                squads = tariff.allowed_squads or []
+                if not squads:
+                    from app.database.crud.server_squad import get_all_server_squads
+
+                    all_servers, _ = await get_all_server_squads(db, available_only=True, limit=10000)
+                    squads = [s.squad_uuid for s in all_servers if s.squad_uuid]
+                if squads:
+                    subscription.connected_squads = squads
+                    _sub_id = subscription.id
+                    await db.commit()
+                    subscription = await self._reload_daily_subscription(db, _sub_id)
+                    user = subscription.user
+        except Exception as sq_err:
+            logger.warning('Не удалось восстановить connected_squads', error=sq_err)
+
+        # Синхронизируем с Remnawave (обновляем срок подписки)
+        _has_panel_user = False
+        try:
+            from app.services.subscription_service import SubscriptionService
 
-                if not already_notified:
-                    await self._notify_insufficient_balance(user, subscription, daily_price)
+            subscription_service = SubscriptionService()
+            _has_panel_user = (
+                getattr(subscription, 'remnawave_id', None)
+                if settings.is_multi_tariff_enabled()
+                else getattr(user, 'remnawave_id', None)
+            ) is not None
+            if _has_panel_user:
+                await subscription_service.update_remnawave_user(
+                    db,
+                    subscription,
+                    reset_traffic=False,
+                    reset_reason=None,
+                    sync_squads=True,
+                )
+            else:
+                await subscription_service.create_remnawave_user(
+                    db,
+                    subscription,
+                    reset_traffic=False,
+                    reset_reason=None,
+                )
+                # POST может игнорировать activeInternalSquads — отправляем PATCH
+                await db.refresh(user)
+                _sync_panel_user_id = (
+                    getattr(subscription, 'remnawave_id', None)
+                    if settings.is_multi_tariff_enabled()
+                    else getattr(user, 'remnawave_id', None)
+                )
+                if _sync_panel_user_id is not None and subscription.connected_squads:
                     try:
-                        await cache.set(cache_key, '1', expire=21600)  # 6 hours
-                    except Exception:
-                        pass
+                        await subscription_service.update_remnawave_user(
+                            db,
+                            subscription,
+                            reset_traffic=False,
+                            sync_squads=True,
+                        )
+                    except Exception as patch_err:
+                        logger.warning('Не удалось синхронизировать сквады после создания', error=patch_err)
+        except Exception as e:
+            logger.warning('Не удалось обновить Remnawave', error=e)
+            from app.services.remnawave_retry_queue import remnawave_retry_queue
 
-            logger.info(
-                'Подписка приостановлена: недостаточно средств',
+            remnawave_retry_queue.enqueue(
                 subscription_id=subscription.id,
-                balance_kopeks=user.balance_kopeks,
-                daily_price=daily_price,
+                user_id=subscription.user_id,
+                action='update' if _has_panel_user else 'create',
             )
-            return 'suspended'
-
-        # Списываем средства
-        description = f'Суточная оплата тарифа «{tariff.name}»'
 
+        # Отправляем уведомление администраторам
         try:
-            # commit=False для атомарности: баланс, транзакция и charge_time коммитятся вместе
-            deducted = await subtract_user_balance(
-                db,
-                user,
-                daily_price,
-                description,
-                mark_as_paid_subscription=True,
-                commit=False,
-            )
-
-            if not deducted:
-                await db.rollback()
-                logger.warning('Не удалось списать средства для подписки', subscription_id=subscription.id)
-                return 'error'
-
-            # Создаём транзакцию (без коммита — часть атомарной операции)
-            transaction = await create_transaction(
-                db=db,
-                user_id=user.id,
-                type=TransactionType.SUBSCRIPTION_PAYMENT,
-                amount_kopeks=daily_price,
-                description=description,
-                payment_method=PaymentMethod.BALANCE,
-                commit=False,
-            )
-
-            # Обновляем время последнего списания и продлеваем подписку (без коммита)
-            old_end_date = subscription.end_date
-            subscription = await update_daily_charge_time(db, subscription, commit=False)
-
-            # Атомарный коммит: баланс + транзакция + charge_time
-            await db.commit()
-            await db.refresh(user)
-
-            user_id_display = user.telegram_id or user.email or f'#{user.id}'
-            logger.info(
-                '✅ Суточное списание: подписка сумма коп., пользователь',
-                subscription_id=subscription.id,
-                daily_price=daily_price,
-                user_id_display=user_id_display,
-            )
-
-            # Восстанавливаем connected_squads из тарифа, если очищены деактивацией
-            try:
-                if not subscription.connected_squads:
-                    squads = tariff.allowed_squads or []
-                    if not squads:
-                        from app.database.crud.server_squad import get_all_server_squads
-
-                        all_servers, _ = await get_all_server_squads(db, available_only=True, limit=10000)
-                        squads = [s.squad_uuid for s in all_servers if s.squad_uuid]
-                    if squads:
-                        subscription.connected_squads = squads
-                        _sub_id = subscription.id
-                        await db.commit()
-                        subscription = await self._reload_daily_subscription(db, _sub_id)
-            except Exception as sq_err:
-                logger.warning('Не удалось восстановить connected_squads', error=sq_err)
-
-            # Синхронизируем с Remnawave (обновляем срок подписки)
-            try:
-                from app.services.subscription_service import SubscriptionService
-
-                subscription_service = SubscriptionService()
-                _has_panel_user = (
-                    getattr(subscription, 'remnawave_id', None)
-                    if settings.is_multi_tariff_enabled()
-                    else getattr(user, 'remnawave_id', None)
-                ) is not None
-                if _has_panel_user:
-                    await subscription_service.update_remnawave_user(
-                        db,
-                        subscription,
-                        reset_traffic=False,
-                        reset_reason=None,
-                        sync_squads=True,
-                    )
-                else:
-                    await subscription_service.create_remnawave_user(
-                        db,
-                        subscription,
-                        reset_traffic=False,
-                        reset_reason=None,
-                    )
-                    # POST может игнорировать activeInternalSquads — отправляем PATCH
-                    await db.refresh(user)
-                    _sync_panel_user_id = (
-                        getattr(subscription, 'remnawave_id', None)
-                        if settings.is_multi_tariff_enabled()
-                        else getattr(user, 'remnawave_id', None)
-                    )
-                    if _sync_panel_user_id is not None and subscription.connected_squads:
-                        try:
-                            await subscription_service.update_remnawave_user(
-                                db,
-                                subscription,
-                                reset_traffic=False,
-                                sync_squads=True,
-                            )
-                        except Exception as patch_err:
-                            logger.warning('Не удалось синхронизировать сквады после создания', error=patch_err)
-            except Exception as e:
-                logger.warning('Не удалось обновить Remnawave', error=e)
-                from app.services.remnawave_retry_queue import remnawave_retry_queue
-
-                if hasattr(subscription, 'id') and hasattr(subscription, 'user_id'):
-                    remnawave_retry_queue.enqueue(
-                        subscription_id=subscription.id,
-                        user_id=subscription.user_id,
-                        action='update' if _has_panel_user else 'create',
-                    )
+            from app.services.subscription_renewal_service import with_admin_notification_service
 
-            # Отправляем уведомление администраторам
-            try:
-                from app.services.subscription_renewal_service import with_admin_notification_service
-
-                await with_admin_notification_service(
-                    lambda svc: svc.send_subscription_extension_notification(
-                        db,
-                        user,
-                        subscription,
-                        transaction,
-                        1,  # 1 день для суточного тарифа
-                        old_end_date,
-                        new_end_date=subscription.end_date,
-                        balance_after=user.balance_kopeks,
-                    )
+            transaction = await db.get(Transaction, outcome.transaction_id) if outcome.transaction_id else None
+            await with_admin_notification_service(
+                lambda svc: svc.send_subscription_extension_notification(
+                    db,
+                    user,
+                    subscription,
+                    transaction,
+                    1,  # 1 день для суточного тарифа
+                    outcome.old_end_date,
+                    new_end_date=subscription.end_date,
+                    balance_after=outcome.balance_kopeks,
                 )
-            except Exception as exc:
-                logger.warning('Не удалось отправить админ-уведомление о суточном списании', user_id=user.id, exc=exc)
-
-            # Уведомляем пользователя
-            if self._bot:
-                await self._notify_daily_charge(user, subscription, daily_price)
+            )
+        except Exception as exc:
+            logger.warning('Не удалось отправить админ-уведомление о суточном списании', user_id=user.id, exc=exc)
 
-            return 'charged'
+        # Уведомляем пользователя (не больше одного раза за оплаченные сутки)
+        if self._bot and await _claim_notification(
+            f'daily_charge_notify:{subscription.id}:{outcome.billing_day}', _CHARGE_NOTIFY_TTL
+        ):
+            await self._notify_daily_charge(user, subscription, outcome.price_kopeks)
 
-        except Exception as e:
-            await db.rollback()
-            logger.error(
-                'Ошибка при списании средств для подписки', subscription_id=subscription.id, error=e, exc_info=True
-            )
-            return 'error'
+    async def _after_suspend(self, subscription: Subscription, outcome: DailyChargeOutcome) -> None:
+        # Rate-limit: не чаще раза в 6 часов на подписку
+        if await _claim_notification(f'daily_insuf_notify:{subscription.id}', _INSUFFICIENT_NOTIFY_TTL):
+            await self._notify_insufficient_balance(subscription.user, subscription, outcome.price_kopeks)
 
     async def _notify_daily_charge(self, user, subscription, amount_kopeks: int):
         """Уведомляет пользователя о суточном списании."""
@@ -757,84 +877,43 @@ class DailySubscriptionService:
         """
         Возобновляет DISABLED суточные подписки, у которых появился достаточный баланс.
         Также восстанавливает EXPIRED подписки, ошибочно экспайренные другими системами.
+
+        Подписка становится ACTIVE только вместе с успешным списанием за первые сутки:
+        если списать не удалось, она остаётся (или становится) DISABLED.
         """
         stats = {'resumed': 0, 'recovered': 0, 'errors': 0}
 
+        # 1. Возобновление DISABLED подписок (недостаточно средств → баланс пополнен)
         try:
-            async with AsyncSessionLocal() as db:
-                # 1. Возобновление DISABLED подписок (недостаточно средств → баланс пополнен)
-                try:
-                    disabled_subs = await get_disabled_daily_subscriptions_for_resume(db)
-                    for subscription in disabled_subs:
-                        try:
-                            # Только активируем — НЕ ставим last_daily_charge_at,
-                            # чтобы _process_single_charge корректно его обновил при списании.
-                            # Если списание упадёт, подписка останется без last_daily_charge_at
-                            # и будет подхвачена на следующем цикле.
-                            _sub_id = subscription.id
-                            subscription.status = SubscriptionStatus.ACTIVE.value
-                            await db.commit()
-                            subscription = await self._reload_daily_subscription(db, _sub_id)
-
-                            logger.info(
-                                '✅ Суточная подписка возобновлена (DISABLED→ACTIVE, баланс пополнен)',
-                                subscription_id=subscription.id,
-                                user_id=subscription.user_id,
-                            )
-
-                            # Списываем за первые сутки — charge обновит end_date и last_daily_charge_at
-                            charge_result = await self._process_single_charge(db, subscription)
-                            if charge_result == 'charged':
-                                stats['resumed'] += 1
-                            elif charge_result == 'error':
-                                stats['errors'] += 1
-                        except Exception as e:
-                            logger.error(
-                                'Ошибка возобновления DISABLED подписки',
-                                subscription_id=subscription.id,
-                                error=e,
-                                exc_info=True,
-                            )
-                            stats['errors'] += 1
-                except Exception as e:
-                    logger.error('Ошибка при обработке DISABLED подписок', error=e, exc_info=True)
-
-                # 2. Восстановление EXPIRED подписок (ошибочно экспайрены middleware/CRUD)
-                try:
-                    expired_subs = await get_expired_daily_subscriptions_for_recovery(db)
-                    for subscription in expired_subs:
-                        try:
-                            # Восстанавливаем в ACTIVE — charge обновит end_date и last_daily_charge_at
-                            _sub_id = subscription.id
-                            subscription.status = SubscriptionStatus.ACTIVE.value
-                            await db.commit()
-                            subscription = await self._reload_daily_subscription(db, _sub_id)
-
-                            logger.warning(
-                                '🔄 Суточная подписка восстановлена (EXPIRED→ACTIVE, ошибочный expire)',
-                                subscription_id=subscription.id,
-                                user_id=subscription.user_id,
-                            )
-
-                            # Списываем за сутки
-                            charge_result = await self._process_single_charge(db, subscription)
-                            if charge_result == 'charged':
-                                stats['recovered'] += 1
-                            elif charge_result == 'error':
-                                stats['errors'] += 1
-                        except Exception as e:
-                            logger.error(
-                                'Ошибка восстановления EXPIRED подписки',
-                                subscription_id=subscription.id,
-                                error=e,
-                                exc_info=True,
-                            )
-                            stats['errors'] += 1
-                except Exception as e:
-                    logger.error('Ошибка при обработке EXPIRED подписок', error=e, exc_info=True)
+            counts = await self._run_charge_pipeline(
+                get_disabled_daily_subscriptions_for_resume,
+                status=SubscriptionStatus.DISABLED.value,
+                require_due=False,
+            )
+            stats['resumed'] = counts['charged']
+            stats['errors'] += counts['error']
+            if counts['charged']:
+                logger.info(
+                    '✅ Суточные подписки возобновлены (DISABLED→ACTIVE, баланс пополнен)', count=counts['charged']
+                )
+        except Exception as e:
+            logger.error('Ошибка при обработке DISABLED подписок', error=e, exc_info=True)
 
+        # 2. Восстановление EXPIRED подписок (ошибочно экспайрены middleware/CRUD)
+        try:
+            counts = await self._run_charge_pipeline(
+                get_expired_daily_subscriptions_for_recovery,
+                status=SubscriptionStatus.EXPIRED.value,
+                require_due=False,
+            )
+            stats['recovered'] = counts['charged']
+            stats['errors'] += counts['error']
+            if counts['charged']:
+                logger.warning(
+                    '🔄 Суточные подписки восстановлены (EXPIRED→ACTIVE, ошибочный expire)', count=counts['charged']
+                )
         except Exception as e:
-            logger.error('Ошибка в process_auto_resume', error=e, exc_info=True)
+            logger.error('Ошибка при обработке EXPIRED подписок', error=e, exc_info=True)
 
         return stats
 
@@ -9,10 +9,13 @@ import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('donut', HttpClientConfig(timeout=30))
+
 
 class DonutAPIError(Exception):
     """Ошибка API Donut."""
@@ -27,9 +30,6 @@ class DonutAPIError(Exception):
 class DonutService:
     """Клиент для Donut P2P (gw.donut.business)."""
 
-    def __init__(self) -> None:
-        self._session: aiohttp.ClientSession | None = None
-
     @property
     def base_url(self) -> str:
         return (settings.DONUT_BASE_URL or 'https://gw.donut.business').rstrip('/')
@@ -48,16 +48,7 @@ class DonutService:
         return value or None
 
     async def _get_session(self) -> aiohttp.ClientSession:
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=30),
-            )
-        return self._session
-
-    async def close(self) -> None:
-        if self._session and not self._session.closed:
-            await self._session.close()
-            self._session = None
+        return http_clients.session('donut')
 
     @staticmethod
     def _build_signature_string(parts: list[tuple[str, Any]]) -> str:
@@ -12,10 +12,15 @@ import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('freekassa', HttpClientConfig(timeout=30))
+# Сервисы определения внешнего IP — отдельный апстрим, не делит пул и лимиты с API Freekassa
+http_clients.register('public_ip', HttpClientConfig(timeout=5, limit_per_host=2))
+
 # Email-заглушки для Freekassa API (test@example.com вызывает ошибку OP-SP-7)
 _FALLBACK_EMAILS = [
     'ivan.petrov@mail.ru',
@@ -94,20 +99,20 @@ async def get_public_ip() -> str:
             return _cached_public_ip
 
         # Пробуем получить IP от внешних сервисов
-        async with aiohttp.ClientSession() as session:
-            for service_url in IP_SERVICES:
-                try:
-                    async with session.get(service_url, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                        if response.status == 200:
-                            ip = (await response.text()).strip()
-                            # Простая валидация IPv4
-                            if ip and len(ip.split('.')) == 4:
-                                _cached_public_ip = ip
-                                logger.info('Определён публичный IP сервера', ip=ip)
-                                return ip
-                except Exception as e:
-                    logger.debug('Не удалось получить IP от сервиса', service_url=service_url, error=e)
-                    continue
+        session = http_clients.session('public_ip')
+        for service_url in IP_SERVICES:
+            try:
+                async with session.get(service_url) as response:
+                    if response.status == 200:
+                        ip = (await response.text()).strip()
+                        # Простая валидация IPv4
+                        if ip and len(ip.split('.')) == 4:
+                            _cached_public_ip = ip
+                            logger.info('Определён публичный IP сервера', ip=ip)
+                            return ip
+            except Exception as e:
+                logger.debug('Не удалось получить IP от сервиса', service_url=service_url, error=e)
+                continue
 
         # Fallback на известный рабочий IP если ничего не получилось
         fallback_ip = '185.92.183.173'
@@ -332,15 +337,11 @@ class FreekassaService:
         logger.info('Freekassa API create_order params', params=params)
 
         try:
-            async with (
-                aiohttp.ClientSession() as session,
-                session.post(
-                    f'{API_BASE_URL}/orders/create',
-                    json=params,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response,
-            ):
+            async with http_clients.session('freekassa').post(
+                f'{API_BASE_URL}/orders/create',
+                json=params,
+                headers={'Content-Type': 'application/json'},
+            ) as response:
                 text = await response.text()
                 logger.info('Freekassa API response', text=text)
 
@@ -398,15 +399,11 @@ class FreekassaService:
         logger.debug('Freekassa get_order_status params', params=params)
 
         try:
-            async with (
-                aiohttp.ClientSession() as session,
-                session.post(
-                    f'{API_BASE_URL}/orders',
-                    json=params,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response,
-            ):
+            async with http_clients.session('freekassa').post(
+                f'{API_BASE_URL}/orders',
+                json=params,
+                headers={'Content-Type': 'application/json'},
+            ) as response:
                 text = await response.text()
                 logger.debug('Freekassa get_order_status response', text=text)
                 return await response.json()
@@ -423,15 +420,11 @@ class FreekassaService:
         params['signature'] = self._generate_api_signature(params)
 
         try:
-            async with (
-                aiohttp.ClientSession() as session,
-                session.post(
-                    f'{API_BASE_URL}/balance',
-                    json=params,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response,
-            ):
+            async with http_clients.session('freekassa').post(
+                f'{API_BASE_URL}/balance',
+                json=params,
+                headers={'Content-Type': 'application/json'},
+            ) as response:
                 return await response.json()
         except aiohttp.ClientError as e:
             logger.exception('Freekassa API connection error', error=e)
@@ -446,15 +439,11 @@ class FreekassaService:
         params['signature'] = self._generate_api_signature(params)
 
         try:
-            async with (
-                aiohttp.ClientSession() as session,
-                session.post(
-                    f'{API_BASE_URL}/currencies',
-                    json=params,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response,
-            ):
+            async with http_clients.session('freekassa').post(
+                f'{API_BASE_URL}/currencies',
+                json=params,
+                headers={'Content-Type': 'application/json'},
+            ) as response:
                 return await response.json()
         except aiohttp.ClientError as e:
             logger.exception('Freekassa API connection error', error=e)
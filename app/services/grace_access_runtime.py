@@ -58,6 +58,7 @@ from app.services.grace_access_service import (
     panel_is_safe_pending_source,
     panel_matches_overlay,
 )
+from app.utils.keyed_locks import KeyedLock, register_keyed_lock
 
 
 logger = structlog.get_logger(__name__)
@@ -451,37 +452,22 @@ class RemnawaveGracePanelGateway:
             raise GracePanelError('Remnawave did not confirm canonical billing state')
 
 
-class _KeyedLocks:
-    """Process-local part of the subscription operation lock."""
-
-    def __init__(self) -> None:
-        self._guard = asyncio.Lock()
-        self._locks: dict[int, tuple[asyncio.Lock, int]] = {}
-
-    @asynccontextmanager
-    async def hold(self, subscription_id: int):
-        async with self._guard:
-            lock, users = self._locks.get(subscription_id, (asyncio.Lock(), 0))
-            self._locks[subscription_id] = (lock, users + 1)
-        try:
-            async with lock:
-                yield
-        finally:
-            async with self._guard:
-                current_lock, users = self._locks[subscription_id]
-                if users <= 1 and not current_lock.locked():
-                    self._locks.pop(subscription_id, None)
-                else:
-                    self._locks[subscription_id] = (current_lock, users - 1)
-
-
 class GraceAccessRuntime:
     """Feature-mode facade and background reconciliation loop."""
 
     def __init__(self) -> None:
         self._task: asyncio.Task[None] | None = None
         self._stop_event = asyncio.Event()
-        self._locks = _KeyedLocks()
+        # Process-local stripes + Redis lease: with several replicas only one of
+        # them acts on a subscription at a time.  The PostgreSQL advisory lock
+        # taken inside stays the final guard for the billing transaction.
+        self._locks = register_keyed_lock(
+            KeyedLock(
+                'grace_access',
+                ttl_ms=settings.GRACE_ACCESS_LOCK_TTL_SECONDS * 1000,
+                distributed=lambda: settings.GRACE_ACCESS_REDIS_LOCK_ENABLED,
+            )
+        )
         self._mode = GraceAccessMode.DISABLED
         self._open_offset = 0
         self._candidate_offset = 0
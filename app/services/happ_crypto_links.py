@@ -0,0 +1,111 @@
+"""Фоновое заполнение ``subscriptions.subscription_crypto_link``.
+
+Экран подключения раньше шифровал ссылку подписки прямо в запросе, если у
+подписки (например, синхронизированной из панели) не было crypto-ссылки. Теперь
+запрос только ставит подписку в очередь: воркер копит id, шифрует ссылки пачкой
+через один API-клиент с ограничением параллельности и записывает их одним
+executemany, не перезаписывая уже появившиеся значения.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+
+import structlog
+from sqlalchemy import bindparam, update
+
+from app.database.database import AsyncSessionLocal
+from app.database.models import Subscription
+
+
+logger = structlog.get_logger(__name__)
+
+
+class HappCryptoLinkFiller:
+    def __init__(self, *, batch_size: int = 100, flush_delay: float = 1.0, concurrency: int = 8) -> None:
+        self.batch_size = batch_size
+        self.flush_delay = flush_delay
+        self.concurrency = concurrency
+        self._pending: dict[int, str] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def schedule(self, subscription_id: int, subscription_url: str) -> None:
+        """Ставит подписку в очередь на генерацию crypto-ссылки (повторы схлопываются)."""
+        if not subscription_url:
+            return
+        self._pending[subscription_id] = subscription_url
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name='happ-crypto-link-filler')
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # Даём набраться пачке: один показ экрана обычно тянет за собой соседние
+            await asyncio.sleep(self.flush_delay)
+            self._wakeup.clear()
+            while self._pending:
+                batch = dict(list(self._pending.items())[: self.batch_size])
+                for subscription_id in batch:
+                    self._pending.pop(subscription_id, None)
+                try:
+                    await self.fill(batch)
+                except Exception as error:
+                    logger.warning('Не удалось сгенерировать crypto-ссылки', count=len(batch), error=error)
+
+    async def fill(self, urls_by_subscription: dict[int, str]) -> int:
+        """Шифрует ссылки и сохраняет их подпискам без crypto-ссылки; возвращает число записанных."""
+        from app.services.remnawave_service import RemnaWaveService
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        service = RemnaWaveService()
+        async with service.get_api_client() as api:
+
+            async def encrypt(subscription_id: int, url: str) -> tuple[int, str | None]:
+                async with semaphore:
+                    try:
+                        return subscription_id, await api.encrypt_happ_crypto_link(url)
+                    except Exception as error:
+                        logger.warning(
+                            'Не удалось сгенерировать crypto-ссылку', subscription_id=subscription_id, error=error
+                        )
+                        return subscription_id, None
+
+            results = await asyncio.gather(*(encrypt(sid, url) for sid, url in urls_by_subscription.items()))
+
+        failed = [sid for sid, link in results if not link]
+        if failed:
+            # Подписка снова попадёт в очередь при следующем показе экрана подключения
+            logger.warning('Crypto-ссылки не получены', count=len(failed), subscription_ids=failed)
+
+        rows = [{'sid': sid, 'link': link} for sid, link in results if link]
+        if not rows:
+            return 0
+
+        statement = (
+            update(Subscription.__table__)
+            .where(
+                Subscription.__table__.c.id == bindparam('sid'),
+                Subscription.__table__.c.subscription_crypto_link.is_(None),
+            )
+            .values(subscription_crypto_link=bindparam('link'))
+        )
+        async with AsyncSessionLocal() as db:
+            await db.execute(statement, rows)
+            await db.commit()
+        logger.info('Сгенерированы crypto-ссылки подписок', count=len(rows))
+        return len(rows)
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        self._pending.clear()
+        if task is None:
+            return
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+happ_crypto_link_filler = HappCryptoLinkFiller()
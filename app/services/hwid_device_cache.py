@@ -0,0 +1,141 @@
+"""Кеш списков HWID-устройств панельных пользователей в Redis.
+
+Экран устройств в кабинете (список, удаление, переименование, уменьшение лимита)
+раньше на каждое действие выкачивал из панели полный список устройств. Теперь
+список хранится под ``hwid_devices:{panel_user_id}``:
+
+- промах заполняется из панели; параллельные промахи по одному пользователю
+  схлопываются в один запрос (single-flight внутри процесса);
+- удаления через ``RemnaWaveAPI.remove_device``/``reset_user_devices`` правят
+  запись на месте, где бы их ни вызвали; вебхуки
+  ``user_hwid_devices.added/deleted`` — правят или сбрасывают её;
+- у записи короткий страховочный TTL на случай потерянного вебхука.
+
+Каждое изменение увеличивает счётчик поколения ``hwid_devices:{id}:gen``;
+заполнение, начатое до изменения, свой (уже устаревший) результат не пишет.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import structlog
+from redis.exceptions import WatchError
+
+from app.utils.cache import cache, decode_value
+
+
+logger = structlog.get_logger(__name__)
+
+DEVICE_CACHE_TTL_SECONDS = 120
+# Счётчик поколения живёт дольше записи, чтобы пережить её истечение во время заполнения
+DEVICE_GENERATION_TTL_SECONDS = 3600
+REMOVE_WATCH_ATTEMPTS = 5
+
+
+def device_hwid(device: dict[str, Any]) -> str | None:
+    return device.get('hwid') or device.get('deviceId') or device.get('id')
+
+
+class HwidDeviceCache:
+    def __init__(self, key_prefix: str = 'hwid_devices') -> None:
+        self.key_prefix = key_prefix
+        self._inflight: dict[int, asyncio.Task[dict[str, Any]]] = {}
+
+    def _key(self, panel_user_id: int) -> str:
+        return f'{self.key_prefix}:{panel_user_id}'
+
+    def _generation_key(self, panel_user_id: int) -> str:
+        return f'{self.key_prefix}:{panel_user_id}:gen'
+
+    def _api_client(self) -> Any:
+        from app.services.remnawave_service import RemnaWaveService
+
+        return RemnaWaveService().get_api_client()
+
+    async def get_devices(self, panel_user_id: int, *, refresh: bool = False) -> dict[str, Any]:
+        """Список устройств в формате ``get_user_devices_all``: ``{'devices': [...], 'total': n}``.
+
+        Заполнение — общая задача для всех ожидающих, поэтому открывает собственный
+        клиент панели: клиент вызывающего закроется вместе с его запросом, а задача
+        может его пережить. ``refresh=True`` пропускает чтение кеша (перед операциями, которым нужна
+        точная картина, например удалением лишних устройств).
+        """
+        if not refresh:
+            cached = await cache.get(self._key(panel_user_id))
+            if isinstance(cached, dict) and isinstance(cached.get('devices'), list):
+                return cached
+
+        task = self._inflight.get(panel_user_id)
+        if task is None:
+            task = asyncio.create_task(self._fill(panel_user_id), name=f'hwid-devices:{panel_user_id}')
+            self._inflight[panel_user_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(panel_user_id, None))
+        return await asyncio.shield(task)
+
+    async def _fill(self, panel_user_id: int) -> dict[str, Any]:
+        generation = await cache.get(self._generation_key(panel_user_id))
+        async with self._api_client() as api:
+            response = await api.get_user_devices_all(panel_user_id)
+
+        devices = list((response or {}).get('devices', []))
+        payload = {'devices': devices, 'total': (response or {}).get('total', len(devices))}
+        if await cache.get(self._generation_key(panel_user_id)) == generation:
+            await cache.set(self._key(panel_user_id), payload, expire=DEVICE_CACHE_TTL_SECONDS)
+        return payload
+
+    async def _bump_generation(self, panel_user_id: int) -> None:
+        key = self._generation_key(panel_user_id)
+        if await cache.increment(key) is not None:
+            await cache.expire(key, DEVICE_GENERATION_TTL_SECONDS)
+
+    async def store(self, panel_user_id: int, devices: list[dict[str, Any]]) -> None:
+        """Записывает известный после локальной операции список устройств."""
+        await self._bump_generation(panel_user_id)
+        await cache.set(
+            self._key(panel_user_id),
+            {'devices': devices, 'total': len(devices)},
+            expire=DEVICE_CACHE_TTL_SECONDS,
+        )
+
+    async def remove_devices(self, panel_user_id: int, hwids: set[str]) -> None:
+        """Убирает устройства из закешированного списка (после удаления в панели или вебхука).
+
+        Чтение и запись идут под WATCH: два параллельных удаления иначе читают один
+        и тот же список, и запись второго возвращает устройство, убранное первым.
+        """
+        if not cache.is_connected or cache.redis_client is None:
+            return
+        key = self._key(panel_user_id)
+        generation_key = self._generation_key(panel_user_id)
+        try:
+            for _ in range(REMOVE_WATCH_ATTEMPTS):
+                async with cache.redis_client.pipeline(transaction=True) as pipe:
+                    try:
+                        await pipe.watch(key)
+                        raw = await pipe.get(key)
+                        cached = decode_value(raw) if raw else None
+                        pipe.multi()
+                        pipe.incr(generation_key)
+                        pipe.expire(generation_key, DEVICE_GENERATION_TTL_SECONDS)
+                        if isinstance(cached, dict) and isinstance(cached.get('devices'), list):
+                            devices = [device for device in cached['devices'] if device_hwid(device) not in hwids]
+                            payload = {'devices': devices, 'total': len(devices)}
+                            pipe.set(key, cache.serializer.encode(payload), ex=DEVICE_CACHE_TTL_SECONDS)
+                        await pipe.execute()
+                        return
+                    except WatchError:
+                        continue
+        except Exception as error:
+            logger.warning('Не удалось обновить кеш устройств', panel_user_id=panel_user_id, error=error)
+        # Список меняется быстрее, чем мы успеваем его поправить, или Redis ответил ошибкой —
+        # сбрасываем запись, следующее чтение возьмёт свежий список из панели
+        await self.invalidate(panel_user_id)
+
+    async def invalidate(self, panel_user_id: int) -> None:
+        await self._bump_generation(panel_user_id)
+        await cache.delete(self._key(panel_user_id))
+
+
+hwid_device_cache = HwidDeviceCache()
@@ -9,10 +9,13 @@ import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('jupiter', HttpClientConfig(timeout=30))
+
 
 class JupiterAPIError(Exception):
     """Ошибка API Jupiter."""
@@ -27,9 +30,6 @@ class JupiterAPIError(Exception):
 class JupiterService:
     """Клиент для FPGate P2P v2.1 (Jupiter / app.juppiter.tech)."""
 
-    def __init__(self) -> None:
-        self._session: aiohttp.ClientSession | None = None
-
     @property
     def base_url(self) -> str:
         return (settings.JUPITER_BASE_URL or 'https://app.juppiter.tech').rstrip('/')
@@ -52,16 +52,7 @@ class JupiterService:
         return (settings.JUPITER_METHOD_DESCRIPTION or 'SBP').strip() or 'SBP'
 
     async def _get_session(self) -> aiohttp.ClientSession:
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=30),
-            )
-        return self._session
-
-    async def close(self) -> None:
-        if self._session and not self._session.closed:
-            await self._session.close()
-            self._session = None
+        return http_clients.session('jupiter')
 
     @staticmethod
     def _build_signature_string(parts: list[tuple[str, Any]]) -> str:
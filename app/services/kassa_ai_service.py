@@ -10,10 +10,13 @@ import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('kassa_ai', HttpClientConfig(timeout=30))
+
 # Sub-method to payment_system_id mapping
 KASSA_AI_SUB_METHODS = {
     'kassa_ai_sbp': {'payment_system_id': 44},
@@ -55,19 +58,19 @@ async def get_public_ip() -> str:
         if _cached_public_ip:
             return _cached_public_ip
 
-        async with aiohttp.ClientSession() as session:
-            for service_url in IP_SERVICES:
-                try:
-                    async with session.get(service_url, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                        if response.status == 200:
-                            ip = (await response.text()).strip()
-                            if ip and len(ip.split('.')) == 4:
-                                _cached_public_ip = ip
-                                logger.info('KassaAI: определён публичный IP сервера', ip=ip)
-                                return ip
-                except Exception as e:
-                    logger.debug('KassaAI: не удалось получить IP от сервиса', service_url=service_url, error=e)
-                    continue
+        session = http_clients.session('kassa_ai')
+        for service_url in IP_SERVICES:
+            try:
+                async with session.get(service_url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                    if response.status == 200:
+                        ip = (await response.text()).strip()
+                        if ip and len(ip.split('.')) == 4:
+                            _cached_public_ip = ip
+                            logger.info('KassaAI: определён публичный IP сервера', ip=ip)
+                            return ip
+            except Exception as e:
+                logger.debug('KassaAI: не удалось получить IP от сервиса', service_url=service_url, error=e)
+                continue
 
         fallback_ip = '127.0.0.1'
         logger.warning('KassaAI: не удалось определить публичный IP, используем fallback', fallback_ip=fallback_ip)
@@ -194,15 +197,11 @@ class KassaAiService:
         )
 
         try:
-            async with (
-                aiohttp.ClientSession() as session,
-                session.post(
-                    f'{API_BASE_URL}/orders/create',
-                    json=params,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response,
-            ):
+            async with http_clients.session('kassa_ai').post(
+                f'{API_BASE_URL}/orders/create',
+                json=params,
+                headers={'Content-Type': 'application/json'},
+            ) as response:
                 text = await response.text()
                 logger.info('KassaAI API response', text=text)
 
@@ -275,15 +274,11 @@ class KassaAiService:
         logger.info('KassaAI get_order_status: order_id', order_id=order_id)
 
         try:
-            async with (
-                aiohttp.ClientSession() as session,
-                session.post(
-                    f'{API_BASE_URL}/orders',
-                    json=params,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response,
-            ):
+            async with http_clients.session('kassa_ai').post(
+                f'{API_BASE_URL}/orders',
+                json=params,
+                headers={'Content-Type': 'application/json'},
+            ) as response:
                 text = await response.text()
                 logger.info('KassaAI get_order_status response', text=text)
                 return await response.json()
@@ -300,15 +295,11 @@ class KassaAiService:
         params['signature'] = self._generate_hmac_signature(params)
 
         try:
-            async with (
-                aiohttp.ClientSession() as session,
-                session.post(
-                    f'{API_BASE_URL}/balance',
-                    json=params,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response,
-            ):
+            async with http_clients.session('kassa_ai').post(
+                f'{API_BASE_URL}/balance',
+                json=params,
+                headers={'Content-Type': 'application/json'},
+            ) as response:
                 return await response.json()
         except aiohttp.ClientError as e:
             logger.exception('KassaAI API connection error', error=e)
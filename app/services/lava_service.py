@@ -29,10 +29,13 @@ import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('lava', HttpClientConfig(timeout=30))
+
 
 def _strip_url_query(url: str) -> str:
     """Return ``url`` without its query string or fragment.
@@ -66,9 +69,6 @@ class LavaService:
     * ``LAVA_WEBHOOK_SECRET`` — shop_webhook_additional_key, подписывает входящие webhook'и.
     """
 
-    def __init__(self) -> None:
-        self._session: aiohttp.ClientSession | None = None
-
     @property
     def base_url(self) -> str:
         return (settings.LAVA_BASE_URL or 'https://api.lava.ru').rstrip('/')
@@ -86,16 +86,7 @@ class LavaService:
         return settings.LAVA_WEBHOOK_SECRET or ''
 
     async def _get_session(self) -> aiohttp.ClientSession:
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=30),
-            )
-        return self._session
-
-    async def close(self) -> None:
-        if self._session and not self._session.closed:
-            await self._session.close()
-            self._session = None
+        return http_clients.session('lava')
 
     @staticmethod
     def _canonical_json(payload: dict[str, Any]) -> str:
@@ -1,7 +1,8 @@
 import asyncio
+import contextlib
 import html
 from dataclasses import dataclass
-from datetime import UTC, datetime, timedelta
+from datetime import UTC, date, datetime, timedelta
 from pathlib import Path
 from typing import Any
 
@@ -23,9 +24,11 @@ from app.database.crud.notification import (
 )
 from app.database.crud.subscription import (
     deactivate_subscription,
+    expire_due_subscriptions,
     extend_subscription,
     get_expired_subscriptions,
     get_expiring_subscriptions,
+    get_next_subscription_expiry_at,
     get_subscriptions_for_autopay,
     reactivate_subscription,
 )
@@ -34,6 +37,7 @@ from app.database.crud.user import (
     delete_user,
     get_inactive_users,
     get_user_by_id,
+    reconcile_user_spending_counters,
     subtract_user_balance,
 )
 from app.database.database import AsyncSessionLocal
@@ -203,7 +207,10 @@ class MonitoringService:
         self.bot = bot
         self._notified_users: set[str] = set()
         self._last_cleanup = datetime.now(UTC)
+        self._last_spending_reconcile: date | None = None
         self._sla_task = None
+        self._expiry_task = None
+        self._expiry_wakeup = asyncio.Event()
         # In-memory fallback состояния уведомлений об ошибке автоплатежа (на случай
         # недоступности Redis). Ключ — (subscription_id, cycle_token=int(end_date.timestamp())).
         self._autopay_fail_state: dict[tuple[int, int], dict] = {}
@@ -325,6 +332,11 @@ class MonitoringService:
                 self._sla_task = asyncio.create_task(self._sla_loop())
         except Exception as e:
             logger.error('Не удалось запустить SLA-мониторинг', error=e)
+        try:
+            if not self._expiry_task or self._expiry_task.done():
+                self._expiry_task = asyncio.create_task(self._expiry_loop())
+        except Exception as e:
+            logger.error('Не удалось запустить планировщик истечения подписок', error=e)
 
         while self.is_running:
             try:
@@ -341,6 +353,8 @@ class MonitoringService:
         try:
             if self._sla_task and not self._sla_task.done():
                 self._sla_task.cancel()
+            if self._expiry_task and not self._expiry_task.done():
+                self._expiry_task.cancel()
         except Exception:
             pass
 
@@ -366,8 +380,8 @@ class MonitoringService:
                         '🧹 Отозвано истекших тестовых доступов к сквадам', cleaned_test_access=cleaned_test_access
                     )
 
-                # ВАЖНО: autopay ПЕРЕД check_expired — иначе подписки с автоплатой
-                # экспайрятся до того, как autopay успеет их продлить
+                # Истечение подписок ведёт _expiry_loop по end_date; autopay берёт подписки
+                # заранее (end_date > now), поэтому продлевает их до момента истечения
                 # Продление с баланса работает всегда, если у подписки autopay_enabled=True
                 await self._process_autopayments(db)
                 # Рекуррентные автоплатежи с карты: требуют ENABLE_AUTOPAY + YOOKASSA_RECURRENT_ENABLED
@@ -389,7 +403,6 @@ class MonitoringService:
                 # Реконсилиация рекуррентных подписок Lava: та же страховка на
                 # случай потерянных вебхуков / недошедших отмен.
                 await self._reconcile_lava_subscriptions(db)
-                await self._check_expired_subscriptions(db)
                 await self._check_expiring_subscriptions(db)
                 await self._check_trial_expiring_soon(db)
                 await self._check_trial_channel_subscriptions(db)
@@ -400,6 +413,7 @@ class MonitoringService:
                 await self._cleanup_expired_refresh_tokens(db)
                 await self._cleanup_button_click_logs(db)
                 await self._cleanup_inactive_users(db)
+                await self._reconcile_spending_counters(db)
                 await self._sync_with_remnawave(db)
 
                 await self._log_monitoring_event(
@@ -529,59 +543,91 @@ class MonitoringService:
         ttl_seconds = int(max(0.0, hours_left) * 3600) + 72 * 3600
         await self._save_autopay_fail_state(subscription.id, cycle_token, state, ttl_seconds)
 
-    async def _check_expired_subscriptions(self, db: AsyncSession):
-        try:
-            from app.database.crud.subscription import is_recently_updated_by_webhook
+    def wake_expiry_scheduler(self) -> None:
+        """Будит планировщик истечения раньше срока (например, end_date подписки сдвинули назад)."""
+        self._expiry_wakeup.set()
 
-            expired_subscriptions = await get_expired_subscriptions(db)
+    async def _expiry_loop(self):
+        """Переводит подписки в EXPIRED в момент их end_date.
 
-            for subscription in expired_subscriptions:
-                if is_recently_updated_by_webhook(subscription):
-                    logger.debug(
-                        'Пропуск expire подписки : обновлена вебхуком недавно', subscription_id=subscription.id
-                    )
-                    continue
+        Вместо полного прохода раз в MONITORING_INTERVAL планировщик спит до ближайшего
+        end_date активной подписки (не дольше SUBSCRIPTION_EXPIRY_POLL_SECONDS — страховка
+        от сдвига end_date назад) и забирает просроченные пакетами по индексу.
+        """
+        poll_seconds = max(1, settings.SUBSCRIPTION_EXPIRY_POLL_SECONDS)
+        while self.is_running:
+            self._expiry_wakeup.clear()
+            delay = poll_seconds
+            try:
+                next_expiry_at = await self._expire_due_subscriptions()
+                if next_expiry_at is not None:
+                    delay = min(poll_seconds, max(0.0, (next_expiry_at - datetime.now(UTC)).total_seconds()))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error('Ошибка в планировщике истечения подписок', error=e)
 
-                from app.database.crud.subscription import expire_subscription
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._expiry_wakeup.wait(), timeout=delay)
 
-                # Capture tariff name before expire_subscription's db.refresh() expires the relationship
-                _tariff_name = subscription.tariff.name if getattr(subscription, 'tariff', None) else None
+    async def _expire_due_subscriptions(self) -> datetime | None:
+        """Экспайрит все просроченные подписки пакетами и возвращает время следующего истечения."""
+        batch_size = max(1, settings.SUBSCRIPTION_EXPIRY_BATCH_SIZE)
+        expired_total = 0
+        async with AsyncSessionLocal() as db:
+            while True:
+                now = datetime.now(UTC)
+                expired = await expire_due_subscriptions(db, now=now, limit=batch_size)
+                await db.commit()
+                if expired:
+                    expired_total += len(expired)
+                    logger.info("🔴 Подписки истекли и статус изменен на 'expired'", count=len(expired))
+                    await self._notify_subscriptions_expired(db, [subscription_id for subscription_id, _ in expired])
+                if len(expired) < batch_size:
+                    break
+
+            if expired_total:
+                await self._log_monitoring_event(
+                    db,
+                    'expired_subscriptions_processed',
+                    f'Обработано {expired_total} истёкших подписок',
+                    {'count': expired_total},
+                )
 
-                await expire_subscription(db, subscription)
+            return await get_next_subscription_expiry_at(db, after=datetime.now(UTC))
 
-                user = await get_user_by_id(db, subscription.user_id)
-                if user and self.bot:
-                    # Skip notification if user has another ACTIVE subscription (multi-tariff)
-                    skip_notify = False
-                    if settings.is_multi_tariff_enabled():
-                        other_active = await db.execute(
-                            select(Subscription.id)
-                            .where(
-                                Subscription.user_id == user.id,
-                                Subscription.id != subscription.id,
-                                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                                Subscription.end_date > datetime.now(UTC),
-                            )
-                            .limit(1)
-                        )
-                        skip_notify = other_active.scalar_one_or_none() is not None
-                    if not skip_notify:
-                        await self._send_subscription_expired_notification(user, subscription, tariff_name=_tariff_name)
+    async def _notify_subscriptions_expired(self, db: AsyncSession, subscription_ids: list[int]) -> None:
+        if not self.bot:
+            return
 
-                logger.info(
-                    "🔴 Подписка пользователя истекла и статус изменен на 'expired'", user_id=subscription.user_id
-                )
+        result = await db.execute(
+            select(Subscription)
+            .options(selectinload(Subscription.user), selectinload(Subscription.tariff))
+            .where(Subscription.id.in_(subscription_ids))
+            .order_by(Subscription.id)
+        )
+        subscriptions = result.scalars().all()
 
-            if expired_subscriptions:
-                await self._log_monitoring_event(
-                    db,
-                    'expired_subscriptions_processed',
-                    f'Обработано {len(expired_subscriptions)} истёкших подписок',
-                    {'count': len(expired_subscriptions)},
+        # Не уведомляем, если у пользователя осталась другая активная подписка (мультитариф)
+        users_with_active: set[int] = set()
+        if settings.is_multi_tariff_enabled():
+            other_active = await db.execute(
+                select(Subscription.user_id)
+                .where(
+                    Subscription.user_id.in_({subscription.user_id for subscription in subscriptions}),
+                    Subscription.id.not_in(subscription_ids),
+                    Subscription.status == SubscriptionStatus.ACTIVE.value,
+                    Subscription.end_date > datetime.now(UTC),
                 )
+                .distinct()
+            )
+            users_with_active = set(other_active.scalars().all())
 
-        except Exception as e:
-            logger.error('Ошибка проверки истёкших подписок', error=e)
+        for subscription in subscriptions:
+            if subscription.user is None or subscription.user_id in users_with_active:
+                continue
+            tariff_name = subscription.tariff.name if subscription.tariff else None
+            await self._send_subscription_expired_notification(subscription.user, subscription, tariff_name=tariff_name)
 
     async def update_remnawave_user(self, db: AsyncSession, subscription: Subscription) -> RemnaWaveUser | None:
         try:
@@ -2688,6 +2734,25 @@ class MonitoringService:
         except Exception as e:
             logger.error('Ошибка очистки неактивных пользователей', error=e)
 
+    async def _reconcile_spending_counters(self, db: AsyncSession):
+        """Раз в сутки сверяет users.total_spent_kopeks/purchase_count с историей транзакций."""
+        now = datetime.now(UTC)
+        if now.hour != 5 or self._last_spending_reconcile == now.date():
+            return
+        self._last_spending_reconcile = now.date()
+
+        try:
+            fixed = await reconcile_user_spending_counters(db)
+            if fixed:
+                await db.commit()
+                logger.warning('Найдены расхождения счётчиков трат пользователей', fixed=fixed)
+        except Exception as error:
+            logger.error('Ошибка сверки счётчиков трат пользователей', error=error)
+            try:
+                await db.rollback()
+            except Exception:
+                pass
+
     async def _sync_with_remnawave(self, db: AsyncSession):
         try:
             now = datetime.now(UTC)
@@ -7,10 +7,14 @@ import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+# Повторы — в собственном цикле _request
+http_clients.register('mulenpay', HttpClientConfig(timeout=30, connect_timeout=10, sock_read_timeout=25))
+
 
 class MulenPayService:
     """Интеграция с Mulen Pay API."""
@@ -20,7 +24,6 @@ class MulenPayService:
         self.shop_id = settings.MULENPAY_SHOP_ID
         self.secret_key = settings.MULENPAY_SECRET_KEY
         self.base_url = settings.MULENPAY_BASE_URL.rstrip('/')
-        self._timeout = aiohttp.ClientTimeout(total=30, connect=10, sock_read=25)
         self._max_retries = 3
         self._retry_delay = 0.5
         self._retryable_statuses = {500, 502, 503, 504}
@@ -51,16 +54,13 @@ class MulenPayService:
 
         for attempt in range(1, self._max_retries + 1):
             try:
-                async with (
-                    aiohttp.ClientSession(timeout=self._timeout) as session,
-                    session.request(
-                        method,
-                        url,
-                        headers=headers,
-                        json=json_data,
-                        params=params,
-                    ) as response,
-                ):
+                async with http_clients.session('mulenpay').request(
+                    method,
+                    url,
+                    headers=headers,
+                    json=json_data,
+                    params=params,
+                ) as response:
                     data, raw_text = await self._deserialize_response(response)
 
                     if response.status >= 400:
@@ -1,11 +1,15 @@
 """Фоновый сервис для обработки очереди чеков NaloGO.
 
 При временной недоступности сервиса nalog.ru (503), чеки сохраняются в Redis
-и отправляются позже этим сервисом.
+и отправляются позже этим сервисом: небольшой пул воркеров разбирает пачки
+готовых чеков, общий темп ограничен token bucket'ом, итоги пачки записываются
+одним pipeline.
 """
 
 import asyncio
+import time
 from datetime import UTC, datetime, timedelta
+from typing import Any
 
 import structlog
 from aiogram import Bot
@@ -13,12 +17,35 @@ from dateutil.parser import isoparse
 
 from app.config import settings
 from app.services.nalogo_service import NaloGoService
-from app.utils.cache import cache
 
 
 logger = structlog.get_logger(__name__)
 
 
+class _TokenBucket:
+    """Ограничитель темпа запросов к nalog.ru: ``rate`` запросов в секунду, всплеск до ``capacity``."""
+
+    def __init__(self, rate: float, capacity: int):
+        self._rate = rate
+        self._capacity = max(capacity, 1)
+        self._tokens = float(self._capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self._rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
 class NalogoQueueService:
     """Сервис фоновой обработки очереди чеков NaloGO."""
 
@@ -58,6 +85,16 @@ class NalogoQueueService:
         """Максимальное количество попыток отправки чека."""
         return getattr(settings, 'NALOGO_QUEUE_MAX_ATTEMPTS', 10)
 
+    @property
+    def _workers(self) -> int:
+        """Количество параллельных воркеров отправки."""
+        return max(getattr(settings, 'NALOGO_QUEUE_WORKERS', 3), 1)
+
+    def _build_rate_limiter(self) -> _TokenBucket:
+        # NALOGO_QUEUE_RECEIPT_DELAY задаёт средний интервал между запросами к nalog.ru
+        delay = self._receipt_delay
+        return _TokenBucket(rate=1 / delay if delay > 0 else 0, capacity=self._workers)
+
     async def start(self) -> None:
         """Запустить фоновую обработку очереди."""
         if not self._nalogo_service or not self._nalogo_service.configured:
@@ -68,12 +105,15 @@ class NalogoQueueService:
             logger.warning('Сервис очереди чеков уже запущен')
             return
 
+        await self._nalogo_service.migrate_legacy_queues()
+
         self._running = True
         self._task = asyncio.create_task(self._process_queue_loop())
         logger.info(
             'Сервис очереди чеков NaloGO запущен',
             _check_interval=self._check_interval,
             _receipt_delay=self._receipt_delay,
+            workers=self._workers,
         )
 
     async def stop(self) -> None:
@@ -152,6 +192,51 @@ class NalogoQueueService:
 
             await asyncio.sleep(self._check_interval)
 
+    async def _send_queued_receipt(self, receipt_data: dict[str, Any]) -> str | None:
+        """Отправить один чек из очереди в nalog.ru."""
+        assert self._nalogo_service is not None
+        payment_id = receipt_data.get('payment_id', 'unknown')
+        amount = receipt_data.get('amount', 0)
+
+        # Восстанавливаем описание из сохранённых данных
+        telegram_user_id = receipt_data.get('telegram_user_id')
+        amount_kopeks = receipt_data.get('amount_kopeks')
+
+        # Извлекаем время оплаты из очереди (чтобы чек был с правильным временем)
+        operation_time = None
+        created_at_str = receipt_data.get('created_at')
+        if created_at_str:
+            try:
+                operation_time = isoparse(created_at_str)
+                if operation_time.tzinfo is None:
+                    operation_time = operation_time.replace(tzinfo=UTC)
+            except (ValueError, TypeError) as parse_error:
+                logger.warning(
+                    'Не удалось распарсить created_at', created_at_str=created_at_str, parse_error=parse_error
+                )
+
+        # Формируем описание заново из настроек (если есть данные)
+        if amount_kopeks is not None:
+            receipt_name = settings.get_balance_payment_description(amount_kopeks, telegram_user_id=telegram_user_id)
+        else:
+            # Fallback на сохранённое имя
+            receipt_name = receipt_data.get(
+                'name',
+                settings.get_balance_payment_description(int(amount * 100), telegram_user_id=telegram_user_id),
+            )
+
+        return await self._nalogo_service.create_receipt(
+            name=receipt_name,
+            amount=amount,
+            quantity=receipt_data.get('quantity', 1),
+            client_info=receipt_data.get('client_info'),
+            payment_id=payment_id,
+            queue_on_failure=False,  # Не добавлять в очередь повторно автоматически
+            telegram_user_id=telegram_user_id,
+            amount_kopeks=amount_kopeks,
+            operation_time=operation_time,  # Время оплаты, а не отправки
+        )
+
     async def _process_pending_receipts(self) -> None:
         """Обработать все ожидающие чеки в очереди."""
         if not self._nalogo_service:
@@ -170,82 +255,89 @@ class NalogoQueueService:
         total_processed_amount = 0.0
         service_unavailable = False
 
-        while True:
-            receipt_data = await self._nalogo_service.pop_receipt_from_queue()
-            if not receipt_data:
+        limiter = self._build_rate_limiter()
+        # Сервис недоступен или ошибка — прекращаем попытки до следующего цикла
+        stop = asyncio.Event()
+        batch_size = self._workers * 4
+
+        while not stop.is_set():
+            batch = await self._nalogo_service.claim_queued_receipts(batch_size)
+            if not batch:
                 break
 
-            attempts = receipt_data.get('attempts', 0)
-            payment_id = receipt_data.get('payment_id', 'unknown')
-            amount = receipt_data.get('amount', 0)
-
-            # Проверяем лимит попыток
-            if attempts >= self._max_attempts:
-                logger.error(
-                    'Чек превысил максимальное количество попыток, удалён из очереди',
-                    payment_id=payment_id,
-                    attempts=attempts,
-                    max_attempts=self._max_attempts,
-                )
-                # Удаляем метку "в очереди" — чек больше не будет обрабатываться
-                if payment_id and payment_id != 'unknown':
-                    queued_key = f'nalogo:queued:{payment_id}'
-                    await cache.delete(queued_key)
-                failed += 1
-                continue
-
-            # Пытаемся отправить чек
-            try:
-                # Восстанавливаем описание из сохранённых данных
-                telegram_user_id = receipt_data.get('telegram_user_id')
-                amount_kopeks = receipt_data.get('amount_kopeks')
-                user_email = receipt_data.get('user_email')
-
-                # Извлекаем время оплаты из очереди (чтобы чек был с правильным временем)
-                operation_time = None
-                created_at_str = receipt_data.get('created_at')
-                if created_at_str:
+            pending: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+            for receipt_data in batch:
+                pending.put_nowait(receipt_data)
+
+            done: list[str] = []
+            retry: list[dict[str, Any]] = []
+            release: list[dict[str, Any]] = []
+            delete_keys: list[str] = []
+
+            async def worker() -> None:
+                nonlocal processed, failed, total_processed_amount, service_unavailable
+                while not pending.empty():
+                    receipt_data = pending.get_nowait()
+                    if stop.is_set():
+                        release.append(receipt_data)
+                        continue
+
+                    attempts = receipt_data.get('attempts', 0)
+                    payment_id = receipt_data.get('payment_id', 'unknown')
+                    amount = receipt_data.get('amount', 0)
+                    queued_key = f'nalogo:queued:{payment_id}' if payment_id and payment_id != 'unknown' else None
+
+                    # Проверяем лимит попыток
+                    if attempts >= self._max_attempts:
+                        logger.error(
+                            'Чек превысил максимальное количество попыток, удалён из очереди',
+                            payment_id=payment_id,
+                            attempts=attempts,
+                            max_attempts=self._max_attempts,
+                        )
+                        # Удаляем метку "в очереди" — чек больше не будет обрабатываться
+                        done.append(receipt_data['queue_key'])
+                        if queued_key:
+                            delete_keys.append(queued_key)
+                        failed += 1
+                        continue
+
+                    await limiter.acquire()
+                    if stop.is_set():
+                        release.append(receipt_data)
+                        continue
+
                     try:
-                        operation_time = isoparse(created_at_str)
-                        if operation_time.tzinfo is None:
-                            operation_time = operation_time.replace(tzinfo=UTC)
-                    except (ValueError, TypeError) as parse_error:
+                        receipt_uuid = await self._send_queued_receipt(receipt_data)
+                    except Exception as error:
+                        receipt_data['attempts'] = attempts + 1
+                        retry.append(receipt_data)
+                        failed += 1
+                        stop.set()
+                        logger.error('Ошибка при создании чека из очереди', payment_id=payment_id, error=error)
+                        continue
+
+                    if not receipt_uuid:
+                        # Вернуть в очередь с увеличенным счетчиком попыток
+                        receipt_data['attempts'] = attempts + 1
+                        retry.append(receipt_data)
+                        failed += 1
+                        service_unavailable = True
+                        stop.set()
                         logger.warning(
-                            'Не удалось распарсить created_at', created_at_str=created_at_str, parse_error=parse_error
+                            'Не удалось создать чек из очереди, возвращён в очередь',
+                            payment_id=payment_id,
+                            attempts=attempts + 1,
+                            _max_attempts=self._max_attempts,
                         )
+                        continue
 
-                # Формируем описание заново из настроек (если есть данные)
-                if amount_kopeks is not None:
-                    receipt_name = settings.get_balance_payment_description(
-                        amount_kopeks, telegram_user_id=telegram_user_id
-                    )
-                else:
-                    # Fallback на сохранённое имя
-                    receipt_name = receipt_data.get(
-                        'name',
-                        settings.get_balance_payment_description(int(amount * 100), telegram_user_id=telegram_user_id),
-                    )
-
-                receipt_uuid = await self._nalogo_service.create_receipt(
-                    name=receipt_name,
-                    amount=amount,
-                    quantity=receipt_data.get('quantity', 1),
-                    client_info=receipt_data.get('client_info'),
-                    payment_id=payment_id,
-                    queue_on_failure=False,  # Не добавлять в очередь повторно автоматически
-                    telegram_user_id=telegram_user_id,
-                    amount_kopeks=amount_kopeks,
-                    operation_time=operation_time,  # Время оплаты, а не отправки
-                )
-
-                if receipt_uuid:
                     processed += 1
                     total_processed_amount += amount
-
-                    # Удаляем метку "в очереди" (чек создан успешно)
-                    if payment_id:
-                        queued_key = f'nalogo:queued:{payment_id}'
-                        await cache.delete(queued_key)
+                    # Удаляем чек и метку "в очереди" (чек создан успешно)
+                    done.append(receipt_data['queue_key'])
+                    if queued_key:
+                        delete_keys.append(queued_key)
 
                     logger.info(
                         'Чек из очереди успешно создан',
@@ -256,35 +348,25 @@ class NalogoQueueService:
 
                     # Отправляем чек пользователю (если есть telegram_id) и дублируем в админ-топик
                     if self._bot:
-                        await self._send_receipt_to_user(
-                            telegram_user_id=telegram_user_id,
-                            receipt_uuid=receipt_uuid,
-                            amount=amount,
-                            user_email=user_email,
-                        )
-                else:
-                    # Вернуть в очередь с увеличенным счетчиком попыток
-                    await self._nalogo_service.requeue_receipt(receipt_data)
-                    failed += 1
-                    service_unavailable = True
-                    logger.warning(
-                        'Не удалось создать чек из очереди, возвращён в очередь',
-                        payment_id=payment_id,
-                        attempts=attempts + 1,
-                        _max_attempts=self._max_attempts,
-                    )
-                    # Если сервис недоступен, прекращаем попытки до следующего цикла
-                    break
+                        try:
+                            await self._send_receipt_to_user(
+                                telegram_user_id=receipt_data.get('telegram_user_id'),
+                                receipt_uuid=receipt_uuid,
+                                amount=amount,
+                                user_email=receipt_data.get('user_email'),
+                            )
+                        except Exception as error:
+                            logger.error('Ошибка отправки чека пользователю', payment_id=payment_id, error=error)
 
-            except Exception as error:
-                await self._nalogo_service.requeue_receipt(receipt_data)
-                failed += 1
-                logger.error('Ошибка при создании чека из очереди', payment_id=payment_id, error=error)
-                # Прекращаем попытки при ошибке
-                break
-
-            # Задержка между чеками чтобы не долбить API
-            await asyncio.sleep(self._receipt_delay)
+            try:
+                await asyncio.gather(*(worker() for _ in range(min(self._workers, len(batch)))))
+            finally:
+                # Необработанные чеки пачки (например, при отмене) возвращаются в очередь сразу
+                while not pending.empty():
+                    release.append(pending.get_nowait())
+                await self._nalogo_service.finish_queued_receipts(
+                    done=done, retry=retry, release=release, delete_keys=delete_keys
+                )
 
         if processed > 0 or failed > 0 or skipped > 0:
             logger.info(
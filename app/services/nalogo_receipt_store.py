@@ -0,0 +1,298 @@
+"""Хранилища очередей чеков NaloGO с доступом по ``payment_id``.
+
+Раньше очереди были Redis-списками: чтобы убрать один чек из очереди ручной
+проверки, список читался целиком, удалялся и перезаписывался поштучными
+``LPUSH`` — O(n) запросов на чек и гонка между воркерами. Теперь очередь — это
+HASH записей (ключ — ``payment_id``) и ZSET сроков/порядка: поиск и удаление
+одного чека O(1), выборка готовых к отправке — ``ZRANGEBYSCORE`` с арендой,
+итоги пачки записываются одним pipeline.
+
+Без Redis очереди недоступны: запись в них не удаётся и логируется, как и
+раньше со списками, — чеки не оседают молча в памяти процесса, откуда их
+никто не перенесёт в Redis после переподключения.
+"""
+
+from __future__ import annotations
+
+import json
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from typing import Any
+
+import structlog
+from redis.exceptions import NoScriptError
+
+
+logger = structlog.get_logger(__name__)
+
+# Сколько секунд захваченный чек невидим для других воркеров. Если процесс умер
+# посреди отправки, чек снова станет доступен после аренды.
+CLAIM_LEASE_SECONDS = 300
+
+
+def receipt_queue_key(receipt: dict[str, Any]) -> str:
+    """Ключ записи: ``payment_id``, а для чеков без него — стабильный сгенерированный id."""
+    key = receipt.get('queue_key') or receipt.get('payment_id')
+    if not key:
+        key = f'anon:{uuid.uuid4().hex}'
+    receipt['queue_key'] = str(key)
+    return receipt['queue_key']
+
+
+class ReceiptStore(ABC):
+    """Очередь чеков: запись по ключу + срок (он же порядок) в отсортированном наборе."""
+
+    @abstractmethod
+    async def put(self, receipt: dict[str, Any], due_at: float) -> bool: ...
+
+    @abstractmethod
+    async def get(self, key: str) -> dict[str, Any] | None: ...
+
+    @abstractmethod
+    async def pop(self, key: str) -> dict[str, Any] | None: ...
+
+    @abstractmethod
+    async def count(self) -> int: ...
+
+    @abstractmethod
+    async def items(self, limit: int | None = None) -> list[dict[str, Any]]: ...
+
+    @abstractmethod
+    async def clear(self) -> int: ...
+
+    @abstractmethod
+    async def claim_due(self, now: float, limit: int) -> list[dict[str, Any]]: ...
+
+    @abstractmethod
+    async def apply(
+        self,
+        *,
+        remove: Sequence[str] = (),
+        reschedule: Sequence[tuple[dict[str, Any], float]] = (),
+        delete_keys: Sequence[str] = (),
+    ) -> None:
+        """Записывает итоги обработки пачки: удаления, переносы и служебные ключи."""
+
+
+class InMemoryReceiptStore(ReceiptStore):
+    """Процессная реализация для тестов."""
+
+    def __init__(self) -> None:
+        self._items: dict[str, dict[str, Any]] = {}
+        self._due: dict[str, float] = {}
+
+    async def put(self, receipt: dict[str, Any], due_at: float) -> bool:
+        key = receipt_queue_key(receipt)
+        self._items[key] = receipt
+        self._due[key] = due_at
+        return True
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        return self._items.get(key)
+
+    async def pop(self, key: str) -> dict[str, Any] | None:
+        self._due.pop(key, None)
+        return self._items.pop(key, None)
+
+    async def count(self) -> int:
+        return len(self._items)
+
+    async def items(self, limit: int | None = None) -> list[dict[str, Any]]:
+        keys = sorted(self._due, key=self._due.__getitem__)
+        return [self._items[key] for key in keys[:limit]]
+
+    async def clear(self) -> int:
+        count = len(self._items)
+        self._items.clear()
+        self._due.clear()
+        return count
+
+    async def claim_due(self, now: float, limit: int) -> list[dict[str, Any]]:
+        due_keys = sorted((due, key) for key, due in self._due.items() if due <= now)[:limit]
+        for _, key in due_keys:
+            self._due[key] = now + CLAIM_LEASE_SECONDS
+        return [dict(self._items[key]) for _, key in due_keys]
+
+    async def apply(
+        self,
+        *,
+        remove: Sequence[str] = (),
+        reschedule: Sequence[tuple[dict[str, Any], float]] = (),
+        delete_keys: Sequence[str] = (),
+    ) -> None:
+        for key in remove:
+            await self.pop(key)
+        for receipt, due_at in reschedule:
+            await self.put(receipt, due_at)
+
+
+class UnavailableReceiptStore(ReceiptStore):
+    """Redis недоступен: запись не удаётся, чтение пустое — как у прежних списков в ``cache``."""
+
+    def __init__(self, prefix: str) -> None:
+        self.prefix = prefix
+
+    async def put(self, receipt: dict[str, Any], due_at: float) -> bool:
+        logger.error(
+            'Redis недоступен — чек не добавлен в очередь NaloGO',
+            queue=self.prefix,
+            payment_id=receipt.get('payment_id'),
+        )
+        return False
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        return None
+
+    async def pop(self, key: str) -> dict[str, Any] | None:
+        return None
+
+    async def count(self) -> int:
+        return 0
+
+    async def items(self, limit: int | None = None) -> list[dict[str, Any]]:
+        return []
+
+    async def clear(self) -> int:
+        return 0
+
+    async def claim_due(self, now: float, limit: int) -> list[dict[str, Any]]:
+        return []
+
+    async def apply(
+        self,
+        *,
+        remove: Sequence[str] = (),
+        reschedule: Sequence[tuple[dict[str, Any], float]] = (),
+        delete_keys: Sequence[str] = (),
+    ) -> None:
+        if remove or reschedule:
+            # Захваченные чеки вернутся в работу после истечения аренды
+            logger.error(
+                'Redis недоступен — итоги пачки чеков NaloGO не записаны',
+                queue=self.prefix,
+                removed=len(remove),
+                rescheduled=len(reschedule),
+            )
+
+
+class RedisReceiptStore(ReceiptStore):
+    """Redis: HASH ``{prefix}:items`` + ZSET ``{prefix}:due``."""
+
+    # KEYS: due; ARGV: now, limit, lease_until
+    _CLAIM_SCRIPT = """
+local keys = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, key in ipairs(keys) do
+    redis.call('ZADD', KEYS[1], ARGV[3], key)
+end
+return keys
+"""
+
+    def __init__(self, client: Any, prefix: str) -> None:
+        self._client = client
+        self.items_key = f'{prefix}:items'
+        self.due_key = f'{prefix}:due'
+        self._claim_sha: str | None = None
+
+    @staticmethod
+    def _decode(raw: bytes | str | None) -> dict[str, Any] | None:
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except (TypeError, ValueError):
+            logger.error('Повреждённая запись очереди чеков NaloGO', raw=str(raw)[:200])
+            return None
+
+    async def put(self, receipt: dict[str, Any], due_at: float) -> bool:
+        key = receipt_queue_key(receipt)
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.hset(self.items_key, key, json.dumps(receipt, default=str))
+            pipe.zadd(self.due_key, {key: due_at})
+            await pipe.execute()
+        return True
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        return self._decode(await self._client.hget(self.items_key, key))
+
+    async def pop(self, key: str) -> dict[str, Any] | None:
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.hget(self.items_key, key)
+            pipe.hdel(self.items_key, key)
+            pipe.zrem(self.due_key, key)
+            raw, _, _ = await pipe.execute()
+        return self._decode(raw)
+
+    async def count(self) -> int:
+        return int(await self._client.hlen(self.items_key))
+
+    async def items(self, limit: int | None = None) -> list[dict[str, Any]]:
+        keys = await self._client.zrange(self.due_key, 0, -1 if limit is None else limit - 1)
+        if not keys:
+            return []
+        raw_items = await self._client.hmget(self.items_key, keys)
+        return [item for item in map(self._decode, raw_items) if item is not None]
+
+    async def clear(self) -> int:
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.hlen(self.items_key)
+            pipe.delete(self.items_key, self.due_key)
+            count, _ = await pipe.execute()
+        return int(count)
+
+    async def claim_due(self, now: float, limit: int) -> list[dict[str, Any]]:
+        args = [now, limit, now + CLAIM_LEASE_SECONDS]
+        if self._claim_sha is None:
+            self._claim_sha = await self._client.script_load(self._CLAIM_SCRIPT)
+        try:
+            keys = await self._client.evalsha(self._claim_sha, 1, self.due_key, *args)
+        except NoScriptError:
+            self._claim_sha = await self._client.script_load(self._CLAIM_SCRIPT)
+            keys = await self._client.evalsha(self._claim_sha, 1, self.due_key, *args)
+        if not keys:
+            return []
+
+        raw_items = await self._client.hmget(self.items_key, keys)
+        claimed = []
+        for key, raw in zip(keys, raw_items, strict=True):
+            receipt = self._decode(raw)
+            if receipt is None:
+                # Запись удалена другим процессом — чистим осиротевший срок
+                await self._client.zrem(self.due_key, key)
+                continue
+            receipt.setdefault('queue_key', key.decode() if isinstance(key, bytes) else key)
+            claimed.append(receipt)
+        return claimed
+
+    async def apply(
+        self,
+        *,
+        remove: Sequence[str] = (),
+        reschedule: Sequence[tuple[dict[str, Any], float]] = (),
+        delete_keys: Sequence[str] = (),
+    ) -> None:
+        if not (remove or reschedule or delete_keys):
+            return
+        async with self._client.pipeline(transaction=False) as pipe:
+            if remove:
+                pipe.hdel(self.items_key, *remove)
+                pipe.zrem(self.due_key, *remove)
+            for receipt, due_at in reschedule:
+                key = receipt_queue_key(receipt)
+                pipe.hset(self.items_key, key, json.dumps(receipt, default=str))
+                pipe.zadd(self.due_key, {key: due_at})
+            if delete_keys:
+                pipe.delete(*delete_keys)
+            await pipe.execute()
+
+    async def migrate_legacy_list(self, legacy_key: str) -> int:
+        """Переносит записи из старого Redis-списка (до перехода на HASH+ZSET)."""
+        if await self._client.type(legacy_key) not in (b'list', 'list'):
+            return 0
+        raw_items = await self._client.lrange(legacy_key, 0, -1)
+        # LPUSH клал новые записи в голову — старейшая в хвосте
+        receipts = [item for item in map(self._decode, reversed(raw_items)) if item is not None]
+        for position, receipt in enumerate(receipts):
+            await self.put(receipt, due_at=float(position))
+        await self._client.delete(legacy_key)
+        return len(receipts)
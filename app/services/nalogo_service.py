@@ -1,3 +1,4 @@
+import time
 from datetime import UTC, date, datetime, timedelta
 from decimal import Decimal
 from typing import Any
@@ -9,16 +10,29 @@ from app.config import settings
 # Используем локальную исправленную версию библиотеки
 from app.lib.nalogo import Client
 from app.lib.nalogo.dto.income import IncomeClient, IncomeType
+from app.services.nalogo_receipt_store import ReceiptStore, RedisReceiptStore, UnavailableReceiptStore
 from app.utils.cache import cache
+from app.utils.http_clients import HttpClientConfig, http_clients
 from app.utils.proxy import mask_proxy_url, sanitize_proxy_error
 
 
 logger = structlog.get_logger(__name__)
 
+# Запросы к API и скачивание печатных форм чеков; таймаут каждого запроса задаётся отдельно
+http_clients.register('nalogo', HttpClientConfig(timeout=30))
+
+# Префиксы очередей: HASH ``{prefix}:items`` + ZSET ``{prefix}:due`` (см. nalogo_receipt_store).
+# По самим префиксам лежали прежние Redis-списки — их переносит migrate_legacy_queues().
 NALOGO_QUEUE_KEY = 'nalogo:receipt_queue'
 NALOGO_PENDING_VERIFICATION_KEY = 'nalogo:pending_verification'
 
 
+def _receipt_store(prefix: str) -> ReceiptStore:
+    if cache.is_connected and cache.redis_client is not None:
+        return RedisReceiptStore(cache.redis_client, prefix)
+    return UnavailableReceiptStore(prefix)
+
+
 class NaloGoService:
     """Сервис для работы с API NaloGO (налоговая служба самозанятых)."""
 
@@ -49,6 +63,7 @@ class NaloGoService:
                     device_id=device_id or 'bot-device-123',
                     timeout=timeout,
                     proxy_url=proxy_url,
+                    http_client_factory=lambda: http_clients.httpx_client('nalogo', proxy=proxy_url),
                 )
                 self.inn = inn
                 self.password = password
@@ -130,9 +145,14 @@ class NaloGoService:
             'created_at': datetime.now(UTC).isoformat(),
             'attempts': 0,
         }
-        success = await cache.lpush(NALOGO_QUEUE_KEY, receipt_data)
+        store = _receipt_store(NALOGO_QUEUE_KEY)
+        try:
+            success = await store.put(receipt_data, due_at=time.time())
+        except Exception as error:
+            logger.error('Не удалось добавить чек в очередь', payment_id=payment_id, error=error)
+            success = False
         if success:
-            queue_len = await cache.llen(NALOGO_QUEUE_KEY)
+            queue_len = await store.count()
             logger.info(
                 'Чек добавлен в очередь',
                 payment_id=payment_id,
@@ -179,9 +199,14 @@ class NaloGoService:
             'error': error_message,
             'status': 'pending_verification',
         }
-        success = await cache.lpush(NALOGO_PENDING_VERIFICATION_KEY, receipt_data)
+        store = _receipt_store(NALOGO_PENDING_VERIFICATION_KEY)
+        try:
+            success = await store.put(receipt_data, due_at=time.time())
+        except Exception as error:
+            logger.error('Не удалось сохранить чек для ручной проверки', payment_id=payment_id, error=error)
+            success = False
         if success:
-            count = await cache.llen(NALOGO_PENDING_VERIFICATION_KEY)
+            count = await store.count()
             logger.warning(
                 'Чек сохранён для ручной проверки',
                 payment_id=payment_id,
@@ -192,11 +217,11 @@ class NaloGoService:
 
     async def get_pending_verification_count(self) -> int:
         """Получить количество чеков ожидающих проверки."""
-        return await cache.llen(NALOGO_PENDING_VERIFICATION_KEY)
+        return await _receipt_store(NALOGO_PENDING_VERIFICATION_KEY).count()
 
     async def get_pending_verification_receipts(self) -> list:
-        """Получить список чеков ожидающих проверки."""
-        return await cache.lrange(NALOGO_PENDING_VERIFICATION_KEY)
+        """Получить список чеков ожидающих проверки (старые первыми)."""
+        return await _receipt_store(NALOGO_PENDING_VERIFICATION_KEY).items()
 
     async def mark_pending_as_verified(
         self,
@@ -214,26 +239,14 @@ class NaloGoService:
         Returns:
             Данные удалённого чека или None если не найден
         """
-        receipts = await self.get_pending_verification_receipts()
-        updated_receipts = []
-        removed_receipt = None
-
-        for receipt in receipts:
-            if receipt.get('payment_id') == payment_id:
-                removed_receipt = receipt
-                if was_created and receipt_uuid:
-                    # Сохраняем что чек создан
-                    created_key = f'nalogo:created:{payment_id}'
-                    await cache.set(created_key, receipt_uuid, expire=30 * 24 * 3600)
-                    logger.info('Чек помечен как созданный', payment_id=payment_id, receipt_uuid=receipt_uuid)
-            else:
-                updated_receipts.append(receipt)
+        removed_receipt = await _receipt_store(NALOGO_PENDING_VERIFICATION_KEY).pop(payment_id)
 
         if removed_receipt:
-            # Очищаем и перезаписываем список
-            await cache.delete(NALOGO_PENDING_VERIFICATION_KEY)
-            for r in reversed(updated_receipts):  # reversed чтобы сохранить порядок
-                await cache.lpush(NALOGO_PENDING_VERIFICATION_KEY, r)
+            if was_created and receipt_uuid:
+                # Сохраняем что чек создан
+                created_key = f'nalogo:created:{payment_id}'
+                await cache.set(created_key, receipt_uuid, expire=30 * 24 * 3600)
+                logger.info('Чек помечен как созданный', payment_id=payment_id, receipt_uuid=receipt_uuid)
             logger.info('Чек удалён из очереди проверки', payment_id=payment_id)
 
         return removed_receipt
@@ -251,13 +264,7 @@ class NaloGoService:
         Returns:
             UUID созданного чека или None
         """
-        receipts = await self.get_pending_verification_receipts()
-        target_receipt = None
-
-        for receipt in receipts:
-            if receipt.get('payment_id') == payment_id:
-                target_receipt = receipt
-                break
+        target_receipt = await _receipt_store(NALOGO_PENDING_VERIFICATION_KEY).get(payment_id)
 
         if not target_receipt:
             logger.warning('Чек не найден в очереди проверки', payment_id=payment_id)
@@ -313,12 +320,25 @@ class NaloGoService:
 
     async def clear_pending_verification(self) -> int:
         """Очистить всю очередь проверки (после полной ручной сверки)."""
-        count = await self.get_pending_verification_count()
+        count = await _receipt_store(NALOGO_PENDING_VERIFICATION_KEY).clear()
         if count > 0:
-            await cache.delete(NALOGO_PENDING_VERIFICATION_KEY)
             logger.info('Очередь проверки очищена', count=count)
         return count
 
+    async def migrate_legacy_queues(self) -> None:
+        """Переносит чеки из Redis-списков прежнего формата в HASH+ZSET."""
+        for prefix in (NALOGO_QUEUE_KEY, NALOGO_PENDING_VERIFICATION_KEY):
+            store = _receipt_store(prefix)
+            if not isinstance(store, RedisReceiptStore):
+                return
+            try:
+                moved = await store.migrate_legacy_list(prefix)
+            except Exception as error:
+                logger.error('Не удалось перенести очередь чеков NaloGO', prefix=prefix, error=error)
+                continue
+            if moved:
+                logger.info('Очередь чеков NaloGO перенесена в новый формат', prefix=prefix, count=moved)
+
     async def authenticate(self) -> bool:
         """Аутентификация в сервисе NaloGO."""
         if not self.configured:
@@ -511,20 +531,48 @@ class NaloGoService:
 
     async def get_queue_length(self) -> int:
         """Получить количество чеков в очереди."""
-        return await cache.llen(NALOGO_QUEUE_KEY)
+        return await _receipt_store(NALOGO_QUEUE_KEY).count()
+
+    async def get_queued_receipts(self, limit: int | None = None) -> list:
+        """Получить список чеков в очереди (без удаления), старые первыми."""
+        return await _receipt_store(NALOGO_QUEUE_KEY).items(limit)
 
-    async def get_queued_receipts(self) -> list:
-        """Получить список чеков в очереди (без удаления)."""
-        return await cache.lrange(NALOGO_QUEUE_KEY)
+    async def claim_queued_receipts(self, limit: int) -> list[dict[str, Any]]:
+        """Захватить до ``limit`` чеков, готовых к отправке (на время аренды они скрыты от других воркеров)."""
+        return await _receipt_store(NALOGO_QUEUE_KEY).claim_due(time.time(), limit)
+
+    async def finish_queued_receipts(
+        self,
+        *,
+        done: list[str],
+        retry: list[dict[str, Any]],
+        release: list[dict[str, Any]],
+        delete_keys: list[str],
+    ) -> None:
+        """Записать итоги пачки одним pipeline.
+
+        ``done`` — ключи отправленных/отброшенных чеков, ``retry`` — неудачные
+        (счётчик попыток уже увеличен), ``release`` — захваченные, но не тронутые.
+        """
+        now = time.time()
+        await _receipt_store(NALOGO_QUEUE_KEY).apply(
+            remove=done,
+            reschedule=[(receipt, now) for receipt in (*retry, *release)],
+            delete_keys=delete_keys,
+        )
 
     async def pop_receipt_from_queue(self) -> dict[str, Any] | None:
         """Извлечь следующий чек из очереди."""
-        return await cache.rpop(NALOGO_QUEUE_KEY)
+        store = _receipt_store(NALOGO_QUEUE_KEY)
+        claimed = await store.claim_due(time.time(), 1)
+        if not claimed:
+            return None
+        return await store.pop(claimed[0]['queue_key'])
 
     async def requeue_receipt(self, receipt_data: dict[str, Any]) -> bool:
         """Вернуть чек обратно в очередь (при неудачной отправке)."""
         receipt_data['attempts'] = receipt_data.get('attempts', 0) + 1
-        return await cache.lpush(NALOGO_QUEUE_KEY, receipt_data)
+        return await _receipt_store(NALOGO_QUEUE_KEY).put(receipt_data, due_at=time.time())
 
     async def find_duplicate_receipt(
         self,
@@ -670,43 +718,42 @@ async def _download_receipt_file(receipt_url: str) -> tuple[bytes, str] | None:
 
     timeout = aiohttp.ClientTimeout(total=20)
     proxy_url = settings.get_nalogo_proxy_url()
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        async with session.get(receipt_url, proxy=proxy_url) as resp:
-            if resp.status != 200:
-                logger.warning('Не удалось скачать чек NaloGO для отправки файлом', status=resp.status)
-                return None
-
-            content_type = (resp.headers.get('Content-Type') or '').lower()
-            # ФНС может отдать HTML (страница ошибки, техработы) с кодом 200 —
-            # отправлять её как «чек» нельзя, лучше откатиться на ссылку.
-            if not content_type.startswith('image/') and 'pdf' not in content_type:
-                logger.warning('Неожиданный формат печатной формы чека NaloGO', content_type=content_type)
-                return None
+    async with http_clients.session('nalogo').get(receipt_url, proxy=proxy_url, timeout=timeout) as resp:
+        if resp.status != 200:
+            logger.warning('Не удалось скачать чек NaloGO для отправки файлом', status=resp.status)
+            return None
 
-            if resp.content_length and resp.content_length > _RECEIPT_MAX_BYTES:
-                logger.warning('Печатная форма чека NaloGO слишком велика', content_length=resp.content_length)
-                return None
+        content_type = (resp.headers.get('Content-Type') or '').lower()
+        # ФНС может отдать HTML (страница ошибки, техработы) с кодом 200 —
+        # отправлять её как «чек» нельзя, лучше откатиться на ссылку.
+        if not content_type.startswith('image/') and 'pdf' not in content_type:
+            logger.warning('Неожиданный формат печатной формы чека NaloGO', content_type=content_type)
+            return None
 
-            # ВАЖНО: читать в цикле до EOF. StreamReader.read(n) возвращает
-            # «до n байт» — первый буферизованный кусок, а не весь ответ;
-            # одиночный read(n) отдавал обрезанный JPEG (файл без хвоста).
-            chunks: list[bytes] = []
-            total = 0
-            while True:
-                chunk = await resp.content.read(64 * 1024)
-                if not chunk:
-                    break
-                total += len(chunk)
-                if total > _RECEIPT_MAX_BYTES:
-                    logger.warning('Печатная форма чека NaloGO превысила лимит при чтении')
-                    return None
-                chunks.append(chunk)
+        if resp.content_length and resp.content_length > _RECEIPT_MAX_BYTES:
+            logger.warning('Печатная форма чека NaloGO слишком велика', content_length=resp.content_length)
+            return None
 
-            data = b''.join(chunks)
-            if not data:
+        # ВАЖНО: читать в цикле до EOF. StreamReader.read(n) возвращает
+        # «до n байт» — первый буферизованный кусок, а не весь ответ;
+        # одиночный read(n) отдавал обрезанный JPEG (файл без хвоста).
+        chunks: list[bytes] = []
+        total = 0
+        while True:
+            chunk = await resp.content.read(64 * 1024)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > _RECEIPT_MAX_BYTES:
+                logger.warning('Печатная форма чека NaloGO превысила лимит при чтении')
                 return None
+            chunks.append(chunk)
+
+        data = b''.join(chunks)
+        if not data:
+            return None
 
-            return data, content_type
+        return data, content_type
 
 
 async def _send_receipt_email(
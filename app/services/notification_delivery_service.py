@@ -397,13 +397,17 @@ class NotificationDeliveryService:
                 )
                 return False
 
-            # Send email (sync smtplib — run in thread to avoid blocking event loop)
-            success = await asyncio.to_thread(
-                self.email_service.send_email,
-                to_email=user.email,
-                subject=template['subject'],
-                body_html=template['body_html'],
-                body_text=template.get('body_text'),
+            # Очередь диспетчера: пул SMTP-соединений вместо потока и нового соединения на письмо
+            from app.cabinet.services.email_dispatcher import email_dispatcher
+            from app.cabinet.services.email_service import OutgoingEmail
+
+            success = await email_dispatcher.send(
+                OutgoingEmail(
+                    to_email=user.email,
+                    subject=template['subject'],
+                    body_html=template['body_html'],
+                    body_text=template.get('body_text'),
+                )
             )
 
             if success:
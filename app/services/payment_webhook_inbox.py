@@ -0,0 +1,372 @@
+"""Inbox входящих вебхуков платёжных провайдеров.
+
+Эндпоинт провайдера после проверки IP/подписи только сохраняет payload в
+``payment_webhook_inbox`` и сразу отвечает: задержка вебхука — один INSERT,
+а повторная доставка того же события схлопывается уникальным
+``idempotency_key``. Зачисление, обновление панели и уведомления выполняет
+пул воркеров: события одного платежа (общий ``ordering_key``) идут строго по
+порядку, неудачи повторяются с экспоненциальной задержкой, итог записывается
+в строку.
+
+Захват строки — условный UPDATE с арендой, поэтому несколько процессов могут
+разбирать inbox одновременно; строка процесса, умершего посреди обработки,
+снова станет доступна после истечения аренды.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from contextlib import suppress
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import structlog
+from sqlalchemy import and_, delete, exists, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.config import settings
+from app.database.database import AsyncSessionLocal
+from app.database.models import PaymentWebhookInbox
+from app.utils.metrics import QUEUE_DEPTH, metrics
+
+
+logger = structlog.get_logger(__name__)
+
+_LEASE = timedelta(minutes=5)
+_POLL_INTERVAL_SECONDS = 5.0
+_MAX_BACKOFF_SECONDS = 3600
+_CLEANUP_INTERVAL = timedelta(hours=1)
+
+_ACTIVE_STATUSES = ('pending', 'processing')
+
+# Поля с идентификатором платежа у разных провайдеров: сначала верхний уровень
+# payload, затем вложенные объекты (``object`` у YooKassa, ``payload`` у
+# CryptoBot, ``data`` у SeverPay и т.д.).
+_ORDERING_CONTAINERS = ('object', 'payload', 'payment', 'data')
+_ORDERING_FIELDS = (
+    'order_id',
+    'orderId',
+    'invoice_id',
+    'InvoiceId',
+    'bill_id',
+    'billId',
+    'BillId',
+    'InvId',
+    'uuid',
+    'payment_id',
+    'paymentLinkId',
+    'SubscriptionId',
+    'id',
+    'Id',
+    'transaction_id',
+    'transactionId',
+)
+
+
+def provider_name(method: str) -> str:
+    """``process_cloudpayments_pay_webhook`` → ``cloudpayments``."""
+    return method.removeprefix('process_').split('_', 1)[0]
+
+
+def idempotency_key(method: str, payload: dict[str, Any]) -> str:
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(f'{method}\n{canonical}'.encode()).hexdigest()
+
+
+def _payment_reference(payload: dict[str, Any]) -> str | None:
+    containers = [payload]
+    containers.extend(payload[name] for name in _ORDERING_CONTAINERS if isinstance(payload.get(name), dict))
+    for container in containers:
+        for field in _ORDERING_FIELDS:
+            value = container.get(field)
+            if isinstance(value, str | int) and not isinstance(value, bool) and str(value):
+                return str(value)
+    return None
+
+
+def ordering_key(method: str, payload: dict[str, Any]) -> str:
+    """Ключ порядка: события одного платежа провайдера обрабатываются последовательно.
+
+    Без распознанного идентификатора событие ни с чем не упорядочивается.
+    """
+    reference = _payment_reference(payload) or f'event:{idempotency_key(method, payload)}'
+    return f'{provider_name(method)}:{reference}'[:255]
+
+
+def _insert(db: AsyncSession):
+    return pg_insert if db.bind.dialect.name == 'postgresql' else sqlite_insert
+
+
+async def enqueue_webhook(db: AsyncSession, method: str, payload: dict[str, Any]) -> bool:
+    """Сохраняет вебхук в inbox. ``False`` — такое событие уже было принято."""
+    now = datetime.now(UTC)
+    stmt = (
+        _insert(db)(PaymentWebhookInbox)
+        .values(
+            provider=provider_name(method),
+            method=method,
+            idempotency_key=idempotency_key(method, payload),
+            ordering_key=ordering_key(method, payload),
+            payload=payload,
+            status='pending',
+            attempts=0,
+            next_attempt_at=now,
+            created_at=now,
+        )
+        .on_conflict_do_nothing(index_elements=['idempotency_key'])
+    )
+    result = await db.execute(stmt)
+    await db.commit()
+    return bool(result.rowcount)
+
+
+@dataclass(slots=True)
+class InboxItem:
+    id: int
+    method: str
+    payload: dict[str, Any]
+    attempts: int
+
+
+def _claimable(now: datetime):
+    earlier = aliased(PaymentWebhookInbox)
+    blocked_by_earlier = exists().where(
+        earlier.ordering_key == PaymentWebhookInbox.ordering_key,
+        earlier.id < PaymentWebhookInbox.id,
+        earlier.status.in_(_ACTIVE_STATUSES),
+    )
+    return and_(
+        or_(
+            and_(PaymentWebhookInbox.status == 'pending', PaymentWebhookInbox.next_attempt_at <= now),
+            and_(PaymentWebhookInbox.status == 'processing', PaymentWebhookInbox.locked_until <= now),
+        ),
+        ~blocked_by_earlier,
+    )
+
+
+async def claim_webhooks(db: AsyncSession, limit: int) -> list[InboxItem]:
+    """Захватывает готовые события — не больше одного на платёж, самое раннее."""
+    now = datetime.now(UTC)
+    ids = (
+        await db.scalars(
+            select(PaymentWebhookInbox.id).where(_claimable(now)).order_by(PaymentWebhookInbox.id).limit(limit)
+        )
+    ).all()
+    if not ids:
+        return []
+
+    # Условие повторяется в UPDATE: строку, которую успел захватить другой процесс, пропускаем
+    result = await db.execute(
+        update(PaymentWebhookInbox)
+        .where(PaymentWebhookInbox.id.in_(ids), _claimable(now))
+        .values(
+            status='processing',
+            locked_until=now + _LEASE,
+            attempts=PaymentWebhookInbox.attempts + 1,
+        )
+        .returning(
+            PaymentWebhookInbox.id,
+            PaymentWebhookInbox.method,
+            PaymentWebhookInbox.payload,
+            PaymentWebhookInbox.attempts,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    items = [InboxItem(id=row.id, method=row.method, payload=row.payload, attempts=row.attempts) for row in result]
+    await db.commit()
+    return sorted(items, key=lambda item: item.id)
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(10 * 2 ** max(attempts - 1, 0), _MAX_BACKOFF_SECONDS))
+
+
+async def finish_webhook(db: AsyncSession, item: InboxItem, error: str | None, max_attempts: int) -> str:
+    """Записывает итог обработки и возвращает новый статус строки."""
+    now = datetime.now(UTC)
+    if error is None:
+        values = {'status': 'done', 'processed_at': now, 'locked_until': None, 'last_error': None}
+    elif item.attempts >= max_attempts:
+        values = {'status': 'failed', 'processed_at': now, 'locked_until': None, 'last_error': error}
+    else:
+        values = {
+            'status': 'pending',
+            'locked_until': None,
+            'last_error': error,
+            'next_attempt_at': now + _backoff(item.attempts),
+        }
+    await db.execute(
+        update(PaymentWebhookInbox)
+        .where(PaymentWebhookInbox.id == item.id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return values['status']
+
+
+class PaymentWebhookInboxWorker:
+    """Пул воркеров, разбирающих ``payment_webhook_inbox`` через методы ``PaymentService``."""
+
+    def __init__(self) -> None:
+        self._payment_service: Any = None
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        self._last_cleanup: datetime | None = None
+
+    def set_payment_service(self, payment_service: Any) -> None:
+        self._payment_service = payment_service
+
+    @property
+    def _workers(self) -> int:
+        return max(settings.PAYMENT_WEBHOOK_INBOX_WORKERS, 1)
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def enqueue(self, method: str, payload: dict[str, Any]) -> bool:
+        async with AsyncSessionLocal() as db:
+            created = await enqueue_webhook(db, method, payload)
+        if created:
+            self._wakeup.set()
+        else:
+            logger.info('Повторная доставка платёжного вебхука пропущена', method=method)
+        return created
+
+    async def process_pending(self) -> int:
+        """Один проход: захватывает и обрабатывает готовые события, возвращает их число."""
+        async with AsyncSessionLocal() as db:
+            items = await claim_webhooks(db, limit=self._workers * 4)
+        if not items:
+            return 0
+
+        semaphore = asyncio.Semaphore(self._workers)
+
+        async def run(item: InboxItem) -> None:
+            async with semaphore:
+                await self._process_item(item)
+
+        await asyncio.gather(*(run(item) for item in items))
+        return len(items)
+
+    async def _process_item(self, item: InboxItem) -> None:
+        error: str | None = None
+        try:
+            async with AsyncSessionLocal() as db:
+                try:
+                    handled = await getattr(self._payment_service, item.method)(db, item.payload)
+                    await db.commit()
+                except Exception:
+                    await db.rollback()
+                    raise
+            # Успех — любой результат, кроме явного False: часть обработчиков
+            # (например, process_platega_subscription_callback) по контракту возвращает None
+            if handled is False:
+                error = 'обработчик вернул False'
+        except Exception as exc:
+            logger.exception('Ошибка обработки платёжного вебхука', inbox_id=item.id, method=item.method)
+            error = f'{type(exc).__name__}: {exc}'
+
+        max_attempts = settings.PAYMENT_WEBHOOK_INBOX_MAX_ATTEMPTS
+        async with AsyncSessionLocal() as db:
+            status = await finish_webhook(db, item, error, max_attempts)
+
+        if status == 'failed':
+            logger.error(
+                '❌ Платёжный вебхук не обработан после всех попыток',
+                inbox_id=item.id,
+                method=item.method,
+                attempts=item.attempts,
+                error=error,
+            )
+        elif status == 'pending':
+            logger.warning(
+                'Платёжный вебхук будет обработан повторно',
+                inbox_id=item.id,
+                method=item.method,
+                attempts=item.attempts,
+                error=error,
+            )
+
+    async def cleanup(self) -> int:
+        """Удаляет завершённые события старше срока хранения; failed хранятся дольше — для разбора."""
+        now = datetime.now(UTC)
+        done_cutoff = now - timedelta(days=settings.PAYMENT_WEBHOOK_INBOX_RETENTION_DAYS)
+        failed_cutoff = now - timedelta(days=settings.PAYMENT_WEBHOOK_INBOX_FAILED_RETENTION_DAYS)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(PaymentWebhookInbox).where(
+                    or_(
+                        and_(PaymentWebhookInbox.status == 'done', PaymentWebhookInbox.processed_at < done_cutoff),
+                        and_(PaymentWebhookInbox.status == 'failed', PaymentWebhookInbox.processed_at < failed_cutoff),
+                    )
+                )
+            )
+            await db.commit()
+        return result.rowcount or 0
+
+    async def _cleanup_if_due(self) -> None:
+        now = datetime.now(UTC)
+        if self._last_cleanup and now - self._last_cleanup < _CLEANUP_INTERVAL:
+            return
+        self._last_cleanup = now
+        removed = await self.cleanup()
+        if removed:
+            logger.info('Удалены обработанные платёжные вебхуки', removed=removed)
+
+    async def start(self) -> None:
+        if self.is_running():
+            return
+        if self._payment_service is None:
+            logger.warning('Воркер inbox платёжных вебхуков не запущен: нет PaymentService')
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run_loop())
+        logger.info('Воркер inbox платёжных вебхуков запущен', workers=self._workers)
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+        self._task = None
+
+    async def _run_loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            processed = 0
+            try:
+                processed = await self.process_pending()
+                await self._cleanup_if_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.error('Ошибка прохода inbox платёжных вебхуков', error=str(error))
+            if processed:
+                continue
+            with suppress(TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=_POLL_INTERVAL_SECONDS)
+
+
+payment_webhook_inbox = PaymentWebhookInboxWorker()
+
+
+async def _collect_inbox_depth() -> None:
+    if not settings.PAYMENT_WEBHOOK_INBOX_ENABLED:
+        return
+    async with AsyncSessionLocal() as db:
+        pending = await db.scalar(
+            select(func.count())
+            .select_from(PaymentWebhookInbox)
+            .where(PaymentWebhookInbox.status.in_(_ACTIVE_STATUSES))
+        )
+    QUEUE_DEPTH.labels('payment_webhook_inbox').set(pending or 0)
+
+
+metrics.add_collector('payment_webhook_inbox', _collect_inbox_depth)
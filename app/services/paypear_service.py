@@ -10,10 +10,13 @@ import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('paypear', HttpClientConfig(timeout=30))
+
 API_BASE_URL = 'https://api.paypear.ru/v1'
 
 
@@ -29,9 +32,6 @@ class PayPearAPIError(Exception):
 class PayPearService:
     """Сервис для работы с API PayPear."""
 
-    def __init__(self):
-        self._session: aiohttp.ClientSession | None = None
-
     @property
     def shop_id(self) -> str:
         return settings.PAYPEAR_SHOP_ID or ''
@@ -48,17 +48,7 @@ class PayPearService:
 
     async def _get_session(self) -> aiohttp.ClientSession:
         """Возвращает переиспользуемую HTTP-сессию."""
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=30),
-            )
-        return self._session
-
-    async def close(self) -> None:
-        """Закрывает HTTP-сессию."""
-        if self._session and not self._session.closed:
-            await self._session.close()
-            self._session = None
+        return http_clients.session('paypear')
 
     async def create_payment(
         self,
@@ -11,10 +11,14 @@ import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+# Повторы — в собственном цикле _request
+http_clients.register('platega', HttpClientConfig(timeout=30, connect_timeout=10, sock_read_timeout=25))
+
 
 class PlategaApiError(RuntimeError):
     """Platega ответила HTTP-ошибкой с телом (не транспортный сбой).
@@ -58,7 +62,6 @@ class PlategaService:
         self.api_version = forced_version or self._normalize_api_version(settings.PLATEGA_API_VERSION)
         self.merchant_id = settings.PLATEGA_MERCHANT_ID
         self.secret = settings.PLATEGA_SECRET
-        self._timeout = aiohttp.ClientTimeout(total=30, connect=10, sock_read=25)
         self._max_retries = 3
         self._retry_delay = 0.5
         self._retryable_statuses = {500, 502, 503, 504}
@@ -246,16 +249,13 @@ class PlategaService:
 
         for attempt in range(1, self._max_retries + 1):
             try:
-                async with (
-                    aiohttp.ClientSession(timeout=self._timeout) as session,
-                    session.request(
-                        method,
-                        url,
-                        json=json_data,
-                        params=params,
-                        headers=headers,
-                    ) as response,
-                ):
+                async with http_clients.session('platega').request(
+                    method,
+                    url,
+                    json=json_data,
+                    params=params,
+                    headers=headers,
+                ) as response:
                     data, raw_text = await self._deserialize_response(response)
 
                     if response.status >= 400:
@@ -0,0 +1,253 @@
+"""Версионированный каталог цен в памяти процесса.
+
+``PricingEngine`` считает цену почти на каждом экране покупки и продления (бот,
+кабинет, мини-приложение), и раньше каждая котировка classic-режима ходила в БД
+за серверами. Каталог — неизменяемый снимок серверов (цена, доступность,
+разрешённые промогруппы) и тарифов (цены периодов, устройства, произвольные
+дни/трафик, разрешённые промогруппы), по которому движок считает цену без
+обращений к БД.
+
+Снимок загружается целиком и подменяется одной операцией присваивания, поэтому
+читатели никогда не видят частично обновлённый каталог. Каждый снимок помечен
+версией из Redis (``pricing_catalog:version``): CRUD-правки цен коммитятся через
+:func:`commit_pricing_changes`, который повышает версию, а фоновая задача каждого
+процесса сверяет её раз в ``PRICING_CATALOG_SYNC_INTERVAL`` секунд и перечитывает
+каталог при расхождении. Правки в обход CRUD-хуков
+подхватываются полной перезагрузкой не реже ``PRICING_CATALOG_MAX_AGE``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import TYPE_CHECKING
+
+import structlog
+from sqlalchemy import select
+
+from app.config import settings
+from app.database.database import AsyncSessionLocal
+from app.database.models import ServerSquad, Tariff
+from app.utils.cache import cache
+
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+
+logger = structlog.get_logger(__name__)
+
+VERSION_KEY = 'pricing_catalog:version'
+
+# Поля ServerSquad, попавшие в снимок. Заполненность (current_users) меняется с каждой
+# подпиской и в каталог намеренно не входит — она не влияет на цену.
+SERVER_PRICE_FIELDS = frozenset({'squad_uuid', 'price_kopeks', 'is_available'})
+
+
+@dataclass(frozen=True, slots=True)
+class ServerPrice:
+    id: int
+    squad_uuid: str
+    price_kopeks: int
+    is_available: bool
+    allowed_promo_group_ids: frozenset[int]
+
+    @classmethod
+    def from_model(cls, server: ServerSquad) -> ServerPrice:
+        return cls(
+            id=server.id,
+            squad_uuid=server.squad_uuid,
+            price_kopeks=server.price_kopeks or 0,
+            is_available=bool(server.is_available),
+            allowed_promo_group_ids=frozenset(pg.id for pg in server.allowed_promo_groups or []),
+        )
+
+
+@dataclass(frozen=True)
+class TariffPrice:
+    """Ценовые поля тарифа; интерфейс совпадает с :class:`Tariff` в части, которую читает PricingEngine."""
+
+    id: int
+    is_active: bool
+    period_prices: Mapping[str, int]
+    is_daily: bool
+    daily_price_kopeks: int
+    device_limit: int
+    device_price_kopeks: int | None
+    custom_days_enabled: bool
+    price_per_day_kopeks: int
+    min_days: int
+    max_days: int
+    custom_traffic_enabled: bool
+    traffic_price_per_gb_kopeks: int
+    min_traffic_gb: int
+    max_traffic_gb: int
+    allowed_promo_group_ids: frozenset[int]
+
+    # Ценовая логика берётся у модели как есть, чтобы снимок не расходился с ORM
+    get_price_for_period = Tariff.get_price_for_period
+    get_available_periods = Tariff.get_available_periods
+    get_price_for_custom_days = Tariff.get_price_for_custom_days
+    get_price_for_custom_traffic = Tariff.get_price_for_custom_traffic
+    can_purchase_custom_days = Tariff.can_purchase_custom_days
+    can_purchase_custom_traffic = Tariff.can_purchase_custom_traffic
+
+    def is_available_for_promo_group(self, promo_group_id: int | None) -> bool:
+        if not self.allowed_promo_group_ids or promo_group_id is None:
+            return True
+        return promo_group_id in self.allowed_promo_group_ids
+
+    @classmethod
+    def from_model(cls, tariff: Tariff) -> TariffPrice:
+        return cls(
+            id=tariff.id,
+            is_active=bool(tariff.is_active),
+            period_prices=MappingProxyType(dict(tariff.period_prices or {})),
+            is_daily=bool(tariff.is_daily),
+            daily_price_kopeks=tariff.daily_price_kopeks or 0,
+            device_limit=tariff.device_limit or 0,
+            device_price_kopeks=tariff.device_price_kopeks,
+            custom_days_enabled=bool(tariff.custom_days_enabled),
+            price_per_day_kopeks=tariff.price_per_day_kopeks or 0,
+            min_days=tariff.min_days,
+            max_days=tariff.max_days,
+            custom_traffic_enabled=bool(tariff.custom_traffic_enabled),
+            traffic_price_per_gb_kopeks=tariff.traffic_price_per_gb_kopeks or 0,
+            min_traffic_gb=tariff.min_traffic_gb,
+            max_traffic_gb=tariff.max_traffic_gb,
+            allowed_promo_group_ids=frozenset(pg.id for pg in tariff.allowed_promo_groups or []),
+        )
+
+
+@dataclass(frozen=True)
+class PricingCatalog:
+    version: int
+    servers: Mapping[str, ServerPrice] = field(default_factory=dict)
+    tariffs: Mapping[int, TariffPrice] = field(default_factory=dict)
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.loaded_at
+
+    def server(self, squad_uuid: str) -> ServerPrice | None:
+        return self.servers.get(squad_uuid)
+
+    def tariff(self, tariff_id: int) -> TariffPrice | None:
+        return self.tariffs.get(tariff_id)
+
+
+async def load_pricing_catalog(db: AsyncSession, version: int) -> PricingCatalog:
+    """Читает серверы и тарифы двумя запросами (промогруппы подгружаются selectin-связями)."""
+    servers = (await db.scalars(select(ServerSquad))).all()
+    tariffs = (await db.scalars(select(Tariff))).all()
+    return PricingCatalog(
+        version=version,
+        servers=MappingProxyType({server.squad_uuid: ServerPrice.from_model(server) for server in servers}),
+        tariffs=MappingProxyType({tariff.id: TariffPrice.from_model(tariff) for tariff in tariffs}),
+    )
+
+
+class PricingCatalogStore:
+    def __init__(self) -> None:
+        self._snapshot: PricingCatalog | None = None
+        self._reload_lock = asyncio.Lock()
+        self._sync_task: asyncio.Task[None] | None = None
+
+    @property
+    def snapshot(self) -> PricingCatalog | None:
+        """Текущий снимок или ``None``, если каталог выключен, не загружен или устарел."""
+        snapshot = self._snapshot
+        if snapshot is None or not settings.PRICING_CATALOG_ENABLED:
+            return None
+        # Процесс без фоновой синхронизации не должен считать по давно устаревшему снимку
+        if snapshot.age > settings.get_pricing_catalog_max_age() * 2:
+            return None
+        return snapshot
+
+    async def reload(self, version: int | None = None) -> PricingCatalog:
+        async with self._reload_lock:
+            if version is None:
+                version = await self._shared_version()
+            async with AsyncSessionLocal() as db:
+                snapshot = await load_pricing_catalog(db, version)
+            self._snapshot = snapshot
+        logger.info(
+            'Каталог цен загружен',
+            version=snapshot.version,
+            servers=len(snapshot.servers),
+            tariffs=len(snapshot.tariffs),
+        )
+        return snapshot
+
+    async def invalidate(self) -> None:
+        """Вызывается после правок серверов, тарифов и промогрупп: новая версия для всех процессов."""
+        if not settings.PRICING_CATALOG_ENABLED:
+            return
+        version = await cache.increment(VERSION_KEY)
+        snapshot = self._snapshot
+        if snapshot is None:
+            return
+        # Без Redis версия остаётся локальной: текущий процесс всё равно перечитывает каталог сразу
+        try:
+            await self.reload(version if version is not None else snapshot.version + 1)
+        except Exception as error:
+            self._snapshot = None
+            logger.error('Ошибка перезагрузки каталога цен, расчёт переключён на БД', error=error)
+
+    async def start(self) -> None:
+        if self._sync_task is not None and not self._sync_task.done():
+            return
+        await self.reload()
+        self._sync_task = asyncio.create_task(self._sync_loop(), name='pricing-catalog-sync')
+
+    async def stop(self) -> None:
+        task, self._sync_task = self._sync_task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def sync_once(self) -> bool:
+        """Перечитывает каталог, если версия в Redis изменилась или снимок старше PRICING_CATALOG_MAX_AGE."""
+        version = await self._shared_version()
+        snapshot = self._snapshot
+        if (
+            snapshot is not None
+            and snapshot.version == version
+            and snapshot.age < settings.get_pricing_catalog_max_age()
+        ):
+            return False
+        await self.reload(version)
+        return True
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.get_pricing_catalog_sync_interval())
+            try:
+                await self.sync_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.error('Ошибка синхронизации каталога цен', error=error)
+
+    async def _shared_version(self) -> int:
+        value = await cache.get(VERSION_KEY)
+        if value is None:
+            # Redis недоступен — сохраняем локальную версию, обновление придёт по MAX_AGE
+            return self._snapshot.version if self._snapshot is not None else 0
+        return int(value)
+
+
+pricing_catalog = PricingCatalogStore()
+
+
+async def commit_pricing_changes(db: AsyncSession, *, changed: bool = True) -> None:
+    """Коммитит правку серверов, тарифов или промогрупп и инвалидирует каталог, если она затрагивает цены."""
+    await db.commit()
+    if changed:
+        await pricing_catalog.invalidate()
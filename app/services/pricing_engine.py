@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import dataclasses
+from collections.abc import Mapping
 from dataclasses import dataclass, field
 from typing import TYPE_CHECKING, Any
 
@@ -8,6 +9,7 @@ import structlog
 
 from app.config import CLASSIC_PERIOD_PRICES, PERIOD_PRICES, settings
 from app.database.crud.server_squad import get_server_squads_by_uuids
+from app.services.pricing_catalog import ServerPrice, TariffPrice, pricing_catalog
 from app.utils.pricing_utils import calculate_months_from_days
 from app.utils.promo_offer import get_user_active_promo_discount_percent
 
@@ -201,6 +203,13 @@ class PricingEngine:
     # Tariff switch
     # ------------------------------------------------------------------
 
+    @staticmethod
+    def _priced_tariff(tariff: Tariff | TariffPrice) -> Tariff | TariffPrice:
+        """Catalog entry for a tariff loaded by the caller, so every quote prices from the same snapshot."""
+        if isinstance(tariff, TariffPrice) or (catalog := pricing_catalog.snapshot) is None:
+            return tariff
+        return catalog.tariff(tariff.id) or tariff
+
     @staticmethod
     def get_tariff_daily_rate_fraction(tariff: Tariff) -> tuple[int, int]:
         """Дневная ставка тарифа как (price, period_days) для целочисленных вычислений.
@@ -238,6 +247,8 @@ class PricingEngine:
 
         Для всех типов переключений скидки (group + offer) применяются stacked.
         """
+        current_tariff = self._priced_tariff(current_tariff) if current_tariff else current_tariff
+        new_tariff = self._priced_tariff(new_tariff)
         current_is_daily = getattr(current_tariff, 'is_daily', False) if current_tariff else False
         new_is_daily = getattr(new_tariff, 'is_daily', False)
 
@@ -416,21 +427,42 @@ class PricingEngine:
     ) -> tuple[int, list[dict]]:
         """Calculate total server price from connected squad UUIDs.
 
-        Uses a single batch query instead of N+1 individual queries.
-        ALWAYS uses real price_kopeks even when server is unavailable
-        or full. Only orphaned UUIDs (not found in DB) get price=0.
+        Servers come from the in-memory pricing catalog; only UUIDs missing
+        from it (catalog not loaded yet, server added after the last reload)
+        are fetched with a single batch query.
         """
         if not country_uuids:
             return 0, []
 
-        try:
-            servers = await get_server_squads_by_uuids(db, country_uuids)
-        except Exception as e:  # intentional broad catch: pricing must not crash on DB errors, servers_price=0 is safe (user pays less)
-            logger.error('Ошибка пакетной загрузки серверов', error=str(e), squad_uuids=country_uuids)
-            return 0, [{'uuid': uuid, 'id': None, 'price': 0, 'status': 'error'} for uuid in country_uuids]
+        server_map: dict[str, ServerPrice] = {}
+        catalog = pricing_catalog.snapshot
+        if catalog is not None:
+            server_map = {uuid: server for uuid in country_uuids if (server := catalog.server(uuid)) is not None}
 
-        server_map = {s.squad_uuid: s for s in servers}
+        missing = [uuid for uuid in country_uuids if uuid not in server_map]
+        if missing:
+            try:
+                servers = await get_server_squads_by_uuids(db, missing)
+            except Exception as e:  # intentional broad catch: pricing must not crash on DB errors, servers_price=0 is safe (user pays less)
+                logger.error('Ошибка пакетной загрузки серверов', error=str(e), squad_uuids=country_uuids)
+                return 0, [{'uuid': uuid, 'id': None, 'price': 0, 'status': 'error'} for uuid in country_uuids]
+            server_map.update((server.squad_uuid, ServerPrice.from_model(server)) for server in servers)
 
+        return self.price_servers(server_map, country_uuids, promo_group_id=promo_group_id)
+
+    @staticmethod
+    def price_servers(
+        server_map: Mapping[str, ServerPrice],
+        country_uuids: list[str],
+        *,
+        promo_group_id: int | None = None,
+    ) -> tuple[int, list[dict]]:
+        """Pure server pricing over catalog entries.
+
+        ALWAYS uses real price_kopeks even when server is unavailable.
+        Only orphaned UUIDs (not found in DB) get price=0. Server fullness
+        is not a pricing input and is not part of the catalog.
+        """
         total_price = 0
         details: list[dict] = []
 
@@ -441,7 +473,7 @@ class PricingEngine:
                 details.append({'uuid': uuid, 'id': None, 'price': 0, 'status': 'not_found'})
                 continue
 
-            price = server.price_kopeks or 0
+            price = server.price_kopeks
             status = 'available'
 
             if not server.is_available:
@@ -451,15 +483,8 @@ class PricingEngine:
                     squad_uuid=uuid,
                     price_kopeks=price,
                 )
-            elif server.is_full:
-                status = 'full'
-                logger.warning(
-                    'Сервер переполнен, используем реальную цену',
-                    squad_uuid=uuid,
-                    price_kopeks=price,
-                )
             elif promo_group_id is not None:
-                allowed_ids = [pg.id for pg in (server.allowed_promo_groups or [])]
+                allowed_ids = server.allowed_promo_group_ids
                 if allowed_ids and promo_group_id not in allowed_ids:
                     status = 'not_allowed'
                     logger.warning(
@@ -517,14 +542,17 @@ class PricingEngine:
             raise ValueError(f'Invalid period_days: {period_days}')
 
         if subscription.tariff_id is not None:
-            if subscription.tariff is None:
+            tariff = subscription.tariff
+            if tariff is None and (catalog := pricing_catalog.snapshot) is not None:
+                tariff = catalog.tariff(subscription.tariff_id)
+            if tariff is None:
                 logger.error(
                     'tariff_id set but tariff relationship not loaded, falling back to classic mode',
                     subscription_id=getattr(subscription, 'id', None),
                     tariff_id=subscription.tariff_id,
                 )
             else:
-                return await self._calculate_tariff_mode(db, subscription, period_days, user=user)
+                return await self._calculate_tariff_mode(tariff, subscription, period_days, user=user)
         return await self._calculate_classic_mode(db, subscription, period_days, user=user)
 
     # ------------------------------------------------------------------
@@ -533,14 +561,13 @@ class PricingEngine:
 
     async def _calculate_tariff_mode(
         self,
-        db: AsyncSession,
+        tariff: Tariff | TariffPrice,
         subscription: Subscription,
         period_days: int,
         *,
         user: User | None = None,
     ) -> RenewalPricing:
-        """Price calculation when subscription is linked to a Tariff."""
-        tariff = subscription.tariff
+        """Price calculation when subscription is linked to a Tariff (ORM row or catalog entry)."""
         device_limit = subscription.device_limit or 0
         return await self._calculate_tariff_core(
             tariff,
@@ -551,7 +578,7 @@ class PricingEngine:
 
     async def _calculate_tariff_core(
         self,
-        tariff: Tariff,
+        tariff: Tariff | TariffPrice,
         period_days: int,
         device_limit: int,
         *,
@@ -566,6 +593,7 @@ class PricingEngine:
         Promo-offer discount applied on the discounted subtotal.
         Device cost is monthly × months_in_period.
         """
+        tariff = self._priced_tariff(tariff)
         months = calculate_months_from_days(period_days)
 
         # --- Base price ---
@@ -665,7 +693,7 @@ class PricingEngine:
 
     async def calculate_tariff_purchase_price(
         self,
-        tariff: Tariff,
+        tariff: Tariff | TariffPrice,
         period_days: int,
         *,
         device_limit: int | None = None,
@@ -676,6 +704,7 @@ class PricingEngine:
 
         Public method that delegates to _calculate_tariff_core.
         If device_limit is None, uses the tariff's included limit (no extra devices).
+        ``tariff`` may be an ORM row or a catalog entry (``pricing_catalog.snapshot.tariff(id)``).
         """
         effective_device_limit = device_limit if device_limit is not None else (tariff.device_limit or 0)
         return await self._calculate_tariff_core(
@@ -11,11 +11,16 @@ HTML-фрагмент; переносы строк конвертируются
 Поддерживается DB-override шаблона (email_templates, тип ``promo_offer``).
 """
 
-import asyncio
+import html
+from typing import TYPE_CHECKING
 
 import structlog
 
 
+if TYPE_CHECKING:
+    from app.cabinet.services.email_service import OutgoingEmail
+
+
 logger = structlog.get_logger(__name__)
 
 
@@ -24,36 +29,29 @@ def _to_email_html(text: str | None) -> str:
     return (text or '').replace('\n', '<br>')
 
 
-async def send_promo_offer_email(
+# Маркеры персональных полей: шаблон рендерится один раз на язык, а имя и
+# адрес подставляются в готовый текст для каждого получателя.
+_USERNAME_MARKER = '%%PROMO_RECIPIENT_USERNAME%%'
+_EMAIL_MARKER = '%%PROMO_RECIPIENT_EMAIL%%'
+
+
+async def _render_promo_offer_template(
+    language: str,
     *,
+    username: str,
     email: str,
-    language: str | None,
-    username: str = '',
     message_text: str | None,
     valid_hours: int,
-    discount_percent: int = 0,
-    bonus_amount_kopeks: int = 0,
-) -> bool:
-    """Шлёт одно промопредложение на почту. True — письмо реально отправлено.
-
-    Принимает только скалярные значения (не ORM-объекты) — безопасно вызывать
-    из detached background-задачи после закрытия сессии запроса.
-    """
-    from app.cabinet.services.email_service import email_service
+    discount_percent: int,
+    bonus_amount_kopeks: int,
+) -> dict[str, str] | None:
     from app.cabinet.services.email_templates import EmailNotificationTemplates
     from app.config import settings
     from app.services.notification_delivery_service import NotificationType
 
-    if not email:
-        return False
-    if not email_service.is_configured():
-        logger.debug('SMTP не настроен — промо-письмо пропущено', email=email)
-        return False
-
-    language = language or 'ru'
     context = {
         'cabinet_url': getattr(settings, 'CABINET_URL', '') or '',
-        'username': username or '',
+        'username': username,
         'email': email,
         'message_html': _to_email_html(message_text),
         'valid_hours': valid_hours,
@@ -78,21 +76,101 @@ async def send_promo_offer_email(
         template = EmailNotificationTemplates().get_template(NotificationType.PROMO_OFFER, language, context)
     if not template:
         logger.warning('Не найден email-шаблон промопредложения', language=language)
-        return False
+    return template
+
+
+def _personalize(template: dict[str, str], *, email: str, username: str) -> 'OutgoingEmail':
+    from app.cabinet.services.email_service import OutgoingEmail
+
+    def fill(text: str | None, *, escape: bool) -> str | None:
+        if text is None:
+            return None
+        name, address = (html.escape(username), html.escape(email)) if escape else (username, email)
+        return text.replace(_USERNAME_MARKER, name).replace(_EMAIL_MARKER, address)
+
+    return OutgoingEmail(
+        to_email=email,
+        subject=fill(template['subject'], escape=False),
+        body_html=fill(template['body_html'], escape=True),
+        body_text=fill(template.get('body_text'), escape=False),
+    )
+
+
+async def send_promo_offer_email(
+    *,
+    email: str,
+    language: str | None,
+    username: str = '',
+    message_text: str | None,
+    valid_hours: int,
+    discount_percent: int = 0,
+    bonus_amount_kopeks: int = 0,
+) -> bool:
+    """Шлёт одно промопредложение на почту. True — письмо реально отправлено.
+
+    Принимает только скалярные значения (не ORM-объекты) — безопасно вызывать
+    из detached background-задачи после закрытия сессии запроса.
+    """
+    sent, _failed = await send_promo_offer_emails(
+        [(email, language or 'ru', username or '')],
+        message_text=message_text,
+        valid_hours=valid_hours,
+        discount_percent=discount_percent,
+        bonus_amount_kopeks=bonus_amount_kopeks,
+    )
+    return sent == 1
+
+
+async def send_promo_offer_emails(
+    targets: list[tuple[str, str, str]],
+    *,
+    message_text: str | None,
+    valid_hours: int,
+    discount_percent: int = 0,
+    bonus_amount_kopeks: int = 0,
+) -> tuple[int, int]:
+    """Рассылает промопредложение списку ``(email, language, username)``.
+
+    Шаблон рендерится один раз на язык, письма уходят через общий
+    ``email_dispatcher`` (пул SMTP-соединений, пачки, лимиты по доменам).
+    Возвращает ``(sent, failed)``.
+    """
+    from app.cabinet.services.email_dispatcher import email_dispatcher
+    from app.cabinet.services.email_service import email_service
+
+    targets = [target for target in targets if target[0]]
+    if not targets:
+        return 0, 0
+    if not email_service.is_configured():
+        logger.debug('SMTP не настроен — промо-письма пропущены', count=len(targets))
+        return 0, len(targets)
+
+    templates: dict[str, dict[str, str] | None] = {}
+    emails = []
+    for email, language, username in targets:
+        language = language or 'ru'
+        if language not in templates:
+            templates[language] = await _render_promo_offer_template(
+                language,
+                username=_USERNAME_MARKER,
+                email=_EMAIL_MARKER,
+                message_text=message_text,
+                valid_hours=valid_hours,
+                discount_percent=discount_percent,
+                bonus_amount_kopeks=bonus_amount_kopeks,
+            )
+        template = templates[language]
+        if not template:
+            continue
+        emails.append(_personalize(template, email=email, username=username or ''))
 
     try:
-        # send_email — sync smtplib, уводим в thread чтобы не блокировать event loop
-        success = await asyncio.to_thread(
-            email_service.send_email,
-            to_email=email,
-            subject=template['subject'],
-            body_html=template['body_html'],
-            body_text=template.get('body_text'),
-        )
+        results = await email_dispatcher.send_many(emails)
     except Exception as e:
-        logger.error('Ошибка отправки промо-письма', email=email, e=e)
-        return False
+        logger.error('Ошибка отправки промо-писем', count=len(emails), e=e)
+        return 0, len(targets)
 
-    if success:
-        logger.info('Промопредложение отправлено на email', email=email)
-    return bool(success)
+    sent = sum(1 for result in results if result)
+    if sent:
+        logger.info('Промопредложения отправлены на email', sent=sent, total=len(targets))
+    return sent, len(targets) - sent
@@ -14,12 +14,14 @@ from app.database.crud.referral_contest import (
     add_contest_event,
     get_contest_events_count,
     get_contest_leaderboard_with_virtual,
+    get_contest_participants_count,
     get_contests_for_events,
     get_contests_for_summaries,
     get_referrer_score,
     list_virtual_participants,
     mark_daily_summary_sent,
     mark_final_summary_sent,
+    rebuild_contest_leaderboard,
 )
 from app.database.crud.user import get_user_by_id
 from app.database.database import AsyncSessionLocal
@@ -28,6 +30,8 @@ from app.database.models import ReferralContest, User
 
 logger = structlog.get_logger(__name__)
 
+SUMMARY_TOP_SIZE = 5
+
 
 class ReferralContestService:
     def __init__(self) -> None:
@@ -170,9 +174,14 @@ class ReferralContestService:
         day_start_utc = day_start_local.astimezone(UTC)
         day_end_utc = day_end_local.astimezone(UTC)
 
-        leaderboard = await get_contest_leaderboard_with_virtual(db, contest.id)
+        if is_final:
+            # Итоги публикуются по счёту, сверенному с событиями
+            await rebuild_contest_leaderboard(db, contest.id)
+
+        leaderboard = await get_contest_leaderboard_with_virtual(db, contest.id, limit=SUMMARY_TOP_SIZE)
         virtual_participants = await list_virtual_participants(db, contest.id)
         virtual_count = sum(vp.referral_count for vp in virtual_participants)
+        participants_count = await get_contest_participants_count(db, contest.id) + len(virtual_participants)
         total_events = await get_contest_events_count(db, contest.id) + virtual_count
         today_events = await get_contest_events_count(
             db,
@@ -193,6 +202,7 @@ class ReferralContestService:
         await self._notify_public_channel(
             contest=contest,
             leaderboard=leaderboard,
+            participants_count=participants_count,
             total_events=total_events,
             today_events=today_events,
             is_final=is_final,
@@ -291,7 +301,7 @@ class ReferralContestService:
         ]
 
         if leaderboard:
-            for idx, (name, score, _, is_virtual) in enumerate(leaderboard[:5], start=1):
+            for idx, (name, score, _, is_virtual) in enumerate(leaderboard[:SUMMARY_TOP_SIZE], start=1):
                 virt_mark = ' 👻' if is_virtual else ''
                 lines.append(f'{idx}. {html.escape(name)}{virt_mark} — {score}')
         else:
@@ -320,6 +330,7 @@ class ReferralContestService:
         *,
         contest: ReferralContest,
         leaderboard: Sequence[tuple[str, int, int, bool]],
+        participants_count: int,
         total_events: int,
         today_events: int,
         is_final: bool,
@@ -338,13 +349,13 @@ class ReferralContestService:
             f'🏆 {html.escape(contest.title)}',
             '🏁 Итоги конкурса' if is_final else '📊 Промежуточные итоги',
             f'Время зоны: {tz.key}',
-            f'Всего участников: <b>{len(leaderboard)}</b>',
+            f'Всего участников: <b>{participants_count}</b>',
             '',
             'Топ участников:',
         ]
 
         if leaderboard:
-            for idx, (name, score, _, _is_virtual) in enumerate(leaderboard[:5], start=1):
+            for idx, (name, score, _, _is_virtual) in enumerate(leaderboard[:SUMMARY_TOP_SIZE], start=1):
                 lines.append(f'{idx}. {html.escape(name)} — {score}')
         else:
             lines.append('Пока нет участников.')
@@ -658,6 +669,19 @@ class ReferralContestService:
             logger.error('Ошибка синхронизации конкурса', contest_id=contest_id, exc=exc)
             return {'error': str(exc)}
 
+    async def rebuild_leaderboard(
+        self,
+        db: AsyncSession,
+        contest_id: int,
+    ) -> dict:
+        """Пересчитать лидерборд конкурса из событий."""
+        try:
+            participants = await rebuild_contest_leaderboard(db, contest_id)
+            return {'participants': participants}
+        except Exception as exc:
+            logger.error('Ошибка пересчёта лидерборда конкурса', contest_id=contest_id, exc=exc)
+            return {'error': str(exc)}
+
     async def cleanup_contest(
         self,
         db: AsyncSession,
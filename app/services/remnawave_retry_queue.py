@@ -2,135 +2,502 @@
 
 When create_remnawave_user() fails during purchase, the subscription exists
 in the bot DB but not in the panel. This queue retries the operation
-periodically until it succeeds or max retries are exhausted.
+until it succeeds or max retries are exhausted.
+
+Items are keyed by subscription: a newer enqueue for the same subscription
+supersedes the pending one (both actions resync the panel from the current DB
+state, so only the latest matters; ``create`` wins over ``update``). Failed
+items are retried with exponential backoff and end up in a dead-letter set.
+
+The queue is persisted in Redis (hash of items + sorted set of due times) when
+the cache is connected, so pending retries survive restarts and are shared by
+all replicas; without Redis an in-memory backend with the same semantics is
+used. Due items are processed by a pool of workers sharded by user, so retries
+of one user stay ordered while a post-outage backlog drains in parallel.
 """
 
 from __future__ import annotations
 
 import asyncio
-from collections import deque
-from dataclasses import dataclass, field
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field
 from datetime import UTC, datetime
-from typing import Literal
+from typing import Any, Literal
 
 import structlog
+from redis.exceptions import NoScriptError
 
+from app.config import settings
 from app.database.database import AsyncSessionLocal
+from app.utils.metrics import QUEUE_DEPTH, metrics
 
 
 logger = structlog.get_logger(__name__)
 
+RetryAction = Literal['create', 'update']
+
+# Сколько секунд захваченный элемент невидим для других воркеров. Если процесс
+# умер посреди обработки, элемент снова станет доступен после аренды.
+_CLAIM_LEASE_SECONDS = 300
+
 
 @dataclass
 class RetryItem:
     subscription_id: int
     user_id: int
-    action: Literal['create', 'update']
+    action: RetryAction
     attempts: int = 0
     created_at: datetime = field(default_factory=lambda: datetime.now(UTC))
     last_error: str | None = None
+    # Меняется при каждом enqueue: ack/reschedule устаревшей версии не трогают
+    # элемент, который перезаписали, пока шла обработка.
+    token: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    @property
+    def key(self) -> str:
+        return str(self.subscription_id)
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        data['created_at'] = self.created_at.isoformat()
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, raw: str | bytes) -> RetryItem:
+        data = json.loads(raw)
+        data['created_at'] = datetime.fromisoformat(data['created_at'])
+        return cls(**data)
+
+
+def merge_retry_items(current: RetryItem | None, new: RetryItem) -> RetryItem:
+    """Схлопывает новую операцию с ожидающей для той же подписки."""
+    if current is None:
+        return new
+    return RetryItem(
+        subscription_id=new.subscription_id,
+        user_id=new.user_id,
+        action='create' if 'create' in (current.action, new.action) else 'update',
+        created_at=current.created_at,
+        token=new.token,
+    )
+
+
+class RetryQueueBackend(ABC):
+    """Хранилище очереди: ключ — подписка, значение — последняя версия операции."""
+
+    @abstractmethod
+    async def upsert(self, item: RetryItem, due_at: float) -> None: ...
+
+    @abstractmethod
+    async def claim_due(self, now: float, limit: int) -> list[RetryItem]: ...
+
+    @abstractmethod
+    async def ack(self, item: RetryItem) -> None: ...
+
+    @abstractmethod
+    async def reschedule(self, item: RetryItem, due_at: float) -> None: ...
+
+    @abstractmethod
+    async def dead_letter(self, item: RetryItem) -> None: ...
+
+    @abstractmethod
+    async def pending_count(self) -> int: ...
+
+    @abstractmethod
+    async def dead_letters(self) -> list[RetryItem]: ...
+
+    @abstractmethod
+    async def requeue_dead_letters(self, due_at: float) -> int: ...
+
+
+class InMemoryRetryBackend(RetryQueueBackend):
+    """Процессная реализация: без Redis и для тестов."""
+
+    def __init__(self) -> None:
+        self._items: dict[str, RetryItem] = {}
+        self._due: dict[str, float] = {}
+        self._dead: dict[str, RetryItem] = {}
+
+    def upsert_nowait(self, item: RetryItem, due_at: float) -> None:
+        self._items[item.key] = merge_retry_items(self._items.get(item.key), item)
+        self._due[item.key] = due_at
+        self._dead.pop(item.key, None)
+
+    async def upsert(self, item: RetryItem, due_at: float) -> None:
+        self.upsert_nowait(item, due_at)
+
+    async def claim_due(self, now: float, limit: int) -> list[RetryItem]:
+        due_keys = sorted((due, key) for key, due in self._due.items() if due <= now)[:limit]
+        claimed = []
+        for _, key in due_keys:
+            self._due[key] = now + _CLAIM_LEASE_SECONDS
+            claimed.append(self._items[key])
+        return claimed
+
+    def _is_current(self, item: RetryItem) -> bool:
+        current = self._items.get(item.key)
+        return current is not None and current.token == item.token
+
+    async def ack(self, item: RetryItem) -> None:
+        if self._is_current(item):
+            del self._items[item.key]
+            self._due.pop(item.key, None)
+
+    async def reschedule(self, item: RetryItem, due_at: float) -> None:
+        if self._is_current(item):
+            self._items[item.key] = item
+            self._due[item.key] = due_at
+
+    async def dead_letter(self, item: RetryItem) -> None:
+        if self._is_current(item):
+            del self._items[item.key]
+            self._due.pop(item.key, None)
+            self._dead[item.key] = item
+
+    async def pending_count(self) -> int:
+        return len(self._items)
+
+    async def dead_letters(self) -> list[RetryItem]:
+        return list(self._dead.values())
+
+    async def requeue_dead_letters(self, due_at: float) -> int:
+        dead = list(self._dead.values())
+        for item in dead:
+            self.upsert_nowait(RetryItem(item.subscription_id, item.user_id, item.action), due_at)
+        return len(dead)
+
+
+class RedisRetryBackend(RetryQueueBackend):
+    """Redis: HASH элементов + ZSET сроков + HASH dead-letter.
+
+    Все изменения, зависящие от текущей версии элемента, выполняются Lua-
+    скриптами, поэтому несколько реплик безопасно делят одну очередь.
+    """
+
+    ITEMS_KEY = 'remnawave_retry:items'
+    DUE_KEY = 'remnawave_retry:due'
+    DEAD_KEY = 'remnawave_retry:dead'
+
+    # KEYS: items, due, dead; ARGV: key, item_json, due_at
+    _UPSERT_SCRIPT = """
+local new = cjson.decode(ARGV[2])
+local raw = redis.call('HGET', KEYS[1], ARGV[1])
+if raw then
+    local cur = cjson.decode(raw)
+    if cur.action == 'create' then new.action = 'create' end
+    new.created_at = cur.created_at
+end
+redis.call('HSET', KEYS[1], ARGV[1], cjson.encode(new))
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+return 1
+"""
+    # KEYS: due; ARGV: now, limit, lease_until
+    _CLAIM_SCRIPT = """
+local keys = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, key in ipairs(keys) do
+    redis.call('ZADD', KEYS[1], ARGV[3], key)
+end
+return keys
+"""
+    # KEYS: items, due, dead; ARGV: key, token, mode ('ack'|'reschedule'|'dead'), item_json, due_at
+    _FINISH_SCRIPT = """
+local raw = redis.call('HGET', KEYS[1], ARGV[1])
+if not raw then return 0 end
+if cjson.decode(raw).token ~= ARGV[2] then return 0 end
+if ARGV[3] == 'reschedule' then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[4])
+    redis.call('ZADD', KEYS[2], ARGV[5], ARGV[1])
+    return 1
+end
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+if ARGV[3] == 'dead' then
+    redis.call('HSET', KEYS[3], ARGV[1], ARGV[4])
+end
+return 1
+"""
+
+    def __init__(self, client: Any) -> None:
+        self._client = client
+        self._shas: dict[str, str] = {}
+
+    async def _eval(self, script: str, keys: list[str], args: list[Any]) -> Any:
+        sha = self._shas.get(script)
+        if sha is None:
+            sha = self._shas[script] = await self._client.script_load(script)
+        try:
+            return await self._client.evalsha(sha, len(keys), *keys, *args)
+        except NoScriptError:
+            self._shas[script] = await self._client.script_load(script)
+            return await self._client.evalsha(self._shas[script], len(keys), *keys, *args)
+
+    async def upsert(self, item: RetryItem, due_at: float) -> None:
+        await self._eval(
+            self._UPSERT_SCRIPT,
+            [self.ITEMS_KEY, self.DUE_KEY, self.DEAD_KEY],
+            [item.key, item.to_json(), due_at],
+        )
+
+    async def claim_due(self, now: float, limit: int) -> list[RetryItem]:
+        keys = await self._eval(self._CLAIM_SCRIPT, [self.DUE_KEY], [now, limit, now + _CLAIM_LEASE_SECONDS])
+        if not keys:
+            return []
+        raw_items = await self._client.hmget(self.ITEMS_KEY, keys)
+        items = []
+        for key, raw in zip(keys, raw_items, strict=True):
+            if raw is None:
+                # Элемент удалён другим процессом — чистим осиротевший срок.
+                await self._client.zrem(self.DUE_KEY, key)
+                continue
+            items.append(RetryItem.from_json(raw))
+        return items
+
+    async def _finish(self, item: RetryItem, mode: str, due_at: float = 0) -> None:
+        await self._eval(
+            self._FINISH_SCRIPT,
+            [self.ITEMS_KEY, self.DUE_KEY, self.DEAD_KEY],
+            [item.key, item.token, mode, item.to_json(), due_at],
+        )
+
+    async def ack(self, item: RetryItem) -> None:
+        await self._finish(item, 'ack')
+
+    async def reschedule(self, item: RetryItem, due_at: float) -> None:
+        await self._finish(item, 'reschedule', due_at)
+
+    async def dead_letter(self, item: RetryItem) -> None:
+        await self._finish(item, 'dead')
+
+    async def pending_count(self) -> int:
+        return int(await self._client.hlen(self.ITEMS_KEY))
+
+    async def dead_letters(self) -> list[RetryItem]:
+        raw_items = await self._client.hvals(self.DEAD_KEY)
+        return [RetryItem.from_json(raw) for raw in raw_items]
+
+    async def requeue_dead_letters(self, due_at: float) -> int:
+        dead = await self.dead_letters()
+        for item in dead:
+            await self.upsert(RetryItem(item.subscription_id, item.user_id, item.action), due_at)
+        return len(dead)
 
 
 class RemnaWaveRetryQueue:
-    def __init__(self, max_retries: int = 5, interval_seconds: int = 120) -> None:
-        self._queue: deque[RetryItem] = deque()
+    def __init__(
+        self,
+        max_retries: int = 5,
+        interval_seconds: int = 120,
+        *,
+        workers: int | None = None,
+        poll_interval_seconds: float = 5.0,
+        backoff_max_seconds: int = 1800,
+        batch_size: int = 200,
+    ) -> None:
+        self._memory_backend = InMemoryRetryBackend()
+        self._backend_override: RetryQueueBackend | None = None
+        self._redis_backend: RedisRetryBackend | None = None
         self._max_retries = max_retries
+        # Первая попытка и база экспоненциальной задержки.
         self._interval = interval_seconds
+        self._backoff_max = backoff_max_seconds
+        self._workers = max(1, workers or settings.REMNAWAVE_RETRY_QUEUE_WORKERS)
+        self._poll_interval = poll_interval_seconds
+        self._batch_size = batch_size
         self._task: asyncio.Task | None = None
+        self._pending_writes: set[asyncio.Task] = set()
 
     @property
-    def pending_count(self) -> int:
-        return len(self._queue)
+    def backend(self) -> RetryQueueBackend:
+        """Redis, если кеш подключён сейчас, иначе память процесса.
+
+        Выбирается при каждом обращении: очередь не зависит от того, был ли
+        Redis доступен при старте, и переходит на него после переподключения.
+        """
+        if self._backend_override is not None:
+            return self._backend_override
+
+        from app.utils.cache import cache
+
+        client = cache.redis_client if cache.is_connected else None
+        if client is None:
+            return self._memory_backend
+        if self._redis_backend is None or self._redis_backend._client is not client:
+            self._redis_backend = RedisRetryBackend(client)
+            logger.info('RemnaWave retry queue uses Redis backend', workers=self._workers)
+        return self._redis_backend
+
+    def use_backend(self, backend: RetryQueueBackend | None) -> None:
+        """Фиксирует хранилище (``None`` — снова выбирать по состоянию кеша)."""
+        self._backend_override = backend
 
     def enqueue(
         self,
         subscription_id: int,
         user_id: int,
-        action: Literal['create', 'update'] = 'create',
+        action: RetryAction = 'create',
     ) -> None:
-        # Deduplicate by subscription_id
-        for item in self._queue:
-            if item.subscription_id == subscription_id:
-                return
-        self._queue.append(
-            RetryItem(
-                subscription_id=subscription_id,
-                user_id=user_id,
-                action=action,
-            )
-        )
+        item = RetryItem(subscription_id=subscription_id, user_id=user_id, action=action)
+        due_at = time.time() + self._interval
+
+        backend = self.backend
+        if backend is self._memory_backend:
+            self._memory_backend.upsert_nowait(item, due_at)
+        else:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._memory_backend.upsert_nowait(item, due_at)
+            else:
+                task = loop.create_task(self._persist(backend, item, due_at))
+                self._pending_writes.add(task)
+                task.add_done_callback(self._pending_writes.discard)
+
         logger.info(
             'Enqueued RemnaWave retry',
             subscription_id=subscription_id,
             user_id=user_id,
             action=action,
-            queue_size=len(self._queue),
         )
 
-    async def process_pending(self) -> None:
-        if not self._queue:
-            return
+    async def _persist(self, backend: RetryQueueBackend, item: RetryItem, due_at: float) -> None:
+        try:
+            await backend.upsert(item, due_at)
+        except Exception as error:
+            # Redis недоступен — не теряем операцию, держим её в памяти процесса.
+            logger.warning(
+                'Retry queue backend unavailable, keeping item in memory',
+                subscription_id=item.subscription_id,
+                error=str(error),
+            )
+            self._memory_backend.upsert_nowait(item, due_at)
+
+    def _backoff_delay(self, attempts: int) -> float:
+        return min(self._interval * 2 ** max(attempts - 1, 0), self._backoff_max)
+
+    async def get_pending_count(self) -> int:
+        count = await self._memory_backend.pending_count()
+        backend = self.backend
+        if backend is not self._memory_backend:
+            count += await backend.pending_count()
+        return count
+
+    async def get_dead_letters(self) -> list[RetryItem]:
+        return await self.backend.dead_letters()
 
+    async def requeue_dead_letters(self) -> int:
+        """Возвращает dead-letter элементы в очередь (после ручного разбора)."""
+        return await self.backend.requeue_dead_letters(time.time())
+
+    async def process_pending(self) -> int:
+        """Обрабатывает все элементы, срок которых наступил. Возвращает их число."""
+        processed = 0
+        # Элементы, оставшиеся в памяти без Redis, дорабатываются и после его возвращения
+        backends = [self._memory_backend]
+        if (backend := self.backend) is not self._memory_backend:
+            backends.append(backend)
+
+        for backend in backends:
+            while True:
+                batch = await backend.claim_due(time.time(), self._batch_size)
+                if not batch:
+                    break
+                await self._process_batch(backend, batch)
+                processed += len(batch)
+                if len(batch) < self._batch_size:
+                    break
+        return processed
+
+    async def _process_batch(self, backend: RetryQueueBackend, batch: list[RetryItem]) -> None:
+        # Шардируем по пользователю: операции одного юзера идут строго по порядку
+        # в одном воркере, разные юзеры — параллельно.
+        shards: dict[int, list[RetryItem]] = {}
+        for item in batch:
+            shards.setdefault(item.user_id % self._workers, []).append(item)
+
+        async def run_shard(items: list[RetryItem]) -> None:
+            for item in items:
+                await self._process_item(backend, item)
+
+        await asyncio.gather(*(run_shard(items) for items in shards.values()))
+
+    async def _process_item(self, backend: RetryQueueBackend, item: RetryItem) -> None:
+        item.attempts += 1
+        try:
+            error = await self._run_action(item)
+        except Exception as exc:
+            error = str(exc)
+
+        try:
+            if error is None:
+                await backend.ack(item)
+                logger.info(
+                    'Retry succeeded',
+                    subscription_id=item.subscription_id,
+                    attempts=item.attempts,
+                )
+            else:
+                await self._requeue(backend, item, error)
+        except Exception as backend_error:
+            # Элемент остаётся захваченным и вернётся после истечения аренды.
+            logger.warning(
+                'Retry queue backend error',
+                subscription_id=item.subscription_id,
+                error=str(backend_error),
+            )
+
+    async def _run_action(self, item: RetryItem) -> str | None:
+        """Выполняет операцию. None — успех (или делать нечего), иначе текст ошибки."""
         from app.database.crud.subscription import get_subscription_by_id
         from app.services.subscription_service import SubscriptionService
 
-        batch = list(self._queue)
-        self._queue.clear()
+        async with AsyncSessionLocal() as db:
+            sub = await get_subscription_by_id(db, item.subscription_id)
+            if not sub:
+                logger.warning(
+                    'Retry: subscription not found, dropping',
+                    subscription_id=item.subscription_id,
+                )
+                return None
 
-        for item in batch:
-            item.attempts += 1
-            try:
-                async with AsyncSessionLocal() as db:
-                    sub = await get_subscription_by_id(db, item.subscription_id)
-                    if not sub:
-                        logger.warning(
-                            'Retry: subscription not found, dropping',
-                            subscription_id=item.subscription_id,
-                        )
-                        continue
-
-                    service = SubscriptionService()
-                    if not service.is_configured:
-                        self._requeue(item, 'RemnaWave not configured')
-                        continue
-
-                    if item.action == 'create':
-                        result = await service.create_remnawave_user(db, sub)
-                    else:
-                        result = await service.update_remnawave_user(db, sub)
-
-                    # create_remnawave_user / update_remnawave_user проглатывают
-                    # RemnaWaveAPIError внутри себя и возвращают None (не
-                    # пробрасывают). Без проверки результата воркер счёл бы
-                    # провал успехом и выбросил бы элемент из очереди после
-                    # первого тика — подписка осталась бы без юзера в панели.
-                    if result is None:
-                        self._requeue(item, f'{item.action}_remnawave_user returned None')
-                        continue
-
-                    logger.info(
-                        'Retry succeeded',
-                        subscription_id=item.subscription_id,
-                        attempts=item.attempts,
-                    )
-
-            except Exception as error:
-                self._requeue(item, str(error))
-
-    def _requeue(self, item: RetryItem, error: str) -> None:
+            service = SubscriptionService()
+            if not service.is_configured:
+                return 'RemnaWave not configured'
+
+            if item.action == 'create':
+                result = await service.create_remnawave_user(db, sub)
+            else:
+                result = await service.update_remnawave_user(db, sub)
+
+            # create_remnawave_user / update_remnawave_user проглатывают
+            # RemnaWaveAPIError внутри себя и возвращают None (не
+            # пробрасывают). Без проверки результата воркер счёл бы
+            # провал успехом и выбросил бы элемент из очереди после
+            # первого тика — подписка осталась бы без юзера в панели.
+            if result is None:
+                return f'{item.action}_remnawave_user returned None'
+            return None
+
+    async def _requeue(self, backend: RetryQueueBackend, item: RetryItem, error: str) -> None:
         item.last_error = error
         if item.attempts < self._max_retries:
-            self._queue.append(item)
+            delay = self._backoff_delay(item.attempts)
+            await backend.reschedule(item, time.time() + delay)
             logger.warning(
-                'Retry failed, re-enqueued',
+                'Retry failed, rescheduled',
                 subscription_id=item.subscription_id,
                 attempts=item.attempts,
                 max_retries=self._max_retries,
+                retry_in_seconds=delay,
                 error=error,
             )
         else:
+            await backend.dead_letter(item)
             logger.error(
-                'Retry exhausted, dropping (MANUAL INTERVENTION NEEDED)',
+                'Retry exhausted, moved to dead letters (MANUAL INTERVENTION NEEDED)',
                 subscription_id=item.subscription_id,
                 user_id=item.user_id,
                 attempts=item.attempts,
@@ -143,6 +510,8 @@ class RemnaWaveRetryQueue:
         self._task = asyncio.create_task(self._run_loop())
 
     async def stop(self) -> None:
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
         if self._task and not self._task.done():
             self._task.cancel()
             try:
@@ -153,11 +522,21 @@ class RemnaWaveRetryQueue:
     async def _run_loop(self) -> None:
         try:
             while True:
-                await asyncio.sleep(self._interval)
-                await self.process_pending()
+                await asyncio.sleep(self._poll_interval)
+                try:
+                    await self.process_pending()
+                except Exception as error:
+                    logger.error('RemnaWave retry queue tick failed', error=str(error))
         except asyncio.CancelledError:
             raise
 
 
 # Global instance
 remnawave_retry_queue = RemnaWaveRetryQueue()
+
+
+async def _collect_retry_queue_depth() -> None:
+    QUEUE_DEPTH.labels('remnawave_retry').set(await remnawave_retry_queue.backend.pending_count())
+
+
+metrics.add_collector('remnawave_retry_queue', _collect_retry_queue_depth)
@@ -3308,6 +3308,10 @@ class RemnaWaveService:
                         balance_kopeks=user.balance_kopeks,
                     )
                 user.remnawave_id = None
+                # История транзакций удалена выше — счётчики трат обнуляются вместе с ней
+                user.total_spent_kopeks = 0
+                user.purchase_count = 0
+                user.last_purchase_at = None
                 # force_cleanup удаляет панельного пользователя целиком, поэтому
                 # исторический uuid тоже теряет смысл: пара «мёртвый uuid + новый
                 # id» отравляет карту идентичностей бэкфила.
@@ -40,6 +40,7 @@ from app.localization.texts import get_texts
 from app.services.admin_notification_service import AdminNotificationService
 from app.services.grace_access_runtime import get_open_grace_subscription_ids, grace_access_runtime
 from app.services.grace_access_service import GraceReason
+from app.services.hwid_device_cache import hwid_device_cache
 from app.services.notification_delivery_service import NotificationType, notification_delivery_service
 from app.utils.miniapp_buttons import build_miniapp_or_callback_button
 
@@ -1915,11 +1916,28 @@ class RemnaWaveWebhookService:
             return html.escape(hwid_short)
         return ''
 
+    @classmethod
+    def _device_event_panel_user_id(cls, user: User, subscription: Subscription | None, data: dict) -> int | None:
+        """Панельный пользователь, чей список устройств изменился (для кеша устройств)."""
+        device_obj = data.get('hwidUserDevice') if isinstance(data.get('hwidUserDevice'), dict) else {}
+        nested_user = data.get('user') if isinstance(data.get('user'), dict) else {}
+        for value in (device_obj.get('userId'), nested_user.get('id')):
+            panel_user_id = cls._coerce_panel_user_id(value)
+            if panel_user_id is not None:
+                return panel_user_id
+        if subscription is not None and getattr(subscription, 'remnawave_id', None):
+            return cls._coerce_panel_user_id(subscription.remnawave_id)
+        return cls._coerce_panel_user_id(getattr(user, 'remnawave_id', None))
+
     async def _handle_device_added(
         self, db: AsyncSession, user: User, subscription: Subscription | None, data: dict
     ) -> None:
         device_name = self._extract_device_name(data)
         logger.info('Webhook: device added for user', user_id=user.id, device_name=device_name or '(empty)')
+        panel_user_id = self._device_event_panel_user_id(user, subscription, data)
+        if panel_user_id is not None:
+            # Формат устройства в хуке не обязан совпадать со списком панели — перечитаем при показе
+            await hwid_device_cache.invalidate(panel_user_id)
         await self._notify_user(
             user,
             'WEBHOOK_DEVICE_ADDED',
@@ -1933,6 +1951,14 @@ class RemnaWaveWebhookService:
     ) -> None:
         device_name = self._extract_device_name(data)
         logger.info('Webhook: device deleted for user', user_id=user.id, device_name=device_name or '(empty)')
+        panel_user_id = self._device_event_panel_user_id(user, subscription, data)
+        if panel_user_id is not None:
+            device_obj = data.get('hwidUserDevice')
+            hwid = device_obj.get('hwid') if isinstance(device_obj, dict) else data.get('hwid')
+            if hwid:
+                await hwid_device_cache.remove_devices(panel_user_id, {str(hwid)})
+            else:
+                await hwid_device_cache.invalidate(panel_user_id)
         await self._notify_user(
             user,
             'WEBHOOK_DEVICE_DELETED',
@@ -8,10 +8,13 @@ import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('riopay', HttpClientConfig(timeout=30))
+
 API_BASE_URL = 'https://api.riopay.online'
 
 
@@ -29,7 +32,6 @@ class RioPayService:
 
     def __init__(self):
         self._api_token: str | None = None
-        self._session: aiohttp.ClientSession | None = None
 
     @property
     def api_token(self) -> str:
@@ -51,17 +53,7 @@ class RioPayService:
 
     async def _get_session(self) -> aiohttp.ClientSession:
         """Возвращает переиспользуемую HTTP-сессию."""
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=30),
-            )
-        return self._session
-
-    async def close(self) -> None:
-        """Закрывает HTTP-сессию."""
-        if self._session and not self._session.closed:
-            await self._session.close()
-            self._session = None
+        return http_clients.session('riopay')
 
     async def create_order(
         self,
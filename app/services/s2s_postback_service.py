@@ -3,18 +3,16 @@
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
-try:
-    import httpx
-except ImportError:
-    httpx = None
+http_clients.register('s2s_postback', HttpClientConfig(timeout=10))
 
 
 def _is_enabled() -> bool:
-    return getattr(settings, 'S2S_POSTBACK_ENABLED', False) and httpx is not None
+    return getattr(settings, 'S2S_POSTBACK_ENABLED', False)
 
 
 def _get_url(event: str) -> str | None:
@@ -69,18 +67,17 @@ async def send_postback(
     url = url.replace('{user_id}', str(user_id) if user_id is not None else '0')
 
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.get(url)
-            logger.info(
-                'S2S postback sent',
-                event=event,
-                subid=subid,
-                amount=amount,
-                user_id=user_id,
-                status_code=response.status_code,
-                url=url[:100],
-            )
-            return response.status_code < 400
+        response = await http_clients.httpx_client('s2s_postback').get(url)
+        logger.info(
+            'S2S postback sent',
+            event=event,
+            subid=subid,
+            amount=amount,
+            user_id=user_id,
+            status_code=response.status_code,
+            url=url[:100],
+        )
+        return response.status_code < 400
     except Exception as e:
         logger.error(
             'S2S postback failed',
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import re
-from dataclasses import dataclass
+import time
+from dataclasses import asdict, dataclass
 
 import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.cache import cache
 
 
 logger = structlog.get_logger(__name__)
@@ -28,82 +32,227 @@ class ServerStatusError(Exception):
     """Raised when server status information cannot be fetched or parsed."""
 
 
+SNAPSHOT_CACHE_KEY = 'server_status:xray'
+REFRESH_LOCK_KEY = 'server_status:xray:lock'
+# Сколько после последнего успешного сбора ещё можно показывать снимок, если экспортер недоступен
+STALE_SNAPSHOT_INTERVALS = 10
+# Снимок обновляет фоновый сбор под блокировкой; читатель собирает сам, только если
+# сбор пропустил целый интервал, иначе каждый процесс опрашивал бы экспортер на границе интервала
+READER_REFRESH_INTERVALS = 2
+
+_METRIC_NAMES = ('xray_proxy_latency_ms', 'xray_proxy_status')
+
+
+@dataclass(slots=True)
+class ServerStatusSnapshot:
+    servers: list[ServerStatusEntry]
+    collected_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.collected_at
+
+
 class ServerStatusService:
-    _LATENCY_PATTERN = re.compile(r'xray_proxy_latency_ms\{(?P<labels>[^}]*)\}\s+(?P<value>[-+]?\d+(?:\.\d+)?)')
-    _STATUS_PATTERN = re.compile(r'xray_proxy_status\{(?P<labels>[^}]*)\}\s+(?P<value>[-+]?\d+(?:\.\d+)?)')
+    """Сборщик статусов серверов из метрик XrayChecker.
+
+    Метрики опрашиваются фоновой задачей раз в ``SERVER_STATUS_REFRESH_INTERVAL``
+    через постоянную HTTP-сессию; ответ разбирается построчно по мере получения, из
+    него остаются только серии ``xray_proxy_*``. Снимок публикуется в Redis с
+    временем сбора, так что экспортер опрашивает один процесс за интервал, а экраны
+    статуса читают готовый снимок. Устаревший снимок обновляется single-flight.
+    """
+
+    _SAMPLE_PATTERN = re.compile(
+        r'^(?P<metric>xray_proxy_latency_ms|xray_proxy_status)\{(?P<labels>[^}]*)\}\s+(?P<value>[-+]?\d+(?:\.\d+)?)'
+    )
     _LABEL_PATTERN = re.compile(r'(?P<key>[a-zA-Z_][a-zA-Z0-9_]*)=\"(?P<value>(?:\\.|[^\"])*)\"')
     _FLAG_PATTERN = re.compile(r'^([\U0001F1E6-\U0001F1FF]{2})\s*(.*)$')
 
     def __init__(self) -> None:
-        pass
+        self._snapshot: ServerStatusSnapshot | None = None
+        self._session: aiohttp.ClientSession | None = None
+        self._refresh_task: asyncio.Task[ServerStatusSnapshot] | None = None
+        self._poll_task: asyncio.Task[None] | None = None
+
+    # ── Публичное API ──
 
     async def get_servers(self) -> list[ServerStatusEntry]:
-        mode = settings.get_server_status_mode()
-        if mode != 'xray':
-            raise ServerStatusError('Server status integration is not enabled')
+        self._ensure_enabled()
+        interval = settings.get_server_status_refresh_interval()
+        max_age = interval * READER_REFRESH_INTERVALS
 
-        url = settings.get_server_status_metrics_url()
-        if not url:
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.age >= interval:
+            snapshot = await self._load_shared_snapshot() or snapshot
+        if snapshot is not None and snapshot.age < max_age:
+            return snapshot.servers
+
+        try:
+            snapshot = await self._refresh_once()
+        except ServerStatusError:
+            stale = self._snapshot
+            if stale is not None and stale.age < interval * STALE_SNAPSHOT_INTERVALS:
+                logger.warning('Метрики недоступны, отдаём устаревший снимок статусов', age=int(stale.age))
+                return stale.servers
+            raise
+        return snapshot.servers
+
+    async def start(self) -> None:
+        if self.is_running():
+            return
+        self._poll_task = asyncio.create_task(self._poll_loop(), name='server-status-collector')
+
+    def is_running(self) -> bool:
+        return self._poll_task is not None and not self._poll_task.done()
+
+    async def stop(self) -> None:
+        task, self._poll_task = self._poll_task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        session, self._session = self._session, None
+        if session is not None and not session.closed:
+            await session.close()
+
+    # ── Сбор ──
+
+    async def _poll_loop(self) -> None:
+        while True:
+            interval = settings.get_server_status_refresh_interval()
+            try:
+                if settings.get_server_status_mode() == 'xray' and settings.get_server_status_metrics_url():
+                    # Между процессами сбор делит блокировка: опрашивает тот, кто её взял
+                    if not cache.is_connected or await cache.setnx(REFRESH_LOCK_KEY, 1, expire=max(interval - 1, 1)):
+                        await self._refresh_once()
+            except ServerStatusError as error:
+                logger.warning('Не удалось собрать статусы серверов', error=error)
+            except Exception as error:
+                logger.error('Ошибка фонового сбора статусов серверов', error=error)
+            await asyncio.sleep(interval)
+
+    async def _refresh_once(self) -> ServerStatusSnapshot:
+        task = self._refresh_task
+        if task is None or task.done():
+            task = asyncio.create_task(self._collect(), name='server-status-refresh')
+            self._refresh_task = task
+        return await asyncio.shield(task)
+
+    async def _collect(self) -> ServerStatusSnapshot:
+        self._ensure_enabled()
+        servers = await self._fetch_servers()
+        snapshot = ServerStatusSnapshot(servers=servers, collected_at=time.time())
+        self._snapshot = snapshot
+        ttl = settings.get_server_status_refresh_interval() * STALE_SNAPSHOT_INTERVALS
+        await cache.set(
+            SNAPSHOT_CACHE_KEY,
+            {'collected_at': snapshot.collected_at, 'servers': [asdict(entry) for entry in servers]},
+            expire=ttl,
+        )
+        return snapshot
+
+    async def _load_shared_snapshot(self) -> ServerStatusSnapshot | None:
+        payload = await cache.get(SNAPSHOT_CACHE_KEY)
+        if not isinstance(payload, dict) or not isinstance(payload.get('servers'), list):
+            return None
+        try:
+            snapshot = ServerStatusSnapshot(
+                servers=[ServerStatusEntry(**item) for item in payload['servers']],
+                collected_at=float(payload.get('collected_at') or 0.0),
+            )
+        except (TypeError, ValueError) as error:
+            logger.warning('Повреждённый снимок статусов серверов в кеше', error=error)
+            return None
+        if self._snapshot is None or snapshot.collected_at > self._snapshot.collected_at:
+            self._snapshot = snapshot
+        return self._snapshot
+
+    def _ensure_enabled(self) -> None:
+        if settings.get_server_status_mode() != 'xray':
+            raise ServerStatusError('Server status integration is not enabled')
+        if not settings.get_server_status_metrics_url():
             raise ServerStatusError('Metrics URL is not configured')
 
+    async def _get_session(self) -> aiohttp.ClientSession:
         timeout = aiohttp.ClientTimeout(total=settings.get_server_status_request_timeout())
+        session = self._session
+        if session is not None and not session.closed:
+            if session.timeout == timeout:
+                return session
+            # Таймаут поменяли в настройках — старую сессию закрываем, а не бросаем
+            await session.close()
+        self._session = aiohttp.ClientSession(timeout=timeout)
+        return self._session
+
+    async def _fetch_servers(self) -> list[ServerStatusEntry]:
+        url = settings.get_server_status_metrics_url()
         auth = None
         auth_credentials = settings.get_server_status_metrics_auth()
         if auth_credentials:
             username, password = auth_credentials
             auth = aiohttp.BasicAuth(username, password)
 
+        session = await self._get_session()
         try:
-            async with (
-                aiohttp.ClientSession(timeout=timeout) as session,
-                session.get(
-                    url,
-                    auth=auth,
-                    ssl=settings.SERVER_STATUS_METRICS_VERIFY_SSL,
-                ) as response,
-            ):
+            async with session.get(
+                url,
+                auth=auth,
+                ssl=settings.SERVER_STATUS_METRICS_VERIFY_SSL,
+            ) as response:
                 if response.status != 200:
                     text = await response.text()
                     raise ServerStatusError(f'Unexpected response status: {response.status} - {text[:200]}')
-                metrics_body = await response.text()
+                return await self._parse_stream(response.content)
         except TimeoutError as error:
             raise ServerStatusError('Request to metrics endpoint timed out') from error
         except aiohttp.ClientError as error:
             raise ServerStatusError('Failed to fetch metrics') from error
+        except ValueError as error:
+            # StreamReader отказывается читать строку длиннее своего лимита
+            raise ServerStatusError('Malformed metrics response') from error
 
-        return self._parse_metrics(metrics_body)
+    # ── Разбор ──
+
+    async def _parse_stream(self, content: aiohttp.StreamReader) -> list[ServerStatusEntry]:
+        servers: dict[tuple[str, str, str, str], ServerStatusEntry] = {}
+        async for raw_line in content:
+            self._consume_line(servers, raw_line.decode('utf-8', errors='replace'))
+        return self._sorted(servers)
 
     def _parse_metrics(self, body: str) -> list[ServerStatusEntry]:
         servers: dict[tuple[str, str, str, str], ServerStatusEntry] = {}
+        for line in body.splitlines():
+            self._consume_line(servers, line)
+        return self._sorted(servers)
 
-        for match in self._LATENCY_PATTERN.finditer(body):
-            labels = self._parse_labels(match.group('labels'))
-            key = self._build_key(labels)
-            entry = servers.get(key)
-            if not entry:
-                entry = self._create_entry(labels)
-                servers[key] = entry
+    def _consume_line(self, servers: dict[tuple[str, str, str, str], ServerStatusEntry], line: str) -> None:
+        # Экспортер отдаёт сотни серий; всё, что не xray_proxy_*, отбрасываем без регулярки
+        if not line.startswith(_METRIC_NAMES):
+            return
+        match = self._SAMPLE_PATTERN.match(line)
+        if not match:
+            return
 
-            try:
-                value = float(match.group('value'))
-                entry.latency_ms = int(round(value))
-            except (TypeError, ValueError):
-                entry.latency_ms = None
-
-        for match in self._STATUS_PATTERN.finditer(body):
-            labels = self._parse_labels(match.group('labels'))
-            key = self._build_key(labels)
-            entry = servers.get(key)
-            if not entry:
-                entry = self._create_entry(labels)
-                servers[key] = entry
+        labels = self._parse_labels(match.group('labels'))
+        key = self._build_key(labels)
+        entry = servers.get(key)
+        if not entry:
+            entry = self._create_entry(labels)
+            servers[key] = entry
 
-            try:
-                value = float(match.group('value'))
-                entry.is_online = value >= 1
-            except (TypeError, ValueError):
-                entry.is_online = False
+        try:
+            value = float(match.group('value'))
+        except (TypeError, ValueError):
+            value = None
+
+        if match.group('metric') == 'xray_proxy_latency_ms':
+            entry.latency_ms = int(round(value)) if value is not None else None
+        else:
+            entry.is_online = value is not None and value >= 1
 
+    @staticmethod
+    def _sorted(servers: dict[tuple[str, str, str, str], ServerStatusEntry]) -> list[ServerStatusEntry]:
         return sorted(
             servers.values(),
             key=lambda item: (
@@ -148,3 +297,6 @@ class ServerStatusService:
             value = match.group('value').replace('\\"', '"')
             labels[key] = value
         return labels
+
+
+server_status_service = ServerStatusService()
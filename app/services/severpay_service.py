@@ -10,10 +10,13 @@ import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('severpay', HttpClientConfig(timeout=30))
+
 API_BASE_URL = 'https://severpay.io/api/merchant'
 
 
@@ -29,9 +32,6 @@ class SeverPayAPIError(Exception):
 class SeverPayService:
     """Сервис для работы с API SeverPay."""
 
-    def __init__(self):
-        self._session: aiohttp.ClientSession | None = None
-
     @property
     def mid(self) -> int | None:
         return settings.SEVERPAY_MID
@@ -42,17 +42,7 @@ class SeverPayService:
 
     async def _get_session(self) -> aiohttp.ClientSession:
         """Возвращает переиспользуемую HTTP-сессию."""
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=30),
-            )
-        return self._session
-
-    async def close(self) -> None:
-        """Закрывает HTTP-сессию."""
-        if self._session and not self._session.closed:
-            await self._session.close()
-            self._session = None
+        return http_clients.session('severpay')
 
     def _sign_request(self, body: dict[str, Any]) -> dict[str, Any]:
         """Генерирует salt, сортирует, подписывает и возвращает body с sign."""
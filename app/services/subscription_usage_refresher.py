@@ -0,0 +1,110 @@
+"""Фоновое обновление снимка трафика подписки (stale-while-revalidate).
+
+Мини-приложение раньше на каждое открытие синхронно ходило в панель за
+использованным трафиком. Теперь ответ строится из ``Subscription.traffic_used_gb``,
+а момент последней синхронизации хранится в Redis под
+``subscription_usage_synced:{subscription_id}`` с TTL, равным допустимому возрасту:
+
+- ключ есть — снимок свежий, его время возвращается клиенту;
+- ключа нет — первый запрос занимает его ``SET NX`` и запускает обновление в фоне,
+  остальные процессы и запросы до истечения TTL панель не трогают;
+- без Redis то же самое решает время последнего обновления в памяти процесса.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import UTC, datetime
+
+import structlog
+
+from app.config import settings
+from app.database.database import AsyncSessionLocal
+from app.database.models import Subscription
+from app.utils.cache import cache
+
+
+logger = structlog.get_logger(__name__)
+
+# Потолок записей о времени обновления в памяти (используются только без Redis)
+_LOCAL_MARKS_LIMIT = 10_000
+
+
+class SubscriptionUsageRefresher:
+    def __init__(self, key_prefix: str = 'subscription_usage_synced') -> None:
+        self.key_prefix = key_prefix
+        self._inflight: dict[int, asyncio.Task[None]] = {}
+        self._local_marks: dict[int, float] = {}
+
+    def _key(self, subscription_id: int) -> str:
+        return f'{self.key_prefix}:{subscription_id}'
+
+    @staticmethod
+    def _max_age_seconds() -> int:
+        return max(1, settings.MINIAPP_USAGE_MAX_AGE_SECONDS)
+
+    async def ensure_fresh(self, subscription_id: int) -> datetime | None:
+        """Возвращает время последней синхронизации снимка; устаревший снимок обновляет в фоне.
+
+        ``None`` — время неизвестно (снимок устарел и обновление уже запущено).
+        """
+        synced_at = await self._get_synced_at(subscription_id)
+        if synced_at is not None:
+            return synced_at
+
+        if subscription_id not in self._inflight and await self._claim(subscription_id):
+            task = asyncio.create_task(self._refresh(subscription_id), name=f'subscription-usage:{subscription_id}')
+            self._inflight[subscription_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(subscription_id, None))
+        return None
+
+    async def _get_synced_at(self, subscription_id: int) -> datetime | None:
+        if not cache.is_connected:
+            return None
+        raw = await cache.get(self._key(subscription_id))
+        if not isinstance(raw, str):
+            return None
+        try:
+            return datetime.fromisoformat(raw)
+        except ValueError:
+            return None
+
+    async def _claim(self, subscription_id: int) -> bool:
+        max_age = self._max_age_seconds()
+        if cache.is_connected:
+            # Пустое значение: ключ занят, но синхронизация ещё не завершилась
+            return await cache.setnx(self._key(subscription_id), 0, expire=max_age)
+
+        # Redis недоступен — решаем по времени обновления внутри процесса
+        now = time.monotonic()
+        last = self._local_marks.get(subscription_id)
+        if last is not None and now - last < max_age:
+            return False
+        if len(self._local_marks) >= _LOCAL_MARKS_LIMIT:
+            self._local_marks = {key: mark for key, mark in self._local_marks.items() if now - mark < max_age}
+        self._local_marks[subscription_id] = now
+        return True
+
+    async def _refresh(self, subscription_id: int) -> None:
+        from app.services.subscription_service import SubscriptionService
+
+        try:
+            async with AsyncSessionLocal() as db:
+                subscription = await db.get(Subscription, subscription_id)
+                if subscription is None:
+                    return
+                synced = await SubscriptionService().sync_subscription_usage(db, subscription)
+        except Exception as error:
+            logger.warning('Не удалось обновить снимок трафика подписки', subscription_id=subscription_id, error=error)
+            return
+
+        if synced:
+            await cache.set(
+                self._key(subscription_id),
+                datetime.now(UTC).isoformat(),
+                expire=self._max_age_seconds(),
+            )
+
+
+subscription_usage_refresher = SubscriptionUsageRefresher()
@@ -23,6 +23,7 @@ from app.database.crud.system_setting import (
 )
 from app.database.database import AsyncSessionLocal
 from app.database.models import SystemSetting
+from app.services.system_settings_sync import SettingChange, system_settings_sync
 from app.services.web_api_token_service import ensure_default_web_api_token
 
 
@@ -410,6 +411,9 @@ class BotConfigurationService:
         'MAIN_MENU_RICH_SUBSCRIPTIONS_COLLAPSIBLE': 'INTERFACE',
         'USER_ACTION_LOG_ENABLED': 'MONITORING',
         'USER_ACTION_LOG_RETENTION_DAYS': 'MONITORING',
+        'USER_ACTION_LOG_FLUSH_INTERVAL_MS': 'MONITORING',
+        'USER_ACTION_LOG_BATCH_SIZE': 'MONITORING',
+        'USER_ACTION_LOG_BUFFER_SIZE': 'MONITORING',
         'CABINET_BUTTON_STYLE': 'INTERFACE',
         'CONNECT_BUTTON_MODE': 'CONNECT_BUTTON',
         'MINIAPP_CUSTOM_URL': 'CONNECT_BUTTON',
@@ -790,6 +794,38 @@ class BotConfigurationService:
             'warning': 'Чистка выполняется раз в сутки циклом мониторинга.',
             'dependencies': 'USER_ACTION_LOG_ENABLED',
         },
+        'USER_ACTION_LOG_FLUSH_INTERVAL_MS': {
+            'description': (
+                'Как часто фоновый писатель сбрасывает накопленные записи лога действий в БД (одним INSERT на пачку).'
+            ),
+            'format': 'Целое число миллисекунд.',
+            'example': '1000',
+            'warning': (
+                'Больший интервал — меньше запросов к БД, но записи появляются в «Активности» позже. '
+                'Применяется после перезапуска.'
+            ),
+            'dependencies': 'USER_ACTION_LOG_BATCH_SIZE, USER_ACTION_LOG_BUFFER_SIZE',
+        },
+        'USER_ACTION_LOG_BATCH_SIZE': {
+            'description': (
+                'Сколько записей лога действий писать одним INSERT. Пачка сбрасывается досрочно, '
+                'не дожидаясь интервала, как только набралось столько записей.'
+            ),
+            'format': 'Целое число записей.',
+            'example': '500',
+            'warning': 'Применяется после перезапуска.',
+            'dependencies': 'USER_ACTION_LOG_FLUSH_INTERVAL_MS, USER_ACTION_LOG_BUFFER_SIZE',
+        },
+        'USER_ACTION_LOG_BUFFER_SIZE': {
+            'description': (
+                'Сколько записей лога действий держать в памяти до записи в БД. '
+                'Записи пишутся пачками фоновым писателем.'
+            ),
+            'format': 'Целое число записей.',
+            'example': '20000',
+            'warning': 'При переполнении (БД не успевает) новые записи отбрасываются. Применяется после перезапуска.',
+            'dependencies': 'USER_ACTION_LOG_BATCH_SIZE, USER_ACTION_LOG_FLUSH_INTERVAL_MS',
+        },
         'MULTI_TARIFF_ENABLED': {
             'description': (
                 'Разрешает пользователям покупать несколько тарифов одновременно. '
@@ -1808,6 +1844,8 @@ class BotConfigurationService:
                     replacement=cls._RETIRED_SETTINGS[row.key],
                 )
 
+        # Снимок переопределений не меняется на месте: собираем новый и подменяем целиком
+        overrides_raw = dict(cls._overrides_raw)
         for key, raw_value in overrides.items():
             if cls._is_env_override(key):
                 logger.debug('Пропускаем настройку из БД: используется значение из окружения', key=key)
@@ -1818,8 +1856,9 @@ class BotConfigurationService:
                 logger.error('Не удалось применить настройку', key=key, error=error)
                 continue
 
-            cls._overrides_raw[key] = raw_value
+            overrides_raw[key] = raw_value
             cls._apply_to_settings(key, parsed_value)
+        cls._overrides_raw = overrides_raw
 
         if sync_web_api_token:
             await cls._sync_default_web_api_token()
@@ -1832,7 +1871,7 @@ class BotConfigurationService:
 
     @classmethod
     async def reload(cls) -> None:
-        cls._overrides_raw.clear()
+        cls._overrides_raw = {}
         await cls.initialize()
 
     @classmethod
@@ -1934,10 +1973,12 @@ class BotConfigurationService:
         await upsert_system_setting(db, key, raw_value)
         if cls._is_env_override(key):
             logger.info('Настройка сохранена в БД, но не применена: значение задаётся через окружение', key=key)
-            cls._overrides_raw.pop(key, None)
+            cls._replace_override(key, None, remove=True)
         else:
-            cls._overrides_raw[key] = raw_value
+            cls._replace_override(key, raw_value)
             cls._apply_to_settings(key, value)
+        cls._invalidate_choice_cache(key)
+        system_settings_sync.publish_after_commit(db, SettingChange(key, raw_value))
 
         if key in {'WEB_API_DEFAULT_TOKEN', 'WEB_API_DEFAULT_TOKEN_NAME'}:
             await cls._sync_default_web_api_token()
@@ -1959,12 +2000,14 @@ class BotConfigurationService:
             raise ReadOnlySettingError(f'Setting {key} is read-only')
 
         await delete_system_setting(db, key)
-        cls._overrides_raw.pop(key, None)
+        cls._replace_override(key, None, remove=True)
         if cls._is_env_override(key):
             logger.info('Настройка сброшена в БД, используется значение из окружения', key=key)
         else:
             original = cls.get_original_value(key)
             cls._apply_to_settings(key, original)
+        cls._invalidate_choice_cache(key)
+        system_settings_sync.publish_after_commit(db, SettingChange(key, None, reset=True))
 
         if key in {'WEB_API_DEFAULT_TOKEN', 'WEB_API_DEFAULT_TOKEN_NAME'}:
             await cls._sync_default_web_api_token()
@@ -1974,6 +2017,37 @@ class BotConfigurationService:
 
             await load_period_prices_from_db(db)
 
+    @classmethod
+    async def apply_remote_change(cls, key: str, raw_value: str | None, *, reset: bool) -> None:
+        """Применяет изменение, сохранённое другим процессом (БД уже обновлена, здесь только память)."""
+        cls.initialize_definitions()
+        if key not in cls._definitions or cls._is_env_override(key):
+            return
+
+        if reset:
+            cls._replace_override(key, None, remove=True)
+            value = cls.get_original_value(key)
+        else:
+            value = cls.deserialize_value(key, raw_value)
+            cls._replace_override(key, raw_value)
+        cls._apply_to_settings(key, value)
+        cls._invalidate_choice_cache(key)
+
+        if key == 'SALES_MODE' and settings.is_tariffs_mode():
+            from app.database.crud.tariff import load_period_prices_from_db
+
+            async with AsyncSessionLocal() as db:
+                await load_period_prices_from_db(db)
+
+    @classmethod
+    def _replace_override(cls, key: str, raw_value: str | None, *, remove: bool = False) -> None:
+        overrides = dict(cls._overrides_raw)
+        if remove:
+            overrides.pop(key, None)
+        else:
+            overrides[key] = raw_value
+        cls._overrides_raw = overrides
+
     @classmethod
     def _apply_to_settings(cls, key: str, value: Any) -> None:
         if cls._is_env_override(key):
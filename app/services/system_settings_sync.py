@@ -0,0 +1,225 @@
+"""Распространение изменений настроек из админки между процессами.
+
+``BotConfigurationService`` держит переопределения в памяти процесса, и раньше
+``set_value``/``reset_value`` меняли только тот процесс, где админ нажал кнопку:
+остальные реплики и воркеры жили со старыми значениями до полного ``reload()``.
+
+Каждое изменение после коммита транзакции публикуется атомарным Lua-скриптом:
+скрипт повышает монотонную версию (``system_settings:version``), записывает в
+хеш ``system_settings:changes`` версию последнего изменения ключа и рассылает
+дельту в канал ``system_settings:delta``. Процессы применяют дельту к своему
+снимку переопределений без чтения БД. Разрыв в номерах версий или периодическая
+сверка (``SYSTEM_SETTINGS_SYNC_INTERVAL``) запускают догоняющую синхронизацию:
+из БД перечитываются только ключи, изменённые после последней применённой версии.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Any
+from uuid import uuid4
+
+import structlog
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.database import AsyncSessionLocal
+from app.database.models import SystemSetting
+from app.utils.cache import cache
+
+
+logger = structlog.get_logger(__name__)
+
+VERSION_KEY = 'system_settings:version'
+CHANGES_KEY = 'system_settings:changes'
+CHANNEL = 'system_settings:delta'
+
+_PENDING_INFO_KEY = 'system_settings_pending_changes'
+
+# INCR, HSET и PUBLISH одним скриптом: версия в хеше и в канале не может разойтись
+# с порядком изменений, даже если два админа сохраняют настройки одновременно.
+_PUBLISH_SCRIPT = """
+local version = redis.call('INCR', KEYS[1])
+redis.call('HSET', KEYS[2], ARGV[1], version)
+local message = cjson.decode(ARGV[3])
+message['version'] = version
+redis.call('PUBLISH', ARGV[2], cjson.encode(message))
+return version
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class SettingChange:
+    key: str
+    raw_value: str | None
+    reset: bool = False
+
+
+class SystemSettingsSync:
+    def __init__(self) -> None:
+        self.origin = uuid4().hex
+        self.applied_version = 0
+        self._apply_lock = asyncio.Lock()
+        self._task: asyncio.Task[None] | None = None
+        self._publish_tasks: set[asyncio.Task[Any]] = set()
+
+    # --- публикация ---
+
+    def publish_after_commit(self, db: Any, change: SettingChange) -> None:
+        """Откладывает публикацию до коммита сессии ``db``; при откате изменение не уходит."""
+        info = getattr(db, 'info', None)
+        if not isinstance(info, dict):
+            self._spawn_publish([change])
+            return
+        info.setdefault(_PENDING_INFO_KEY, []).append(change)
+
+    async def publish(self, change: SettingChange) -> int | None:
+        redis = cache.redis_client if cache.is_connected else None
+        if redis is None:
+            return None
+        message = json.dumps(
+            {'origin': self.origin, 'key': change.key, 'raw_value': change.raw_value, 'reset': change.reset}
+        )
+        try:
+            version = int(await redis.eval(_PUBLISH_SCRIPT, 2, VERSION_KEY, CHANGES_KEY, change.key, CHANNEL, message))
+        except Exception as error:
+            logger.error('Не удалось опубликовать изменение настройки', key=change.key, error=error)
+            return None
+        logger.debug('Изменение настройки опубликовано', key=change.key, version=version)
+        return version
+
+    def _spawn_publish(self, changes: list[SettingChange]) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        for change in changes:
+            task = loop.create_task(self.publish(change))
+            self._publish_tasks.add(task)
+            task.add_done_callback(self._publish_tasks.discard)
+
+    # --- применение ---
+
+    async def handle_message(self, data: bytes | str) -> None:
+        try:
+            message = json.loads(data)
+            version = int(message['version'])
+        except (ValueError, KeyError, TypeError) as error:
+            logger.warning('Некорректное сообщение канала настроек', error=error)
+            return
+
+        async with self._apply_lock:
+            if version <= self.applied_version:
+                return
+            if version > self.applied_version + 1:
+                # Пропущено хотя бы одно сообщение — перечитываем изменённые ключи
+                await self._catch_up_locked()
+                return
+            if message.get('origin') != self.origin:
+                await self._apply(SettingChange(message['key'], message.get('raw_value'), bool(message.get('reset'))))
+            self.applied_version = version
+
+    async def check_version(self) -> bool:
+        """Сверяет версию с Redis и догоняет пропущенные изменения."""
+        redis = cache.redis_client if cache.is_connected else None
+        if redis is None:
+            return False
+        version = int(await redis.get(VERSION_KEY) or 0)
+        if version <= self.applied_version:
+            return False
+        async with self._apply_lock:
+            await self._catch_up_locked()
+        return True
+
+    async def _catch_up_locked(self) -> None:
+        redis = cache.redis_client
+        changed = {
+            (key.decode() if isinstance(key, bytes) else key): int(version)
+            for key, version in (await redis.hgetall(CHANGES_KEY)).items()
+        }
+        stale = sorted(key for key, version in changed.items() if version > self.applied_version)
+        if stale:
+            async with AsyncSessionLocal() as db:
+                rows = (
+                    await db.execute(select(SystemSetting.key, SystemSetting.value).where(SystemSetting.key.in_(stale)))
+                ).all()
+            values = dict(rows)
+            for key in stale:
+                await self._apply(SettingChange(key, values.get(key), reset=key not in values))
+            logger.info('Настройки синхронизированы с другими процессами', keys=stale)
+        self.applied_version = max([self.applied_version, *changed.values()])
+
+    @staticmethod
+    async def _apply(change: SettingChange) -> None:
+        from app.services.system_settings_service import bot_configuration_service
+
+        try:
+            await bot_configuration_service.apply_remote_change(change.key, change.raw_value, reset=change.reset)
+        except Exception as error:
+            logger.error('Не удалось применить изменение настройки', key=change.key, error=error)
+
+    # --- фоновая подписка ---
+
+    async def start(self) -> None:
+        if self.is_running():
+            return
+        if not cache.is_connected:
+            logger.warning('Redis недоступен: изменения настроек не будут приходить из других процессов')
+            return
+        self._task = asyncio.create_task(self._listen(), name='system-settings-sync')
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def _listen(self) -> None:
+        interval = settings.get_system_settings_sync_interval()
+        while True:
+            pubsub = cache.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(CHANNEL)
+                # Подписка уже активна: всё, что изменилось до неё, подтянет догоняющая синхронизация
+                async with self._apply_lock:
+                    await self._catch_up_locked()
+                next_check = time.monotonic() + interval
+                while True:
+                    message = await pubsub.get_message(timeout=max(0.0, next_check - time.monotonic()))
+                    if message is not None:
+                        await self.handle_message(message['data'])
+                    if time.monotonic() >= next_check:
+                        await self.check_version()
+                        next_check = time.monotonic() + interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.error('Ошибка подписки на изменения настроек, переподключение', error=error)
+                await asyncio.sleep(interval)
+            finally:
+                with contextlib.suppress(Exception):
+                    await pubsub.aclose()
+
+
+system_settings_sync = SystemSettingsSync()
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_committed_changes(session: Session) -> None:
+    changes = session.info.pop(_PENDING_INFO_KEY, None)
+    if changes:
+        system_settings_sync._spawn_publish(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_rolled_back_changes(session: Session) -> None:
+    session.info.pop(_PENDING_INFO_KEY, None)
@@ -3,19 +3,15 @@
 Нажатия callback-кнопок в боте пишет ButtonStatsMiddleware; этот модуль
 дописывает вторую половину — мутационные запросы юзера в кабинете — в ту же
 таблицу button_click_logs (button_type='cabinet'), без новых миграций.
-Записи обоих источников отдаёт GET /cabinet/admin/users/{id}/activity.
+Записи обоих источников отдаёт GET /cabinet/admin/users/{id}/activity и
+пишет пачками общий button_click_log_writer.
 """
 
-import asyncio
 import re
 
-import structlog
-
 from app.config import settings
-from app.database.database import AsyncSessionLocal
-
+from app.services.button_click_log_writer import ClickLogEntry, button_click_log_writer
 
-logger = structlog.get_logger(__name__)
 
 CABINET_BUTTON_TYPE = 'cabinet'
 
@@ -43,21 +39,12 @@ def schedule_cabinet_action_log(user_id: int, method: str, path: str) -> None:
     """Fire-and-forget запись действия юзера в кабинете — не задерживает запрос."""
     if not should_log_cabinet_action(method, path):
         return
-    asyncio.create_task(_write_cabinet_action(user_id, method.upper(), path))
-
-
-async def _write_cabinet_action(user_id: int, method: str, path: str) -> None:
-    try:
-        async with AsyncSessionLocal() as db:
-            from app.services.menu_layout.service import MenuLayoutService
-
-            await MenuLayoutService.log_button_click(
-                db,
-                button_id=f'{method} {normalize_cabinet_path(path)}'[:100],
-                user_id=user_id,
-                callback_data=path[:255],
-                button_type=CABINET_BUTTON_TYPE,
-                button_text=None,
-            )
-    except Exception as error:
-        logger.debug('Не удалось записать действие юзера в кабинете', error=str(error))
+    method = method.upper()
+    button_click_log_writer.enqueue(
+        ClickLogEntry(
+            button_id=f'{method} {normalize_cabinet_path(path)}'[:100],
+            user_id=user_id,
+            callback_data=path[:255],
+            button_type=CABINET_BUTTON_TYPE,
+        )
+    )
@@ -10,6 +10,7 @@ from sqlalchemy.orm import selectinload
 
 from app.config import settings
 from app.database.crud.promo_group import get_promo_group_by_id
+from app.database.crud.referral_contest import get_user_contest_ids, rebuild_contest_leaderboards
 from app.database.crud.subscription import get_subscription_by_user_id
 from app.database.crud.transaction import get_user_transactions_count
 from app.database.crud.user import (
@@ -1433,7 +1434,10 @@ class UserService:
                 await db.execute(update(AdminRole).where(AdminRole.created_by == user_id).values(created_by=None))
                 await db.execute(update(UserRole).where(UserRole.assigned_by == user_id).values(assigned_by=None))
                 await db.execute(update(AccessPolicy).where(AccessPolicy.created_by == user_id).values(created_by=None))
+                # События конкурсов удаляются каскадом, счёт участников пересчитываем из оставшихся
+                contest_ids = await get_user_contest_ids(db, [user_id])
                 await db.execute(delete(User).where(User.id == user_id))
+                await rebuild_contest_leaderboards(db, contest_ids, commit=False)
                 await db.commit()
                 logger.info('✅ Пользователь окончательно удален из базы', user_id=user_id)
             except Exception as e:
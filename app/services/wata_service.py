@@ -11,10 +11,14 @@ import aiohttp
 import structlog
 
 from app.config import settings
+from app.utils.http_clients import HttpClientConfig, http_clients
 
 
 logger = structlog.get_logger(__name__)
 
+# Таймаут задаётся на запрос (WATA_REQUEST_TIMEOUT), повторы — в собственном цикле _request
+http_clients.register('wata', HttpClientConfig())
+
 # WATA API rejects expirationDateTime <= now + 10 minutes (exclusive lower bound).
 # 15 minutes provides a 5-minute buffer against clock skew and request latency.
 _MIN_EXPIRATION_MINUTES = 15
@@ -92,16 +96,14 @@ class WataService:
         last_error: WataAPIError | None = None
         for attempt in range(1 + self._MAX_RETRIES):
             try:
-                async with (
-                    aiohttp.ClientSession(timeout=timeout) as session,
-                    session.request(
-                        method,
-                        url,
-                        json=json,
-                        params=params,
-                        headers=self._build_headers(),
-                    ) as response,
-                ):
+                async with http_clients.session('wata').request(
+                    method,
+                    url,
+                    json=json,
+                    params=params,
+                    headers=self._build_headers(),
+                    timeout=timeout,
+                ) as response:
                     response_text = await response.text()
 
                     if response.status == 429:
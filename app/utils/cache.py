@@ -1,5 +1,9 @@
+import fnmatch
 import functools
 import json
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Mapping, Sequence
 from datetime import timedelta
 from typing import Any
 
@@ -8,23 +12,246 @@ import structlog
 from redis.exceptions import NoScriptError
 
 from app.config import settings
+from app.utils.metrics import instrument_redis_client, metrics
+
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson необязателен
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack необязателен
+    msgpack = None
 
 
 logger = structlog.get_logger(__name__)
 
 
+# Конверт значения: байт-маркер NUL (JSON-текст с него начаться не может) и байт
+# кодека, затем полезная нагрузка. Значение без маркера — прежний JSON; так
+# читаются ключи, записанные до появления конверта, и счётчики INCRBY.
+_ENVELOPE_MARKER = b'\x00'
+_CODEC_JSON = 1
+_CODEC_MSGPACK = 2
+
+# Даты и dataclass отдаём в default=str, как stdlib json, чтобы формат значений не зависел от orjson
+_ORJSON_OPTIONS = (
+    (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS) if orjson else 0
+)
+
+_SCAN_COUNT = 500
+_UNLINK_BATCH = 500
+
+
+class JsonSerializer:
+    """JSON через orjson (если установлен) или stdlib; пишет значения без конверта."""
+
+    codec_id = _CODEC_JSON
+    name = 'json'
+
+    def dumps(self, value: Any) -> bytes:
+        if orjson is not None:
+            try:
+                return orjson.dumps(value, default=str, option=_ORJSON_OPTIONS)
+            except TypeError:
+                # orjson не умеет, например, целые больше 64 бит — stdlib умеет
+                pass
+        return json.dumps(value, default=str).encode()
+
+    def loads(self, payload: bytes) -> Any:
+        if orjson is not None:
+            try:
+                return orjson.loads(payload)
+            except ValueError:
+                # NaN/Infinity из stdlib json orjson не читает
+                pass
+        return json.loads(payload)
+
+    def encode(self, value: Any) -> bytes:
+        # Простой JSON совместим с процессами и кодом, не знающими о конверте
+        return self.dumps(value)
+
+
+class MsgpackSerializer:
+    """Компактный msgpack в конверте; нужен пакет msgpack."""
+
+    codec_id = _CODEC_MSGPACK
+    name = 'msgpack'
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=str, use_bin_type=True)
+
+    def loads(self, payload: bytes) -> Any:
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+    def encode(self, value: Any) -> bytes:
+        return _ENVELOPE_MARKER + bytes((self.codec_id,)) + self.dumps(value)
+
+
+_json_serializer = JsonSerializer()
+_CODECS: dict[int, JsonSerializer | MsgpackSerializer] = {_CODEC_JSON: _json_serializer}
+if msgpack is not None:
+    _CODECS[_CODEC_MSGPACK] = MsgpackSerializer()
+
+
+def resolve_serializer(name: str | None = None) -> JsonSerializer | MsgpackSerializer:
+    name = (name or settings.CACHE_SERIALIZER or 'json').strip().lower()
+    if name == 'msgpack':
+        if msgpack is not None:
+            return _CODECS[_CODEC_MSGPACK]
+        logger.warning('CACHE_SERIALIZER=msgpack, но пакет msgpack не установлен — используется JSON')
+    elif name != 'json':
+        logger.warning('Неизвестный CACHE_SERIALIZER, используется JSON', serializer=name)
+    return _json_serializer
+
+
+def decode_value(raw: bytes | str) -> Any:
+    """Декодирует значение любого поддерживаемого формата, включая прежний JSON."""
+    if isinstance(raw, str):
+        raw = raw.encode()
+    if raw[:1] == _ENVELOPE_MARKER:
+        codec = _CODECS.get(raw[1]) if len(raw) > 1 else None
+        if codec is None:
+            raise ValueError(f'Неизвестный кодек значения кеша: {raw[1:2]!r}')
+        return codec.loads(raw[2:])
+    return _json_serializer.loads(raw)
+
+
+class LocalCacheLayer:
+    """Маленький in-process слой поверх Redis для крошечных, горячих и редко меняющихся ключей.
+
+    Хранит сырые байты, а не объекты: каждое чтение декодирует свою копию, и
+    вызывающий код не может испортить кеш, изменив полученный список или словарь.
+    Изменения из других процессов видны не позже чем через TTL записи.
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, raw = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return raw
+
+    def put(self, key: str, raw: bytes, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, raw)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key.decode() if isinstance(key, bytes) else key, None)
+
+    def invalidate_pattern(self, pattern: str) -> None:
+        for key in [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def _expire_seconds(expire: int | timedelta | None) -> int | None:
+    if isinstance(expire, timedelta):
+        return int(expire.total_seconds())
+    return expire
+
+
+class CachePipeline:
+    """Несколько команд кеша за один round-trip; значения (де)сериализуются как в ``CacheService``.
+
+    Без подключения к Redis ``execute`` возвращает значения по умолчанию:
+    ``None`` для ``get``, ``False`` для ``set``, ``0`` для ``delete``.
+    """
+
+    def __init__(self, service: 'CacheService') -> None:
+        self._service = service
+        self._commands: list[tuple[str, tuple, dict, Any]] = []
+
+    def get(self, key: str) -> 'CachePipeline':
+        self._commands.append(('get', (key,), {}, None))
+        return self
+
+    def set(self, key: str, value: Any, expire: int | timedelta = None) -> 'CachePipeline':
+        encoded = self._service.serializer.encode(value)
+        self._commands.append(('set', (key, encoded), {'ex': _expire_seconds(expire)}, False))
+        return self
+
+    def delete(self, *keys: str) -> 'CachePipeline':
+        self._commands.append(('delete', keys, {}, 0))
+        return self
+
+    def expire(self, key: str, seconds: int) -> 'CachePipeline':
+        self._commands.append(('expire', (key, seconds), {}, False))
+        return self
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    async def execute(self) -> list[Any]:
+        commands, self._commands = self._commands, []
+        defaults = [default for _, _, _, default in commands]
+        service = self._service
+        if not commands or not service.is_connected:
+            return defaults
+
+        for name, args, _, _ in commands:
+            if name == 'set':
+                service.local.invalidate(args[0])
+            elif name == 'delete':
+                service.local.invalidate(*args)
+
+        try:
+            pipe = service.redis_client.pipeline(transaction=False)
+            for name, args, kwargs, _ in commands:
+                getattr(pipe, name)(*args, **kwargs)
+            results = await pipe.execute()
+        except Exception as e:
+            logger.error('Ошибка выполнения пакета команд кеша', commands=len(commands), error=e)
+            return defaults
+
+        values = []
+        for (name, args, _, _), result in zip(commands, results, strict=True):
+            if name == 'get':
+                values.append(service._decode(args[0], result))
+            elif name == 'set':
+                values.append(bool(result))
+            else:
+                values.append(result)
+        return values
+
+
 class CacheService:
-    def __init__(self):
+    def __init__(self, serializer: JsonSerializer | MsgpackSerializer | None = None):
         self.redis_client: redis.Redis | None = None
         self._connected = False
+        self.serializer = serializer or resolve_serializer()
+        self.local = LocalCacheLayer()
+
+    @property
+    def is_connected(self) -> bool:
+        """Есть ли подключение к Redis; без него кеш работает как no-op."""
+        return self._connected
 
     async def connect(self):
         try:
             self.redis_client = redis.from_url(settings.REDIS_URL)
+            if metrics.enabled:
+                instrument_redis_client(self.redis_client)
             await self.redis_client.ping()
             self._connected = True
             # Invalidate cached Lua script SHA (new connection = new script cache)
             RateLimitCache._rate_limit_sha = None
+            GcraRateLimitCache._gcra_sha = None
             logger.info('✅ Подключение к Redis кешу установлено')
         except Exception as e:
             logger.warning('⚠️ Не удалось подключиться к Redis', error=e)
@@ -34,6 +261,16 @@ class CacheService:
         if self.redis_client:
             await self.redis_client.close()
             self._connected = False
+        self.local.clear()
+
+    def _decode(self, key: str, raw: bytes | None) -> Any | None:
+        if not raw:
+            return None
+        try:
+            return decode_value(raw)
+        except Exception as e:
+            logger.error('Ошибка декодирования значения кеша', key=key, error=e)
+            return None
 
     async def get(self, key: str) -> Any | None:
         if not self._connected:
@@ -41,24 +278,65 @@ class CacheService:
 
         try:
             value = await self.redis_client.get(key)
-            if value:
-                return json.loads(value)
-            return None
         except Exception as e:
             logger.error('Ошибка получения из кеша', key=key, error=e)
             return None
+        return self._decode(key, value)
 
-    async def set(self, key: str, value: Any, expire: int | timedelta = None) -> bool:
+    async def get_local(self, key: str, ttl: float = 5.0) -> Any | None:
+        """Чтение через in-process слой: Redis опрашивается не чаще раза в ``ttl`` секунд.
+
+        Только для крошечных, горячих и редко меняющихся ключей: другие процессы
+        увидят изменение с задержкой до ``ttl``. Промахи не кешируются.
+        """
         if not self._connected:
-            return False
+            return None
+
+        raw = self.local.get(key)
+        if raw is None:
+            try:
+                raw = await self.redis_client.get(key)
+            except Exception as e:
+                logger.error('Ошибка получения из кеша', key=key, error=e)
+                return None
+            if raw:
+                self.local.put(key, raw, ttl)
+        return self._decode(key, raw)
+
+    async def mget(self, keys: Sequence[str]) -> list[Any | None]:
+        """Значения нескольких ключей одним MGET; отсутствующие — ``None``."""
+        if not keys:
+            return []
+        if not self._connected:
+            return [None] * len(keys)
 
         try:
-            serialized_value = json.dumps(value, default=str)
+            raw_values = await self.redis_client.mget(list(keys))
+        except Exception as e:
+            logger.error('Ошибка пакетного получения из кеша', keys=len(keys), error=e)
+            return [None] * len(keys)
+        return [self._decode(key, raw) for key, raw in zip(keys, raw_values, strict=True)]
+
+    async def mset(self, mapping: Mapping[str, Any], expire: int | timedelta = None) -> bool:
+        """Записывает несколько ключей с общим TTL за один round-trip."""
+        if not mapping:
+            return True
+        pipe = self.pipeline()
+        for key, value in mapping.items():
+            pipe.set(key, value, expire)
+        results = await pipe.execute()
+        return all(results)
 
-            if isinstance(expire, timedelta):
-                expire = int(expire.total_seconds())
+    def pipeline(self) -> CachePipeline:
+        return CachePipeline(self)
 
-            await self.redis_client.set(key, serialized_value, ex=expire)
+    async def set(self, key: str, value: Any, expire: int | timedelta = None) -> bool:
+        if not self._connected:
+            return False
+
+        self.local.invalidate(key)
+        try:
+            await self.redis_client.set(key, self.serializer.encode(value), ex=_expire_seconds(expire))
             return True
         except Exception as e:
             logger.error('Ошибка записи в кеш', key=key, error=e)
@@ -74,17 +352,16 @@ class CacheService:
             return False
 
         try:
-            serialized_value = json.dumps(value, default=str)
-
-            if isinstance(expire, timedelta):
-                expire = int(expire.total_seconds())
-
             # SET с NX возвращает True если установлено, None если ключ существует
-            result = await self.redis_client.set(key, serialized_value, ex=expire, nx=True)
-            return result is True
+            result = await self.redis_client.set(
+                key, self.serializer.encode(value), ex=_expire_seconds(expire), nx=True
+            )
         except Exception as e:
             logger.error('Ошибка setnx в кеш', key=key, error=e)
             return False
+        if result is True:
+            self.local.invalidate(key)
+        return result is True
 
     async def getdel(self, key: str) -> Any | None:
         """Atomically get and delete a key (Redis GETDEL).
@@ -94,19 +371,19 @@ class CacheService:
         if not self._connected:
             return None
 
+        self.local.invalidate(key)
         try:
             value = await self.redis_client.getdel(key)
-            if value:
-                return json.loads(value)
-            return None
         except Exception as e:
             logger.error('Ошибка атомарного getdel из кеша', key=key, error=e)
             return None
+        return self._decode(key, value)
 
     async def delete(self, key: str) -> bool:
         if not self._connected:
             return False
 
+        self.local.invalidate(key)
         try:
             deleted = await self.redis_client.delete(key)
             return deleted > 0
@@ -114,20 +391,33 @@ class CacheService:
             logger.error('Ошибка удаления из кеша', key=key, error=e)
             return False
 
+    async def iter_keys(self, pattern: str = '*', *, count: int = _SCAN_COUNT) -> AsyncIterator[str]:
+        """Ключи по шаблону через SCAN: Redis не блокируется на время обхода всего keyspace.
+
+        SCAN может вернуть один ключ дважды и не гарантирует ключи, созданные во время обхода.
+        """
+        async for key in self.redis_client.scan_iter(match=pattern, count=count):
+            yield key.decode() if isinstance(key, bytes) else key
+
     async def delete_pattern(self, pattern: str) -> int:
         if not self._connected:
             return 0
 
+        self.local.invalidate_pattern(pattern)
+        deleted = 0
+        batch: list[str] = []
         try:
-            keys = await self.redis_client.keys(pattern)
-            if not keys:
-                return 0
-
-            deleted = await self.redis_client.delete(*keys)
-            return int(deleted)
+            async for key in self.iter_keys(pattern):
+                batch.append(key)
+                if len(batch) >= _UNLINK_BATCH:
+                    deleted += int(await self.redis_client.unlink(*batch))
+                    batch.clear()
+            if batch:
+                deleted += int(await self.redis_client.unlink(*batch))
+            return deleted
         except Exception as e:
             logger.error('Ошибка удаления ключей по шаблону', pattern=pattern, error=e)
-            return 0
+            return deleted
 
     async def exists(self, key: str) -> bool:
         if not self._connected:
@@ -154,8 +444,7 @@ class CacheService:
             return []
 
         try:
-            keys = await self.redis_client.keys(pattern)
-            return [key.decode() if isinstance(key, bytes) else key for key in keys]
+            return list(dict.fromkeys([key async for key in self.iter_keys(pattern)]))
         except Exception as e:
             logger.error('Ошибка получения ключей по паттерну', pattern=pattern, error=e)
             return []
@@ -164,6 +453,7 @@ class CacheService:
         if not self._connected:
             return False
 
+        self.local.clear()
         try:
             await self.redis_client.flushall()
             logger.info('🗑️ Кеш полностью очищен')
@@ -215,8 +505,7 @@ class CacheService:
             return False
 
         try:
-            serialized = json.dumps(value, default=str)
-            await self.redis_client.lpush(key, serialized)
+            await self.redis_client.lpush(key, self.serializer.encode(value))
             return True
         except Exception as e:
             logger.error('Ошибка добавления в очередь', key=key, error=e)
@@ -229,12 +518,10 @@ class CacheService:
 
         try:
             value = await self.redis_client.rpop(key)
-            if value:
-                return json.loads(value)
-            return None
         except Exception as e:
             logger.error('Ошибка извлечения из очереди', key=key, error=e)
             return None
+        return self._decode(key, value)
 
     async def llen(self, key: str) -> int:
         """Получить длину списка (очереди)."""
@@ -254,7 +541,7 @@ class CacheService:
 
         try:
             items = await self.redis_client.lrange(key, start, end)
-            return [json.loads(item) for item in items]
+            return [decode_value(item) for item in items]
         except Exception as e:
             logger.error('Ошибка чтения очереди', key=key, error=e)
             return []
@@ -366,7 +653,7 @@ return c
         When fail_closed=True, blocks requests when Redis is unavailable
         (use for security-critical unauthenticated endpoints).
         """
-        if not cache._connected or cache.redis_client is None:
+        if not cache.is_connected or cache.redis_client is None:
             logger.warning('Rate limiter unavailable: Redis disconnected', key=key)
             return fail_closed
 
@@ -423,6 +710,84 @@ return c
         return await RateLimitCache._atomic_rate_check(key, limit, window, fail_closed=fail_closed)
 
 
+class GcraRateLimitCache:
+    """Generic cell rate algorithm: several limits checked in one EVALSHA.
+
+    Each key stores the theoretical arrival time (TAT) in microseconds of the
+    Redis server clock, so all replicas share one time base.  A request is
+    admitted only if every limit admits it; otherwise nothing is updated and
+    the largest retry-after is returned.
+    """
+
+    # KEYS[i] — TAT key of limit i; ARGV[3*i-2..3*i] — interval_us, tolerance_us, cost.
+    # Returns {allowed (1/0), retry_after_us, index of the rejecting limit (0 = none)}.
+    _GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+local new_tats = {}
+local retry_after = 0
+local rejected = 0
+for i = 1, #KEYS do
+    local interval = tonumber(ARGV[3 * i - 2])
+    local tolerance = tonumber(ARGV[3 * i - 1])
+    local cost = tonumber(ARGV[3 * i])
+    local tat = tonumber(redis.call('GET', KEYS[i]) or now)
+    if tat < now then tat = now end
+    -- admission is checked for one cell; cost only pushes the TAT further, so
+    -- a weighted request never needs more burst than the limit has
+    local allow_at = tat - tolerance
+    local new_tat = math.floor(tat + interval * cost)
+    if allow_at > now then
+        if allow_at - now > retry_after then
+            retry_after = allow_at - now
+            rejected = i
+        end
+    end
+    new_tats[i] = new_tat
+end
+if rejected > 0 then
+    return {0, retry_after, rejected}
+end
+for i = 1, #KEYS do
+    -- string.format: tostring() would round a 16-digit timestamp to 14 significant digits
+    redis.call('SET', KEYS[i], string.format('%d', new_tats[i]), 'PX', math.ceil((new_tats[i] - now) / 1000) + 1)
+end
+return {1, 0, 0}
+"""
+    _gcra_sha: str | None = None
+
+    @staticmethod
+    async def check(limits: list[tuple[str, float, float, float]]) -> tuple[bool, float, int] | None:
+        """Checks ``(key, interval_sec, tolerance_sec, cost)`` limits atomically.
+
+        Returns ``(allowed, retry_after_sec, rejected_index)`` where the index is
+        0-based into ``limits`` (-1 when allowed), or None when Redis is not
+        available and the caller must decide locally.
+        """
+        if not limits or not cache.is_connected or cache.redis_client is None:
+            return None
+
+        keys = [key for key, _, _, _ in limits]
+        args: list[int | float] = []
+        for _, interval, tolerance, cost in limits:
+            args.extend((int(interval * 1_000_000), int(tolerance * 1_000_000), cost))
+
+        try:
+            if GcraRateLimitCache._gcra_sha is None:
+                GcraRateLimitCache._gcra_sha = await cache.redis_client.script_load(GcraRateLimitCache._GCRA_SCRIPT)
+            try:
+                result = await cache.redis_client.evalsha(GcraRateLimitCache._gcra_sha, len(keys), *keys, *args)
+            except NoScriptError:
+                GcraRateLimitCache._gcra_sha = await cache.redis_client.script_load(GcraRateLimitCache._GCRA_SCRIPT)
+                result = await cache.redis_client.evalsha(GcraRateLimitCache._gcra_sha, len(keys), *keys, *args)
+        except Exception:
+            logger.warning('GCRA rate limiter error', keys=keys, exc_info=True)
+            return None
+
+        allowed, retry_after_us, rejected = (int(value) for value in result)
+        return bool(allowed), retry_after_us / 1_000_000, rejected - 1
+
+
 class TokenReplayCache:
     """Prevents OIDC id_token replay by storing token hashes with TTL."""
 
@@ -434,7 +799,7 @@ class TokenReplayCache:
         If Redis is unavailable, allows the request (fail-open,
         since rate limiting already provides protection).
         """
-        if not cache._connected or cache.redis_client is None:
+        if not cache.is_connected or cache.redis_client is None:
             return False
         try:
             key = cache_key('oidc_token', token_hash)
@@ -454,6 +819,7 @@ class ChannelSubCache:
 
     SUB_TTL = 600  # 10 min -- individual user subscription status
     CHANNELS_TTL = 60  # 1 min -- list of required channels
+    LOCAL_TTL = 5  # 5 s -- in-process copy of the required channels list
 
     @staticmethod
     async def get_sub_status(telegram_id: int, channel_id: str) -> bool | None:
@@ -469,35 +835,13 @@ class ChannelSubCache:
         """Batch-fetch subscription statuses via Redis MGET (single round-trip).
 
         Returns {channel_id: True/False/None} where None = cache miss.
-        Falls back to sequential gets if Redis pipeline is unavailable.
         """
         if not channel_ids:
             return {}
 
-        if not cache._connected or cache.redis_client is None:
-            return dict.fromkeys(channel_ids, None)
-
         keys = [cache_key('channel_sub', telegram_id, ch_id) for ch_id in channel_ids]
-        try:
-            raw_values = await cache.redis_client.mget(keys)
-        except Exception as e:
-            logger.warning('Redis MGET failed, falling back to sequential', error=str(e))
-            result: dict[str, bool | None] = {}
-            for ch_id in channel_ids:
-                result[ch_id] = await ChannelSubCache.get_sub_status(telegram_id, ch_id)
-            return result
-
-        statuses: dict[str, bool | None] = {}
-        for ch_id, raw in zip(channel_ids, raw_values, strict=True):
-            if raw is None:
-                statuses[ch_id] = None
-            else:
-                try:
-                    parsed = json.loads(raw)
-                    statuses[ch_id] = parsed == 1
-                except (ValueError, TypeError):
-                    statuses[ch_id] = None
-        return statuses
+        values = await cache.mget(keys)
+        return {ch_id: None if value is None else value == 1 for ch_id, value in zip(channel_ids, values, strict=True)}
 
     @staticmethod
     async def set_sub_status(telegram_id: int, channel_id: str, is_member: bool) -> None:
@@ -513,10 +857,10 @@ class ChannelSubCache:
     async def invalidate_user_channels(telegram_id: int, channel_ids: list[str]) -> None:
         """Invalidate specific channel keys for a user using single Redis DELETE.
 
-        Uses multi-key DELETE (O(K)) instead of delete_pattern() which uses KEYS (O(N)).
-        At 100k users * 5 channels = 500k keys, KEYS would block Redis for seconds.
+        Uses multi-key DELETE (O(K)) instead of delete_pattern(), which SCANs the whole
+        keyspace (O(N)): at 100k users * 5 channels = 500k keys that is far more work.
         """
-        if not channel_ids or not cache._connected or not cache.redis_client:
+        if not channel_ids or not cache.is_connected or not cache.redis_client:
             return
         keys = [cache_key('channel_sub', telegram_id, ch_id) for ch_id in channel_ids]
         try:
@@ -526,8 +870,12 @@ class ChannelSubCache:
 
     @staticmethod
     async def get_required_channels() -> list[dict] | None:
-        """Get the list of required channels from cache."""
-        return await cache.get('required_channels:active')
+        """Get the list of required channels from cache.
+
+        Читается на каждую проверку подписки, меняется только из админки — поэтому
+        через in-process слой. Другие процессы увидят изменение не позже LOCAL_TTL.
+        """
+        return await cache.get_local('required_channels:active', ChannelSubCache.LOCAL_TTL)
 
     @staticmethod
     async def set_required_channels(channels: list[dict]) -> None:
@@ -0,0 +1,263 @@
+"""Индексированная маршрутизация callback-запросов.
+
+aiogram проверяет хендлеры наблюдателя по очереди, пока фильтры одного из них не
+пройдут: на корневом диспетчере зарегистрированы сотни callback-хендлеров, и
+каждое нажатие платит за сотни проверок ``F.data``. Здесь из хендлеров
+извлекаются фильтры ``F.data == ...``, ``F.data.in_(...)`` и
+``F.data.startswith(...)`` и компилируются в словарь точных значений и
+префиксное дерево. Нажатие сразу получает несколько кандидатов (плюс
+неиндексируемые хендлеры) в исходном порядке регистрации; остальные фильтры —
+состояние FSM, права и т.п. — проверяются у кандидатов как обычно, поэтому
+первым срабатывает тот же хендлер, что и при линейном проходе.
+"""
+
+from __future__ import annotations
+
+import operator
+from collections.abc import Collection, Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+import structlog
+from aiogram import Dispatcher
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.types import TelegramObject
+from magic_filter import MagicFilter
+from magic_filter.operations import (
+    CallOperation,
+    CombinationOperation,
+    ComparatorOperation,
+    FunctionOperation,
+    GetAttributeOperation,
+)
+from magic_filter.util import and_op, in_op, or_op
+
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass(slots=True)
+class DataKeys:
+    """Необходимое условие на ``callback.data``: точное значение из ``exact`` или префикс из ``prefixes``."""
+
+    exact: tuple[str, ...] = ()
+    prefixes: tuple[str, ...] = ()
+
+
+def _strings(value: Any) -> tuple[str, ...] | None:
+    if isinstance(value, str):
+        return (value,)
+    if isinstance(value, Collection) and value and all(isinstance(item, str) for item in value):
+        return tuple(value)
+    return None
+
+
+def _merge_any(left: DataKeys | None, right: DataKeys | None) -> DataKeys | None:
+    """Условие для ``left | right``: подходит любое из двух."""
+    if left is None or right is None:
+        return None
+    return DataKeys(exact=left.exact + right.exact, prefixes=left.prefixes + right.prefixes)
+
+
+def _prefer(left: DataKeys | None, right: DataKeys | None) -> DataKeys | None:
+    """Условие для ``left & right``: хватает любого, точное совпадение предпочтительнее."""
+    if left is None or right is None:
+        return left or right
+    if right.exact and not left.exact:
+        return right
+    return left
+
+
+def _operations_data_keys(operations: tuple[Any, ...]) -> DataKeys | None:
+    match operations:
+        case (*left, CombinationOperation(combinator=combinator, right=MagicFilter() as right)):
+            left_keys = _operations_data_keys(tuple(left))
+            right_keys = _operations_data_keys(right._operations)
+            if combinator is and_op:
+                return _prefer(left_keys, right_keys)
+            if combinator is or_op:
+                return _merge_any(left_keys, right_keys)
+            return None
+
+    if not operations or not isinstance(operations[0], GetAttributeOperation) or operations[0].name != 'data':
+        return None
+
+    match operations[1:]:
+        case (ComparatorOperation(comparator=operator.eq, right=str() as value),):
+            return DataKeys(exact=(value,))
+        case (FunctionOperation(function=function, args=(values,)),) if function is in_op:
+            # in_('abc') — проверка подстроки, а не набора значений
+            exact = None if isinstance(values, str) else _strings(values)
+            return DataKeys(exact=exact) if exact else None
+        case (GetAttributeOperation(name='startswith'), CallOperation(args=(prefix,), kwargs=kwargs)) if not kwargs:
+            prefixes = _strings(prefix)
+            return DataKeys(prefixes=prefixes) if prefixes else None
+    return None
+
+
+def extract_data_keys(handler: HandlerObject) -> DataKeys | None:
+    """Возвращает индексируемое условие хендлера или ``None``, если его нельзя вывести из фильтров.
+
+    Фильтры хендлера (и части ``a & b``) объединяются по И, поэтому достаточно
+    одного подходящего, точное совпадение предпочтительнее префикса; ``a | b``
+    индексируется, только если индексируемы обе части.
+    """
+    best: DataKeys | None = None
+    for filter_object in handler.filters or ():
+        if filter_object.magic is None:
+            continue
+        best = _prefer(best, _operations_data_keys(filter_object.magic._operations))
+    return best
+
+
+class _TrieNode:
+    __slots__ = ('children', 'handlers')
+
+    def __init__(self) -> None:
+        self.children: dict[str, _TrieNode] = {}
+        self.handlers: list[int] = []
+
+
+@dataclass(slots=True)
+class CallbackIndexReport:
+    total: int
+    indexed: int
+    unindexed: list[str] = field(default_factory=list)
+
+
+def handler_name(handler: HandlerObject) -> str:
+    callback = handler.callback
+    return f'{getattr(callback, "__module__", "?")}.{getattr(callback, "__qualname__", repr(callback))}'
+
+
+class CallbackIndex:
+    """Словарь точных значений + префиксное дерево над списком хендлеров."""
+
+    def __init__(self, handlers: Iterable[HandlerObject]) -> None:
+        self.handlers = list(handlers)
+        self._exact: dict[str, list[int]] = {}
+        self._root = _TrieNode()
+        self._unindexed: list[int] = []
+
+        for position, handler in enumerate(self.handlers):
+            keys = extract_data_keys(handler)
+            if keys is None:
+                self._unindexed.append(position)
+                continue
+            for value in keys.exact:
+                self._exact.setdefault(value, []).append(position)
+            for prefix in keys.prefixes:
+                node = self._root
+                for char in prefix:
+                    node = node.children.setdefault(char, _TrieNode())
+                node.handlers.append(position)
+
+    def candidates(self, data: str | None) -> list[HandlerObject]:
+        """Хендлеры, чьи фильтры могут пройти для ``data``, в порядке регистрации."""
+        positions = list(self._unindexed)
+        if data is not None:
+            positions.extend(self._exact.get(data, ()))
+            node = self._root
+            positions.extend(node.handlers)
+            for char in data:
+                node = node.children.get(char)
+                if node is None:
+                    break
+                positions.extend(node.handlers)
+        if len(positions) > 1:
+            # Хендлер с несколькими префиксами может попасть в список дважды
+            positions = sorted(set(positions))
+        return [self.handlers[position] for position in positions]
+
+    def report(self) -> CallbackIndexReport:
+        return CallbackIndexReport(
+            total=len(self.handlers),
+            indexed=len(self.handlers) - len(self._unindexed),
+            unindexed=[handler_name(self.handlers[position]) for position in self._unindexed],
+        )
+
+    def keys(self) -> tuple[list[str], list[str]]:
+        """Точные значения и префиксы индекса (для бенчмарка и отладки)."""
+        prefixes: list[str] = []
+        stack: list[tuple[str, _TrieNode]] = [('', self._root)]
+        while stack:
+            prefix, node = stack.pop()
+            if node.handlers:
+                prefixes.append(prefix)
+            stack.extend((prefix + char, child) for char, child in node.children.items())
+        return list(self._exact), sorted(prefixes)
+
+
+class IndexedCallbackQueryObserver(TelegramEventObserver):
+    """Наблюдатель ``callback_query``, выбирающий кандидатов по индексу ``callback.data``.
+
+    Индекс строится при первом событии (или явно через ``compile``) и
+    сбрасывается при регистрации нового хендлера.
+    """
+
+    def __init__(self, router: Any, event_name: str = 'callback_query') -> None:
+        super().__init__(router=router, event_name=event_name)
+        self._index: CallbackIndex | None = None
+
+    def register(self, *args: Any, **kwargs: Any) -> Any:
+        self._index = None
+        return super().register(*args, **kwargs)
+
+    def compile(self) -> CallbackIndex:
+        if self._index is None or len(self._index.handlers) != len(self.handlers):
+            self._index = CallbackIndex(self.handlers)
+        return self._index
+
+    async def trigger(self, event: TelegramObject, **kwargs: Any) -> Any:
+        for handler in self.compile().candidates(getattr(event, 'data', None)):
+            kwargs['handler'] = handler
+            result, data = await handler.check(event, **kwargs)
+            if result:
+                kwargs.update(data)
+                try:
+                    wrapped_inner = self.outer_middleware.wrap_middlewares(
+                        self._resolve_middlewares(),
+                        handler.call,
+                    )
+                    return await wrapped_inner(event, kwargs)
+                except SkipHandler:
+                    continue
+
+        return UNHANDLED
+
+
+def install_callback_index(dp: Dispatcher) -> IndexedCallbackQueryObserver:
+    """Подменяет наблюдатель ``callback_query`` диспетчера индексированным.
+
+    Уже зарегистрированные хендлеры, фильтры и middleware переносятся.
+    """
+    current = dp.callback_query
+    if isinstance(current, IndexedCallbackQueryObserver):
+        return current
+
+    observer = IndexedCallbackQueryObserver(router=dp)
+    observer.handlers.extend(current.handlers)
+    observer._handler.filters = current._handler.filters
+    for middleware in current.middleware:
+        observer.middleware.register(middleware)
+    for middleware in current.outer_middleware:
+        observer.outer_middleware.register(middleware)
+
+    dp.callback_query = observer
+    dp.observers['callback_query'] = observer
+    return observer
+
+
+def log_callback_index_report(observer: IndexedCallbackQueryObserver) -> CallbackIndexReport:
+    report = observer.compile().report()
+    logger.info(
+        '🗂️ Индекс callback-хендлеров собран',
+        total=report.total,
+        indexed=report.indexed,
+        unindexed=len(report.unindexed),
+    )
+    if report.unindexed:
+        logger.info('Callback-хендлеры без индекса (линейная проверка)', handlers=report.unindexed)
+    return report
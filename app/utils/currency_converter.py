@@ -1,11 +1,14 @@
 from datetime import UTC, datetime
 
-import aiohttp
 import structlog
 
+from app.utils.http_clients import HttpClientConfig, http_clients
+
 
 logger = structlog.get_logger(__name__)
 
+http_clients.register('currency_rates', HttpClientConfig(timeout=10))
+
 
 class CurrencyConverter:
     def __init__(self):
@@ -64,12 +67,13 @@ class CurrencyConverter:
     async def _fetch_from_cbr(self) -> float | None:
         """Получает курс с сайта ЦБ РФ"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                async with session.get('https://www.cbr-xml-daily.ru/daily_json.js') as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        usd_rate = data['Valute']['USD']['Value']
-                        return float(usd_rate)
+            async with http_clients.session('currency_rates').get(
+                'https://www.cbr-xml-daily.ru/daily_json.js'
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    usd_rate = data['Valute']['USD']['Value']
+                    return float(usd_rate)
         except Exception as e:
             logger.debug('Ошибка получения курса ЦБ', error=e)
             return None
@@ -77,12 +81,13 @@ class CurrencyConverter:
     async def _fetch_from_exchangerate_api(self) -> float | None:
         """Получает курс с exchangerate-api.com"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                async with session.get('https://api.exchangerate-api.com/v4/latest/USD') as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        rub_rate = data['rates']['RUB']
-                        return float(rub_rate)
+            async with http_clients.session('currency_rates').get(
+                'https://api.exchangerate-api.com/v4/latest/USD'
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    rub_rate = data['rates']['RUB']
+                    return float(rub_rate)
         except Exception as e:
             logger.debug('Ошибка получения курса exchangerate-api', error=e)
             return None
@@ -90,19 +95,18 @@ class CurrencyConverter:
     async def _fetch_from_fixer(self) -> float | None:
         """Получает курс с fixer.io (бесплатный план)"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                # Используем бесплатный endpoint (EUR base)
-                async with session.get(
-                    'https://api.fixer.io/latest?access_key=YOUR_API_KEY&symbols=USD,RUB'
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get('success'):
-                            # Конвертируем EUR -> USD -> RUB
-                            usd_eur = data['rates']['USD']
-                            rub_eur = data['rates']['RUB']
-                            usd_rub = rub_eur / usd_eur
-                            return float(usd_rub)
+            # Используем бесплатный endpoint (EUR base)
+            async with http_clients.session('currency_rates').get(
+                'https://api.fixer.io/latest?access_key=YOUR_API_KEY&symbols=USD,RUB'
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    if data.get('success'):
+                        # Конвертируем EUR -> USD -> RUB
+                        usd_eur = data['rates']['USD']
+                        rub_eur = data['rates']['RUB']
+                        usd_rub = rub_eur / usd_eur
+                        return float(usd_rub)
         except Exception as e:
             logger.debug('Ошибка получения курса fixer', error=e)
             return None
@@ -0,0 +1,369 @@
+"""Общий реестр HTTP-клиентов для платёжных провайдеров и внешних интеграций.
+
+Провайдеры раньше создавали ``aiohttp.ClientSession``/``httpx.AsyncClient`` на
+каждый вызов и каждый раз платили за DNS, TCP и TLS. Здесь у каждого апстрима
+один именованный клиент на процесс со своими лимитами соединений, keep-alive,
+DNS-кэшем, таймаутами и политикой повторов. Модуль провайдера регистрирует
+конфигурацию при импорте (``http_clients.register``), клиент создаётся при
+первом запросе внутри работающего event loop, а при остановке приложения все
+клиенты закрываются через ``http_clients.close``.
+
+Для офлайн-тестов ``http_clients.test_transport(handler)`` подменяет сеть у всех
+клиентов: ``handler`` получает :class:`HttpTestRequest` и возвращает
+:class:`HttpTestResponse` (или бросает исключение — таймаут, обрыв соединения).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from dataclasses import dataclass, field
+from typing import Any, Self
+
+import aiohttp
+import httpx
+import structlog
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+
+logger = structlog.get_logger(__name__)
+
+_IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+
+@dataclass(frozen=True, slots=True)
+class HttpClientConfig:
+    """Параметры клиента одного апстрима.
+
+    ``retries`` — число повторов: ошибка установки соединения повторяется для
+    любого метода (запрос ещё не отправлен), таймаут и ``retry_statuses`` —
+    только для идемпотентных методов. Провайдеры со своим циклом повторов
+    регистрируются с ``retries=0``.
+    """
+
+    timeout: float = 30.0
+    connect_timeout: float = 10.0
+    sock_read_timeout: float | None = None
+    limit: int = 100
+    limit_per_host: int = 20
+    keepalive_timeout: float = 30.0
+    dns_cache_ttl: int = 300
+    retries: int = 0
+    retry_backoff: float = 0.5
+    retry_statuses: frozenset[int] = frozenset({502, 503, 504})
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class HttpTestRequest:
+    client: str
+    method: str
+    url: str
+    headers: dict[str, str] = field(default_factory=dict)
+    params: dict[str, Any] | None = None
+    json: Any = None
+    data: Any = None
+
+
+@dataclass(slots=True)
+class HttpTestResponse:
+    status: int = 200
+    json: Any = None
+    text: str | None = None
+    headers: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def body(self) -> bytes:
+        if self.text is not None:
+            return self.text.encode()
+        if self.json is not None:
+            return json.dumps(self.json).encode()
+        return b''
+
+
+TestHandler = Callable[[HttpTestRequest], Awaitable[HttpTestResponse]]
+
+
+class _TestClientResponse:
+    """Ответ тестового транспорта с интерфейсом ``aiohttp.ClientResponse``, который используют провайдеры."""
+
+    def __init__(self, method: str, url: str, response: HttpTestResponse) -> None:
+        self.method = method
+        self.url = URL(url)
+        self.status = response.status
+        self.reason = 'OK' if response.status < 400 else 'Error'
+        self.headers = CIMultiDictProxy(CIMultiDict(response.headers))
+        self._body = response.body
+        self.content_type = self.headers.get('Content-Type', 'application/json').split(';')[0]
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: str | None = None) -> str:
+        return self._body.decode(encoding or 'utf-8')
+
+    async def json(self, *, content_type: str | None = 'application/json', loads: Callable = json.loads) -> Any:
+        return loads(self._body.decode()) if self._body else None
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(
+                request_info=None,  # type: ignore[arg-type]
+                history=(),
+                status=self.status,
+                message=self.reason,
+                headers=self.headers,
+            )
+
+    def release(self) -> None:
+        return None
+
+    def close(self) -> None:
+        return None
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        return None
+
+
+class _TestRequestContext:
+    """Как ``aiohttp`` ``_RequestContextManager``: и ``await``, и ``async with``."""
+
+    def __init__(self, coro: Awaitable[_TestClientResponse]) -> None:
+        self._coro = coro
+        self._response: _TestClientResponse | None = None
+
+    def __await__(self):
+        return self._coro.__await__()
+
+    async def __aenter__(self) -> _TestClientResponse:
+        self._response = await self._coro
+        return self._response
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        return None
+
+
+class _TestClientSession:
+    """Подмена ``aiohttp.ClientSession``: запросы уходят в обработчик теста."""
+
+    def __init__(self, name: str, handler: TestHandler, config: HttpClientConfig) -> None:
+        self._name = name
+        self._handler = handler
+        self._config = config
+        self.closed = False
+
+    async def _send(self, method: str, url: Any, **kwargs: Any) -> _TestClientResponse:
+        request = HttpTestRequest(
+            client=self._name,
+            method=method.upper(),
+            url=str(url),
+            headers={**self._config.headers, **(kwargs.get('headers') or {})},
+            params=kwargs.get('params'),
+            json=kwargs.get('json'),
+            data=kwargs.get('data'),
+        )
+        return _TestClientResponse(request.method, request.url, await self._handler(request))
+
+    def request(self, method: str, url: Any, **kwargs: Any) -> _TestRequestContext:
+        return _TestRequestContext(self._send(method, url, **kwargs))
+
+    def get(self, url: Any, **kwargs: Any) -> _TestRequestContext:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: Any, **kwargs: Any) -> _TestRequestContext:
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url: Any, **kwargs: Any) -> _TestRequestContext:
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url: Any, **kwargs: Any) -> _TestRequestContext:
+        return self.request('DELETE', url, **kwargs)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def _httpx_test_transport(name: str, handler: TestHandler) -> httpx.MockTransport:
+    async def handle(request: httpx.Request) -> httpx.Response:
+        content = request.content
+        payload = None
+        if content and request.headers.get('content-type', '').startswith('application/json'):
+            payload = json.loads(content)
+        response = await handler(
+            HttpTestRequest(
+                client=name,
+                method=request.method,
+                url=str(request.url.copy_with(query=None)),
+                headers=dict(request.headers),
+                params=dict(request.url.params) or None,
+                json=payload,
+                data=None if payload is not None else (content or None),
+            )
+        )
+        return httpx.Response(response.status, content=response.body, headers=response.headers)
+
+    return httpx.MockTransport(handle)
+
+
+class HttpClientRegistry:
+    def __init__(self) -> None:
+        self._configs: dict[str, HttpClientConfig] = {}
+        self._sessions: dict[str, aiohttp.ClientSession | _TestClientSession] = {}
+        self._httpx_clients: dict[tuple[str, str | None], httpx.AsyncClient] = {}
+        self._test_handler: TestHandler | None = None
+
+    def register(self, name: str, config: HttpClientConfig | None = None) -> None:
+        self._configs[name] = config or HttpClientConfig()
+
+    def config(self, name: str) -> HttpClientConfig:
+        try:
+            return self._configs[name]
+        except KeyError:
+            raise KeyError(f'HTTP-клиент {name!r} не зарегистрирован') from None
+
+    def session(self, name: str) -> aiohttp.ClientSession:
+        """aiohttp-сессия апстрима ``name``; создаётся при первом вызове в текущем event loop."""
+        session = self._sessions.get(name)
+        if session is not None and not session.closed:
+            if not self._bound_to_other_loop(session):
+                return session  # type: ignore[return-value]
+            self._close_stale(session)
+
+        config = self.config(name)
+        if self._test_handler is not None:
+            session = _TestClientSession(name, self._test_handler, config)
+        else:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=config.limit,
+                    limit_per_host=config.limit_per_host,
+                    keepalive_timeout=config.keepalive_timeout,
+                    ttl_dns_cache=config.dns_cache_ttl,
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    total=config.timeout,
+                    connect=config.connect_timeout,
+                    sock_read=config.sock_read_timeout,
+                ),
+                headers=config.headers or None,
+            )
+        self._sessions[name] = session
+        return session  # type: ignore[return-value]
+
+    def httpx_client(self, name: str, *, proxy: str | None = None) -> httpx.AsyncClient:
+        """httpx-клиент апстрима ``name`` (отдельный пул на каждый ``proxy``)."""
+        key = (name, proxy)
+        client = self._httpx_clients.get(key)
+        if client is not None and not client.is_closed:
+            return client
+
+        config = self.config(name)
+        timeout = httpx.Timeout(config.timeout, connect=config.connect_timeout, read=config.sock_read_timeout)
+        if self._test_handler is not None:
+            client = httpx.AsyncClient(
+                transport=_httpx_test_transport(name, self._test_handler),
+                timeout=timeout,
+                headers=config.headers,
+            )
+        else:
+            # Лимиты и прокси задаются на транспорте: переданный transport заменяет собственный пул клиента
+            transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=config.limit,
+                    max_keepalive_connections=config.limit_per_host,
+                    keepalive_expiry=config.keepalive_timeout,
+                ),
+                retries=config.retries,
+                proxy=proxy,
+            )
+            client = httpx.AsyncClient(timeout=timeout, transport=transport, headers=config.headers)
+        self._httpx_clients[key] = client
+        return client
+
+    @contextlib.asynccontextmanager
+    async def request(self, name: str, method: str, url: str, **kwargs: Any) -> AsyncIterator[aiohttp.ClientResponse]:
+        """``session.request`` с политикой повторов клиента ``name``."""
+        config = self.config(name)
+        idempotent = method.upper() in _IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            attempt += 1
+            can_retry = attempt <= config.retries
+            try:
+                response = await self.session(name).request(method, url, **kwargs)
+            except aiohttp.ClientConnectorError:
+                if not can_retry:
+                    raise
+            except TimeoutError:
+                if not (can_retry and idempotent):
+                    raise
+            else:
+                if not (can_retry and idempotent and response.status in config.retry_statuses):
+                    break
+                response.release()
+            logger.debug('Повтор HTTP-запроса', client=name, method=method, attempt=attempt)
+            await asyncio.sleep(config.retry_backoff * 2 ** (attempt - 1))
+
+        try:
+            yield response
+        finally:
+            response.release()
+
+    @staticmethod
+    def _bound_to_other_loop(session: Any) -> bool:
+        loop = getattr(session, '_loop', None)
+        if loop is None:
+            return False
+        try:
+            return loop is not asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+    @staticmethod
+    def _close_stale(session: Any) -> None:
+        """Закрывает сессию, которую заменяет новая: её соединения принадлежат другому event loop."""
+        loop = session._loop
+        if not loop.is_closed():
+            # Закрывать сессию нужно в её собственном loop
+            loop.call_soon_threadsafe(lambda: loop.create_task(session.close()))
+            return
+        # Loop уже закрыт — ввод-вывод невозможен, отвязываем соединения от сессии
+        session.detach()
+
+    @contextlib.contextmanager
+    def test_transport(self, handler: TestHandler) -> Iterator[None]:
+        """Подменяет сеть всех клиентов обработчиком ``handler`` на время блока."""
+        previous = self._test_handler
+        self._test_handler = handler
+        sessions, httpx_clients = self._sessions, self._httpx_clients
+        self._sessions, self._httpx_clients = {}, {}
+        try:
+            yield
+        finally:
+            self._test_handler = previous
+            self._sessions, self._httpx_clients = sessions, httpx_clients
+
+    async def close(self) -> None:
+        sessions, self._sessions = list(self._sessions.values()), {}
+        clients, self._httpx_clients = list(self._httpx_clients.values()), {}
+        for session in sessions:
+            with contextlib.suppress(Exception):
+                await session.close()
+        for client in clients:
+            with contextlib.suppress(Exception):
+                await client.aclose()
+        if sessions or clients:
+            logger.info('HTTP-клиенты закрыты', sessions=len(sessions), httpx_clients=len(clients))
+
+
+http_clients = HttpClientRegistry()
@@ -0,0 +1,310 @@
+"""Keyed locks shared between replicas.
+
+``KeyedLock.hold(key)`` serialises work on one key (a subscription, a user)
+in two layers:
+
+* a process-local striped lock — a fixed array of ``asyncio.Lock`` picked by
+  key hash, so memory stays bounded no matter how many keys pass through and
+  coroutines of one process queue locally instead of polling Redis;
+* a Redis lease (``SET NX PX`` with an owner token) renewed in the background
+  while the holder works, so another replica cannot act on the same key.
+
+Every acquisition returns a monotonically increasing fencing token.  When
+Redis is unavailable the lock degrades to the local layer and counts a
+fallback instead of failing the caller.
+
+Holders must not nest ``hold()`` calls: two keys may share a stripe.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import time
+import uuid
+import zlib
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any
+
+import structlog
+from redis.exceptions import NoScriptError
+
+from app.utils.metrics import metrics
+
+
+logger = structlog.get_logger(__name__)
+
+
+class KeyedLockTimeout(TimeoutError):
+    """The lock was not acquired within ``acquire_timeout`` (when one is set)."""
+
+
+@dataclass
+class LockLease:
+    key: str
+    fencing_token: int
+    distributed: bool
+    lost: bool = False
+
+
+@dataclass
+class KeyedLockStats:
+    acquired: int = 0
+    contended: int = 0
+    timeouts: int = 0
+    fallbacks: int = 0
+    lost: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    holders: int = 0
+
+    def record_wait(self, waited: float) -> None:
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def as_dict(self) -> dict[str, float | int]:
+        return {
+            'acquired': self.acquired,
+            'contended': self.contended,
+            'timeouts': self.timeouts,
+            'fallbacks': self.fallbacks,
+            'lost': self.lost,
+            'wait_seconds_total': round(self.wait_seconds_total, 6),
+            'wait_seconds_max': round(self.wait_seconds_max, 6),
+            'holders': self.holders,
+        }
+
+
+class RedisLockBackend:
+    """Redis lease per key: ``SET NX PX`` + compare-and-delete/renew by owner."""
+
+    # KEYS: lock, fence; ARGV: owner, ttl_ms
+    _ACQUIRE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return redis.call('INCR', KEYS[2])
+end
+return 0
+"""
+    # KEYS: lock; ARGV: owner, ttl_ms
+    _RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+    # KEYS: lock; ARGV: owner
+    _RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+    def __init__(self, client: Any, namespace: str) -> None:
+        self._client = client
+        self._namespace = namespace
+        self._shas: dict[str, str] = {}
+
+    def _lock_key(self, key: str) -> str:
+        return f'lock:{self._namespace}:{key}'
+
+    def _fence_key(self) -> str:
+        return f'lock:{self._namespace}:fence'
+
+    async def _eval(self, script: str, keys: list[str], args: list[Any]) -> Any:
+        sha = self._shas.get(script)
+        if sha is None:
+            sha = self._shas[script] = await self._client.script_load(script)
+        try:
+            return await self._client.evalsha(sha, len(keys), *keys, *args)
+        except NoScriptError:
+            self._shas[script] = await self._client.script_load(script)
+            return await self._client.evalsha(self._shas[script], len(keys), *keys, *args)
+
+    async def try_acquire(self, key: str, owner: str, ttl_ms: int) -> int:
+        """Returns the fencing token, or 0 when the key is held by someone else."""
+        return int(await self._eval(self._ACQUIRE_SCRIPT, [self._lock_key(key), self._fence_key()], [owner, ttl_ms]))
+
+    async def renew(self, key: str, owner: str, ttl_ms: int) -> bool:
+        return bool(await self._eval(self._RENEW_SCRIPT, [self._lock_key(key)], [owner, ttl_ms]))
+
+    async def release(self, key: str, owner: str) -> bool:
+        return bool(await self._eval(self._RELEASE_SCRIPT, [self._lock_key(key)], [owner]))
+
+
+def _default_redis_client() -> Any | None:
+    from app.utils.cache import cache
+
+    if cache.is_connected and cache.redis_client is not None:
+        return cache.redis_client
+    return None
+
+
+class KeyedLock:
+    """Striped local lock + optional Redis lease per key."""
+
+    def __init__(
+        self,
+        namespace: str,
+        *,
+        stripes: int = 1024,
+        ttl_ms: int = 30_000,
+        acquire_timeout: float | None = None,
+        distributed: bool | Callable[[], bool] = True,
+        redis_client_factory: Callable[[], Any | None] = _default_redis_client,
+    ) -> None:
+        self.namespace = namespace
+        self._stripes = [asyncio.Lock() for _ in range(max(1, stripes))]
+        self._ttl_ms = ttl_ms
+        self._acquire_timeout = acquire_timeout
+        self._distributed = distributed
+        self._redis_client_factory = redis_client_factory
+        self._backend: RedisLockBackend | None = None
+        self._backend_client: Any | None = None
+        self._local_tokens = itertools.count(1)
+        self._owner_prefix = uuid.uuid4().hex
+        self.stats = KeyedLockStats()
+
+    def _stripe(self, key: str) -> asyncio.Lock:
+        return self._stripes[zlib.crc32(key.encode()) % len(self._stripes)]
+
+    def _redis_backend(self) -> RedisLockBackend | None:
+        enabled = self._distributed() if callable(self._distributed) else self._distributed
+        if not enabled:
+            return None
+        client = self._redis_client_factory()
+        if client is None:
+            return None
+        if client is not self._backend_client:
+            self._backend = RedisLockBackend(client, self.namespace)
+            self._backend_client = client
+        return self._backend
+
+    @asynccontextmanager
+    async def hold(self, key: object) -> AsyncIterator[LockLease]:
+        key = str(key)
+        stripe = self._stripe(key)
+        started = time.monotonic()
+        contended = stripe.locked()
+        try:
+            await asyncio.wait_for(stripe.acquire(), timeout=self._acquire_timeout)
+        except TimeoutError:
+            self.stats.timeouts += 1
+            raise KeyedLockTimeout(f'{self.namespace}:{key} local lock not acquired') from None
+
+        renew_task: asyncio.Task | None = None
+        backend: RedisLockBackend | None = None
+        owner = f'{self._owner_prefix}:{next(self._local_tokens)}'
+        lease: LockLease | None = None
+        try:
+            backend = self._redis_backend()
+            if backend is not None:
+                try:
+                    token, remote_contended = await self._acquire_remote(backend, key, owner, started)
+                    contended = contended or remote_contended
+                    lease = LockLease(key=key, fencing_token=token, distributed=True)
+                    renew_task = asyncio.create_task(self._renew_loop(backend, key, owner, lease))
+                except KeyedLockTimeout:
+                    self.stats.timeouts += 1
+                    raise
+                except Exception as error:
+                    backend = None
+                    self.stats.fallbacks += 1
+                    logger.warning(
+                        'Distributed lock unavailable, using local lock', namespace=self.namespace, error=error
+                    )
+            if lease is None:
+                lease = LockLease(key=key, fencing_token=next(self._local_tokens), distributed=False)
+
+            waited = time.monotonic() - started
+            self.stats.acquired += 1
+            self.stats.contended += int(contended)
+            self.stats.record_wait(waited)
+            self.stats.holders += 1
+            try:
+                yield lease
+            finally:
+                self.stats.holders -= 1
+        finally:
+            if renew_task is not None:
+                renew_task.cancel()
+                try:
+                    await renew_task
+                except asyncio.CancelledError:
+                    pass
+            if backend is not None:
+                try:
+                    await backend.release(key, owner)
+                except Exception as error:
+                    # The lease expires on its own after ttl_ms.
+                    logger.warning('Distributed lock release failed', namespace=self.namespace, key=key, error=error)
+            stripe.release()
+
+    async def _acquire_remote(
+        self, backend: RedisLockBackend, key: str, owner: str, started: float
+    ) -> tuple[int, bool]:
+        delay = 0.005
+        contended = False
+        while True:
+            token = await backend.try_acquire(key, owner, self._ttl_ms)
+            if token:
+                return token, contended
+            contended = True
+            if self._acquire_timeout is not None and time.monotonic() - started + delay > self._acquire_timeout:
+                raise KeyedLockTimeout(f'{self.namespace}:{key} is held by another process')
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.2)
+
+    async def _renew_loop(self, backend: RedisLockBackend, key: str, owner: str, lease: LockLease) -> None:
+        interval = self._ttl_ms / 3000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                renewed = await backend.renew(key, owner, self._ttl_ms)
+            except Exception as error:
+                logger.warning('Distributed lock renewal failed', namespace=self.namespace, key=key, error=error)
+                continue
+            if not renewed:
+                lease.lost = True
+                self.stats.lost += 1
+                logger.error(
+                    'Distributed lock lease lost while held',
+                    namespace=self.namespace,
+                    key=key,
+                    fencing_token=lease.fencing_token,
+                )
+                return
+
+    def get_stats(self) -> dict[str, float | int]:
+        return self.stats.as_dict()
+
+
+_registered_locks: dict[str, KeyedLock] = {}
+
+
+def register_keyed_lock(lock: KeyedLock) -> KeyedLock:
+    """Makes the lock's contention stats visible through ``get_keyed_lock_stats``."""
+    _registered_locks[lock.namespace] = lock
+    return lock
+
+
+def get_keyed_lock_stats() -> dict[str, dict[str, float | int]]:
+    return {namespace: lock.get_stats() for namespace, lock in _registered_locks.items()}
+
+
+KEYED_LOCK_STATS = metrics.gauge(
+    'keyed_lock_stats',
+    'Счётчики распределённых блокировок по ключу: захваты, ожидание, таймауты, откаты на локальный режим',
+    ('namespace', 'stat'),
+)
+
+
+def _collect_keyed_lock_stats() -> None:
+    for namespace, stats in get_keyed_lock_stats().items():
+        for stat, value in stats.items():
+            KEYED_LOCK_STATS.labels(namespace, stat).set(value)
+
+
+metrics.add_collector('keyed_locks', _collect_keyed_lock_stats)
@@ -0,0 +1,387 @@
+"""Встроенный реестр метрик в текстовом формате Prometheus.
+
+Счётчики, гистограммы и gauge'и живут в памяти процесса; запись — это поиск
+дочерней серии в словаре и пара арифметических операций, без блокировок и
+без ввода-вывода. Количество серий на метрику ограничено: лишние наборы меток
+сливаются в одну серию ``__overflow__``, так что путь с ошибкой нормализации
+не раздует память и ответ ``/metrics``.
+
+Gauge'и глубины очередей заполняются коллекторами в момент выдачи метрик.
+"""
+
+from __future__ import annotations
+
+import inspect
+import re
+from bisect import bisect_left
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any
+
+import structlog
+
+from app.config import settings
+
+
+logger = structlog.get_logger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+OVERFLOW_LABEL = '__overflow__'
+DEFAULT_MAX_SERIES = 500
+
+_ID_SEGMENT = re.compile(r'^(?:\d+|[0-9a-fA-F-]{16,}|[A-Za-z0-9_-]*\d[A-Za-z0-9_-]{11,})$')
+
+
+def normalize_path(path: str) -> str:
+    """Заменяет идентификаторы в пути на ``:id`` — иначе каждая запись станет отдельной серией."""
+    path = path.split('?', 1)[0]
+    return '/'.join(':id' if _ID_SEGMENT.match(segment) else segment for segment in path.split('/'))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ('_buckets', 'counts', 'sum')
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self._buckets = buckets
+        # Последняя ячейка — +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self._buckets, value)] += 1
+        self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...], max_series: int) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._max_series = max_series
+        self._children: dict[tuple[str, ...], Any] = {}
+        self._overflowed = False
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: Any) -> Any:
+        key = tuple(map(str, values))
+        child = self._children.get(key)
+        if child is not None:
+            return child
+        if len(key) != len(self.labelnames):
+            raise ValueError(f'{self.name}: expected labels {self.labelnames}, got {key}')
+        if len(self._children) >= self._max_series:
+            if not self._overflowed:
+                self._overflowed = True
+                logger.warning('Превышен лимит серий метрики, новые метки объединены', metric=self.name)
+            key = (OVERFLOW_LABEL,) * len(self.labelnames)
+            child = self._children.get(key)
+            if child is not None:
+                return child
+        child = self._children[key] = self._new_child()
+        return child
+
+    def clear(self) -> None:
+        self._children.clear()
+        self._overflowed = False
+
+    def _label_text(self, key: tuple[str, ...], extra: str = '') -> str:
+        parts = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key, strict=True)]
+        if extra:
+            parts.append(extra)
+        return '{' + ','.join(parts) + '}' if parts else ''
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {_escape(self.documentation)}', f'# TYPE {self.name} {self.kind}']
+        for key, child in list(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key: tuple[str, ...], child: Any) -> list[str]:
+        return [f'{self.name}{self._label_text(key)} {_format_value(child.value)}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...],
+        max_series: int,
+        buckets: tuple[float, ...],
+    ) -> None:
+        super().__init__(name, documentation, labelnames, max_series)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, key: tuple[str, ...], child: _HistogramChild) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float('inf')), child.counts, strict=True):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f'{self.name}_bucket{self._label_text(key, le)} {cumulative}')
+        lines.append(f'{self.name}_sum{self._label_text(key)} {_format_value(child.sum)}')
+        lines.append(f'{self.name}_count{self._label_text(key)} {cumulative}')
+        return lines
+
+
+Collector = Callable[[], Awaitable[None] | None]
+
+
+class MetricsRegistry:
+    """Набор метрик процесса и коллекторов, опрашиваемых при выдаче."""
+
+    def __init__(self, *, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: dict[str, Collector] = {}
+
+    def _register(self, metric: _Metric) -> Any:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                raise ValueError(f'Metric {metric.name} is already registered with a different shape')
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = (), *, max_series: int = DEFAULT_MAX_SERIES
+    ) -> Counter:
+        return self._register(Counter(name, documentation, labelnames, max_series))
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = (), *, max_series: int = DEFAULT_MAX_SERIES
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, max_series))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        *,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        max_series: int = DEFAULT_MAX_SERIES,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, max_series, buckets))
+
+    def add_collector(self, name: str, collector: Collector) -> None:
+        """Регистрирует (или заменяет) коллектор, который обновляет gauge'и перед выдачей."""
+        self._collectors[name] = collector
+
+    def remove_collector(self, name: str) -> None:
+        self._collectors.pop(name, None)
+
+    def reset(self) -> None:
+        for metric in self._metrics.values():
+            metric.clear()
+
+    async def render(self) -> str:
+        for name, collector in list(self._collectors.items()):
+            try:
+                result = collector()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as error:
+                logger.warning('Коллектор метрик завершился с ошибкой', collector=name, error=error)
+
+        lines: list[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry(enabled=settings.METRICS_ENABLED)
+
+# ── Горячие пути ──
+
+HANDLER_SECONDS = metrics.histogram(
+    'bot_handler_duration_seconds',
+    'Время выполнения aiogram-обработчика',
+    ('event', 'handler'),
+    max_series=2000,
+)
+HANDLER_ERRORS = metrics.counter(
+    'bot_handler_errors_total',
+    'Исключения aiogram-обработчиков',
+    ('event', 'handler'),
+    max_series=2000,
+)
+MIDDLEWARE_SECONDS = metrics.histogram(
+    'bot_middleware_duration_seconds',
+    'Собственное время middleware до передачи события дальше',
+    ('event', 'middleware'),
+    buckets=FAST_BUCKETS,
+)
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    'http_request_duration_seconds',
+    'Время обработки HTTP-запроса по шаблону маршрута',
+    ('method', 'route', 'status'),
+    max_series=2000,
+)
+DB_QUERY_SECONDS = metrics.histogram(
+    'db_query_duration_seconds',
+    'Время выполнения SQL-запроса',
+    ('operation',),
+    buckets=FAST_BUCKETS,
+)
+DB_QUERIES_PER_REQUEST = metrics.histogram(
+    'db_queries_per_request',
+    'Количество SQL-запросов на одно обновление бота или HTTP-запрос',
+    ('source',),
+    buckets=COUNT_BUCKETS,
+)
+DB_TIME_PER_REQUEST = metrics.histogram(
+    'db_time_per_request_seconds',
+    'Суммарное время SQL-запросов на одно обновление бота или HTTP-запрос',
+    ('source',),
+)
+REDIS_COMMAND_SECONDS = metrics.histogram(
+    'redis_command_duration_seconds',
+    'Время выполнения команды Redis',
+    ('command',),
+    buckets=FAST_BUCKETS,
+    max_series=200,
+)
+REMNAWAVE_REQUEST_SECONDS = metrics.histogram(
+    'remnawave_request_duration_seconds',
+    'Время запроса к API панели RemnaWave с учётом повторов',
+    ('method', 'endpoint', 'outcome'),
+)
+REMNAWAVE_RETRIES = metrics.counter(
+    'remnawave_request_retries_total',
+    'Повторы запросов к API панели RemnaWave',
+    ('method', 'endpoint'),
+)
+QUEUE_DEPTH = metrics.gauge(
+    'worker_queue_depth',
+    'Количество заданий, ожидающих обработки в очереди воркеров',
+    ('queue',),
+)
+
+
+# ── SQL на запрос ──
+
+
+@dataclass(slots=True)
+class _DbStats:
+    queries: int = 0
+    seconds: float = 0.0
+
+
+_db_stats: ContextVar[_DbStats | None] = ContextVar('metrics_db_stats', default=None)
+
+_SQL_OPERATIONS = frozenset({'SELECT', 'INSERT', 'UPDATE', 'DELETE'})
+
+
+def observe_db_query(statement: str, seconds: float) -> None:
+    operation = statement.lstrip()[:6].upper()
+    DB_QUERY_SECONDS.labels(operation if operation in _SQL_OPERATIONS else 'OTHER').observe(seconds)
+    stats = _db_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += seconds
+
+
+@contextmanager
+def db_query_scope(source: str) -> Iterator[None]:
+    """Считает SQL-запросы внутри обновления бота или HTTP-запроса."""
+    stats = _DbStats()
+    token = _db_stats.set(stats)
+    try:
+        yield
+    finally:
+        _db_stats.reset(token)
+        DB_QUERIES_PER_REQUEST.labels(source).observe(stats.queries)
+        DB_TIME_PER_REQUEST.labels(source).observe(stats.seconds)
+
+
+# ── Redis ──
+
+
+def instrument_redis_client(client: Any) -> None:
+    """Оборачивает ``execute_command`` клиента redis.asyncio замером времени по имени команды."""
+    execute_command = client.execute_command
+    if getattr(execute_command, '_metrics_wrapped', False):
+        return
+
+    async def timed_execute_command(*args: Any, **options: Any) -> Any:
+        start = perf_counter()
+        try:
+            return await execute_command(*args, **options)
+        finally:
+            command = args[0] if args else 'UNKNOWN'
+            if isinstance(command, bytes):
+                command = command.decode(errors='replace')
+            REDIS_COMMAND_SECONDS.labels(str(command).split(' ', 1)[0].upper()).observe(perf_counter() - start)
+
+    timed_execute_command._metrics_wrapped = True  # type: ignore[attr-defined]
+    client.execute_command = timed_execute_command
@@ -1,6 +1,23 @@
+import base64
+import hashlib
+import json
+from collections.abc import Sequence
+from datetime import datetime
 from math import ceil
 from typing import Any, TypeVar
 
+import structlog
+from sqlalchemy import Select, func, literal, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.utils.cache import cache
+
+
+logger = structlog.get_logger(__name__)
+
 
 T = TypeVar('T')
 
@@ -57,3 +74,132 @@ def get_page_numbers(current_page: int, total_pages: int, max_visible: int = 5)
         start_page = max(1, end_page - max_visible + 1)
 
     return list(range(start_page, end_page + 1))
+
+
+# ── Keyset-пагинация ──────────────────────────────────────────────────────────
+#
+# OFFSET заставляет БД прочитать и выбросить все строки до нужной страницы, поэтому
+# глубокие страницы больших списков дорожают линейно. Курсор хранит значения ключа
+# сортировки последней строки (с id в конце для уникальности), и следующая страница
+# — это просто ``WHERE (ключ) < (значения курсора)`` по индексу.
+
+# Ниже этого порога оценка планировщика слишком неточна — считаем точно (с кешем)
+ESTIMATED_COUNT_THRESHOLD = 10_000
+COUNT_CACHE_TTL = 60
+
+
+class InvalidCursorError(ValueError):
+    """Курсор повреждён или выдан для другой сортировки."""
+
+
+def _encode_cursor_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_cursor_value(value: Any) -> Any:
+    if isinstance(value, dict) and set(value) == {'dt'}:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_keyset_cursor(scope: str, values: Sequence[Any]) -> str:
+    """Упаковывает значения ключа сортировки в непрозрачный url-safe курсор."""
+    payload = json.dumps([scope, [_encode_cursor_value(value) for value in values]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_keyset_cursor(cursor: str, scope: str) -> list[Any]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_scope, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if cursor_scope != scope or not isinstance(values, list):
+            raise InvalidCursorError('Курсор выдан для другого списка или сортировки')
+        return [_decode_cursor_value(value) for value in values]
+    except InvalidCursorError:
+        raise
+    except (ValueError, TypeError) as error:
+        raise InvalidCursorError('Некорректный курсор') from error
+
+
+def keyset_cursor_for(row: Any, columns: Sequence[InstrumentedAttribute], scope: str) -> str:
+    """Курсор, указывающий на ``row`` — следующая страница начнётся сразу после неё."""
+    return encode_keyset_cursor(scope, [getattr(row, column.key) for column in columns])
+
+
+def apply_keyset(
+    query: Select,
+    columns: Sequence[InstrumentedAttribute],
+    cursor: str | None,
+    *,
+    scope: str,
+) -> Select:
+    """Сортирует ``query`` по ``columns`` по убыванию и продолжает после ``cursor``.
+
+    Последней колонкой должен идти уникальный ключ (обычно id), иначе строки с
+    одинаковым значением сортировки могут потеряться на границе страниц.
+    """
+    query = query.order_by(*(column.desc() for column in columns))
+    if cursor is None:
+        return query
+
+    values = decode_keyset_cursor(cursor, scope)
+    if len(values) != len(columns):
+        raise InvalidCursorError('Курсор не соответствует сортировке')
+    bounds = [literal(value, column.type) for column, value in zip(columns, values, strict=True)]
+    return query.where(tuple_(*columns) < tuple_(*bounds))
+
+
+class _ExplainJson(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement: Select) -> None:
+        self.statement = statement
+
+
+@compiles(_ExplainJson, 'postgresql')
+def _compile_explain_json(element: _ExplainJson, compiler, **kw) -> str:
+    return 'EXPLAIN (FORMAT JSON) ' + compiler.process(element.statement, **kw)
+
+
+async def _planner_row_estimate(db: AsyncSession, query: Select) -> int | None:
+    if db.get_bind().dialect.name != 'postgresql':
+        return None
+    try:
+        plan = (await db.execute(_ExplainJson(query.order_by(None)))).scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception as error:
+        logger.debug('Не удалось получить оценку планировщика', error=error)
+        return None
+
+
+def _count_cache_key(query: Select) -> str:
+    compiled = query.compile()
+    digest = hashlib.sha1(f'{compiled}|{sorted(compiled.params.items())!r}'.encode()).hexdigest()
+    return f'count_estimate:{digest}'
+
+
+async def count_total(db: AsyncSession, query: Select, *, estimate: bool = False) -> tuple[int, bool]:
+    """Число строк ``query``; возвращает ``(total, is_estimate)``.
+
+    В режиме ``estimate`` большие выборки считаются по оценке планировщика
+    PostgreSQL (``EXPLAIN``, без прохода по таблице), а небольшие — точно с
+    коротким кешем в Redis, чтобы листание страниц не пересчитывало COUNT.
+    """
+    cache_key = None
+    if estimate:
+        planned = await _planner_row_estimate(db, query)
+        if planned is not None and planned >= ESTIMATED_COUNT_THRESHOLD:
+            return planned, True
+        cache_key = _count_cache_key(query)
+        cached = await cache.get(cache_key)
+        if cached is not None:
+            return int(cached), True
+
+    total = (await db.execute(select(func.count()).select_from(query.order_by(None).subquery()))).scalar_one()
+    if cache_key is not None:
+        await cache.set(cache_key, total, expire=COUNT_CACHE_TTL)
+    return int(total), False
@@ -0,0 +1,183 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+
+if TYPE_CHECKING:
+    from app.utils.startup_timeline import StartupTimeline
+
+
+StageFunc = Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class GraphStage:
+    name: str
+    func: StageFunc
+    after: tuple[str, ...] = ()
+    deferred: bool = False
+    started_at: float | None = None
+    finished_at: float | None = None
+    failed: bool = False
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def duration(self) -> float:
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+
+class StartupGraphError(RuntimeError):
+    pass
+
+
+class StartupGraph:
+    """Граф этапов запуска: этап стартует, как только завершены его зависимости.
+
+    Независимые этапы выполняются параллельно в ``asyncio.TaskGroup``. Отложенные
+    (``deferred=True``) этапы — сетевые операции, без которых бот может начать
+    обслуживать пользователей, — запускаются отдельно через ``start_deferred()``.
+    Исключение этапа отменяет остальные этапы того же запуска и пробрасывается
+    как есть; обработку «мягких» ошибок этапы делают сами, как и раньше.
+    """
+
+    def __init__(self, timeline: 'StartupTimeline') -> None:
+        self.timeline = timeline
+        self.stages: dict[str, GraphStage] = {}
+        self.created_at = time.perf_counter()
+        self.serving_at: float | None = None
+        self.report_logged = False
+        self._deferred_task: asyncio.Task | None = None
+
+    def add(self, name: str, func: StageFunc, *, after: Iterable[str] = (), deferred: bool = False) -> None:
+        if name in self.stages:
+            raise StartupGraphError(f'Этап {name!r} уже зарегистрирован')
+        self.stages[name] = GraphStage(name=name, func=func, after=tuple(after), deferred=deferred)
+
+    def stage(
+        self, name: str, *, after: Iterable[str] = (), deferred: bool = False
+    ) -> Callable[[StageFunc], StageFunc]:
+        def decorator(func: StageFunc) -> StageFunc:
+            self.add(name, func, after=after, deferred=deferred)
+            return func
+
+        return decorator
+
+    def _validate(self, names: Iterable[str]) -> None:
+        for name in names:
+            stage = self.stages[name]
+            for dependency in stage.after:
+                if dependency not in self.stages:
+                    raise StartupGraphError(f'Этап {name!r} зависит от неизвестного этапа {dependency!r}')
+                if self.stages[dependency].deferred and not stage.deferred:
+                    raise StartupGraphError(f'Этап {name!r} не может зависеть от отложенного этапа {dependency!r}')
+
+        visiting: set[str] = set()
+        visited: set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in visited:
+                return
+            if name in visiting:
+                raise StartupGraphError(f'Циклическая зависимость этапов запуска: {name!r}')
+            visiting.add(name)
+            for dependency in self.stages[name].after:
+                visit(dependency)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    async def _run_stage(self, stage: GraphStage) -> None:
+        for dependency in stage.after:
+            await self.stages[dependency].done.wait()
+            if self.stages[dependency].failed:
+                # Зависимость упала — этап не запускаем, ошибку пробросит сам упавший этап.
+                # failed распространяется дальше по цепочке, чтобы не стартовали и его зависимые
+                stage.failed = True
+                stage.done.set()
+                return
+        stage.started_at = time.perf_counter()
+        try:
+            await stage.func()
+        except BaseException:
+            stage.failed = True
+            raise
+        finally:
+            stage.finished_at = time.perf_counter()
+            stage.done.set()
+
+    async def _run(self, stages: list[GraphStage]) -> None:
+        self._validate(stage.name for stage in stages)
+        try:
+            async with asyncio.TaskGroup() as group:
+                for stage in stages:
+                    group.create_task(self._run_stage(stage), name=f'startup:{stage.name}')
+        except BaseExceptionGroup as group_error:
+            # Вызывающему коду важна исходная ошибка этапа, а не обёртка TaskGroup
+            raise group_error.exceptions[0] from None
+
+    async def run(self) -> None:
+        """Выполняет все ещё не запущенные неотложенные этапы."""
+        await self._run([stage for stage in self.stages.values() if not stage.deferred and stage.started_at is None])
+
+    def mark_serving(self) -> None:
+        """Отмечает момент, когда бот начал принимать обновления."""
+        self.serving_at = time.perf_counter()
+
+    def start_deferred(self) -> asyncio.Task | None:
+        """Запускает отложенные этапы в фоне; отчёт о запуске логируется, когда завершатся и они."""
+        stages = [stage for stage in self.stages.values() if stage.deferred and stage.started_at is None]
+        if not stages:
+            self.log_report()
+            return None
+
+        async def runner() -> None:
+            try:
+                await self._run(stages)
+            except Exception as error:
+                self.timeline.logger.error('Ошибка отложенного этапа запуска', error=error)
+            finally:
+                self.log_report()
+
+        self._deferred_task = asyncio.create_task(runner(), name='startup:deferred')
+        return self._deferred_task
+
+    async def cancel_deferred(self) -> None:
+        task = self._deferred_task
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def report_lines(self) -> list[str]:
+        finished = [stage for stage in self.stages.values() if stage.started_at is not None]
+        finished.sort(key=lambda stage: stage.started_at)
+        lines = []
+        for stage in finished:
+            offset = stage.started_at - self.created_at
+            marker = ' (отложен)' if stage.deferred else ''
+            status = ' ❌' if stage.failed else ''
+            lines.append(f'+{offset:6.2f}s {stage.duration:6.2f}s  {stage.name}{marker}{status}')
+
+        busy = sum(stage.duration for stage in finished)
+        wall = max((stage.finished_at for stage in finished if stage.finished_at is not None), default=self.created_at)
+        lines.append(f'Сумма этапов: {busy:.2f}s, фактически: {wall - self.created_at:.2f}s')
+        if self.serving_at is not None:
+            lines.append(f'До приёма обновлений: {self.serving_at - self.created_at:.2f}s')
+        return lines
+
+    def log_report(self) -> None:
+        """Логирует резюме запуска и время этапов — один раз, включая отложенные этапы."""
+        if self.report_logged:
+            return
+        self.report_logged = True
+        self.timeline.log_summary()
+        self.timeline.log_section('Время этапов запуска', self.report_lines(), icon='⏱️')
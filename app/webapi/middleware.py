@@ -1,14 +1,17 @@
 from __future__ import annotations
 
-from time import monotonic
+from time import monotonic, perf_counter
 
 import structlog
 from sqlalchemy.exc import InterfaceError, OperationalError
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.requests import Request
 from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from structlog.contextvars import bound_contextvars
 
+from app.utils.metrics import HTTP_REQUEST_SECONDS, db_query_scope
+
 
 logger = structlog.get_logger('web_api')
 
@@ -45,3 +48,37 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
                     status=status,
                     duration_ms=duration_ms,
                 )
+
+
+class HttpMetricsMiddleware:
+    """Гистограмма времени HTTP-запросов по шаблону маршрута и счётчик SQL на запрос.
+
+    Чистый ASGI, без буферизации тела ответа: маршрут берётся из ``scope['route']``,
+    который проставляет роутер FastAPI, поэтому идентификаторы в пути не плодят серии.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            with db_query_scope('http'):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get('route'), 'path', None) or 'unmatched'
+            HTTP_REQUEST_SECONDS.labels(scope['method'], route, f'{status_code // 100}xx').observe(
+                perf_counter() - start
+            )
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Security
+from fastapi import APIRouter, HTTPException, Security, status
+from fastapi.responses import PlainTextResponse
 
 from app.config import settings
 from app.database import db_manager, get_pool_metrics
 from app.services.version_service import version_service
+from app.utils.metrics import metrics
 
 from ..dependencies import require_api_token
 from ..schemas.health import HealthCheckResponse, HealthFeatureFlags
@@ -45,3 +47,12 @@ async def pool_metrics(_: object = Security(require_api_token)) -> dict:
     """Метрики пула подключений к базе данных."""
 
     return await get_pool_metrics()
+
+
+@router.get('/metrics', tags=['health'], response_class=PlainTextResponse)
+async def prometheus_metrics(_: object = Security(require_api_token)) -> PlainTextResponse:
+    """Метрики процесса в текстовом формате Prometheus."""
+
+    if not metrics.enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Metrics are disabled')
+    return PlainTextResponse(await metrics.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 import dataclasses
 import math
 import re
-from collections.abc import Collection
+from collections.abc import Awaitable, Callable, Collection
 from datetime import UTC, datetime, timedelta
 from decimal import ROUND_FLOOR, ROUND_HALF_UP, ROUND_UP, Decimal, InvalidOperation
 from typing import Any
@@ -45,6 +46,7 @@ from app.database.crud.transaction import (
     get_user_total_spent_kopeks,
 )
 from app.database.crud.user import get_user_by_telegram_id, subtract_user_balance
+from app.database.database import AsyncSessionLocal
 from app.database.models import (
     PaymentMethod,
     PromoGroup,
@@ -56,6 +58,7 @@ from app.database.models import (
     User,
 )
 from app.services.faq_service import FaqService
+from app.services.hwid_device_cache import hwid_device_cache
 from app.services.maintenance_service import maintenance_service
 from app.services.payment_service import PaymentService, get_wata_payment_by_link_id
 from app.services.pricing_engine import PricingEngine
@@ -82,6 +85,7 @@ from app.services.subscription_renewal_service import (
     with_admin_notification_service,
 )
 from app.services.subscription_service import SubscriptionService
+from app.services.subscription_usage_refresher import subscription_usage_refresher
 from app.services.trial_activation_service import (
     TrialPaymentChargeFailed,
     TrialPaymentInsufficientFunds,
@@ -2808,8 +2812,7 @@ async def _load_devices_info(user: User, subscription=None) -> tuple[int, list[M
         return 0, []
 
     try:
-        async with service.get_api_client() as api:
-            response = await api.get_user_devices_all(panel_user_id)
+        response = await hwid_device_cache.get_devices(panel_user_id)
     except RemnaWaveConfigurationError:
         logger.debug('RemnaWave configuration missing while loading devices')
         return 0, []
@@ -3044,6 +3047,51 @@ def _is_trial_available_for_user(user: User) -> bool:
     return True
 
 
+ResponseSectionLoader = Callable[[AsyncSession], Awaitable[Any]]
+
+
+async def _load_response_sections(
+    sections: dict[str, tuple[ResponseSectionLoader, Any]],
+    *,
+    budget: float,
+) -> dict[str, Any]:
+    """Загружает независимые секции ответа параллельно, каждую в своей сессии БД.
+
+    ``sections`` — имя секции -> (загрузчик, значение по умолчанию). Секция, которая
+    упала или не уложилась в ``budget`` секунд, отдаётся значением по умолчанию,
+    поэтому ответ ждёт не дольше бюджета, а не сумму всех шагов.
+    """
+
+    async def run(loader: ResponseSectionLoader) -> Any:
+        async with AsyncSessionLocal() as section_db:
+            return await loader(section_db)
+
+    tasks = {
+        name: asyncio.create_task(run(loader), name=f'miniapp-section:{name}') for name, (loader, _) in sections.items()
+    }
+    try:
+        _, pending = await asyncio.wait(tasks.values(), timeout=max(0.1, budget))
+    finally:
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results: dict[str, Any] = {}
+    for name, task in tasks.items():
+        default = sections[name][1]
+        if task in pending:
+            logger.warning('Miniapp subscription section exceeded time budget', section=name, budget=budget)
+            results[name] = default
+        elif task.exception() is not None:
+            logger.warning('Failed to load miniapp subscription section', section=name, error=task.exception())
+            results[name] = default
+        else:
+            results[name] = task.result()
+    return results
+
+
 @router.post('/subscription', response_model=MiniAppSubscriptionResponse)
 async def get_subscription_details(
     payload: MiniAppSubscriptionRequest,
@@ -3129,64 +3177,26 @@ async def get_subscription_details(
             subscription = max(subs, key=lambda s: s.id) if subs else None
     else:
         subscription = None
-    usage_synced = False
 
+    # Трафик берётся из локального снимка; устаревший снимок обновляется из панели в фоне
+    usage_synced_at: datetime | None = None
     if subscription and _is_remnawave_configured():
-        service = SubscriptionService()
         try:
-            usage_synced = await service.sync_subscription_usage(db, subscription)
+            usage_synced_at = await subscription_usage_refresher.ensure_fresh(subscription.id)
         except Exception as error:  # pragma: no cover - defensive logging
             logger.warning(
-                'Failed to sync subscription usage for user', getattr=getattr(user, 'id', 'unknown'), error=error
+                'Failed to schedule subscription usage refresh for user',
+                getattr=getattr(user, 'id', 'unknown'),
+                error=error,
             )
 
-    if usage_synced:
-        try:
-            await db.refresh(subscription, attribute_names=['traffic_used_gb', 'updated_at'])
-        except Exception as refresh_error:  # pragma: no cover - defensive logging
-            logger.debug('Failed to refresh subscription after usage sync', refresh_error=refresh_error)
-
-        try:
-            await db.refresh(user)
-        except Exception as refresh_error:  # pragma: no cover - defensive logging
-            logger.debug('Failed to refresh user after usage sync', refresh_error=refresh_error)
-            user = await get_user_by_telegram_id(db, telegram_id)
-
-        subscription = getattr(user, 'subscription', subscription)
     lifetime_used = _bytes_to_gb(getattr(user, 'lifetime_used_traffic_bytes', 0))
 
-    transactions_query = (
-        select(Transaction).where(Transaction.user_id == user.id).order_by(Transaction.created_at.desc()).limit(10)
-    )
-    transactions_result = await db.execute(transactions_query)
-    transactions = list(transactions_result.scalars().all())
-
     balance_currency = getattr(user, 'balance_currency', None)
     if isinstance(balance_currency, str):
         balance_currency = balance_currency.upper()
 
     promo_group = getattr(user, 'promo_group', None)
-    total_spent_kopeks = await get_user_total_spent_kopeks(db, user.id)
-    auto_assign_groups = await get_auto_assign_promo_groups(db)
-
-    auto_promo_levels: list[MiniAppAutoPromoGroupLevel] = []
-    for group in auto_assign_groups:
-        threshold = group.auto_assign_total_spent_kopeks or 0
-        if threshold <= 0:
-            continue
-
-        auto_promo_levels.append(
-            MiniAppAutoPromoGroupLevel(
-                id=group.id,
-                name=group.name,
-                threshold_kopeks=threshold,
-                threshold_rubles=round(threshold / 100, 2),
-                threshold_label=settings.format_price(threshold),
-                is_reached=total_spent_kopeks >= threshold,
-                is_current=bool(promo_group and promo_group.id == group.id),
-                **_extract_promo_discounts(group),
-            )
-        )
 
     active_discount_percent = 0
     try:
@@ -3200,34 +3210,7 @@ async def get_subscription_details(
         active_discount_expires_at = None
         active_discount_percent = 0
 
-    available_promo_offers = await list_active_discount_offers_for_user(db, user.id)
-
     promo_offer_source = getattr(user, 'promo_offer_discount_source', None)
-    active_offer_contexts: list[ActiveOfferContext] = []
-    if promo_offer_source or active_discount_percent > 0:
-        active_discount_offer = await get_latest_claimed_offer_for_user(
-            db,
-            user.id,
-            promo_offer_source,
-        )
-        if active_discount_offer and active_discount_percent > 0:
-            active_offer_contexts.append(
-                (
-                    active_discount_offer,
-                    active_discount_percent,
-                    active_discount_expires_at,
-                )
-            )
-
-    if subscription:
-        active_offer_contexts.extend(await _find_active_test_access_offers(db, subscription))
-
-    promo_offers = await _build_promo_offer_models(
-        db,
-        available_promo_offers,
-        active_offer_contexts,
-        user=user,
-    )
 
     content_language_preference = user.language or settings.DEFAULT_LANGUAGE or 'ru'
 
@@ -3235,116 +3218,275 @@ async def get_subscription_details(
         base_language = language or settings.DEFAULT_LANGUAGE or 'ru'
         return base_language.split('-')[0].lower()
 
-    faq_payload: MiniAppFaq | None = None
-    requested_faq_language = FaqService.normalize_language(content_language_preference)
-    faq_pages = await FaqService.get_pages(
-        db,
-        requested_faq_language,
-        include_inactive=False,
-        fallback=True,
-    )
+    connected_squads: list[str] = list(subscription.connected_squads or []) if subscription else []
+
+    # Независимые секции ответа грузятся параллельно, каждая в своей сессии
+    async def load_transactions(section_db: AsyncSession) -> list[MiniAppTransaction]:
+        transactions_query = (
+            select(Transaction).where(Transaction.user_id == user.id).order_by(Transaction.created_at.desc()).limit(10)
+        )
+        transactions_result = await section_db.execute(transactions_query)
+        return [_serialize_transaction(tx) for tx in transactions_result.scalars().all()]
+
+    async def load_promo_levels(section_db: AsyncSession) -> tuple[int, list[MiniAppAutoPromoGroupLevel]]:
+        total_spent_kopeks = await get_user_total_spent_kopeks(section_db, user.id)
+        auto_assign_groups = await get_auto_assign_promo_groups(section_db)
+
+        auto_promo_levels: list[MiniAppAutoPromoGroupLevel] = []
+        for group in auto_assign_groups:
+            threshold = group.auto_assign_total_spent_kopeks or 0
+            if threshold <= 0:
+                continue
+
+            auto_promo_levels.append(
+                MiniAppAutoPromoGroupLevel(
+                    id=group.id,
+                    name=group.name,
+                    threshold_kopeks=threshold,
+                    threshold_rubles=round(threshold / 100, 2),
+                    threshold_label=settings.format_price(threshold),
+                    is_reached=total_spent_kopeks >= threshold,
+                    is_current=bool(promo_group and promo_group.id == group.id),
+                    **_extract_promo_discounts(group),
+                )
+            )
+        return total_spent_kopeks, auto_promo_levels
+
+    async def load_promo_offers(section_db: AsyncSession) -> list[MiniAppPromoOffer]:
+        available_promo_offers = await list_active_discount_offers_for_user(section_db, user.id)
+
+        active_offer_contexts: list[ActiveOfferContext] = []
+        if promo_offer_source or active_discount_percent > 0:
+            active_discount_offer = await get_latest_claimed_offer_for_user(
+                section_db,
+                user.id,
+                promo_offer_source,
+            )
+            if active_discount_offer and active_discount_percent > 0:
+                active_offer_contexts.append(
+                    (
+                        active_discount_offer,
+                        active_discount_percent,
+                        active_discount_expires_at,
+                    )
+                )
+
+        if subscription:
+            active_offer_contexts.extend(await _find_active_test_access_offers(section_db, subscription))
+
+        return await _build_promo_offer_models(
+            section_db,
+            available_promo_offers,
+            active_offer_contexts,
+            user=user,
+        )
+
+    async def load_faq(section_db: AsyncSession) -> MiniAppFaq | None:
+        requested_faq_language = FaqService.normalize_language(content_language_preference)
+        faq_pages = await FaqService.get_pages(
+            section_db,
+            requested_faq_language,
+            include_inactive=False,
+            fallback=True,
+        )
+        if not faq_pages:
+            return None
 
-    if faq_pages:
         faq_setting = await FaqService.get_setting(
-            db,
+            section_db,
             requested_faq_language,
             fallback=True,
         )
         is_enabled = bool(faq_setting.is_enabled) if faq_setting else True
+        if not is_enabled:
+            return None
 
-        if is_enabled:
-            ordered_pages = sorted(
-                faq_pages,
-                key=lambda page: (
-                    (page.display_order or 0),
-                    page.id,
-                ),
+        ordered_pages = sorted(
+            faq_pages,
+            key=lambda page: (
+                (page.display_order or 0),
+                page.id,
+            ),
+        )
+        faq_items: list[MiniAppFaqItem] = []
+        for page in ordered_pages:
+            raw_content = (page.content or '').strip()
+            if not raw_content:
+                continue
+            if not re.sub(r'<[^>]+>', '', raw_content).strip():
+                continue
+            faq_items.append(
+                MiniAppFaqItem(
+                    id=page.id,
+                    title=page.title or None,
+                    content=page.content or '',
+                    display_order=getattr(page, 'display_order', None),
+                )
+            )
+
+        if not faq_items:
+            return None
+
+        resolved_language = faq_setting.language if faq_setting and faq_setting.language else ordered_pages[0].language
+        return MiniAppFaq(
+            requested_language=requested_faq_language,
+            language=resolved_language or requested_faq_language,
+            is_enabled=is_enabled,
+            total=len(faq_items),
+            items=faq_items,
+        )
+
+    async def load_legal_documents(section_db: AsyncSession) -> MiniAppLegalDocuments | None:
+        legal_documents_payload: MiniAppLegalDocuments | None = None
+
+        requested_offer_language = PublicOfferService.normalize_language(content_language_preference)
+        public_offer = await PublicOfferService.get_active_offer(
+            section_db,
+            requested_offer_language,
+        )
+        if public_offer and (public_offer.content or '').strip():
+            legal_documents_payload = legal_documents_payload or MiniAppLegalDocuments()
+            legal_documents_payload.public_offer = MiniAppRichTextDocument(
+                requested_language=requested_offer_language,
+                language=public_offer.language,
+                title=None,
+                is_enabled=bool(public_offer.is_enabled),
+                content=public_offer.content or '',
+                created_at=public_offer.created_at,
+                updated_at=public_offer.updated_at,
+            )
+
+        requested_policy_language = PrivacyPolicyService.normalize_language(content_language_preference)
+        privacy_policy = await PrivacyPolicyService.get_active_policy(
+            section_db,
+            requested_policy_language,
+        )
+        if privacy_policy and (privacy_policy.content or '').strip():
+            legal_documents_payload = legal_documents_payload or MiniAppLegalDocuments()
+            legal_documents_payload.privacy_policy = MiniAppRichTextDocument(
+                requested_language=requested_policy_language,
+                language=privacy_policy.language,
+                title=None,
+                is_enabled=bool(privacy_policy.is_enabled),
+                content=privacy_policy.content or '',
+                created_at=privacy_policy.created_at,
+                updated_at=privacy_policy.updated_at,
+            )
+
+        requested_rules_language = _normalize_language_code(content_language_preference)
+        default_rules_language = _normalize_language_code(settings.DEFAULT_LANGUAGE)
+        service_rules = await get_rules_by_language(section_db, requested_rules_language)
+        if not service_rules and requested_rules_language != default_rules_language:
+            service_rules = await get_rules_by_language(section_db, default_rules_language)
+
+        if service_rules and (service_rules.content or '').strip():
+            legal_documents_payload = legal_documents_payload or MiniAppLegalDocuments()
+            legal_documents_payload.service_rules = MiniAppRichTextDocument(
+                requested_language=requested_rules_language,
+                language=service_rules.language,
+                title=getattr(service_rules, 'title', None),
+                is_enabled=bool(getattr(service_rules, 'is_active', True)),
+                content=service_rules.content or '',
+                created_at=getattr(service_rules, 'created_at', None),
+                updated_at=getattr(service_rules, 'updated_at', None),
             )
-            faq_items: list[MiniAppFaqItem] = []
-            for page in ordered_pages:
-                raw_content = (page.content or '').strip()
-                if not raw_content:
-                    continue
-                if not re.sub(r'<[^>]+>', '', raw_content).strip():
-                    continue
-                faq_items.append(
-                    MiniAppFaqItem(
-                        id=page.id,
-                        title=page.title or None,
-                        content=page.content or '',
-                        display_order=getattr(page, 'display_order', None),
+
+        return legal_documents_payload
+
+    async def load_tariff(section_db: AsyncSession) -> tuple[dict[str, Any], MiniAppCurrentTariff | None]:
+        # Данные суточного тарифа для блока пользователя
+        daily_info: dict[str, Any] = {}
+        if not getattr(subscription, 'tariff_id', None):
+            return daily_info, None
+
+        tariff = await get_tariff_by_id(section_db, subscription.tariff_id)
+        if tariff and getattr(tariff, 'is_daily', False):
+            daily_price_kopeks = getattr(tariff, 'daily_price_kopeks', 0)
+            # Применяем скидку промогруппы + promo-offer для отображения
+            if daily_price_kopeks > 0:
+                _promo_group = user.get_primary_promo_group() if hasattr(user, 'get_primary_promo_group') else None
+                _group_pct = _promo_group.get_discount_percent('period', 1) if _promo_group else 0
+                _offer_pct = get_user_active_promo_discount_percent(user) if user else 0
+                if _group_pct > 0 or _offer_pct > 0:
+                    daily_price_kopeks, _, _ = PricingEngine.apply_stacked_discounts(
+                        daily_price_kopeks, _group_pct, _offer_pct
                     )
-                )
+            daily_info = {
+                'is_daily_tariff': True,
+                'is_daily_paused': getattr(subscription, 'is_daily_paused', False),
+                'daily_tariff_name': tariff.name,
+                'daily_price_kopeks': daily_price_kopeks,
+                'daily_price_label': (
+                    settings.format_price(daily_price_kopeks) + '/день' if daily_price_kopeks > 0 else None
+                ),
+                # Оставшееся время подписки (показываем даже при паузе)
+                'daily_next_charge_at': subscription.end_date or None,
+            }
 
-            if faq_items:
-                resolved_language = (
-                    faq_setting.language if faq_setting and faq_setting.language else ordered_pages[0].language
-                )
-                faq_payload = MiniAppFaq(
-                    requested_language=requested_faq_language,
-                    language=resolved_language or requested_faq_language,
-                    is_enabled=is_enabled,
-                    total=len(faq_items),
-                    items=faq_items,
-                )
+        return daily_info, await _get_current_tariff_model(section_db, subscription, user)
+
+    async def load_traffic_purchases(section_db: AsyncSession) -> list[dict[str, Any]]:
+        from app.database.models import TrafficPurchase
 
-    legal_documents_payload: MiniAppLegalDocuments | None = None
+        purchases_now = datetime.now(UTC)
+        purchases_result = await section_db.execute(
+            select(TrafficPurchase)
+            .where(TrafficPurchase.subscription_id == subscription.id)
+            .where(TrafficPurchase.expires_at > purchases_now)
+            .order_by(TrafficPurchase.expires_at.asc())
+        )
 
-    requested_offer_language = PublicOfferService.normalize_language(content_language_preference)
-    public_offer = await PublicOfferService.get_active_offer(
-        db,
-        requested_offer_language,
-    )
-    if public_offer and (public_offer.content or '').strip():
-        legal_documents_payload = legal_documents_payload or MiniAppLegalDocuments()
-        legal_documents_payload.public_offer = MiniAppRichTextDocument(
-            requested_language=requested_offer_language,
-            language=public_offer.language,
-            title=None,
-            is_enabled=bool(public_offer.is_enabled),
-            content=public_offer.content or '',
-            created_at=public_offer.created_at,
-            updated_at=public_offer.updated_at,
-        )
-
-    requested_policy_language = PrivacyPolicyService.normalize_language(content_language_preference)
-    privacy_policy = await PrivacyPolicyService.get_active_policy(
-        db,
-        requested_policy_language,
-    )
-    if privacy_policy and (privacy_policy.content or '').strip():
-        legal_documents_payload = legal_documents_payload or MiniAppLegalDocuments()
-        legal_documents_payload.privacy_policy = MiniAppRichTextDocument(
-            requested_language=requested_policy_language,
-            language=privacy_policy.language,
-            title=None,
-            is_enabled=bool(privacy_policy.is_enabled),
-            content=privacy_policy.content or '',
-            created_at=privacy_policy.created_at,
-            updated_at=privacy_policy.updated_at,
-        )
-
-    requested_rules_language = _normalize_language_code(content_language_preference)
-    default_rules_language = _normalize_language_code(settings.DEFAULT_LANGUAGE)
-    service_rules = await get_rules_by_language(db, requested_rules_language)
-    if not service_rules and requested_rules_language != default_rules_language:
-        service_rules = await get_rules_by_language(db, default_rules_language)
-
-    if service_rules and (service_rules.content or '').strip():
-        legal_documents_payload = legal_documents_payload or MiniAppLegalDocuments()
-        legal_documents_payload.service_rules = MiniAppRichTextDocument(
-            requested_language=requested_rules_language,
-            language=service_rules.language,
-            title=getattr(service_rules, 'title', None),
-            is_enabled=bool(getattr(service_rules, 'is_active', True)),
-            content=service_rules.content or '',
-            created_at=getattr(service_rules, 'created_at', None),
-            updated_at=getattr(service_rules, 'updated_at', None),
-        )
-
-    links_payload: dict[str, Any] = {}
-    connected_squads: list[str] = []
-    connected_servers: list[MiniAppConnectedServer] = []
+        traffic_purchases_data = []
+        for purchase in purchases_result.scalars().all():
+            time_remaining = purchase.expires_at - purchases_now
+            days_remaining = max(0, int(time_remaining.total_seconds() / 86400))
+            total_duration_seconds = (purchase.expires_at - purchase.created_at).total_seconds()
+            elapsed_seconds = (purchases_now - purchase.created_at).total_seconds()
+            progress_percent = min(
+                100.0, max(0.0, (elapsed_seconds / total_duration_seconds * 100) if total_duration_seconds > 0 else 0)
+            )
+
+            traffic_purchases_data.append(
+                {
+                    'id': purchase.id,
+                    'traffic_gb': purchase.traffic_gb,
+                    'expires_at': purchase.expires_at,
+                    'created_at': purchase.created_at,
+                    'days_remaining': days_remaining,
+                    'progress_percent': round(progress_percent, 1),
+                }
+            )
+        return traffic_purchases_data
+
+    sections: dict[str, tuple[ResponseSectionLoader, Any]] = {
+        'transactions': (load_transactions, []),
+        'promo_levels': (load_promo_levels, (0, [])),
+        'promo_offers': (load_promo_offers, []),
+        'faq': (load_faq, None),
+        'legal_documents': (load_legal_documents, None),
+        'referral': (lambda section_db: _build_referral_info(section_db, user), None),
+        'devices': (lambda _section_db: _load_devices_info(user, subscription), (0, [])),
+    }
+    if subscription:
+        sections.update(
+            {
+                'links': (lambda _section_db: _load_subscription_links(subscription), {}),
+                'connected_servers': (
+                    lambda section_db: _resolve_connected_servers(section_db, connected_squads),
+                    [MiniAppConnectedServer(uuid=squad_uuid, name=squad_uuid) for squad_uuid in connected_squads],
+                ),
+                'tariff': (load_tariff, ({}, None)),
+                'traffic_purchases': (load_traffic_purchases, []),
+            }
+        )
+    loaded = await _load_response_sections(sections, budget=settings.MINIAPP_SECTIONS_BUDGET_SECONDS)
+
+    total_spent_kopeks, auto_promo_levels = loaded['promo_levels']
+    devices_count, devices = loaded['devices']
+    daily_info, current_tariff = loaded.get('tariff', ({}, None))
+
+    links_payload: dict[str, Any] = loaded.get('links', {})
+    connected_servers: list[MiniAppConnectedServer] = loaded.get('connected_servers', [])
     links: list[str] = []
     ss_conf_links: dict[str, str] = {}
     subscription_url: str | None = None
@@ -3364,14 +3506,11 @@ async def get_subscription_details(
         traffic_limit_value = subscription.traffic_limit_gb or 0
         status_actual = subscription.actual_status
         subscription_status_value = subscription.status
-        links_payload = await _load_subscription_links(subscription)
         # Флаг скрытия ссылки (скрывается только текст, кнопки работают)
         hide_subscription_link = settings.should_hide_subscription_link()
         subscription_url = links_payload.get('subscription_url') or subscription.subscription_url
         subscription_crypto_link = links_payload.get('happ_crypto_link') or subscription.subscription_crypto_link
         happ_redirect_link = get_happ_cryptolink_redirect_link(subscription_crypto_link)
-        connected_squads = list(subscription.connected_squads or [])
-        connected_servers = await _resolve_connected_servers(db, connected_squads)
         links = links_payload.get('links') or connected_squads
         ss_conf_links = links_payload.get('ss_conf_links') or {}
         remnawave_short_uuid = subscription.remnawave_short_uuid
@@ -3388,37 +3527,6 @@ async def get_subscription_details(
         autopay_payload,
     )
 
-    devices_count, devices = await _load_devices_info(user, subscription)
-
-    # Загружаем данные суточного тарифа
-    is_daily_tariff = False
-    is_daily_paused = False
-    daily_tariff_name = None
-    daily_price_kopeks = None
-    daily_price_label = None
-    daily_next_charge_at = None
-
-    if subscription and getattr(subscription, 'tariff_id', None):
-        tariff = await get_tariff_by_id(db, subscription.tariff_id)
-        if tariff and getattr(tariff, 'is_daily', False):
-            is_daily_tariff = True
-            is_daily_paused = getattr(subscription, 'is_daily_paused', False)
-            daily_tariff_name = tariff.name
-            daily_price_kopeks = getattr(tariff, 'daily_price_kopeks', 0)
-            # Применяем скидку промогруппы + promo-offer для отображения
-            if daily_price_kopeks > 0:
-                _promo_group = user.get_primary_promo_group() if hasattr(user, 'get_primary_promo_group') else None
-                _group_pct = _promo_group.get_discount_percent('period', 1) if _promo_group else 0
-                _offer_pct = get_user_active_promo_discount_percent(user) if user else 0
-                if _group_pct > 0 or _offer_pct > 0:
-                    daily_price_kopeks, _, _ = PricingEngine.apply_stacked_discounts(
-                        daily_price_kopeks, _group_pct, _offer_pct
-                    )
-            daily_price_label = settings.format_price(daily_price_kopeks) + '/день' if daily_price_kopeks > 0 else None
-            # Оставшееся время подписки (показываем даже при паузе)
-            if subscription.end_date:
-                daily_next_charge_at = subscription.end_date
-
     response_user = MiniAppSubscriptionUser(
         telegram_id=user.telegram_id,
         username=user.username,
@@ -3441,6 +3549,7 @@ async def get_subscription_details(
         device_limit=device_limit_value,
         traffic_used_gb=round(traffic_used_value, 2),
         traffic_used_label=_format_gb_label(traffic_used_value),
+        traffic_used_synced_at=usage_synced_at,
         traffic_limit_gb=traffic_limit_value,
         traffic_limit_label=_format_limit_label(traffic_limit_value),
         lifetime_used_traffic_gb=lifetime_used,
@@ -3448,16 +3557,9 @@ async def get_subscription_details(
         promo_offer_discount_percent=active_discount_percent,
         promo_offer_discount_expires_at=active_discount_expires_at,
         promo_offer_discount_source=promo_offer_source,
-        is_daily_tariff=is_daily_tariff,
-        is_daily_paused=is_daily_paused,
-        daily_tariff_name=daily_tariff_name,
-        daily_price_kopeks=daily_price_kopeks,
-        daily_price_label=daily_price_label,
-        daily_next_charge_at=daily_next_charge_at,
+        **daily_info,
     )
 
-    referral_info = await _build_referral_info(db, user)
-
     trial_available = _is_trial_available_for_user(user)
     trial_duration_days = settings.TRIAL_DURATION_DAYS if settings.TRIAL_DURATION_DAYS > 0 else None
     trial_price_kopeks = settings.get_trial_activation_price()
@@ -3471,45 +3573,8 @@ async def get_subscription_details(
         else:
             subscription_missing_reason = 'not_found'
 
-    # Получаем докупки трафика
-    traffic_purchases_data = []
-    if subscription:
-        from sqlalchemy import select as sql_select
-
-        from app.database.models import TrafficPurchase
-
-        now = datetime.now(UTC)
-        purchases_query = (
-            sql_select(TrafficPurchase)
-            .where(TrafficPurchase.subscription_id == subscription.id)
-            .where(TrafficPurchase.expires_at > now)
-            .order_by(TrafficPurchase.expires_at.asc())
-        )
-        purchases_result = await db.execute(purchases_query)
-        purchases = purchases_result.scalars().all()
-
-        for purchase in purchases:
-            time_remaining = purchase.expires_at - now
-            days_remaining = max(0, int(time_remaining.total_seconds() / 86400))
-            total_duration_seconds = (purchase.expires_at - purchase.created_at).total_seconds()
-            elapsed_seconds = (now - purchase.created_at).total_seconds()
-            progress_percent = min(
-                100.0, max(0.0, (elapsed_seconds / total_duration_seconds * 100) if total_duration_seconds > 0 else 0)
-            )
-
-            traffic_purchases_data.append(
-                {
-                    'id': purchase.id,
-                    'traffic_gb': purchase.traffic_gb,
-                    'expires_at': purchase.expires_at,
-                    'created_at': purchase.created_at,
-                    'days_remaining': days_remaining,
-                    'progress_percent': round(progress_percent, 1),
-                }
-            )
-
     return MiniAppSubscriptionResponse(
-        traffic_purchases=traffic_purchases_data,
+        traffic_purchases=loaded.get('traffic_purchases', []),
         subscription_id=getattr(subscription, 'id', None),
         remnawave_short_uuid=remnawave_short_uuid,
         user=response_user,
@@ -3531,8 +3596,8 @@ async def get_subscription_details(
         balance_kopeks=user.balance_kopeks,
         balance_rubles=round(user.balance_rubles, 2),
         balance_currency=balance_currency,
-        transactions=[_serialize_transaction(tx) for tx in transactions],
-        promo_offers=promo_offers,
+        transactions=loaded['transactions'],
+        promo_offers=loaded['promo_offers'],
         promo_group=(
             MiniAppPromoGroup(
                 id=promo_group.id,
@@ -3553,9 +3618,9 @@ async def get_subscription_details(
         autopay=autopay_payload,
         autopay_settings=autopay_payload,
         branding=settings.get_miniapp_branding(),
-        faq=faq_payload,
-        legal_documents=legal_documents_payload,
-        referral=referral_info,
+        faq=loaded['faq'],
+        legal_documents=loaded['legal_documents'],
+        referral=loaded['referral'],
         subscription_missing=subscription is None,
         subscription_missing_reason=subscription_missing_reason,
         trial_available=trial_available,
@@ -3565,7 +3630,7 @@ async def get_subscription_details(
         trial_price_kopeks=trial_price_kopeks if trial_payment_required else None,
         trial_price_label=trial_price_label,
         sales_mode=settings.get_sales_mode(),
-        current_tariff=await _get_current_tariff_model(db, subscription, user) if subscription else None,
+        current_tariff=current_tariff,
         **autopay_extras,
     )
 
@@ -6,6 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Security, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.crud.discount_offer import (
+    bulk_upsert_discount_offers,
     count_discount_offers,
     get_offer_by_id,
     list_discount_offers,
@@ -334,21 +335,18 @@ async def broadcast_promo_offers(
                 'Subscription does not belong to the user',
             )
 
-    created_offers = 0
-    for user in recipients.values():
-        offer = await upsert_discount_offer(
-            db,
-            user_id=user.id,
-            subscription_id=payload.subscription_id,
-            notification_type=payload.notification_type.strip(),
-            discount_percent=payload.discount_percent,
-            bonus_amount_kopeks=payload.bonus_amount_kopeks,
-            valid_hours=payload.valid_hours,
-            effect_type=payload.effect_type,
-            extra_data=payload.extra_data,
-        )
-        if offer:
-            created_offers += 1
+    offer_ids = await bulk_upsert_discount_offers(
+        db,
+        user_ids=list(recipients),
+        subscription_id=payload.subscription_id,
+        notification_type=payload.notification_type.strip(),
+        discount_percent=payload.discount_percent,
+        bonus_amount_kopeks=payload.bonus_amount_kopeks,
+        valid_hours=payload.valid_hours,
+        effect_type=payload.effect_type,
+        extra_data=payload.extra_data,
+    )
+    created_offers = len(offer_ids)
 
     return PromoOfferBroadcastResponse(
         created_offers=created_offers,
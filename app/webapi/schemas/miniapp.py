@@ -40,6 +40,8 @@ class MiniAppSubscriptionUser(BaseModel):
     device_limit: int | None = None
     traffic_used_gb: float = 0.0
     traffic_used_label: str
+    # Момент синхронизации снимка трафика с панелью; None — снимок обновляется в фоне
+    traffic_used_synced_at: datetime | None = None
     traffic_limit_gb: int | None = None
     traffic_limit_label: str
     lifetime_used_traffic_gb: float = 0.0
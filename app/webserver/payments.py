@@ -20,6 +20,7 @@ from app.external.tribute import TributeService as TributeAPI
 from app.external.wata_webhook import WataWebhookHandler
 from app.services.pal24_service import Pal24Service
 from app.services.payment_service import PaymentService
+from app.services.payment_webhook_inbox import payment_webhook_inbox
 from app.services.tribute_service import TributeService
 
 
@@ -140,6 +141,13 @@ async def _process_payment_service_callback(
     payload: dict,
     method_name: str,
 ) -> bool:
+    # С inbox вебхук только сохраняется (повтор схлопывается по idempotency_key),
+    # а зачисление выполняет воркер payment_webhook_inbox: ответ провайдеру не ждёт
+    # панели и уведомлений. True — событие принято, ошибка записи в БД — исключение.
+    if settings.PAYMENT_WEBHOOK_INBOX_ENABLED:
+        await payment_webhook_inbox.enqueue(method_name, payload)
+        return True
+
     async with _get_webhook_callback_semaphore():
         db_generator = get_db()
         try:
@@ -56,6 +56,10 @@ class TelegramWebhookProcessor:
     def is_running(self) -> bool:
         return self._running
 
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
     async def start(self) -> None:
         async with self._lifecycle_lock:
             if self._running:
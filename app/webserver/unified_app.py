@@ -15,7 +15,10 @@ from app.cabinet.apple_iap import apple_iap_only_router
 from app.config import settings
 from app.services.disposable_email_service import disposable_email_service
 from app.services.payment_service import PaymentService
+from app.services.payment_webhook_inbox import payment_webhook_inbox
+from app.utils.metrics import QUEUE_DEPTH, metrics
 from app.webapi.docs import add_redoc_endpoint
+from app.webapi.middleware import HttpMetricsMiddleware
 
 from . import payments, telegram
 
@@ -95,6 +98,9 @@ def _create_base_app(lifespan: Any = None) -> FastAPI:
             else:
                 app.include_router(apple_iap_only_router)
 
+    if metrics.enabled:
+        app.add_middleware(HttpMetricsMiddleware)
+
     _attach_docs_alias(app, app.docs_url)
     return app
 
@@ -184,6 +190,11 @@ def create_unified_app(
     if payments_router:
         app.include_router(payments_router)
 
+        if settings.PAYMENT_WEBHOOK_INBOX_ENABLED:
+            payment_webhook_inbox.set_payment_service(payment_service)
+            startup_handlers.append(payment_webhook_inbox.start)
+            shutdown_handlers.append(payment_webhook_inbox.stop)
+
     # Mount RemnaWave incoming webhook router
     remnawave_webhook_enabled = settings.is_remnawave_webhook_enabled()
     if remnawave_webhook_enabled:
@@ -225,6 +236,10 @@ def create_unified_app(
             shutdown_timeout=settings.get_webhook_shutdown_timeout(),
         )
         app.state.telegram_webhook_processor = telegram_processor
+        metrics.add_collector(
+            'telegram_webhook_queue',
+            lambda: QUEUE_DEPTH.labels('telegram_webhook').set(telegram_processor.queue_depth),
+        )
 
         startup_handlers.append(telegram_processor.start)
         shutdown_handlers.append(telegram_processor.stop)
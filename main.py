@@ -20,6 +20,7 @@ from app.logging_config import _resolve_log_level, setup_logging
 from app.services.backup_service import backup_service
 from app.services.ban_notification_service import ban_notification_service
 from app.services.broadcast_service import broadcast_service
+from app.services.button_click_log_writer import button_click_log_writer
 from app.services.contest_rotation_service import contest_rotation_service
 from app.services.daily_subscription_service import daily_subscription_service
 from app.services.grace_access_runtime import grace_access_runtime
@@ -38,13 +39,13 @@ from app.services.payment_verification_service import (
 from app.services.referral_contest_service import referral_contest_service
 from app.services.remnawave_sync_service import remnawave_sync_service
 from app.services.reporting_service import reporting_service
-from app.services.riopay_service import riopay_service
 from app.services.system_settings_service import bot_configuration_service
 from app.services.traffic_monitoring_service import traffic_monitoring_scheduler
 from app.services.version_service import version_service
 from app.services.web_api_token_service import ensure_default_web_api_token
 from app.utils.log_handlers import ExcludePaymentFilter, LevelFilterHandler
 from app.utils.payment_logger import configure_payment_logger
+from app.utils.startup_graph import StartupGraph
 from app.utils.startup_timeline import StartupTimeline
 from app.webapi.server import WebAPIServer
 from app.webserver.unified_app import create_unified_app
@@ -181,12 +182,27 @@ async def main():
     polling_enabled = True
     payment_webhooks_enabled = False
 
-    summary_logged = False
+    startup_graph = StartupGraph(timeline)
 
     try:
         skip_migration = os.getenv('SKIP_MIGRATION', 'false').lower() == 'true'
 
-        if not skip_migration:
+        # Этапы запуска объявлены графом зависимостей: независимые этапы идут
+        # параллельно, сетевые операции, без которых бот может отвечать
+        # пользователям, откладываются до запуска приёма обновлений.
+        bot = None
+        dp = None
+
+        @startup_graph.stage('migrations')
+        async def _migrations_stage() -> None:
+            if skip_migration:
+                timeline.add_manual_step(
+                    'Миграция базы данных (Alembic)',
+                    '⏭️',
+                    'Пропущено',
+                    'SKIP_MIGRATION=true',
+                )
+                return
             async with timeline.stage(
                 'Миграция базы данных (Alembic)',
                 '🧬',
@@ -201,117 +217,132 @@ async def main():
                     if not allow_failure:
                         raise
                     stage.warning(f'Ошибка миграции: {migration_error} (ALLOW_MIGRATION_FAILURE=true)')
-        else:
-            timeline.add_manual_step(
-                'Миграция базы данных (Alembic)',
-                '⏭️',
-                'Пропущено',
-                'SKIP_MIGRATION=true',
-            )
 
-        async with timeline.stage(
-            'Инициализация базы данных',
-            '🗄️',
-            success_message='База данных готова',
-        ) as stage:
-            seq_ok = await sync_postgres_sequences()
-            token_ok = await ensure_default_web_api_token()
-            if not seq_ok:
-                stage.warning('Не удалось синхронизировать последовательности PostgreSQL')
-            if not token_ok:
-                stage.warning('Не удалось создать/проверить дефолтный веб-API токен')
-
-        async with timeline.stage(
-            'RBAC bootstrap',
-            '🔐',
-            success_message='RBAC roles and superadmins ready',
-        ) as stage:
-            try:
-                from app.database.database import AsyncSessionLocal
-                from app.services.rbac_bootstrap_service import bootstrap_superadmins
-
-                async with AsyncSessionLocal() as db:
-                    await bootstrap_superadmins(db)
-            except Exception as error:
-                stage.warning(f'RBAC bootstrap warning: {error}')
-                logger.error('RBAC bootstrap failed', error=error)
-
-        async with timeline.stage(
-            'Синхронизация тарифов из конфига',
-            '💰',
-            success_message='Тарифы синхронизированы',
-        ) as stage:
-            try:
-                from app.database.crud.tariff import ensure_tariffs_synced
-                from app.database.database import AsyncSessionLocal
+        @startup_graph.stage('database', after=['migrations'])
+        async def _database_stage() -> None:
+            async with timeline.stage(
+                'Инициализация базы данных',
+                '🗄️',
+                success_message='База данных готова',
+            ) as stage:
+                seq_ok = await sync_postgres_sequences()
+                token_ok = await ensure_default_web_api_token()
+                if not seq_ok:
+                    stage.warning('Не удалось синхронизировать последовательности PostgreSQL')
+                if not token_ok:
+                    stage.warning('Не удалось создать/проверить дефолтный веб-API токен')
+
+        # Вставки строк ждут синхронизации последовательностей PostgreSQL
+        @startup_graph.stage('rbac', after=['database'])
+        async def _rbac_stage() -> None:
+            async with timeline.stage(
+                'RBAC bootstrap',
+                '🔐',
+                success_message='RBAC roles and superadmins ready',
+            ) as stage:
+                try:
+                    from app.database.database import AsyncSessionLocal
+                    from app.services.rbac_bootstrap_service import bootstrap_superadmins
 
-                async with AsyncSessionLocal() as db:
-                    await ensure_tariffs_synced(db)
-            except Exception as error:
-                stage.warning(f'Не удалось синхронизировать тарифы: {error}')
-                logger.error('❌ Не удалось синхронизировать тарифы', error=error)
+                    async with AsyncSessionLocal() as db:
+                        await bootstrap_superadmins(db)
+                except Exception as error:
+                    stage.warning(f'RBAC bootstrap warning: {error}')
+                    logger.error('RBAC bootstrap failed', error=error)
 
-        async with timeline.stage(
-            'Синхронизация серверов из RemnaWave',
-            '🖥️',
-            success_message='Серверы синхронизированы',
-        ) as stage:
-            try:
-                from app.database.crud.server_squad import ensure_servers_synced
-                from app.database.database import AsyncSessionLocal
+        @startup_graph.stage('tariffs', after=['database'])
+        async def _tariffs_stage() -> None:
+            async with timeline.stage(
+                'Синхронизация тарифов из конфига',
+                '💰',
+                success_message='Тарифы синхронизированы',
+            ) as stage:
+                try:
+                    from app.database.crud.tariff import ensure_tariffs_synced
+                    from app.database.database import AsyncSessionLocal
+
+                    async with AsyncSessionLocal() as db:
+                        await ensure_tariffs_synced(db)
+                except Exception as error:
+                    stage.warning(f'Не удалось синхронизировать тарифы: {error}')
+                    logger.error('❌ Не удалось синхронизировать тарифы', error=error)
+
+        # Загрузка серверов из панели нужна только пустой БД и ходит в сеть —
+        # бот начинает отвечать, не дожидаясь её.
+        @startup_graph.stage('servers', after=['database'], deferred=True)
+        async def _servers_stage() -> None:
+            async with timeline.stage(
+                'Синхронизация серверов из RemnaWave',
+                '🖥️',
+                success_message='Серверы синхронизированы',
+            ) as stage:
+                try:
+                    from app.database.crud.server_squad import ensure_servers_synced
+                    from app.database.database import AsyncSessionLocal
 
-                async with AsyncSessionLocal() as db:
-                    await ensure_servers_synced(db)
-            except Exception as error:
-                stage.warning(f'Не удалось синхронизировать серверы: {error}')
-                logger.error('❌ Не удалось синхронизировать серверы', error=error)
+                    async with AsyncSessionLocal() as db:
+                        await ensure_servers_synced(db)
+                except Exception as error:
+                    stage.warning(f'Не удалось синхронизировать серверы: {error}')
+                    logger.error('❌ Не удалось синхронизировать серверы', error=error)
 
-        async with timeline.stage(
-            'Инициализация платёжных методов',
-            '💳',
-            success_message='Платёжные методы инициализированы',
-        ) as stage:
-            try:
-                from app.database.database import AsyncSessionLocal
-                from app.services.payment_method_config_service import (
-                    ensure_payment_method_configs,
-                    refresh_display_name_overrides,
-                )
+        @startup_graph.stage('payment_methods', after=['database'])
+        async def _payment_methods_stage() -> None:
+            async with timeline.stage(
+                'Инициализация платёжных методов',
+                '💳',
+                success_message='Платёжные методы инициализированы',
+            ) as stage:
+                try:
+                    from app.database.database import AsyncSessionLocal
+                    from app.services.payment_method_config_service import (
+                        ensure_payment_method_configs,
+                        refresh_display_name_overrides,
+                    )
 
-                async with AsyncSessionLocal() as db:
-                    await ensure_payment_method_configs(db)
-                    # Warm the display-name override cache so bot keyboards show
-                    # cabinet-configured method names (matches the cabinet).
-                    await refresh_display_name_overrides(db)
-            except Exception as error:
-                stage.warning(f'Не удалось инициализировать платёжные методы: {error}')
-                logger.error('❌ Не удалось инициализировать платёжные методы', error=error)
+                    async with AsyncSessionLocal() as db:
+                        await ensure_payment_method_configs(db)
+                        # Warm the display-name override cache so bot keyboards show
+                        # cabinet-configured method names (matches the cabinet).
+                        await refresh_display_name_overrides(db)
+                except Exception as error:
+                    stage.warning(f'Не удалось инициализировать платёжные методы: {error}')
+                    logger.error('❌ Не удалось инициализировать платёжные методы', error=error)
+
+        # initialize() пересчитывает цены тарифов после применения SALES_MODE и
+        # рассчитывает на уже синхронизированные тарифы и платёжные методы.
+        @startup_graph.stage('configuration', after=['database', 'tariffs', 'payment_methods'])
+        async def _configuration_stage() -> None:
+            async with timeline.stage(
+                'Загрузка конфигурации из БД',
+                '⚙️',
+                success_message='Конфигурация загружена',
+            ) as stage:
+                try:
+                    await bot_configuration_service.initialize()
+                except Exception as error:
+                    stage.warning(f'Не удалось загрузить конфигурацию: {error}')
+                    logger.error('❌ Не удалось загрузить конфигурацию', error=error)
 
-        async with timeline.stage(
-            'Загрузка конфигурации из БД',
-            '⚙️',
-            success_message='Конфигурация загружена',
-        ) as stage:
-            try:
-                await bot_configuration_service.initialize()
-            except Exception as error:
-                stage.warning(f'Не удалось загрузить конфигурацию: {error}')
-                logger.error('❌ Не удалось загрузить конфигурацию', error=error)
+        @startup_graph.stage('bot', after=['configuration'])
+        async def _bot_stage() -> None:
+            nonlocal bot, dp
+            async with timeline.stage('Настройка бота', '🤖', success_message='Бот настроен') as stage:
+                bot, dp = await setup_bot()
+                stage.log('Кеш и FSM подготовлены')
 
-        bot = None
-        dp = None
-        async with timeline.stage('Настройка бота', '🤖', success_message='Бот настроен') as stage:
-            bot, dp = await setup_bot()
-            stage.log('Кеш и FSM подготовлены')
+            bot_user = await bot.get_me()
+            if bot_user.username and not settings.BOT_USERNAME:
+                settings.BOT_USERNAME = bot_user.username
+                logger.info('BOT_USERNAME auto-detected', bot_username=bot_user.username)
 
-        bot_user = await bot.get_me()
-        if bot_user.username and not settings.BOT_USERNAME:
-            settings.BOT_USERNAME = bot_user.username
-            logger.info('BOT_USERNAME auto-detected', bot_username=bot_user.username)
+        @startup_graph.stage('chat_menu_button', after=['bot'], deferred=True)
+        async def _chat_menu_button_stage() -> None:
+            from app.utils.chat_menu_button import configure_chat_menu_button
 
-        from app.utils.chat_menu_button import configure_chat_menu_button
+            await configure_chat_menu_button(bot)
 
-        await configure_chat_menu_button(bot)
+        await startup_graph.run()
 
         monitoring_service.bot = bot
         maintenance_service.set_bot(bot)
@@ -346,125 +377,160 @@ async def main():
             stage.log(f'Текущая версия: {version_service.current_version}')
             stage.success('Мониторинг, уведомления и рассылки подключены')
 
-        async with timeline.stage(
-            'Сервис бекапов',
-            '🗄️',
-            success_message='Сервис бекапов инициализирован',
-        ) as stage:
-            try:
-                backup_service.bot = bot
-                settings_obj = await backup_service.get_backup_settings()
-                if settings_obj.auto_backup_enabled:
-                    await backup_service.start_auto_backup()
-                    stage.log(
-                        'Автобекапы включены: интервал '
-                        f'{settings_obj.backup_interval_hours}ч, запуск {settings_obj.backup_time}'
-                    )
-                else:
-                    stage.log('Автобекапы отключены настройками')
-                stage.success('Сервис бекапов инициализирован')
-            except Exception as e:
-                stage.warning(f'Ошибка инициализации сервиса бекапов: {e}')
-                logger.error('❌ Ошибка инициализации сервиса бекапов', error=e)
+        @startup_graph.stage('backups', after=['bot'])
+        async def _backups_stage() -> None:
+            async with timeline.stage(
+                'Сервис бекапов',
+                '🗄️',
+                success_message='Сервис бекапов инициализирован',
+            ) as stage:
+                try:
+                    backup_service.bot = bot
+                    settings_obj = await backup_service.get_backup_settings()
+                    if settings_obj.auto_backup_enabled:
+                        await backup_service.start_auto_backup()
+                        stage.log(
+                            'Автобекапы включены: интервал '
+                            f'{settings_obj.backup_interval_hours}ч, запуск {settings_obj.backup_time}'
+                        )
+                    else:
+                        stage.log('Автобекапы отключены настройками')
+                    stage.success('Сервис бекапов инициализирован')
+                except Exception as e:
+                    stage.warning(f'Ошибка инициализации сервиса бекапов: {e}')
+                    logger.error('❌ Ошибка инициализации сервиса бекапов', error=e)
 
-        async with timeline.stage(
-            'Сервис отчетов',
-            '📊',
-            success_message='Сервис отчетов готов',
-        ) as stage:
-            try:
-                reporting_service.set_bot(bot)
-                await reporting_service.start()
-            except Exception as e:
-                stage.warning(f'Ошибка запуска сервиса отчетов: {e}')
-                logger.error('❌ Ошибка запуска сервиса отчетов', error=e)
+        @startup_graph.stage('reporting', after=['bot'])
+        async def _reporting_stage() -> None:
+            async with timeline.stage(
+                'Сервис отчетов',
+                '📊',
+                success_message='Сервис отчетов готов',
+            ) as stage:
+                try:
+                    reporting_service.set_bot(bot)
+                    await reporting_service.start()
+                except Exception as e:
+                    stage.warning(f'Ошибка запуска сервиса отчетов: {e}')
+                    logger.error('❌ Ошибка запуска сервиса отчетов', error=e)
 
-        async with timeline.stage(
-            'Реферальные конкурсы',
-            '🏆',
-            success_message='Сервис конкурсов готов',
-        ) as stage:
-            try:
-                await referral_contest_service.start()
-                if referral_contest_service.is_running():
-                    stage.log('Автосводки по конкурсам запущены')
-                else:
-                    stage.skip('Сервис конкурсов выключен настройками')
-            except Exception as e:
-                stage.warning(f'Ошибка запуска сервиса конкурсов: {e}')
-                logger.error('❌ Ошибка запуска сервиса конкурсов', error=e)
+        @startup_graph.stage('settings_sync', after=['bot'])
+        async def _settings_sync_stage() -> None:
+            async with timeline.stage(
+                'Синхронизация настроек',
+                '🔁',
+                success_message='Изменения настроек синхронизируются между процессами',
+            ) as stage:
+                try:
+                    from app.services.system_settings_sync import system_settings_sync
 
-        async with timeline.stage(
-            'Ротация игр',
-            '🎲',
-            success_message='Мини-игры готовы',
-        ) as stage:
-            try:
-                contest_rotation_service.set_bot(bot)
-                await contest_rotation_service.start()
-                if contest_rotation_service.is_running():
-                    stage.log('Ротационные игры запущены')
-                else:
-                    stage.skip('Ротация игр выключена настройками')
-            except Exception as e:
-                stage.warning(f'Ошибка запуска ротации игр: {e}')
-                logger.error('❌ Ошибка запуска ротации игр', error=e)
+                    await system_settings_sync.start()
+                    if system_settings_sync.is_running():
+                        stage.log(f'Сверка версии настроек: каждые {settings.get_system_settings_sync_interval()} с')
+                    else:
+                        stage.skip('Redis недоступен, настройки применяются только в текущем процессе')
+                except Exception as e:
+                    stage.warning(f'Ошибка запуска синхронизации настроек: {e}')
+                    logger.error('❌ Ошибка запуска синхронизации настроек', error=e)
 
-        if settings.is_log_rotation_enabled():
+        @startup_graph.stage('referral_contests', after=['bot'])
+        async def _referral_contests_stage() -> None:
             async with timeline.stage(
-                'Ротация логов',
-                '📋',
-                success_message='Сервис ротации логов готов',
+                'Реферальные конкурсы',
+                '🏆',
+                success_message='Сервис конкурсов готов',
             ) as stage:
                 try:
-                    log_rotation_service.set_bot(bot)
-                    await log_rotation_service.start()
-                    status = log_rotation_service.get_status()
-                    stage.log(f'Время ротации: {status.rotation_time}')
-                    stage.log(f'Хранение архивов: {status.keep_days} дней')
-                    if status.send_to_telegram:
-                        stage.log('Отправка в Telegram: включена')
-                    if status.next_rotation:
-                        from datetime import datetime
-
-                        next_dt = datetime.fromisoformat(status.next_rotation)
-                        stage.log(f'Следующая ротация: {next_dt.strftime("%d.%m.%Y %H:%M")}')
+                    await referral_contest_service.start()
+                    if referral_contest_service.is_running():
+                        stage.log('Автосводки по конкурсам запущены')
+                    else:
+                        stage.skip('Сервис конкурсов выключен настройками')
                 except Exception as e:
-                    stage.warning(f'Ошибка запуска сервиса ротации логов: {e}')
-                    logger.error('❌ Ошибка запуска сервиса ротации логов', error=e)
+                    stage.warning(f'Ошибка запуска сервиса конкурсов: {e}')
+                    logger.error('❌ Ошибка запуска сервиса конкурсов', error=e)
 
-        async with timeline.stage(
-            'Автосинхронизация RemnaWave',
-            '🔄',
-            success_message='Сервис автосинхронизации готов',
-        ) as stage:
-            try:
-                await remnawave_sync_service.initialize()
-                status = remnawave_sync_service.get_status()
-                if status.enabled:
-                    times_text = ', '.join(t.strftime('%H:%M') for t in status.times) or '—'
-                    if status.next_run:
-                        next_run_text = status.next_run.strftime('%d.%m.%Y %H:%M')
-                        stage.log(f'Активирована: расписание {times_text}, ближайший запуск {next_run_text}')
+        @startup_graph.stage('game_rotation', after=['bot'])
+        async def _game_rotation_stage() -> None:
+            async with timeline.stage(
+                'Ротация игр',
+                '🎲',
+                success_message='Мини-игры готовы',
+            ) as stage:
+                try:
+                    contest_rotation_service.set_bot(bot)
+                    await contest_rotation_service.start()
+                    if contest_rotation_service.is_running():
+                        stage.log('Ротационные игры запущены')
                     else:
-                        stage.log(f'Активирована: расписание {times_text}')
-                else:
-                    stage.log('Автосинхронизация отключена настройками')
-            except Exception as e:
-                stage.warning(f'Ошибка запуска автосинхронизации: {e}')
-                logger.error('❌ Ошибка запуска автосинхронизации RemnaWave', error=e)
+                        stage.skip('Ротация игр выключена настройками')
+                except Exception as e:
+                    stage.warning(f'Ошибка запуска ротации игр: {e}')
+                    logger.error('❌ Ошибка запуска ротации игр', error=e)
+
+        @startup_graph.stage('log_rotation', after=['bot'])
+        async def _log_rotation_stage() -> None:
+            if settings.is_log_rotation_enabled():
+                async with timeline.stage(
+                    'Ротация логов',
+                    '📋',
+                    success_message='Сервис ротации логов готов',
+                ) as stage:
+                    try:
+                        log_rotation_service.set_bot(bot)
+                        await log_rotation_service.start()
+                        status = log_rotation_service.get_status()
+                        stage.log(f'Время ротации: {status.rotation_time}')
+                        stage.log(f'Хранение архивов: {status.keep_days} дней')
+                        if status.send_to_telegram:
+                            stage.log('Отправка в Telegram: включена')
+                        if status.next_rotation:
+                            from datetime import datetime
+
+                            next_dt = datetime.fromisoformat(status.next_rotation)
+                            stage.log(f'Следующая ротация: {next_dt.strftime("%d.%m.%Y %H:%M")}')
+                    except Exception as e:
+                        stage.warning(f'Ошибка запуска сервиса ротации логов: {e}')
+                        logger.error('❌ Ошибка запуска сервиса ротации логов', error=e)
+
+        @startup_graph.stage('remnawave_autosync', after=['bot'])
+        async def _remnawave_autosync_stage() -> None:
+            async with timeline.stage(
+                'Автосинхронизация RemnaWave',
+                '🔄',
+                success_message='Сервис автосинхронизации готов',
+            ) as stage:
+                try:
+                    await remnawave_sync_service.initialize()
+                    status = remnawave_sync_service.get_status()
+                    if status.enabled:
+                        times_text = ', '.join(t.strftime('%H:%M') for t in status.times) or '—'
+                        if status.next_run:
+                            next_run_text = status.next_run.strftime('%d.%m.%Y %H:%M')
+                            stage.log(f'Активирована: расписание {times_text}, ближайший запуск {next_run_text}')
+                        else:
+                            stage.log(f'Активирована: расписание {times_text}')
+                    else:
+                        stage.log('Автосинхронизация отключена настройками')
+                except Exception as e:
+                    stage.warning(f'Ошибка запуска автосинхронизации: {e}')
+                    logger.error('❌ Ошибка запуска автосинхронизации RemnaWave', error=e)
 
-        async with timeline.stage(
-            'Grace-доступ для продления',
-            '🛟',
-            success_message='Сервис grace-доступа готов',
-        ) as stage:
-            try:
-                await grace_access_runtime.start()
-                stage.log(f'Режим: {grace_access_runtime.mode.value}')
-            except Exception as e:
-                stage.warning(f'Grace-доступ безопасно отключён из-за ошибки конфигурации: {e}')
-                logger.error('Ошибка запуска grace-доступа; основной бот продолжает работу', error=e)
+        @startup_graph.stage('grace_access', after=['bot'])
+        async def _grace_access_stage() -> None:
+            async with timeline.stage(
+                'Grace-доступ для продления',
+                '🛟',
+                success_message='Сервис grace-доступа готов',
+            ) as stage:
+                try:
+                    await grace_access_runtime.start()
+                    stage.log(f'Режим: {grace_access_runtime.mode.value}')
+                except Exception as e:
+                    stage.warning(f'Grace-доступ безопасно отключён из-за ошибки конфигурации: {e}')
+                    logger.error('Ошибка запуска grace-доступа; основной бот продолжает работу', error=e)
+
+        await startup_graph.run()
 
         # Разовая фоновая чистка накопившихся дублей тарифных подписок (multi-tariff):
         # лишние истёкшие дубли удаляются из БД и панели вместе, как штатное удаление.
@@ -550,6 +616,40 @@ async def main():
             else:
                 stage.skip('NaloGO отключен настройками')
 
+        async with timeline.stage(
+            'Статус серверов',
+            '📊',
+            success_message='Сборщик статусов серверов запущен',
+        ) as stage:
+            if settings.get_server_status_mode() == 'xray':
+                try:
+                    from app.services.server_status_service import server_status_service
+
+                    await server_status_service.start()
+                    stage.log(f'Интервал опроса метрик: {settings.get_server_status_refresh_interval()} с')
+                except Exception as e:
+                    stage.warning(f'Ошибка запуска сборщика статусов серверов: {e}')
+                    logger.error('❌ Ошибка запуска сборщика статусов серверов', error=e)
+            else:
+                stage.skip('Интеграция с XrayChecker отключена')
+
+        async with timeline.stage(
+            'Каталог цен',
+            '💰',
+            success_message='Каталог цен загружен',
+        ) as stage:
+            if settings.PRICING_CATALOG_ENABLED:
+                try:
+                    from app.services.pricing_catalog import pricing_catalog
+
+                    await pricing_catalog.start()
+                    stage.log(f'Сверка версии каталога: каждые {settings.get_pricing_catalog_sync_interval()} с')
+                except Exception as e:
+                    stage.warning(f'Ошибка загрузки каталога цен: {e}')
+                    logger.error('❌ Ошибка загрузки каталога цен, расчёт цен идёт через БД', error=e)
+            else:
+                stage.skip('Каталог цен отключен настройками')
+
         bot_run_mode = settings.get_bot_run_mode()
         polling_enabled = bot_run_mode == 'polling'
         telegram_webhook_enabled = bot_run_mode == 'webhook'
@@ -713,6 +813,9 @@ async def main():
                 polling_task = None
                 stage.skip('Polling отключен режимом работы')
 
+        startup_graph.mark_serving()
+        startup_graph.start_deferred()
+
         webhook_lines: list[str] = []
         base_url = settings.WEBHOOK_URL or f'http://{settings.WEB_API_HOST}:{settings.WEB_API_PORT}'
 
@@ -772,9 +875,6 @@ async def main():
         )
         timeline.log_section('Активные фоновые сервисы', services_lines, icon='📄')
 
-        timeline.log_summary()
-        summary_logged = True
-
         # Отправляем стартовое уведомление в админский чат
         try:
             from app.services.startup_notification_service import send_bot_startup_notification
@@ -851,9 +951,9 @@ async def main():
         raise
 
     finally:
-        if not summary_logged:
-            timeline.log_summary()
-            summary_logged = True
+        # Отменённые отложенные этапы сами логируют отчёт о запуске
+        await startup_graph.cancel_deferred()
+        startup_graph.log_report()
         logger.info('🛑 Начинается корректное завершение работы...')
 
         logger.info('ℹ️ Остановка сервиса автопроверки пополнений...')
@@ -978,10 +1078,75 @@ async def main():
             except Exception as error:
                 logger.error('Ошибка остановки веб-API', error=error)
 
+        logger.info('ℹ️ Остановка фоновых массовых действий...')
+        try:
+            from app.cabinet.routes.admin_bulk_actions import stop_bulk_jobs
+
+            await stop_bulk_jobs()
+        except Exception as e:
+            logger.error('Ошибка остановки фоновых массовых действий', error=e)
+
+        logger.info('ℹ️ Отправка очереди писем и закрытие SMTP-соединений...')
+        try:
+            from app.cabinet.services.email_dispatcher import email_dispatcher
+
+            await email_dispatcher.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки очереди писем', error=e)
+
+        logger.info('ℹ️ Остановка сборщика статусов серверов...')
+        try:
+            from app.services.server_status_service import server_status_service
+
+            await server_status_service.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки сборщика статусов серверов', error=e)
+
+        logger.info('ℹ️ Остановка синхронизации настроек...')
         try:
-            await riopay_service.close()
+            from app.services.system_settings_sync import system_settings_sync
+
+            await system_settings_sync.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки синхронизации настроек', error=e)
+
+        logger.info('ℹ️ Остановка синхронизации каталога цен...')
+        try:
+            from app.services.pricing_catalog import pricing_catalog
+
+            await pricing_catalog.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки синхронизации каталога цен', error=e)
+
+        logger.info('ℹ️ Остановка генерации crypto-ссылок...')
+        try:
+            from app.services.happ_crypto_links import happ_crypto_link_filler
+
+            await happ_crypto_link_filler.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки генерации crypto-ссылок', error=e)
+
+        logger.info('ℹ️ Остановка очереди повторов RemnaWave...')
+        try:
+            from app.services.remnawave_retry_queue import remnawave_retry_queue
+
+            await remnawave_retry_queue.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки очереди повторов RemnaWave', error=e)
+
+        logger.info('ℹ️ Запись буфера лога действий...')
+        try:
+            await button_click_log_writer.stop()
+        except Exception as e:
+            logger.error('Ошибка остановки записи лога действий', error=e)
+
+        logger.info('ℹ️ Закрытие HTTP-клиентов платёжных провайдеров...')
+        try:
+            from app.utils.http_clients import http_clients
+
+            await http_clients.close()
         except Exception as e:
-            logger.error('Ошибка закрытия сессии RioPay', error=e)
+            logger.error('Ошибка закрытия HTTP-клиентов', error=e)
 
         if 'bot' in locals():
             try:
@@ -0,0 +1,74 @@
+"""add bulk_action_jobs + bulk_action_job_results
+
+Массовые действия из кабинета выполняются фоновой задачей вместо цикла внутри
+HTTP-запроса. Задача хранит цели и параметры, счётчики прогресса обновляются
+по чанкам, результаты по целям пишутся с возрастающим ``seq``, чтобы клиент мог
+дочитать прогресс после обрыва SSE-соединения.
+
+``0001`` создаёт свежую схему через ``create_all``, поэтому создание таблиц
+защищено проверкой инспектора.
+
+Revision ID: 0105
+Revises: 0104
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0105'
+down_revision = '0104'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    if 'bulk_action_jobs' not in tables:
+        op.create_table(
+            'bulk_action_jobs',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('action', sa.String(length=50), nullable=False),
+            sa.Column('target_type', sa.String(length=20), nullable=False),
+            sa.Column('target_ids', sa.JSON(), nullable=False),
+            sa.Column('params', sa.JSON(), nullable=False),
+            sa.Column('dry_run', sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.Column('status', sa.String(length=20), nullable=False, server_default='queued'),
+            sa.Column('cancel_requested', sa.Boolean(), nullable=False, server_default=sa.false()),
+            sa.Column('total_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('processed_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('success_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('error_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('skipped_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('panel_error_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('admin_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='SET NULL'), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index('ix_bulk_action_jobs_id', 'bulk_action_jobs', ['id'])
+        op.create_index('ix_bulk_action_jobs_status', 'bulk_action_jobs', ['status'])
+
+    if 'bulk_action_job_results' not in tables:
+        op.create_table(
+            'bulk_action_job_results',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('job_id', sa.Integer(), sa.ForeignKey('bulk_action_jobs.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('seq', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('subscription_id', sa.Integer(), nullable=True),
+            sa.Column('success', sa.Boolean(), nullable=False),
+            sa.Column('message', sa.Text(), nullable=False),
+            sa.Column('username', sa.String(length=255), nullable=True),
+            sa.Column('subscriptions', sa.JSON(), nullable=True),
+            sa.UniqueConstraint('job_id', 'seq', name='uq_bulk_action_job_results_seq'),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('bulk_action_job_results')
+    op.drop_table('bulk_action_jobs')
@@ -0,0 +1,85 @@
+"""add denormalized spending counters to users
+
+Админский список пользователей сортировал по тратам/числу покупок через
+агрегат ``GROUP BY`` по всей таблице ``transactions``. Теперь у пользователя
+есть ``total_spent_kopeks``, ``purchase_count`` и ``last_purchase_at``, которые
+обновляются при записи транзакций, а сортировка идёт по индексам.
+
+Бэкфилл пересчитывает счётчики из истории транзакций (тот же фильтр, что и у
+``_build_spending_stats_select``).
+
+Revision ID: 0106
+Revises: 0105
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0106'
+down_revision = '0105'
+branch_labels = None
+depends_on = None
+
+
+_BACKFILL_SQL = """
+UPDATE users
+SET total_spent_kopeks = stats.total_spent,
+    purchase_count = stats.purchase_count,
+    last_purchase_at = stats.last_purchase_at
+FROM (
+    SELECT user_id,
+           SUM(ABS(amount_kopeks)) AS total_spent,
+           COUNT(*) AS purchase_count,
+           MAX(created_at) AS last_purchase_at
+    FROM transactions
+    WHERE type = 'subscription_payment' AND is_completed = true
+    GROUP BY user_id
+) AS stats
+WHERE users.id = stats.user_id
+"""
+
+
+def _columns(inspector: sa.Inspector, table: str) -> set[str]:
+    return {column['name'] for column in inspector.get_columns(table)}
+
+
+def _index_names(inspector: sa.Inspector, table: str) -> set[str]:
+    return {str(item['name']) for item in inspector.get_indexes(table) if item.get('name')}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'users' not in set(inspector.get_table_names()):
+        return
+
+    columns = _columns(inspector, 'users')
+    added = False
+    if 'total_spent_kopeks' not in columns:
+        op.add_column('users', sa.Column('total_spent_kopeks', sa.BigInteger(), nullable=False, server_default='0'))
+        added = True
+    if 'purchase_count' not in columns:
+        op.add_column('users', sa.Column('purchase_count', sa.Integer(), nullable=False, server_default='0'))
+        added = True
+    if 'last_purchase_at' not in columns:
+        op.add_column('users', sa.Column('last_purchase_at', sa.DateTime(timezone=True), nullable=True))
+        added = True
+
+    inspector = sa.inspect(bind)
+    indexes = _index_names(inspector, 'users')
+    if 'ix_users_total_spent' not in indexes:
+        op.create_index('ix_users_total_spent', 'users', ['total_spent_kopeks', 'created_at'])
+    if 'ix_users_purchase_count' not in indexes:
+        op.create_index('ix_users_purchase_count', 'users', ['purchase_count', 'created_at'])
+
+    if added and 'transactions' in set(inspector.get_table_names()):
+        op.execute(sa.text(_BACKFILL_SQL))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_purchase_count', table_name='users')
+    op.drop_index('ix_users_total_spent', table_name='users')
+    op.drop_column('users', 'last_purchase_at')
+    op.drop_column('users', 'purchase_count')
+    op.drop_column('users', 'total_spent_kopeks')
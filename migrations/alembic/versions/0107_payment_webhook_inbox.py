@@ -0,0 +1,52 @@
+"""add payment_webhook_inbox
+
+Вебхуки платёжных провайдеров после проверки IP/подписи сохраняются в
+``payment_webhook_inbox`` и сразу подтверждаются, а зачисление, обновление
+панели и уведомления выполняет фоновый воркер. Уникальный
+``idempotency_key`` схлопывает повторные доставки одного события на уровне БД.
+
+Revision ID: 0107
+Revises: 0106
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0107'
+down_revision = '0106'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if 'payment_webhook_inbox' in sa.inspect(bind).get_table_names():
+        return
+
+    op.create_table(
+        'payment_webhook_inbox',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('provider', sa.String(length=32), nullable=False),
+        sa.Column('method', sa.String(length=64), nullable=False),
+        sa.Column('idempotency_key', sa.String(length=128), nullable=False),
+        sa.Column('ordering_key', sa.String(length=255), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint('idempotency_key', name='uq_payment_webhook_inbox_idempotency_key'),
+    )
+    op.create_index('ix_payment_webhook_inbox_id', 'payment_webhook_inbox', ['id'])
+    op.create_index(
+        'ix_payment_webhook_inbox_status_next_attempt', 'payment_webhook_inbox', ['status', 'next_attempt_at']
+    )
+    op.create_index('ix_payment_webhook_inbox_ordering_key', 'payment_webhook_inbox', ['ordering_key', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_table('payment_webhook_inbox')
@@ -0,0 +1,69 @@
+"""add referral_contest_scores
+
+Лидерборд реферального конкурса считался ``GROUP BY`` по всем событиям
+конкурса на каждый просмотр и сводку. Теперь счёт участника хранится в
+``referral_contest_scores`` и обновляется при записи события, а топ и место
+участника читаются по индексу ``(contest_id, referral_count, total_amount_kopeks)``.
+
+Бэкфилл повторяет фильтр прежнего лидерборда: события в границах конкурса,
+полночный ``end_at`` — конец дня.
+
+Revision ID: 0108
+Revises: 0107
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0108'
+down_revision = '0107'
+branch_labels = None
+depends_on = None
+
+
+_BACKFILL_SQL = """
+INSERT INTO referral_contest_scores (contest_id, referrer_id, referral_count, total_amount_kopeks)
+SELECT e.contest_id, e.referrer_id, COUNT(e.id), COALESCE(SUM(ABS(e.amount_kopeks)), 0)
+FROM referral_contest_events e
+JOIN referral_contests c ON c.id = e.contest_id
+WHERE e.occurred_at >= c.start_at
+  AND e.occurred_at <= CASE
+      WHEN date_trunc('second', c.end_at AT TIME ZONE 'UTC') = date_trunc('day', c.end_at AT TIME ZONE 'UTC')
+      THEN date_trunc('second', c.end_at) + interval '1 day' - interval '1 microsecond'
+      ELSE c.end_at
+  END
+GROUP BY e.contest_id, e.referrer_id
+"""
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+    if 'referral_contest_scores' in tables:
+        return
+
+    op.create_table(
+        'referral_contest_scores',
+        sa.Column(
+            'contest_id',
+            sa.Integer(),
+            sa.ForeignKey('referral_contests.id', ondelete='CASCADE'),
+            primary_key=True,
+        ),
+        sa.Column('referrer_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('referral_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_amount_kopeks', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+    op.create_index(
+        'ix_referral_contest_scores_rank',
+        'referral_contest_scores',
+        ['contest_id', 'referral_count', 'total_amount_kopeks'],
+    )
+
+    if {'referral_contest_events', 'referral_contests'} <= tables:
+        op.execute(sa.text(_BACKFILL_SQL))
+
+
+def downgrade() -> None:
+    op.drop_table('referral_contest_scores')
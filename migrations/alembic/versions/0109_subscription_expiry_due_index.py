@@ -0,0 +1,46 @@
+"""add subscriptions (status, end_date) due index
+
+Истечение подписок раньше определялось полным проходом монитора раз в
+``MONITORING_INTERVAL`` и записью из middleware на каждом апдейте. Теперь
+выделенный планировщик спит до ближайшего ``end_date`` активной подписки и
+переводит просроченные в ``expired`` пакетным ``UPDATE``. Оба запроса
+(``MIN(end_date)`` и выборка просроченных) читают индекс ``(status, end_date)``,
+который БД поддерживает при любом изменении ``end_date``.
+
+Revision ID: 0109
+Revises: 0108
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0109'
+down_revision = '0108'
+branch_labels = None
+depends_on = None
+
+
+_INDEX_NAME = 'ix_subscriptions_status_end_date'
+
+
+def _index_names(inspector: sa.Inspector, table: str) -> set[str]:
+    return {str(item['name']) for item in inspector.get_indexes(table) if item.get('name')}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'subscriptions' not in set(inspector.get_table_names()):
+        return
+    if _INDEX_NAME in _index_names(inspector, 'subscriptions'):
+        return
+
+    op.create_index(_INDEX_NAME, 'subscriptions', ['status', 'end_date'])
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if _INDEX_NAME in _index_names(inspector, 'subscriptions'):
+        op.drop_index(_INDEX_NAME, table_name='subscriptions')
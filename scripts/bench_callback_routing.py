@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""Microbenchmark for callback-query routing: linear scan vs. the callback index.
+
+Replays recorded ``callback_data`` through the real handler registration and
+measures how long it takes to find the handler whose filters pass, first with
+aiogram's linear walk over every handler and then with the candidates picked by
+``app.utils.callback_index``.  Both paths must pick the same handler; any
+mismatch is printed and turns the exit code non-zero.
+
+Usage:
+    python -m scripts.bench_callback_routing --file callbacks.txt   # one callback_data per line
+    python -m scripts.bench_callback_routing --from-db --limit 20000  # button_click_logs
+    python -m scripts.bench_callback_routing                        # synthetic data from the index keys
+
+Only filters are evaluated, handlers are never called; FSM-state filters see an
+empty state.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+from pathlib import Path
+from time import perf_counter
+
+from aiogram import Dispatcher
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import CallbackQuery, User
+from sqlalchemy import select
+
+from app.bot import register_all_handlers
+from app.database.database import AsyncSessionLocal
+from app.database.models import ButtonClickLog
+from app.utils.callback_index import CallbackIndex, handler_name, install_callback_index
+
+
+def _event(data: str) -> CallbackQuery:
+    user = User.model_construct(id=1, is_bot=False, first_name='bench')
+    return CallbackQuery.model_construct(id='bench', from_user=user, chat_instance='bench', data=data)
+
+
+async def _first_match(handlers: list[HandlerObject], event: CallbackQuery) -> HandlerObject | None:
+    for handler in handlers:
+        try:
+            passed, _ = await handler.check(event, raw_state=None, event_from_user=event.from_user)
+        except Exception:
+            # Фильтры, которым нужен полный контекст middleware, считаем непрошедшими
+            continue
+        if passed:
+            return handler
+    return None
+
+
+async def _load_from_db(limit: int) -> list[str]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(ButtonClickLog.callback_data)
+            .where(ButtonClickLog.callback_data.is_not(None))
+            .order_by(ButtonClickLog.id.desc())
+            .limit(limit)
+        )
+        return [row for row in result.scalars() if row]
+
+
+def _synthesize(index: CallbackIndex, count: int) -> list[str]:
+    exact, prefixes = index.keys()
+    pool = exact + [f'{prefix}{random.randint(1, 10_000)}' for prefix in prefixes]
+    return [random.choice(pool) for _ in range(count)] if pool else []
+
+
+async def _run(args: argparse.Namespace, recorded: list[str] | None) -> int:
+    dp = Dispatcher()
+    observer = install_callback_index(dp)
+    register_all_handlers(dp)
+    index = observer.compile()
+    report = index.report()
+
+    if recorded is not None:
+        samples = recorded
+    elif args.from_db:
+        samples = await _load_from_db(args.limit)
+    else:
+        samples = _synthesize(index, args.limit)
+    if not samples:
+        print('  нет callback_data для прогона')
+        return 1
+
+    events = [_event(data) for data in samples]
+    handlers = list(observer.handlers)
+
+    started = perf_counter()
+    linear = [await _first_match(handlers, event) for event in events]
+    linear_seconds = perf_counter() - started
+
+    started = perf_counter()
+    indexed = [await _first_match(index.candidates(event.data), event) for event in events]
+    indexed_seconds = perf_counter() - started
+
+    candidates = sum(len(index.candidates(data)) for data in samples) / len(samples)
+    mismatches = [
+        (data, left, right) for data, left, right in zip(samples, linear, indexed, strict=True) if left is not right
+    ]
+
+    print()
+    print('=' * 62)
+    print(f'  хендлеров callback_query   : {report.total} (без индекса: {len(report.unindexed)})')
+    print(f'  callback_data в прогоне    : {len(samples)}')
+    print(f'  кандидатов на нажатие      : {candidates:.1f}')
+    print(f'  линейный проход            : {linear_seconds * 1e6 / len(samples):.1f} мкс/нажатие')
+    print(f'  через индекс               : {indexed_seconds * 1e6 / len(samples):.1f} мкс/нажатие')
+    if indexed_seconds:
+        print(f'  ускорение                  : x{linear_seconds / indexed_seconds:.1f}')
+    if mismatches:
+        print(f'  !! РАСХОЖДЕНИЯ: {len(mismatches)}')
+        for data, left, right in mismatches[:20]:
+            left_name = handler_name(left) if left else '-'
+            right_name = handler_name(right) if right else '-'
+            print(f'     {data!r}: {left_name} != {right_name}')
+    print('=' * 62)
+    return 2 if mismatches else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark callback-query routing against recorded callback_data')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--file', help='file with one callback_data per line')
+    source.add_argument('--from-db', action='store_true', help='replay callback_data from button_click_logs')
+    parser.add_argument('--limit', type=int, default=10_000, help='number of samples (db or synthetic)')
+    args = parser.parse_args()
+    recorded = None
+    if args.file:
+        lines = Path(args.file).read_text(encoding='utf-8').splitlines()
+        recorded = [line.strip() for line in lines if line.strip()]
+    return asyncio.run(_run(args, recorded))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""Фоновые массовые действия: чанки, set-based обновления, отложенная синхронизация с панелью."""
+
+from __future__ import annotations
+
+import contextlib
+import json
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import app.cabinet.routes.admin_bulk_actions as bulk
+from app.cabinet.schemas.bulk_actions import BulkActionType, BulkJobStatus, BulkUserResult
+from app.database.models import (
+    Base,
+    BulkActionJob,
+    BulkActionJobResult,
+    PromoGroup,
+    ServerSquad,
+    Subscription,
+    Tariff,
+    User,
+    UserPromoGroup,
+    server_squad_promo_groups,
+)
+from tests.fixtures.sqlite_memory import ensure_real_aiosqlite
+
+
+_TABLES = [
+    User.__table__,
+    PromoGroup.__table__,
+    UserPromoGroup.__table__,
+    ServerSquad.__table__,
+    server_squad_promo_groups,
+    Tariff.__table__,
+    Subscription.__table__,
+    BulkActionJob.__table__,
+    BulkActionJobResult.__table__,
+]
+
+
+@contextlib.asynccontextmanager
+async def _database(monkeypatch, tmp_path):
+    """Файловая SQLite: задача открывает несколько сессий, им нужна одна БД."""
+    ensure_real_aiosqlite(monkeypatch)
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "bulk.sqlite"}')
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: Base.metadata.create_all(c, tables=_TABLES))
+    maker = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+    monkeypatch.setattr(bulk, 'AsyncSessionLocal', maker)
+    try:
+        yield maker
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture
+def panel_calls(monkeypatch) -> list[int]:
+    calls: list[int] = []
+
+    async def fake_sync(db, user, sub, **kwargs):
+        calls.append(sub.id)
+        return {}
+
+    monkeypatch.setattr(bulk, '_sync_subscription_to_panel', fake_sync)
+    return calls
+
+
+async def _seed(maker, *, users: int, with_subscription: bool = True) -> list[int]:
+    async with maker() as db:
+        created = []
+        for index in range(users):
+            user = User(telegram_id=1000 + index, username=f'user{index}')
+            db.add(user)
+            await db.flush()
+            if with_subscription:
+                db.add(
+                    Subscription(
+                        user_id=user.id,
+                        status='active',
+                        end_date=datetime.now(UTC) + timedelta(days=10),
+                        device_limit=1,
+                        remnawave_short_id=f'short{index}',
+                    )
+                )
+            created.append(user.id)
+        await db.commit()
+    return created
+
+
+async def _create_job(maker, action: BulkActionType, ids: list[int], **params) -> int:
+    async with maker() as db:
+        job = BulkActionJob(
+            action=action.value,
+            target_type='users',
+            target_ids=ids,
+            params=bulk.BulkActionParams(**params).model_dump(),
+            dry_run=False,
+            status=BulkJobStatus.QUEUED.value,
+            total_count=len(ids),
+        )
+        db.add(job)
+        await db.commit()
+        return job.id
+
+
+async def test_set_based_action_updates_chunks_and_defers_panel(monkeypatch, tmp_path, panel_calls) -> None:
+    monkeypatch.setattr(bulk, '_JOB_CHUNK_SIZE', 2)
+    async with _database(monkeypatch, tmp_path) as maker:
+        user_ids = await _seed(maker, users=3)
+        missing_id = 999
+        job_id = await _create_job(maker, BulkActionType.SET_DEVICES, [*user_ids, missing_id], device_limit=5)
+
+        await bulk._run_bulk_job(job_id)
+
+        async with maker() as db:
+            job = await db.get(BulkActionJob, job_id)
+            limits = (await db.scalars(select(Subscription.device_limit))).all()
+            results = (await db.scalars(select(BulkActionJobResult).order_by(BulkActionJobResult.seq))).all()
+
+    assert job.status == BulkJobStatus.COMPLETED
+    assert (job.processed_count, job.success_count, job.skipped_count, job.error_count) == (4, 3, 1, 0)
+    assert limits == [5, 5, 5]
+    assert [row.seq for row in results] == [1, 2, 3, 4]
+    assert results[0].message == 'Set devices to 5'
+    assert results[3].message == 'User not found'
+    assert sorted(panel_calls) == [1, 2, 3]
+
+
+async def test_per_target_failure_reloads_remaining_targets(monkeypatch, tmp_path, panel_calls) -> None:
+    async with _database(monkeypatch, tmp_path) as maker:
+        user_ids = await _seed(maker, users=3)
+        job_id = await _create_job(maker, BulkActionType.ACTIVATE_SUBSCRIPTION, user_ids)
+
+        async def flaky_activate(db, user, params, dry_run, sub_override=None):
+            if user.id == user_ids[0]:
+                raise RuntimeError('boom')
+            sub = bulk._resolve_subscription(user, sub_override)
+            await bulk._panel_sync(db, user, sub)
+            return BulkUserResult(user_id=user.id, success=True, message='ok', username=user.username)
+
+        monkeypatch.setitem(bulk._ACTION_HANDLERS, BulkActionType.ACTIVATE_SUBSCRIPTION, flaky_activate)
+
+        await bulk._run_bulk_job(job_id)
+
+        async with maker() as db:
+            job = await db.get(BulkActionJob, job_id)
+
+    assert (job.success_count, job.error_count) == (2, 1)
+    # Панель вызывается после DB-фазы чанка, а не между мутациями
+    assert sorted(panel_calls) == [2, 3]
+
+
+async def test_cancel_requested_job_stops_before_next_chunk(monkeypatch, tmp_path, panel_calls) -> None:
+    async with _database(monkeypatch, tmp_path) as maker:
+        user_ids = await _seed(maker, users=2)
+        job_id = await _create_job(maker, BulkActionType.SET_DEVICES, user_ids, device_limit=3)
+        async with maker() as db:
+            job = await db.get(BulkActionJob, job_id)
+            job.cancel_requested = True
+            await db.commit()
+
+        await bulk._run_bulk_job(job_id)
+
+        async with maker() as db:
+            job = await db.get(BulkActionJob, job_id)
+
+    assert job.status == BulkJobStatus.CANCELLED
+    assert job.processed_count == 0
+    assert panel_calls == []
+
+
+async def test_assign_promo_group_is_set_based(monkeypatch, tmp_path, panel_calls) -> None:
+    async with _database(monkeypatch, tmp_path) as maker:
+        user_ids = await _seed(maker, users=2, with_subscription=False)
+        async with maker() as db:
+            group = PromoGroup(name='VIP')
+            db.add(group)
+            await db.commit()
+            group_id = group.id
+        job_id = await _create_job(maker, BulkActionType.ASSIGN_PROMO_GROUP, user_ids, promo_group_id=group_id)
+
+        await bulk._run_bulk_job(job_id)
+
+        async with maker() as db:
+            links = (await db.execute(select(UserPromoGroup.user_id, UserPromoGroup.promo_group_id))).all()
+            primary = (await db.scalars(select(User.promo_group_id).order_by(User.id))).all()
+
+    assert sorted(links) == [(user_id, group_id) for user_id in user_ids]
+    assert primary == [group_id, group_id]
+    assert panel_calls == []
+
+
+async def test_event_stream_resumes_after_cursor(monkeypatch, tmp_path, panel_calls) -> None:
+    async with _database(monkeypatch, tmp_path) as maker:
+        user_ids = await _seed(maker, users=3)
+        job_id = await _create_job(maker, BulkActionType.SET_DEVICES, user_ids, device_limit=2)
+        await bulk._run_bulk_job(job_id)
+
+        events = [event async for event in bulk._stream_job_events(job_id, cursor=1)]
+
+    ids = [line.removeprefix('id: ') for event in events for line in event.splitlines() if line.startswith('id: ')]
+    assert ids == ['2', '3']
+    complete = json.loads(events[-1].removeprefix('data: '))
+    assert complete['type'] == 'complete'
+    assert complete['status'] == 'completed'
+    assert complete['processed'] == 3
@@ -0,0 +1,133 @@
+"""Пул SMTP-соединений и очередь писем: одно соединение на много писем, лимиты по доменам."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.cabinet.services.email_dispatcher import DomainRateLimiter, EmailDispatcher
+from app.cabinet.services.email_service import EmailService, OutgoingEmail
+from tests.fixtures.smtp_stub import SmtpStub
+
+
+@pytest.fixture
+def smtp_stub(monkeypatch):
+    from app.config import settings
+
+    with SmtpStub() as stub:
+        monkeypatch.setattr(settings, 'SMTP_HOST', '127.0.0.1', raising=False)
+        monkeypatch.setattr(settings, 'SMTP_PORT', stub.port, raising=False)
+        monkeypatch.setattr(settings, 'SMTP_USER', None, raising=False)
+        monkeypatch.setattr(settings, 'SMTP_PASSWORD', None, raising=False)
+        monkeypatch.setattr(settings, 'SMTP_USE_TLS', False, raising=False)
+        monkeypatch.setattr(settings, 'SMTP_USE_SSL', False, raising=False)
+        monkeypatch.setattr(type(settings), 'is_smtp_configured', lambda self: True)
+        monkeypatch.setattr(type(settings), 'get_smtp_from_email', lambda self: 'noreply@vpn.test')
+        yield stub
+
+
+def _email(address: str) -> OutgoingEmail:
+    return OutgoingEmail(to_email=address, subject='Hi', body_html='<p>hello</p>')
+
+
+def test_pool_reuses_connection_between_messages(smtp_stub) -> None:
+    service = EmailService()
+
+    assert all(service.send_email(f'user{index}@example.com', 'Hi', '<p>x</p>') for index in range(5))
+
+    assert smtp_stub.state.connections == 1
+    assert len(smtp_stub.state.messages) == 5
+    service.pool.close_all()
+
+
+def test_idle_connection_is_checked_with_noop_and_replaced_when_dead(smtp_stub) -> None:
+    service = EmailService()
+    service.pool.noop_after = 0.0
+
+    assert service.send_email('a@example.com', 'Hi', '<p>x</p>')
+    assert service.send_email('b@example.com', 'Hi', '<p>x</p>')
+    assert smtp_stub.state.noops == 1
+    assert smtp_stub.state.connections == 1
+
+    # Сервер рвёт соединение после письма — NOOP это замечает, следующее письмо уходит по новому
+    smtp_stub.state.drop_after_message = True
+    assert service.send_email('c@example.com', 'Hi', '<p>x</p>')
+    assert service.send_email('d@example.com', 'Hi', '<p>x</p>')
+    assert smtp_stub.state.connections == 2
+    assert len(smtp_stub.state.messages) == 4
+    service.pool.close_all()
+
+
+def test_dropped_connection_without_noop_is_retried_once(smtp_stub) -> None:
+    service = EmailService()
+    smtp_stub.state.drop_after_message = True
+
+    assert service.send_email('a@example.com', 'Hi', '<p>x</p>')
+    # Соединение в пуле уже мёртвое, NOOP не делался — отправка переподключается сама
+    assert service.send_email('b@example.com', 'Hi', '<p>x</p>')
+    assert smtp_stub.state.connections == 2
+    assert [rcpt for _, (rcpt,), _ in smtp_stub.state.messages] == ['<a@example.com>', '<b@example.com>']
+    service.pool.close_all()
+
+
+async def test_dispatcher_batches_over_pooled_connections(smtp_stub) -> None:
+    service = EmailService()
+    dispatcher = EmailDispatcher(service, workers=2, batch_size=10, domain_interval=0.0, domain_burst=1)
+
+    results = await dispatcher.send_many([_email(f'user{index}@example.com') for index in range(20)])
+    await dispatcher.stop()
+
+    assert results == [True] * 20
+    assert len(smtp_stub.state.messages) == 20
+    assert smtp_stub.state.connections <= 2
+
+
+async def test_dispatcher_applies_per_domain_rate(smtp_stub) -> None:
+    service = EmailService()
+    dispatcher = EmailDispatcher(service, workers=1, domain_interval=0.05, domain_burst=2)
+
+    started = time.monotonic()
+    results = await dispatcher.send_many(
+        [_email('a@slow.test'), _email('b@slow.test'), _email('c@slow.test'), _email('d@slow.test')]
+    )
+    elapsed = time.monotonic() - started
+    await dispatcher.stop()
+
+    assert results == [True] * 4
+    # 2 письма сразу, затем по одному раз в 50 мс
+    assert elapsed >= 0.09
+
+
+async def test_stopped_worker_reports_result_of_batch_already_sending(smtp_stub) -> None:
+    service = EmailService()
+    release = threading.Event()
+    send_batch = service.send_batch
+
+    def slow_send_batch(emails, not_before=None):
+        release.wait(5)
+        return send_batch(emails, not_before)
+
+    service.send_batch = slow_send_batch
+    dispatcher = EmailDispatcher(service, workers=1, domain_interval=0.0, domain_burst=1)
+    pending = await dispatcher.enqueue(_email('late@example.com'))
+    await asyncio.sleep(0.05)
+
+    # Воркер отменяется, пока поток ещё отправляет: письмо уходит, и ожидающий узнаёт об этом
+    stopping = asyncio.create_task(dispatcher.stop(timeout=0.01))
+    await asyncio.sleep(0.05)
+    release.set()
+    await stopping
+
+    assert await asyncio.wait_for(pending, 5) is True
+    assert len(smtp_stub.state.messages) == 1
+
+
+def test_domain_limiter_is_per_domain() -> None:
+    limiter = DomainRateLimiter(interval=1.0, burst=1)
+
+    assert limiter.reserve('a@gmail.com', now=100.0) == 100.0
+    assert limiter.reserve('b@GMAIL.com', now=100.0) == 101.0
+    assert limiter.reserve('c@mail.ru', now=100.0) == 100.0
@@ -15,7 +15,7 @@ from email.header import decode_header, make_header
 from email.utils import parseaddr
 from typing import Self
 
-from app.cabinet.services.email_service import email_service
+from app.cabinet.services.email_service import SmtpConnectionPool, email_service
 
 
 class _FakeSMTP:
@@ -42,7 +42,7 @@ def _send_and_capture(monkeypatch, from_name: str) -> str:
     monkeypatch.setattr(settings, 'SMTP_FROM_NAME', from_name, raising=False)
 
     fake = _FakeSMTP()
-    monkeypatch.setattr(email_service, '_get_smtp_connection', lambda: fake)
+    monkeypatch.setattr(email_service, 'pool', SmtpConnectionPool(lambda: fake, email_service._connection_signature))
 
     ok = email_service.send_email('to@example.com', 'Subj', '<b>hi</b>')
     assert ok is True
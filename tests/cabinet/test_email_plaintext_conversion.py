@@ -13,7 +13,7 @@ plain-версию, отдавали пользователю простыню C
 """
 
 from app.cabinet.routes.admin_email_templates import SAMPLE_CONTEXTS, _get_default_template
-from app.cabinet.services.email_service import EmailService
+from app.cabinet.services.email_service import EmailService, SmtpConnectionPool
 
 
 def test_style_block_content_is_stripped() -> None:
@@ -127,7 +127,7 @@ def test_send_email_plain_part_is_clean(monkeypatch) -> None:
         def __exit__(self, *args):
             return False
 
-    monkeypatch.setattr(service, '_get_smtp_connection', lambda: _FakeSMTP())
+    monkeypatch.setattr(service, 'pool', SmtpConnectionPool(_FakeSMTP, service._connection_signature))
 
     html = '<html><head><style>body { font-family: Arial; }</style></head><body><p>Код: 123456</p></body></html>'
     ok = service.send_email('user@example.com', 'Тема', html)
@@ -19,12 +19,28 @@ from app.services import promo_offer_email as m
 # отдаёт настоящий модуль из sys.modules — патчим его атрибуты.
 email_service_module = importlib.import_module('app.cabinet.services.email_service')
 overrides_module = importlib.import_module('app.cabinet.services.email_template_overrides')
+dispatcher_module = importlib.import_module('app.cabinet.services.email_dispatcher')
+
+
+def _capture_dispatch(monkeypatch, results=None) -> list:
+    """Подменяет очередь писем: возвращает список ушедших OutgoingEmail."""
+    sent: list = []
+
+    async def fake_send_many(emails):
+        sent.extend(emails)
+        if results is None:
+            return [True] * len(emails)
+        return [results(email) for email in emails]
+
+    monkeypatch.setattr(dispatcher_module.email_dispatcher, 'send_many', fake_send_many)
+    return sent
 
 
 async def test_send_promo_offer_email_skips_when_smtp_not_configured(monkeypatch):
     email_service = MagicMock()
     email_service.is_configured = MagicMock(return_value=False)
     monkeypatch.setattr(email_service_module, 'email_service', email_service)
+    sent = _capture_dispatch(monkeypatch)
 
     ok = await m.send_promo_offer_email(
         email='u@example.com',
@@ -34,14 +50,14 @@ async def test_send_promo_offer_email_skips_when_smtp_not_configured(monkeypatch
     )
 
     assert ok is False
-    email_service.send_email.assert_not_called()
+    assert sent == []
 
 
 async def test_send_promo_offer_email_renders_template_and_sends(monkeypatch):
     email_service = MagicMock()
     email_service.is_configured = MagicMock(return_value=True)
-    email_service.send_email = MagicMock(return_value=True)
     monkeypatch.setattr(email_service_module, 'email_service', email_service)
+    sent = _capture_dispatch(monkeypatch)
     # Без DB-override — падаем на дефолтный шаблон
     monkeypatch.setattr(overrides_module, 'get_rendered_override', AsyncMock(return_value=None))
 
@@ -55,19 +71,19 @@ async def test_send_promo_offer_email_renders_template_and_sends(monkeypatch):
     )
 
     assert ok is True
-    email_service.send_email.assert_called_once()
-    kwargs = email_service.send_email.call_args.kwargs
-    assert kwargs['to_email'] == 'u@example.com'
-    assert '20%' in kwargs['subject']
+    assert len(sent) == 1
+    message = sent[0]
+    assert message.to_email == 'u@example.com'
+    assert '20%' in message.subject
     # Telegram-текст конвертирован в HTML-фрагмент (переносы → <br>)
-    assert 'Скидка <b>20%</b><br>на подписку' in kwargs['body_html']
+    assert 'Скидка <b>20%</b><br>на подписку' in message.body_html
 
 
 async def test_send_promo_offer_email_prefers_db_override(monkeypatch):
     email_service = MagicMock()
     email_service.is_configured = MagicMock(return_value=True)
-    email_service.send_email = MagicMock(return_value=True)
     monkeypatch.setattr(email_service_module, 'email_service', email_service)
+    sent = _capture_dispatch(monkeypatch)
     monkeypatch.setattr(
         overrides_module,
         'get_rendered_override',
@@ -82,9 +98,8 @@ async def test_send_promo_offer_email_prefers_db_override(monkeypatch):
     )
 
     assert ok is True
-    kwargs = email_service.send_email.call_args.kwargs
-    assert kwargs['subject'] == 'SUBJ'
-    assert kwargs['body_html'] == '<p>OVERRIDE</p>'
+    assert sent[0].subject == 'SUBJ'
+    assert sent[0].body_html == '<p>OVERRIDE</p>'
 
 
 async def test_promo_offer_email_template_registered():
@@ -107,15 +122,13 @@ async def test_promo_offer_email_template_registered():
 async def test_email_fanout_counts_sent_and_failed(monkeypatch):
     """Фан-аут работает на скалярных таргетах (email, language, username) и
     честно считает sent/failed — как Telegram-собрат."""
-    calls: list[str] = []
-
-    async def fake_send(**kwargs):
-        calls.append(kwargs['email'])
-        return kwargs['email'] != 'bad@example.com'
-
-    monkeypatch.setattr('app.services.promo_offer_email.send_promo_offer_email', fake_send)
+    email_service = MagicMock()
+    email_service.is_configured = MagicMock(return_value=True)
+    monkeypatch.setattr(email_service_module, 'email_service', email_service)
+    sent = _capture_dispatch(monkeypatch, results=lambda email: email.to_email != 'bad@example.com')
+    monkeypatch.setattr(overrides_module, 'get_rendered_override', AsyncMock(return_value=None))
 
-    sent, failed = await route_module._send_promo_email_notifications(
+    sent_count, failed = await route_module._send_promo_email_notifications(
         [
             ('a@example.com', 'ru', 'A'),
             ('bad@example.com', 'en', 'B'),
@@ -127,8 +140,30 @@ async def test_email_fanout_counts_sent_and_failed(monkeypatch):
         valid_hours=24,
     )
 
-    assert (sent, failed) == (2, 1)
-    assert sorted(calls) == ['a@example.com', 'bad@example.com', 'c@example.com']
+    assert (sent_count, failed) == (2, 1)
+    assert sorted(message.to_email for message in sent) == ['a@example.com', 'bad@example.com', 'c@example.com']
+
+
+async def test_email_fanout_renders_once_per_language_and_personalizes(monkeypatch):
+    """Шаблон рендерится по разу на язык; имя подставляется каждому получателю с экранированием."""
+    email_service = MagicMock()
+    email_service.is_configured = MagicMock(return_value=True)
+    monkeypatch.setattr(email_service_module, 'email_service', email_service)
+    sent = _capture_dispatch(monkeypatch)
+    override = AsyncMock(side_effect=lambda _type, _lang, ctx: (f'Hi {ctx["username"]}', f'<p>{ctx["username"]}</p>'))
+    monkeypatch.setattr(overrides_module, 'get_rendered_override', override)
+
+    await m.send_promo_offer_emails(
+        [('a@example.com', 'ru', 'Ann'), ('b@example.com', 'en', 'Bob'), ('c@example.com', 'ru', '<Eve>')],
+        message_text='hi',
+        valid_hours=24,
+    )
+
+    assert override.await_count == 2
+    by_email = {message.to_email: message for message in sent}
+    assert by_email['a@example.com'].body_html == '<p>Ann</p>'
+    assert by_email['c@example.com'].body_html == '<p>&lt;Eve&gt;</p>'
+    assert by_email['c@example.com'].subject == 'Hi <Eve>'
 
 
 async def test_email_fanout_empty_targets_noop():
@@ -0,0 +1,94 @@
+"""Set-based операции с офферами: массовый upsert рассылки и истечение одним UPDATE."""
+
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import select
+
+from app.database.crud.discount_offer import bulk_upsert_discount_offers, deactivate_expired_offers
+from app.database.models import DiscountOffer, PromoOfferLog, User, UserStatus
+from tests.fixtures.sqlite_memory import memory_session
+
+
+OFFER_TABLES = (User.__table__, DiscountOffer.__table__, PromoOfferLog.__table__)
+
+
+async def _users(db, count: int) -> list[int]:
+    users = [User(telegram_id=100 + index, status=UserStatus.ACTIVE.value) for index in range(count)]
+    db.add_all(users)
+    await db.commit()
+    return [user.id for user in users]
+
+
+def _offer(user_id: int, **kwargs) -> DiscountOffer:
+    defaults = {
+        'user_id': user_id,
+        'notification_type': 'extend_discount',
+        'discount_percent': 5,
+        'expires_at': datetime.now(UTC) + timedelta(hours=1),
+        'is_active': True,
+    }
+    defaults.update(kwargs)
+    return DiscountOffer(**defaults)
+
+
+async def test_bulk_upsert_refreshes_unclaimed_and_creates_missing(monkeypatch):
+    async with memory_session(monkeypatch, OFFER_TABLES) as db:
+        refreshed, claimed, fresh = await _users(db, 3)
+        existing = _offer(refreshed)
+        claimed_offer = _offer(claimed, claimed_at=datetime.now(UTC))
+        other_type = _offer(fresh, notification_type='other')
+        db.add_all([existing, claimed_offer, other_type])
+        await db.commit()
+
+        offer_ids = await bulk_upsert_discount_offers(
+            db,
+            user_ids=[refreshed, claimed, fresh, fresh],
+            subscription_id=None,
+            notification_type='extend_discount',
+            discount_percent=25,
+            bonus_amount_kopeks=0,
+            valid_hours=48,
+            chunk_size=2,
+        )
+
+        assert set(offer_ids) == {refreshed, claimed, fresh}
+        # Активный невостребованный оффер обновлён на месте, а не продублирован
+        assert offer_ids[refreshed] == existing.id
+        assert offer_ids[claimed] != claimed_offer.id
+        assert offer_ids[fresh] != other_type.id
+
+        db.expire_all()
+        rows = (await db.execute(select(DiscountOffer).where(DiscountOffer.id.in_(offer_ids.values())))).scalars()
+        by_user = {offer.user_id: offer for offer in rows}
+        assert all(offer.discount_percent == 25 for offer in by_user.values())
+        assert all(offer.expires_at > datetime.now(UTC) + timedelta(hours=47) for offer in by_user.values())
+        total = (await db.execute(select(DiscountOffer))).scalars().all()
+        assert len(total) == 5
+
+
+async def test_deactivate_expired_offers_updates_and_logs_in_bulk(monkeypatch):
+    async with memory_session(monkeypatch, OFFER_TABLES) as db:
+        first, second = await _users(db, 2)
+        past = datetime.now(UTC) - timedelta(minutes=5)
+        db.add_all(
+            [
+                _offer(first, expires_at=past),
+                _offer(second, expires_at=past, discount_percent=15),
+                _offer(second, notification_type='still_valid'),
+            ]
+        )
+        await db.commit()
+
+        assert await deactivate_expired_offers(db) == 2
+        assert await deactivate_expired_offers(db) == 0
+
+        db.expire_all()
+        active = (await db.execute(select(DiscountOffer.notification_type).where(DiscountOffer.is_active))).all()
+        assert active == [('still_valid',)]
+
+        logs = (await db.execute(select(PromoOfferLog).order_by(PromoOfferLog.user_id))).scalars().all()
+        assert [(log.user_id, log.action, log.percent) for log in logs] == [
+            (first, 'disabled', 5),
+            (second, 'disabled', 15),
+        ]
+        assert logs[0].details == {'reason': 'offer_expired'}
@@ -0,0 +1,156 @@
+"""Лидерборд реферального конкурса: счёт обновляется с событиями, чтение — по индексу, сверка из событий."""
+
+from datetime import UTC, datetime, time, timedelta
+
+from sqlalchemy import update
+
+from app.database.crud.referral_contest import (
+    add_contest_event,
+    add_virtual_participant,
+    create_referral_contest,
+    get_contest_leaderboard,
+    get_contest_leaderboard_with_virtual,
+    get_contest_participants_count,
+    get_contest_rank,
+    rebuild_contest_leaderboard,
+    update_referral_contest,
+    upsert_contest_event,
+)
+from app.database.models import (
+    ReferralContest,
+    ReferralContestEvent,
+    ReferralContestScore,
+    ReferralContestVirtualParticipant,
+    User,
+    UserStatus,
+)
+from tests.fixtures.sqlite_memory import memory_session
+
+
+CONTEST_TABLES = (
+    User.__table__,
+    ReferralContest.__table__,
+    ReferralContestEvent.__table__,
+    ReferralContestScore.__table__,
+    ReferralContestVirtualParticipant.__table__,
+)
+
+
+async def _contest(db) -> ReferralContest:
+    now = datetime.now(UTC)
+    return await create_referral_contest(
+        db,
+        title='Весенний конкурс',
+        description=None,
+        prize_text=None,
+        contest_type='referral_paid',
+        start_at=now - timedelta(days=1),
+        end_at=now + timedelta(days=1),
+        daily_summary_time=time(12, 0),
+        timezone_name='UTC',
+    )
+
+
+async def _users(db, count: int) -> list[User]:
+    users = [
+        User(telegram_id=700 + index, first_name=f'User{index}', status=UserStatus.ACTIVE.value)
+        for index in range(count)
+    ]
+    db.add_all(users)
+    await db.commit()
+    return users
+
+
+def _board(rows) -> list[tuple[int, int, int]]:
+    return [(user.id, count, amount) for user, count, amount in rows]
+
+
+async def test_scores_follow_event_writes(monkeypatch):
+    async with memory_session(monkeypatch, CONTEST_TABLES) as db:
+        contest = await _contest(db)
+        alice, bob, *referrals = await _users(db, 6)
+
+        for referral, amount in zip(referrals[:3], (10_000, 0, -5_000), strict=True):
+            await add_contest_event(
+                db, contest_id=contest.id, referrer_id=alice.id, referral_id=referral.id, amount_kopeks=amount
+            )
+        await add_contest_event(
+            db, contest_id=contest.id, referrer_id=bob.id, referral_id=referrals[3].id, amount_kopeks=30_000
+        )
+
+        # Повтор того же реферала не добавляет зачёт, но обновляет сумму
+        assert (
+            await add_contest_event(
+                db, contest_id=contest.id, referrer_id=alice.id, referral_id=referrals[0].id, amount_kopeks=12_000
+            )
+            is None
+        )
+        await upsert_contest_event(
+            db, contest_id=contest.id, referrer_id=bob.id, referral_id=referrals[3].id, amount_kopeks=0
+        )
+
+        assert _board(await get_contest_leaderboard(db, contest.id)) == [
+            (alice.id, 3, 17_000),
+            (bob.id, 1, 0),
+        ]
+        assert await get_contest_participants_count(db, contest.id) == 2
+
+
+async def test_rank_top_and_virtual_participants(monkeypatch):
+    async with memory_session(monkeypatch, CONTEST_TABLES) as db:
+        contest = await _contest(db)
+        users = await _users(db, 4)
+        db.add_all(
+            [
+                ReferralContestScore(
+                    contest_id=contest.id, referrer_id=users[0].id, referral_count=2, total_amount_kopeks=0
+                ),
+                ReferralContestScore(
+                    contest_id=contest.id, referrer_id=users[1].id, referral_count=5, total_amount_kopeks=0
+                ),
+                ReferralContestScore(
+                    contest_id=contest.id, referrer_id=users[2].id, referral_count=2, total_amount_kopeks=900
+                ),
+            ]
+        )
+        await db.commit()
+        await add_virtual_participant(db, contest.id, 'Призрак', referral_count=3)
+
+        assert await get_contest_rank(db, contest.id, users[1].id) == (1, 5, 0)
+        assert await get_contest_rank(db, contest.id, users[2].id) == (2, 2, 900)
+        assert await get_contest_rank(db, contest.id, users[0].id) == (3, 2, 0)
+        assert await get_contest_rank(db, contest.id, users[3].id) is None
+
+        top = await get_contest_leaderboard_with_virtual(db, contest.id, limit=3)
+        assert [(name, count, is_virtual) for name, count, _, is_virtual in top] == [
+            ('User1', 5, False),
+            ('Призрак', 3, True),
+            ('User2', 2, False),
+        ]
+
+
+async def test_rebuild_reconciles_with_events_and_contest_window(monkeypatch):
+    async with memory_session(monkeypatch, CONTEST_TABLES) as db:
+        contest = await _contest(db)
+        alice, *referrals = await _users(db, 3)
+        for referral in referrals:
+            await add_contest_event(
+                db, contest_id=contest.id, referrer_id=alice.id, referral_id=referral.id, amount_kopeks=1_000
+            )
+
+        # Дрейф счёта относительно событий (правка в обход CRUD)
+        await db.execute(
+            update(ReferralContestScore)
+            .where(ReferralContestScore.contest_id == contest.id)
+            .values(referral_count=10, total_amount_kopeks=1)
+        )
+        await db.commit()
+
+        assert await rebuild_contest_leaderboard(db, contest.id) == 1
+        assert _board(await get_contest_leaderboard(db, contest.id)) == [(alice.id, 2, 2_000)]
+
+        # Перенос начала конкурса после событий исключает их из лидерборда
+        await update_referral_contest(db, contest, start_at=datetime.now(UTC) + timedelta(hours=1))
+
+        assert await get_contest_leaderboard(db, contest.id) == []
+        assert await get_contest_rank(db, contest.id, alice.id) is None
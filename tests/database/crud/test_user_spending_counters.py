@@ -0,0 +1,147 @@
+"""Денормализованные счётчики трат: инкремент при записи транзакций и сверка с историей."""
+
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import update
+
+from app.database.crud.transaction import complete_transaction, create_transaction
+from app.database.crud.user import (
+    get_users_list,
+    get_users_spending_stats,
+    reconcile_user_spending_counters,
+)
+from app.database.models import (
+    PromoGroup,
+    ServerSquad,
+    Subscription,
+    Tariff,
+    Transaction,
+    TransactionType,
+    User,
+    UserPromoGroup,
+    UserStatus,
+    server_squad_promo_groups,
+)
+from app.services import promo_group_assignment
+from tests.fixtures.sqlite_memory import memory_session
+
+
+SPENDING_TABLES = (
+    PromoGroup.__table__,
+    ServerSquad.__table__,
+    server_squad_promo_groups,
+    User.__table__,
+    UserPromoGroup.__table__,
+    Tariff.__table__,
+    Subscription.__table__,
+    Transaction.__table__,
+)
+
+
+async def _users(db, count: int) -> list[User]:
+    users = [User(telegram_id=500 + index, status=UserStatus.ACTIVE.value) for index in range(count)]
+    db.add_all(users)
+    await db.commit()
+    return users
+
+
+async def _noop_promo_assignment(db, user_id):
+    return None
+
+
+async def test_counters_follow_purchase_writes(monkeypatch):
+    monkeypatch.setattr(promo_group_assignment, 'maybe_assign_promo_group_by_total_spent', _noop_promo_assignment)
+    async with memory_session(monkeypatch, SPENDING_TABLES) as db:
+        (user,) = await _users(db, 1)
+
+        await create_transaction(db, user.id, TransactionType.DEPOSIT, 50_000, 'deposit', commit=False)
+        await create_transaction(db, user.id, TransactionType.SUBSCRIPTION_PAYMENT, 19_900, 'buy', commit=False)
+        await create_transaction(db, user.id, TransactionType.GIFT_PAYMENT, 10_000, 'gift', commit=False)
+        pending = await create_transaction(
+            db, user.id, TransactionType.SUBSCRIPTION_PAYMENT, 5_000, 'renew', is_completed=False, commit=False
+        )
+        await db.commit()
+
+        await db.refresh(user)
+        assert (user.total_spent_kopeks, user.purchase_count) == (19_900, 1)
+        first_purchase_at = user.last_purchase_at
+        assert first_purchase_at is not None
+
+        await complete_transaction(db, pending)
+        # Повторное завершение уже завершённой транзакции не считается второй покупкой
+        await complete_transaction(db, pending)
+
+        await db.refresh(user)
+        assert (user.total_spent_kopeks, user.purchase_count) == (24_900, 2)
+        assert user.last_purchase_at == first_purchase_at
+
+        assert await reconcile_user_spending_counters(db) == 0
+        assert await get_users_spending_stats(db, [user.id]) == {user.id: {'total_spent': 24_900, 'purchase_count': 2}}
+
+
+async def test_failed_purchase_leaves_counters_untouched(monkeypatch):
+    monkeypatch.setattr(promo_group_assignment, 'maybe_assign_promo_group_by_total_spent', _noop_promo_assignment)
+    async with memory_session(monkeypatch, SPENDING_TABLES) as db:
+        (user,) = await _users(db, 1)
+        user_id = user.id
+
+        # Покупка упала: её транзакция БД откатывается вместе с инкрементом счётчиков,
+        # а деньги возвращаются отдельным REFUND, который покупкой не считается
+        await create_transaction(db, user_id, TransactionType.SUBSCRIPTION_PAYMENT, 19_900, 'buy', commit=False)
+        await db.rollback()
+        await create_transaction(db, user_id, TransactionType.REFUND, 19_900, 'refund', commit=False)
+        await db.commit()
+
+        assert await get_users_spending_stats(db, [user_id]) == {user_id: {'total_spent': 0, 'purchase_count': 0}}
+        assert await reconcile_user_spending_counters(db) == 0
+
+
+async def test_reconcile_repairs_drift(monkeypatch):
+    async with memory_session(monkeypatch, SPENDING_TABLES) as db:
+        drifted, clean, ghost = await _users(db, 3)
+        purchased_at = datetime.now(UTC) - timedelta(days=3)
+        db.add_all(
+            [
+                Transaction(
+                    user_id=drifted.id,
+                    type=TransactionType.SUBSCRIPTION_PAYMENT.value,
+                    amount_kopeks=-30_000,
+                    is_completed=True,
+                    created_at=purchased_at,
+                ),
+                Transaction(
+                    user_id=drifted.id,
+                    type=TransactionType.SUBSCRIPTION_PAYMENT.value,
+                    amount_kopeks=-7_000,
+                    is_completed=False,
+                    created_at=datetime.now(UTC),
+                ),
+            ]
+        )
+        await db.commit()
+        await db.execute(update(User).where(User.id == ghost.id).values(total_spent_kopeks=999, purchase_count=4))
+        await db.commit()
+
+        assert await reconcile_user_spending_counters(db, batch_size=2) == 2
+        await db.commit()
+
+        stats = await get_users_spending_stats(db, [drifted.id, clean.id, ghost.id])
+        assert stats[drifted.id] == {'total_spent': 30_000, 'purchase_count': 1}
+        assert stats[clean.id] == stats[ghost.id] == {'total_spent': 0, 'purchase_count': 0}
+        await db.refresh(drifted)
+        assert drifted.last_purchase_at == purchased_at
+
+
+async def test_users_list_sorts_by_counters(monkeypatch):
+    async with memory_session(monkeypatch, SPENDING_TABLES) as db:
+        low, high, none = await _users(db, 3)
+        await db.execute(update(User).where(User.id == low.id).values(total_spent_kopeks=100, purchase_count=5))
+        await db.execute(update(User).where(User.id == high.id).values(total_spent_kopeks=900, purchase_count=1))
+        await db.commit()
+
+        by_spent = await get_users_list(db, order_by_total_spent=True)
+        by_count = await get_users_list(db, order_by_purchase_count=True)
+
+        assert [user.id for user in by_spent][:2] == [high.id, low.id]
+        assert [user.id for user in by_count][:2] == [low.id, high.id]
+        assert by_spent[-1].id == none.id
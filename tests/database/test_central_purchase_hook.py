@@ -38,9 +38,10 @@ from app.database.models import TransactionType
 
 
 def _stub_db() -> SimpleNamespace:
-    """Minimal AsyncSession double: records add, satisfies commit/flush/refresh."""
+    """Minimal AsyncSession double: records add, satisfies execute/commit/flush/refresh."""
     db = SimpleNamespace()
     db.add = MagicMock()
+    db.execute = AsyncMock()
     db.commit = AsyncMock()
     db.flush = AsyncMock()
     db.refresh = AsyncMock()
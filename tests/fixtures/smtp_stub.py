@@ -0,0 +1,95 @@
+"""Минимальный SMTP-сервер в потоке для тестов пула соединений.
+
+Понимает EHLO/HELO, MAIL, RCPT, DATA, NOOP, RSET, QUIT — ровно то, что шлёт
+smtplib без TLS и AUTH. Считает открытые соединения и принятые письма.
+"""
+
+from __future__ import annotations
+
+import socketserver
+import threading
+from dataclasses import dataclass, field
+from typing import Self
+
+
+@dataclass
+class StubState:
+    connections: int = 0
+    messages: list[tuple[str, list[str], str]] = field(default_factory=list)
+    noops: int = 0
+    drop_after_message: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    state: StubState
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self) -> None:
+        state = self.server.state
+        with state.lock:
+            state.connections += 1
+        self._reply('220 stub ESMTP')
+        sender, recipients = '', []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            command = raw.decode().strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                self._reply('250 stub')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip(), []
+                self._reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip())
+                self._reply('250 OK')
+            elif verb == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while (line := self.rfile.readline()) not in (b'.\r\n', b''):
+                    lines.append(line.decode())
+                with state.lock:
+                    state.messages.append((sender, recipients, ''.join(lines)))
+                self._reply('250 OK queued')
+                if state.drop_after_message:
+                    return
+            elif verb == 'NOOP':
+                with state.lock:
+                    state.noops += 1
+                self._reply('250 OK')
+            elif verb == 'RSET':
+                self._reply('250 OK')
+            elif verb == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SmtpStub:
+    def __init__(self) -> None:
+        self.state = StubState()
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.state = self.state
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def __enter__(self) -> Self:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
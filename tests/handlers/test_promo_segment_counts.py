@@ -7,6 +7,8 @@ get_target_users_count считает получателей запросом, g
 
 from datetime import UTC, datetime, timedelta
 
+from sqlalchemy import update
+
 from app.database.models import (
     PromoGroup,
     Subscription,
@@ -15,8 +17,9 @@ from app.database.models import (
     Tariff,
     User,
     UserStatus,
+    tariff_promo_groups,
 )
-from app.handlers.admin.messages import get_target_users, get_target_users_count
+from app.handlers.admin.messages import build_target_user_ids_query, get_target_users, get_target_users_count
 from tests.fixtures.sqlite_memory import memory_session
 
 
@@ -36,6 +39,7 @@ SEGMENT_TABLES = (
     SubscriptionEvent.__table__,
     Tariff.__table__,
     PromoGroup.__table__,
+    tariff_promo_groups,
 )
 
 
@@ -215,6 +219,65 @@ async def test_expired_segment_edge_cases(monkeypatch):
         assert len(await get_target_users(db, 'expired')) == 1
 
 
+async def test_subscription_segments_match_python_recipients(monkeypatch):
+    """SQL-сегменты по активной подписке отбирают тех же получателей, что и Subscription.is_active.
+
+    stale_active (ACTIVE с прошедшей датой) — не активный: его нет в active/zero/tariff_*,
+    и он есть в 'no'.
+    """
+    async with memory_session(monkeypatch, SEGMENT_TABLES) as db:
+        await _seed(db)
+        tariff = Tariff(name='Month', period_prices={'30': 10000})
+        db.add(tariff)
+        await db.flush()
+        await db.execute(update(Subscription).values(tariff_id=tariff.id))
+        await db.commit()
+
+        for segment in ('active', 'no', 'active_zero', 'trial_zero', 'zero', f'tariff_{tariff.id}'):
+            sql_ids = set((await db.execute(build_target_user_ids_query(segment))).scalars())
+            python_ids = {user.id for user in await get_target_users(db, segment)}
+            assert sql_ids == python_ids, f'сегмент {segment}: SQL {sorted(sql_ids)} != Python {sorted(python_ids)}'
+
+        no_subscription_ids = set((await db.execute(build_target_user_ids_query('no'))).scalars())
+        assert 7 in no_subscription_ids
+
+
+async def test_expiring_segments_skip_active_daily_subscriptions(monkeypatch):
+    """У активной суточной подписки end_date всегда ~+24ч — в «истекающие» она не попадает.
+
+    SQL-ветка обязана исключать её так же, как get_expiring_subscriptions, иначе
+    оффер уйдёт всем суточным подписчикам, а счётчик разойдётся со списком получателей.
+    """
+    now = datetime.now(UTC)
+    async with memory_session(monkeypatch, SEGMENT_TABLES) as db:
+        await _seed(db)
+        daily_tariff = Tariff(name='Day', period_prices={}, is_daily=True, daily_price_kopeks=1000)
+        db.add(daily_tariff)
+        daily_active = _user(10)
+        daily_paused = _user(11)
+        db.add_all([daily_active, daily_paused])
+        await db.flush()
+        day_ahead = now + timedelta(hours=20)
+        active_sub = _subscription(daily_active.id, status=SubscriptionStatus.ACTIVE.value, end_date=day_ahead)
+        active_sub.tariff_id = daily_tariff.id
+        # Приостановленная суточная подписка истекает по-настоящему — её оставляем
+        paused_sub = _subscription(daily_paused.id, status=SubscriptionStatus.ACTIVE.value, end_date=day_ahead)
+        paused_sub.tariff_id = daily_tariff.id
+        paused_sub.is_daily_paused = True
+        db.add_all([active_sub, paused_sub])
+        await db.commit()
+
+        for segment in ('expiring', 'expiring_subscribers'):
+            sql_ids = set((await db.execute(build_target_user_ids_query(segment))).scalars())
+            python_ids = {user.id for user in await get_target_users(db, segment)}
+            assert sql_ids == python_ids, f'сегмент {segment}: SQL {sorted(sql_ids)} != Python {sorted(python_ids)}'
+            assert await get_target_users_count(db, segment) == len(python_ids)
+            assert daily_active.id not in sql_ids
+            assert daily_paused.id in sql_ids
+            # trial_ending (2 дня) — обычная подписка, остаётся в сегменте
+            assert 3 in sql_ids
+
+
 async def test_unknown_segment_counts_zero(monkeypatch):
     """Неизвестный ключ не роняет запрос и не показывает мусорный охват."""
     async with memory_session(monkeypatch, SEGMENT_TABLES) as db:
@@ -2,25 +2,19 @@
 
 from pathlib import Path
 from types import SimpleNamespace
-from unittest.mock import MagicMock, patch
 
 from app.config import settings
 from app.middlewares.button_stats import ButtonStatsMiddleware
 
 
 def _capture_log_calls(middleware, monkeypatch):
-    """Подменяет фоновую запись: возвращает список kwargs вызовов."""
+    """Подменяет постановку в буфер записи: возвращает список kwargs вызовов."""
     calls = []
 
-    def fake_log(**kwargs):
+    def fake_enqueue(**kwargs):
         calls.append(kwargs)
 
-        async def _noop():
-            return None
-
-        return _noop()
-
-    monkeypatch.setattr(middleware, '_log_button_click_async', fake_log)
+    monkeypatch.setattr(middleware, '_enqueue_click', fake_enqueue)
     return calls
 
 
@@ -33,8 +27,7 @@ def test_start_command_logged(monkeypatch):
     middleware = ButtonStatsMiddleware()
     calls = _capture_log_calls(middleware, monkeypatch)
 
-    with patch('app.middlewares.button_stats.asyncio.create_task', MagicMock(side_effect=lambda coro: coro.close())):
-        middleware._log_command(_message('/start'))
+    middleware._log_command(_message('/start'))
 
     assert len(calls) == 1
     assert calls[0]['button_id'] == '/start'
@@ -49,8 +42,7 @@ def test_command_payload_not_stored(monkeypatch):
     middleware = ButtonStatsMiddleware()
     calls = _capture_log_calls(middleware, monkeypatch)
 
-    with patch('app.middlewares.button_stats.asyncio.create_task', MagicMock(side_effect=lambda coro: coro.close())):
-        middleware._log_command(_message('/start webauth_SECRET_TOKEN_123'))
+    middleware._log_command(_message('/start webauth_SECRET_TOKEN_123'))
 
     assert len(calls) == 1
     serialized = str(calls[0])
@@ -63,8 +55,7 @@ def test_command_with_bot_mention_normalized(monkeypatch):
     middleware = ButtonStatsMiddleware()
     calls = _capture_log_calls(middleware, monkeypatch)
 
-    with patch('app.middlewares.button_stats.asyncio.create_task', MagicMock(side_effect=lambda coro: coro.close())):
-        middleware._log_command(_message('/menu@my_vpn_bot'))
+    middleware._log_command(_message('/menu@my_vpn_bot'))
 
     assert calls[0]['button_id'] == '/menu'
 
@@ -74,10 +65,9 @@ def test_plain_text_not_logged(monkeypatch):
     middleware = ButtonStatsMiddleware()
     calls = _capture_log_calls(middleware, monkeypatch)
 
-    with patch('app.middlewares.button_stats.asyncio.create_task', MagicMock(side_effect=lambda coro: coro.close())):
-        middleware._log_command(_message('привет, мой промокод SUMMER25'))
-        middleware._log_command(_message(None))
-        middleware._log_command(_message('/'))
+    middleware._log_command(_message('привет, мой промокод SUMMER25'))
+    middleware._log_command(_message(None))
+    middleware._log_command(_message('/'))
 
     assert calls == []
 
@@ -0,0 +1,82 @@
+"""Метрики aiogram: собственное время middleware и время обработчика."""
+
+from types import SimpleNamespace
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import Chat, Message, User
+
+from app.middlewares.metrics import HandlerMetricsMiddleware, StageMetricsMiddleware, instrument_dispatcher
+from app.utils import metrics
+
+
+class _Pass(BaseMiddleware):
+    async def __call__(self, handler, event, data):
+        data['seen'] = data.get('seen', 0) + 1
+        return await handler(event, data)
+
+
+class _Stop(BaseMiddleware):
+    async def __call__(self, handler, event, data):
+        return 'stopped'
+
+
+_BOT = SimpleNamespace(id=1)
+
+
+def _message(text: str) -> Message:
+    return Message.model_construct(
+        message_id=1,
+        text=text,
+        chat=Chat.model_construct(id=1, type='private'),
+        from_user=User.model_construct(id=1, is_bot=False, first_name='u'),
+    )
+
+
+def _count(histogram, *labels) -> int:
+    return sum(histogram.labels(*labels).counts)
+
+
+async def test_instrumented_dispatcher_keeps_order_and_records_stages():
+    dp = Dispatcher()
+    dp.message.middleware(_Pass())
+    dp.message.middleware(_Pass())
+    calls = []
+
+    async def handle(message: Message, seen: int):
+        calls.append(seen)
+        return 'ok'
+
+    dp.message.register(handle)
+    instrument_dispatcher(dp)
+
+    stages = [type(m) for m in dp.message.middleware]
+    assert stages[-1] is HandlerMetricsMiddleware
+    assert all(stage is StageMetricsMiddleware for stage in stages[1:-1])
+
+    handler_name = f'{__name__}.test_instrumented_dispatcher_keeps_order_and_records_stages.<locals>.handle'
+    before_handler = _count(metrics.HANDLER_SECONDS, 'message', handler_name)
+    before_stage = _count(metrics.MIDDLEWARE_SECONDS, 'message', '_Pass')
+
+    await dp.message.trigger(_message('hi'), bot=_BOT)
+
+    assert calls == [2]
+    assert _count(metrics.HANDLER_SECONDS, 'message', handler_name) == before_handler + 1
+    assert _count(metrics.MIDDLEWARE_SECONDS, 'message', '_Pass') == before_stage + 2
+
+
+async def test_short_circuiting_middleware_is_timed_and_handler_skipped():
+    dp = Dispatcher()
+    dp.message.middleware(_Stop())
+    calls = []
+
+    async def handle(message: Message):
+        calls.append(message)
+
+    dp.message.register(handle)
+    instrument_dispatcher(dp)
+    before = _count(metrics.MIDDLEWARE_SECONDS, 'message', '_Stop')
+
+    await dp.message.trigger(_message('hi'), bot=_BOT)
+
+    assert calls == []
+    assert _count(metrics.MIDDLEWARE_SECONDS, 'message', '_Stop') == before + 1
@@ -0,0 +1,174 @@
+"""Тесты GCRA-троттлинга (ThrottlingMiddleware)."""
+
+from aiogram.types import CallbackQuery, Message, User
+
+from app.config import settings
+from app.middlewares import throttling
+from app.middlewares.throttling import ThrottlingMiddleware
+from app.utils.cache import GcraRateLimitCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _middleware(monkeypatch, **kwargs) -> tuple[ThrottlingMiddleware, FakeClock]:
+    clock = FakeClock()
+    monkeypatch.setattr(throttling.time, 'monotonic', clock)
+    kwargs.setdefault('use_redis', False)
+    return ThrottlingMiddleware(**kwargs), clock
+
+
+def _message(text: str, user_id: int = 1) -> Message:
+    return Message.model_construct(text=text, from_user=User.model_construct(id=user_id, is_bot=False, first_name='u'))
+
+
+def _callback(data: str, user_id: int = 1) -> CallbackQuery:
+    return CallbackQuery.model_construct(
+        data=data, from_user=User.model_construct(id=user_id, is_bot=False, first_name='u')
+    )
+
+
+async def test_general_limit_rejects_until_interval(monkeypatch) -> None:
+    middleware, clock = _middleware(monkeypatch, rate_limit=0.5)
+    limits = [(middleware.general_limit, 1.0)]
+
+    assert (await middleware._check(1, limits)).allowed
+    rejected = await middleware._check(1, limits)
+    assert not rejected.allowed
+    assert rejected.retry_after == 0.5
+    # Другой пользователь не затронут
+    assert (await middleware._check(2, limits)).allowed
+
+    clock.now += 0.5
+    assert (await middleware._check(1, limits)).allowed
+
+
+def test_cost_weight_by_most_specific_prefix(monkeypatch) -> None:
+    middleware, _ = _middleware(monkeypatch, cost_weights={'admin_': 2.0, 'admin_stats': 4.0, '/broadcast': 5.0})
+
+    assert middleware._resolve_cost(_callback('admin_stats_daily')) == 4.0
+    assert middleware._resolve_cost(_callback('admin_users')) == 2.0
+    assert middleware._resolve_cost(_callback('menu')) == 1.0
+    assert middleware._resolve_cost(_message('/broadcast hello')) == 5.0
+
+
+async def test_weighted_update_spends_more(monkeypatch) -> None:
+    middleware, clock = _middleware(monkeypatch, rate_limit=1.0)
+
+    assert (await middleware._check(1, [(middleware.general_limit, 3.0)])).allowed
+    clock.now += 2.0
+    rejected = await middleware._check(1, [(middleware.general_limit, 1.0)])
+    assert rejected.retry_after == 1.0
+
+
+async def test_configured_weights_delay_next_update(monkeypatch) -> None:
+    monkeypatch.setattr(settings, 'THROTTLING_COST_WEIGHTS', 'admin_stats:4, bad, /broadcast:x, :2')
+    assert settings.get_throttling_cost_weights() == {'admin_stats': 4.0}
+
+    middleware, clock = _middleware(monkeypatch, rate_limit=1.0, cost_weights=settings.get_throttling_cost_weights())
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event.data)
+
+    async def fake_answer(self, *args, **kwargs):
+        return None
+
+    monkeypatch.setattr(CallbackQuery, 'answer', fake_answer)
+
+    await middleware(handler, _callback('admin_stats_daily'), {})
+    clock.now += 3.0
+    await middleware(handler, _callback('menu'), {})
+    clock.now += 1.0
+    await middleware(handler, _callback('menu'), {})
+
+    assert handled == ['admin_stats_daily', 'menu']
+
+
+async def test_start_burst_then_cooldown(monkeypatch) -> None:
+    middleware, clock = _middleware(monkeypatch, rate_limit=0.0, start_max_calls=3, start_window=60.0)
+    limits = [(middleware.general_limit, 1.0), (middleware.start_limit, 1.0)]
+
+    for _ in range(3):
+        assert (await middleware._check(1, limits)).allowed
+    rejected = await middleware._check(1, limits)
+    assert not rejected.allowed
+    assert rejected.limit is middleware.start_limit
+    assert rejected.retry_after == 20.0
+
+    clock.now += 20.0
+    assert (await middleware._check(1, limits)).allowed
+
+
+async def test_redis_decision_wins_and_local_reject_skips_redis(monkeypatch) -> None:
+    middleware, _ = _middleware(monkeypatch, use_redis=True)
+    calls = []
+
+    async def fake_check(limits):
+        calls.append(limits)
+        return (False, 3.0, 0) if len(calls) == 2 else (True, 0.0, -1)
+
+    monkeypatch.setattr(GcraRateLimitCache, 'check', staticmethod(fake_check))
+    limits = [(middleware.general_limit, 1.0)]
+
+    assert (await middleware._check(1, limits)).allowed
+    assert calls[0] == [('throttle:general:1', 0.5, 0.0, 1.0)]
+
+    # Локальный фильтр отказывает сам, Redis не вызывается
+    assert not (await middleware._check(1, limits)).allowed
+    assert len(calls) == 1
+
+    # Отказ другой реплики приходит из Redis; локальное состояние не двигается
+    rejected = await middleware._check(2, limits)
+    assert not rejected.allowed
+    assert rejected.retry_after == 3.0
+    assert ('general', 2) not in middleware.local_tats
+
+
+async def test_redis_unavailable_falls_back_to_local(monkeypatch) -> None:
+    middleware, _ = _middleware(monkeypatch, use_redis=True)
+
+    async def unavailable(limits):
+        return None
+
+    monkeypatch.setattr(GcraRateLimitCache, 'check', staticmethod(unavailable))
+    limits = [(middleware.general_limit, 1.0)]
+
+    assert (await middleware._check(1, limits)).allowed
+    assert not (await middleware._check(1, limits)).allowed
+
+
+async def test_stale_entries_evicted(monkeypatch) -> None:
+    middleware, clock = _middleware(monkeypatch)
+    await middleware._check(1, [(middleware.general_limit, 1.0)])
+    assert middleware.local_tats
+
+    clock.now += 31
+    await middleware._check(2, [(middleware.general_limit, 1.0)])
+
+    assert list(middleware.local_tats) == [('general', 2)]
+
+
+async def test_start_message_answers_with_cooldown(monkeypatch) -> None:
+    middleware, _ = _middleware(monkeypatch, rate_limit=0.0, start_max_calls=1, start_window=30.0)
+    answers = []
+    handled = []
+
+    async def fake_answer(self, text, **kwargs):
+        answers.append(text)
+
+    async def handler(event, data):
+        handled.append(event)
+
+    monkeypatch.setattr(Message, 'answer', fake_answer)
+
+    await middleware(handler, _message('/start ref_1'), {})
+    await middleware(handler, _message('/start'), {})
+
+    assert len(handled) == 1
+    assert answers == ['⏳ Слишком много запросов. Попробуйте через 31 сек.']
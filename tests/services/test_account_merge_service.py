@@ -1,13 +1,17 @@
 """Tests for app.services.account_merge_service."""
 
 from contextlib import asynccontextmanager
-from datetime import UTC, datetime
+from datetime import UTC, datetime, time, timedelta
 from types import SimpleNamespace
 from unittest.mock import AsyncMock, patch
 
 import pytest
+from sqlalchemy import select
 
 from app.config import Settings
+from app.database.crud import referral_contest as referral_contest_crud
+from app.database.crud.referral_contest import add_contest_event, create_referral_contest
+from app.database.models import Base, ReferralContestScore, User, UserStatus
 from app.services import account_merge_service
 from app.services.account_merge_service import (
     _build_subscription_preview,
@@ -16,6 +20,7 @@ from app.services.account_merge_service import (
     execute_merge,
     get_merge_preview,
 )
+from tests.fixtures.sqlite_memory import memory_session
 
 
 @pytest.fixture(autouse=True)
@@ -29,6 +34,23 @@ def _stub_grace_delete_guard(monkeypatch):
     return guard
 
 
+@pytest.fixture(autouse=True)
+def _stub_spending_reconcile(monkeypatch):
+    """Пересчёт счётчиков трат — реальные SELECT'ы, DB double их не отдаёт."""
+    reconcile = AsyncMock(return_value=0)
+    monkeypatch.setattr(account_merge_service, 'reconcile_user_spending_counters', reconcile)
+    return reconcile
+
+
+@pytest.fixture(autouse=True)
+def _stub_contest_rebuild(monkeypatch):
+    """Пересчёт лидербордов конкурсов — тоже реальные запросы (см. test_referral_contest_leaderboard)."""
+    monkeypatch.setattr(account_merge_service, 'get_user_contest_ids', AsyncMock(return_value=[]))
+    rebuild = AsyncMock()
+    monkeypatch.setattr(account_merge_service, 'rebuild_contest_leaderboards', rebuild)
+    return rebuild
+
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
@@ -993,3 +1015,100 @@ class TestExecuteMergeSelfReferralPrevention:
             result = await execute_merge(db, 1, 2)
 
         assert result.referred_by_id is None
+
+
+# ---------------------------------------------------------------------------
+# execute_merge — referral contest scores (real SQLite)
+# ---------------------------------------------------------------------------
+
+
+class TestExecuteMergeContestScores:
+    async def test_scores_are_rebuilt_for_merged_referrers(self, monkeypatch):
+        """Очки secondary переходят к primary, событие «primary пригласил secondary» исчезает."""
+        monkeypatch.setattr(account_merge_service, 'get_user_contest_ids', referral_contest_crud.get_user_contest_ids)
+        monkeypatch.setattr(
+            account_merge_service, 'rebuild_contest_leaderboards', referral_contest_crud.rebuild_contest_leaderboards
+        )
+        async with memory_session(monkeypatch, Base.metadata.sorted_tables) as db:
+            now = datetime.now(UTC)
+            contest = await create_referral_contest(
+                db,
+                title='Конкурс',
+                description=None,
+                prize_text=None,
+                contest_type='referral_paid',
+                start_at=now - timedelta(days=1),
+                end_at=now + timedelta(days=1),
+                daily_summary_time=time(12, 0),
+                timezone_name='UTC',
+            )
+            users = [User(telegram_id=900 + i, first_name=f'U{i}', status=UserStatus.ACTIVE.value) for i in range(4)]
+            db.add_all(users)
+            await db.commit()
+            primary, secondary, first_referral, second_referral = users
+            for referrer, referral, amount in (
+                (primary, first_referral, 1_000),
+                (primary, secondary, 500),
+                (secondary, second_referral, 2_000),
+            ):
+                await add_contest_event(
+                    db, contest_id=contest.id, referrer_id=referrer.id, referral_id=referral.id, amount_kopeks=amount
+                )
+
+            with _patch_remnawave_delete():
+                await execute_merge(db, primary.id, secondary.id)
+            await db.commit()
+
+            scores = (
+                await db.execute(
+                    select(
+                        ReferralContestScore.referrer_id,
+                        ReferralContestScore.referral_count,
+                        ReferralContestScore.total_amount_kopeks,
+                    ).where(ReferralContestScore.contest_id == contest.id)
+                )
+            ).all()
+            assert scores == [(primary.id, 2, 3_000)]
+
+
+class TestDeleteBlockedUserContestScores:
+    async def test_scores_drop_events_of_deleted_referral(self, monkeypatch):
+        """Удалённый заблокированный реферал перестаёт учитываться в счёте своего реферера."""
+        from app.services import blocked_users_service
+        from app.services.blocked_users_service import BlockedUsersService
+
+        monkeypatch.setattr(blocked_users_service, 'RemnaWaveService', lambda: None)
+        async with memory_session(monkeypatch, Base.metadata.sorted_tables) as db:
+            now = datetime.now(UTC)
+            contest = await create_referral_contest(
+                db,
+                title='Конкурс',
+                description=None,
+                prize_text=None,
+                contest_type='referral_paid',
+                start_at=now - timedelta(days=1),
+                end_at=now + timedelta(days=1),
+                daily_summary_time=time(12, 0),
+                timezone_name='UTC',
+            )
+            users = [User(telegram_id=950 + i, first_name=f'U{i}', status=UserStatus.ACTIVE.value) for i in range(3)]
+            db.add_all(users)
+            await db.commit()
+            referrer, blocked, kept = users
+            for referral, amount in ((blocked, 700), (kept, 1_000)):
+                await add_contest_event(
+                    db, contest_id=contest.id, referrer_id=referrer.id, referral_id=referral.id, amount_kopeks=amount
+                )
+
+            assert await BlockedUsersService(bot=None).delete_user_from_db(db, blocked.id)
+
+            scores = (
+                await db.execute(
+                    select(
+                        ReferralContestScore.referrer_id,
+                        ReferralContestScore.referral_count,
+                        ReferralContestScore.total_amount_kopeks,
+                    ).where(ReferralContestScore.contest_id == contest.id)
+                )
+            ).all()
+            assert scores == [(referrer.id, 1, 1_000)]
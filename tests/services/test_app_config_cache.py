@@ -0,0 +1,184 @@
+"""Общий кеш конфига приложений: SWR, single-flight, инвалидация и ETag экрана подключения."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from types import SimpleNamespace
+
+import pytest
+import structlog
+from fastapi import Response
+from starlette.requests import Request
+
+from app.cabinet.routes.subscription_modules import status as status_routes
+from app.services import app_config_cache as module
+from app.services.app_config_cache import AppConfigCache
+from app.services.happ_crypto_links import HappCryptoLinkFiller
+
+
+CONFIG = {
+    'platforms': {
+        'ios': {
+            'displayName': {'en': 'iOS'},
+            'apps': [
+                {
+                    'name': 'Happ',
+                    'blocks': [
+                        {'buttons': [{'type': 'subscriptionLink', 'link': 'happ://add/{{SUBSCRIPTION_LINK}}'}]},
+                        {'buttons': [{'type': 'external', 'link': 'https://example.com'}]},
+                    ],
+                }
+            ],
+        }
+    }
+}
+
+
+@pytest.fixture
+def shared_cache(monkeypatch):
+    stored: dict[str, object] = {}
+
+    async def fake_get(key):
+        return stored.get(key)
+
+    async def fake_set(key, value, expire=None):
+        stored[key] = value
+        return True
+
+    async def fake_setnx(key, value, expire=None):
+        return stored.setdefault(key, value) is value
+
+    async def fake_delete(key):
+        return stored.pop(key, None) is not None
+
+    monkeypatch.setattr(module.cache, 'get', fake_get)
+    monkeypatch.setattr(module.cache, 'set', fake_set)
+    monkeypatch.setattr(module.cache, 'setnx', fake_setnx)
+    monkeypatch.setattr(module.cache, 'delete', fake_delete)
+    monkeypatch.setattr(module.cache, '_connected', True)
+    monkeypatch.setattr(module, '_get_remnawave_config_uuid', lambda: 'uuid-1')
+    return stored
+
+
+def _counting_fetch(monkeypatch, configs: list[dict]):
+    calls = []
+
+    async def fake_fetch(uuid):
+        calls.append(uuid)
+        await asyncio.sleep(0)
+        return configs[min(len(calls), len(configs)) - 1]
+
+    monkeypatch.setattr(AppConfigCache, '_fetch', staticmethod(fake_fetch))
+    return calls
+
+
+async def test_concurrent_cold_loads_fetch_once_and_share_via_redis(monkeypatch, shared_cache):
+    calls = _counting_fetch(monkeypatch, [CONFIG])
+    app_cache = AppConfigCache()
+
+    entries = await asyncio.gather(*(app_cache.get() for _ in range(5)))
+
+    assert calls == ['uuid-1']
+    assert len({entry.version for entry in entries}) == 1
+    assert shared_cache['app_config:uuid-1:version'] == entries[0].version
+
+    # Другой процесс берёт конфиг из Redis, не обращаясь к панели
+    other = await AppConfigCache().get()
+    assert other.config == CONFIG
+    assert calls == ['uuid-1']
+
+
+async def test_stale_entry_is_served_while_refreshing(monkeypatch, shared_cache):
+    updated = {**CONFIG, 'svgLibrary': {'icon': '<svg/>'}}
+    calls = _counting_fetch(monkeypatch, [CONFIG, updated])
+    app_cache = AppConfigCache()
+    first = await app_cache.get()
+    first.fetched_at -= module.settings.APP_CONFIG_CACHE_TTL + 1
+
+    stale = await app_cache.get()
+    assert stale is first
+    await asyncio.gather(*app_cache._refreshing.values())
+
+    fresh = await app_cache.get()
+    assert len(calls) == 2
+    assert fresh.version != first.version
+    assert fresh.config['svgLibrary'] == {'icon': '<svg/>'}
+    assert 'app_config:uuid-1:lock' not in shared_cache
+
+
+async def test_invalidate_forces_refetch_and_derived_is_per_version(monkeypatch, shared_cache):
+    calls = _counting_fetch(monkeypatch, [CONFIG])
+    app_cache = AppConfigCache()
+    entry = await app_cache.get()
+    builds = []
+    entry.derive('probe', builds.append)
+    entry.derive('probe', builds.append)
+    assert builds == [CONFIG]
+
+    app_cache.invalidate()
+    await asyncio.sleep(0)
+
+    assert 'app_config:uuid-1' not in shared_cache
+    again = await app_cache.get()
+    assert len(calls) == 2
+    assert again is not entry
+
+
+async def test_app_config_route_sends_etag_and_keeps_shared_config_intact(monkeypatch, shared_cache):
+    _counting_fetch(monkeypatch, [CONFIG])
+    monkeypatch.setattr(status_routes, 'app_config_cache', AppConfigCache())
+    subscription = SimpleNamespace(
+        id=7, subscription_url='https://panel.example/sub/abc', subscription_crypto_link='happ://crypt5/x'
+    )
+
+    async def fake_resolve(db, user, subscription_id):
+        return subscription
+
+    monkeypatch.setattr(status_routes, 'resolve_subscription', fake_resolve)
+
+    def request(etag: str | None = None) -> Request:
+        headers = [(b'if-none-match', etag.encode())] if etag else []
+        return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': headers})
+
+    response = Response()
+    body = await status_routes.get_app_config(request(), response, user=SimpleNamespace(id=1), db=None)
+
+    happ = body['platforms']['ios']['apps'][0]
+    assert happ['deepLink'] == 'happ://add/https://panel.example/sub/abc'
+    assert happ['blocks'][0]['buttons'][0]['resolvedUrl'] == 'happ://add/https://panel.example/sub/abc'
+    # Общий конфиг в кеше не получил пользовательских полей
+    cached_app = CONFIG['platforms']['ios']['apps'][0]
+    assert 'deepLink' not in cached_app
+    assert 'resolvedUrl' not in cached_app['blocks'][0]['buttons'][0]
+
+    etag = response.headers['etag']
+    not_modified = await status_routes.get_app_config(request(etag), Response(), user=SimpleNamespace(id=1), db=None)
+    assert not_modified.status_code == 304
+
+    subscription.subscription_crypto_link = 'happ://crypt5/y'
+    changed = Response()
+    await status_routes.get_app_config(request(etag), changed, user=SimpleNamespace(id=1), db=None)
+    assert changed.headers['etag'] != etag
+
+
+async def test_crypto_link_filler_logs_failed_encryptions(monkeypatch):
+    class _Api:
+        async def encrypt_happ_crypto_link(self, url):
+            # Панель либо падает, либо не возвращает ссылку
+            if url.endswith('broken'):
+                raise RuntimeError('panel error')
+
+    class _Service:
+        def get_api_client(self):
+            return contextlib.nullcontext(_Api())
+
+    monkeypatch.setattr('app.services.remnawave_service.RemnaWaveService', _Service)
+
+    with structlog.testing.capture_logs() as logs:
+        written = await HappCryptoLinkFiller().fill({1: 'https://s/broken', 2: 'https://s/empty'})
+
+    assert written == 0
+    warnings = [entry for entry in logs if entry['log_level'] == 'warning']
+    assert [entry.get('subscription_id') for entry in warnings][:1] == [1]
+    assert warnings[-1]['subscription_ids'] == [1, 2]
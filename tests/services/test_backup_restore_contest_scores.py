@@ -0,0 +1,75 @@
+"""Восстановление бекапа пересчитывает лидерборды реферальных конкурсов.
+
+``referral_contest_scores`` в бекап не входит и очищается каскадом вместе с
+``referral_contests``, а лидерборды читаются только из него: без пересчёта
+после восстановления все конкурсы остались бы с пустыми таблицами лидеров.
+"""
+
+from __future__ import annotations
+
+import contextlib
+from datetime import UTC, datetime, timedelta
+from unittest.mock import AsyncMock
+
+from sqlalchemy import select
+
+from app.database.models import Base, ReferralContestScore
+from app.services import backup_service as module
+from app.services.backup_service import BackupService
+from tests.fixtures.sqlite_memory import memory_session
+
+
+def _payload() -> dict[str, list[dict]]:
+    now = datetime.now(UTC)
+    users = [
+        {'id': user_id, 'telegram_id': 700 + user_id, 'first_name': f'U{user_id}', 'status': 'active'}
+        for user_id in (1, 2, 3)
+    ]
+    contest = {
+        'id': 5,
+        'title': 'Конкурс',
+        'contest_type': 'referral_paid',
+        'start_at': (now - timedelta(days=1)).isoformat(),
+        'end_at': (now + timedelta(days=1)).isoformat(),
+        'daily_summary_time': '12:00:00',
+        'timezone': 'UTC',
+        'is_active': True,
+        'final_summary_sent': False,
+    }
+    events = [
+        {
+            'id': event_id,
+            'contest_id': 5,
+            'referrer_id': 1,
+            'referral_id': referral_id,
+            'event_type': 'subscription_purchase',
+            'amount_kopeks': amount,
+            'occurred_at': now.isoformat(),
+        }
+        for event_id, referral_id, amount in ((1, 2, 1_000), (2, 3, 500))
+    ]
+    return {'users': users, 'referral_contests': [contest], 'referral_contest_events': events}
+
+
+async def test_restore_rebuilds_contest_scores(monkeypatch):
+    async with memory_session(monkeypatch, Base.metadata.sorted_tables) as db:
+
+        @contextlib.asynccontextmanager
+        async def session_factory():
+            yield db
+
+        monkeypatch.setattr(module, 'AsyncSessionLocal', session_factory)
+        monkeypatch.setattr(module, 'sync_postgres_sequences', AsyncMock())
+
+        await BackupService()._restore_database_payload(_payload(), {}, {}, clear_existing=False)
+
+        scores = (
+            await db.execute(
+                select(
+                    ReferralContestScore.referrer_id,
+                    ReferralContestScore.referral_count,
+                    ReferralContestScore.total_amount_kopeks,
+                ).where(ReferralContestScore.contest_id == 5)
+            )
+        ).all()
+        assert scores == [(1, 2, 1_500)]
@@ -0,0 +1,87 @@
+"""Тесты пакетного писателя лога действий (button_click_log_writer)."""
+
+import asyncio
+
+from app.services.button_click_log_writer import ButtonClickLogWriter, ClickLogEntry
+
+
+def _writer(**kwargs) -> tuple[ButtonClickLogWriter, list[list[ClickLogEntry]]]:
+    writer = ButtonClickLogWriter(**kwargs)
+    batches: list[list[ClickLogEntry]] = []
+
+    async def fake_write(batch):
+        batches.append(batch)
+
+    writer._write_batch = fake_write
+    return writer, batches
+
+
+def test_enqueue_without_loop_only_buffers() -> None:
+    writer, _ = _writer(buffer_size=10, batch_size=5, flush_interval_ms=1000)
+
+    assert writer.enqueue(ClickLogEntry(button_id='menu_balance', telegram_id=1)) is True
+    assert writer.pending_count == 1
+    assert writer.is_running() is False
+
+
+def test_full_buffer_drops_and_counts() -> None:
+    writer, _ = _writer(buffer_size=3, batch_size=100, flush_interval_ms=1000)
+
+    results = [writer.enqueue(ClickLogEntry(button_id=f'b{i}')) for i in range(5)]
+
+    assert results == [True, True, True, False, False]
+    assert writer.pending_count == 3
+    assert writer.dropped == 2
+
+
+async def test_batch_size_triggers_flush_before_interval() -> None:
+    writer, batches = _writer(buffer_size=100, batch_size=3, flush_interval_ms=60_000)
+
+    for i in range(3):
+        writer.enqueue(ClickLogEntry(button_id=f'b{i}', telegram_id=i))
+    await asyncio.sleep(0.05)
+
+    assert [len(batch) for batch in batches] == [3]
+    assert writer.written == 3
+    await writer.stop()
+
+
+async def test_interval_flushes_partial_batch() -> None:
+    writer, batches = _writer(buffer_size=100, batch_size=50, flush_interval_ms=10)
+
+    writer.enqueue(ClickLogEntry(button_id='menu_trial', telegram_id=7))
+    await asyncio.sleep(0.05)
+
+    assert [entry.button_id for entry in batches[0]] == ['menu_trial']
+    await writer.stop()
+
+
+async def test_failed_batch_returns_to_buffer_head() -> None:
+    writer = ButtonClickLogWriter(buffer_size=100, batch_size=2, flush_interval_ms=60_000)
+
+    async def failing_write(batch):
+        raise RuntimeError('db is down')
+
+    writer._write_batch = failing_write
+    for name in ('a', 'b', 'c'):
+        writer._buffer.append(ClickLogEntry(button_id=name))
+
+    assert await writer.flush() is False
+    assert [entry.button_id for entry in writer._buffer] == ['a', 'b', 'c']
+    assert writer.failed_batches == 1
+    assert writer.dropped == 0
+
+
+async def test_stop_drains_everything() -> None:
+    writer, batches = _writer(buffer_size=100, batch_size=2, flush_interval_ms=60_000)
+    await writer.start()
+    for i in range(5):
+        writer._buffer.append(ClickLogEntry(button_id=f'b{i}'))
+
+    await writer.stop()
+
+    assert writer.pending_count == 0
+    assert sum(len(batch) for batch in batches) == 5
+    # После остановки новые записи фоновую задачу не поднимают
+    writer.enqueue(ClickLogEntry(button_id='late'))
+    assert writer.is_running() is False
@@ -0,0 +1,232 @@
+"""Пакетное суточное списание: условный UPDATE балансов, приостановка, раунды по пользователю, идемпотентность."""
+
+from __future__ import annotations
+
+import contextlib
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database.models import (
+    Base,
+    PromoGroup,
+    ServerSquad,
+    Subscription,
+    SubscriptionStatus,
+    Tariff,
+    Transaction,
+    User,
+    UserPromoGroup,
+    UserStatus,
+    server_squad_promo_groups,
+    tariff_promo_groups,
+)
+from app.services import daily_subscription_service as module
+from app.services.daily_subscription_service import DailySubscriptionService, billing_day_key
+from tests.fixtures.sqlite_memory import ensure_real_aiosqlite
+
+
+TABLES = [
+    PromoGroup.__table__,
+    ServerSquad.__table__,
+    server_squad_promo_groups,
+    User.__table__,
+    UserPromoGroup.__table__,
+    Tariff.__table__,
+    tariff_promo_groups,
+    Subscription.__table__,
+    Transaction.__table__,
+]
+
+
+@contextlib.asynccontextmanager
+async def charge_db(monkeypatch, tmp_path, *, batch_size: int = 2):
+    ensure_real_aiosqlite(monkeypatch)
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "daily.db"}')
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: Base.metadata.create_all(c, tables=TABLES))
+    maker = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+    monkeypatch.setattr(module, 'AsyncSessionLocal', maker)
+    monkeypatch.setattr(module.settings, 'DAILY_SUBSCRIPTIONS_CHARGE_BATCH_SIZE', batch_size)
+    monkeypatch.setattr(module.settings, 'DAILY_SUBSCRIPTIONS_CONCURRENCY', 2)
+    try:
+        yield maker
+    finally:
+        await engine.dispose()
+
+
+def _record_follow_ups(monkeypatch, service: DailySubscriptionService) -> list[tuple[str, int]]:
+    handled: list[tuple[str, int]] = []
+
+    async def after_charge(db, subscription, outcome):
+        handled.append(('charged', subscription.id))
+
+    async def after_suspend(subscription, outcome):
+        handled.append(('suspended', subscription.id))
+
+    monkeypatch.setattr(service, '_after_charge', after_charge)
+    monkeypatch.setattr(service, '_after_suspend', after_suspend)
+    service._bot = object()
+    return handled
+
+
+async def _seed(maker, balances: list[int], *, subscriptions_per_user: int = 1) -> None:
+    now = datetime.now(UTC)
+    async with maker() as db:
+        half = PromoGroup(name='Half', period_discounts={'1': 50})
+        # Мультитариф: у пользователя может быть по суточной подписке на каждый тариф
+        tariffs = [
+            Tariff(name=f'Daily {number}', is_daily=True, daily_price_kopeks=1000, period_prices={})
+            for number in range(subscriptions_per_user)
+        ]
+        db.add_all([half, *tariffs])
+        await db.flush()
+        for index, balance in enumerate(balances):
+            user = User(
+                telegram_id=900 + index,
+                first_name=f'User{index}',
+                status=UserStatus.ACTIVE.value,
+                balance_kopeks=balance,
+            )
+            db.add(user)
+            await db.flush()
+            for number, tariff in enumerate(tariffs):
+                db.add(
+                    Subscription(
+                        user_id=user.id,
+                        remnawave_short_id=f'short{index}_{number}',
+                        tariff_id=tariff.id,
+                        status=SubscriptionStatus.ACTIVE.value,
+                        is_trial=False,
+                        start_date=now - timedelta(days=3),
+                        end_date=now + timedelta(hours=1),
+                        last_daily_charge_at=now - timedelta(hours=25),
+                    )
+                )
+        await db.commit()
+
+
+async def _state(maker) -> tuple[dict[int, int], dict[int, str], list[tuple[int, int, str]]]:
+    async with maker() as db:
+        balances = dict((await db.execute(select(User.id, User.balance_kopeks).order_by(User.id))).all())
+        statuses = dict((await db.execute(select(Subscription.id, Subscription.status))).all())
+        transactions = (
+            await db.execute(
+                select(Transaction.user_id, Transaction.amount_kopeks, Transaction.external_id).order_by(Transaction.id)
+            )
+        ).all()
+    return balances, statuses, [tuple(row) for row in transactions]
+
+
+async def test_batches_debit_only_users_with_enough_balance(monkeypatch, tmp_path):
+    async with charge_db(monkeypatch, tmp_path) as maker:
+        await _seed(maker, [5000, 500, 1000])
+        async with maker() as db:
+            db.add(UserPromoGroup(user_id=2, promo_group_id=1))
+            await db.commit()
+        service = DailySubscriptionService()
+        handled = _record_follow_ups(monkeypatch, service)
+
+        stats = await service.process_daily_charges()
+
+        assert stats == {'checked': 3, 'charged': 3, 'suspended': 0, 'errors': 0}
+        balances, statuses, transactions = await _state(maker)
+        # Пользователь 2 со скидкой 50% платит 500 при балансе 500
+        assert balances == {1: 4000, 2: 0, 3: 0}
+        assert statuses == dict.fromkeys((1, 2, 3), SubscriptionStatus.ACTIVE.value)
+        assert sorted(amount for _, amount, _ in transactions) == [-1000, -1000, -500]
+        assert sorted(handled) == [('charged', 1), ('charged', 2), ('charged', 3)]
+
+        async with maker() as db:
+            user = await db.get(User, 1)
+            subscription = await db.get(Subscription, 1)
+            assert (user.total_spent_kopeks, user.purchase_count, user.has_had_paid_subscription) == (1000, 1, True)
+            assert subscription.end_date > datetime.now(UTC) + timedelta(hours=23)
+            assert subscription.last_daily_charge_at is not None
+
+
+async def test_insufficient_balance_suspends_without_transaction(monkeypatch, tmp_path):
+    async with charge_db(monkeypatch, tmp_path) as maker:
+        await _seed(maker, [999, 3000])
+        service = DailySubscriptionService()
+        handled = _record_follow_ups(monkeypatch, service)
+
+        stats = await service.process_daily_charges()
+
+        assert stats == {'checked': 2, 'charged': 1, 'suspended': 1, 'errors': 0}
+        balances, statuses, transactions = await _state(maker)
+        assert balances == {1: 999, 2: 2000}
+        assert statuses == {1: SubscriptionStatus.DISABLED.value, 2: SubscriptionStatus.ACTIVE.value}
+        assert [user_id for user_id, _, _ in transactions] == [2]
+        assert sorted(handled) == [('charged', 2), ('suspended', 1)]
+
+
+async def test_user_with_several_subscriptions_is_charged_per_round(monkeypatch, tmp_path):
+    async with charge_db(monkeypatch, tmp_path, batch_size=10) as maker:
+        await _seed(maker, [1500], subscriptions_per_user=2)
+
+        service = DailySubscriptionService()
+        _record_follow_ups(monkeypatch, service)
+
+        stats = await service.process_daily_charges()
+
+        # Баланса хватает только на одни сутки: вторая подписка приостанавливается
+        assert stats == {'checked': 2, 'charged': 1, 'suspended': 1, 'errors': 0}
+        balances, statuses, transactions = await _state(maker)
+        assert balances == {1: 500}
+        assert sorted(statuses.values()) == [SubscriptionStatus.ACTIVE.value, SubscriptionStatus.DISABLED.value]
+        assert len(transactions) == 1
+
+
+async def test_same_billing_day_is_not_charged_twice(monkeypatch, tmp_path):
+    async with charge_db(monkeypatch, tmp_path) as maker:
+        await _seed(maker, [5000, 5000])
+        now = datetime.now(UTC)
+        async with maker() as db:
+            # Оплата подписки 1 за сегодня уже записана, но last_daily_charge_at не обновлён
+            db.add(
+                Transaction(
+                    user_id=1,
+                    type='subscription_payment',
+                    amount_kopeks=-1000,
+                    payment_method='balance',
+                    external_id=billing_day_key(1, now),
+                    is_completed=True,
+                )
+            )
+            await db.commit()
+        service = DailySubscriptionService()
+        handled = _record_follow_ups(monkeypatch, service)
+
+        first = await service.process_daily_charges()
+        second = await service.process_daily_charges()
+
+        assert first == {'checked': 2, 'charged': 1, 'suspended': 0, 'errors': 0}
+        assert second['charged'] == 0
+        assert handled == [('charged', 2)]
+        balances, _, transactions = await _state(maker)
+        assert balances == {1: 5000, 2: 4000}
+        async with maker() as db:
+            assert await db.scalar(select(func.count()).select_from(Transaction)) == 2
+        assert transactions[-1] == (2, -1000, billing_day_key(2, now))
+
+
+async def test_auto_resume_activates_only_charged_subscriptions(monkeypatch, tmp_path):
+    async with charge_db(monkeypatch, tmp_path) as maker:
+        await _seed(maker, [2000, 100])
+        async with maker() as db:
+            for subscription in (await db.execute(select(Subscription))).scalars():
+                subscription.status = SubscriptionStatus.DISABLED.value
+            await db.commit()
+
+        service = DailySubscriptionService()
+        handled = _record_follow_ups(monkeypatch, service)
+
+        stats = await service.process_auto_resume()
+
+        assert stats == {'resumed': 1, 'recovered': 0, 'errors': 0}
+        balances, statuses, _ = await _state(maker)
+        assert balances == {1: 1000, 2: 100}
+        assert statuses == {1: SubscriptionStatus.ACTIVE.value, 2: SubscriptionStatus.DISABLED.value}
+        assert sorted(handled) == [('charged', 1), ('suspended', 2)]
@@ -0,0 +1,228 @@
+"""Кеш HWID-устройств: single-flight промахов, защита от устаревшего заполнения, правки из вебхуков."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from redis.exceptions import WatchError
+
+from app.external.remnawave_api import RemnaWaveAPI
+from app.services import hwid_device_cache as module
+from app.services.hwid_device_cache import HwidDeviceCache
+from app.services.remnawave_webhook_service import RemnaWaveWebhookService
+from app.utils.cache import decode_value
+
+
+@pytest.fixture
+def shared_cache(monkeypatch):
+    stored: dict[str, object] = {}
+
+    async def fake_get(key):
+        return stored.get(key)
+
+    async def fake_set(key, value, expire=None):
+        stored[key] = value
+        return True
+
+    async def fake_delete(key):
+        return stored.pop(key, None) is not None
+
+    async def fake_increment(key, amount=1):
+        stored[key] = int(stored.get(key) or 0) + amount
+        return stored[key]
+
+    async def fake_expire(key, seconds):
+        return key in stored
+
+    monkeypatch.setattr(module.cache, 'get', fake_get)
+    monkeypatch.setattr(module.cache, 'set', fake_set)
+    monkeypatch.setattr(module.cache, 'delete', fake_delete)
+    monkeypatch.setattr(module.cache, 'increment', fake_increment)
+    monkeypatch.setattr(module.cache, 'expire', fake_expire)
+    monkeypatch.setattr(module.cache, '_connected', True)
+    monkeypatch.setattr(module.cache, 'redis_client', _FakeRedis(stored))
+    return stored
+
+
+class _FakePipeline:
+    """WATCH/MULTI/EXEC поверх словаря ``stored``: запись в наблюдаемый ключ срывает транзакцию."""
+
+    def __init__(self, redis: _FakeRedis) -> None:
+        self.redis = redis
+        self.watched: dict[str, object] = {}
+        self.commands: list[tuple] = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def watch(self, key):
+        self.watched[key] = self.redis.stored.get(key)
+
+    async def get(self, key):
+        # Уступаем цикл, чтобы параллельные удаления успели прочитать одно и то же
+        await asyncio.sleep(0)
+        value = self.redis.stored.get(key)
+        return None if value is None else json.dumps(value).encode()
+
+    def multi(self):
+        pass
+
+    def incr(self, key):
+        self.commands.append(('incr', key))
+
+    def expire(self, key, seconds):
+        pass
+
+    def set(self, key, value, ex=None):
+        self.commands.append(('set', key, value))
+
+    async def execute(self):
+        if any(self.redis.stored.get(key) is not value for key, value in self.watched.items()):
+            raise WatchError('watched key changed')
+        for command in self.commands:
+            if command[0] == 'incr':
+                self.redis.stored[command[1]] = int(self.redis.stored.get(command[1]) or 0) + 1
+            else:
+                self.redis.stored[command[1]] = decode_value(command[2])
+        return []
+
+
+class _FakeRedis:
+    def __init__(self, stored: dict[str, object]) -> None:
+        self.stored = stored
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+
+class _Api:
+    def __init__(self, devices, gate: asyncio.Event | None = None):
+        self.devices = devices
+        self.gate = gate
+        self.calls = 0
+
+    async def get_user_devices_all(self, panel_user_id):
+        self.calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        return {'devices': list(self.devices), 'total': len(self.devices)}
+
+
+def _device_cache(api: _Api) -> HwidDeviceCache:
+    """Кеш, который открывает клиент панели ``api`` вместо настоящего."""
+    device_cache = HwidDeviceCache()
+    device_cache._api_client = lambda: contextlib.nullcontext(api)
+    return device_cache
+
+
+async def test_concurrent_misses_share_one_panel_call(shared_cache):
+    api = _Api([{'hwid': 'a'}, {'hwid': 'b'}])
+    device_cache = _device_cache(api)
+
+    results = await asyncio.gather(*(device_cache.get_devices(7) for _ in range(4)))
+
+    assert api.calls == 1
+    assert all(result['total'] == 2 for result in results)
+    # Следующее чтение обслуживается из кеша
+    assert (await device_cache.get_devices(7))['total'] == 2
+    assert api.calls == 1
+
+
+async def test_fill_started_before_mutation_is_not_stored(shared_cache):
+    gate = asyncio.Event()
+    api = _Api([{'hwid': 'a'}, {'hwid': 'gone'}], gate=gate)
+    device_cache = _device_cache(api)
+
+    fill = asyncio.create_task(device_cache.get_devices(7))
+    while not api.calls:
+        await asyncio.sleep(0)
+    await device_cache.remove_devices(7, {'gone'})
+    gate.set()
+    await fill
+
+    assert 'hwid_devices:7' not in shared_cache
+
+
+async def test_cancelled_caller_does_not_cancel_shared_fill(shared_cache):
+    gate = asyncio.Event()
+    api = _Api([{'hwid': 'a'}], gate=gate)
+    device_cache = _device_cache(api)
+
+    first = asyncio.create_task(device_cache.get_devices(7))
+    while not api.calls:
+        await asyncio.sleep(0)
+    second = asyncio.create_task(device_cache.get_devices(7))
+    await asyncio.sleep(0)
+    first.cancel()
+    gate.set()
+
+    assert (await second)['total'] == 1
+    assert api.calls == 1
+    assert first.cancelled()
+
+
+async def test_local_removal_patches_cached_list(shared_cache):
+    device_cache = _device_cache(_Api([{'hwid': 'a'}, {'hwid': 'b'}]))
+    await device_cache.get_devices(7)
+
+    await device_cache.remove_devices(7, {'a'})
+
+    assert shared_cache['hwid_devices:7'] == {'devices': [{'hwid': 'b'}], 'total': 1}
+
+
+async def test_concurrent_removals_keep_both_updates(shared_cache):
+    device_cache = _device_cache(_Api([{'hwid': 'a'}, {'hwid': 'b'}, {'hwid': 'c'}]))
+    await device_cache.get_devices(7)
+
+    await asyncio.gather(device_cache.remove_devices(7, {'a'}), device_cache.remove_devices(7, {'b'}))
+
+    assert shared_cache['hwid_devices:7'] == {'devices': [{'hwid': 'c'}], 'total': 1}
+
+
+async def test_panel_client_deletions_update_cache(monkeypatch, shared_cache):
+    """Любое удаление через клиент панели правит кеш — не только маршруты кабинета."""
+    device_cache = _device_cache(_Api([{'hwid': 'a'}, {'hwid': 'b'}]))
+    monkeypatch.setattr(module, 'hwid_device_cache', device_cache)
+    await device_cache.get_devices(7)
+    api = RemnaWaveAPI('http://panel.local', 'key')
+    api._make_request = AsyncMock(return_value={'response': {'total': 1, 'devices': [{'hwid': 'b'}]}})
+
+    assert await api.remove_device(7, 'a') is True
+    assert shared_cache['hwid_devices:7']['devices'] == [{'hwid': 'b'}]
+
+    api._make_request = AsyncMock(return_value={'response': {'total': 0, 'devices': []}})
+    assert await api.reset_user_devices(7) is True
+    assert shared_cache['hwid_devices:7'] == {'devices': [], 'total': 0}
+
+    # Неудача: что осталось в панели — неизвестно, запись сбрасывается
+    await device_cache.store(7, [{'hwid': 'c'}])
+    api._make_request = AsyncMock(return_value={'response': {'total': 1, 'devices': [{'hwid': 'c'}]}})
+    assert await api.remove_device(7, 'c') is False
+    assert 'hwid_devices:7' not in shared_cache
+
+
+async def test_device_webhooks_update_cache(monkeypatch, shared_cache):
+    device_cache = _device_cache(_Api([{'hwid': 'phone'}, {'hwid': 'tv'}]))
+    monkeypatch.setattr('app.services.remnawave_webhook_service.hwid_device_cache', device_cache)
+    await device_cache.get_devices(42)
+
+    service = RemnaWaveWebhookService(bot=AsyncMock())
+    monkeypatch.setattr(service, '_notify_user', AsyncMock())
+    user = SimpleNamespace(id=1, remnawave_id=None, language='ru')
+    subscription = SimpleNamespace(remnawave_id=None)
+
+    await service._handle_device_deleted(
+        None, user, subscription, {'hwidUserDevice': {'userId': 42, 'hwid': 'tv', 'platform': 'android'}}
+    )
+    assert shared_cache['hwid_devices:42']['devices'] == [{'hwid': 'phone'}]
+
+    await service._handle_device_added(None, user, subscription, {'hwidUserDevice': {'userId': 42, 'hwid': 'pc'}})
+    assert 'hwid_devices:42' not in shared_cache
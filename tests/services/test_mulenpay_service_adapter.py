@@ -7,7 +7,7 @@ import json
 import sys
 from collections.abc import Sequence
 from pathlib import Path
-from typing import Any, Self
+from typing import Any
 
 import pytest
 
@@ -18,57 +18,22 @@ if str(ROOT_DIR) not in sys.path:
 
 from app.config import settings
 from app.services.mulenpay_service import MulenPayService
+from app.utils.http_clients import HttpTestRequest, HttpTestResponse, http_clients
 
 
-class _DummyResponse:
-    def __init__(
-        self,
-        *,
-        status: int,
-        body: str = '{}',
-        headers: dict[str, str] | None = None,
-        url: str = 'https://mulenpay.test/endpoint',
-    ) -> None:
-        self.status = status
-        self._body = body
-        self.headers = headers or {'Content-Type': 'application/json'}
-        self.url = url
-
-    async def __aenter__(self) -> Self:
-        return self
-
-    async def __aexit__(self, exc_type, exc, tb) -> bool:  # pragma: no cover - interface
-        return False
-
-    async def text(self) -> str:
-        return self._body
-
-
-class _DummySession:
-    def __init__(self, result: Any) -> None:
-        self._result = result
-
-    async def __aenter__(self) -> Self:
-        return self
-
-    async def __aexit__(self, exc_type, exc, tb) -> bool:  # pragma: no cover - interface
-        return False
-
-    def request(self, *args: Any, **kwargs: Any) -> Any:
-        if isinstance(self._result, BaseException):
-            raise self._result
-        return self._result
-
-
-def _session_factory(responses: Sequence[Any]) -> Any:
+def _responder(responses: Sequence[Any]) -> Any:
+    """Обработчик test_transport: отдаёт ответы по очереди, исключения бросает."""
     call_state = {'index': 0}
 
-    def _factory(*_args: Any, **_kwargs: Any) -> _DummySession:
+    async def _handler(_request: HttpTestRequest) -> HttpTestResponse:
         index = min(call_state['index'], len(responses) - 1)
         call_state['index'] += 1
-        return _DummySession(responses[index])
+        result = responses[index]
+        if isinstance(result, BaseException):
+            raise result
+        return result
 
-    return _factory
+    return _handler
 
 
 @pytest.fixture
@@ -168,16 +133,8 @@ async def test_request_success(monkeypatch: pytest.MonkeyPatch) -> None:
     service = MulenPayService()
 
     response_payload = {'ok': True}
-    monkeypatch.setattr(
-        'app.services.mulenpay_service.aiohttp.ClientSession',
-        _session_factory(
-            [
-                _DummyResponse(status=200, body=json.dumps(response_payload)),
-            ]
-        ),
-    )
-
-    result = await service._request('GET', '/ping')
+    with http_clients.test_transport(_responder([HttpTestResponse(200, text=json.dumps(response_payload))])):
+        result = await service._request('GET', '/ping')
     assert result == response_payload
 
 
@@ -197,17 +154,12 @@ async def test_request_retries_on_server_error(monkeypatch: pytest.MonkeyPatch)
         fake_sleep,
     )
 
-    monkeypatch.setattr(
-        'app.services.mulenpay_service.aiohttp.ClientSession',
-        _session_factory(
-            [
-                _DummyResponse(status=502, body='{"error": "bad gateway"}'),
-                _DummyResponse(status=200, body='{"ok": true}'),
-            ]
-        ),
-    )
-
-    result = await service._request('GET', '/retry')
+    responses = [
+        HttpTestResponse(502, text='{"error": "bad gateway"}'),
+        HttpTestResponse(200, text='{"ok": true}'),
+    ]
+    with http_clients.test_transport(_responder(responses)):
+        result = await service._request('GET', '/retry')
     assert result == {'ok': True}
     assert sleep_calls == [service._retry_delay]
 
@@ -226,12 +178,8 @@ async def test_request_returns_none_after_timeouts(monkeypatch: pytest.MonkeyPat
         fake_sleep,
     )
 
-    monkeypatch.setattr(
-        'app.services.mulenpay_service.aiohttp.ClientSession',
-        _session_factory([TimeoutError()]),
-    )
-
-    result = await service._request('GET', '/timeout')
+    with http_clients.test_transport(_responder([TimeoutError()])):
+        result = await service._request('GET', '/timeout')
     assert result is None
 
 
@@ -240,10 +188,5 @@ async def test_request_reraises_cancelled(monkeypatch: pytest.MonkeyPatch) -> No
     _enable_service(monkeypatch)
     service = MulenPayService()
 
-    monkeypatch.setattr(
-        'app.services.mulenpay_service.aiohttp.ClientSession',
-        _session_factory([asyncio.CancelledError()]),
-    )
-
-    with pytest.raises(asyncio.CancelledError):
+    with http_clients.test_transport(_responder([asyncio.CancelledError()])), pytest.raises(asyncio.CancelledError):
         await service._request('GET', '/cancel')
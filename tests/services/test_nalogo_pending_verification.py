@@ -10,29 +10,23 @@
 from types import SimpleNamespace
 from unittest.mock import AsyncMock
 
+import pytest
+
 import app.services.nalogo_service as nalogo_module
-from app.services.nalogo_service import NALOGO_PENDING_VERIFICATION_KEY, NaloGoService
+from app.services.nalogo_receipt_store import InMemoryReceiptStore
+from app.services.nalogo_service import NALOGO_PENDING_VERIFICATION_KEY, NALOGO_QUEUE_KEY, NaloGoService
 
 
 class _FakeCache:
-    """Минимальный in-memory дублёр списков app.utils.cache."""
-
-    def __init__(self, lists=None):
-        self.lists = {k: list(v) for k, v in (lists or {}).items()}
-        self.values = {}
+    """Минимальный дублёр значений app.utils.cache; очереди — в процессных хранилищах."""
 
-    async def lrange(self, key):
-        return list(self.lists.get(key, []))
+    is_connected = False
+    redis_client = None
 
-    async def lpush(self, key, value):
-        self.lists.setdefault(key, []).insert(0, value)
-        return True
-
-    async def llen(self, key):
-        return len(self.lists.get(key, []))
+    def __init__(self):
+        self.values = {}
 
     async def delete(self, key):
-        self.lists.pop(key, None)
         self.values.pop(key, None)
         return True
 
@@ -41,6 +35,22 @@ class _FakeCache:
         return True
 
 
+@pytest.fixture(autouse=True)
+def stores(monkeypatch):
+    stores = {NALOGO_QUEUE_KEY: InMemoryReceiptStore(), NALOGO_PENDING_VERIFICATION_KEY: InMemoryReceiptStore()}
+    monkeypatch.setattr(nalogo_module, '_receipt_store', stores.__getitem__)
+    return stores
+
+
+async def _pending_items(stores) -> list[dict]:
+    return await stores[NALOGO_PENDING_VERIFICATION_KEY].items()
+
+
+async def _seed(stores, *receipts) -> None:
+    for position, receipt in enumerate(receipts):
+        await stores[NALOGO_PENDING_VERIFICATION_KEY].put(receipt, due_at=position)
+
+
 def _service() -> NaloGoService:
     service = NaloGoService.__new__(NaloGoService)
     service.configured = True
@@ -64,7 +74,7 @@ def _pending(**overrides) -> dict:
     return base | overrides
 
 
-async def test_pending_verification_entry_keeps_user_email(monkeypatch):
+async def test_pending_verification_entry_keeps_user_email(monkeypatch, stores):
     """Почта покупателя обязана лечь в очередь — иначе при пересылке её нет."""
     cache = _FakeCache()
     monkeypatch.setattr(nalogo_module, 'cache', cache)
@@ -81,14 +91,14 @@ async def test_pending_verification_entry_keeps_user_email(monkeypatch):
         user_email='buyer@example.com',
     )
 
-    (stored,) = cache.lists[NALOGO_PENDING_VERIFICATION_KEY]
+    (stored,) = await _pending_items(stores)
     assert stored['user_email'] == 'buyer@example.com'
 
 
-async def test_retry_delivers_receipt_to_the_buyer(monkeypatch):
+async def test_retry_delivers_receipt_to_the_buyer(monkeypatch, stores):
     """Чек, созданный ручной пересылкой, доставляется покупателю."""
-    cache = _FakeCache({NALOGO_PENDING_VERIFICATION_KEY: [_pending()]})
-    monkeypatch.setattr(nalogo_module, 'cache', cache)
+    await _seed(stores, _pending())
+    monkeypatch.setattr(nalogo_module, 'cache', _FakeCache())
     notify = AsyncMock()
     monkeypatch.setattr(nalogo_module, 'send_nalogo_receipt_notifications', notify)
     service = _service()
@@ -104,13 +114,13 @@ async def test_retry_delivers_receipt_to_the_buyer(monkeypatch):
     assert kwargs['user_email'] == 'buyer@example.com'
     assert kwargs['amount_kopeks'] == 149900
     # чек ушёл из очереди проверки — повторно его не пришлют
-    assert cache.lists.get(NALOGO_PENDING_VERIFICATION_KEY, []) == []
+    assert await _pending_items(stores) == []
 
 
-async def test_retry_recovers_amount_from_legacy_entry(monkeypatch):
+async def test_retry_recovers_amount_from_legacy_entry(monkeypatch, stores):
     """Старые записи очереди без amount_kopeks — сумма берётся из amount."""
-    cache = _FakeCache({NALOGO_PENDING_VERIFICATION_KEY: [_pending(amount_kopeks=None)]})
-    monkeypatch.setattr(nalogo_module, 'cache', cache)
+    await _seed(stores, _pending(amount_kopeks=None))
+    monkeypatch.setattr(nalogo_module, 'cache', _FakeCache())
     notify = AsyncMock()
     monkeypatch.setattr(nalogo_module, 'send_nalogo_receipt_notifications', notify)
     service = _service()
@@ -121,14 +131,14 @@ async def test_retry_recovers_amount_from_legacy_entry(monkeypatch):
     assert notify.await_args.kwargs['amount_kopeks'] == 149900
 
 
-async def test_retry_keeps_receipt_when_delivery_fails(monkeypatch):
+async def test_retry_keeps_receipt_when_delivery_fails(monkeypatch, stores):
     """Доставка упала — чек в ФНС уже создан, из очереди он всё равно уходит.
 
     Иначе админ увидит ошибку, нажмёт «повторить» и выпишет второй чек на тот
     же платёж.
     """
-    cache = _FakeCache({NALOGO_PENDING_VERIFICATION_KEY: [_pending()]})
-    monkeypatch.setattr(nalogo_module, 'cache', cache)
+    await _seed(stores, _pending())
+    monkeypatch.setattr(nalogo_module, 'cache', _FakeCache())
     monkeypatch.setattr(
         nalogo_module,
         'send_nalogo_receipt_notifications',
@@ -138,13 +148,13 @@ async def test_retry_keeps_receipt_when_delivery_fails(monkeypatch):
     monkeypatch.setattr(service, 'create_receipt', AsyncMock(return_value='uuid-42'))
 
     assert await service.retry_pending_receipt('pay-1', bot=SimpleNamespace()) == 'uuid-42'
-    assert cache.lists.get(NALOGO_PENDING_VERIFICATION_KEY, []) == []
+    assert await _pending_items(stores) == []
 
 
-async def test_retry_without_bot_still_creates_receipt(monkeypatch):
+async def test_retry_without_bot_still_creates_receipt(monkeypatch, stores):
     """Без bot чек всё равно создаётся — старое поведение не ломаем."""
-    cache = _FakeCache({NALOGO_PENDING_VERIFICATION_KEY: [_pending()]})
-    monkeypatch.setattr(nalogo_module, 'cache', cache)
+    await _seed(stores, _pending())
+    monkeypatch.setattr(nalogo_module, 'cache', _FakeCache())
     notify = AsyncMock()
     monkeypatch.setattr(nalogo_module, 'send_nalogo_receipt_notifications', notify)
     service = _service()
@@ -152,3 +162,17 @@ async def test_retry_without_bot_still_creates_receipt(monkeypatch):
 
     assert await service.retry_pending_receipt('pay-1') == 'uuid-42'
     notify.assert_not_awaited()
+
+
+async def test_mark_verified_removes_only_that_receipt(monkeypatch, stores):
+    """Снятие одного чека с проверки не трогает остальные и сохраняет их порядок."""
+    cache = _FakeCache()
+    monkeypatch.setattr(nalogo_module, 'cache', cache)
+    await _seed(stores, _pending(payment_id='pay-1'), _pending(payment_id='pay-2'), _pending(payment_id='pay-3'))
+
+    removed = await _service().mark_pending_as_verified('pay-2', receipt_uuid='uuid-2', was_created=True)
+
+    assert removed['payment_id'] == 'pay-2'
+    assert [r['payment_id'] for r in await _pending_items(stores)] == ['pay-1', 'pay-3']
+    assert cache.values['nalogo:created:pay-2'] == 'uuid-2'
+    assert await _service().mark_pending_as_verified('pay-2') is None
@@ -0,0 +1,110 @@
+"""Очередь чеков NaloGO: пул воркеров, ограничитель темпа и итоги пачки."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import app.services.nalogo_queue_service as queue_module
+import app.services.nalogo_service as nalogo_module
+from app.services.nalogo_queue_service import NalogoQueueService, _TokenBucket
+from app.services.nalogo_receipt_store import InMemoryReceiptStore
+from app.services.nalogo_service import NALOGO_PENDING_VERIFICATION_KEY, NALOGO_QUEUE_KEY, NaloGoService
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    stores = {NALOGO_QUEUE_KEY: InMemoryReceiptStore(), NALOGO_PENDING_VERIFICATION_KEY: InMemoryReceiptStore()}
+    monkeypatch.setattr(nalogo_module, '_receipt_store', stores.__getitem__)
+    monkeypatch.setattr(queue_module.settings, 'NALOGO_QUEUE_RECEIPT_DELAY', 0)
+    monkeypatch.setattr(queue_module.settings, 'NALOGO_QUEUE_WORKERS', 3)
+    monkeypatch.setattr(queue_module.settings, 'NALOGO_QUEUE_MAX_ATTEMPTS', 5)
+    return stores[NALOGO_QUEUE_KEY]
+
+
+def _nalogo_service(outcomes: dict[str, str | Exception | None]) -> NaloGoService:
+    service = NaloGoService.__new__(NaloGoService)
+    service.configured = True
+    service.sent = []
+
+    async def create_receipt(*, payment_id, **kwargs):
+        service.sent.append(payment_id)
+        await asyncio.sleep(0)
+        outcome = outcomes.get(payment_id, f'uuid-{payment_id}')
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    service.create_receipt = create_receipt
+    return service
+
+
+async def _enqueue(store, *receipts) -> None:
+    for position, receipt in enumerate(receipts):
+        await store.put({'amount': 100.0, **receipt}, due_at=position)
+
+
+async def test_workers_drain_queue_and_remove_sent_receipts(queue):
+    await _enqueue(queue, *({'payment_id': f'pay-{i}'} for i in range(10)))
+    service = _nalogo_service({})
+
+    await NalogoQueueService(service)._process_pending_receipts()
+
+    assert sorted(service.sent) == sorted(f'pay-{i}' for i in range(10))
+    assert await queue.count() == 0
+
+
+async def test_unavailable_service_stops_batch_and_keeps_receipts(queue):
+    await _enqueue(queue, *({'payment_id': f'pay-{i}'} for i in range(10)))
+    service = _nalogo_service({'pay-0': None})
+
+    await NalogoQueueService(service)._process_pending_receipts()
+
+    remaining = {r['payment_id']: r for r in await queue.items()}
+    # Отправленные до сбоя чеки ушли, остальные вернулись в очередь сразу доступными
+    assert set(remaining) == {f'pay-{i}' for i in range(10)} - set(service.sent) | {'pay-0'}
+    assert remaining['pay-0']['attempts'] == 1
+    assert len(await queue.claim_due(time.time(), 100)) == len(remaining)
+
+
+async def test_exhausted_receipts_are_dropped_without_sending(queue):
+    await _enqueue(queue, {'payment_id': 'pay-old', 'attempts': 5}, {'payment_id': 'pay-new'})
+    service = _nalogo_service({})
+
+    await NalogoQueueService(service)._process_pending_receipts()
+
+    assert service.sent == ['pay-new']
+    assert await queue.count() == 0
+
+
+async def test_without_redis_queueing_fails_instead_of_keeping_receipt_in_memory(monkeypatch):
+    monkeypatch.setattr(nalogo_module.cache, '_connected', False)
+    service = NaloGoService.__new__(NaloGoService)
+
+    queued = await service._queue_receipt('Подписка', 100.0, 1, None)
+
+    assert queued is False
+    assert await service.get_queue_length() == 0
+    assert await service.claim_queued_receipts(10) == []
+
+
+async def test_token_bucket_limits_rate_after_burst(monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    sleeps: list[float] = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        clock.now += delay
+
+    monkeypatch.setattr(queue_module.time, 'monotonic', lambda: clock.now)
+    monkeypatch.setattr(queue_module.asyncio, 'sleep', fake_sleep)
+    bucket = _TokenBucket(rate=0.5, capacity=2)
+
+    for _ in range(4):
+        await bucket.acquire()
+
+    # Два запроса всплеском, дальше — по одному раз в 2 секунды
+    assert sleeps == [pytest.approx(2.0), pytest.approx(2.0)]
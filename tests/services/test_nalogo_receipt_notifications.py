@@ -371,17 +371,9 @@ class _FakeSession:
     def get(self, *args, **kwargs):
         return self._response
 
-    async def __aenter__(self):
-        return self
-
-    async def __aexit__(self, *args):
-        return False
-
 
 def _patch_aiohttp(monkeypatch, response):
-    import aiohttp
-
-    monkeypatch.setattr(aiohttp, 'ClientSession', lambda *a, **kw: _FakeSession(response))
+    monkeypatch.setattr(_nalogo_module.http_clients, 'session', lambda name: _FakeSession(response))
     monkeypatch.setattr(settings, 'NALOGO_PROXY_URL', None, raising=False)
 
 
@@ -0,0 +1,237 @@
+"""Inbox платёжных вебхуков: идемпотентная запись, порядок по платежу, повторы, быстрый ответ."""
+
+from __future__ import annotations
+
+import contextlib
+import json
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.requests import Request
+
+from app.config import settings
+from app.database.models import Base, PaymentWebhookInbox
+from app.services import payment_webhook_inbox as module
+from app.services.payment_webhook_inbox import PaymentWebhookInboxWorker, ordering_key
+from app.webserver.payments import create_payment_router
+from tests.fixtures.sqlite_memory import ensure_real_aiosqlite
+
+
+@contextlib.asynccontextmanager
+async def inbox_db(monkeypatch, tmp_path):
+    """Файловая SQLite: воркеры открывают несколько сессий параллельно."""
+    ensure_real_aiosqlite(monkeypatch)
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "inbox.db"}')
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: Base.metadata.create_all(c, tables=[PaymentWebhookInbox.__table__]))
+    maker = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+    monkeypatch.setattr(module, 'AsyncSessionLocal', maker)
+    try:
+        yield maker
+    finally:
+        await engine.dispose()
+
+
+async def _rows(maker) -> list[PaymentWebhookInbox]:
+    async with maker() as db:
+        return list((await db.scalars(select(PaymentWebhookInbox).order_by(PaymentWebhookInbox.id))).all())
+
+
+def _yookassa(payment_id: str, event: str) -> dict:
+    return {
+        'type': 'notification',
+        'event': event,
+        'object': {'id': payment_id, 'status': event.rsplit('.', maxsplit=1)[-1]},
+    }
+
+
+def test_ordering_key_finds_payment_reference():
+    assert ordering_key('process_yookassa_webhook', _yookassa('p1', 'payment.succeeded')) == 'yookassa:p1'
+    assert ordering_key('process_cryptobot_webhook', {'update_id': 5, 'payload': {'invoice_id': 77}}) == 'cryptobot:77'
+    assert ordering_key('process_cloudpayments_fail_webhook', {'invoice_id': 'inv'}) == 'cloudpayments:inv'
+    assert ordering_key('process_heleket_webhook', {'status': 'paid'}).startswith('heleket:event:')
+
+
+async def test_duplicate_delivery_collapses(monkeypatch, tmp_path):
+    async with inbox_db(monkeypatch, tmp_path) as session_maker:
+        worker = PaymentWebhookInboxWorker()
+        payload = _yookassa('p1', 'payment.succeeded')
+
+        assert await worker.enqueue('process_yookassa_webhook', payload) is True
+        assert await worker.enqueue('process_yookassa_webhook', json.loads(json.dumps(payload))) is False
+        assert await worker.enqueue('process_yookassa_webhook', _yookassa('p1', 'payment.canceled')) is True
+
+        rows = await _rows(session_maker)
+        assert [(row.provider, row.ordering_key, row.status) for row in rows] == [
+            ('yookassa', 'yookassa:p1', 'pending'),
+            ('yookassa', 'yookassa:p1', 'pending'),
+        ]
+
+
+async def test_events_of_one_payment_are_processed_in_order(monkeypatch, tmp_path):
+    async with inbox_db(monkeypatch, tmp_path) as session_maker:
+        calls: list[tuple[str, str]] = []
+
+        async def process_yookassa_webhook(db, payload):
+            calls.append((payload['object']['id'], payload['event']))
+            return True
+
+        worker = PaymentWebhookInboxWorker()
+        worker.set_payment_service(SimpleNamespace(process_yookassa_webhook=process_yookassa_webhook))
+        await worker.enqueue('process_yookassa_webhook', _yookassa('p1', 'payment.waiting_for_capture'))
+        await worker.enqueue('process_yookassa_webhook', _yookassa('p1', 'payment.succeeded'))
+        await worker.enqueue('process_yookassa_webhook', _yookassa('p2', 'payment.succeeded'))
+
+        assert await worker.process_pending() == 2
+        assert sorted(calls) == [('p1', 'payment.waiting_for_capture'), ('p2', 'payment.succeeded')]
+        assert await worker.process_pending() == 1
+        assert calls[-1] == ('p1', 'payment.succeeded')
+        assert await worker.process_pending() == 0
+
+        rows = await _rows(session_maker)
+        assert {row.status for row in rows} == {'done'}
+        assert all(row.attempts == 1 and row.processed_at is not None for row in rows)
+
+
+async def test_failures_are_retried_then_marked_failed(monkeypatch, tmp_path):
+    async with inbox_db(monkeypatch, tmp_path) as session_maker:
+        monkeypatch.setattr(settings, 'PAYMENT_WEBHOOK_INBOX_MAX_ATTEMPTS', 2)
+        handler = AsyncMock(side_effect=[RuntimeError('panel down'), False])
+        worker = PaymentWebhookInboxWorker()
+        worker.set_payment_service(SimpleNamespace(process_yookassa_webhook=handler))
+        await worker.enqueue('process_yookassa_webhook', _yookassa('p1', 'payment.succeeded'))
+        await worker.enqueue('process_yookassa_webhook', _yookassa('p1', 'payment.canceled'))
+
+        assert await worker.process_pending() == 1
+        first = (await _rows(session_maker))[0]
+        assert (first.status, first.attempts, first.last_error) == ('pending', 1, 'RuntimeError: panel down')
+        assert first.next_attempt_at > datetime.now(UTC)
+        # Следующее событие того же платежа ждёт, пока первое не завершится
+        assert await worker.process_pending() == 0
+
+        async with session_maker() as db:
+            await db.execute(
+                update(PaymentWebhookInbox).values(next_attempt_at=datetime.now(UTC) - timedelta(seconds=1))
+            )
+            await db.commit()
+
+        assert await worker.process_pending() == 1
+        first = (await _rows(session_maker))[0]
+        assert (first.status, first.attempts, first.last_error) == ('failed', 2, 'обработчик вернул False')
+        assert handler.await_count == 2
+
+
+async def test_expired_lease_is_reclaimed(monkeypatch, tmp_path):
+    async with inbox_db(monkeypatch, tmp_path) as session_maker:
+        handler = AsyncMock(return_value=True)
+        worker = PaymentWebhookInboxWorker()
+        worker.set_payment_service(SimpleNamespace(process_yookassa_webhook=handler))
+        await worker.enqueue('process_yookassa_webhook', _yookassa('p1', 'payment.succeeded'))
+
+        async with session_maker() as db:
+            await db.execute(
+                update(PaymentWebhookInbox).values(
+                    status='processing', attempts=1, locked_until=datetime.now(UTC) - timedelta(seconds=1)
+                )
+            )
+            await db.commit()
+
+        assert await worker.process_pending() == 1
+        row = (await _rows(session_maker))[0]
+        assert (row.status, row.attempts) == ('done', 2)
+
+
+async def test_webhook_is_acknowledged_without_processing(monkeypatch, tmp_path):
+    async with inbox_db(monkeypatch, tmp_path) as session_maker:
+        monkeypatch.setattr(settings, 'PAYMENT_WEBHOOK_INBOX_ENABLED', True)
+        monkeypatch.setattr(settings, 'YOOKASSA_ENABLED', True, raising=False)
+        monkeypatch.setattr(settings, 'YOOKASSA_SHOP_ID', 'shop', raising=False)
+        monkeypatch.setattr(settings, 'YOOKASSA_SECRET_KEY', 'key', raising=False)
+        monkeypatch.setattr(settings, 'YOOKASSA_WEBHOOK_PATH', '/yookassa', raising=False)
+        monkeypatch.setattr(settings, 'YOOKASSA_SKIP_IP_CHECK', True, raising=False)
+        service = SimpleNamespace(process_yookassa_webhook=AsyncMock(return_value=True))
+
+        router = create_payment_router(SimpleNamespace(), service)
+        route = next(route for route in router.routes if route.path == '/yookassa' and 'POST' in route.methods)
+        body = json.dumps(_yookassa('p1', 'payment.succeeded')).encode()
+
+        async def receive() -> dict:
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        for _ in range(2):
+            request = Request({'type': 'http', 'method': 'POST', 'path': '/yookassa', 'headers': []}, receive)
+            response = await route.endpoint(request)
+            assert response.status_code == 200
+
+        service.process_yookassa_webhook.assert_not_awaited()
+        rows = await _rows(session_maker)
+        assert [(row.method, row.status) for row in rows] == [('process_yookassa_webhook', 'pending')]
+
+
+async def test_platega_subscription_callback_returning_none_is_done(monkeypatch, tmp_path):
+    async with inbox_db(monkeypatch, tmp_path) as session_maker:
+        monkeypatch.setattr(settings, 'PAYMENT_WEBHOOK_INBOX_ENABLED', True)
+        monkeypatch.setattr(settings, 'PLATEGA_ENABLED', True, raising=False)
+        monkeypatch.setattr(settings, 'PLATEGA_MERCHANT_ID', 'merchant', raising=False)
+        monkeypatch.setattr(settings, 'PLATEGA_SECRET', 'secret', raising=False)
+        monkeypatch.setattr(settings, 'PLATEGA_WEBHOOK_PATH', '/platega', raising=False)
+        # Обработчик подписочных коллбеков Platega по контракту возвращает None
+        handler = AsyncMock(return_value=None)
+        service = SimpleNamespace(process_platega_subscription_callback=handler)
+
+        router = create_payment_router(SimpleNamespace(), service)
+        route = next(route for route in router.routes if route.path == '/platega' and 'POST' in route.methods)
+        body = json.dumps({'Id': 'charge-1', 'SubscriptionId': 'sub-1', 'Status': 'CONFIRMED'}).encode()
+
+        async def receive() -> dict:
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        headers = [(b'x-merchantid', b'merchant'), (b'x-secret', b'secret')]
+        request = Request({'type': 'http', 'method': 'POST', 'path': '/platega', 'headers': headers}, receive)
+        response = await route.endpoint(request)
+        assert response.status_code == 200
+        handler.assert_not_awaited()
+
+        worker = PaymentWebhookInboxWorker()
+        worker.set_payment_service(service)
+        assert await worker.process_pending() == 1
+        assert await worker.process_pending() == 0
+
+        handler.assert_awaited_once()
+        rows = await _rows(session_maker)
+        assert [(row.method, row.status, row.attempts, row.last_error) for row in rows] == [
+            ('process_platega_subscription_callback', 'done', 1, None)
+        ]
+
+
+async def test_cleanup_prunes_old_done_and_failed_rows(monkeypatch, tmp_path):
+    async with inbox_db(monkeypatch, tmp_path) as session_maker:
+        monkeypatch.setattr(settings, 'PAYMENT_WEBHOOK_INBOX_RETENTION_DAYS', 14)
+        monkeypatch.setattr(settings, 'PAYMENT_WEBHOOK_INBOX_FAILED_RETENTION_DAYS', 90)
+        worker = PaymentWebhookInboxWorker()
+        now = datetime.now(UTC)
+        ages = {
+            'done_old': ('done', 20),
+            'done_new': ('done', 1),
+            'failed_mid': ('failed', 20),
+            'failed_old': ('failed', 100),
+        }
+        for payment_id in ages:
+            await worker.enqueue('process_yookassa_webhook', _yookassa(payment_id, 'payment.succeeded'))
+        async with session_maker() as db:
+            for payment_id, (row_status, days) in ages.items():
+                await db.execute(
+                    update(PaymentWebhookInbox)
+                    .where(PaymentWebhookInbox.ordering_key == f'yookassa:{payment_id}')
+                    .values(status=row_status, processed_at=now - timedelta(days=days))
+                )
+            await db.commit()
+
+        assert await worker.cleanup() == 2
+        assert sorted(row.ordering_key for row in await _rows(session_maker)) == [
+            'yookassa:done_new',
+            'yookassa:failed_mid',
+        ]
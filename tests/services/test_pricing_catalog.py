@@ -0,0 +1,244 @@
+"""Каталог цен: снимок из БД, расчёт без запросов, версия и перезагрузка."""
+
+from __future__ import annotations
+
+import contextlib
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database.models import (
+    Base,
+    PromoGroup,
+    ServerSquad,
+    Tariff,
+    server_squad_promo_groups,
+    tariff_promo_groups,
+)
+from app.services import pricing_catalog as module
+from app.services.pricing_catalog import PricingCatalog, PricingCatalogStore, ServerPrice, TariffPrice
+from app.services.pricing_engine import PricingEngine
+from tests.fixtures.sqlite_memory import ensure_real_aiosqlite
+
+
+CATALOG_TABLES = [
+    PromoGroup.__table__,
+    ServerSquad.__table__,
+    Tariff.__table__,
+    server_squad_promo_groups,
+    tariff_promo_groups,
+]
+
+
+@contextlib.asynccontextmanager
+async def catalog_db(monkeypatch, tmp_path):
+    ensure_real_aiosqlite(monkeypatch)
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "catalog.db"}')
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: Base.metadata.create_all(c, tables=CATALOG_TABLES))
+    maker = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+    monkeypatch.setattr(module, 'AsyncSessionLocal', maker)
+    try:
+        async with maker() as db:
+            vip = PromoGroup(name='VIP')
+            db.add_all(
+                [
+                    vip,
+                    ServerSquad(squad_uuid='nl', display_name='NL', price_kopeks=5000, allowed_promo_groups=[vip]),
+                    ServerSquad(squad_uuid='de', display_name='DE', price_kopeks=7000, is_available=False),
+                    Tariff(
+                        name='Pro',
+                        period_prices={'30': 29900, '90': 79900},
+                        device_limit=2,
+                        device_price_kopeks=10000,
+                        custom_days_enabled=True,
+                        price_per_day_kopeks=1000,
+                        allowed_promo_groups=[vip],
+                    ),
+                ]
+            )
+            await db.commit()
+        yield maker
+    finally:
+        await engine.dispose()
+
+
+def _fake_cache(monkeypatch) -> dict:
+    store: dict = {}
+
+    async def get(key):
+        return store.get(key)
+
+    async def increment(key, amount=1):
+        store[key] = store.get(key, 0) + amount
+        return store[key]
+
+    monkeypatch.setattr(module, 'cache', SimpleNamespace(get=get, increment=increment))
+    return store
+
+
+def _server(uuid: str, price: int, *, allowed: frozenset[int] = frozenset(), server_id: int = 1) -> ServerPrice:
+    return ServerPrice(
+        id=server_id,
+        squad_uuid=uuid,
+        price_kopeks=price,
+        is_available=True,
+        allowed_promo_group_ids=allowed,
+    )
+
+
+async def test_snapshot_mirrors_database(monkeypatch, tmp_path):
+    async with catalog_db(monkeypatch, tmp_path) as maker:
+        async with maker() as db:
+            catalog = await module.load_pricing_catalog(db, version=3)
+
+        assert catalog.version == 3
+        nl, de = catalog.server('nl'), catalog.server('de')
+        assert (nl.price_kopeks, nl.is_available, len(nl.allowed_promo_group_ids)) == (5000, True, 1)
+        assert (de.price_kopeks, de.is_available, de.allowed_promo_group_ids) == (7000, False, frozenset())
+
+        (tariff,) = catalog.tariffs.values()
+        assert tariff.get_available_periods() == [30, 90]
+        assert tariff.get_price_for_period(90) == 79900
+        assert tariff.get_price_for_custom_days(10) == 10000
+        assert tariff.is_available_for_promo_group(next(iter(nl.allowed_promo_group_ids)))
+        assert not tariff.is_available_for_promo_group(999)
+
+
+async def test_tariff_quote_from_snapshot_matches_orm(monkeypatch, tmp_path):
+    async with catalog_db(monkeypatch, tmp_path) as maker:
+        async with maker() as db:
+            orm_tariff = await db.get(Tariff, 1)
+            snapshot_tariff = TariffPrice.from_model(orm_tariff)
+
+            engine = PricingEngine()
+            for period, devices in [(30, 2), (90, 4), (10, 3)]:
+                expected = await engine.calculate_tariff_purchase_price(orm_tariff, period, device_limit=devices)
+                actual = await engine.calculate_tariff_purchase_price(snapshot_tariff, period, device_limit=devices)
+                assert actual == expected
+
+
+async def test_caller_loaded_tariff_is_quoted_from_snapshot(monkeypatch, tmp_path):
+    async with catalog_db(monkeypatch, tmp_path) as maker:
+        async with maker() as db:
+            orm_tariff = await db.get(Tariff, 1)
+            store = PricingCatalogStore()
+            store._snapshot = await module.load_pricing_catalog(db, version=1)
+        monkeypatch.setattr('app.services.pricing_engine.pricing_catalog', store)
+
+        # Строка, загруженная вызывающим кодом до правки цены, не должна влиять на котировку
+        orm_tariff.period_prices = {'30': 1}
+        pricing = await PricingEngine().calculate_tariff_purchase_price(orm_tariff, 30)
+
+        assert pricing.final_total == 29900
+
+
+async def test_only_price_edits_invalidate_catalog(monkeypatch, tmp_path):
+    from app.database.crud.server_squad import update_server_squad
+
+    invalidations: list[bool] = []
+
+    async def invalidate():
+        invalidations.append(True)
+
+    monkeypatch.setattr(module, 'pricing_catalog', SimpleNamespace(invalidate=invalidate))
+    async with catalog_db(monkeypatch, tmp_path) as maker:
+        async with maker() as db:
+            await update_server_squad(db, 1, display_name='Netherlands', max_users=10)
+            assert invalidations == []
+
+            await update_server_squad(db, 1, price_kopeks=5500)
+            assert invalidations == [True]
+
+
+async def test_servers_are_priced_from_snapshot_without_db(monkeypatch):
+    store = PricingCatalogStore()
+    store._snapshot = PricingCatalog(version=1, servers={'nl': _server('nl', 5000, allowed=frozenset({7}))})
+    monkeypatch.setattr('app.services.pricing_engine.pricing_catalog', store)
+
+    batch = AsyncMock(return_value=[])
+    with patch('app.services.pricing_engine.get_server_squads_by_uuids', batch):
+        total, details = await PricingEngine()._calculate_servers_price(['nl'], AsyncMock(), promo_group_id=3)
+
+    batch.assert_not_awaited()
+    assert total == 5000
+    assert details == [{'uuid': 'nl', 'id': 1, 'price': 5000, 'status': 'not_allowed'}]
+
+
+async def test_servers_missing_from_snapshot_fall_back_to_db(monkeypatch):
+    store = PricingCatalogStore()
+    store._snapshot = PricingCatalog(version=1, servers={'nl': _server('nl', 5000)})
+    monkeypatch.setattr('app.services.pricing_engine.pricing_catalog', store)
+
+    fresh = SimpleNamespace(id=2, squad_uuid='fi', price_kopeks=3000, is_available=True, allowed_promo_groups=[])
+    batch = AsyncMock(return_value=[fresh])
+    with patch('app.services.pricing_engine.get_server_squads_by_uuids', batch):
+        total, details = await PricingEngine()._calculate_servers_price(['nl', 'fi'], AsyncMock())
+
+    assert batch.await_args.args[1] == ['fi']
+    assert total == 8000
+    assert [detail['id'] for detail in details] == [1, 2]
+
+
+async def test_renewal_uses_snapshot_tariff_when_relationship_is_not_loaded(monkeypatch):
+    tariff = TariffPrice.from_model(
+        Tariff(
+            id=5,
+            is_active=True,
+            period_prices={'30': 29900},
+            is_daily=False,
+            daily_price_kopeks=0,
+            device_limit=1,
+            device_price_kopeks=10000,
+            custom_days_enabled=False,
+            price_per_day_kopeks=0,
+            min_days=1,
+            max_days=365,
+            custom_traffic_enabled=False,
+            traffic_price_per_gb_kopeks=0,
+            min_traffic_gb=1,
+            max_traffic_gb=1000,
+        )
+    )
+    store = PricingCatalogStore()
+    store._snapshot = PricingCatalog(version=1, tariffs={5: tariff})
+    monkeypatch.setattr('app.services.pricing_engine.pricing_catalog', store)
+    subscription = SimpleNamespace(id=1, tariff_id=5, tariff=None, device_limit=2)
+
+    pricing = await PricingEngine().calculate_renewal_price(AsyncMock(), subscription, 30)
+
+    assert pricing.is_tariff_mode
+    assert pricing.final_total == 29900 + 10000
+
+
+async def test_version_bump_reloads_every_process(monkeypatch, tmp_path):
+    async with catalog_db(monkeypatch, tmp_path) as maker:
+        shared = _fake_cache(monkeypatch)
+        editor, other = PricingCatalogStore(), PricingCatalogStore()
+        await editor.reload()
+        await other.reload()
+        assert other.snapshot.version == 0
+        assert await other.sync_once() is False
+
+        async with maker() as db:
+            server = await db.get(ServerSquad, 1)
+            server.price_kopeks = 6500
+            await db.commit()
+        await editor.invalidate()
+
+        assert shared[module.VERSION_KEY] == 1
+        assert editor.snapshot.server('nl').price_kopeks == 6500
+        assert other.snapshot.server('nl').price_kopeks == 5000
+        assert await other.sync_once() is True
+        assert other.snapshot.version == 1
+        assert other.snapshot.server('nl').price_kopeks == 6500
+
+
+async def test_disabled_or_unloaded_catalog_is_not_used(monkeypatch):
+    store = PricingCatalogStore()
+    assert store.snapshot is None
+
+    store._snapshot = PricingCatalog(version=1)
+    monkeypatch.setattr(module.settings, 'PRICING_CATALOG_ENABLED', False)
+    assert store.snapshot is None
@@ -0,0 +1,149 @@
+"""Тесты очереди повторов операций в панели RemnaWave (in-memory backend)."""
+
+import asyncio
+import time
+
+from app.services.remnawave_retry_queue import (
+    InMemoryRetryBackend,
+    RedisRetryBackend,
+    RemnaWaveRetryQueue,
+    RetryItem,
+    merge_retry_items,
+)
+from app.utils.cache import cache
+
+
+def _queue(**kwargs) -> RemnaWaveRetryQueue:
+    # interval=0 — элементы сразу доступны для обработки
+    kwargs.setdefault('interval_seconds', 0)
+    kwargs.setdefault('workers', 4)
+    return RemnaWaveRetryQueue(**kwargs)
+
+
+def test_merge_keeps_create_and_original_timestamp() -> None:
+    first = RetryItem(subscription_id=1, user_id=10, action='create')
+    second = RetryItem(subscription_id=1, user_id=10, action='update')
+
+    merged = merge_retry_items(first, second)
+
+    assert merged.action == 'create'
+    assert merged.created_at == first.created_at
+    assert merged.token == second.token
+
+
+async def test_enqueue_collapses_same_subscription() -> None:
+    queue = _queue()
+    queue.enqueue(subscription_id=5, user_id=1, action='update')
+    queue.enqueue(subscription_id=5, user_id=1, action='create')
+    queue.enqueue(subscription_id=6, user_id=1, action='update')
+
+    assert await queue.get_pending_count() == 2
+
+
+async def test_success_acks_item(monkeypatch) -> None:
+    queue = _queue()
+
+    async def ok(item):
+        return None
+
+    monkeypatch.setattr(queue, '_run_action', ok)
+    queue.enqueue(subscription_id=5, user_id=1)
+
+    assert await queue.process_pending() == 1
+    assert await queue.get_pending_count() == 0
+
+
+async def test_failure_backs_off_then_dead_letters(monkeypatch) -> None:
+    queue = _queue(max_retries=2, interval_seconds=60)
+
+    async def fail(item):
+        return 'panel is down'
+
+    monkeypatch.setattr(queue, '_run_action', fail)
+    backend = queue.backend
+    await backend.upsert(RetryItem(subscription_id=5, user_id=1, action='create'), due_at=time.time())
+
+    await queue.process_pending()
+    # Первая неудача — перенос на base * 2^0 секунд вперёд
+    assert backend._due['5'] >= time.time() + 59
+    assert backend._items['5'].attempts == 1
+
+    backend._due['5'] = time.time()
+    await queue.process_pending()
+
+    assert await queue.get_pending_count() == 0
+    dead = await queue.get_dead_letters()
+    assert [item.subscription_id for item in dead] == [5]
+    assert dead[0].last_error == 'panel is down'
+
+    assert await queue.requeue_dead_letters() == 1
+    assert await queue.get_pending_count() == 1
+
+
+async def test_backoff_is_capped() -> None:
+    queue = _queue(interval_seconds=100, backoff_max_seconds=500)
+
+    assert [queue._backoff_delay(n) for n in (1, 2, 3, 4, 5)] == [100, 200, 400, 500, 500]
+
+
+async def test_superseded_item_survives_stale_ack() -> None:
+    backend = InMemoryRetryBackend()
+    stale = RetryItem(subscription_id=5, user_id=1, action='update')
+    await backend.upsert(stale, due_at=0)
+    [claimed] = await backend.claim_due(now=1, limit=10)
+
+    # Пока шла обработка, пришла новая операция для той же подписки
+    await backend.upsert(RetryItem(subscription_id=5, user_id=1, action='update'), due_at=2)
+    await backend.ack(claimed)
+
+    assert await backend.pending_count() == 1
+
+
+async def test_claimed_items_are_leased() -> None:
+    backend = InMemoryRetryBackend()
+    await backend.upsert(RetryItem(subscription_id=5, user_id=1, action='create'), due_at=0)
+
+    assert len(await backend.claim_due(now=1, limit=10)) == 1
+    assert await backend.claim_due(now=2, limit=10) == []
+
+
+async def test_workers_run_users_in_parallel_and_each_user_in_order(monkeypatch) -> None:
+    queue = _queue(workers=4)
+    running = 0
+    peak = 0
+    order: dict[int, list[int]] = {}
+
+    async def slow(item):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        order.setdefault(item.user_id, []).append(item.subscription_id)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    monkeypatch.setattr(queue, '_run_action', slow)
+    for user_id in range(4):
+        for sub_offset in range(3):
+            queue.enqueue(subscription_id=user_id * 10 + sub_offset, user_id=user_id)
+
+    assert await queue.process_pending() == 12
+    assert peak == 4
+    for user_id, subs in order.items():
+        assert subs == [user_id * 10, user_id * 10 + 1, user_id * 10 + 2]
+
+
+def test_backend_follows_cache_connection(monkeypatch) -> None:
+    """Хранилище выбирается при обращении, а не один раз при старте."""
+    queue = _queue()
+    monkeypatch.setattr(cache, '_connected', False)
+    assert isinstance(queue.backend, InMemoryRetryBackend)
+
+    client = object()
+    monkeypatch.setattr(cache, 'redis_client', client)
+    monkeypatch.setattr(cache, '_connected', True)
+    backend = queue.backend
+    assert isinstance(backend, RedisRetryBackend)
+    assert queue.backend is backend
+
+    monkeypatch.setattr(cache, '_connected', False)
+    assert isinstance(queue.backend, InMemoryRetryBackend)
@@ -0,0 +1,178 @@
+"""Сборщик статусов серверов: построчный разбор метрик, снимок в кеше и single-flight обновление."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.services import server_status_service as module
+from app.services.server_status_service import ServerStatusEntry, ServerStatusError, ServerStatusService
+
+
+METRICS = [
+    b'# HELP xray_proxy_latency_ms Proxy latency\n',
+    b'go_goroutines 42\n',
+    b'xray_proxy_latency_ms{address="1.1.1.1",name="\xf0\x9f\x87\xa9\xf0\x9f\x87\xaa Berlin",protocol="vless"} 120.6\n',
+    b'xray_proxy_status{address="1.1.1.1",name="\xf0\x9f\x87\xa9\xf0\x9f\x87\xaa Berlin",protocol="vless"} 1\n',
+    b'xray_proxy_status{address="2.2.2.2",name="Amsterdam",protocol="trojan"} 0\n',
+    b'xray_proxy_status_total 2\n',
+]
+
+
+class _Stream:
+    def __init__(self, lines: list[bytes]):
+        self._lines = iter(lines)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._lines)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+
+@pytest.fixture
+def xray_settings(monkeypatch):
+    monkeypatch.setattr(module.settings, 'SERVER_STATUS_MODE', 'xray')
+    monkeypatch.setattr(module.settings, 'SERVER_STATUS_METRICS_URL', 'http://checker/metrics')
+    monkeypatch.setattr(module.settings, 'SERVER_STATUS_REFRESH_INTERVAL', 30)
+
+    stored: dict[str, object] = {}
+
+    async def fake_get(key):
+        return stored.get(key)
+
+    async def fake_set(key, value, expire=None):
+        stored[key] = value
+        return True
+
+    monkeypatch.setattr(module.cache, 'get', fake_get)
+    monkeypatch.setattr(module.cache, 'set', fake_set)
+    return stored
+
+
+async def test_stream_parser_keeps_only_xray_series():
+    servers = await ServerStatusService()._parse_stream(_Stream(METRICS))
+
+    assert [(s.display_name, s.flag, s.latency_ms, s.is_online) for s in servers] == [
+        ('Berlin', '🇩🇪', 121, True),
+        ('Amsterdam', '', None, False),
+    ]
+    assert servers == ServerStatusService()._parse_metrics(b''.join(METRICS).decode())
+
+
+async def test_concurrent_reads_share_one_collection(monkeypatch, xray_settings):
+    service = ServerStatusService()
+    calls = 0
+
+    async def fake_fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0)
+        return await service._parse_stream(_Stream(METRICS))
+
+    monkeypatch.setattr(service, '_fetch_servers', fake_fetch)
+
+    results = await asyncio.gather(*(service.get_servers() for _ in range(5)))
+    assert calls == 1
+    assert all(len(result) == 2 for result in results)
+
+    # Второй процесс читает опубликованный снимок, не обращаясь к экспортеру
+    other = ServerStatusService()
+    monkeypatch.setattr(other, '_fetch_servers', fake_fetch)
+    shared = await other.get_servers()
+    assert calls == 1
+    assert shared[0] == results[0][0]
+    assert isinstance(shared[0], ServerStatusEntry)
+
+
+async def test_stale_snapshot_served_when_exporter_fails(monkeypatch, xray_settings):
+    service = ServerStatusService()
+
+    async def ok_fetch():
+        return await service._parse_stream(_Stream(METRICS))
+
+    async def failing_fetch():
+        raise ServerStatusError('Failed to fetch metrics')
+
+    monkeypatch.setattr(service, '_fetch_servers', ok_fetch)
+    await service.get_servers()
+    service._snapshot.collected_at -= 60
+    xray_settings.clear()
+
+    monkeypatch.setattr(service, '_fetch_servers', failing_fetch)
+    assert len(await service.get_servers()) == 2
+
+    service._snapshot.collected_at -= 3600
+    with pytest.raises(ServerStatusError):
+        await service.get_servers()
+
+
+async def test_reader_leaves_refresh_to_poller_until_it_misses_an_interval(monkeypatch, xray_settings):
+    service = ServerStatusService()
+    calls = 0
+
+    async def fake_fetch():
+        nonlocal calls
+        calls += 1
+        return await service._parse_stream(_Stream(METRICS))
+
+    monkeypatch.setattr(service, '_fetch_servers', fake_fetch)
+    await service.get_servers()
+    xray_settings.clear()
+
+    # Ровно интервал назад: очередной сбор за фоновой задачей, читатель экспортер не трогает
+    service._snapshot.collected_at -= 30
+    await service.get_servers()
+    assert calls == 1
+
+    service._snapshot.collected_at -= 30
+    await service.get_servers()
+    assert calls == 2
+
+
+async def test_overlong_metrics_line_is_reported_as_status_error(monkeypatch, xray_settings):
+    class _Response:
+        status = 200
+        content = _Stream([])
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    class _Session:
+        def get(self, url, **kwargs):
+            return _Response()
+
+    async def get_session():
+        return _Session()
+
+    async def too_long(content):
+        raise ValueError('Chunk too big')
+
+    service = ServerStatusService()
+    monkeypatch.setattr(service, '_get_session', get_session)
+    monkeypatch.setattr(service, '_parse_stream', too_long)
+
+    with pytest.raises(ServerStatusError):
+        await service._fetch_servers()
+
+
+async def test_session_replaced_after_timeout_change_is_closed(monkeypatch, xray_settings):
+    service = ServerStatusService()
+    monkeypatch.setattr(module.settings, 'SERVER_STATUS_REQUEST_TIMEOUT', 10)
+    first = await service._get_session()
+    assert await service._get_session() is first
+
+    monkeypatch.setattr(module.settings, 'SERVER_STATUS_REQUEST_TIMEOUT', 20)
+    second = await service._get_session()
+
+    assert second is not first
+    assert first.closed
+    await service.stop()
+    assert second.closed
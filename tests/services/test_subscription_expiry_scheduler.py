@@ -0,0 +1,189 @@
+"""Планировщик истечения: пакетный UPDATE по end_date, ближайший срок и read-only middleware."""
+
+from __future__ import annotations
+
+import contextlib
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database.crud.subscription import expire_due_subscriptions, get_next_subscription_expiry_at
+from app.database.models import (
+    Base,
+    MonitoringLog,
+    PromoGroup,
+    ServerSquad,
+    Subscription,
+    SubscriptionStatus,
+    Tariff,
+    User,
+    UserPromoGroup,
+    UserStatus,
+    server_squad_promo_groups,
+    tariff_promo_groups,
+)
+from app.middlewares.subscription_checker import SubscriptionStatusMiddleware
+from app.services import monitoring_service as module
+from app.services.monitoring_service import MonitoringService
+from tests.fixtures.sqlite_memory import ensure_real_aiosqlite
+
+
+TABLES = [
+    PromoGroup.__table__,
+    ServerSquad.__table__,
+    server_squad_promo_groups,
+    User.__table__,
+    UserPromoGroup.__table__,
+    Tariff.__table__,
+    tariff_promo_groups,
+    Subscription.__table__,
+    MonitoringLog.__table__,
+]
+
+
+@contextlib.asynccontextmanager
+async def expiry_db(monkeypatch, tmp_path):
+    ensure_real_aiosqlite(monkeypatch)
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "expiry.db"}')
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: Base.metadata.create_all(c, tables=TABLES))
+    maker = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+    monkeypatch.setattr(module, 'AsyncSessionLocal', maker)
+    try:
+        yield maker
+    finally:
+        await engine.dispose()
+
+
+async def _seed(maker, now: datetime) -> dict[str, int]:
+    """Создаёт по подписке на каждый сценарий и возвращает их id."""
+    async with maker() as db:
+        regular = Tariff(name='Month', period_prices={'30': 10000})
+        daily = Tariff(name='Daily', is_daily=True, daily_price_kopeks=1000, period_prices={})
+        db.add_all([regular, daily])
+        await db.flush()
+
+        scenarios = {
+            'due': dict(end_date=now - timedelta(seconds=1)),
+            'due_multi': dict(end_date=now - timedelta(minutes=10), owner='multi'),
+            # Вторая подписка того же пользователя — на другом тарифе (мультитариф)
+            'future': dict(end_date=now + timedelta(minutes=3), owner='multi', tariff=daily),
+            'daily': dict(end_date=now - timedelta(minutes=5), tariff=daily),
+            'webhook': dict(end_date=now - timedelta(minutes=5), last_webhook_update_at=now - timedelta(seconds=10)),
+            'blocked_user': dict(end_date=now - timedelta(minutes=5), user_status=UserStatus.BLOCKED.value),
+            'already_expired': dict(end_date=now - timedelta(days=1), status=SubscriptionStatus.EXPIRED.value),
+        }
+        users: dict[str, User] = {}
+        ids: dict[str, int] = {}
+        for index, (name, options) in enumerate(scenarios.items()):
+            owner = options.pop('owner', name)
+            if owner not in users:
+                users[owner] = User(
+                    telegram_id=700 + index,
+                    first_name=owner,
+                    status=options.pop('user_status', UserStatus.ACTIVE.value),
+                )
+                db.add(users[owner])
+                await db.flush()
+            options.pop('user_status', None)
+            tariff = options.pop('tariff', None)
+            subscription = Subscription(
+                user_id=users[owner].id,
+                remnawave_short_id=f'short_{name}',
+                tariff_id=(tariff or regular).id,
+                status=options.pop('status', SubscriptionStatus.ACTIVE.value),
+                is_trial=False,
+                start_date=now - timedelta(days=30),
+                **options,
+            )
+            db.add(subscription)
+            await db.flush()
+            ids[name] = subscription.id
+        await db.commit()
+    return ids
+
+
+async def _statuses(maker) -> dict[int, str]:
+    async with maker() as db:
+        return dict((await db.execute(select(Subscription.id, Subscription.status))).all())
+
+
+async def test_expire_due_subscriptions_updates_only_due_rows(monkeypatch, tmp_path):
+    async with expiry_db(monkeypatch, tmp_path) as maker:
+        now = datetime.now(UTC)
+        ids = await _seed(maker, now)
+
+        async with maker() as db:
+            first = await expire_due_subscriptions(db, now=now, limit=1)
+            rest = await expire_due_subscriptions(db, now=now, limit=10)
+            await db.commit()
+
+        # Сначала самая старая просрочка, затем остальные; суточная, недавно
+        # обновлённая вебхуком и подписка заблокированного пользователя не трогаются
+        assert [subscription_id for subscription_id, _ in first] == [ids['due_multi']]
+        assert [subscription_id for subscription_id, _ in rest] == [ids['due']]
+        statuses = await _statuses(maker)
+        expired = {name for name, subscription_id in ids.items() if statuses[subscription_id] == 'expired'}
+        assert expired == {'due', 'due_multi', 'already_expired'}
+
+        async with maker() as db:
+            next_expiry = await get_next_subscription_expiry_at(db, after=now)
+        assert abs(next_expiry.replace(tzinfo=UTC) - (now + timedelta(minutes=3))) < timedelta(seconds=1)
+
+
+async def test_scheduler_notifies_users_left_without_active_subscription(monkeypatch, tmp_path):
+    async with expiry_db(monkeypatch, tmp_path) as maker:
+        ids = await _seed(maker, datetime.now(UTC))
+        monkeypatch.setattr(module.settings, 'SUBSCRIPTION_EXPIRY_BATCH_SIZE', 1)
+        monkeypatch.setattr(module.settings, 'MULTI_TARIFF_ENABLED', True)
+        monkeypatch.setattr(module.settings, 'SALES_MODE', 'tariffs')
+
+        service = MonitoringService(bot=object())
+        notified: list[tuple[int, str | None]] = []
+
+        async def send_expired(user, subscription, *, tariff_name=None):
+            notified.append((subscription.id, tariff_name))
+            return True
+
+        monkeypatch.setattr(service, '_send_subscription_expired_notification', send_expired)
+
+        next_expiry = await service._expire_due_subscriptions()
+
+        # У владельца due_multi осталась активная подписка future — уведомление не нужно
+        assert notified == [(ids['due'], 'Month')]
+        assert next_expiry is not None
+        assert next_expiry.replace(tzinfo=UTC) > datetime.now(UTC)
+        statuses = await _statuses(maker)
+        assert statuses[ids['due_multi']] == statuses[ids['due']] == SubscriptionStatus.EXPIRED.value
+        async with maker() as db:
+            log = await db.scalar(select(MonitoringLog))
+        assert log.data == {'count': 2}
+
+
+async def test_middleware_only_wakes_scheduler(monkeypatch):
+    woken: list[bool] = []
+    monkeypatch.setattr(module.monitoring_service, 'wake_expiry_scheduler', lambda: woken.append(True))
+
+    class ForbiddenDb:
+        def __getattr__(self, name):
+            raise AssertionError(f'middleware не должен обращаться к БД: {name}')
+
+    subscription = SimpleNamespace(
+        id=1,
+        status=SubscriptionStatus.ACTIVE.value,
+        end_date=datetime.now(UTC) - timedelta(hours=1),
+        tariff=None,
+        is_daily_paused=False,
+    )
+    user = SimpleNamespace(id=1, subscriptions=[subscription])
+
+    async def handler(event, data):
+        return 'handled'
+
+    result = await SubscriptionStatusMiddleware()(handler, object(), {'db': ForbiddenDb(), 'db_user': user})
+
+    assert result == 'handled'
+    assert woken == [True]
+    assert subscription.status == SubscriptionStatus.ACTIVE.value
@@ -0,0 +1,101 @@
+"""Снимок трафика для мини-приложения: свежий не трогает панель, устаревший обновляется один раз в фоне."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import UTC, datetime
+
+from app.services import subscription_usage_refresher as module
+from app.services.subscription_usage_refresher import SubscriptionUsageRefresher
+from app.utils.cache import CacheService
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, bytes] = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+
+def _cache(monkeypatch, *, connected: bool = True) -> CacheService:
+    service = CacheService()
+    service.redis_client = FakeRedis()
+    service._connected = connected
+    monkeypatch.setattr(module, 'cache', service)
+    return service
+
+
+def _count_refreshes(monkeypatch, refresher: SubscriptionUsageRefresher, *, synced: bool = True) -> list[int]:
+    calls: list[int] = []
+    release = asyncio.Event()
+
+    async def refresh(subscription_id):
+        calls.append(subscription_id)
+        await release.wait()
+        if synced:
+            await module.cache.set(refresher._key(subscription_id), datetime.now(UTC).isoformat(), expire=60)
+
+    monkeypatch.setattr(refresher, '_refresh', refresh)
+    refresher.release = release
+    return calls
+
+
+async def _drain(refresher: SubscriptionUsageRefresher) -> None:
+    refresher.release.set()
+    await asyncio.gather(*refresher._inflight.values())
+
+
+async def test_stale_snapshot_is_refreshed_once_in_background(monkeypatch):
+    _cache(monkeypatch)
+    refresher = SubscriptionUsageRefresher()
+    calls = _count_refreshes(monkeypatch, refresher)
+
+    # Параллельные открытия мини-приложения не ждут панель и запускают одно обновление
+    results = await asyncio.gather(*(refresher.ensure_fresh(7) for _ in range(5)))
+    assert results == [None] * 5
+    assert calls == [7]
+
+    await _drain(refresher)
+    synced_at = await refresher.ensure_fresh(7)
+    assert isinstance(synced_at, datetime)
+    assert calls == [7]
+
+
+async def test_claim_blocks_other_processes_until_marker_expires(monkeypatch):
+    cache = _cache(monkeypatch)
+    first, second = SubscriptionUsageRefresher(), SubscriptionUsageRefresher()
+    first_calls = _count_refreshes(monkeypatch, first, synced=False)
+    second_calls = _count_refreshes(monkeypatch, second, synced=False)
+
+    await first.ensure_fresh(3)
+    await _drain(first)
+    # Синхронизация не удалась, но ключ занят до конца TTL — второй процесс панель не дёргает
+    assert await second.ensure_fresh(3) is None
+    assert (first_calls, second_calls) == ([3], [])
+
+    cache.redis_client.values.clear()
+    await second.ensure_fresh(3)
+    await _drain(second)
+    assert second_calls == [3]
+
+
+async def test_without_redis_refresh_is_throttled_in_process(monkeypatch):
+    _cache(monkeypatch, connected=False)
+    monkeypatch.setattr(module.settings, 'MINIAPP_USAGE_MAX_AGE_SECONDS', 300)
+    refresher = SubscriptionUsageRefresher()
+    calls = _count_refreshes(monkeypatch, refresher)
+
+    await refresher.ensure_fresh(1)
+    await _drain(refresher)
+    await refresher.ensure_fresh(1)
+    await refresher.ensure_fresh(2)
+    await _drain(refresher)
+
+    assert calls == [1, 2]
@@ -0,0 +1,179 @@
+"""Синхронизация настроек между процессами: дельты, версии, догоняющее чтение и публикация после коммита."""
+
+from __future__ import annotations
+
+import contextlib
+import json
+from types import SimpleNamespace
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.config import settings
+from app.database.models import Base, SystemSetting
+from app.services import system_settings_sync as module
+from app.services.system_settings_service import bot_configuration_service
+from app.services.system_settings_sync import SettingChange, SystemSettingsSync
+from tests.fixtures.sqlite_memory import ensure_real_aiosqlite
+
+
+class FakeRedis:
+    """Общий Redis нескольких «процессов»: эмулирует Lua-скрипт публикации."""
+
+    def __init__(self) -> None:
+        self.values: dict[str, int] = {}
+        self.hashes: dict[str, dict[str, int]] = {}
+        self.published: list[tuple[str, str]] = []
+
+    async def eval(self, script, numkeys, version_key, changes_key, key, channel, message):
+        assert script == module._PUBLISH_SCRIPT
+        version = self.values.get(version_key, 0) + 1
+        self.values[version_key] = version
+        self.hashes.setdefault(changes_key, {})[key] = version
+        payload = json.loads(message)
+        payload['version'] = version
+        self.published.append((channel, json.dumps(payload)))
+        return version
+
+    async def get(self, key):
+        value = self.values.get(key)
+        return None if value is None else str(value).encode()
+
+    async def hgetall(self, key):
+        return {name.encode(): str(version).encode() for name, version in self.hashes.get(key, {}).items()}
+
+
+def _shared_redis(monkeypatch) -> FakeRedis:
+    redis = FakeRedis()
+    monkeypatch.setattr(module, 'cache', SimpleNamespace(redis_client=redis, is_connected=True))
+    return redis
+
+
+def _record_applied(monkeypatch) -> list[tuple[str, str | None, bool]]:
+    applied: list[tuple[str, str | None, bool]] = []
+
+    async def fake_apply(key, raw_value, *, reset):
+        applied.append((key, raw_value, reset))
+
+    monkeypatch.setattr(bot_configuration_service, 'apply_remote_change', fake_apply)
+    return applied
+
+
+@contextlib.asynccontextmanager
+async def settings_db(monkeypatch, tmp_path):
+    ensure_real_aiosqlite(monkeypatch)
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "settings.db"}')
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda c: Base.metadata.create_all(c, tables=[SystemSetting.__table__]))
+    maker = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(module, 'AsyncSessionLocal', maker)
+    try:
+        yield maker
+    finally:
+        await engine.dispose()
+
+
+async def test_delta_from_other_process_is_applied(monkeypatch):
+    redis = _shared_redis(monkeypatch)
+    applied = _record_applied(monkeypatch)
+    editor, other = SystemSettingsSync(), SystemSettingsSync()
+
+    assert await editor.publish(SettingChange('SUPPORT_USERNAME', 'new_support')) == 1
+    assert await editor.publish(SettingChange('SUPPORT_USERNAME', None, reset=True)) == 2
+
+    for _channel, message in redis.published:
+        await other.handle_message(message)
+        await editor.handle_message(message)
+
+    assert [channel for channel, _ in redis.published] == [module.CHANNEL] * 2
+    assert applied == [('SUPPORT_USERNAME', 'new_support', False), ('SUPPORT_USERNAME', None, True)]
+    assert other.applied_version == editor.applied_version == 2
+
+    # Повторная доставка уже применённой версии игнорируется
+    await other.handle_message(redis.published[0][1])
+    assert len(applied) == 2
+
+
+async def test_version_gap_rereads_only_changed_keys(monkeypatch, tmp_path):
+    async with settings_db(monkeypatch, tmp_path) as maker:
+        redis = _shared_redis(monkeypatch)
+        applied = _record_applied(monkeypatch)
+        editor, other = SystemSettingsSync(), SystemSettingsSync()
+
+        async with maker() as db:
+            db.add_all(
+                [
+                    SystemSetting(key='SUPPORT_USERNAME', value='support_v2'),
+                    SystemSetting(key='UNTOUCHED', value='ignored'),
+                ]
+            )
+            await db.commit()
+
+        await editor.publish(SettingChange('MAINTENANCE_MODE', 'true'))
+        await editor.publish(SettingChange('SUPPORT_USERNAME', 'support_v1'))
+        await editor.publish(SettingChange('SUPPORT_USERNAME', 'support_v2'))
+        await editor.publish(SettingChange('MAINTENANCE_MODE', None, reset=True))
+
+        # Первые три сообщения потеряны, приходит только последнее
+        await other.handle_message(redis.published[-1][1])
+
+        assert sorted(applied) == [('MAINTENANCE_MODE', None, True), ('SUPPORT_USERNAME', 'support_v2', False)]
+        assert other.applied_version == 4
+        assert await other.check_version() is False
+
+
+async def test_periodic_check_catches_up_without_messages(monkeypatch, tmp_path):
+    async with settings_db(monkeypatch, tmp_path) as maker:
+        _shared_redis(monkeypatch)
+        applied = _record_applied(monkeypatch)
+        editor, other = SystemSettingsSync(), SystemSettingsSync()
+
+        async with maker() as db:
+            db.add(SystemSetting(key='SUPPORT_USERNAME', value='from_db'))
+            await db.commit()
+        await editor.publish(SettingChange('SUPPORT_USERNAME', 'from_db'))
+
+        assert await other.check_version() is True
+        assert applied == [('SUPPORT_USERNAME', 'from_db', False)]
+        assert await other.check_version() is False
+
+
+async def test_change_is_published_only_after_commit(monkeypatch, tmp_path):
+    async with settings_db(monkeypatch, tmp_path) as maker:
+        spawned: list[list[SettingChange]] = []
+        monkeypatch.setattr(module.system_settings_sync, '_spawn_publish', spawned.append)
+
+        async with maker() as db:
+            db.add(SystemSetting(key='SUPPORT_USERNAME', value='rolled_back'))
+            module.system_settings_sync.publish_after_commit(db, SettingChange('SUPPORT_USERNAME', 'rolled_back'))
+            await db.rollback()
+            assert spawned == []
+
+            db.add(SystemSetting(key='SUPPORT_USERNAME', value='committed'))
+            module.system_settings_sync.publish_after_commit(db, SettingChange('SUPPORT_USERNAME', 'committed'))
+            assert spawned == []
+            await db.commit()
+
+        assert spawned == [[SettingChange('SUPPORT_USERNAME', 'committed')]]
+
+
+async def test_remote_change_updates_snapshot_and_settings(monkeypatch):
+    bot_configuration_service.initialize_definitions()
+    monkeypatch.setattr(settings, 'SUPPORT_USERNAME', 'original')
+    original_values = dict(bot_configuration_service._original_values)
+    original_values['SUPPORT_USERNAME'] = 'original'
+    monkeypatch.setattr(bot_configuration_service, '_original_values', original_values)
+    monkeypatch.setattr(bot_configuration_service, '_env_override_keys', set())
+    snapshot: dict[str, str | None] = {}
+    monkeypatch.setattr(bot_configuration_service, '_overrides_raw', snapshot)
+
+    await bot_configuration_service.apply_remote_change('SUPPORT_USERNAME', 'remote', reset=False)
+
+    assert settings.SUPPORT_USERNAME == 'remote'
+    assert bot_configuration_service._overrides_raw == {'SUPPORT_USERNAME': 'remote'}
+    # Снимок подменяется целиком, а не меняется на месте
+    assert snapshot == {}
+
+    await bot_configuration_service.apply_remote_change('SUPPORT_USERNAME', None, reset=True)
+
+    assert settings.SUPPORT_USERNAME == 'original'
+    assert not bot_configuration_service.has_override('SUPPORT_USERNAME')
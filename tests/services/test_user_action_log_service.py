@@ -1,6 +1,6 @@
 """Тесты лога действий юзера в кабинете (user_action_log_service)."""
 
-from unittest.mock import AsyncMock, patch
+from unittest.mock import patch
 
 from app.config import Settings, settings
 from app.services.user_action_log_service import (
@@ -39,39 +39,23 @@ def test_should_log_gates(monkeypatch) -> None:
 
 def test_schedule_skips_when_gated(monkeypatch) -> None:
     monkeypatch.setattr(settings, 'USER_ACTION_LOG_ENABLED', True, raising=False)
-    with patch('app.services.user_action_log_service.asyncio.create_task') as create_task:
+    with patch('app.services.user_action_log_service.button_click_log_writer') as writer:
         schedule_cabinet_action_log(1, 'GET', '/cabinet/subscription')
-        create_task.assert_not_called()
+        writer.enqueue.assert_not_called()
 
         schedule_cabinet_action_log(1, 'POST', '/cabinet/subscription/trial')
-        create_task.assert_called_once()
-        # Извлекаем корутину, чтобы не ругался warning про не-awaited
-        create_task.call_args.args[0].close()
+        writer.enqueue.assert_called_once()
 
 
-async def test_write_uses_stats_service(monkeypatch) -> None:
+def test_schedule_enqueues_normalized_entry(monkeypatch) -> None:
     monkeypatch.setattr(settings, 'USER_ACTION_LOG_ENABLED', True, raising=False)
-    from app.services import user_action_log_service as mod
-
-    log_call = AsyncMock()
-    fake_db = AsyncMock()
-
-    class FakeSessionCtx:
-        async def __aenter__(self):
-            return fake_db
-
-        async def __aexit__(self, *args):
-            return False
-
-    with (
-        patch.object(mod, 'AsyncSessionLocal', lambda: FakeSessionCtx()),
-        patch('app.services.menu_layout.service.MenuLayoutService.log_button_click', log_call),
-    ):
-        await mod._write_cabinet_action(42, 'POST', '/cabinet/subscriptions/5/renew')
-
-    log_call.assert_awaited_once()
-    kwargs = log_call.await_args.kwargs
-    assert kwargs['button_id'] == 'POST /cabinet/subscriptions/{id}/renew'
-    assert kwargs['user_id'] == 42
-    assert kwargs['callback_data'] == '/cabinet/subscriptions/5/renew'
-    assert kwargs['button_type'] == 'cabinet'
+    with patch('app.services.user_action_log_service.button_click_log_writer') as writer:
+        schedule_cabinet_action_log(42, 'post', '/cabinet/subscriptions/5/renew')
+
+    entry = writer.enqueue.call_args.args[0]
+    assert entry.button_id == 'POST /cabinet/subscriptions/{id}/renew'
+    # Кабинет знает внутренний User.id, а не Telegram ID
+    assert entry.user_id == 42
+    assert entry.telegram_id is None
+    assert entry.callback_data == '/cabinet/subscriptions/5/renew'
+    assert entry.button_type == 'cabinet'
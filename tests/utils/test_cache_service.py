@@ -0,0 +1,170 @@
+"""CacheService: SCAN/UNLINK вместо KEYS, пакетные mget/mset/pipeline, конверт формата и локальный слой."""
+
+from __future__ import annotations
+
+import fnmatch
+import json
+
+import pytest
+
+from app.utils import cache as module
+from app.utils.cache import CacheService, ChannelSubCache, JsonSerializer, decode_value
+
+
+class FakeRedis:
+    """Словарь байтов с командами, которые использует CacheService."""
+
+    def __init__(self) -> None:
+        self.values: dict[str, bytes] = {}
+        self.calls: list[str] = []
+
+    async def get(self, key):
+        self.calls.append('get')
+        return self.values.get(key)
+
+    async def mget(self, keys):
+        self.calls.append('mget')
+        return [self.values.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None, nx=False):
+        self.calls.append('set')
+        if nx and key in self.values:
+            return None
+        self.values[key] = value if isinstance(value, bytes) else str(value).encode()
+        return True
+
+    async def delete(self, *keys):
+        self.calls.append('delete')
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+    async def unlink(self, *keys):
+        self.calls.append('unlink')
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+    async def keys(self, pattern):
+        raise AssertionError('KEYS блокирует Redis')
+
+    async def scan_iter(self, match='*', count=None):
+        self.calls.append('scan')
+        for key in list(self.values):
+            if fnmatch.fnmatchcase(key, match):
+                yield key.encode()
+
+    async def expire(self, key, seconds):
+        return key in self.values
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis) -> None:
+        self.redis = redis
+        self.queued: list = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.queued.append((name, args, kwargs))
+
+        return queue
+
+    async def execute(self):
+        self.redis.calls.append('pipeline')
+        calls_before = len(self.redis.calls)
+        results = [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.queued]
+        del self.redis.calls[calls_before:]
+        return results
+
+
+def _service(serializer=None) -> tuple[CacheService, FakeRedis]:
+    service = CacheService(serializer=serializer)
+    redis = FakeRedis()
+    service.redis_client = redis
+    service._connected = True
+    return service, redis
+
+
+async def test_delete_pattern_scans_and_unlinks_in_batches(monkeypatch):
+    service, redis = _service()
+    monkeypatch.setattr(module, '_UNLINK_BATCH', 2)
+    for index in range(5):
+        redis.values[f'available_countries:{index}'] = b'1'
+    redis.values['other'] = b'1'
+
+    assert sorted(await service.get_keys('available_countries*')) == [f'available_countries:{i}' for i in range(5)]
+    assert await service.delete_pattern('available_countries*') == 5
+
+    assert list(redis.values) == ['other']
+    assert redis.calls.count('unlink') == 3
+
+
+async def test_mget_mset_and_pipeline_round_trip():
+    service, redis = _service()
+
+    assert await service.mset({'a': {'x': 1}, 'b': [1, 2]}, expire=60)
+    assert redis.calls == ['pipeline']
+    assert await service.mget(['a', 'missing', 'b']) == [{'x': 1}, None, [1, 2]]
+
+    results = await service.pipeline().get('a').set('c', 'value').delete('b').execute()
+    assert results == [{'x': 1}, True, 1]
+    assert await service.get('c') == 'value'
+
+
+async def test_legacy_json_and_counters_stay_readable():
+    service, redis = _service()
+    redis.values['legacy'] = json.dumps({'when': '2026-01-01 00:00:00+00:00'}).encode()
+    redis.values['counter'] = b'7'
+
+    assert await service.get('legacy') == {'when': '2026-01-01 00:00:00+00:00'}
+    assert await service.get('counter') == 7
+    # JSON по умолчанию пишется без конверта — его читают и процессы старой версии
+    await service.set('plain', {'a': 1})
+    assert json.loads(redis.values['plain']) == {'a': 1}
+
+
+async def test_envelope_selects_codec_and_rejects_unknown():
+    class Compact(JsonSerializer):
+        def encode(self, value):
+            return module._ENVELOPE_MARKER + bytes((self.codec_id,)) + self.dumps(value)
+
+    service, redis = _service(Compact())
+    await service.set('k', [1, 'два'])
+
+    assert redis.values['k'][:1] == b'\x00'
+    assert await service.get('k') == [1, 'два']
+    with pytest.raises(ValueError):
+        decode_value(b'\x00\x7f payload')
+
+    redis.values['broken'] = b'\x00\x7f payload'
+    assert await service.get('broken') is None
+
+
+async def test_local_layer_serves_hot_key_and_is_invalidated_by_writes(monkeypatch):
+    service, redis = _service()
+    monkeypatch.setattr(module, 'cache', service)
+    await service.set('required_channels:active', [{'channel_id': '-100'}])
+
+    first = await ChannelSubCache.get_required_channels()
+    first.append({'channel_id': 'mutated'})
+    second = await ChannelSubCache.get_required_channels()
+
+    # Один поход в Redis, а изменение полученного списка не портит кеш
+    assert redis.calls.count('get') == 1
+    assert second == [{'channel_id': '-100'}]
+
+    await ChannelSubCache.invalidate_channels()
+    assert await ChannelSubCache.get_required_channels() is None
+    assert redis.calls.count('get') == 2
+
+
+async def test_channel_statuses_use_single_mget(monkeypatch):
+    service, redis = _service()
+    monkeypatch.setattr(module, 'cache', service)
+    await ChannelSubCache.set_sub_status(5, '-1', True)
+    await ChannelSubCache.set_sub_status(5, '-2', False)
+    redis.calls.clear()
+
+    statuses = await ChannelSubCache.get_sub_statuses(5, ['-1', '-2', '-3'])
+
+    assert statuses == {'-1': True, '-2': False, '-3': None}
+    assert redis.calls == ['mget']
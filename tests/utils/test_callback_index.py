@@ -0,0 +1,145 @@
+"""Индекс callback-хендлеров: извлечение ключей, порядок кандидатов, подмена наблюдателя."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from aiogram import BaseMiddleware, Dispatcher, F
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.filters import StateFilter
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import CallbackQuery, User
+
+from app.utils.callback_index import (
+    CallbackIndex,
+    DataKeys,
+    IndexedCallbackQueryObserver,
+    extract_data_keys,
+    install_callback_index,
+    log_callback_index_report,
+)
+
+
+class _States(StatesGroup):
+    editing = State()
+
+
+def _keys(*filters) -> DataKeys | None:
+    dp = Dispatcher()
+
+    async def handler(callback): ...
+
+    dp.callback_query.register(handler, *filters)
+    return extract_data_keys(dp.callback_query.handlers[0])
+
+
+def _callback(data: str) -> CallbackQuery:
+    user = User.model_construct(id=1, is_bot=False, first_name='u')
+    return CallbackQuery.model_construct(id='1', from_user=user, chat_instance='c', data=data)
+
+
+def _named(name: str):
+    async def handler(callback):
+        return name
+
+    handler.__name__ = handler.__qualname__ = name
+    return handler
+
+
+def test_extracts_exact_prefix_and_combined_filters():
+    assert _keys(F.data == 'menu') == DataKeys(exact=('menu',))
+    assert _keys(F.data.in_({'a'})) == DataKeys(exact=('a',))
+    assert _keys(F.data.startswith('buy_')) == DataKeys(prefixes=('buy_',))
+    assert _keys(F.data.startswith(('a_', 'b_'))) == DataKeys(prefixes=('a_', 'b_'))
+    assert _keys(F.data.startswith('pay_') & ~F.data.startswith('pay_check_')) == DataKeys(prefixes=('pay_',))
+    assert _keys(F.data.startswith('x_'), F.data == 'x_1') == DataKeys(exact=('x_1',))
+    assert _keys((F.data == 'a') | F.data.startswith('b_')) == DataKeys(exact=('a',), prefixes=('b_',))
+
+
+def test_unindexable_filters():
+    assert _keys(lambda c: c.data == 'menu') is None
+    assert _keys(F.data.in_('abc')) is None
+    assert _keys(~F.data.startswith('a')) is None
+    assert _keys((F.data == 'a') | F.data.contains('b')) is None
+    assert _keys(F.data.regexp(r'^a_\d+$')) is None
+    assert _keys() is None
+
+
+def test_candidates_keep_registration_order():
+    dp = Dispatcher()
+    for name, flt in [
+        ('prefix_short', F.data.startswith('a')),
+        ('lambda', lambda c: True),
+        ('exact', F.data == 'ab_1'),
+        ('prefix_long', F.data.startswith('ab_')),
+        ('other', F.data.startswith('z')),
+    ]:
+        dp.callback_query.register(_named(name), flt)
+
+    index = CallbackIndex(dp.callback_query.handlers)
+
+    assert [h.callback.__name__ for h in index.candidates('ab_1')] == ['prefix_short', 'lambda', 'exact', 'prefix_long']
+    assert [h.callback.__name__ for h in index.candidates('zz')] == ['lambda', 'other']
+    assert [h.callback.__name__ for h in index.candidates(None)] == ['lambda']
+    assert index.report().indexed == 4
+
+
+async def test_routes_to_same_handler_as_linear_dispatcher():
+    def register(dp: Dispatcher) -> None:
+        dp.callback_query.register(_named('edit_state'), F.data.startswith('edit_'), StateFilter(_States.editing))
+        dp.callback_query.register(_named('edit'), F.data.startswith('edit_'))
+        dp.callback_query.register(_named('menu'), F.data == 'menu')
+        dp.callback_query.register(_named('fallback'))
+
+    plain = Dispatcher()
+    register(plain)
+    indexed = Dispatcher()
+    install_callback_index(indexed)
+    register(indexed)
+    bot = SimpleNamespace(id=1)
+
+    for data, raw_state in [
+        ('edit_1', None),
+        ('edit_1', _States.editing.state),
+        ('menu', None),
+        ('unknown', None),
+    ]:
+        expected = await plain.callback_query.trigger(_callback(data), bot=bot, raw_state=raw_state)
+        actual = await indexed.callback_query.trigger(_callback(data), bot=bot, raw_state=raw_state)
+        assert actual == expected
+
+    assert await indexed.callback_query.trigger(_callback('menu'), bot=bot, raw_state=None) == 'menu'
+
+
+async def test_install_moves_handlers_and_middlewares():
+    class _Tag(BaseMiddleware):
+        async def __call__(self, handler, event, data):
+            data['tag'] = 'seen'
+            return await handler(event, data)
+
+    async def tagged(callback, tag):
+        return tag
+
+    dp = Dispatcher()
+    dp.callback_query.middleware(_Tag())
+    dp.callback_query.register(tagged, F.data == 'go')
+
+    observer = install_callback_index(dp)
+
+    assert isinstance(dp.callback_query, IndexedCallbackQueryObserver)
+    assert dp.observers['callback_query'] is observer
+    assert install_callback_index(dp) is observer
+    assert await observer.trigger(_callback('go'), bot=SimpleNamespace(id=1)) == 'seen'
+    assert await observer.trigger(_callback('stop'), bot=SimpleNamespace(id=1)) is UNHANDLED
+
+
+def test_report_lists_unindexed_handlers():
+    dp = Dispatcher()
+    observer = install_callback_index(dp)
+    observer.register(_named('indexed'), F.data == 'a')
+    observer.register(_named('legacy'), lambda c: c.data == 'b')
+
+    report = log_callback_index_report(observer)
+
+    assert (report.total, report.indexed) == (2, 1)
+    assert report.unindexed == [f'{__name__}.legacy']
@@ -0,0 +1,182 @@
+"""Реестр HTTP-клиентов: переиспользование сессий, политика повторов, тестовый транспорт."""
+
+from __future__ import annotations
+
+import asyncio
+
+import aiohttp
+import pytest
+
+from app.utils import http_clients as module
+from app.utils.http_clients import (
+    HttpClientConfig,
+    HttpClientRegistry,
+    HttpTestRequest,
+    HttpTestResponse,
+)
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch):
+    async def fake_sleep(_delay: float) -> None:
+        return None
+
+    monkeypatch.setattr(module.asyncio, 'sleep', fake_sleep)
+
+
+def _scripted(results: list) -> tuple[list[HttpTestRequest], object]:
+    seen: list[HttpTestRequest] = []
+
+    async def handler(request: HttpTestRequest) -> HttpTestResponse:
+        seen.append(request)
+        result = results[min(len(seen), len(results)) - 1]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    return seen, handler
+
+
+def _connect_error() -> aiohttp.ClientConnectorError:
+    return aiohttp.ClientConnectorError(connection_key=None, os_error=OSError('refused'))  # type: ignore[arg-type]
+
+
+async def test_session_is_reused_and_recreated_after_close():
+    registry = HttpClientRegistry()
+    registry.register('provider', HttpClientConfig(limit=7, limit_per_host=3, dns_cache_ttl=60))
+
+    session = registry.session('provider')
+    try:
+        assert registry.session('provider') is session
+        assert session.connector.limit == 7
+        assert session.connector.limit_per_host == 3
+    finally:
+        await registry.close()
+
+    assert session.closed
+    fresh = registry.session('provider')
+    assert fresh is not session
+    await registry.close()
+
+
+def test_unregistered_client_is_rejected():
+    with pytest.raises(KeyError, match='not_registered'):
+        HttpClientRegistry().session('not_registered')
+
+
+async def test_idempotent_request_retries_on_gateway_status():
+    registry = HttpClientRegistry()
+    registry.register('provider', HttpClientConfig(retries=2))
+    seen, handler = _scripted([HttpTestResponse(503), HttpTestResponse(200, json={'ok': True})])
+
+    with registry.test_transport(handler):
+        async with registry.request('provider', 'GET', 'https://api.test/status', params={'id': 1}) as response:
+            assert response.status == 200
+            assert await response.json() == {'ok': True}
+
+    assert [(request.method, request.params) for request in seen] == [('GET', {'id': 1})] * 2
+
+
+async def test_post_is_not_retried_on_status_or_timeout():
+    registry = HttpClientRegistry()
+    registry.register('provider', HttpClientConfig(retries=2))
+
+    seen, handler = _scripted([HttpTestResponse(503), HttpTestResponse(200)])
+    with registry.test_transport(handler):
+        async with registry.request('provider', 'POST', 'https://api.test/pay', json={'a': 1}) as response:
+            assert response.status == 503
+    assert len(seen) == 1 and seen[0].json == {'a': 1}
+
+    seen, handler = _scripted([TimeoutError()])
+    with registry.test_transport(handler), pytest.raises(TimeoutError):
+        async with registry.request('provider', 'POST', 'https://api.test/pay'):
+            pass
+    assert len(seen) == 1
+
+
+async def test_connect_errors_are_retried_for_any_method():
+    registry = HttpClientRegistry()
+    registry.register('provider', HttpClientConfig(retries=1))
+
+    seen, handler = _scripted([_connect_error(), HttpTestResponse(201, text='created')])
+    with registry.test_transport(handler):
+        async with registry.request('provider', 'POST', 'https://api.test/pay') as response:
+            assert await response.text() == 'created'
+    assert len(seen) == 2
+
+    seen, handler = _scripted([_connect_error()])
+    with registry.test_transport(handler), pytest.raises(aiohttp.ClientConnectorError):
+        async with registry.request('provider', 'POST', 'https://api.test/pay'):
+            pass
+    assert len(seen) == 2
+
+
+async def test_httpx_client_goes_through_test_transport():
+    registry = HttpClientRegistry()
+    registry.register('provider', HttpClientConfig(headers={'X-Shop': 'shop'}))
+    seen, handler = _scripted([HttpTestResponse(200, json={'Success': True})])
+
+    with registry.test_transport(handler):
+        client = registry.httpx_client('provider')
+        assert registry.httpx_client('provider') is client
+        response = await client.post('https://api.test/payments?lang=ru', json={'Amount': 10})
+        await registry.close()
+
+    assert response.json() == {'Success': True}
+    assert seen[0].url == 'https://api.test/payments'
+    assert seen[0].params == {'lang': 'ru'}
+    assert seen[0].json == {'Amount': 10}
+    assert seen[0].headers['x-shop'] == 'shop'
+    assert client.is_closed
+
+
+def test_session_of_finished_loop_is_released_when_replaced():
+    registry = HttpClientRegistry()
+    registry.register('provider')
+
+    async def open_session() -> aiohttp.ClientSession:
+        return registry.session('provider')
+
+    stale = asyncio.run(open_session())
+    assert not stale.closed
+
+    async def replace() -> aiohttp.ClientSession:
+        fresh = registry.session('provider')
+        await registry.close()
+        return fresh
+
+    fresh = asyncio.run(replace())
+
+    assert fresh is not stale
+    assert stale.closed
+
+
+async def test_nalogo_client_reuses_shared_httpx_client():
+    from app.lib.nalogo._http import AsyncHTTPClient, AuthProvider
+
+    class _Auth(AuthProvider):
+        async def get_token(self):
+            return {'token': 't'}
+
+        async def refresh(self, refresh_token):
+            return None
+
+    registry = HttpClientRegistry()
+    registry.register('nalogo')
+    seen, handler = _scripted([HttpTestResponse(200, json={'ok': True})])
+    clients = []
+
+    def factory():
+        clients.append(registry.httpx_client('nalogo'))
+        return clients[-1]
+
+    with registry.test_transport(handler):
+        api = AsyncHTTPClient('https://lknpd.test/api/v1', _Auth(), client_factory=factory)
+        await api.get('/user')
+        await api.get('/user')
+        assert clients[0] is clients[1]
+        assert not clients[0].is_closed
+        await registry.close()
+
+    assert len(seen) == 2
+    assert seen[0].headers['authorization'] == 'Bearer t'
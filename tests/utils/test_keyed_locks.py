@@ -0,0 +1,147 @@
+"""Тесты распределённых keyed-блокировок (app.utils.keyed_locks)."""
+
+import asyncio
+
+import pytest
+
+from app.utils import keyed_locks
+from app.utils.keyed_locks import KeyedLock, KeyedLockTimeout, RedisLockBackend, register_keyed_lock
+from app.utils.metrics import metrics
+
+
+class FakeLockRedis:
+    """Эмулирует три Lua-скрипта RedisLockBackend поверх словаря (без TTL)."""
+
+    def __init__(self) -> None:
+        self.values: dict[str, str] = {}
+        self.counters: dict[str, int] = {}
+        self.fail = False
+
+    async def script_load(self, script: str) -> str:
+        return script
+
+    async def evalsha(self, sha: str, numkeys: int, *args):
+        if self.fail:
+            raise ConnectionError('redis is down')
+        keys, argv = args[:numkeys], args[numkeys:]
+        if sha == RedisLockBackend._ACQUIRE_SCRIPT:
+            if keys[0] in self.values:
+                return 0
+            self.values[keys[0]] = argv[0]
+            self.counters[keys[1]] = self.counters.get(keys[1], 0) + 1
+            return self.counters[keys[1]]
+        if sha == RedisLockBackend._RENEW_SCRIPT:
+            return int(self.values.get(keys[0]) == argv[0])
+        if sha == RedisLockBackend._RELEASE_SCRIPT:
+            if self.values.get(keys[0]) == argv[0]:
+                del self.values[keys[0]]
+                return 1
+            return 0
+        raise AssertionError('unexpected script')
+
+
+def _lock(redis: FakeLockRedis | None = None, **kwargs) -> KeyedLock:
+    return KeyedLock('test', redis_client_factory=lambda: redis, **kwargs)
+
+
+async def _overlap_on_same_key(first: KeyedLock, second: KeyedLock) -> int:
+    inside = 0
+    peak = 0
+
+    async def worker(lock: KeyedLock) -> None:
+        nonlocal inside, peak
+        async with lock.hold(42):
+            inside += 1
+            peak = max(peak, inside)
+            await asyncio.sleep(0.02)
+            inside -= 1
+
+    await asyncio.gather(worker(first), worker(second), worker(first))
+    return peak
+
+
+async def test_local_lock_serialises_same_key() -> None:
+    lock = _lock()
+
+    assert await _overlap_on_same_key(lock, lock) == 1
+    assert lock.stats.acquired == 3
+    assert lock.stats.contended >= 1
+    assert lock.stats.holders == 0
+
+
+async def test_two_replicas_share_redis_lease() -> None:
+    redis = FakeLockRedis()
+    replica_a = _lock(redis)
+    replica_b = _lock(redis)
+
+    assert await _overlap_on_same_key(replica_a, replica_b) == 1
+    assert redis.values == {}
+
+
+async def test_fencing_tokens_increase() -> None:
+    redis = FakeLockRedis()
+    replica_a = _lock(redis)
+    replica_b = _lock(redis)
+
+    async with replica_a.hold(1) as first:
+        pass
+    async with replica_b.hold(1) as second:
+        pass
+
+    assert first.distributed is True
+    assert second.fencing_token > first.fencing_token
+
+
+async def test_redis_failure_falls_back_to_local() -> None:
+    redis = FakeLockRedis()
+    redis.fail = True
+    lock = _lock(redis)
+
+    async with lock.hold(7) as lease:
+        assert lease.distributed is False
+
+    assert lock.stats.fallbacks == 1
+
+
+async def test_remote_holder_times_out() -> None:
+    redis = FakeLockRedis()
+    redis.values['lock:test:9'] = 'someone-else'
+    lock = _lock(redis, acquire_timeout=0.05)
+
+    with pytest.raises(KeyedLockTimeout):
+        async with lock.hold(9):
+            pass
+
+    assert lock.stats.timeouts == 1
+    # Чужая аренда не тронута
+    assert redis.values['lock:test:9'] == 'someone-else'
+
+
+async def test_lost_lease_is_flagged() -> None:
+    redis = FakeLockRedis()
+    lock = _lock(redis, ttl_ms=30)
+
+    async with lock.hold(3) as lease:
+        redis.values.clear()  # аренда истекла и ключ забрал кто-то другой
+        await asyncio.sleep(0.05)
+
+    assert lease.lost is True
+    assert lock.stats.lost == 1
+
+
+def test_stripes_bound_memory() -> None:
+    lock = _lock(stripes=8)
+
+    assert {id(lock._stripe(str(key))) for key in range(10_000)} <= {id(stripe) for stripe in lock._stripes}
+    assert len(lock._stripes) == 8
+
+
+async def test_registered_lock_stats_are_exported_as_metrics(monkeypatch) -> None:
+    monkeypatch.setattr(keyed_locks, '_registered_locks', {})
+    lock = register_keyed_lock(KeyedLock('metrics_test', redis_client_factory=lambda: None))
+
+    async with lock.hold(1):
+        pass
+
+    rendered = await metrics.render()
+    assert 'keyed_lock_stats{namespace="metrics_test",stat="acquired"} 1' in rendered
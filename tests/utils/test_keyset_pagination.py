@@ -0,0 +1,138 @@
+"""Keyset-курсоры админских списков: обход страниц совпадает с OFFSET-листанием."""
+
+import itertools
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.database.crud.user import (
+    get_referrals_page,
+    get_referrals_total,
+    get_users_list,
+    get_users_total,
+    referrals_next_cursor,
+    users_next_cursor,
+)
+from app.database.models import (
+    PromoGroup,
+    ServerSquad,
+    Subscription,
+    Tariff,
+    User,
+    UserPromoGroup,
+    UserStatus,
+    server_squad_promo_groups,
+)
+from app.utils import pagination
+from app.utils.pagination import InvalidCursorError, decode_keyset_cursor, encode_keyset_cursor
+from tests.fixtures.sqlite_memory import memory_session
+
+
+_telegram_ids = itertools.count(9000)
+
+USER_TABLES = (
+    PromoGroup.__table__,
+    ServerSquad.__table__,
+    server_squad_promo_groups,
+    User.__table__,
+    UserPromoGroup.__table__,
+    Tariff.__table__,
+    Subscription.__table__,
+)
+
+
+async def _seed_users(db, count: int, referrer_id: int | None = None) -> list[User]:
+    base = datetime(2026, 1, 1, tzinfo=UTC)
+    users = [
+        User(
+            telegram_id=next(_telegram_ids),
+            status=UserStatus.ACTIVE.value,
+            # Пары одинаковых created_at/balance — проверка тай-брейка по id на границе страниц
+            created_at=base + timedelta(hours=index // 2),
+            balance_kopeks=(index % 3) * 100,
+            referred_by_id=referrer_id,
+        )
+        for index in range(count)
+    ]
+    db.add_all(users)
+    await db.commit()
+    return users
+
+
+def test_cursor_roundtrip_and_scope_check():
+    moment = datetime(2026, 5, 1, 12, 30, tzinfo=UTC)
+    cursor = encode_keyset_cursor('users:created_at', [moment, 42])
+
+    assert decode_keyset_cursor(cursor, 'users:created_at') == [moment, 42]
+    with pytest.raises(InvalidCursorError):
+        decode_keyset_cursor(cursor, 'users:balance')
+    with pytest.raises(InvalidCursorError):
+        decode_keyset_cursor('not-a-cursor', 'users:created_at')
+
+
+@pytest.mark.parametrize('flag', [None, 'order_by_balance'])
+async def test_users_cursor_walk_matches_offset_pages(monkeypatch, flag):
+    sort = 'balance' if flag else 'created_at'
+    kwargs = {flag: True} if flag else {}
+    async with memory_session(monkeypatch, USER_TABLES) as db:
+        await _seed_users(db, 11)
+
+        expected = [user.id for user in await get_users_list(db, limit=100, **kwargs)]
+
+        walked: list[int] = []
+        cursor = None
+        for _ in range(10):
+            page = await get_users_list(db, limit=4, cursor=cursor, **kwargs)
+            walked.extend(user.id for user in page)
+            cursor = users_next_cursor(page, sort, 4)
+            if cursor is None:
+                break
+
+        assert walked == expected
+        assert await get_users_total(db) == (11, False)
+
+
+async def test_users_cursor_rejected_for_offset_only_sort(monkeypatch):
+    async with memory_session(monkeypatch, USER_TABLES) as db:
+        cursor = encode_keyset_cursor('users:created_at', [datetime.now(UTC), 1])
+        with pytest.raises(InvalidCursorError):
+            await get_users_list(db, order_by_last_activity=True, cursor=cursor)
+
+
+async def test_referrals_are_paged_in_sql(monkeypatch):
+    async with memory_session(monkeypatch, USER_TABLES) as db:
+        (referrer,) = await _seed_users(db, 1)
+        referrals = await _seed_users(db, 5, referrer_id=referrer.id)
+        await _seed_users(db, 2)
+
+        first = await get_referrals_page(db, referrer.id, limit=3)
+        second = await get_referrals_page(db, referrer.id, limit=3, cursor=referrals_next_cursor(first, referrer.id, 3))
+
+        assert len(first) == 3
+        assert len(second) == 2
+        assert {user.id for user in first + second} == {user.id for user in referrals}
+        assert referrals_next_cursor(second, referrer.id, 3) is None
+        assert await get_referrals_total(db, referrer.id) == (5, False)
+
+
+async def test_estimated_total_uses_cached_count(monkeypatch):
+    stored: dict[str, int] = {}
+
+    async def fake_get(key):
+        return stored.get(key)
+
+    async def fake_set(key, value, expire=None):
+        stored[key] = value
+        return True
+
+    monkeypatch.setattr(pagination.cache, 'get', fake_get)
+    monkeypatch.setattr(pagination.cache, 'set', fake_set)
+
+    async with memory_session(monkeypatch, USER_TABLES) as db:
+        await _seed_users(db, 3)
+
+        assert await get_users_total(db, estimate=True) == (3, False)
+        await _seed_users(db, 1)
+        # Второй запрос в пределах TTL берёт закешированное значение и помечает его оценкой
+        assert await get_users_total(db, estimate=True) == (3, True)
+        assert await get_users_total(db) == (4, False)
@@ -0,0 +1,87 @@
+"""Реестр метрик: формат Prometheus, защита от кардинальности, SQL и Redis на запрос."""
+
+from __future__ import annotations
+
+from sqlalchemy import select
+
+import app.database.database  # noqa: F401 — регистрирует обработчики событий engine
+from app.database.models import User
+from app.utils import metrics as module
+from app.utils.metrics import MetricsRegistry, db_query_scope, instrument_redis_client, normalize_path
+from tests.fixtures.sqlite_memory import memory_session
+
+
+async def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('op_seconds', 'Время операции', ('op',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.labels('a"b').observe(value)
+
+    text = await registry.render()
+
+    assert '# TYPE op_seconds histogram' in text
+    assert 'op_seconds_bucket{op="a\\"b",le="0.1"} 2' in text
+    assert 'op_seconds_bucket{op="a\\"b",le="1"} 3' in text
+    assert 'op_seconds_bucket{op="a\\"b",le="+Inf"} 4' in text
+    assert 'op_seconds_count{op="a\\"b"} 4' in text
+    assert 'op_seconds_sum{op="a\\"b"} 3.65' in text
+
+
+async def test_series_over_limit_collapse_into_overflow_series():
+    registry = MetricsRegistry()
+    counter = registry.counter('hits_total', 'Попадания', ('path',), max_series=2)
+
+    for index in range(10):
+        counter.labels(f'/users/{index}').inc()
+
+    text = await registry.render()
+    assert text.count('hits_total{') == 3
+    assert 'hits_total{path="__overflow__"} 8' in text
+
+
+async def test_collectors_fill_gauges_at_render_time():
+    registry = MetricsRegistry()
+    gauge = registry.gauge('queue_depth', 'Глубина', ('queue',))
+    depth = {'value': 3}
+
+    async def collect():
+        gauge.labels('emails').set(depth['value'])
+
+    registry.add_collector('emails', collect)
+    assert 'queue_depth{queue="emails"} 3' in await registry.render()
+    depth['value'] = 0
+    assert 'queue_depth{queue="emails"} 0' in await registry.render()
+
+
+def test_normalize_path_replaces_identifiers():
+    assert normalize_path('/api/users/123') == '/api/users/:id'
+    assert normalize_path('/api/users/by-short-uuid/Ab3dEfGh1jKlMn') == '/api/users/by-short-uuid/:id'
+    assert normalize_path('/api/hwid/devices/4f9b1c2e-7a1d-4c8e-9d3a-0b6f5e2d1c7a?x=1') == '/api/hwid/devices/:id'
+    assert normalize_path('/api/internal-squads') == '/api/internal-squads'
+
+
+async def test_db_query_scope_counts_statements(monkeypatch):
+    per_request = module.DB_QUERIES_PER_REQUEST.labels('test')
+    before = (sum(per_request.counts), per_request.sum)
+
+    async with memory_session(monkeypatch, [User.__table__]) as session:
+        with db_query_scope('test'):
+            await session.execute(select(User.id))
+            await session.execute(select(User.id).where(User.id == 1))
+
+    assert (sum(per_request.counts), per_request.sum) == (before[0] + 1, before[1] + 2)
+
+
+async def test_redis_commands_are_timed():
+    class _Client:
+        async def execute_command(self, *args, **options):
+            return 'PONG'
+
+    client = _Client()
+    instrument_redis_client(client)
+    instrument_redis_client(client)
+    ping = module.REDIS_COMMAND_SECONDS.labels('PING')
+    before = sum(ping.counts)
+
+    assert await client.execute_command('PING') == 'PONG'
+    assert sum(ping.counts) == before + 1
@@ -0,0 +1,150 @@
+"""Тесты графа этапов запуска (app.utils.startup_graph)."""
+
+import asyncio
+
+import pytest
+import structlog
+
+from app.utils.startup_graph import StartupGraph, StartupGraphError
+from app.utils.startup_timeline import StartupTimeline
+
+
+def _graph() -> StartupGraph:
+    return StartupGraph(StartupTimeline(structlog.get_logger('test'), 'test'))
+
+
+async def test_independent_stages_run_concurrently_after_dependency() -> None:
+    graph = _graph()
+    order: list[str] = []
+    running = 0
+    peak = 0
+
+    async def root() -> None:
+        order.append('root')
+
+    def leaf(name: str):
+        async def run() -> None:
+            nonlocal running, peak
+            assert order[0] == 'root'
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+            order.append(name)
+
+        return run
+
+    graph.add('root', root)
+    graph.add('a', leaf('a'), after=['root'])
+    graph.add('b', leaf('b'), after=['root'])
+
+    await graph.run()
+
+    assert peak == 2
+    assert sorted(order[1:]) == ['a', 'b']
+
+
+async def test_failure_cancels_siblings_and_reraises_original_error() -> None:
+    graph = _graph()
+    cancelled = False
+
+    async def broken() -> None:
+        raise ValueError('migration failed')
+
+    async def slow() -> None:
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    graph.add('broken', broken)
+    graph.add('slow', slow)
+
+    with pytest.raises(ValueError, match='migration failed'):
+        await graph.run()
+    assert cancelled
+    assert graph.stages['broken'].failed
+
+
+async def test_dependents_of_failed_stage_do_not_run() -> None:
+    graph = _graph()
+    calls: list[str] = []
+
+    async def migration() -> None:
+        raise ValueError('migration failed')
+
+    async def dependent() -> None:
+        calls.append('dependent')
+
+    async def transitive() -> None:
+        calls.append('transitive')
+
+    graph.add('migration', migration)
+    graph.add('database', dependent, after=['migration'])
+    graph.add('services', transitive, after=['database'])
+
+    with pytest.raises(ValueError, match='migration failed'):
+        await graph.run()
+    assert calls == []
+    assert graph.stages['database'].started_at is None
+    assert graph.stages['services'].started_at is None
+
+
+async def test_deferred_stages_run_in_background() -> None:
+    graph = _graph()
+    calls: list[str] = []
+
+    async def eager() -> None:
+        calls.append('eager')
+
+    async def deferred() -> None:
+        calls.append('deferred')
+
+    graph.add('eager', eager)
+    graph.add('deferred', deferred, after=['eager'], deferred=True)
+
+    await graph.run()
+    assert calls == ['eager']
+
+    graph.mark_serving()
+    summaries: list[bool] = []
+    graph.timeline.log_summary = lambda: summaries.append(True)
+    task = graph.start_deferred()
+    assert not graph.report_logged
+    await task
+
+    assert calls == ['eager', 'deferred']
+    # Резюме запуска логируется один раз — после отложенных этапов
+    assert graph.report_logged
+    graph.log_report()
+    assert summaries == [True]
+    report = graph.report_lines()
+    assert any('deferred (отложен)' in line for line in report)
+    assert report[-1].startswith('До приёма обновлений')
+
+
+async def test_invalid_graphs_are_rejected() -> None:
+    async def noop() -> None:
+        return
+
+    cyclic = _graph()
+    cyclic.add('a', noop, after=['b'])
+    cyclic.add('b', noop, after=['a'])
+    with pytest.raises(StartupGraphError):
+        await cyclic.run()
+
+    unknown = _graph()
+    unknown.add('a', noop, after=['missing'])
+    with pytest.raises(StartupGraphError):
+        await unknown.run()
+
+    eager_on_deferred = _graph()
+    eager_on_deferred.add('late', noop, deferred=True)
+    eager_on_deferred.add('early', noop, after=['late'])
+    with pytest.raises(StartupGraphError):
+        await eager_on_deferred.run()
+
+    with pytest.raises(StartupGraphError):
+        unknown.add('a', noop)
@@ -0,0 +1,75 @@
+"""Секции ответа /miniapp/subscription: параллельно, в своих сессиях, в пределах бюджета."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+
+from app.webapi.routes import miniapp
+
+
+def _track_sessions(monkeypatch) -> list[object]:
+    opened: list[object] = []
+
+    @contextlib.asynccontextmanager
+    async def session_factory():
+        session = object()
+        opened.append(session)
+        yield session
+
+    monkeypatch.setattr(miniapp, 'AsyncSessionLocal', session_factory)
+    return opened
+
+
+async def test_sections_run_concurrently_on_separate_sessions(monkeypatch):
+    opened = _track_sessions(monkeypatch)
+    seen: list[object] = []
+
+    def section(value):
+        async def load(section_db):
+            seen.append(section_db)
+            await asyncio.sleep(0.05)
+            return value
+
+        return load
+
+    started = time.monotonic()
+    results = await miniapp._load_response_sections(
+        {name: (section(name.upper()), None) for name in ('a', 'b', 'c', 'd')},
+        budget=5,
+    )
+
+    assert results == {'a': 'A', 'b': 'B', 'c': 'C', 'd': 'D'}
+    assert time.monotonic() - started < 0.15
+    assert len(set(map(id, seen))) == 4
+    assert seen == opened
+
+
+async def test_slow_or_failing_sections_fall_back_to_defaults(monkeypatch):
+    _track_sessions(monkeypatch)
+    cancelled: list[bool] = []
+
+    async def slow(section_db):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return 'late'
+
+    async def broken(section_db):
+        raise RuntimeError('db is down')
+
+    async def fast(section_db):
+        return [1]
+
+    started = time.monotonic()
+    results = await miniapp._load_response_sections(
+        {'slow': (slow, 'default'), 'broken': (broken, []), 'fast': (fast, [])},
+        budget=0.1,
+    )
+
+    assert results == {'slow': 'default', 'broken': [], 'fast': [1]}
+    assert time.monotonic() - started < 1
+    assert cancelled == [True]
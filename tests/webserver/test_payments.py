@@ -30,6 +30,8 @@ def reset_settings(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setattr(settings, 'YOOKASSA_TRUSTED_PROXY_NETWORKS', '', raising=False)
     monkeypatch.setattr(settings, 'YOOKASSA_SKIP_IP_CHECK', False, raising=False)
     monkeypatch.setattr(settings, 'WEBHOOK_URL', 'http://test', raising=False)
+    # Тесты ниже проверяют обработку внутри запроса; inbox — в test_payment_webhook_inbox
+    monkeypatch.setattr(settings, 'PAYMENT_WEBHOOK_INBOX_ENABLED', False, raising=False)
 
 
 def _get_route(router, path: str, method: str = 'POST'):